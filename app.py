@@ -9,11 +9,17 @@ from cotizador import (
     safe_float, safe_int, validate_material_data,
     wrap_description_text, generar_pdf_reportlab, generar_desglose_pdf_reportlab
 )
+from pricing_engine import aplicar_a_items, resumen_cotizacion, totales_cotizaciones, subtotal_material, leer_numero
+from structured_logging import Perezoso, logger_debug, volcado_json
+from job_queue import ESTADOS as ESTADOS_TRABAJO, PRIORIDAD_ALTA, PRIORIDAD_BAJA, PRIORIDAD_NORMAL, ErrorPermanente
+from cotizador.http_cache import (CWS_COMPANY_ID, con_etag, etag_cotizacion, etag_listado, no_modificada,
+                                  respuesta_no_modificada)
 
 # ── Imports estándar usados por las rutas ──
-from flask import Flask, render_template, render_template_string, request, jsonify, send_file, session, redirect, url_for, g
+from flask import Flask, render_template, render_template_string, request, jsonify, send_file, session, redirect, url_for, g, Response, stream_with_context
 import io
 import datetime
+import time
 import atexit
 import os
 import json
@@ -26,24 +32,8 @@ from logging.handlers import RotatingFileHandler
 import copy
 from dotenv import load_dotenv
     
-# Crear instancia de Render Keepalive (solo en producción)
-try:
-    from render_keepalive import init_keepalive, get_keepalive_instance
-
-    # Inicializar keepalive - se activa automáticamente solo en Render
-    keepalive = init_keepalive()
-    print("Render Keepalive inicializado exitosamente")
-
-    # Mostrar estadísticas si está activo
-    if keepalive.is_running:
-        stats = keepalive.get_stats()
-        print(f"Keepalive activo - {stats['schedule']}")
-    else:
-        print("Keepalive en standby - Solo se activa en producción (Render)")
-
-except Exception as e:
-    print(f"Error inicializando Render Keepalive: {e}")
-    keepalive = None
+# Render Keepalive: servicio 'keepalive' del registro (cotizador/services.py),
+# arranca en el calentamiento y solo en el proceso líder
 
 # ===========================================
 # FUNCIONES AUXILIARES PARA CONVERSIÓN ROBUSTA
@@ -100,13 +90,13 @@ def safe_float(value, default=0.0):
         
         # Validar que el resultado es razonable
         if abs(result) > 1e10:  # Muy grande
-            print(f"[SAFE_FLOAT] Valor muy grande detectado: {result}, usando default")
+            logger.info("[SAFE_FLOAT] Valor muy grande detectado: %s, usando default", result)
             return default
         
         return result
         
     except (ValueError, TypeError, AttributeError) as e:
-        print(f"[SAFE_FLOAT] Error convirtiendo '{value}' a float: {e}")
+        logger.error("[SAFE_FLOAT] Error convirtiendo '%s' a float: %s", value, e)
         return default
 
 def safe_int(value, default=0):
@@ -126,7 +116,7 @@ def validate_material_data(material, item_index=0, material_index=0):
         dict: Material validado y limpio
     """
     if not isinstance(material, dict):
-        print(f"[VALIDATE] Item {item_index}, Material {material_index}: No es dict válido")
+        logger.info("[VALIDATE] Item %s, Material %s: No es dict válido", item_index, material_index)
         return {
             'descripcion': 'Material inválido',
             'peso': 1.0,
@@ -138,32 +128,32 @@ def validate_material_data(material, item_index=0, material_index=0):
     # Obtener descripción
     descripcion = material.get('descripcion') or material.get('material', 'Sin descripción')
     
-    # Convertir valores numéricos con validación
-    peso = safe_float(material.get('peso'), 1.0)
-    cantidad = safe_float(material.get('cantidad'), 0.0)
-    precio = safe_float(material.get('precio'), 0.0)
+    # Valores ya normalizados al guardar (filas sin migrar se convierten aquí)
+    peso = leer_numero(material.get('peso'), 1.0)
+    cantidad = leer_numero(material.get('cantidad'), 0.0)
+    precio = leer_numero(material.get('precio'), 0.0)
     
     # Validaciones específicas - CONSERVAR VALORES ORIGINALES EN REVISIONES
     if peso < 0:
         peso = 0.0  # Solo corregir valores negativos, no cambiar valores válidos
         
     if cantidad < 0:
-        print(f"[VALIDATE] Cantidad negativa detectada: {cantidad}, corrigiendo a 0")
+        logger.info("[VALIDATE] Cantidad negativa detectada: %s, corrigiendo a 0", cantidad)
         cantidad = 0.0
         
     if precio < 0:
-        print(f"[VALIDATE] Precio negativo detectado: {precio}, corrigiendo a 0")
+        logger.info("[VALIDATE] Precio negativo detectado: %s, corrigiendo a 0", precio)
         precio = 0.0
     
     # Calcular subtotal
-    subtotal = round(peso * cantidad * precio, 2)
+    subtotal = subtotal_material(peso, cantidad, precio)
     
     # Log de conversión para debugging
-    print(f"[VALIDATE] Item {item_index}, Material {material_index}: {descripcion}")
-    print(f"   Peso: {material.get('peso')} -> {peso}")
-    print(f"   Cantidad: {material.get('cantidad')} -> {cantidad}")
-    print(f"   Precio: {material.get('precio')} -> {precio}")
-    print(f"   Subtotal calculado: {subtotal}")
+    logger.info("[VALIDATE] Item %s, Material %s: %s", item_index, material_index, descripcion)
+    logger.info("   Peso: %s -> %s", material.get('peso'), peso)
+    logger.info("   Cantidad: %s -> %s", material.get('cantidad'), cantidad)
+    logger.info("   Precio: %s -> %s", material.get('precio'), precio)
+    logger.info("   Subtotal calculado: %s", subtotal)
     
     return {
         'descripcion': descripcion,
@@ -184,9 +174,9 @@ def cargar_materiales_csv():
     
     # Detectar entorno
     es_render = os.getenv('RENDER') or os.getenv('RENDER_SERVICE_NAME')
-    print(f"[MATERIALES] Entorno Render detectado: {bool(es_render)}")
-    print(f"[MATERIALES] Directorio actual: {os.getcwd()}")
-    print(f"[MATERIALES] __file__ path: {__file__}")
+    logger.info("[MATERIALES] Entorno Render detectado: %s", bool(es_render))
+    logger.info("[MATERIALES] Directorio actual: %s", os.getcwd())
+    logger.info("[MATERIALES] __file__ path: %s", __file__)
     
     try:
         # Intentar múltiples rutas posibles
@@ -199,23 +189,23 @@ def cargar_materiales_csv():
         
         archivo_encontrado = None
         for ruta_csv in rutas_posibles:
-            print(f"[MATERIALES] Intentando cargar CSV desde: {ruta_csv}")
+            logger.info("[MATERIALES] Intentando cargar CSV desde: %s", ruta_csv)
             if os.path.exists(ruta_csv):
                 archivo_encontrado = ruta_csv
-                print(f"[MATERIALES] Archivo CSV encontrado en: {ruta_csv}")
+                logger.info("[MATERIALES] Archivo CSV encontrado en: %s", ruta_csv)
                 break
             else:
-                print(f"[MATERIALES] No encontrado en: {ruta_csv}")
+                logger.warning("[MATERIALES] No encontrado en: %s", ruta_csv)
         
         if not archivo_encontrado:
             raise FileNotFoundError("No se encontró el archivo 'Lista de materiales.csv' en ninguna ubicación")
         
         # Cargar el CSV
-        print(f"[MATERIALES] Cargando CSV desde: {archivo_encontrado}")
+        logger.info("[MATERIALES] Cargando CSV desde: %s", archivo_encontrado)
         with open(archivo_encontrado, 'r', encoding='utf-8-sig') as archivo:
             contenido = archivo.read()
-            print(f"[MATERIALES] Tamaño del archivo: {len(contenido)} caracteres")
-            print(f"[MATERIALES] Primeras 200 caracteres: {contenido[:200]}")
+            logger.info("[MATERIALES] Tamaño del archivo: %s caracteres", len(contenido))
+            logger.info("[MATERIALES] Primeras 200 caracteres: %s", contenido[:200])
             
             # Resetear puntero del archivo
             archivo.seek(0)
@@ -223,7 +213,7 @@ def cargar_materiales_csv():
             
             # Verificar headers
             headers = reader.fieldnames
-            print(f"[MATERIALES] Headers encontrados: {headers}")
+            logger.info("[MATERIALES] Headers encontrados: %s", headers)
             
             for i, fila in enumerate(reader):
                 try:
@@ -267,25 +257,25 @@ def cargar_materiales_csv():
                     materiales.append(material)
                     
                 except Exception as fila_error:
-                    print(f"[MATERIALES] Error procesando fila {i+1}: {fila_error}")
+                    logger.error("[MATERIALES] Error procesando fila %s: %s", i + 1, fila_error)
                     continue
                     
-        print(f"[MATERIALES] Cargados {len(materiales)} materiales desde CSV")
+        logger.info("[MATERIALES] Cargados %s materiales desde CSV", len(materiales))
         
         # Mostrar algunos ejemplos
         if materiales:
-            print(f"[MATERIALES] Ejemplos cargados:")
+            logger.info("[MATERIALES] Ejemplos cargados:")
             for i, mat in enumerate(materiales[:3]):
-                print(f"  {i+1}. {mat['descripcion']} - {mat['peso']} {mat['uom']}")
+                logger.info("  %s. %s - %s %s", i + 1, mat['descripcion'], mat['peso'], mat['uom'])
         
     except Exception as e:
-        print(f"[MATERIALES] Error cargando materiales: {e}")
-        print(f"[MATERIALES] Tipo de error: {type(e).__name__}")
+        logger.error("[MATERIALES] Error cargando materiales: %s", e)
+        logger.error("[MATERIALES] Tipo de error: %s", type(e).__name__)
         
         # Lista archivos del directorio para debug
         try:
             archivos = os.listdir(os.path.dirname(__file__) or '.')
-            print(f"[MATERIALES] Archivos en directorio: {archivos}")
+            logger.info("[MATERIALES] Archivos en directorio: %s", archivos)
         except:
             pass
         
@@ -298,7 +288,7 @@ def cargar_materiales_csv():
             {'descripcion': 'Tubo estructural', 'peso': 1.0, 'uom': 'kg/ml'},
             {'descripcion': 'Material personalizado', 'peso': 1.0, 'uom': 'Especificar'}
         ]
-        print(f"[MATERIALES] Usando {len(materiales)} materiales por defecto")
+        logger.info("[MATERIALES] Usando %s materiales por defecto", len(materiales))
     
     return materiales
 
@@ -380,6 +370,13 @@ db_manager = app.extensions['db_manager']
 pdf_manager = app.extensions['pdf_manager']
 sync_scheduler = app.extensions.get('sync_scheduler')
 LISTA_MATERIALES = app.config.get('LISTA_MATERIALES', [])
+catalogo_materiales = app.extensions.get('catalogo_materiales')
+
+# ── Loggers (pipeline asíncrono de structured_logging) ──
+logger = logging.getLogger('cotizador.app')
+log_form = logger_debug('formulario')
+log_issue1 = logger_debug('issue1')
+log_listado = logger_debug('listado')
 
 def verificar_revision_mas_reciente(numero_cotizacion, db_manager):
     """
@@ -389,147 +386,35 @@ def verificar_revision_mas_reciente(numero_cotizacion, db_manager):
     - revision_actual: int
     - revision_maxima: int
     - numero_ultima_revision: str
+    - historial_revisiones: list (más reciente primero)
     """
     try:
-        print(f"\n[VERIFICAR_REVISION] ========== INICIO VERIFICACIÓN ==========")
-        print(f"[VERIFICAR_REVISION] Número cotización a verificar: {numero_cotizacion}")
-
-        # Extraer el número base y revisión actual
-        # Formato típico: CLIENTE-CWS-VENDOR-###-R#-PROYECTO
-        partes = numero_cotizacion.split('-')
-        print(f"[VERIFICAR_REVISION] Partes del número: {partes}")
-
-        revision_actual = 1
-        indice_revision = -1
-
-        for i, parte in enumerate(partes):
-            if parte.startswith('R') and len(parte) > 1:
-                try:
-                    revision_actual = int(parte[1:])
-                    indice_revision = i
-                    print(f"[VERIFICAR_REVISION] Encontrada revisión R{revision_actual} en índice {i}")
-                    break
-                except ValueError:
-                    print(f"[VERIFICAR_REVISION] Parte '{parte}' parece revisión pero no es número válido")
-                    continue
-
-        if indice_revision == -1:
-            print(f"[VERIFICAR_REVISION] ⚠️ No se encontró revisión en formato R# - Asumiendo es la más reciente")
-            return {
-                'es_mas_reciente': True,
-                'revision_actual': 1,
-                'revision_maxima': 1,
-                'numero_ultima_revision': numero_cotizacion
-            }
-
-        # Construir patrón base (sin R#)
-        # Ejemplo: BMW-CWS-RAE-001-R2-PROYECTO -> BMW-CWS-RAE-001-PROYECTO
-        patron_base = '-'.join(partes[:indice_revision] + partes[indice_revision+1:])
-
-        # También crear versión simplificada para búsqueda más amplia
-        # Buscar por las primeras 4 partes (CLIENTE-CWS-VENDOR-###)
-        patron_busqueda = '-'.join(partes[:min(4, len(partes))])
-
-        print(f"[VERIFICAR_REVISION] Patrón base: {patron_base}")
-        print(f"[VERIFICAR_REVISION] Patrón búsqueda: {patron_busqueda}")
-        print(f"[VERIFICAR_REVISION] Revisión actual: R{revision_actual}")
-
-        # Buscar todas las cotizaciones relacionadas usando el patrón de búsqueda
-        print(f"[VERIFICAR_REVISION] Buscando cotizaciones con patrón: '{patron_busqueda}'")
-        resultado = db_manager.buscar_cotizaciones(patron_busqueda, page=1, per_page=100, company_id=session.get("company_id"))
-
-        # IMPORTANTE: La API puede retornar 'items' o 'resultados' dependiendo del manager
-        items_encontrados = resultado.get('items') or resultado.get('resultados') or []
-
-        if not items_encontrados:
-            print(f"[VERIFICAR_REVISION] ⚠️ No se encontraron items en la búsqueda")
-            print(f"[VERIFICAR_REVISION] Keys en resultado: {resultado.keys()}")
-            print(f"[VERIFICAR_REVISION] Resultado completo: {resultado}")
-            return {
-                'es_mas_reciente': True,
-                'revision_actual': revision_actual,
-                'revision_maxima': revision_actual,
-                'numero_ultima_revision': numero_cotizacion
-            }
-
-        print(f"[VERIFICAR_REVISION] Se encontraron {len(items_encontrados)} cotizaciones")
-
-        # Buscar revisión máxima en las cotizaciones encontradas
-        revision_maxima = revision_actual
-        numero_ultima_revision = numero_cotizacion
-        revisiones_encontradas = []
-
-        for item in items_encontrados:
-            num_cotiz = item.get('numeroCotizacion', '')
-            print(f"[VERIFICAR_REVISION] Analizando cotización: {num_cotiz}")
-
-            # Verificar que pertenezca a la misma familia (mismo patrón base)
-            # Debe contener las partes principales
-            if patron_busqueda not in num_cotiz:
-                print(f"[VERIFICAR_REVISION]   → Descartada (patrón no coincide)")
-                continue
-
-            # Extraer revisión de esta cotización
-            partes_item = num_cotiz.split('-')
-            for parte in partes_item:
-                if parte.startswith('R') and len(parte) > 1:
-                    try:
-                        rev = int(parte[1:])
-
-                        # Extraer justificación de actualización
-                        datos_generales = item.get('datosGenerales', {})
-                        justificacion = datos_generales.get('actualizacionRevision', '')
-
-                        # Extraer fecha si está disponible
-                        fecha_creacion = item.get('fechaCreacion', '')
-                        if not fecha_creacion:
-                            fecha_creacion = datos_generales.get('fecha', '')
-
-                        revisiones_encontradas.append({
-                            'numero': num_cotiz,
-                            'revision': rev,
-                            'justificacion': justificacion,
-                            'fecha': fecha_creacion
-                        })
-                        print(f"[VERIFICAR_REVISION]   → Revisión encontrada: R{rev}")
-                        if justificacion:
-                            print(f"[VERIFICAR_REVISION]   → Justificación: {justificacion[:50]}...")
-
-                        if rev > revision_maxima:
-                            revision_maxima = rev
-                            numero_ultima_revision = num_cotiz
-                            print(f"[VERIFICAR_REVISION]   → ¡Nueva revisión máxima! R{rev}")
-                        break
-                    except ValueError:
-                        continue
-
-        # Ordenar revisiones de más reciente a más antigua
-        revisiones_encontradas.sort(key=lambda x: x['revision'], reverse=True)
+        # Una sola consulta indexada por numero_base (ver migrations/v2.2_revision_family.sql)
+        familia = db_manager.obtener_familia_revisiones(
+            numero_cotizacion, company_id=session.get("company_id")
+        )
 
+        revision_actual = familia['revision_actual']
+        revision_maxima = familia['revision_maxima']
         es_mas_reciente = (revision_actual >= revision_maxima)
 
-        print(f"\n[VERIFICAR_REVISION] ========== RESULTADO ==========")
-        print(f"[VERIFICAR_REVISION] Revisiones encontradas: {len(revisiones_encontradas)}")
-        print(f"[VERIFICAR_REVISION] Revisión actual: R{revision_actual}")
-        print(f"[VERIFICAR_REVISION] Revisión máxima: R{revision_maxima}")
-        print(f"[VERIFICAR_REVISION] ¿Es la más reciente?: {es_mas_reciente}")
-        print(f"[VERIFICAR_REVISION] Última revisión: {numero_ultima_revision}")
-        print(f"[VERIFICAR_REVISION] ========== FIN VERIFICACIÓN ==========\n")
+        logger.info("[VERIFICAR_REVISION] %s: base=%s | R%s/R%s | revisiones=%s | más reciente=%s",
+                    numero_cotizacion, familia['numero_base'], revision_actual, revision_maxima, len(familia['revisiones']), es_mas_reciente)
 
         return {
             'es_mas_reciente': es_mas_reciente,
             'revision_actual': revision_actual,
             'revision_maxima': revision_maxima,
-            'numero_ultima_revision': numero_ultima_revision,
-            'historial_revisiones': revisiones_encontradas
+            'numero_ultima_revision': familia['numero_ultima_revision'],
+            'historial_revisiones': familia['revisiones']
         }
 
     except Exception as e:
-        print(f"[VERIFICAR_REVISION] ❌ ERROR: {e}")
+        logger.error("[VERIFICAR_REVISION] ❌ ERROR: %s", e)
         import traceback
         traceback.print_exc()
         # En caso de error, permitir la revisión para no bloquear el sistema
-        print(f"[VERIFICAR_REVISION] Por seguridad, permitiendo la revisión")
+        logger.info("[VERIFICAR_REVISION] Por seguridad, permitiendo la revisión")
         return {
             'es_mas_reciente': True,
             'revision_actual': 1,
@@ -588,7 +473,7 @@ def preparar_datos_nueva_revision(cotizacion_original):
         
         # Generar nuevo número de cotización con revisión usando el sistema automático
         numero_original = datos['datosGenerales'].get('numeroCotizacion', '')
-        print(f"[REVISION] Número original: '{numero_original}' -> Nueva revisión: {nueva_revision}")
+        logger.info("[REVISION] Número original: '%s' -> Nueva revisión: %s", numero_original, nueva_revision)
         
         if numero_original:
             # Usar la función del DatabaseManager para generar el número de revisión
@@ -598,29 +483,30 @@ def preparar_datos_nueva_revision(cotizacion_original):
             datos['datosGenerales']['numeroCotizacion'] = nuevo_numero
             datos['numeroCotizacion'] = nuevo_numero  # NIVEL RAÍZ también
             
-            print(f"[REVISION] Número actualizado: '{nuevo_numero}'")
-            print(f"[REVISION] FIX ISSUE #1: Número puesto en datosGenerales Y nivel raíz")
+            logger.info("[REVISION] Número actualizado: '%s'", nuevo_numero)
+            logger.info("[REVISION] FIX ISSUE #1: Número puesto en datosGenerales Y nivel raíz")
         else:
             # Si no hay número original, generar uno nuevo completo
             cliente = datos['datosGenerales'].get('cliente', '')
             vendedor = datos['datosGenerales'].get('vendedor', '')
             proyecto = datos['datosGenerales'].get('proyecto', '')
-            print(f"[REVISION] Generando número nuevo para: Cliente='{cliente}', Vendedor='{vendedor}', Proyecto='{proyecto}'")
+            logger.info("[REVISION] Generando número nuevo para: Cliente='%s', Vendedor='%s', Proyecto='%s'",
+                        cliente, vendedor, proyecto)
             nuevo_numero = db_manager.generar_numero_cotizacion(cliente, vendedor, proyecto, int(nueva_revision))
             datos['datosGenerales']['numeroCotizacion'] = nuevo_numero
-            print(f"[REVISION] Número generado: '{nuevo_numero}'")
+            logger.info("[REVISION] Número generado: '%s'", nuevo_numero)
         
         # NUEVO: Recalcular subtotales de materiales para asegurar consistencia
         if 'items' in datos:
-            print("[REVISION] Recalculando subtotales de materiales...")
+            logger.info("[REVISION] Recalculando subtotales de materiales...")
             for i, item in enumerate(datos['items']):
-                print(f"  Procesando item {i+1}: {item.get('descripcion', 'Sin descripción')}")
+                logger.info("  Procesando item %s: %s", i + 1, item.get('descripcion', 'Sin descripción'))
                 
                 if 'materiales' in item and isinstance(item['materiales'], list):
                     for j, material in enumerate(item['materiales']):
                         # Validar que el material tenga los campos necesarios
                         if not material or not isinstance(material, dict):
-                            print(f"    Material {j+1}: Estructura inválida, saltando")
+                            logger.warning("    Material %s: Estructura inválida, saltando", j + 1)
                             continue
                         
                         # MEJORADO: Usar validación robusta de datos de material
@@ -629,46 +515,15 @@ def preparar_datos_nueva_revision(cotizacion_original):
                         # Actualizar el material con los datos validados
                         material.update(material_validado)
                         
-                        print(f"    Material {j+1} validado y recalculado: {material_validado['descripcion']} = {material_validado['peso']} * {material_validado['cantidad']} * {material_validado['precio']} = {material_validado['subtotal']}")
-                
-                # MEJORADO: Recalcular total del item con conversión robusta
-                try:
-                    materiales_list = item.get('materiales', [])
-                    if isinstance(materiales_list, list):
-                        total_materiales = sum(safe_float(m.get('subtotal', 0)) for m in materiales_list if isinstance(m, dict))
-                    else:
-                        total_materiales = 0.0
-
-                    # Sumar correctamente los otros materiales (campo 'otrosMateriales', no 'otros')
-                    otros_materiales_list = item.get('otrosMateriales', [])
-                    if isinstance(otros_materiales_list, list):
-                        total_otros = sum(safe_float(m.get('subtotal', 0)) for m in otros_materiales_list if isinstance(m, dict))
-                    else:
-                        total_otros = 0.0
-
-                    transporte  = safe_float(item.get('transporte', 0))
-                    instalacion = safe_float(item.get('instalacion', 0))
-                    seguridad   = safe_float(item.get('seguridad', 0))
-                    descuento   = safe_float(item.get('descuento', 0))
-                    cant_raw    = safe_float(item.get('cantidad', 1))
-                    cantidad    = cant_raw if cant_raw > 0 else 1
-
-                    subtotal_base     = total_materiales + total_otros + transporte + instalacion
-                    aumento_seguridad = subtotal_base * (seguridad / 100)
-                    subtotal_con_seg  = subtotal_base + aumento_seguridad
-                    reduccion_desc    = subtotal_con_seg * (descuento / 100)
-                    costo_unidad      = subtotal_con_seg - reduccion_desc
-                    total_item        = costo_unidad * cantidad
-
-                    item['costoUnidad'] = round(costo_unidad, 2)
-                    item['total']       = round(total_item, 2)
-
-                    print(f"  [RECALC] Item total: {item.get('descripcion', 'Sin desc')} = "
-                          f"(mats={total_materiales} + otros={total_otros} + transp={transporte} + inst={instalacion}) "
-                          f"* (1+seg{seguridad}%) * (1-desc{descuento}%) * cant{cantidad} = {total_item}")
-                except Exception as e:
-                    print(f"  [ERROR] Error calculando total del item: {e}")
-                    item['total'] = 0.0
+                        logger.info("    Material %s validado y recalculado: %s = %s * %s * %s = %s",
+                                    j + 1, material_validado['descripcion'], material_validado['peso'], material_validado['cantidad'], material_validado['precio'], material_validado['subtotal'])
+            
+            # Recalcular costoUnidad/total de todas las partidas con el motor de precios
+            aplicar_a_items(datos['items'])
+            for item in datos['items']:
+                if isinstance(item, dict):
+                    logger.info("  [RECALC] Item total: %s = %s",
+                                item.get('descripcion', 'Sin desc'), item.get('total'))
         
         # Limpiar campos que no deben copiarse
         campos_a_limpiar = ['_id', 'fechaCreacion', 'timestamp', 'version']
@@ -678,18 +533,15 @@ def preparar_datos_nueva_revision(cotizacion_original):
         # Agregar campo de actualización
         datos['datosGenerales']['actualizacionRevision'] = f"Revisión {nueva_revision} basada en cotización original"
         
-        print(f"[OK] Datos preparados para nueva revisión: {nuevo_numero}")
+        logger.info("[OK] Datos preparados para nueva revisión: %s", nuevo_numero)
         return _safe_for_json(datos)
         
     except Exception as e:
-        print(f"[ERROR] Error preparando nueva revisión: {e}")
+        logger.error("[ERROR] Error preparando nueva revisión: %s", e)
         import traceback
         traceback.print_exc()
         return None
 
-# Registrar cierre de conexión al salir
-atexit.register(db_manager.cerrar_conexion)
-
 # ============================================
 # PROCESAMIENTO DE IMAGEN DE REFERENCIA
 # ============================================
@@ -698,15 +550,17 @@ def procesar_imagen_referencia(datos, numero_cotizacion):
     """
     Procesa una imagen de referencia enviada como base64 desde el formulario.
 
-    Extrae, valida, guarda en Supabase Storage (o local como fallback) y
-    retorna un dict con {url, nombre, tamano_bytes, mime_type} para almacenar en datos_generales.
+    Extrae y valida la imagen y retorna el dict para datos_generales. La subida
+    a Supabase Storage es lenta: se hace en la cola de trabajos ('imagen.subir')
+    después de guardar; mientras tanto url queda vacía y la vista usa dataUri.
 
     Args:
         datos: Dict completo de la cotizacion recibido del formulario
         numero_cotizacion: Numero de cotizacion para nombrar el archivo
 
     Returns:
-        dict con {url, nombre, tamano_bytes, mime_type} o None si no hay imagen o error
+        dict con {url, dataUri, nombre, tamano_bytes, mime_type, rutaStorage}
+        (rutaStorage solo si la imagen es nueva y falta subirla) o None si no hay imagen o error
     """
     img_data = datos.get('imagenReferencia')
     if not img_data:
@@ -717,13 +571,13 @@ def procesar_imagen_referencia(datos, numero_cotizacion):
         datos_generales = datos.get('datosGenerales', {})
         existente = datos_generales.get('imagenReferencia')
         if existente:
-            print(f"[IMAGEN] Conservando imagen existente: {existente.get('url', 'sin URL')}")
+            logger.info("[IMAGEN] Conservando imagen existente: %s", existente.get('url', 'sin URL'))
             return existente
         return None
 
     base64_str = img_data.get('base64', '')
     if not base64_str:
-        print("[IMAGEN] No se recibio base64 — ignorando")
+        logger.info("[IMAGEN] No se recibio base64 — ignorando")
         return None
 
     # Validar y decodificar base64
@@ -736,20 +590,20 @@ def procesar_imagen_referencia(datos, numero_cotizacion):
 
         image_bytes = base64.b64decode(encoded)
     except Exception as e:
-        print(f"[IMAGEN] Error decodificando base64: {e}")
+        logger.error("[IMAGEN] Error decodificando base64: %s", e)
         return None
 
     # Validar tamano (max 5 MB)
     max_size = 5 * 1024 * 1024
     if len(image_bytes) > max_size:
-        print(f"[IMAGEN] Imagen demasiado grande: {len(image_bytes)} bytes (max {max_size})")
+        logger.info("[IMAGEN] Imagen demasiado grande: %s bytes (max %s)", len(image_bytes), max_size)
         return None
 
     # Validar tipo MIME
     mime_type = img_data.get('mime_type', 'image/jpeg')
     allowed_types = ['image/jpeg', 'image/png']
     if mime_type not in allowed_types:
-        print(f"[IMAGEN] Tipo MIME no soportado: {mime_type}")
+        logger.info("[IMAGEN] Tipo MIME no soportado: %s", mime_type)
         return None
 
     # Determinar extension del archivo
@@ -766,6 +620,29 @@ def procesar_imagen_referencia(datos, numero_cotizacion):
     nombre_archivo = f"REF_{num_sanitizado}_{uuid.uuid4().hex[:8]}{extension}"
     storage_path = f"imagenes_referencia/{nombre_archivo}"
 
+    # dataUri como respaldo persistente (sobrevive deploys en Render)
+    data_uri = base64_str  # ya viene como "data:image/jpeg;base64,..."
+    if not data_uri.startswith('data:'):
+        data_uri = f"data:{mime_type};base64,{base64_str}"
+
+    logger.info("[IMAGEN] Procesada: %s (subida en cola), dataUri presente: %s", storage_path, bool(data_uri))
+    return {
+        "url": "",
+        "dataUri": data_uri,
+        "nombre": img_data.get('nombre', nombre_archivo),
+        "tamano_bytes": len(image_bytes),
+        "mime_type": mime_type,
+        "rutaStorage": storage_path
+    }
+
+
+def subir_imagen_referencia(image_bytes, storage_path, mime_type):
+    """
+    Sube la imagen a Supabase Storage (o la guarda local como fallback).
+
+    Returns:
+        URL pública o local; "" si todo falló
+    """
     url = None
 
     # Intentar guardar en Supabase Storage
@@ -783,38 +660,27 @@ def procesar_imagen_referencia(datos, numero_cotizacion):
                 url = resultado.get('url', '')
                 if url and url.endswith('?'):
                     url = url[:-1]
-                print(f"[IMAGEN] Subida exitosa a Supabase Storage: {url}")
+                logger.info("[IMAGEN] Subida exitosa a Supabase Storage: %s", url)
     except ImportError:
-        print("[IMAGEN] SupabaseStorageManager no disponible — guardando localmente")
+        logger.warning("[IMAGEN] SupabaseStorageManager no disponible — guardando localmente")
     except Exception as e:
-        print(f"[IMAGEN] Error subiendo a Supabase Storage: {e}")
+        logger.error("[IMAGEN] Error subiendo a Supabase Storage: %s", e)
 
     # Fallback: guardar localmente (Render ephemeral, pero util en local dev)
     if not url:
         try:
+            nombre_archivo = storage_path.rsplit('/', 1)[-1]
             local_images_dir = Path("static/imagenes_referencia")
             local_images_dir.mkdir(parents=True, exist_ok=True)
             local_path = local_images_dir / nombre_archivo
             local_path.write_bytes(image_bytes)
             url = f"/static/imagenes_referencia/{nombre_archivo}"
-            print(f"[IMAGEN] Guardada localmente: {local_path}")
+            logger.info("[IMAGEN] Guardada localmente: %s", local_path)
         except Exception as e:
-            print(f"[IMAGEN] Error en fallback local: {e}")
+            logger.warning("[IMAGEN] Error en fallback local: %s", e)
             url = ""
 
-    # dataUri como respaldo persistente (sobrevive deploys en Render)
-    data_uri = base64_str  # ya viene como "data:image/jpeg;base64,..."
-    if not data_uri.startswith('data:'):
-        data_uri = f"data:{mime_type};base64,{base64_str}"
-
-    print(f"[IMAGEN] Procesada: {url}, dataUri presente: {bool(data_uri)}")
-    return {
-        "url": url if url else "",
-        "dataUri": data_uri,
-        "nombre": img_data.get('nombre', nombre_archivo),
-        "tamano_bytes": len(image_bytes),
-        "mime_type": mime_type
-    }
+    return url
 
 # ============================================
 # FILTROS PARA TEMPLATES
@@ -840,7 +706,8 @@ def timestamp_to_date(timestamp):
 # ============================================
 
 from functools import wraps
-from cotizador.middleware import login_required
+from cotizador.middleware import _load_company_from_db, company_api_required, login_required
+from cotizador.instrumentation import span
 
 @app.route("/login")
 def login():
@@ -881,7 +748,7 @@ def health_check():
             },
             'services': {
                 'pdf_generation': REPORTLAB_AVAILABLE or WEASYPRINT_AVAILABLE,
-                'pdf_manager': pdf_manager is not None
+                'pdf_manager': bool(pdf_manager)
             }
         }
 
@@ -928,7 +795,7 @@ def home():
     if request.method == "POST":
         try:
             datos = request.get_json()
-            print("Nueva cotizacion recibida")
+            logger.info("Nueva cotizacion recibida")
 
             # Guardar TODOS los datos usando el DatabaseManager
             resultado = db_manager.guardar_cotizacion(datos, company_id=session.get("company_id"))
@@ -953,7 +820,7 @@ def home():
                 return jsonify({"error": error_msg}), 500
 
         except Exception as e:
-            print(f"Error en ruta principal: {e}")
+            logger.error("Error en ruta principal: %s", e)
             return jsonify({"error": "Error del servidor"}), 500
 
     # GET: Mostrar tabla completa con paginación y filtros
@@ -976,24 +843,31 @@ def home():
         filtro_moneda = request.args.get('moneda', '').strip()
         filtro_tipo = request.args.get('tipo', '').strip()
 
-        print(f"[HOME] Obteniendo todas las cotizaciones (página {page})...")
+        # VALIDACIÓN HTTP: si nada cambió desde la última visita, 304 sin leer la BD
+        etag = etag_listado(db_manager, session.get("company_id"))
+        if no_modificada(etag):
+            return respuesta_no_modificada(etag)
+
+        logger.info("[HOME] Obteniendo todas las cotizaciones (página %s)...", page)
         if query_general:
-            print(f"[HOME] Búsqueda rápida: '{query_general}'")
+            logger.info("[HOME] Búsqueda rápida: '%s'", query_general)
 
         # Obtener todas las cotizaciones de la base de datos
         resultado_db = db_manager.buscar_cotizaciones("", 1, 10000, company_id=session.get("company_id"))  # Query vacía = todas
 
-        # Obtener todos los PDFs (incluye Google Drive antiguas)
-        resultado_pdfs = pdf_manager.buscar_pdfs("", 1, 10000) if pdf_manager else {"resultados": []}
+        # Obtener todos los PDFs (incluye Google Drive antiguas) - solo se muestran a CWS Company legacy
+        es_cws_legacy = session.get('company_id') == CWS_COMPANY_ID
+        resultado_pdfs = pdf_manager.buscar_pdfs("", 1, 10000) if pdf_manager and es_cws_legacy else {"resultados": []}
 
         cotizaciones = []
         numeros_vistos = set()  # Para evitar duplicados entre BD y PDFs
 
         if not resultado_db.get("error"):
             cotizaciones_raw = resultado_db.get("resultados", [])
-            print(f"[HOME] Encontradas {len(cotizaciones_raw)} cotizaciones de BD")
+            logger.info("[HOME] Encontradas %s cotizaciones de BD", len(cotizaciones_raw))
 
             # Transformar datos para tabla compacta
+            totales_lote = totales_cotizaciones(cotizaciones_raw)
             for idx, cot in enumerate(cotizaciones_raw):
                 datos_gen = cot.get('datosGenerales', {})
 
@@ -1012,20 +886,8 @@ def home():
                 if not fecha:
                     fecha = 'N/A'
 
-                # CÁLCULO DEL TOTAL
-                total_calculado = 0.0
-                items = cot.get('items', [])
-                if isinstance(items, list):
-                    for item in items:
-                        if isinstance(item, dict):
-                            if 'total' in item and item['total']:
-                                total_calculado += safe_float(item.get('total', 0))
-                            elif 'subtotal' in item and item['subtotal']:
-                                total_calculado += safe_float(item.get('subtotal', 0))
-                            elif 'precio_unitario' in item:
-                                precio = safe_float(item.get('precio_unitario', 0))
-                                cantidad = safe_float(item.get('cantidad', 1))
-                                total_calculado += precio * cantidad
+                # CÁLCULO DEL TOTAL (motor de precios, evaluado en lote)
+                total_calculado = totales_lote[idx]
 
                 # Obtener moneda
                 condiciones = cot.get('condiciones', {})
@@ -1065,13 +927,13 @@ def home():
                     "es_antigua": False
                 })
         else:
-            print(f"[HOME] Error: {resultado_db.get('error')}")
+            logger.error("[HOME] Error: %s", resultado_db.get('error'))
+            etag = None  # No validar una página armada sobre un error
 
         # AGREGAR COTIZACIONES ANTIGUAS DE GOOGLE DRIVE (solo para CWS Company legacy)
-        cws_company_id = '5f6b07c9-3b9f-42ac-8ea0-e3ad9a4fe56b'
-        if session.get('company_id') == cws_company_id and not resultado_pdfs.get("error"):
+        if es_cws_legacy and not resultado_pdfs.get("error"):
             pdfs_antiguos = resultado_pdfs.get("resultados", [])
-            print(f"[HOME] Encontrados {len(pdfs_antiguos)} PDFs totales")
+            logger.info("[HOME] Encontrados %s PDFs totales", len(pdfs_antiguos))
 
             for pdf in pdfs_antiguos:
                 numero_pdf = pdf.get('numero_cotizacion', 'N/A')
@@ -1107,7 +969,7 @@ def home():
                         "es_antigua": True  # Marcar como antigua
                     })
 
-            print(f"[HOME] Total final: {len(cotizaciones)} cotizaciones (BD + antiguas)")
+            logger.info("[HOME] Total final: %s cotizaciones (BD + antiguas)", len(cotizaciones))
 
         # APLICAR BÚSQUEDA RÁPIDA (busca en todos los campos)
         if query_general:
@@ -1122,7 +984,7 @@ def home():
                     cotizaciones_busqueda.append(cot)
 
             cotizaciones = cotizaciones_busqueda
-            print(f"[HOME] Después de búsqueda rápida: {len(cotizaciones)} cotizaciones")
+            logger.info("[HOME] Después de búsqueda rápida: %s cotizaciones", len(cotizaciones))
 
         # APLICAR FILTROS AVANZADOS antes de paginación
         if any([filtro_numero, filtro_cliente, filtro_vendedor, filtro_proyecto,
@@ -1145,7 +1007,7 @@ def home():
                     cotizaciones_filtradas.append(cot)
 
             cotizaciones = cotizaciones_filtradas
-            print(f"[HOME] Después de filtros avanzados: {len(cotizaciones)} cotizaciones")
+            logger.info("[HOME] Después de filtros avanzados: %s cotizaciones", len(cotizaciones))
 
         # APLICAR PAGINACIÓN
         total_cotizaciones = len(cotizaciones)
@@ -1160,9 +1022,10 @@ def home():
         end_index = start_index + page_size
         cotizaciones_pagina = cotizaciones[start_index:end_index]
 
-        print(f"[HOME] Mostrando {len(cotizaciones_pagina)} de {total_cotizaciones} (página {page}/{total_pages})")
+        logger.info("[HOME] Mostrando %s de %s (página %s/%s)",
+                    len(cotizaciones_pagina), total_cotizaciones, page, total_pages)
 
-        return render_template(
+        return con_etag(render_template(
             "home.html",
             cotizaciones=cotizaciones_pagina,
             user_name=session.get('user_name', ''),
@@ -1180,10 +1043,10 @@ def home():
             filtro_revision=filtro_revision,
             filtro_moneda=filtro_moneda,
             filtro_tipo=filtro_tipo
-        )
+        ), etag)
 
     except Exception as e:
-        print(f"[HOME] Error: {e}")
+        logger.error("[HOME] Error: %s", e)
         import traceback
         traceback.print_exc()
         return render_template("home.html",
@@ -1202,50 +1065,32 @@ def formulario():
     if request.method == "POST":
         try:
             datos = request.get_json()
-            print("[FORM] FORMULARIO: Datos del formulario recibidos")
-            print(f"[FORM] FORMULARIO: Cliente='{datos.get('datosGenerales', {}).get('cliente', 'N/A')}' | Items={len(datos.get('items', []))}")
-            
-            # DEBUG ISSUE #1: Mostrar exactamente qué números llegan
-            print(f"[ISSUE1_DEBUG] ======= DEBUGGING ISSUE #1 =======")
-            print(f"[ISSUE1_DEBUG] datos['numeroCotizacion']: '{datos.get('numeroCotizacion', 'NO_ENCONTRADO')}'")
-            print(f"[ISSUE1_DEBUG] datos['numeroCotizacionHidden']: '{datos.get('numeroCotizacionHidden', 'NO_ENCONTRADO')}'")
             datos_generales = datos.get('datosGenerales', {})
-            print(f"[ISSUE1_DEBUG] datosGenerales['numeroCotizacion']: '{datos_generales.get('numeroCotizacion', 'NO_ENCONTRADO')}'")
-            print(f"[ISSUE1_DEBUG] datosGenerales['revision']: '{datos_generales.get('revision', 'NO_ENCONTRADO')}'")
-            print(f"[ISSUE1_DEBUG] ======= FIN DEBUG ISSUE #1 =======")
-            
-            # DEBUG: Diagnóstico completo de condiciones recibidas
-            print(f"[FORM_DEBUG] ======= DIAGNÓSTICO FORMULARIO =======")
-            condiciones_recibidas = datos.get('condiciones', {})
-            print(f"[FORM_DEBUG] CONDICIONES COMPLETAS: {condiciones_recibidas}")
-            print(f"[FORM_DEBUG] MONEDA RECIBIDA: '{condiciones_recibidas.get('moneda', 'NO_ENCONTRADO')}'")
-            print(f"[FORM_DEBUG] TIPO_CAMBIO RECIBIDO: '{condiciones_recibidas.get('tipoCambio', 'NO_ENCONTRADO')}'")
-            print(f"[FORM_DEBUG] TIEMPO_ENTREGA: '{condiciones_recibidas.get('tiempoEntrega', 'NO_ENCONTRADO')}'")
-            print(f"[FORM_DEBUG] ENTREGAR_EN: '{condiciones_recibidas.get('entregaEn', 'NO_ENCONTRADO')}'")
-            print(f"[FORM_DEBUG] CONDICIONES_PAGO: '{condiciones_recibidas.get('condicionesPago', 'NO_ENCONTRADO')}'")
-            print(f"[FORM_DEBUG] COMENTARIOS_ADICIONALES: '{condiciones_recibidas.get('comentariosAdicionales', 'NO_ENCONTRADO')}'")
-            print(f"[FORM_DEBUG] ======= FIN DIAGNÓSTICO FORMULARIO =======")
-            
+            logger.info("[FORM] FORMULARIO: Datos recibidos - Cliente=%r | Items=%d",
+                        datos_generales.get('cliente', 'N/A'), len(datos.get('items', [])))
+
+            # DEBUG ISSUE #1: qué números llegan (categoría 'issue1', apagada por defecto)
+            log_issue1.debug("[ISSUE1_DEBUG] numeroCotizacion=%r numeroCotizacionHidden=%r "
+                             "datosGenerales.numeroCotizacion=%r datosGenerales.revision=%r",
+                             datos.get('numeroCotizacion', 'NO_ENCONTRADO'), datos.get('numeroCotizacionHidden', 'NO_ENCONTRADO'),
+                             datos_generales.get('numeroCotizacion', 'NO_ENCONTRADO'), datos_generales.get('revision', 'NO_ENCONTRADO'))
+
+            # DEBUG: condiciones recibidas completas (volcado perezoso)
+            log_form.debug("[FORM_DEBUG] CONDICIONES COMPLETAS: %s", volcado_json(datos.get('condiciones', {})))
+
             # VALIDACIÓN MEJORADA PARA REVISIONES con logging detallado
-            datos_generales = datos.get('datosGenerales', {})
             revision = safe_int(datos_generales.get('revision', 1))
             numero_cotizacion = datos_generales.get('numeroCotizacion', 'N/A')
-            
-            print(f"[REVISION_DEBUG] ======= ANÁLISIS DE REVISIÓN =======")
-            print(f"[REVISION_DEBUG] Número cotización: '{numero_cotizacion}'")
-            print(f"[REVISION_DEBUG] Revisión detectada: {revision}")
-            print(f"[REVISION_DEBUG] Es revisión (>=2): {revision >= 2}")
-            
+
+            log_form.debug("[REVISION_DEBUG] Número cotización: %r | Revisión detectada: %s", numero_cotizacion, revision)
+
             if revision >= 2:
                 actualizacion_revision = datos_generales.get('actualizacionRevision', '').strip()
-                print(f"[REVISION_DEBUG] Justificación presente: {bool(actualizacion_revision)}")
-                print(f"[REVISION_DEBUG] Longitud justificación: {len(actualizacion_revision)}")
-                print(f"[REVISION_DEBUG] Justificación válida (>=10 chars): {len(actualizacion_revision) >= 10}")
-                
+                log_form.debug("[REVISION_DEBUG] Longitud justificación: %d", len(actualizacion_revision))
+
                 if not actualizacion_revision or len(actualizacion_revision) < 10:
                     error_msg = f"Justificación requerida para revisión R{revision}. Mínimo 10 caracteres (actual: {len(actualizacion_revision)})."
-                    print(f"[VALIDATION ERROR] {error_msg}")
-                    print(f"[REVISION_DEBUG] ======= FIN ANÁLISIS DE REVISIÓN (ERROR) =======")
+                    logger.warning("[VALIDATION ERROR] %s", error_msg)
                     return jsonify({
                         "error": error_msg,
                         "campo_requerido": "actualizacionRevision",
@@ -1255,9 +1100,7 @@ def formulario():
                         "justificacion_recibida": actualizacion_revision[:50] + "..." if len(actualizacion_revision) > 50 else actualizacion_revision
                     }), 400
                 else:
-                    print(f"[REVISION_DEBUG] ✅ Validación de justificación EXITOSA para R{revision}")
-            
-            print(f"[REVISION_DEBUG] ======= FIN ANÁLISIS DE REVISIÓN (OK) =======")
+                    log_form.debug("[REVISION_DEBUG] Validación de justificación EXITOSA para R%s", revision)
             
             # Función auxiliar para extraer número de cotización de manera robusta
             def extraer_numero_cotizacion(datos):
@@ -1270,23 +1113,23 @@ def formulario():
                 
                 for i, candidato in enumerate(candidatos):
                     if candidato and str(candidato).strip():
-                        print(f"[NUMERO_DEBUG] Número encontrado en posición {i}: '{candidato}'")
+                        log_form.debug("[NUMERO_DEBUG] Número encontrado en posición %d: %r", i, candidato)
                         return str(candidato).strip()
                 
-                print(f"[NUMERO_DEBUG] ❌ NO se encontró número de cotización en ningún lugar")
+                log_form.debug("[NUMERO_DEBUG] NO se encontró número de cotización en ningún lugar")
                 return None
             
             # Extraer y validar número de cotización
             numero_final = extraer_numero_cotizacion(datos)
             if numero_final:
-                print(f"[NUMERO_DEBUG] ✅ Número de cotización confirmado: '{numero_final}'")
+                log_form.debug("[NUMERO_DEBUG] Número de cotización confirmado: %r", numero_final)
                 # Asegurar que esté en todos los lugares necesarios
                 datos['numeroCotizacion'] = numero_final
                 if 'datosGenerales' not in datos:
                     datos['datosGenerales'] = {}
                 datos['datosGenerales']['numeroCotizacion'] = numero_final
             else:
-                print(f"[NUMERO_DEBUG] ⚠️ Procediendo sin número - será generado automáticamente")
+                log_form.debug("[NUMERO_DEBUG] Procediendo sin número - será generado automáticamente")
             
             # Procesar imagen de referencia (si fue enviada)
             img_ref_resultado = procesar_imagen_referencia(datos, numero_final or 'nueva')
@@ -1296,25 +1139,15 @@ def formulario():
                 datos['datosGenerales']['imagenReferencia'] = img_ref_resultado
                 # Remover base64 crudo del payload antes de guardar en BD
                 datos.pop('imagenReferencia', None)
-                print(f"[FORM] Imagen de referencia procesada: {img_ref_resultado.get('url', 'sin URL')}")
+                logger.info("[FORM] Imagen de referencia procesada: %s", img_ref_resultado.get('url', 'sin URL'))
 
             # Guardar usando DatabaseManager con manejo robusto de errores
-            print("[FORM] FORMULARIO: Llamando a guardar_cotizacion...")
             resultado = db_manager.guardar_cotizacion(datos, company_id=session.get("company_id"))
-            print(f"[FORM] FORMULARIO: Resultado guardado = {json.dumps(resultado, indent=2, ensure_ascii=False)}")
-            
-            # Análisis detallado del resultado
-            print(f"[GUARDAR_DEBUG] ===== ANÁLISIS DE RESULTADO DE GUARDADO =====")
-            print(f"[GUARDAR_DEBUG] Success: {resultado.get('success', False)}")
-            print(f"[GUARDAR_DEBUG] Error: {resultado.get('error', 'N/A')}")
-            print(f"[GUARDAR_DEBUG] Numero cotización: {resultado.get('numeroCotizacion') or resultado.get('numero_cotizacion', 'N/A')}")
-            print(f"[GUARDAR_DEBUG] Tipo error: {resultado.get('tipo_error', 'N/A')}")
-            print(f"[GUARDAR_DEBUG] ID generado: {resultado.get('id', 'N/A')}")
-            print(f"[GUARDAR_DEBUG] ===== FIN ANÁLISIS DE RESULTADO =====")
+            log_form.debug("[GUARDAR_DEBUG] Resultado guardado = %s", volcado_json(resultado))
             
             if resultado.get("success", False):
                 numero_cotizacion = resultado.get('numero_cotizacion') or resultado.get('numeroCotizacion')
-                print(f"[OK] FORMULARIO: Guardado exitoso - Numero: {numero_cotizacion}")
+                logger.info("[OK] FORMULARIO: Guardado exitoso - Numero: %s", numero_cotizacion)
                 
                 # ✅ LOG CRÍTICO: Cotización guardada exitosamente
                 logging.info(f"COTIZACION_GUARDADA: {numero_cotizacion} - Cliente: {datos.get('datosGenerales', {}).get('cliente', 'N/A')}")
@@ -1322,14 +1155,15 @@ def formulario():
                 # ✅ ELIMINAR DRAFTS ASOCIADOS - Prevenir duplicados después de guardar
                 try:
                     if numero_cotizacion:
-                        print(f"[DRAFT] Intentando eliminar drafts asociados a: {numero_cotizacion}")
+                        logger.info("[DRAFT] Intentando eliminar drafts asociados a: %s", numero_cotizacion)
                         resultado_limpieza = db_manager.eliminar_drafts_por_numero_cotizacion(numero_cotizacion)
                         if resultado_limpieza.get('success'):
-                            print(f"[DRAFT] ✅ {resultado_limpieza.get('mensaje')}")
+                            logger.info("[DRAFT] ✅ %s", resultado_limpieza.get('mensaje'))
                         else:
-                            print(f"[DRAFT] ⚠️ No se pudieron eliminar drafts: {resultado_limpieza.get('error')}")
+                            logger.warning("[DRAFT] ⚠️ No se pudieron eliminar drafts: %s",
+                                           resultado_limpieza.get('error'))
                 except Exception as draft_error:
-                    print(f"[DRAFT] ❌ Error limpiando drafts (no crítico): {draft_error}")
+                    logger.warning("[DRAFT] ❌ Error limpiando drafts (no crítico): %s", draft_error)
                     # No bloquear el guardado por errores en drafts
 
                 # Verificar si es un fallo silencioso detectado
@@ -1358,76 +1192,32 @@ def formulario():
                 if "id" in resultado:
                     respuesta_base["id"] = resultado["id"]
                 
-                # INTENTAR generar PDF (OPCIONAL - no afecta éxito del guardado)
-                try:
-                    print(f"[PDF] FORMULARIO: ⏳ Iniciando generación de PDF (no crítica) para {numero_cotizacion}")
-                    
-                    if pdf_manager and (WEASYPRINT_AVAILABLE or REPORTLAB_AVAILABLE):
-                        # Intentar generar PDF de manera no bloqueante
-                        company_branding = g.get('company')  # capturar antes del async
-                        def generar_pdf_asincrono():
-                            try:
-                                cotizacion_busqueda = db_manager.obtener_cotizacion(numero_cotizacion)
-                                if cotizacion_busqueda["encontrado"]:
-                                    cotizacion = cotizacion_busqueda["item"]
-                                    pdf_data = generar_pdf_reportlab(cotizacion, company_branding=company_branding)
-                                    resultado_almacenamiento = pdf_manager.almacenar_pdf_nuevo(pdf_data, cotizacion)
-                                    print(f"[PDF] ✅ PDF generado exitosamente en segundo plano: {numero_cotizacion}")
-                                    return resultado_almacenamiento
-                                else:
-                                    print(f"[PDF] ⚠️ No se encontró cotización para PDF: {numero_cotizacion}")
-                                    return None
-                            except Exception as e:
-                                print(f"[PDF] ❌ Error en generación asíncrona: {e}")
-                                return None
-                        
-                        # Generar PDF con manejo simple de tiempo (compatible Windows)
-                        import time
-                        
-                        try:
-                            inicio_pdf = time.time()
-                            print(f"[PDF] Iniciando generación a las {time.strftime('%H:%M:%S')}")
-                            
-                            pdf_resultado = generar_pdf_asincrono()
-                            tiempo_transcurrido = time.time() - inicio_pdf
-                            
-                            print(f"[PDF] Generación completada en {tiempo_transcurrido:.2f} segundos")
-                            
-                            if pdf_resultado:
-                                respuesta_base["pdf_generado"] = True
-                                respuesta_base["pdf_info"] = {
-                                    "ruta_local": pdf_resultado.get("ruta_local"),
-                                    "google_drive": pdf_resultado.get("google_drive", {}),
-                                    "mensaje": "PDF generado automáticamente",
-                                    "tiempo_generacion": f"{tiempo_transcurrido:.2f}s"
-                                }
-                                print(f"[PDF] ✅ PDF incluido en respuesta exitosamente")
-                            else:
-                                respuesta_base["pdf_generado"] = False
-                                respuesta_base["pdf_mensaje"] = "PDF se generará por demanda - cotización guardada exitosamente"
-                                
-                        except Exception as pdf_gen_error:
-                            tiempo_transcurrido = time.time() - inicio_pdf
-                            print(f"[PDF] ❌ Error después de {tiempo_transcurrido:.2f}s: {pdf_gen_error}")
-                            respuesta_base["pdf_generado"] = False
-                            respuesta_base["pdf_mensaje"] = f"PDF se generará por demanda (error de generación) - cotización guardada exitosamente"
-                            
-                    else:
-                        print(f"[PDF] ⚠️ Generadores de PDF no disponibles")
-                        respuesta_base["pdf_generado"] = False
-                        respuesta_base["pdf_mensaje"] = "PDF se generará por demanda - cotización guardada exitosamente"
-                        
-                except Exception as pdf_error:
-                    # CRÍTICO: Los errores de PDF NO deben afectar el éxito del guardado
-                    print(f"[PDF] ❌ Error en PDF (NO CRÍTICO): {pdf_error}")
-                    respuesta_base["pdf_generado"] = False
-                    respuesta_base["pdf_mensaje"] = f"PDF se generará por demanda (error: {str(pdf_error)[:50]}) - cotización guardada exitosamente"
-                
+                # PDF e imagen de referencia en la cola de trabajos: el request solo encola
+                company_id = session.get("company_id")
+                img_ref = datos.get('datosGenerales', {}).get('imagenReferencia') or {}
+                if img_ref.get('rutaStorage') and not img_ref.get('url'):
+                    encolar_trabajo('imagen.subir',
+                                    {"numero": numero_cotizacion, "ruta_storage": img_ref['rutaStorage'],
+                                     "company_id": company_id},
+                                    clave_idempotencia=f"imagen:{img_ref['rutaStorage']}")
+                trabajo_pdf = None
+                if pdf_manager and REPORTLAB_AVAILABLE:
+                    trabajo_pdf = encolar_trabajo(
+                        'pdf.generar', {"numero": numero_cotizacion, "company_id": company_id},
+                        clave_idempotencia=clave_trabajo('pdf', numero_cotizacion, datos))
+                respuesta_base["pdf_generado"] = False
+                respuesta_base["pdf_en_cola"] = trabajo_pdf is not None
+                if trabajo_pdf:
+                    respuesta_base["trabajo_pdf"] = trabajo_pdf["id"]
+                    respuesta_base["pdf_mensaje"] = "PDF en generación - cotización guardada exitosamente"
+                else:
+                    respuesta_base["pdf_mensaje"] = "PDF se generará por demanda - cotización guardada exitosamente"
+
                 # Agregar información adicional
                 respuesta_base["revision"] = datos.get('datosGenerales', {}).get('revision', '1')
                 respuesta_base["cliente"] = datos.get('datosGenerales', {}).get('cliente', 'N/A')
                 
-                print(f"[SUCCESS] FORMULARIO: ✅ Respuesta completa preparada para {numero_cotizacion}")
+                logger.info("[SUCCESS] FORMULARIO: ✅ Respuesta completa preparada para %s", numero_cotizacion)
                 respuesta = respuesta_base
                 
                 return jsonify(respuesta)
@@ -1436,11 +1226,8 @@ def formulario():
                 error_detalle = resultado.get('error', 'Error desconocido')
                 tipo_error = resultado.get('tipo_error', 'general')
                 
-                print(f"[ERROR] FORMULARIO: ===== ERROR DE GUARDADO =====")
-                print(f"[ERROR] FORMULARIO: Tipo: {tipo_error}")
-                print(f"[ERROR] FORMULARIO: Detalle: {error_detalle}")
-                print(f"[ERROR] FORMULARIO: Resultado completo: {json.dumps(resultado, indent=2, ensure_ascii=False)}")
-                print(f"[ERROR] FORMULARIO: ===== FIN ERROR DE GUARDADO =====")
+                logger.error("[ERROR] FORMULARIO: Error de guardado (%s): %s - Resultado completo: %s",
+                             tipo_error, error_detalle, volcado_json(resultado))
                 
                 # Log crítico para seguimiento
                 logging.error(f"ERROR_GUARDADO_COTIZACION: {error_detalle} - Tipo: {tipo_error} - Cliente: {datos.get('datosGenerales', {}).get('cliente', 'N/A')}")
@@ -1473,7 +1260,7 @@ def formulario():
                 }), status_code
                 
         except Exception as e:
-            print(f"[CRITICAL] FORMULARIO: ERROR CRITICO - {e}")
+            logger.error("[CRITICAL] FORMULARIO: ERROR CRITICO - %s", e)
             import traceback
             traceback.print_exc()
             return jsonify({
@@ -1483,10 +1270,10 @@ def formulario():
             }), 500
     
     # ===== DIAGNÓSTICO GET =====
-    print(f"[FORM_GET] ===== INICIO GET formulario =====")
-    print(f"[FORM_GET] Query params recibidos: {dict(request.args)}")
-    print(f"[FORM_GET] edicion_menor = {request.args.get('edicion_menor', 'NO_PRESENTE')!r}")
-    print(f"[FORM_GET] revision = {request.args.get('revision', 'NO_PRESENTE')!r}")
+    logger.info("[FORM_GET] ===== INICIO GET formulario =====")
+    logger.info("[FORM_GET] Query params recibidos: %s", dict(request.args))
+    logger.info("[FORM_GET] edicion_menor = %r", request.args.get('edicion_menor', 'NO_PRESENTE'))
+    logger.info("[FORM_GET] revision = %r", request.args.get('revision', 'NO_PRESENTE'))
     # ===== FIN DIAGNÓSTICO =====
 
     # Verificar si es edición menor (corrección sin nueva revisión)
@@ -1495,15 +1282,15 @@ def formulario():
     datos_edicion_menor = None
 
     if edicion_menor_id:
-        print(f"[EDICION_MENOR] Cargando formulario para edición menor: '{edicion_menor_id}'")
+        logger.info("[EDICION_MENOR] Cargando formulario para edición menor: '%s'", edicion_menor_id)
         resultado_em = db_manager.obtener_cotizacion(edicion_menor_id)
         if resultado_em.get('encontrado'):
             datos_edicion_menor = resultado_em['item']
             datos_edicion_menor = _safe_for_json(datos_edicion_menor)
             modo_edicion_menor = True
-            print(f"[EDICION_MENOR] Cotización cargada para edición menor: {edicion_menor_id}")
+            logger.info("[EDICION_MENOR] Cotización cargada para edición menor: %s", edicion_menor_id)
         else:
-            print(f"[EDICION_MENOR] Cotización no encontrada: '{edicion_menor_id}'")
+            logger.warning("[EDICION_MENOR] Cotización no encontrada: '%s'", edicion_menor_id)
 
     # Verificar si es una nueva revisión
     revision_id = request.args.get('revision')
@@ -1511,13 +1298,13 @@ def formulario():
     info_bloqueo_revision = None
 
     if revision_id:
-        print(f"[REVISION] Solicitando nueva revisión de: '{revision_id}'")
+        logger.info("[REVISION] Solicitando nueva revisión de: '%s'", revision_id)
         # Cargar datos de la cotización original para nueva revisión
         resultado = db_manager.obtener_cotizacion(revision_id)
         if resultado.get('encontrado'):
             cotizacion_original = resultado['item']
             numero_cotizacion = cotizacion_original.get('numeroCotizacion', '')
-            print(f"[REVISION] Cotización original encontrada: {numero_cotizacion}")
+            logger.info("[REVISION] Cotización original encontrada: %s", numero_cotizacion)
 
             # Verificar si es la revisión más reciente
             info_revision = verificar_revision_mas_reciente(numero_cotizacion, db_manager)
@@ -1525,12 +1312,14 @@ def formulario():
             if info_revision['es_mas_reciente']:
                 # Es la más reciente, permitir crear nueva revisión
                 datos_precargados = preparar_datos_nueva_revision(cotizacion_original)
-                print(f"[REVISION] ✅ Es la más reciente - Nueva revisión: {datos_precargados.get('datosGenerales', {}).get('revision', 'N/A')}")
+                logger.info("[REVISION] ✅ Es la más reciente - Nueva revisión: %s",
+                            datos_precargados.get('datosGenerales', {}).get('revision', 'N/A'))
             else:
                 # NO es la más reciente, bloquear y mostrar advertencia
-                print(f"[REVISION] ⚠️ BLOQUEADA - No es la más reciente")
-                print(f"[REVISION] Revisión actual: R{info_revision['revision_actual']}")
-                print(f"[REVISION] Última revisión: R{info_revision['revision_maxima']} ({info_revision['numero_ultima_revision']})")
+                logger.warning("[REVISION] ⚠️ BLOQUEADA - No es la más reciente")
+                logger.info("[REVISION] Revisión actual: R%s", info_revision['revision_actual'])
+                logger.info("[REVISION] Última revisión: R%s (%s)",
+                            info_revision['revision_maxima'], info_revision['numero_ultima_revision'])
 
                 info_bloqueo_revision = {
                     'bloqueada': True,
@@ -1541,19 +1330,21 @@ def formulario():
                     'historial': info_revision.get('historial_revisiones', [])
                 }
         else:
-            print(f"[REVISION] ⚠️ Cotización original no encontrada para: '{revision_id}'")
+            logger.warning("[REVISION] ⚠️ Cotización original no encontrada para: '%s'", revision_id)
 
-    print(f"[FORM_GET] ===== RENDERIZANDO TEMPLATE =====")
-    print(f"[FORM_GET] modo_edicion_menor={modo_edicion_menor!r} | datos_edicion_menor presente={datos_edicion_menor is not None}")
-    print(f"[FORM_GET] datos_precargados presente={datos_precargados is not None} | info_bloqueo_revision presente={info_bloqueo_revision is not None}")
+    logger.info("[FORM_GET] ===== RENDERIZANDO TEMPLATE =====")
+    logger.info("[FORM_GET] modo_edicion_menor=%r | datos_edicion_menor presente=%s",
+                modo_edicion_menor, datos_edicion_menor is not None)
+    logger.info("[FORM_GET] datos_precargados presente=%s | info_bloqueo_revision presente=%s",
+                datos_precargados is not None, info_bloqueo_revision is not None)
     if datos_edicion_menor:
-        print(f"[FORM_GET] datos_edicion_menor keys: {list(datos_edicion_menor.keys())[:10]}")
+        logger.info("[FORM_GET] datos_edicion_menor keys: %s", list(datos_edicion_menor.keys())[:10])
     if datos_precargados:
-        print(f"[FORM_GET] datos_precargados keys: {list(datos_precargados.keys())[:10]}")
-    print(f"[FORM_GET] ===== FIN RENDERIZANDO =====")
+        logger.info("[FORM_GET] datos_precargados keys: %s", list(datos_precargados.keys())[:10])
+    logger.info("[FORM_GET] ===== FIN RENDERIZANDO =====")
 
     return render_template("formulario.html",
-                         materiales=LISTA_MATERIALES,
+                         catalogo_version=catalogo_materiales.version if catalogo_materiales else '',
                          datos_precargados=datos_precargados,
                          info_bloqueo_revision=info_bloqueo_revision,
                          user_name=session.get('user_name', ''),
@@ -1606,12 +1397,285 @@ def debug_test_obtener_cotizacion(item_id):
 @app.route("/debug-materiales")
 def debug_materiales():
     """Ruta de debug para verificar materiales"""
+    materiales = catalogo_materiales.materiales if catalogo_materiales else LISTA_MATERIALES
     return jsonify({
-        "total": len(LISTA_MATERIALES),
-        "primeros_5": LISTA_MATERIALES[:5],
-        "ultimos_5": LISTA_MATERIALES[-5:] if len(LISTA_MATERIALES) > 5 else LISTA_MATERIALES
+        "total": len(materiales),
+        "primeros_5": materiales[:5],
+        "ultimos_5": materiales[-5:] if len(materiales) > 5 else materiales,
+        "catalogo": catalogo_materiales.obtener_estado() if catalogo_materiales else None
     })
 
+@app.route("/api/materiales")
+@login_required
+def api_materiales():
+    """
+    Catálogo de materiales (completo o filtrado) con ETag.
+    Query params: q (búsqueda por prefijo de tokens), uom, limite,
+                  v (versión del catálogo; si coincide, la respuesta es inmutable)
+    """
+    if not catalogo_materiales:
+        return jsonify({"materiales": LISTA_MATERIALES, "version": ""})
+
+    q = request.args.get('q', '').strip()
+    uom = request.args.get('uom', '').strip()
+    try:
+        limite = int(request.args.get('limite', 0 if not q else 20))
+    except ValueError:
+        return jsonify({"error": "limite inválido"}), 400
+
+    version = catalogo_materiales.version
+    etag = catalogo_materiales.etag(q, uom, limite)
+    if etag in request.if_none_match:
+        respuesta = Response(status=304)
+    else:
+        materiales = catalogo_materiales.buscar(q, uom or None, limite) if (q or uom) else catalogo_materiales.materiales
+        respuesta = jsonify({"version": version, "total": len(materiales), "materiales": materiales})
+
+    respuesta.set_etag(etag)
+    if request.args.get('v') == version:
+        # URL versionada: el contenido no cambia mientras la versión sea la misma
+        respuesta.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+@app.route("/api/cotizar-por-peso/lote", methods=["POST"])
+@login_required
+def cotizar_por_peso_lote():
+    """
+    Cotización por peso de muchas estructuras en una sola llamada.
+    Body JSON: {estructuras: [...], precioKg?, seguridad?, descuento?}
+    Cada estructura: {descripcion, cantidad, pesoEstructura | materiales[{material, cantidad}], precioKg?}
+    """
+    from weight_quoting import cotizar_lote
+
+    datos = request.get_json(silent=True) or {}
+    try:
+        resultado = cotizar_lote(
+            datos.get('estructuras'),
+            catalogo=catalogo_materiales,
+            precio_kg=datos.get('precioKg'),
+            seguridad=datos.get('seguridad', 0),
+            descuento=datos.get('descuento', 0)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(resultado)
+
+@app.route("/api/materiales/material")
+@login_required
+def api_materiales_lookup():
+    """Material exacto por descripción (comparación normalizada)"""
+    descripcion = request.args.get('descripcion', '')
+    material = catalogo_materiales.obtener(descripcion) if catalogo_materiales else None
+    if not material:
+        return jsonify({"error": "Material no encontrado", "descripcion": descripcion}), 404
+    return jsonify(material)
+
+@app.route("/api/materiales/uso")
+@login_required
+@company_api_required
+def api_materiales_uso():
+    """
+    Cotizaciones de la compañía que usan un material.
+    Query params: material (requerido), dias (default 90), limite (default 200)
+    """
+    material = request.args.get('material', '').strip()
+    if not material:
+        return jsonify({"error": "material requerido"}), 400
+    try:
+        dias = int(request.args.get('dias', 90))
+        limite = min(int(request.args.get('limite', 200)), 1000)
+    except ValueError:
+        return jsonify({"error": "dias/limite inválidos"}), 400
+
+    return jsonify(db_manager.cotizaciones_por_material(
+        material, company_id=session["company_id"], dias=dias, limite=limite
+    ))
+
+@app.route("/api/materiales/estadisticas")
+@login_required
+@company_api_required
+def api_materiales_estadisticas():
+    """
+    Estadísticas por material de la compañía ($/kg promedio, rango de precios, usos).
+    Query params: dias (opcional), material (opcional), limite (default 50)
+    """
+    try:
+        dias = int(request.args['dias']) if request.args.get('dias') else None
+        limite = min(int(request.args.get('limite', 50)), 500)
+    except ValueError:
+        return jsonify({"error": "dias/limite inválidos"}), 400
+
+    return jsonify(db_manager.estadisticas_materiales(
+        company_id=session["company_id"], dias=dias,
+        material=request.args.get('material') or None, limite=limite
+    ))
+
+@app.route("/api/precios/sugerencia")
+@login_required
+@company_api_required
+def api_precios_sugerencia():
+    """
+    Precio sugerido por material para precargar el formulario
+    (último, mediana, mínimo y máximo de las cotizaciones de la compañía).
+    Query params: material (repetible), tipo (material|peso|otro), moneda (MXN|USD)
+    """
+    price_history = app.extensions.get('price_history')
+    if not price_history:
+        return jsonify({"error": "Historial de precios no inicializado"}), 503
+
+    materiales = [m for m in request.args.getlist('material') if m.strip()][:100]
+    if not materiales:
+        return jsonify({"error": "material requerido"}), 400
+    tipo = request.args.get('tipo', 'material')
+    if tipo not in ('material', 'peso', 'otro'):
+        return jsonify({"error": "tipo inválido"}), 400
+
+    sugerencias = price_history.sugerir(
+        materiales, company_id=session["company_id"],
+        tipo=tipo, moneda=request.args.get('moneda', 'MXN')
+    )
+    return jsonify({"sugerencias": sugerencias})
+
+@app.route("/admin/db/consultas-lentas", methods=["GET", "POST"])
+@login_required
+def admin_consultas_lentas():
+    """
+    Trazado de base de datos: contadores por capa (postgresql/sdk/offline) y
+    buffer de consultas lentas con su ruta de origen y EXPLAIN muestreado.
+    GET ?limite=N. POST {umbral_ms?, muestreo_explain?, limpiar?} ajusta en caliente.
+    """
+    from db_tracing import trazador
+
+    if request.method == "POST":
+        datos = request.get_json(silent=True) or {}
+        try:
+            trazador.configurar(datos.get('umbral_ms'), datos.get('muestreo_explain'))
+        except (TypeError, ValueError):
+            return jsonify({"error": "umbral_ms/muestreo_explain inválidos"}), 400
+        if datos.get('limpiar'):
+            trazador.limpiar()
+    try:
+        limite = int(request.args.get('limite', 50))
+    except ValueError:
+        return jsonify({"error": "limite inválido"}), 400
+    return jsonify(trazador.obtener_estado(limite))
+
+@app.route("/admin/cache-http", methods=["GET", "POST"])
+@login_required
+def admin_cache_http():
+    """
+    Caché HTTP: respuestas 304, compresión y filas renderizadas en memoria.
+    POST {limpiar: true} vacía la caché de filas.
+    """
+    cache_http = app.extensions['http_cache']
+    if request.method == "POST" and (request.get_json(silent=True) or {}).get('limpiar'):
+        cache_http.fragmentos.limpiar()
+    return jsonify(cache_http.obtener_estado())
+
+# ========================================
+# COLA DE TRABAJOS EN SEGUNDO PLANO (job_queue.py)
+# ========================================
+
+def clave_trabajo(*partes):
+    """Clave de idempotencia: digest estable de las partes (dicts incluidos)"""
+    import hashlib
+    texto = json.dumps(partes, sort_keys=True, default=str, ensure_ascii=False)
+    return f"{partes[0]}:{hashlib.blake2b(texto.encode('utf-8'), digest_size=12).hexdigest()}"
+
+
+def encolar_trabajo(tipo, payload, prioridad=PRIORIDAD_NORMAL, **opciones):
+    """
+    Encola un trabajo con la compañía y el usuario de la sesión.
+
+    Returns:
+        {"id", "estado", "duplicado"} o None si la cola no está disponible
+        (el llamador decide si ejecuta en línea)
+    """
+    try:
+        return app.extensions['cola_trabajos'].encolar(
+            tipo, payload, prioridad=prioridad,
+            company_id=session.get("company_id"), usuario=session.get("user_name"), **opciones)
+    except Exception as e:
+        logger.warning("[COLA] No se pudo encolar %s: %s", tipo, e)
+        return None
+
+
+def encolar_o_ejecutar(tipo, payload, ejecutar, mensaje):
+    """
+    Para operaciones administrativas masivas: encola y responde 202 con la URL
+    de estado. Un clic repetido en el mismo minuto devuelve el mismo trabajo.
+    Si la cola no está disponible ejecuta en línea como antes.
+    """
+    trabajo = encolar_trabajo(tipo, payload, prioridad=PRIORIDAD_BAJA,
+                              clave_idempotencia=clave_trabajo(tipo, payload, int(time.time() // 60)))
+    if trabajo is None:
+        resultado, status = ejecutar(**payload)
+        return jsonify(resultado), status
+    return jsonify({
+        "success": True,
+        "pendiente": True,
+        "trabajo_id": trabajo["id"],
+        "duplicado": trabajo["duplicado"],
+        "estado_url": url_for('estado_trabajo', trabajo_id=trabajo["id"]),
+        "mensaje": mensaje
+    }), 202
+
+
+def almacenar_pdf_en_cola(pdf_content, cotizacion):
+    """Sube un PDF recién generado vía la cola ('pdf.almacenar'); en línea si no hay cola"""
+    trabajo = encolar_trabajo('pdf.almacenar', {"cotizacion": cotizacion}, adjunto=pdf_content,
+                              clave_idempotencia=clave_trabajo('pdf.almacenar', cotizacion))
+    if trabajo is None:
+        return pdf_manager.almacenar_pdf_nuevo(pdf_content=pdf_content, cotizacion_data=cotizacion)
+    return trabajo
+
+
+@app.route("/api/trabajos/<int:trabajo_id>")
+@login_required
+def estado_trabajo(trabajo_id):
+    """Estado de un trabajo encolado por la compañía de la sesión (sin payload)"""
+    trabajo = app.extensions['cola_trabajos'].obtener(trabajo_id)
+    if not trabajo or trabajo.get('company_id') != session.get("company_id"):
+        return jsonify({"success": False, "error": "Trabajo no encontrado"}), 404
+    return jsonify({
+        "success": True,
+        "id": trabajo['id'],
+        "tipo": trabajo['tipo'],
+        "estado": trabajo['estado'],
+        "intentos": trabajo['intentos'],
+        "max_intentos": trabajo['max_intentos'],
+        "ultimo_error": trabajo['ultimo_error'],
+        "resultado": trabajo.get('resultado'),
+    })
+
+@app.route("/admin/trabajos")
+@login_required
+def admin_trabajos():
+    """
+    Cola de trabajos: conteos por estado/tipo y últimos trabajos.
+    GET ?estado=pendiente|en_curso|completado|fallido ?tipo=.. ?limite=N
+    """
+    cola = app.extensions['cola_trabajos']
+    try:
+        limite = int(request.args.get('limite', 50))
+    except ValueError:
+        return jsonify({"error": "limite inválido"}), 400
+    estado = request.args.get('estado')
+    if estado and estado not in ESTADOS_TRABAJO:
+        return jsonify({"error": "estado inválido"}), 400
+    return jsonify({**cola.obtener_estado(),
+                    "trabajos": cola.listar(estado, request.args.get('tipo'), limite)})
+
+@app.route("/admin/trabajos/<int:trabajo_id>/reintentar", methods=["POST"])
+@login_required
+def admin_reintentar_trabajo(trabajo_id):
+    """Devuelve a la cola un trabajo de dead-letter"""
+    if not app.extensions['cola_trabajos'].reintentar(trabajo_id):
+        return jsonify({"success": False, "error": "El trabajo no está en dead-letter"}), 404
+    return jsonify({"success": True, "trabajo_id": trabajo_id})
+
 @app.route("/admin/sincronizacion")
 def admin_sincronizacion():
     """Panel administrativo de sincronización"""
@@ -1670,15 +1734,15 @@ def guardar_draft():
         resultado = db_manager.guardar_draft(datos)
 
         if resultado.get('success'):
-            print(f"[API] Draft guardado exitosamente: {resultado.get('draft_id')}")
+            logger.info("[API] Draft guardado exitosamente: %s", resultado.get('draft_id'))
             return jsonify(resultado), 200
         else:
-            print(f"[API] Error guardando draft: {resultado.get('error')}")
+            logger.error("[API] Error guardando draft: %s", resultado.get('error'))
             return jsonify(resultado), 500
 
     except Exception as e:
         error_msg = str(e)
-        print(f"[API] Excepción guardando draft: {error_msg}")
+        logger.error("[API] Excepción guardando draft: %s", error_msg)
         return jsonify({"success": False, "error": error_msg}), 500
 
 
@@ -1711,7 +1775,7 @@ def listar_drafts():
 
         drafts = db_manager.listar_drafts(vendedor, company_id=session.get("company_id"))
 
-        print(f"[API] Listando drafts - Vendedor: {vendedor or 'Todos'} - Total: {len(drafts)}")
+        logger.info("[API] Listando drafts - Vendedor: %s - Total: %s", vendedor or 'Todos', len(drafts))
 
         return jsonify({
             "success": True,
@@ -1721,7 +1785,7 @@ def listar_drafts():
 
     except Exception as e:
         error_msg = str(e)
-        print(f"[API] Error listando drafts: {error_msg}")
+        logger.error("[API] Error listando drafts: %s", error_msg)
         return jsonify({"success": False, "error": error_msg}), 500
 
 
@@ -1755,13 +1819,13 @@ def cargar_draft(draft_id):
         draft = db_manager.obtener_draft(draft_id)
 
         if draft:
-            print(f"[API] Draft cargado: {draft_id}")
+            logger.info("[API] Draft cargado: %s", draft_id)
             return jsonify({
                 "success": True,
                 "draft": draft
             }), 200
         else:
-            print(f"[API] Draft no encontrado: {draft_id}")
+            logger.warning("[API] Draft no encontrado: %s", draft_id)
             return jsonify({
                 "success": False,
                 "error": f"Draft {draft_id} no encontrado"
@@ -1769,7 +1833,7 @@ def cargar_draft(draft_id):
 
     except Exception as e:
         error_msg = str(e)
-        print(f"[API] Error cargando draft: {error_msg}")
+        logger.error("[API] Error cargando draft: %s", error_msg)
         return jsonify({"success": False, "error": error_msg}), 500
 
 
@@ -1879,7 +1943,7 @@ def debug_draft(draft_id):
 
     except Exception as e:
         error_msg = str(e)
-        print(f"[API] Error en debug draft: {error_msg}")
+        logger.error("[API] Error en debug draft: %s", error_msg)
         return jsonify({"success": False, "error": error_msg}), 500
 
 
@@ -1901,15 +1965,15 @@ def eliminar_draft(draft_id):
         resultado = db_manager.eliminar_draft(draft_id)
 
         if resultado.get('success'):
-            print(f"[API] Draft eliminado: {draft_id}")
+            logger.info("[API] Draft eliminado: %s", draft_id)
             return jsonify(resultado), 200
         else:
-            print(f"[API] Error eliminando draft: {resultado.get('error')}")
+            logger.error("[API] Error eliminando draft: %s", resultado.get('error'))
             return jsonify(resultado), 500
 
     except Exception as e:
         error_msg = str(e)
-        print(f"[API] Excepción eliminando draft: {error_msg}")
+        logger.error("[API] Excepción eliminando draft: %s", error_msg)
         return jsonify({"success": False, "error": error_msg}), 500
 
 # ========================================
@@ -1929,10 +1993,11 @@ def obtener_cotizacion_api(numero_cotizacion):
         from urllib.parse import unquote
         numero_cotizacion = unquote(numero_cotizacion)
         preparar_revision = request.args.get('preparar_revision', '').lower() == 'true'
-        print(f"[API_COTIZACION] Buscando: {numero_cotizacion!r} | preparar_revision={preparar_revision}")
+        logger.info("[API_COTIZACION] Buscando: %r | preparar_revision=%s", numero_cotizacion, preparar_revision)
 
         resultado = db_manager.obtener_cotizacion(numero_cotizacion)
-        print(f"[API_COTIZACION] Resultado: encontrado={resultado.get('encontrado')} | keys={list(resultado.keys())}")
+        logger.info("[API_COTIZACION] Resultado: encontrado=%s | keys=%s",
+                    resultado.get('encontrado'), list(resultado.keys()))
         if resultado.get('encontrado'):
             cotizacion = resultado['item']
             if preparar_revision:
@@ -1950,17 +2015,38 @@ def obtener_cotizacion_api(numero_cotizacion):
                 cotizacion = preparar_datos_nueva_revision(cotizacion)
                 if cotizacion is None:
                     return jsonify({"success": False, "error": "Error al preparar revisión"}), 500
-            nc_api = cotizacion.get("numeroCotizacion", "?"); rev_api = cotizacion.get("datosGenerales",{}).get("revision","?"); print(f"[API_COTIZACION] [OK] Exito en {time.time()-t0:.3f}s | num={nc_api} | rev={rev_api}")
-            return jsonify({"success": True, "cotizacion": cotizacion}), 200
+            # ETag solo para la cotización tal cual (la preparada para revisión cambia en cada llamada)
+            etag = None if preparar_revision else etag_cotizacion(cotizacion)
+            if no_modificada(etag):
+                return respuesta_no_modificada(etag)
+            nc_api = cotizacion.get("numeroCotizacion", "?"); rev_api = cotizacion.get("datosGenerales",{}).get("revision","?"); logger.info("[API_COTIZACION] [OK] Exito en %.3fs | num=%s | rev=%s", time.time() - t0, nc_api, rev_api)
+            return con_etag(jsonify({"success": True, "cotizacion": cotizacion}), etag)
         else:
-            print(f"[API_COTIZACION] ❌ No encontrada: {numero_cotizacion!r} en {time.time()-t0:.3f}s")
+            logger.error("[API_COTIZACION] ❌ No encontrada: %r en %.3fs", numero_cotizacion, time.time() - t0)
             return jsonify({"success": False, "error": f"Cotización '{numero_cotizacion}' no encontrada"}), 404
     except Exception as e:
         import traceback
-        print(f"[API_COTIZACION] [ERROR] {type(e).__name__}: {e} en {time.time()-t0:.3f}s")
+        logger.error("[API_COTIZACION] [ERROR] %s: %s en %.3fs", type(e).__name__, e, time.time() - t0)
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route("/api/cotizacion/<path:numero_cotizacion>/revisiones", methods=["GET"])
+@login_required
+@company_api_required
+def revisiones_cotizacion_api(numero_cotizacion):
+    """Historial de revisiones de la misma cotización base (más reciente primero)."""
+    try:
+        from urllib.parse import unquote
+        numero_cotizacion = unquote(numero_cotizacion)
+        familia = db_manager.obtener_familia_revisiones(
+            numero_cotizacion, company_id=session["company_id"]
+        )
+        familia['es_mas_reciente'] = familia['revision_actual'] >= familia['revision_maxima']
+        return jsonify({"success": True, **familia}), 200
+    except Exception as e:
+        logger.error("[API_REVISIONES] Error: %s", e)
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route("/api/cotizacion/<path:numero_cotizacion>/edicion-menor", methods=["PATCH"])
 def edicion_menor(numero_cotizacion):
     """
@@ -1981,7 +2067,7 @@ def edicion_menor(numero_cotizacion):
         if 'imagenReferencia' in parche:
             img_raw = parche.pop('imagenReferencia')
             if img_raw is not None and not (isinstance(img_raw, dict) and img_raw.get('conservar')):
-                # Nueva imagen: procesar base64 y subir
+                # Nueva imagen: validar base64 (la subida va en la cola)
                 datos_temp = {
                     'imagenReferencia': img_raw,
                     'datosGenerales': {}
@@ -2001,8 +2087,14 @@ def edicion_menor(numero_cotizacion):
         if resultado.get('success'):
             nuevo_numero = resultado.get('numero_cotizacion', numero_cotizacion)
             proyecto_cambiado = resultado.get('proyecto_cambiado', False)
-            print(f"[EDICION_MENOR] Corrección guardada: {nuevo_numero}" +
-                  (f" (proyecto cambiado, era: {resultado.get('numero_anterior', '')})" if proyecto_cambiado else ""))
+            logger.info("%s",
+                        f'[EDICION_MENOR] Corrección guardada: {nuevo_numero}' + (f" (proyecto cambiado, era: {resultado.get('numero_anterior', '')})" if proyecto_cambiado else ''))
+            img_ref = parche.get('imagenReferenciaProcesada') or {}
+            if img_ref.get('rutaStorage') and not img_ref.get('url'):
+                encolar_trabajo('imagen.subir',
+                                {"numero": nuevo_numero, "ruta_storage": img_ref['rutaStorage'],
+                                 "company_id": session.get("company_id")},
+                                clave_idempotencia=f"imagen:{img_ref['rutaStorage']}")
             return jsonify({
                 "success": True,
                 "numero_cotizacion": nuevo_numero,
@@ -2014,7 +2106,7 @@ def edicion_menor(numero_cotizacion):
             return jsonify(resultado), 400
 
     except Exception as e:
-        print(f"[EDICION_MENOR] Error: {e}")
+        logger.error("[EDICION_MENOR] Error: %s", e)
         return jsonify({"success": False, "error": str(e)}), 500
 
 
@@ -2049,13 +2141,13 @@ def diagnostico_completo():
             "carpeta_antiguas": os.getenv('GOOGLE_DRIVE_FOLDER_ANTIGUAS')
         },
         "materiales": {
-            "total_cargados": len(LISTA_MATERIALES),
+            "total_cargados": len(catalogo_materiales.materiales) if catalogo_materiales else len(LISTA_MATERIALES),
             "archivo_csv_existe": os.path.exists(os.path.join(os.getcwd(), 'Lista de materiales.csv'))
         },
         "pdf": {
             "reportlab_disponible": REPORTLAB_AVAILABLE,
             "weasyprint_disponible": WEASYPRINT_AVAILABLE,
-            "pdf_manager_inicializado": pdf_manager is not None
+            "pdf_manager_inicializado": bool(pdf_manager)
         }
     }
     
@@ -2106,26 +2198,28 @@ def buscar():
         page = datos.get("page", 1)
         per_page = datos.get("per_page", int(os.getenv('DEFAULT_PAGE_SIZE', '20')))
         
-        print(f"[BÚSQUEDA UNIFICADA] Query: '{query}' (página {page})")
-        print(f"[BÚSQUEDA UNIFICADA] Estado DB: modo_offline={db_manager.modo_offline}")
+        logger.info("[BÚSQUEDA UNIFICADA] Query: '%s' (página %s)", query, page)
+        logger.info("[BÚSQUEDA UNIFICADA] Estado DB: modo_offline=%s", db_manager.modo_offline)
         
         # PASO 1: Buscar en Supabase/JSON local (cotizaciones con desglose)
         resultados_cotizaciones = []
         try:
-            print(f"[DB] Iniciando búsqueda en {'Supabase' if not db_manager.modo_offline else 'JSON local'}...")
+            logger.info("[DB] Iniciando búsqueda en %s...", 'Supabase' if not db_manager.modo_offline else 'JSON local')
             resultado_db = db_manager.buscar_cotizaciones(query, 1, 1000, company_id=session.get("company_id"))  # Obtener todas
-            print(f"[DB] Resultado de búsqueda: {type(resultado_db)} - {list(resultado_db.keys()) if isinstance(resultado_db, dict) else 'No es dict'}")
+            logger.info("[DB] Resultado de búsqueda: %s - %s",
+                        type(resultado_db), list(resultado_db.keys()) if isinstance(resultado_db, dict) else 'No es dict')
             
             if not resultado_db.get("error"):
                 cotizaciones = resultado_db.get("resultados", [])
-                print(f"[DB] Encontradas {len(cotizaciones)} cotizaciones en base de datos")
+                logger.info("[DB] Encontradas %s cotizaciones en base de datos", len(cotizaciones))
                 
                 if len(cotizaciones) > 0:
-                    print(f"[DB] Primera cotización: {list(cotizaciones[0].keys()) if cotizaciones[0] else 'Vacía'}")
+                    logger.info("[DB] Primera cotización: %s",
+                                list(cotizaciones[0].keys()) if cotizaciones[0] else 'Vacía')
                     if 'datosGenerales' in cotizaciones[0]:
-                        print(f"[DB] datosGenerales keys: {list(cotizaciones[0]['datosGenerales'].keys())}")
+                        logger.info("[DB] datosGenerales keys: %s", list(cotizaciones[0]['datosGenerales'].keys()))
                 else:
-                    print(f"[DB] ⚠️ No se encontraron cotizaciones para query: '{query}'")
+                    logger.warning("[DB] ⚠️ No se encontraron cotizaciones para query: '%s'", query)
                 
                 for cot in cotizaciones:
                     datos_gen = cot.get('datosGenerales', {})
@@ -2142,22 +2236,23 @@ def buscar():
                         "_id": cot.get('_id')
                     })
             else:
-                print(f"[DB] Error en búsqueda de cotizaciones: {resultado_db.get('error')}")
+                logger.error("[DB] Error en búsqueda de cotizaciones: %s", resultado_db.get('error'))
         except Exception as e:
-            print(f"[DB] Error buscando cotizaciones: {e}")
+            logger.error("[DB] Error buscando cotizaciones: %s", e)
         
         # PASO 2: Buscar en PDFs (Supabase Storage + Google Drive + Local)
         resultados_pdfs = []
         try:
             if pdf_manager:
-                print(f"[PDF] Iniciando búsqueda de PDFs...")
+                logger.info("[PDF] Iniciando búsqueda de PDFs...")
                 resultado_pdfs = pdf_manager.buscar_pdfs(query, 1, 1000)  # Obtener todos
-                print(f"[PDF] Resultado PDFs: {type(resultado_pdfs)} - {list(resultado_pdfs.keys()) if isinstance(resultado_pdfs, dict) else 'No es dict'}")
+                logger.info("[PDF] Resultado PDFs: %s - %s",
+                            type(resultado_pdfs), list(resultado_pdfs.keys()) if isinstance(resultado_pdfs, dict) else 'No es dict')
                 
                 cws_id = '5f6b07c9-3b9f-42ac-8ea0-e3ad9a4fe56b'
                 if session.get('company_id') == cws_id and not resultado_pdfs.get("error"):
                     pdfs = resultado_pdfs.get("resultados", [])
-                    print(f"[PDF] Encontrados {len(pdfs)} PDFs")
+                    logger.info("[PDF] Encontrados %s PDFs", len(pdfs))
 
                     for pdf in pdfs:
                         resultados_pdfs.append({
@@ -2172,35 +2267,35 @@ def buscar():
                             "revision": pdf.get('revision', 1)
                         })
                 else:
-                    print(f"[PDF] Error en búsqueda de PDFs: {resultado_pdfs.get('error')}")
+                    logger.error("[PDF] Error en búsqueda de PDFs: %s", resultado_pdfs.get('error'))
             else:
-                print(f"[PDF] ⚠️ PDFManager no disponible - saltando búsqueda de PDFs")
+                logger.warning("[PDF] ⚠️ PDFManager no disponible - saltando búsqueda de PDFs")
         except Exception as e:
-            print(f"[PDF] Error buscando PDFs: {e}")
+            logger.error("[PDF] Error buscando PDFs: %s", e)
             import traceback
             traceback.print_exc()
         
         # PASO 3: Combinar y deduplicar resultados
         resultados_combinados = {}
         
-        print(f"[COMBINAR] Cotizaciones DB: {len(resultados_cotizaciones)}, PDFs: {len(resultados_pdfs)}")
+        logger.info("[COMBINAR] Cotizaciones DB: %s, PDFs: %s", len(resultados_cotizaciones), len(resultados_pdfs))
         
         # Añadir cotizaciones (prioridad alta - tienen desglose)
         for cot in resultados_cotizaciones:
             numero = cot['numero_cotizacion']
             resultados_combinados[numero] = cot
-            print(f"[COMBINAR] Agregada cotización: {numero}")
+            logger.info("[COMBINAR] Agregada cotización: %s", numero)
         
         # Añadir PDFs solo si no existe cotización con desglose
         for pdf in resultados_pdfs:
             numero = pdf['numero_cotizacion']
             if numero not in resultados_combinados:
                 resultados_combinados[numero] = pdf
-                print(f"[COMBINAR] Agregado PDF: {numero}")
+                logger.info("[COMBINAR] Agregado PDF: %s", numero)
             else:
                 # Si ya existe cotización, marcar que tiene PDF
                 resultados_combinados[numero]['tiene_pdf'] = True
-                print(f"[COMBINAR] PDF {numero} ya existe como cotización - marcando tiene_pdf=True")
+                logger.info("[COMBINAR] PDF %s ya existe como cotización - marcando tiene_pdf=True", numero)
         
         # Convertir a lista y ordenar por relevancia
         resultados_finales = list(resultados_combinados.values())
@@ -2222,14 +2317,14 @@ def buscar():
         end = start + per_page
         resultados_paginados = resultados_finales[start:end]
         
-        print(f"[UNIFICADA] Total: {total}, Página: {len(resultados_paginados)} resultados")
+        logger.info("[UNIFICADA] Total: %s, Página: %s resultados", total, len(resultados_paginados))
         
         # Debug: mostrar estructura de respuesta
         if len(resultados_paginados) > 0:
-            print(f"[UNIFICADA] Primer resultado enviado al frontend:")
+            logger.info("[UNIFICADA] Primer resultado enviado al frontend:")
             primer_resultado = resultados_paginados[0]
             for key, value in primer_resultado.items():
-                print(f"   {key}: {value}")
+                logger.info("   %s: %s", key, value)
         
         respuesta = {
             "resultados": resultados_paginados,
@@ -2240,15 +2335,61 @@ def buscar():
             "modo": "busqueda_unificada"
         }
         
-        print(f"[UNIFICADA] Enviando respuesta con {len(resultados_paginados)} resultados")
+        logger.info("[UNIFICADA] Enviando respuesta con %s resultados", len(resultados_paginados))
         return jsonify(respuesta)
 
     except Exception as e:
-        print(f"[UNIFICADA] Error en búsqueda: {e}")
+        logger.error("[UNIFICADA] Error en búsqueda: %s", e)
         import traceback
         traceback.print_exc()
         return jsonify({"error": "Error en búsqueda unificada"}), 500
 
+@app.route("/exportar/cotizaciones")
+@login_required
+@company_api_required
+def exportar_cotizaciones():
+    """
+    Exportación masiva en streaming.
+    Query params: formato=csv|jsonl|xlsx  nivel=cotizacion|lineas
+                  desde=YYYY-MM-DD  hasta=YYYY-MM-DD
+    Siempre filtrada por la compañía de la sesión.
+    """
+    from quote_export import FORMATOS, exportar, nombre_archivo
+
+    formato = request.args.get('formato', 'csv').lower()
+    nivel = request.args.get('nivel', 'cotizacion').lower()
+    try:
+        generador = exportar(
+            db_manager, formato, nivel,
+            company_id=session["company_id"],
+            desde=request.args.get('desde') or None,
+            hasta=request.args.get('hasta') or None
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return Response(
+        stream_with_context(generador),
+        mimetype=FORMATOS[formato][0],
+        headers={"Content-Disposition": f'attachment; filename="{nombre_archivo(formato, nivel)}"'}
+    )
+
+
+def _estructura_cotizacion(cot: dict) -> str:
+    """Resumen de la forma de una cotización para el log de debug del listado"""
+    dg = cot.get('datosGenerales')
+    items = cot.get('items')
+    primer_item = items[0] if isinstance(items, list) and items else None
+    return json.dumps({
+        'keys': list(cot.keys()),
+        'numeroCotizacion': cot.get('numeroCotizacion', 'NO ENCONTRADO'),
+        'datosGenerales': ({'keys': list(dg.keys()), 'fecha': dg.get('fecha'), 'cliente': dg.get('cliente')}
+                           if isinstance(dg, dict) else type(dg).__name__),
+        'items': len(items) if isinstance(items, list) else type(items).__name__,
+        'primer_item': primer_item,
+        'condiciones': cot.get('condiciones'),
+    }, default=str, ensure_ascii=False)
+
 @app.route("/todas-cotizaciones")
 @login_required
 def todas_cotizaciones():
@@ -2285,16 +2426,22 @@ def todas_cotizaciones():
     if filtro_tipo: filtros_activos.append(f"tipo={filtro_tipo}")
 
     if filtros_activos:
-        print(f"[TODAS-COTIZACIONES] Filtros activos: {', '.join(filtros_activos)}")
+        logger.info("[TODAS-COTIZACIONES] Filtros activos: %s", ', '.join(filtros_activos))
 
     try:
-        print(f"[TODAS-COTIZACIONES] Obteniendo todas las cotizaciones (página {page})...")
+        # VALIDACIÓN HTTP: si nada cambió desde la última visita, 304 sin leer la BD
+        etag = None if debug_mode else etag_listado(db_manager, session.get("company_id"))
+        if no_modificada(etag):
+            return respuesta_no_modificada(etag)
+
+        log_listado.debug("[TODAS-COTIZACIONES] Obteniendo todas las cotizaciones (página %d)...", page)
 
         # Obtener todas las cotizaciones de la base de datos
         resultado_db = db_manager.buscar_cotizaciones("", 1, 10000, company_id=session.get("company_id"))  # Query vacía = todas
 
-        # Obtener todos los PDFs (incluye Google Drive antiguas)
-        resultado_pdfs = pdf_manager.buscar_pdfs("", 1, 10000) if pdf_manager else {"resultados": []}
+        # Obtener todos los PDFs (incluye Google Drive antiguas) - solo se muestran a CWS Company
+        es_cws_legacy = session.get('company_id') == CWS_COMPANY_ID
+        resultado_pdfs = pdf_manager.buscar_pdfs("", 1, 10000) if pdf_manager and es_cws_legacy else {"resultados": []}
 
         if debug_mode:
             # MODO DEBUG: Devolver JSON crudo de las primeras 3 cotizaciones
@@ -2333,37 +2480,15 @@ def todas_cotizaciones():
 
         if not resultado_db.get("error"):
             cotizaciones_raw = resultado_db.get("resultados", [])
-            print(f"[TODAS-COTIZACIONES] Encontradas {len(cotizaciones_raw)} cotizaciones de BD")
-
-            # DEBUG: Mostrar estructura de primera cotización
-            if len(cotizaciones_raw) > 0:
-                primera = cotizaciones_raw[0]
-                print(f"[DEBUG] === ESTRUCTURA DE PRIMERA COTIZACIÓN ===")
-                print(f"[DEBUG] Keys en raíz: {list(primera.keys())}")
-                print(f"[DEBUG] numeroCotizacion: {primera.get('numeroCotizacion', 'NO ENCONTRADO')}")
-                print(f"[DEBUG] datosGenerales presente: {'datosGenerales' in primera}")
-                if 'datosGenerales' in primera:
-                    dg = primera['datosGenerales']
-                    print(f"[DEBUG] datosGenerales type: {type(dg)}")
-                    if isinstance(dg, dict):
-                        print(f"[DEBUG] datosGenerales keys: {list(dg.keys())}")
-                        print(f"[DEBUG] datosGenerales.fecha: '{dg.get('fecha', 'NO ENCONTRADO')}'")
-                        print(f"[DEBUG] datosGenerales.cliente: '{dg.get('cliente', 'NO ENCONTRADO')}'")
-                    else:
-                        print(f"[DEBUG] datosGenerales NO ES DICT: {dg}")
-                print(f"[DEBUG] items presente: {'items' in primera}")
-                if 'items' in primera:
-                    items = primera['items']
-                    print(f"[DEBUG] Total items: {len(items) if isinstance(items, list) else 'NO ES LISTA'}")
-                    if isinstance(items, list) and len(items) > 0:
-                        print(f"[DEBUG] Primer item keys: {list(items[0].keys()) if isinstance(items[0], dict) else 'NO ES DICT'}")
-                        print(f"[DEBUG] Primer item completo: {items[0]}")
-                print(f"[DEBUG] condiciones presente: {'condiciones' in primera}")
-                if 'condiciones' in primera:
-                    print(f"[DEBUG] condiciones: {primera['condiciones']}")
-                print(f"[DEBUG] === FIN ESTRUCTURA ===")
+            logger.info("[TODAS-COTIZACIONES] Encontradas %d cotizaciones de BD", len(cotizaciones_raw))
+
+            # DEBUG: estructura de la primera cotización (solo se arma si la categoría está activa)
+            if cotizaciones_raw:
+                log_listado.debug("[DEBUG] Estructura de primera cotización: %s",
+                                  Perezoso(_estructura_cotizacion, cotizaciones_raw[0]))
 
             # Transformar datos para tabla compacta
+            totales_lote = totales_cotizaciones(cotizaciones_raw)
             for idx, cot in enumerate(cotizaciones_raw):
                 datos_gen = cot.get('datosGenerales', {})
 
@@ -2384,51 +2509,8 @@ def todas_cotizaciones():
                 if not fecha:
                     fecha = 'N/A'
 
-                # CÁLCULO ROBUSTO DEL TOTAL - Recalcular desde componentes para garantizar
-                # consistencia con el formulario de edición y preparar_datos_nueva_revision()
-                # Fórmula: (Σmateriales + Σotros + transporte + instalacion)
-                #           * (1 + seguridad/100) * (1 - descuento/100) * cantidad
-                total_calculado = 0.0
-                items = cot.get('items', [])
-
-                if isinstance(items, list):
-                    for item in items:
-                        if isinstance(item, dict):
-                            # Sumar subtotales de materiales normales
-                            materiales_list = item.get('materiales', [])
-                            total_materiales = 0.0
-                            if isinstance(materiales_list, list):
-                                total_materiales = sum(
-                                    safe_float(m.get('subtotal', 0))
-                                    for m in materiales_list if isinstance(m, dict)
-                                )
-
-                            # Sumar subtotales de otros materiales
-                            otros_list = item.get('otrosMateriales', [])
-                            total_otros = 0.0
-                            if isinstance(otros_list, list):
-                                total_otros = sum(
-                                    safe_float(m.get('subtotal', 0))
-                                    for m in otros_list if isinstance(m, dict)
-                                )
-
-                            transporte  = safe_float(item.get('transporte', 0))
-                            instalacion = safe_float(item.get('instalacion', 0))
-                            seguridad   = safe_float(item.get('seguridad', 0))
-                            descuento   = safe_float(item.get('descuento', 0))
-                            cantidad    = safe_float(item.get('cantidad', 1))
-                            if cantidad <= 0:
-                                cantidad = 1
-
-                            # Misma fórmula que preparar_datos_nueva_revision() y JS calcularCostosItem()
-                            subtotal_base     = total_materiales + total_otros + transporte + instalacion
-                            aumento_seguridad = subtotal_base * (seguridad / 100.0)
-                            subtotal_con_seg  = subtotal_base + aumento_seguridad
-                            reduccion_desc    = subtotal_con_seg * (descuento / 100.0)
-                            costo_unidad      = subtotal_con_seg - reduccion_desc
-                            total_item        = costo_unidad * cantidad
-
-                            total_calculado += total_item
+                # Total recalculado desde componentes (motor de precios, evaluado en lote)
+                total_calculado = totales_lote[idx]
 
                 # Obtener moneda de condiciones o datosGenerales
                 condiciones = cot.get('condiciones', {})
@@ -2483,13 +2565,13 @@ def todas_cotizaciones():
                     "es_antigua": False
                 })
         else:
-            print(f"[TODAS-COTIZACIONES] Error: {resultado_db.get('error')}")
+            logger.error("[TODAS-COTIZACIONES] Error: %s", resultado_db.get('error'))
+            etag = None  # No validar una página armada sobre un error
 
         # AGREGAR COTIZACIONES ANTIGUAS DE GOOGLE DRIVE (solo CWS Company)
-        cws_company_id = '5f6b07c9-3b9f-42ac-8ea0-e3ad9a4fe56b'
-        if session.get('company_id') == cws_company_id and not resultado_pdfs.get("error"):
+        if es_cws_legacy and not resultado_pdfs.get("error"):
             pdfs_antiguos = resultado_pdfs.get("resultados", [])
-            print(f"[TODAS-COTIZACIONES] Encontrados {len(pdfs_antiguos)} PDFs totales")
+            logger.info("[TODAS-COTIZACIONES] Encontrados %s PDFs totales", len(pdfs_antiguos))
 
             for pdf in pdfs_antiguos:
                 numero_pdf = pdf.get('numero_cotizacion', 'N/A')
@@ -2525,7 +2607,7 @@ def todas_cotizaciones():
                         "es_antigua": True  # Marcar como antigua
                     })
 
-            print(f"[TODAS-COTIZACIONES] Total final: {len(cotizaciones)} cotizaciones (BD + antiguas)")
+            logger.info("[TODAS-COTIZACIONES] Total final: %s cotizaciones (BD + antiguas)", len(cotizaciones))
 
         # APLICAR FILTROS antes de paginación
         if any([filtro_numero, filtro_cliente, filtro_vendedor, filtro_proyecto,
@@ -2632,7 +2714,7 @@ def todas_cotizaciones():
 
             # Reemplazar cotizaciones con las filtradas
             cotizaciones = cotizaciones_filtradas
-            print(f"[TODAS-COTIZACIONES] Después de filtros: {len(cotizaciones)} cotizaciones")
+            logger.info("[TODAS-COTIZACIONES] Después de filtros: %s cotizaciones", len(cotizaciones))
 
         # APLICAR PAGINACIÓN
         total_cotizaciones = len(cotizaciones)
@@ -2651,9 +2733,10 @@ def todas_cotizaciones():
         # Obtener cotizaciones de la página actual
         cotizaciones_pagina = cotizaciones[start_index:end_index]
 
-        print(f"[TODAS-COTIZACIONES] Mostrando {len(cotizaciones_pagina)} de {total_cotizaciones} (página {page}/{total_pages})")
+        logger.info("[TODAS-COTIZACIONES] Mostrando %s de %s (página %s/%s)",
+                    len(cotizaciones_pagina), total_cotizaciones, page, total_pages)
 
-        return render_template(
+        return con_etag(render_template(
             "todas_cotizaciones.html",
             cotizaciones=cotizaciones_pagina,
             user_name=session.get('user_name', ''),
@@ -2662,10 +2745,10 @@ def todas_cotizaciones():
             total_pages=total_pages,
             total_cotizaciones=total_cotizaciones,
             page_size=page_size
-        )
+        ), etag)
 
     except Exception as e:
-        print(f"[TODAS-COTIZACIONES] Error: {e}")
+        logger.error("[TODAS-COTIZACIONES] Error: %s", e)
         import traceback
         traceback.print_exc()
         return f"Error al cargar cotizaciones: {str(e)}", 500
@@ -2858,7 +2941,7 @@ def ver_item(item_id):
         from urllib.parse import unquote
         item_id = unquote(item_id)
         
-        print(f"Viendo cotizacion: '{item_id}'")
+        logger.info("Viendo cotizacion: '%s'", item_id)
         
         resultado = db_manager.obtener_cotizacion(item_id)
         
@@ -2876,7 +2959,7 @@ def ver_item(item_id):
             return render_template("ver_cotizacion.html", cotizacion=resultado["item"])
             
     except Exception as e:
-        print(f"Error al ver cotizacion: {e}")
+        logger.error("Error al ver cotizacion: %s", e)
         import traceback
         traceback.print_exc()
         return handle_error_response(str(e), item_id)
@@ -2900,7 +2983,7 @@ def listar_cotizaciones():
         return jsonify(resultado)
         
     except Exception as e:
-        print(f"Error al listar: {e}")
+        logger.error("Error al listar: %s", e)
         return jsonify({"error": "Error del servidor"}), 500
     
     
@@ -2909,6 +2992,115 @@ def listar_cotizaciones():
 # GENERACIÓN DE TEXTO IA
 # ============================================
 
+def _anthropic_api_key():
+    """API key de Anthropic si está configurada y no es placeholder"""
+    api_key = os.getenv('ANTHROPIC_API_KEY', '').strip()
+    if api_key and not api_key.endswith('...') and api_key.startswith('sk-ant-'):
+        return api_key
+    return None
+
+
+def _texto_introductorio_generico(datos):
+    datos_generales = datos.get('datosGenerales', {})
+    cliente = datos_generales.get('cliente', 'Cliente')
+    proyecto = datos_generales.get('proyecto', 'su proyecto')
+
+    texto_generico = (
+        f"Estimado {cliente},\n\n"
+        f"CWS Company presenta esta propuesta económica "
+        f"para {proyecto}, "
+        f"equilibrando calidad, funcionalidad y costo.\n\n"
+        f"Quedamos a la espera de su respuesta."
+    )
+    return {"success": True, "texto": texto_generico, "fuente": "generico"}
+
+
+def generar_texto_introductorio(datos):
+    """
+    Llama a Claude con los datos de la cotización (tarea 'ia.texto_introductorio').
+    Si la llamada falla se devuelve el texto genérico, igual que antes.
+
+    Returns:
+        {"success", "texto", "fuente": "ia" | "generico", "textoGuardado"}
+    """
+    api_key = _anthropic_api_key()
+    if api_key:
+        import anthropic
+
+        datos_generales = datos.get('datosGenerales', {})
+        items = datos.get('items', [])
+        condiciones = datos.get('condiciones', {})
+        revision = datos.get('revision', '1')
+        cambios = datos.get('cambiosRevision', '')
+
+        cliente = datos_generales.get('cliente', 'Cliente')
+        proyecto = datos_generales.get('proyecto', 'su proyecto')
+        vendedor = datos_generales.get('vendedor', 'CWS Company')
+
+        # Construir resumen de items
+        items_resumen = ""
+        for i, item in enumerate(items[:10]):  # max 10 items para no exceder tokens
+            desc = (item.get('descripcion') or 'Sin descripción')[:100]
+            precio = item.get('total') or item.get('totalItem') or 'N/A'
+            uom = item.get('uom', '')
+            cant = item.get('cantidad', '')
+            items_resumen += f"- Item {i+1}: {desc} | {cant} {uom} | ${precio}\n"
+
+        moneda = condiciones.get('moneda', 'MXN')
+
+        # System prompt
+        system_prompt = (
+            "Eres un cotizador profesional mexicano. Generas textos introductorios "
+            "para PDFs de cotizaciones. Sé MUY conciso — escribe 30% más breve de lo "
+            "que normalmente harías. Profesional y cálido. "
+            "Escribe en español formal. NO uses markdown. "
+            "Formato: texto plano con saltos de línea simples. "
+            "Máximo 2 párrafos breves. Ve directo al punto, sin rodeos."
+        )
+
+        # User prompt
+        user_prompt = f"""Genera el texto introductorio para un PDF de cotización con estos datos:
+
+Cliente: {cliente}
+Proyecto: {proyecto}
+Vendedor: {vendedor}
+Moneda: {moneda}
+Revisión: R{revision}
+
+Resumen de ítems cotizados:
+{items_resumen if items_resumen else 'No se especificaron ítems'}"""
+
+        if cambios and revision != '1':
+            user_prompt += f"\nCambios respecto a revisión anterior:\n{cambios}\nExplica estos cambios de forma profesional.\n"
+
+        user_prompt += "\nEscribe un texto introductorio de 1-2 párrafos breves (30% más corto de lo habitual) que presente la cotización. Ve directo al punto."
+
+        try:
+            client = anthropic.Anthropic(api_key=api_key)
+            message = client.messages.create(
+                model="claude-sonnet-4-6",
+                max_tokens=400,
+                temperature=0.7,
+                system=system_prompt,
+                messages=[{"role": "user", "content": user_prompt}]
+            )
+            texto_generado = message.content[0].text
+            logger.info("[IA] Texto generado: %s caracteres", len(texto_generado))
+
+            return {
+                "success": True,
+                "texto": texto_generado,
+                "fuente": "ia",
+                "textoGuardado": texto_generado
+            }
+
+        except Exception as ia_error:
+            logger.error("[IA] Error llamando a Claude: %s", str(ia_error))
+            # Fallback a texto genérico
+
+    return {**_texto_introductorio_generico(datos), "textoGuardado": None}
+
+
 @app.route("/api/generar-texto-ia", methods=["POST"])
 def generar_texto_ia():
     """
@@ -2951,9 +3143,9 @@ def generar_texto_ia():
                         None
                     )
                     if texto_guardado:
-                        print(f"[IA] Texto guardado encontrado en BD ({len(texto_guardado)} chars)")
+                        logger.info("[IA] Texto guardado encontrado en BD (%s chars)", len(texto_guardado))
             except Exception as e:
-                print(f"[IA] Error buscando texto guardado: {e}")
+                logger.error("[IA] Error buscando texto guardado: %s", e)
 
         # Si ya existe texto guardado, devolverlo sin llamar a Claude
         if texto_guardado:
@@ -2964,108 +3156,26 @@ def generar_texto_ia():
                 "textoGuardado": texto_guardado
             })
 
-        # Intentar usar Claude si está configurado
-        api_key = os.getenv('ANTHROPIC_API_KEY', '').strip()
-        # Solo usar IA si la API key está configurada y no es placeholder
-        if api_key and not api_key.endswith('...') and api_key.startswith('sk-ant-'):
-            import anthropic
-
-            datos_generales = datos.get('datosGenerales', {})
-            items = datos.get('items', [])
-            condiciones = datos.get('condiciones', {})
-            revision = datos.get('revision', '1')
-            cambios = datos.get('cambiosRevision', '')
-
-            cliente = datos_generales.get('cliente', 'Cliente')
-            proyecto = datos_generales.get('proyecto', 'su proyecto')
-            vendedor = datos_generales.get('vendedor', 'CWS Company')
-
-            # Construir resumen de items
-            items_resumen = ""
-            for i, item in enumerate(items[:10]):  # max 10 items para no exceder tokens
-                desc = (item.get('descripcion') or 'Sin descripción')[:100]
-                precio = item.get('total') or item.get('totalItem') or 'N/A'
-                uom = item.get('uom', '')
-                cant = item.get('cantidad', '')
-                items_resumen += f"- Item {i+1}: {desc} | {cant} {uom} | ${precio}\n"
-
-            moneda = condiciones.get('moneda', 'MXN')
-
-            # System prompt
-            system_prompt = (
-                "Eres un cotizador profesional mexicano. Generas textos introductorios "
-                "para PDFs de cotizaciones. Sé MUY conciso — escribe 30% más breve de lo "
-                "que normalmente harías. Profesional y cálido. "
-                "Escribe en español formal. NO uses markdown. "
-                "Formato: texto plano con saltos de línea simples. "
-                "Máximo 2 párrafos breves. Ve directo al punto, sin rodeos."
-            )
-
-            # User prompt
-            user_prompt = f"""Genera el texto introductorio para un PDF de cotización con estos datos:
-
-Cliente: {cliente}
-Proyecto: {proyecto}
-Vendedor: {vendedor}
-Moneda: {moneda}
-Revisión: R{revision}
-
-Resumen de ítems cotizados:
-{items_resumen if items_resumen else 'No se especificaron ítems'}"""
-
-            if cambios and revision != '1':
-                user_prompt += f"\nCambios respecto a revisión anterior:\n{cambios}\nExplica estos cambios de forma profesional.\n"
-
-            user_prompt += "\nEscribe un texto introductorio de 1-2 párrafos breves (30% más corto de lo habitual) que presente la cotización. Ve directo al punto."
-
-            try:
-                client = anthropic.Anthropic(api_key=api_key)
-                message = client.messages.create(
-                    model="claude-sonnet-4-6",
-                    max_tokens=400,
-                    temperature=0.7,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": user_prompt}]
-                )
-                texto_generado = message.content[0].text
-                print(f"[IA] Texto generado: {len(texto_generado)} caracteres")
-
+        # Claude corre en la cola de trabajos (segundos por llamada); el navegador
+        # consulta estado_url hasta tener el resultado
+        if _anthropic_api_key():
+            trabajo = encolar_trabajo('ia.texto_introductorio', datos, prioridad=PRIORIDAD_ALTA)
+            if trabajo:
                 return jsonify({
                     "success": True,
-                    "texto": texto_generado,
-                    "fuente": "ia",
-                    "textoGuardado": texto_guardado or texto_generado
-                }), 200
-
-            except Exception as ia_error:
-                print(f"[IA] Error llamando a Claude: {str(ia_error)}")
-                # Fallback a texto genérico
-        else:
-            print("[IA] ANTHROPIC_API_KEY no configurada - usando texto genérico")
+                    "pendiente": True,
+                    "trabajo_id": trabajo["id"],
+                    "estado_url": url_for('estado_trabajo', trabajo_id=trabajo["id"]),
+                    "textoGuardado": None
+                }), 202
+            return jsonify(generar_texto_introductorio(datos)), 200
+        logger.info("[IA] ANTHROPIC_API_KEY no configurada - usando texto genérico")
 
-        # Texto genérico (fallback)
-        datos_generales = datos.get('datosGenerales', {})
-        cliente = datos_generales.get('cliente', 'Cliente')
-        proyecto = datos_generales.get('proyecto', 'su proyecto')
-
-        texto_generico = (
-            f"Estimado {cliente},\n\n"
-            f"CWS Company presenta esta propuesta económica "
-            f"para {proyecto}, "
-            f"equilibrando calidad, funcionalidad y costo.\n\n"
-            f"Quedamos a la espera de su respuesta."
-        )
-
-        return jsonify({
-            "success": True,
-            "texto": texto_generico,
-            "fuente": "generico",
-            "textoGuardado": texto_guardado or None
-        }), 200
+        return jsonify({**_texto_introductorio_generico(datos), "textoGuardado": None}), 200
 
     except Exception as e:
         error_msg = str(e)
-        print(f"[IA] Error en generar-texto-ia: {error_msg}")
+        logger.error("[IA] Error en generar-texto-ia: %s", error_msg)
         return jsonify({"success": False, "error": error_msg, "textoGuardado": None}), 500
 
 
@@ -3149,18 +3259,18 @@ def generar_pdf():
             'logo_path': 'static/logo.png'
         }
         
-        print(f"Generando PDF para: {numero_cotizacion}")
-        print(f"Items count: {len(items)}")
-        print(f"Cliente: {datos_generales.get('cliente', 'No encontrado')}")
+        logger.info("Generando PDF para: %s", numero_cotizacion)
+        logger.info("Items count: %s", len(items))
+        logger.info("Cliente: %s", datos_generales.get('cliente', 'No encontrado'))
         
         # Intentar con ReportLab primero (más estable)
         if REPORTLAB_AVAILABLE:
-            print("Generando PDF con ReportLab")
+            logger.info("Generando PDF con ReportLab")
             pdf_data = generar_pdf_reportlab(cotizacion, company_branding=g.get("company"), texto_personalizado=texto_personalizado)
             pdf_buffer = io.BytesIO(pdf_data)
             
         elif WEASYPRINT_AVAILABLE:
-            print("Generando PDF con WeasyPrint (fallback)")
+            logger.warning("Generando PDF con WeasyPrint (fallback)")
             # Lógica WeasyPrint como fallback
             import tempfile
             
@@ -3170,8 +3280,9 @@ def generar_pdf():
                 f.write(html_content)
                 temp_html_path = f.name
             
-            html_obj = weasyprint.HTML(filename=temp_html_path)
-            pdf_file = html_obj.write_pdf()
+            with span('pdf'):
+                html_obj = weasyprint.HTML(filename=temp_html_path)
+                pdf_file = html_obj.write_pdf()
             os.unlink(temp_html_path)
             
             pdf_buffer = io.BytesIO(pdf_file)
@@ -3181,25 +3292,14 @@ def generar_pdf():
         pdf_buffer.seek(0)
         filename = f"{numero_cotizacion.replace('/', '_').replace('-', '_')}.pdf"
         
-        print(f"PDF generado exitosamente: {filename}")
+        logger.info("PDF generado exitosamente: %s", filename)
         
-        # IMPORTANTE: Almacenar el PDF en el sistema antes de enviarlo
+        # IMPORTANTE: Almacenar el PDF en el sistema (subida a Storage en la cola de trabajos)
         if pdf_manager:
             try:
-                pdf_content = pdf_buffer.getvalue()  # Obtener contenido binario
-                resultado_almacenamiento = pdf_manager.almacenar_pdf_nuevo(
-                    pdf_content=pdf_content,
-                    cotizacion_data=cotizacion
-                )
-                
-                if resultado_almacenamiento.get("success"):
-                    print(f"PDF almacenado exitosamente: {resultado_almacenamiento.get('mensaje')}")
-                    print(f"Ruta: {resultado_almacenamiento.get('ruta')}")
-                else:
-                    print(f"Error almacenando PDF: {resultado_almacenamiento.get('error')}")
-                    
+                almacenar_pdf_en_cola(pdf_buffer.getvalue(), cotizacion)
             except Exception as e:
-                print(f"Error en almacenamiento de PDF: {e}")
+                logger.error("Error en almacenamiento de PDF: %s", e)
                 # No fallar la descarga por error de almacenamiento
 
         # Guardar texto introductorio en la cotización para futuras referencias
@@ -3211,11 +3311,11 @@ def generar_pdf():
                 cotizacion['textoIntroductorio'] = texto_personalizado
                 resultado_texto = db_manager.guardar_cotizacion(cotizacion, company_id=session.get("company_id"))
                 if resultado_texto.get('success'):
-                    print(f"Texto introductorio guardado en cotización ({len(texto_personalizado)} chars)")
+                    logger.info("Texto introductorio guardado en cotización (%s chars)", len(texto_personalizado))
                 else:
-                    print(f"Error guardando texto introductorio: {resultado_texto.get('error')}")
+                    logger.error("Error guardando texto introductorio: %s", resultado_texto.get('error'))
             except Exception as e:
-                print(f"Error guardando texto introductorio: {e}")
+                logger.error("Error guardando texto introductorio: %s", e)
 
         # Regresar el buffer al inicio para la descarga
         pdf_buffer.seek(0)
@@ -3228,7 +3328,7 @@ def generar_pdf():
         )
         
     except Exception as e:
-        print(f"Error generando PDF: {e}")
+        logger.error("Error generando PDF: %s", e)
         import traceback
         traceback.print_exc()
         return jsonify({
@@ -3249,7 +3349,7 @@ def buscar_pdfs():
         page = datos.get("page", 1)
         per_page = datos.get("per_page", int(os.getenv('DEFAULT_PAGE_SIZE', '20')))
         
-        print(f"Buscando PDFs: '{query}' (pagina {page})")
+        logger.info("Buscando PDFs: '%s' (pagina %s)", query, page)
         
         # Buscar PDFs usando el PDF Manager
         resultado = pdf_manager.buscar_pdfs(query, page, per_page)
@@ -3260,7 +3360,7 @@ def buscar_pdfs():
         return jsonify(resultado)
         
     except Exception as e:
-        print(f"Error en búsqueda de PDFs: {e}")
+        logger.error("Error en búsqueda de PDFs: %s", e)
         return jsonify({"error": "Error al buscar PDFs"}), 500
 
 @app.route("/pdf/<path:numero_cotizacion>")
@@ -3274,14 +3374,14 @@ def servir_pdf(numero_cotizacion):
         # BUGFIX: Eliminar trailing slash que causa problemas con nombres de archivo
         numero_cotizacion = numero_cotizacion.rstrip('/')
 
-        print(f"PDF: Sirviendo PDF:")
-        print(f"   URL original: '{numero_original}'")
-        print(f"   Después de unquote: '{numero_cotizacion}'")
+        logger.info("PDF: Sirviendo PDF:")
+        logger.info("   URL original: '%s'", numero_original)
+        logger.info("   Después de unquote: '%s'", numero_cotizacion)
         
         # Si tiene espacios, intentar reemplazar con guiones
         if ' ' in numero_cotizacion:
             numero_alternativo = numero_cotizacion.replace(' ', '-')
-            print(f"   Variación con guiones: '{numero_alternativo}'")
+            logger.info("   Variación con guiones: '%s'", numero_alternativo)
         else:
             numero_alternativo = None
         
@@ -3290,7 +3390,7 @@ def servir_pdf(numero_cotizacion):
         
         # Si no lo encuentra y hay una versión alternativa, intentar con esa
         if not resultado.get("encontrado", False) and numero_alternativo:
-            print(f"   No encontrado con espacios, intentando con guiones...")
+            logger.warning("   No encontrado con espacios, intentando con guiones...")
             resultado = pdf_manager.obtener_pdf(numero_alternativo)
             if resultado.get("encontrado", False):
                 numero_cotizacion = numero_alternativo  # Usar la versión que funcionó
@@ -3301,7 +3401,7 @@ def servir_pdf(numero_cotizacion):
         # (no es un fallo de sistema). El bloque de regeneración al vuelo debe ser alcanzable.
         if not resultado.get("encontrado", False):
             # PDF no existe en Storage — intentar generarlo al vuelo desde la cotización
-            print(f"PDF: No encontrado en Storage, intentando generar al vuelo para '{numero_cotizacion}'")
+            logger.warning("PDF: No encontrado en Storage, intentando generar al vuelo para '%s'", numero_cotizacion)
             if not (REPORTLAB_AVAILABLE or WEASYPRINT_AVAILABLE):
                 return jsonify({"error": f"PDF '{numero_cotizacion}' no encontrado y no hay generador disponible"}), 404
 
@@ -3315,12 +3415,12 @@ def servir_pdf(numero_cotizacion):
                 if pdf_data is None:
                     return jsonify({"error": "Error generando PDF al vuelo"}), 500
 
-                # Almacenar en Storage para futuras solicitudes
+                # Almacenar en Storage para futuras solicitudes (en la cola de trabajos)
                 if pdf_manager:
                     try:
-                        pdf_manager.almacenar_pdf_nuevo(pdf_content=pdf_data, cotizacion_data=cotizacion)
+                        almacenar_pdf_en_cola(pdf_data, cotizacion)
                     except Exception as store_err:
-                        print(f"PDF: Advertencia — no se pudo almacenar en Storage: {store_err}")
+                        logger.warning("PDF: Advertencia — no se pudo almacenar en Storage: %s", store_err)
 
                 from io import BytesIO
                 buf = BytesIO(pdf_data)
@@ -3328,7 +3428,7 @@ def servir_pdf(numero_cotizacion):
                 return send_file(buf, mimetype='application/pdf', as_attachment=False,
                                  download_name=f"{numero_cotizacion}.pdf")
             except Exception as gen_err:
-                print(f"PDF: Error generando PDF al vuelo: {gen_err}")
+                logger.error("PDF: Error generando PDF al vuelo: %s", gen_err)
                 return jsonify({"error": f"Error generando PDF: {str(gen_err)}"}), 500
         
         # Servir el archivo PDF
@@ -3344,12 +3444,12 @@ def servir_pdf(numero_cotizacion):
                 # Cloudinary eliminado
             }.get(tipo_fuente, "URL directa")
             
-            print(f"PDF: Sirviendo PDF de {fuente_nombre}: {numero_cotizacion}")
-            print(f"   URL: {ruta_completa}")
+            logger.info("PDF: Sirviendo PDF de %s: %s", fuente_nombre, numero_cotizacion)
+            logger.info("   URL: %s", ruta_completa)
             
             # Verificar que la URL no esté vacía
             if not ruta_completa or ruta_completa.strip() == "":
-                print(f"ERROR: URL vacía para PDF {numero_cotizacion}")
+                logger.error("ERROR: URL vacía para PDF %s", numero_cotizacion)
                 return jsonify({"error": "URL del PDF no disponible"}), 500
             
             # SOLUCIÓN: Descargar desde Supabase y servir directamente
@@ -3357,11 +3457,11 @@ def servir_pdf(numero_cotizacion):
                 import requests
                 from io import BytesIO
                 
-                print(f"   Descargando PDF desde: {ruta_completa}")
+                logger.info("   Descargando PDF desde: %s", ruta_completa)
                 response = requests.get(ruta_completa, timeout=30)
                 
                 if response.status_code == 200:
-                    print(f"   PDF descargado exitosamente ({len(response.content)} bytes)")
+                    logger.info("   PDF descargado exitosamente (%s bytes)", len(response.content))
                     
                     # Verificar que es un PDF válido
                     if response.content.startswith(b'%PDF'):
@@ -3375,14 +3475,14 @@ def servir_pdf(numero_cotizacion):
                             download_name=f"{numero_cotizacion}.pdf"
                         )
                     else:
-                        print(f"ERROR: Contenido descargado no es un PDF válido")
+                        logger.error("ERROR: Contenido descargado no es un PDF válido")
                         return jsonify({"error": "Archivo descargado no es un PDF válido"}), 500
                 else:
-                    print(f"ERROR: Descarga falló con código {response.status_code}")
+                    logger.error("ERROR: Descarga falló con código %s", response.status_code)
                     return jsonify({"error": f"Error descargando PDF (código {response.status_code})"}), 500
                     
             except Exception as download_error:
-                print(f"ERROR: Excepción descargando PDF: {download_error}")
+                logger.error("ERROR: Excepción descargando PDF: %s", download_error)
                 return jsonify({"error": f"Error descargando PDF: {str(download_error)}"}), 500
         
         # Si es un PDF de Google Drive, descargar y servir
@@ -3391,7 +3491,7 @@ def servir_pdf(numero_cotizacion):
             if not drive_id:
                 return jsonify({"error": "ID de Google Drive no encontrado"}), 500
             
-            print(f"PDF: Sirviendo PDF desde Google Drive: {numero_cotizacion} (ID: {drive_id})")
+            logger.info("PDF: Sirviendo PDF desde Google Drive: %s (ID: %s)", numero_cotizacion, drive_id)
             
             # Descargar PDF desde Google Drive usando ID (más eficiente)
             if drive_id:
@@ -3429,7 +3529,7 @@ def servir_pdf(numero_cotizacion):
             )
         
     except Exception as e:
-        print(f"Error sirviendo PDF: {e}")
+        logger.error("Error sirviendo PDF: %s", e)
         return jsonify({"error": f"Error sirviendo PDF: {str(e)}"}), 500
 
 @app.route("/desglose/<path:numero_cotizacion>")
@@ -3439,7 +3539,7 @@ def ver_desglose(numero_cotizacion):
         from urllib.parse import unquote
         numero_cotizacion = unquote(numero_cotizacion)
         
-        print(f"[DESGLOSE] Viendo: '{numero_cotizacion}'")
+        logger.info("[DESGLOSE] Viendo: '%s'", numero_cotizacion)
         
         # PASO 1: Intentar obtener cotización completa (con datos de desglose)
         resultado_cotizacion = db_manager.obtener_cotizacion(numero_cotizacion)
@@ -3447,17 +3547,22 @@ def ver_desglose(numero_cotizacion):
         if resultado_cotizacion.get("encontrado"):
             # Tenemos datos completos - mostrar desglose normal
             cotizacion = resultado_cotizacion["item"]
-            print(f"[DESGLOSE] Cotización encontrada en DB - mostrando desglose completo")
+            logger.info("[DESGLOSE] Cotización encontrada en DB - mostrando desglose completo")
+
+            # ETag sobre la cotización tal como viene de la BD (antes de completarla para el template)
+            etag = etag_cotizacion(cotizacion)
+            if no_modificada(etag):
+                return respuesta_no_modificada(etag)
 
             # Asegurar que la cotización tenga numeroCotizacion para el botón Nueva Revisión
             if not cotizacion.get('numeroCotizacion'):
                 cotizacion['numeroCotizacion'] = numero_cotizacion
-                print(f"[DESGLOSE] Añadido numeroCotizacion faltante: {numero_cotizacion}")
+                logger.info("[DESGLOSE] Añadido numeroCotizacion faltante: %s", numero_cotizacion)
 
             # Asegurar que exista datosGenerales (evitar errores de template)
             if not cotizacion.get('datosGenerales'):
                 cotizacion['datosGenerales'] = {}
-                print(f"[DESGLOSE] Inicializado datosGenerales vacío")
+                logger.info("[DESGLOSE] Inicializado datosGenerales vacío")
 
             # Asegurar que exista condiciones (evitar errores de template)
             # Intentar recuperar condiciones de datosGenerales si no existen a nivel raíz
@@ -3479,49 +3584,24 @@ def ver_desglose(numero_cotizacion):
                     # Normalizar alias
                     if 'condicionesPago' in cotizacion['condiciones'] and 'terminos' not in cotizacion['condiciones']:
                         cotizacion['condiciones']['terminos'] = cotizacion['condiciones']['condicionesPago']
-                    print(f"[DESGLOSE] Condiciones recuperadas de datosGenerales: {list(cotizacion['condiciones'].keys())}")
+                    logger.info("[DESGLOSE] Condiciones recuperadas de datosGenerales: %s",
+                                list(cotizacion['condiciones'].keys()))
                 else:
                     cotizacion['condiciones'] = {'moneda': 'MXN'}
-                    print(f"[DESGLOSE] Inicializado condiciones con valores por defecto")
+                    logger.info("[DESGLOSE] Inicializado condiciones con valores por defecto")
             else:
-                print(f"[DESGLOSE] Condiciones ya existentes: {list(cotizacion['condiciones'].keys())}")
+                logger.info("[DESGLOSE] Condiciones ya existentes: %s", list(cotizacion['condiciones'].keys()))
 
             # CALCULAR TOTALES para asegurar que se muestren correctamente
             if cotizacion.get('items') and isinstance(cotizacion['items'], list):
-                subtotal_calculado = 0.0
-                for item in cotizacion['items']:
-                    try:
-                        # Asegurar que item es un diccionario
-                        if not isinstance(item, dict):
-                            print(f"[DESGLOSE] ADVERTENCIA: Item no es diccionario, saltando")
-                            continue
-
-                        # Calcular total del item si no existe
-                        if not item.get('total') and not item.get('subtotal'):
-                            # Intentar obtener precio de cualquier campo
-                            precio_raw = item.get('precio_unitario') or item.get('precio') or item.get('costoUnidad') or 0
-                            cantidad_raw = item.get('cantidad') or 0
-
-                            # Convertir a float de manera segura
-                            precio = float(precio_raw) if precio_raw else 0.0
-                            cantidad = float(cantidad_raw) if cantidad_raw else 0.0
-
-                            item['total'] = float(precio * cantidad)
-                            print(f"[DESGLOSE] Item '{item.get('descripcion', 'N/A')}': calculado total = {item['total']}")
-
-                        # Sumar al subtotal general - convertir a float de manera segura
-                        total_raw = item.get('total') or item.get('subtotal') or 0
-                        item_total = float(total_raw) if total_raw else 0.0
-                        subtotal_calculado += item_total
-                    except (ValueError, TypeError, AttributeError) as e:
-                        print(f"[DESGLOSE] ERROR calculando item '{item.get('descripcion', 'N/A') if isinstance(item, dict) else 'UNKNOWN'}': {e}")
-                        continue
-
-                # Agregar totales calculados a la cotización como floats
-                cotizacion['subtotal_calculado'] = float(subtotal_calculado)
-                cotizacion['iva_calculado'] = float(subtotal_calculado * 0.16)
-                cotizacion['total_calculado'] = float(subtotal_calculado * 1.16)
-                print(f"[DESGLOSE] Totales calculados - Subtotal: {cotizacion['subtotal_calculado']}, IVA: {cotizacion['iva_calculado']}, Total: {cotizacion['total_calculado']}")
+                # Las líneas se muestran con el mismo motor que el resumen (no el total guardado)
+                aplicar_a_items(cotizacion['items'], completar_legacy=True)
+                resumen = resumen_cotizacion(cotizacion['items'])
+                cotizacion['subtotal_calculado'] = resumen['subtotal']
+                cotizacion['iva_calculado'] = resumen['iva']
+                cotizacion['total_calculado'] = resumen['total']
+                logger.info("[DESGLOSE] Totales calculados - Subtotal: %s, IVA: %s, Total: %s",
+                            cotizacion['subtotal_calculado'], cotizacion['iva_calculado'], cotizacion['total_calculado'])
             else:
                 # No hay items o no es lista válida - inicializar totales en 0
                 cotizacion['subtotal_calculado'] = 0.0
@@ -3529,14 +3609,14 @@ def ver_desglose(numero_cotizacion):
                 cotizacion['total_calculado'] = 0.0
                 if not cotizacion.get('items'):
                     cotizacion['items'] = []
-                print(f"[DESGLOSE] No hay items válidos, totales en 0")
+                logger.info("[DESGLOSE] No hay items válidos, totales en 0")
 
-            print(f"[DESGLOSE] Cotización con numeroCotizacion: {cotizacion.get('numeroCotizacion', 'N/A')}")
+            logger.info("[DESGLOSE] Cotización con numeroCotizacion: %s", cotizacion.get('numeroCotizacion', 'N/A'))
             from flask import render_template
-            return render_template("ver_cotizacion.html", cotizacion=cotizacion)
+            return con_etag(render_template("ver_cotizacion.html", cotizacion=cotizacion), etag)
         
         # PASO 2: No hay datos completos, verificar si existe PDF
-        print(f"[DESGLOSE] Cotización no en DB, verificando PDF...")
+        logger.info("[DESGLOSE] Cotización no en DB, verificando PDF...")
         resultado_pdf = pdf_manager.obtener_pdf(numero_cotizacion)
         
         if resultado_pdf.get("encontrado"):
@@ -3545,7 +3625,7 @@ def ver_desglose(numero_cotizacion):
             
             if tiene_desglose:
                 # PDF de cotización generada por la app, pero datos perdidos
-                print(f"[DESGLOSE] PDF encontrado (nueva cotización) - datos perdidos en contenedor")
+                logger.info("[DESGLOSE] PDF encontrado (nueva cotización) - datos perdidos en contenedor")
                 return render_template_string("""
                 <!DOCTYPE html>
                 <html lang="es">
@@ -3601,7 +3681,7 @@ def ver_desglose(numero_cotizacion):
                 """, numero=numero_cotizacion)
             else:
                 # PDF histórico sin desglose
-                print(f"[DESGLOSE] PDF histórico encontrado - sin desglose")
+                logger.info("[DESGLOSE] PDF histórico encontrado - sin desglose")
                 return render_template_string("""
                 <!DOCTYPE html>
                 <html lang="es">
@@ -3647,7 +3727,7 @@ def ver_desglose(numero_cotizacion):
                 """, numero=numero_cotizacion)
         
         # PASO 3: No existe ni cotización ni PDF
-        print(f"[DESGLOSE] Cotización '{numero_cotizacion}' no encontrada en ninguna fuente")
+        logger.warning("[DESGLOSE] Cotización '%s' no encontrada en ninguna fuente", numero_cotizacion)
         return render_template_string("""
         <!DOCTYPE html>
         <html lang="es">
@@ -3688,7 +3768,7 @@ def ver_desglose(numero_cotizacion):
         """, numero=numero_cotizacion), 404
         
     except Exception as e:
-        print(f"[DESGLOSE] ERROR CRÍTICO procesando '{numero_cotizacion}': {e}")
+        logger.error("[DESGLOSE] ERROR CRÍTICO procesando '%s': %s", numero_cotizacion, e)
         import traceback
         traceback.print_exc()
 
@@ -3810,13 +3890,13 @@ def descargar_desglose_pdf(numero_cotizacion):
     try:
         from urllib.parse import unquote
         numero_cotizacion = unquote(numero_cotizacion)
-        print(f"[DESGLOSE_PDF] Generando PDF compacto para: '{numero_cotizacion}'")
+        logger.info("[DESGLOSE_PDF] Generando PDF compacto para: '%s'", numero_cotizacion)
 
         # Obtener datos de la cotización (misma lógica que ver_desglose)
         resultado = db_manager.obtener_cotizacion(numero_cotizacion)
 
         if not resultado.get("encontrado"):
-            print(f"[DESGLOSE_PDF] Cotización no encontrada: '{numero_cotizacion}'")
+            logger.warning("[DESGLOSE_PDF] Cotización no encontrada: '%s'", numero_cotizacion)
             return jsonify({"error": "Cotización no encontrada", "numero": numero_cotizacion}), 404
 
         cotizacion = resultado["item"]
@@ -3851,7 +3931,7 @@ def descargar_desglose_pdf(numero_cotizacion):
         safe_numero = numero_cotizacion.replace('/', '-').replace('\\', '-')
         filename = f"Desglose_{safe_numero}.pdf"
 
-        print(f"[DESGLOSE_PDF] PDF generado: {len(pdf_data)} bytes -> {filename}")
+        logger.info("[DESGLOSE_PDF] PDF generado: %s bytes -> %s", len(pdf_data), filename)
 
         return send_file(
             io.BytesIO(pdf_data),
@@ -3861,7 +3941,7 @@ def descargar_desglose_pdf(numero_cotizacion):
         )
 
     except Exception as e:
-        print(f"[DESGLOSE_PDF] ERROR: {e}")
+        logger.error("[DESGLOSE_PDF] ERROR: %s", e)
         import traceback
         traceback.print_exc()
         return jsonify({"error": f"Error generando PDF de desglose: {str(e)}"}), 500
@@ -4017,6 +4097,9 @@ def panel_admin():
                     estadoHtml += `<strong>Total Cotizaciones:</strong> ${{data.total_cotizaciones}}<br>`;
                     estadoHtml += `<strong>Clientes Únicos:</strong> ${{data.clientes_unicos}}<br>`;
                     estadoHtml += `<strong>Vendedores Únicos:</strong> ${{data.vendedores_unicos}}`;
+                    for (const [moneda, total] of Object.entries(data.totales_por_moneda || {{}})) {{
+                        estadoHtml += `<br><strong>Total ${{moneda}}:</strong> ${{total.toLocaleString('es-MX', {{minimumFractionDigits: 2}})}}`;
+                    }}
                     estadoHtml += `</div>`;
                     
                     document.getElementById('estado-sistema').innerHTML = estadoHtml;
@@ -4044,10 +4127,25 @@ def panel_admin():
                 }}
             }}
             
+            async function esperarTrabajo(estadoUrl, timeoutMs = 600000) {{
+                const limite = Date.now() + timeoutMs;
+                while (Date.now() < limite) {{
+                    await new Promise(r => setTimeout(r, 2000));
+                    const trabajo = await (await fetch(estadoUrl)).json();
+                    if (trabajo.estado === 'completado') return trabajo.resultado;
+                    if (trabajo.estado === 'fallido' || !trabajo.success) return {{ error: trabajo.ultimo_error || trabajo.error }};
+                }}
+                return {{ error: 'Tiempo de espera agotado; revise /admin/trabajos' }};
+            }}
+
             async function sincronizarOffline() {{
                 try {{
                     const response = await fetch('/admin/sincronizar-offline');
-                    const data = await response.json();
+                    let data = await response.json();
+                    if (data.pendiente) {{
+                        mostrarResultado('resultado-migracion', data, 'info');
+                        data = await esperarTrabajo(data.estado_url);
+                    }}
                     
                     if (data.exito) {{
                         mostrarResultado('resultado-migracion', data, 'success');
@@ -4091,13 +4189,18 @@ def migrar_a_mongodb():
 
 @app.route("/admin/sincronizar-offline")
 def sincronizar_offline():
-    """Sincroniza PostgreSQL → archivo offline como respaldo"""
-    try:
-        if db_manager.modo_offline:
-            return jsonify({
-                "error": "En modo offline, no se puede sincronizar desde la base de datos"
-            }), 503
+    """Encola la sincronización PostgreSQL → archivo offline (tarea 'admin.sincronizar_offline')"""
+    if db_manager.modo_offline:
+        return jsonify({
+            "error": "En modo offline, no se puede sincronizar desde la base de datos"
+        }), 503
+    return encolar_o_ejecutar('admin.sincronizar_offline', {}, _sincronizar_offline_json,
+                              "Sincronización a archivo offline en cola")
+
 
+def _sincronizar_offline_json():
+    """Sincroniza PostgreSQL → archivo offline como respaldo. Returns: (dict, status)"""
+    try:
         # Obtener todas las cotizaciones (prioridad: PostgreSQL directo → SDK REST → offline JSON)
         cotizaciones_supabase = []
         try:
@@ -4139,9 +4242,9 @@ def sincronizar_offline():
                 datos_offline = db_manager._cargar_datos_offline()
                 cotizaciones_supabase = datos_offline.get("cotizaciones", [])
                 if not cotizaciones_supabase:
-                    return jsonify({
+                    return {
                         "error": f"No se pudo obtener cotizaciones. PG: {str(e)[:100]}, SDK: {str(e2)[:100]}"
-                    }), 500
+                    }, 500
 
         # Crear estructura offline
         datos_offline = {
@@ -4156,21 +4259,21 @@ def sincronizar_offline():
 
         # Guardar archivo offline actualizado
         if db_manager._guardar_datos_offline(datos_offline):
-            return jsonify({
+            return {
                 "exito": True,
                 "total_sincronizadas": len(cotizaciones_supabase),
                 "archivo": getattr(db_manager, 'archivo_offline', 'cotizaciones_offline.json'),
                 "mensaje": f"{len(cotizaciones_supabase)} cotizaciones sincronizadas a archivo offline"
-            })
+            }, 200
         else:
-            return jsonify({
+            return {
                 "error": "Error guardando archivo offline"
-            }), 500
+            }, 500
 
     except Exception as e:
-        return jsonify({
+        return {
             "error": f"Error durante sincronización: {str(e)}"
-        }), 500
+        }, 500
 
 # ============================================
 # RUTAS DE ADMINISTRACIÓN DE PDFs
@@ -4339,6 +4442,17 @@ def admin_pdfs():
                     }}
                 }}
                 
+                async function esperarTrabajo(estadoUrl, timeoutMs = 600000) {{
+                    const limite = Date.now() + timeoutMs;
+                    while (Date.now() < limite) {{
+                        await new Promise(r => setTimeout(r, 2000));
+                        const trabajo = await (await fetch(estadoUrl)).json();
+                        if (trabajo.estado === 'completado') return trabajo.resultado;
+                        if (trabajo.estado === 'fallido' || !trabajo.success) return {{ error: trabajo.ultimo_error || trabajo.error }};
+                    }}
+                    return {{ error: 'Tiempo de espera agotado; revise /admin/trabajos' }};
+                }}
+
                 async function escanearPDFs() {{
                     if (!confirm('¿Escanear las carpetas de PDFs y registrar archivos no indexados?')) {{
                         return;
@@ -4347,7 +4461,10 @@ def admin_pdfs():
                     try {{
                         mostrarResultado('Escaneando carpetas de PDFs...', 'info');
                         const response = await fetch('/admin/escanear-pdfs-existentes');
-                        const data = await response.json();
+                        let data = await response.json();
+                        if (data.pendiente) {{
+                            data = await esperarTrabajo(data.estado_url);
+                        }}
                         
                         if (data.error) {{
                             mostrarError(data.error);
@@ -4679,12 +4796,12 @@ def actualizar_rutas_pdf():
                 )
                 
                 actualizados += 1
-                print(f"Actualizado: {numero_cotizacion} -> {nueva_ruta}")
+                logger.info("Actualizado: %s -> %s", numero_cotizacion, nueva_ruta)
                 
             except Exception as e:
                 error_msg = f"Error actualizando {registro.get('numero_cotizacion', 'desconocido')}: {str(e)}"
                 errores.append(error_msg)
-                print(error_msg)
+                logger.info("%s", error_msg)
         
         resultado = {
             "success": True,
@@ -4703,11 +4820,16 @@ def actualizar_rutas_pdf():
 
 @app.route("/admin/escanear-pdfs-existentes")
 def escanear_pdfs_existentes():
-    """Escanea las carpetas de PDFs y registra archivos no indexados"""
+    """Encola el escaneo de carpetas de PDFs (tarea 'admin.escanear_pdfs')"""
+    if db_manager.modo_offline:
+        return jsonify({"error": "No disponible en modo offline"}), 400
+    return encolar_o_ejecutar('admin.escanear_pdfs', {}, _escanear_pdfs_existentes,
+                              "Escaneo de carpetas de PDFs en cola")
+
+
+def _escanear_pdfs_existentes():
+    """Escanea las carpetas de PDFs y registra archivos no indexados. Returns: (dict, status)"""
     try:
-        if db_manager.modo_offline:
-            return jsonify({"error": "No disponible en modo offline"}), 400
-        
         registrados = 0
         ya_existentes = 0
         errores = []
@@ -4744,14 +4866,14 @@ def escanear_pdfs_existentes():
                         
                         pdf_manager.pdf_collection.insert_one(registro_pdf)
                         registrados += 1
-                        print(f"Registrado PDF nuevo: {numero_cotizacion}")
+                        logger.info("Registrado PDF nuevo: %s", numero_cotizacion)
                     else:
                         ya_existentes += 1
                         
                 except Exception as e:
                     error_msg = f"Error procesando {archivo_pdf.name}: {str(e)}"
                     errores.append(error_msg)
-                    print(error_msg)
+                    logger.info("%s", error_msg)
         
         # Escanear carpeta de PDFs antiguos
         if pdf_manager.antiguas_path.exists():
@@ -4785,14 +4907,14 @@ def escanear_pdfs_existentes():
                         
                         pdf_manager.pdf_collection.insert_one(registro_pdf)
                         registrados += 1
-                        print(f"Registrado PDF antiguo: {numero_cotizacion}")
+                        logger.info("Registrado PDF antiguo: %s", numero_cotizacion)
                     else:
                         ya_existentes += 1
                         
                 except Exception as e:
                     error_msg = f"Error procesando {archivo_pdf.name}: {str(e)}"
                     errores.append(error_msg)
-                    print(error_msg)
+                    logger.info("%s", error_msg)
         
         resultado = {
             "success": True,
@@ -4807,70 +4929,73 @@ def escanear_pdfs_existentes():
             ]
         }
         
-        return jsonify(resultado)
+        return resultado, 200
 
     except Exception as e:
-        return jsonify({"error": f"Error escaneando PDFs: {str(e)}"}), 500
+        return {"error": f"Error escaneando PDFs: {str(e)}"}, 500
 
 @app.route("/admin/regenerar-pdfs-faltantes", methods=["POST"])
 def regenerar_pdfs_faltantes():
-    """Regenera PDFs para todas las cotizaciones que no tienen PDF en ningún storage."""
-    try:
-        if not (REPORTLAB_AVAILABLE or WEASYPRINT_AVAILABLE):
-            return jsonify({"error": "No hay generador de PDF disponible (ReportLab/WeasyPrint)"}), 500
+    """Encola la búsqueda de cotizaciones sin PDF (tarea 'admin.regenerar_pdfs')"""
+    if not (REPORTLAB_AVAILABLE or WEASYPRINT_AVAILABLE):
+        return jsonify({"error": "No hay generador de PDF disponible (ReportLab/WeasyPrint)"}), 500
+    return encolar_o_ejecutar('admin.regenerar_pdfs', {"company_id": session.get("company_id")},
+                              _regenerar_pdfs_faltantes, "Regeneración de PDFs faltantes en cola")
 
-        # Obtener todas las cotizaciones de la base de datos
-        resultado_busqueda = db_manager.buscar_cotizaciones("", pagina=1, por_pagina=500, company_id=session.get("company_id"))
-        cotizaciones = resultado_busqueda.get("items", [])
 
-        total = len(cotizaciones)
-        regenerados = 0
+def _regenerar_pdfs_faltantes(company_id=None, por_pagina=100):
+    """
+    Busca las cotizaciones que no tienen PDF en ningún storage y encola un
+    'pdf.generar' de prioridad baja por cada una. Returns: (dict, status)
+    """
+    try:
+        cola = app.extensions['cola_trabajos']
+        total = 0
+        encolados = 0
         ya_existentes = 0
         fallidos = []
 
-        for cot in cotizaciones:
-            numero = cot.get("numeroCotizacion") or cot.get("numero_cotizacion", "")
-            if not numero:
-                continue
-
-            # Verificar si ya existe el PDF en algún storage
-            resultado_pdf = pdf_manager.obtener_pdf(numero)
-            if resultado_pdf.get("encontrado"):
-                ya_existentes += 1
-                continue
+        pagina = 1
+        while True:
+            resultado_busqueda = db_manager.buscar_cotizaciones("", page=pagina, per_page=por_pagina, company_id=company_id)
+            cotizaciones = resultado_busqueda.get("resultados", [])
+            total += len(cotizaciones)
 
-            # No existe — intentar regenerar
-            try:
-                # Obtener datos completos de la cotización
-                cot_completa = db_manager.obtener_cotizacion(numero)
-                if not cot_completa.get("encontrado"):
-                    fallidos.append({"numero": numero, "razon": "cotización no encontrada en DB"})
+            for cot in cotizaciones:
+                numero = cot.get("numeroCotizacion") or cot.get("numero_cotizacion", "")
+                if not numero:
                     continue
 
-                cotizacion_data = cot_completa["item"]
-                pdf_data = generar_pdf_reportlab(cotizacion_data, company_branding=g.get("company")) if REPORTLAB_AVAILABLE else None
-                if not pdf_data:
-                    fallidos.append({"numero": numero, "razon": "generación de PDF falló"})
+                # Verificar si ya existe el PDF en algún storage
+                resultado_pdf = pdf_manager.obtener_pdf(numero)
+                if resultado_pdf.get("encontrado"):
+                    ya_existentes += 1
                     continue
 
-                pdf_manager.almacenar_pdf_nuevo(pdf_content=pdf_data, cotizacion_data=cotizacion_data)
-                regenerados += 1
-                print(f"[REGENERAR] PDF regenerado: {numero}")
-
-            except Exception as err:
-                fallidos.append({"numero": numero, "razon": str(err)})
-                print(f"[REGENERAR] Error con {numero}: {err}")
+                try:
+                    cola.encolar('pdf.generar', {"numero": numero, "company_id": company_id},
+                                 prioridad=PRIORIDAD_BAJA, company_id=company_id,
+                                 clave_idempotencia=f"pdf.regenerar:{numero}:{datetime.date.today()}")
+                    encolados += 1
+                except Exception as err:
+                    fallidos.append({"numero": numero, "razon": str(err)})
+                    logger.error("[REGENERAR] Error con %s: %s", numero, err)
+
+            if len(cotizaciones) < por_pagina or pagina >= resultado_busqueda.get("pages", pagina):
+                break
+            pagina += 1
 
-        return jsonify({
+        logger.info("[REGENERAR] %s PDFs faltantes encolados de %s cotizaciones", encolados, total)
+        return {
             "total_cotizaciones": total,
             "ya_existentes": ya_existentes,
-            "regenerados": regenerados,
+            "encolados": encolados,
             "fallidos": len(fallidos),
             "detalle_fallidos": fallidos[:50]  # Limitar a 50 para no saturar la respuesta
-        })
+        }, 200
 
     except Exception as e:
-        return jsonify({"error": f"Error en regeneración masiva: {str(e)}"}), 500
+        return {"error": f"Error en regeneración masiva: {str(e)}"}, 500
 
 @app.route("/admin/debug-pdf/<path:numero_cotizacion>")
 def debug_pdf_especifico(numero_cotizacion):
@@ -4977,98 +5102,44 @@ def debug_env():
     return jsonify(env_check)
 
 @app.route("/stats")
+@login_required
+@company_api_required
 def stats_sistema():
-    """Estadísticas detalladas de la base de datos"""
+    """Estadísticas detalladas de la base de datos (agregados por compañía)"""
     try:
-        if db_manager.modo_offline:
-            # Modo offline - contar desde archivo JSON
-            datos = db_manager._cargar_datos_offline()
-            total_cotizaciones = len(datos.get("cotizaciones", []))
-            
-            # Estadísticas adicionales
-            cotizaciones = datos.get("cotizaciones", [])
-            clientes_unicos = set()
-            vendedores_unicos = set()
-            
-            for cot in cotizaciones:
-                datos_gen = cot.get("datosGenerales", {})
-                if datos_gen.get("cliente"):
-                    clientes_unicos.add(datos_gen["cliente"])
-                if datos_gen.get("vendedor"):
-                    vendedores_unicos.add(datos_gen["vendedor"])
-            
-            return jsonify({
-                "modo": "OFFLINE",
-                "total_cotizaciones": total_cotizaciones,
-                "clientes_unicos": len(clientes_unicos),
-                "vendedores_unicos": len(vendedores_unicos),
-                "archivo_datos": db_manager.archivo_offline,
-                "metadata": datos.get("metadata", {})
-            })
-        else:
-            # Modo online - Supabase PostgreSQL
-            # Usar obtener_estadisticas() que ya tiene triple capa (PG → SDK → JSON)
-            stats = db_manager.obtener_estadisticas()
-            total_cotizaciones = stats.get("total_cotizaciones", 0)
+        company_id = session["company_id"]
+        stats = db_manager.obtener_estadisticas_detalladas(company_id=company_id)
 
-            # Clientes y vendedores únicos vía Supabase SDK
-            clientes_unicos = 0
-            vendedores_unicos = 0
-            try:
-                if hasattr(db_manager, 'supabase_client') and db_manager.supabase_client:
-                    try:
-                        resp = db_manager.supabase_client.table('cotizaciones').select('datosGenerales').execute()
-                        if resp.data:
-                            clientes_set = set()
-                            vendedores_set = set()
-                            for row in resp.data:
-                                dg = row.get('datosGenerales', {})
-                                if dg.get('cliente'):
-                                    clientes_set.add(dg['cliente'])
-                                if dg.get('vendedor'):
-                                    vendedores_set.add(dg['vendedor'])
-                            clientes_unicos = len(clientes_set)
-                            vendedores_unicos = len(vendedores_set)
-                    except Exception:
-                        # Fallback: contar desde JSON offline
-                        datos = db_manager._cargar_datos_offline()
-                        cots = datos.get("cotizaciones", [])
-                        c_set = set(c.get("datosGenerales", {}).get("cliente") for c in cots if c.get("datosGenerales", {}).get("cliente"))
-                        v_set = set(c.get("datosGenerales", {}).get("vendedor") for c in cots if c.get("datosGenerales", {}).get("vendedor"))
-                        clientes_unicos = len(c_set)
-                        vendedores_unicos = len(v_set)
-            except Exception:
-                clientes_unicos = "Error calculando"
-                vendedores_unicos = "Error calculando"
-
-            # Última cotización vía Supabase SDK
+        # Última cotización: una sola fila, ya ordenada por fecha en cada capa
+        ultima_info = None
+        try:
+            ultima = db_manager.buscar_cotizaciones("", page=1, per_page=1, company_id=company_id)
+            if ultima.get("resultados"):
+                cot = ultima["resultados"][0]
+                ultima_info = {
+                    "numero": cot.get("numeroCotizacion"),
+                    "cliente": (cot.get("datosGenerales") or {}).get("cliente"),
+                    "fecha": cot.get("fechaCreacion")
+                }
+        except Exception:
             ultima_info = None
-            try:
-                if hasattr(db_manager, 'supabase_client') and db_manager.supabase_client:
-                    ultima_resp = db_manager.supabase_client.table('cotizaciones') \
-                        .select('numeroCotizacion, datosGenerales, fechaCreacion') \
-                        .order('created_at', desc=True) \
-                        .limit(1) \
-                        .execute()
-                    if ultima_resp.data:
-                        ultima = ultima_resp.data[0]
-                        ultima_info = {
-                            "numero": ultima.get("numeroCotizacion"),
-                            "cliente": ultima.get("datosGenerales", {}).get("cliente"),
-                            "fecha": ultima.get("fechaCreacion")
-                        }
-            except Exception:
-                ultima_info = None
 
-            return jsonify({
-                "modo": "ONLINE",
-                "total_cotizaciones": total_cotizaciones,
-                "clientes_unicos": clientes_unicos,
-                "vendedores_unicos": vendedores_unicos,
-                "database": "Supabase PostgreSQL",
-                "fuente": stats.get("fuente", "desconocida"),
-                "ultima_cotizacion": ultima_info
-            })
+        respuesta = {
+            "modo": "OFFLINE" if db_manager.modo_offline else "ONLINE",
+            "total_cotizaciones": stats["total_cotizaciones"],
+            "clientes_unicos": stats["clientes_unicos"],
+            "vendedores_unicos": stats["vendedores_unicos"],
+            "totales_por_moneda": stats["totales_por_moneda"],
+            "por_vendedor": stats["por_vendedor"],
+            "por_mes": stats["por_mes"],
+            "fuente": stats["fuente"],
+            "ultima_cotizacion": ultima_info
+        }
+        if db_manager.modo_offline:
+            respuesta["archivo_datos"] = db_manager.archivo_offline
+        else:
+            respuesta["database"] = "Supabase PostgreSQL"
+        return jsonify(respuesta)
             
     except Exception as e:
         return jsonify({
@@ -5266,7 +5337,7 @@ def debug_google_drive():
 def debug_buscar_pdf_especifico(numero_cotizacion):
     """Debug para buscar un PDF específico"""
     try:
-        print(f"🔍 DEBUG: Buscando PDF específico: '{numero_cotizacion}'")
+        logger.info("🔍 DEBUG: Buscando PDF específico: '%s'", numero_cotizacion)
         
         # Búsqueda general en Google Drive
         if pdf_manager.drive_client and pdf_manager.drive_client.is_available():
@@ -5395,7 +5466,7 @@ def handle_not_found_response(item_id):
 
 def render_cotizacion_html(cotizacion):
     """Renderiza la cotización mostrando TODOS los campos"""
-    print(f"Renderizando cotizacion completa: {cotizacion.get('numeroCotizacion', 'Sin numero')}")
+    logger.info("Renderizando cotizacion completa: %s", cotizacion.get('numeroCotizacion', 'Sin numero'))
     
     # Datos básicos
     numero = cotizacion.get('numeroCotizacion', 'Sin número')
@@ -5795,7 +5866,7 @@ def internal_error(error):
 def actualizar_timestamps():
     """Actualiza cotizaciones existentes con timestamps faltantes (Supabase)"""
     try:
-        print("Verificando cotizaciones existentes con timestamps...")
+        logger.info("Verificando cotizaciones existentes con timestamps...")
 
         # Obtener todas las cotizaciones via Supabase SDK
         try:
@@ -5820,7 +5891,7 @@ def actualizar_timestamps():
             if not cot.get("timestamp") or not cot.get("fechaCreacion"):
                 sin_timestamp.append(cot)
 
-        print(f"Encontradas {len(sin_timestamp)} cotizaciones sin timestamp")
+        logger.info("Encontradas %s cotizaciones sin timestamp", len(sin_timestamp))
 
         resultado_html = f"""
         <html>
@@ -5876,7 +5947,7 @@ def actualizar_timestamps():
                         .execute()
                     actualizadas += 1
                     numero = cotizacion.get("numeroCotizacion", str(cot_id))
-                    print(f"Actualizada: {numero}")
+                    logger.info("Actualizada: %s", numero)
                     resultado_html += f'<p class="success">Actualizada: {numero}</p>\n'
                 except Exception as e:
                     resultado_html += f'<p class="error">Error en {cotizacion.get("numeroCotizacion", cot_id)}: {str(e)[:100]}</p>\n'
@@ -6089,8 +6160,11 @@ def ver_json_cotizacion(item_id):
         if not resultado["encontrado"]:
             return jsonify({"error": "Cotización no encontrada"}), 404
         
-        # Devolver JSON formateado
-        return jsonify(resultado["item"])
+        # Devolver JSON formateado (304 si el cliente ya tiene esta versión)
+        etag = etag_cotizacion(resultado["item"])
+        if no_modificada(etag):
+            return respuesta_no_modificada(etag)
+        return con_etag(jsonify(resultado["item"]), etag)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -6145,47 +6219,183 @@ def debug_sistema():
         return jsonify({'error': str(e)}), 500
 
 @app.route("/buscar-texto-completo/<texto>")
+@login_required
+@company_api_required
 def buscar_texto_completo(texto):
-    """Busca un texto en TODOS los campos de las cotizaciones"""
+    """
+    Busca un texto en el contenido de los PDFs (índice de texto completo,
+    incluye históricos de Drive y antiguas) y en los campos de las cotizaciones.
+    Parámetros: ?page=1&per_page=20
+    """
     try:
-        encontradas = []
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
 
-        if db_manager.modo_offline:
-            datos = db_manager._cargar_datos_offline()
-            cotizaciones = datos.get("cotizaciones", [])
+        company_id = session.get("company_id")
+
+        pdf_text_index = app.extensions.get('pdf_text_index')
+        if pdf_text_index:
+            # Los PDFs históricos sin cotización registrada solo los ve la compañía legacy
+            resultado_pdfs = pdf_text_index.buscar(texto, company_id, page=page, per_page=per_page,
+                                                   incluir_sin_compania=company_id == CWS_COMPANY_ID)
         else:
-            # Usar Supabase SDK para obtener todas las cotizaciones
-            try:
-                resp = db_manager.supabase_client.table('cotizaciones') \
-                    .select('*').execute()
-                cotizaciones = resp.data if resp.data else []
-            except Exception:
-                # Fallback a JSON offline
-                datos = db_manager._cargar_datos_offline()
-                cotizaciones = datos.get("cotizaciones", [])
-
-        # Buscar en TODO el documento
-        for cot in cotizaciones:
-            # Convertir todo el documento a string
-            doc_str = json.dumps(cot, ensure_ascii=False).lower()
-            if texto.lower() in doc_str:
-                encontradas.append({
-                    "id": cot.get("id", cot.get("_id")),
-                    "numero": cot.get("numeroCotizacion"),
-                    "cliente": cot.get("datosGenerales", {}).get("cliente"),
-                    "vendedor": cot.get("datosGenerales", {}).get("vendedor"),
-                    "proyecto": cot.get("datosGenerales", {}).get("proyecto")
-                })
+            resultado_pdfs = {"resultados": [], "total": 0, "page": page, "per_page": per_page, "pages": 0}
+
+        # Cotizaciones con registro en BD (búsqueda indexada por campos)
+        resultado_db = db_manager.buscar_cotizaciones(texto, page, per_page, company_id=company_id)
+        encontradas = []
+        for cot in resultado_db.get('resultados') or []:
+            datos_generales = cot.get("datosGenerales") or {}
+            encontradas.append({
+                "id": cot.get("id", cot.get("_id")),
+                "numero": cot.get("numeroCotizacion"),
+                "cliente": datos_generales.get("cliente"),
+                "vendedor": datos_generales.get("vendedor"),
+                "proyecto": datos_generales.get("proyecto")
+            })
 
         return jsonify({
             "texto_buscado": texto,
-            "total_encontradas": len(encontradas),
+            "page": resultado_pdfs["page"],
+            "per_page": resultado_pdfs["per_page"],
+            "pages": resultado_pdfs["pages"],
+            "total_encontradas": resultado_pdfs["total"],
+            "pdfs": resultado_pdfs["resultados"],
+            "total_cotizaciones": resultado_db.get('total', 0),
             "cotizaciones": encontradas
         })
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
+
+@app.route("/admin/pdf-text-index/estado")
+@login_required
+def pdf_text_index_estado():
+    """Estado del índice de texto completo de PDFs"""
+    pdf_text_index = app.extensions.get('pdf_text_index')
+    if not pdf_text_index:
+        return jsonify({"error": "Índice de texto completo no inicializado"}), 503
+    return jsonify(pdf_text_index.obtener_estado())
+
+@app.route("/admin/pdf-text-index/sincronizar", methods=["POST"])
+@login_required
+def pdf_text_index_sincronizar():
+    """Forzar una indexación incremental de los PDFs (tarea 'pdf_index.sincronizar')"""
+    pdf_text_index = app.extensions.get('pdf_text_index')
+    if not pdf_text_index:
+        return jsonify({"error": "Índice de texto completo no inicializado"}), 503
+    return encolar_o_ejecutar('pdf_index.sincronizar', {}, _sincronizar_pdf_text_index,
+                              "Indexación de PDFs en cola")
+
+
+def _sincronizar_pdf_text_index():
+    return app.extensions['pdf_text_index'].sincronizar(), 200
+
+@app.route("/api/analytics/cubo")
+@login_required
+@company_api_required
+def analytics_cubo_api():
+    """
+    Consulta slice/dice del cubo de ventas.
+    Query params: agrupar=vendedor,mes  vendedor=..  cliente=..  moneda=..  revision=..
+                  mes_desde=YYYY-MM  mes_hasta=YYYY-MM  ordenar=monto  limite=50
+    Los filtros aceptan varios valores separados por coma.
+    """
+    from sales_analytics import DIMENSIONES
+    sales_cube = app.extensions.get('sales_cube')
+    if not sales_cube:
+        return jsonify({"error": "Cubo de analítica no inicializado"}), 503
+
+    try:
+        agrupar = [d for d in request.args.get('agrupar', '').split(',') if d.strip()]
+        filtros = {
+            dim: request.args.get(dim).split(',')
+            for dim in DIMENSIONES
+            if dim != 'company_id' and request.args.get(dim)
+        }
+        # Cada compañía solo ve sus propias cifras
+        filtros['company_id'] = session["company_id"]
+
+        resultado = sales_cube.consultar(
+            filtros=filtros,
+            agrupar_por=[d.strip() for d in agrupar],
+            mes_desde=request.args.get('mes_desde'),
+            mes_hasta=request.args.get('mes_hasta'),
+            ordenar_por=request.args.get('ordenar', 'monto'),
+            limite=request.args.get('limite', type=int)
+        )
+        return jsonify(resultado)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/api/analytics/dimensiones/<dimension>")
+@login_required
+@company_api_required
+def analytics_dimension_api(dimension):
+    """Valores disponibles de una dimensión del cubo (para filtros del dashboard)"""
+    sales_cube = app.extensions.get('sales_cube')
+    if not sales_cube:
+        return jsonify({"error": "Cubo de analítica no inicializado"}), 503
+    if dimension == 'company_id':
+        return jsonify({"error": "Dimensión no disponible"}), 400
+    try:
+        filtros = {'company_id': session["company_id"]}
+        grupos = sales_cube.consultar(filtros=filtros, agrupar_por=[dimension], ordenar_por=dimension)
+        return jsonify({"dimension": dimension, "valores": [g[dimension] for g in grupos["grupos"]]})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route("/admin/analytics/estado")
+@login_required
+def analytics_estado():
+    """Estado del cubo de analítica de ventas"""
+    sales_cube = app.extensions.get('sales_cube')
+    if not sales_cube:
+        return jsonify({"error": "Cubo de analítica no inicializado"}), 503
+    return jsonify(sales_cube.obtener_estado())
+
+@app.route("/admin/analytics/reconstruir", methods=["POST"])
+@login_required
+def analytics_reconstruir():
+    """Reconstruir el cubo completo desde la base de datos (tarea 'analytics.reconstruir')"""
+    sales_cube = app.extensions.get('sales_cube')
+    if not sales_cube:
+        return jsonify({"error": "Cubo de analítica no inicializado"}), 503
+    return encolar_o_ejecutar('analytics.reconstruir', {}, _reconstruir_sales_cube,
+                              "Reconstrucción del cubo de ventas en cola")
+
+
+def _reconstruir_sales_cube():
+    return app.extensions['sales_cube'].reconstruir(db_manager), 200
+
+@app.route("/admin/auditoria-financiera", methods=["GET", "POST"])
+@login_required
+@company_api_required
+def auditoria_financiera():
+    """
+    Auditoría financiera de la compañía de la sesión.
+    GET: solo reporta. POST: además repara las partidas con diferencia.
+    Query params: desde, hasta (YYYY-MM-DD), tolerancia
+    Sin compañía en la sesión no se audita ni se repara (la reparación de
+    todas las compañías solo existe en el CLI).
+    """
+    from financial_audit import TOLERANCIA_DEFAULT, auditar
+
+    try:
+        tolerancia = float(request.args.get('tolerancia', TOLERANCIA_DEFAULT))
+    except ValueError:
+        return jsonify({"error": "tolerancia inválida"}), 400
+
+    reporte = auditar(
+        db_manager,
+        company_id=session["company_id"],
+        desde=request.args.get('desde') or None,
+        hasta=request.args.get('hasta') or None,
+        tolerancia=tolerancia,
+        reparar=request.method == "POST"
+    )
+    return jsonify(reporte)
+
 @app.route("/verificar-ultima")
 def verificar_ultima():
     """Verifica la última cotización guardada"""
@@ -6272,27 +6482,31 @@ def scheduler_estado():
 
 @app.route("/admin/scheduler/sync-manual", methods=["POST"])
 def scheduler_sync_manual():
-    """Ejecuta una sincronización manual inmediata"""
+    """Encola una sincronización manual inmediata (tarea 'sync.manual')"""
+    if not sync_scheduler:
+        return jsonify({"error": "Scheduler no disponible"}), 503
+    return encolar_o_ejecutar('sync.manual', {}, _sincronizacion_manual, "Sincronización manual en cola")
+
+
+def _sincronizacion_manual():
+    """Ejecuta una sincronización manual inmediata. Returns: (dict, status)"""
     try:
-        if not sync_scheduler:
-            return jsonify({"error": "Scheduler no disponible"}), 503
-        
         resultado = sync_scheduler.ejecutar_sincronizacion_manual()
         
         if resultado.get("success", False):
-            return jsonify({
+            return {
                 "success": True,
                 "resultado": resultado,
                 "mensaje": "Sincronización manual completada"
-            })
+            }, 200
         else:
-            return jsonify({
+            return {
                 "error": resultado.get("error", "Error en sincronización manual"),
                 "resultado": resultado
-            }), 500
+            }, 500
             
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 @app.route("/admin/supabase-storage/estado")
 def supabase_storage_estado():
@@ -6368,7 +6582,7 @@ def storage_diagnostic():
         else:
             diagnostic["pdf_manager_status"] = {
                 "initialized": False,
-                "error": "pdf_manager is None"
+                "error": "pdf_manager no disponible"
             }
             
         return jsonify(diagnostic)
@@ -6397,7 +6611,7 @@ def debug_revision_especifica(numero_cotizacion):
             "analisis": {}
         }
         
-        print(f"[DEBUG_REVISION] ===== ANÁLISIS TEMPORAL PARA: {numero_decodificado} =====")
+        logger.info("[DEBUG_REVISION] ===== ANÁLISIS TEMPORAL PARA: %s =====", numero_decodificado)
         
         # 1. Verificar si la cotización existe
         resultado_busqueda = db_manager.obtener_cotizacion(numero_decodificado)
@@ -6454,9 +6668,9 @@ def debug_revision_especifica(numero_cotizacion):
         
         # 4. Verificar estado del sistema
         debug_info["analisis"]["estado_sistema"] = {
-            "db_manager_disponible": db_manager is not None,
+            "db_manager_disponible": bool(db_manager),
             "db_manager_modo": "offline" if getattr(db_manager, 'modo_offline', None) else "online",
-            "pdf_manager_disponible": pdf_manager is not None
+            "pdf_manager_disponible": bool(pdf_manager)
         }
         
         # 5. Verificar estado de Supabase específicamente
@@ -6474,7 +6688,7 @@ def debug_revision_especifica(numero_cotizacion):
                     "error": str(e)
                 }
         
-        print(f"[DEBUG_REVISION] ===== FIN ANÁLISIS TEMPORAL =====")
+        logger.info("[DEBUG_REVISION] ===== FIN ANÁLISIS TEMPORAL =====")
         
         return jsonify(debug_info)
         
@@ -6490,8 +6704,8 @@ def test_revision_form():
     try:
         datos_test = request.get_json()
         
-        print(f"[TEST_REVISION] ===== PRUEBA DE FORMULARIO DE REVISIÓN =====")
-        print(f"[TEST_REVISION] Datos recibidos: {json.dumps(datos_test, indent=2, ensure_ascii=False)}")
+        logger.info("[TEST_REVISION] ===== PRUEBA DE FORMULARIO DE REVISIÓN =====")
+        logger.info("[TEST_REVISION] Datos recibidos: %s", json.dumps(datos_test, indent=2, ensure_ascii=False))
         
         # Aplicar exactamente la misma lógica del formulario real
         datos_generales = datos_test.get('datosGenerales', {})
@@ -6534,7 +6748,7 @@ def test_revision_form():
                 "error": f"Excepción durante guardado: {str(e)}"
             }
         
-        print(f"[TEST_REVISION] ===== FIN PRUEBA DE FORMULARIO =====")
+        logger.info("[TEST_REVISION] ===== FIN PRUEBA DE FORMULARIO =====")
         
         return jsonify(resultado_test)
         
@@ -6572,17 +6786,112 @@ def servir_pdf_local(numero_cotizacion):
         
         for ruta in posibles_rutas:
             if os.path.exists(ruta):
-                print(f"[LOCAL_PDF] Sirviendo: {ruta}")
+                logger.info("[LOCAL_PDF] Sirviendo: %s", ruta)
                 return send_file(ruta, as_attachment=False, mimetype='application/pdf')
         
-        print(f"[LOCAL_PDF] No encontrado: {numero_cotizacion}")
-        print(f"[LOCAL_PDF] Rutas buscadas: {posibles_rutas}")
+        logger.warning("[LOCAL_PDF] No encontrado: %s", numero_cotizacion)
+        logger.info("[LOCAL_PDF] Rutas buscadas: %s", posibles_rutas)
         return jsonify({"error": "PDF no encontrado en almacenamiento local", "numero": numero_cotizacion}), 404
         
     except Exception as e:
-        print(f"[LOCAL_PDF] Error sirviendo PDF: {e}")
+        logger.error("[LOCAL_PDF] Error sirviendo PDF: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# ============================================
+# TAREAS DE LA COLA DE TRABAJOS
+# ============================================
+
+def _tarea_pdf_generar(payload, adjunto):
+    """Genera el PDF de una cotización guardada y lo sube a Storage"""
+    if not REPORTLAB_AVAILABLE:
+        raise ErrorPermanente("ReportLab no disponible")
+    numero = payload['numero']
+    busqueda = db_manager.obtener_cotizacion(numero)
+    if not busqueda.get("encontrado"):
+        raise ErrorPermanente(f"Cotización no encontrada: {numero}")
+    cotizacion = busqueda["item"]
+    company_id = payload.get('company_id')
+    company_branding = _load_company_from_db(db_manager, company_id) if company_id else None
+    pdf_data = generar_pdf_reportlab(cotizacion, company_branding=company_branding)
+    return _tarea_pdf_almacenar({"cotizacion": cotizacion}, pdf_data)
+
+
+def _tarea_pdf_almacenar(payload, adjunto):
+    """Sube un PDF ya generado; reintenta si Storage estaba configurado y falló"""
+    if not adjunto:
+        raise ErrorPermanente("Trabajo sin PDF adjunto")
+    resultado = pdf_manager.almacenar_pdf_nuevo(pdf_content=adjunto, cotizacion_data=payload['cotizacion'])
+    if not resultado.get("success"):
+        raise RuntimeError(resultado.get("error", "Error almacenando PDF"))
+    storage = resultado.get("sistemas", {}).get("supabase_storage", {})
+    if pdf_manager.supabase_storage_disponible and not storage.get("success"):
+        # El respaldo local ya quedó escrito; el reintento vuelve a intentar Storage
+        raise RuntimeError(f"Supabase Storage: {storage.get('error', 'error desconocido')}")
+    logger.info("[PDF] ✅ %s", resultado.get('mensaje'))
+    return {"estado": resultado.get("estado"), "nombre_archivo": resultado.get("nombre_archivo")}
+
+
+def _tarea_imagen_subir(payload, adjunto):
+    """Sube la imagen de referencia de una cotización guardada y registra su URL"""
+    numero = payload['numero']
+    busqueda = db_manager.obtener_cotizacion(numero)
+    if not busqueda.get("encontrado"):
+        raise ErrorPermanente(f"Cotización no encontrada: {numero}")
+    cotizacion = busqueda["item"]
+    img = cotizacion.get('datosGenerales', {}).get('imagenReferencia') or {}
+    if img.get('rutaStorage') != payload['ruta_storage']:
+        return {"omitido": "la imagen fue reemplazada o eliminada"}
+    if img.get('url'):
+        return {"url": img['url']}
+
+    try:
+        image_bytes = base64.b64decode(img.get('dataUri', '').split(',', 1)[-1])
+    except Exception as e:
+        raise ErrorPermanente(f"dataUri inválido: {e}")
+    url = subir_imagen_referencia(image_bytes, payload['ruta_storage'], img.get('mime_type', 'image/jpeg'))
+    if not url:
+        raise RuntimeError("No se pudo subir ni guardar la imagen")
+
+    img['url'] = url
+    resultado = db_manager.guardar_cotizacion(
+        cotizacion, company_id=payload.get('company_id') or cotizacion.get('company_id'))
+    if not resultado.get("success"):
+        raise RuntimeError(resultado.get("error", "Error guardando URL de la imagen"))
+    return {"url": url}
+
+
+def _tarea_admin(funcion):
+    """Adapta una operación administrativa (dict, status) a tarea de la cola"""
+    def tarea(payload, adjunto):
+        resultado, status = funcion(**payload)
+        if status >= 500:
+            raise RuntimeError(resultado.get("error", f"HTTP {status}"))
+        if status >= 400:
+            raise ErrorPermanente(resultado.get("error", f"HTTP {status}"))
+        return resultado
+    return tarea
+
+
+def registrar_tareas(cola):
+    cola.registrar_tarea('pdf.generar', _tarea_pdf_generar)
+    cola.registrar_tarea('pdf.almacenar', _tarea_pdf_almacenar)
+    cola.registrar_tarea('imagen.subir', _tarea_imagen_subir)
+    # El usuario espera el texto: sin reintentos (la tarea ya cae al texto genérico)
+    cola.registrar_tarea('ia.texto_introductorio', lambda payload, adjunto: generar_texto_introductorio(payload),
+                         max_intentos=1)
+    cola.registrar_tarea('admin.sincronizar_offline', _tarea_admin(_sincronizar_offline_json), max_intentos=3)
+    cola.registrar_tarea('admin.escanear_pdfs', _tarea_admin(_escanear_pdfs_existentes), max_intentos=3)
+    cola.registrar_tarea('admin.regenerar_pdfs', _tarea_admin(_regenerar_pdfs_faltantes), max_intentos=3,
+                         lease_segundos=1800)
+    cola.registrar_tarea('pdf_index.sincronizar', _tarea_admin(_sincronizar_pdf_text_index), max_intentos=3,
+                         lease_segundos=1800)
+    cola.registrar_tarea('analytics.reconstruir', _tarea_admin(_reconstruir_sales_cube), max_intentos=3,
+                         lease_segundos=1800)
+    cola.registrar_tarea('sync.manual', _tarea_admin(_sincronizacion_manual), max_intentos=3)
+
+
+app.extensions['cola_trabajos'].al_crear(registrar_tareas)
+
 # ============================================
 
 if __name__ == "__main__":
@@ -6591,11 +6900,11 @@ if __name__ == "__main__":
     environment = os.getenv('FLASK_ENV', 'development')
     database = os.getenv('MONGO_DATABASE', 'cotizaciones')
     
-    print(f"Iniciando {app_name} v{app_version}")
-    print(f"Entorno: {environment}")
-    print(f"Base de datos: {database}")
-    print(f"Servidor disponible en: http://127.0.0.1:5000")
-    print(f"Info del sistema en: http://127.0.0.1:5000/info")
+    logger.info("Iniciando %s v%s", app_name, app_version)
+    logger.info("Entorno: %s", environment)
+    logger.info("Base de datos: %s", database)
+    logger.info("Servidor disponible en: http://127.0.0.1:5000")
+    logger.info("Info del sistema en: http://127.0.0.1:5000/info")
     
     # Para la nube, el puerto es asignado dinámicamente
     port = int(os.getenv('PORT', 5000))
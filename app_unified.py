@@ -643,6 +643,33 @@ def force_health_check():
         logger.error(f"Error en verificación forzada: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/admin/health/metrics')
+def health_metrics():
+    """Series de métricas de salud (?metric=&horas=&resolucion=crudo|minuto|hora|auto)"""
+    try:
+        if not health_system:
+            return jsonify({"error": "Sistema de salud no disponible"}), 503
+        
+        nombre = request.args.get('metric')
+        if not nombre:
+            return jsonify({
+                "metrics": health_system.metricas.nombres(),
+                "store": health_system.metricas.obtener_estado()
+            })
+        
+        serie = health_system.get_metric_series(
+            nombre,
+            horas=float(request.args.get('horas', 24)),
+            resolucion=request.args.get('resolucion', 'auto')
+        )
+        return jsonify(serie)
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error consultando métricas: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/admin/integrity/check', methods=['POST'])
 def force_integrity_check():
     """Forzar verificación de integridad"""
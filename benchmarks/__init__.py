@@ -0,0 +1,16 @@
+"""
+Benchmarks reproducibles de CWS Cotizador.
+
+Generan tenants sintéticos (1k/10k/100k cotizaciones con partidas y
+materiales del catálogo real), ejecutan los caminos críticos con el test
+client de Flask contra dobles locales (JSON offline, SDK de Supabase sobre
+SQLite, Storage/Drive en memoria o un PostgreSQL local) y emiten JSON para
+comparar resultados entre commits.
+
+Módulos:
+    datos_sinteticos   generador determinista de cotizaciones
+    fakes              ClienteSupabaseSQLite, StorageMemoria, DriveMemoria
+    run                CLI: python -m benchmarks.run --help
+    carga              prueba de carga con gunicorn: python -m benchmarks.carga --help
+    gunicorn_carga     hooks de gunicorn que montan los dobles en cada worker
+"""
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK DE CONSOLIDACIÓN DE BOMs
+==================================
+
+Mide el motor de bom_consolidation (pasos 4 y 5 del análisis de PDFs) con
+juegos de planos sintéticos grandes, sin Gemini:
+
+    consolidar      un PDF: items de todas las páginas -> tabla master + grand total
+    combinar_pdfs   el mismo volumen repartido en varios PDFs (consolidar_resultados)
+    legado          algoritmo anterior (lista por clave única, O(n²)); solo con --legado
+                    y hasta --legado-max items
+
+Los items se generan con semilla fija: ~1 de cada --repeticion items es un
+material nuevo, el resto repite uno anterior (mismo id, descripción y
+dimensiones) como pasa en planos con muchas piezas iguales.
+
+Uso CLI:
+    python -m benchmarks.bom --tamanos 10000,100000
+    python -m benchmarks.bom --tamanos 10000 --legado --salida bom.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmarks.run import estadisticas  # noqa: E402
+from bom_consolidation import ConsolidadorBOM, clave_consolidacion, consolidar_resultados  # noqa: E402
+
+TAMANOS_DEFAULT = (10000, 100000)
+ITEMS_POR_PAGINA = 40
+PERFILES = ('IPR', 'PTR', 'Canal', 'Ángulo', 'Placa', 'Solera', 'Redondo')
+CLASIFICACIONES = ('perfil estructural', 'placa', 'conexion', 'tornilleria')
+
+
+def generar_items(cantidad: int, repeticion: int = 5, semilla: int = 42) -> List[Dict]:
+    """Items (dicts del paso 2) con pagina_origen; determinista"""
+    aleatorio = random.Random(semilla)
+    materiales = []
+    items = []
+    for i in range(cantidad):
+        if not materiales or aleatorio.randrange(repeticion) == 0:
+            perfil = aleatorio.choice(PERFILES)
+            largo = aleatorio.choice((None, float(aleatorio.randrange(100, 12000, 50))))
+            materiales.append({
+                "item_id": f"{perfil[:3].upper()}-{len(materiales) + 1:05d}",
+                "udm": "pcs",
+                "descripcion": f"{perfil} {aleatorio.randrange(2, 12)}x{aleatorio.randrange(2, 8)}",
+                "largo": largo,
+                "ancho": float(aleatorio.randrange(50, 600, 25)) if largo else None,
+                "espesor": aleatorio.choice((None, 6.35, 9.53, 12.7)),
+                "clasificacion": aleatorio.choice(CLASIFICACIONES),
+            })
+        material = aleatorio.choice(materiales)
+        items.append({**material, "cantidad": float(aleatorio.randrange(1, 20)),
+                      "pagina_origen": i // ITEMS_POR_PAGINA + 1})
+    return items
+
+
+def como_resultados(items: List[Dict], pdfs: int) -> List[Dict]:
+    """Reparte los items en `pdfs` resultados de analizar_pdf_completo"""
+    por_pdf = -(-len(items) // pdfs)
+    resultados = []
+    for n in range(pdfs):
+        tablas: Dict[int, List[Dict]] = {}
+        for item in items[n * por_pdf:(n + 1) * por_pdf]:
+            tablas.setdefault(item["pagina_origen"], []).append(item)
+        resultados.append({"numero_cotizacion": f"PLANOS-{n + 1:02d}",
+                           "paso_2_tablas_por_pagina": [{"pagina": p, "items": t} for p, t in tablas.items()]})
+    return resultados
+
+
+def consolidar_legado(items: List) -> List[Dict]:
+    """Paso 4 anterior: una lista por cada clave única (cuadrático), sin subtotales"""
+    tabla_master = []
+    items_procesados = set()
+    for item in items:
+        key = item.get_key_consolidacion()
+        if key not in items_procesados:
+            items_similares = [i for i in items if i.get_key_consolidacion() == key]
+            tabla_master.append({
+                "item_id": item.item_id,
+                "cantidad_total": sum(i.cantidad for i in items_similares),
+                "paginas_origen": list(set(i.pagina_origen for i in items_similares)),
+                "ocurrencias": len(items_similares)
+            })
+            items_procesados.add(key)
+    return tabla_master
+
+
+def _como_objetos(items: List[Dict]) -> List:
+    objetos = []
+    for item in items:
+        objeto = SimpleNamespace(**item)
+        objeto.get_key_consolidacion = (lambda o=objeto: clave_consolidacion(
+            o.item_id, o.descripcion, o.largo, o.ancho, o.espesor))
+        objetos.append(objeto)
+    return objetos
+
+
+def medir(funcion: Callable, repeticiones: int, calentamiento: int = 1) -> Dict:
+    for _ in range(calentamiento):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return estadisticas(tiempos)
+
+
+def ejecutar(tamanos: List[int], repeticiones: int = 3, pdfs: int = 10, repeticion: int = 5,
+             legado: bool = False, legado_max: int = 10000, semilla: int = 42) -> Dict:
+    documento = {'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pdfs': pdfs, 'repeticion': repeticion,
+                 'resultados': []}
+    for tamano in tamanos:
+        items = generar_items(tamano, repeticion, semilla)
+        resultados = como_resultados(items, pdfs)
+
+        def consolidar():
+            consolidador = ConsolidadorBOM()
+            consolidador.agregar_items(items)
+            return consolidador.consolidar()
+
+        tabla_master, _ = consolidar()
+        fila = {'tamano': tamano, 'items_unicos': len(tabla_master),
+                'consolidar': medir(consolidar, repeticiones),
+                'combinar_pdfs': medir(lambda: consolidar_resultados(resultados), repeticiones)}
+        fila['items_por_segundo'] = round(tamano / (fila['consolidar']['p50_ms'] / 1000)) if fila['consolidar']['p50_ms'] else None
+        if legado and tamano <= legado_max:
+            objetos = _como_objetos(items)
+            fila['legado'] = medir(lambda: consolidar_legado(objetos), 1, calentamiento=0)
+        documento['resultados'].append(fila)
+        print(f"[BENCHMARK_BOM] n={tamano}: {fila['consolidar']['p50_ms']} ms "
+              f"({fila['items_unicos']} únicos)", file=sys.stderr)
+    return documento
+
+
+def _imprimir(documento: Dict):
+    print(f"{'items':>8} {'únicos':>8} {'consolidar p50':>15} {'combinar p50':>13} {'legado':>10}")
+    for fila in documento['resultados']:
+        legado = f"{fila['legado']['p50_ms']:.0f} ms" if 'legado' in fila else '-'
+        print(f"{fila['tamano']:>8} {fila['items_unicos']:>8} {fila['consolidar']['p50_ms']:>12.1f} ms "
+              f"{fila['combinar_pdfs']['p50_ms']:>10.1f} ms {legado:>10}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de consolidación de BOMs")
+    parser.add_argument('--tamanos', type=lambda v: [int(x) for x in v.split(',') if x],
+                        default=list(TAMANOS_DEFAULT), help="Items totales (lista)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--pdfs', type=int, default=10, help="PDFs en los que se reparte combinar_pdfs")
+    parser.add_argument('--repeticion', type=int, default=5, help="~1 material nuevo cada N items")
+    parser.add_argument('--legado', action='store_true', help="Medir también el algoritmo anterior")
+    parser.add_argument('--legado-max', type=int, default=10000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help="Archivo JSON de resultados")
+    args = parser.parse_args(argv)
+
+    documento = ejecutar(args.tamanos, args.repeticiones, args.pdfs, args.repeticion,
+                         args.legado, args.legado_max, args.semilla)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(documento, archivo, ensure_ascii=False, indent=2)
+    _imprimir(documento)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
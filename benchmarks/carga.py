@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PRUEBA DE CARGA CONCURRENTE
+===========================
+
+¿Cuántos vendedores simultáneos aguanta una instancia de Render? Este
+harness levanta la app con gunicorn (workers/threads configurables, como el
+Procfile) sobre un tenant sintético y la golpea con usuarios virtuales que
+reproducen una mezcla realista de operaciones:
+
+    listado    GET  /todas-cotizaciones
+    buscar     POST /buscar
+    desglose   GET  /desglose/<numero>
+    guardar    POST /formulario (cotización R1 nueva)
+    pdf        GET  /pdf/<numero>
+
+Cada corrida (workers × threads × usuarios) arranca un gunicorn limpio y
+reporta latencia p50/p95/p99 por operación, throughput y códigos de estado.
+
+Contención: cada worker vuelca al salir los contadores de db_tracing
+('solapadas', 'max_concurrentes' por capa). Llamadas PostgreSQL solapadas
+esperan el mismo pg_connection; cargas/guardados offline solapados son
+lecturas-modificación-escritura del JSON sin candado. Además se verifica la
+integridad: cada número devuelto por un guardado exitoso debe existir en el
+JSON offline (y en el SDK/PostgreSQL según la capa) y no repetirse; los
+faltantes son escrituras perdidas por la carrera sobre el archivo.
+
+Supabase, Storage y Drive son siempre los dobles locales de benchmarks.fakes
+(o un PostgreSQL local con --database-url); nunca se usa el .env.
+
+Uso CLI:
+    python -m benchmarks.carga --usuarios 1,4,8,16 --duracion 30
+    python -m benchmarks.carga --capa sdk --workers 2 --threads 4 --usuarios 8 --salida carga.json
+    python -m benchmarks.carga --mezcla listado=50,buscar=30,pdf=20 --slo-p95 1500
+"""
+
+import argparse
+import json
+import os
+import random
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List
+from urllib.parse import quote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmarks import datos_sinteticos as datos  # noqa: E402
+from benchmarks.run import BUCKET, CAPAS, _commit_git, percentil, preparar_entorno, sembrar  # noqa: E402
+
+MEZCLA_DEFAULT = {'listado': 30, 'buscar': 25, 'desglose': 20, 'guardar': 10, 'pdf': 15}
+CONFIG_GUNICORN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn_carga.py')
+MANIFIESTO = 'manifiesto.json'
+SLO_P95_DEFAULT = 2000.0
+TIMEOUT_PETICION = 120
+
+
+# ──────────────────────────────────────────────────────────
+# LADO WORKER (hooks de gunicorn_carga.py)
+# ──────────────────────────────────────────────────────────
+
+_servidor_storage = None
+
+
+def montar_worker():
+    """Monta los dobles locales en el worker recién iniciado (post_worker_init)"""
+    global _servidor_storage
+    from benchmarks.fakes import ClienteSupabaseSQLite, DriveMemoria, ServidorStorage, StorageMemoria, pdf_minimo
+    from benchmarks.run import montar_capa
+
+    directorio = os.environ['CARGA_DIRECTORIO']
+    with open(os.path.join(directorio, MANIFIESTO), encoding='utf-8') as archivo:
+        manifiesto = json.load(archivo)
+
+    pdf = pdf_minimo()
+    storage = StorageMemoria()
+    for nombre in manifiesto['storage']:
+        storage.escribir(BUCKET, f"nuevas/{nombre}.pdf", pdf)
+    drive = DriveMemoria()
+    for archivo_drive in manifiesto['drive']:
+        drive.agregar(archivo_drive['nombre'], pdf, archivo_drive['carpeta_origen'], archivo_drive['fecha_modificacion'])
+    _servidor_storage = ServidorStorage(storage)
+
+    capa = manifiesto['capa']
+    semilla = {
+        'ruta_json': os.path.join(directorio, 'cotizaciones_offline.json'),
+        'storage': storage,
+        'drive': drive,
+        'cliente_sdk': (ClienteSupabaseSQLite(os.path.join(directorio, 'sdk.sqlite3'), storage=storage)
+                        if capa == 'sdk' else None),
+    }
+    import app as aplicacion
+    montar_capa(aplicacion.app, capa, semilla, directorio, os.environ.get('CARGA_DATABASE_URL') or None)
+    print(f"[CARGA] Worker {os.getpid()} montado sobre capa {capa}")
+
+
+def volcar_traza_worker():
+    """Escribe los contadores de db_tracing del worker (worker_exit)"""
+    from db_tracing import trazador
+
+    directorio = os.environ.get('CARGA_TRAZAS')
+    if not directorio:
+        return
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, f"worker-{os.getpid()}.json"), 'w', encoding='utf-8') as archivo:
+        json.dump({'pid': os.getpid(), **trazador.obtener_estado(limite=20)}, archivo, ensure_ascii=False, default=str)
+
+
+# ──────────────────────────────────────────────────────────
+# SERVIDOR
+# ──────────────────────────────────────────────────────────
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class ServidorGunicorn:
+    """gunicorn app:app en un subproceso con los hooks de gunicorn_carga.py"""
+
+    def __init__(self, directorio: str, trazas: str, workers: int, threads: int, database_url: str = None):
+        self.puerto = _puerto_libre()
+        self.url = f"http://127.0.0.1:{self.puerto}"
+        self.trazas = trazas
+        entorno = dict(os.environ, CARGA_DIRECTORIO=directorio, CARGA_TRAZAS=trazas,
+                       CARGA_DATABASE_URL=database_url or '', PYTHONPATH=RAIZ)
+        self._log = open(os.path.join(directorio, f"gunicorn-{self.puerto}.log"), 'w', encoding='utf-8')
+        self.proceso = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', CONFIG_GUNICORN, '--bind', f"127.0.0.1:{self.puerto}",
+             '--workers', str(workers), '--threads', str(threads), '--timeout', str(TIMEOUT_PETICION), 'app:app'],
+            cwd=RAIZ, env=entorno, stdout=self._log, stderr=subprocess.STDOUT)
+
+    def esperar_listo(self, timeout: float = 120) -> bool:
+        import requests
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                return False
+            try:
+                if requests.get(f"{self.url}/health", timeout=5).status_code == 200:
+                    return True
+            except requests.RequestException:
+                pass
+            time.sleep(0.25)
+        return False
+
+    def detener(self) -> List[Dict]:
+        """SIGTERM (cierre ordenado: worker_exit vuelca trazas) y lectura de los volcados"""
+        if self.proceso.poll() is None:
+            self.proceso.send_signal(signal.SIGTERM)
+            try:
+                self.proceso.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+                self.proceso.wait()
+        self._log.close()
+        volcados = []
+        if os.path.isdir(self.trazas):
+            for nombre in sorted(os.listdir(self.trazas)):
+                with open(os.path.join(self.trazas, nombre), encoding='utf-8') as archivo:
+                    volcados.append(json.load(archivo))
+        return volcados
+
+
+# ──────────────────────────────────────────────────────────
+# USUARIOS VIRTUALES
+# ──────────────────────────────────────────────────────────
+
+def cookie_sesion(clave: str) -> str:
+    """Cookie de sesión Flask firmada con SECRET_KEY (usuario admin del tenant principal)"""
+    from flask import Flask
+    from flask.sessions import SecureCookieSessionInterface
+
+    firmante = Flask('carga')
+    firmante.secret_key = clave
+    serializador = SecureCookieSessionInterface().get_signing_serializer(firmante)
+    return 'session=' + serializador.dumps({
+        'user_id': 'carga-user', 'user_email': 'carga@cws.mx', 'user_name': 'Carga',
+        'user_role': 'admin', 'company_id': datos.COMPANY_ID,
+    })
+
+
+class UsuarioVirtual(threading.Thread):
+    """Bucle cerrado: elige operación según la mezcla, la ejecuta y registra la muestra"""
+
+    def __init__(self, indice: int, url: str, cookie: str, mezcla: Dict[str, int], manifiesto: Dict,
+                 inicio_medicion: float, fin: float, pausa_ms: float, semilla: int, materiales: List[Dict]):
+        super().__init__(daemon=True, name=f"UsuarioVirtual-{indice}")
+        self.indice = indice
+        self.url = url
+        self.cookie = cookie
+        self.operaciones, self.pesos = zip(*mezcla.items())
+        self.manifiesto = manifiesto
+        self.inicio_medicion = inicio_medicion
+        self.fin = fin
+        self.pausa = pausa_ms / 1000.0
+        self.rng = random.Random(f"{semilla}:{indice}")
+        self.materiales = materiales
+        self.muestras = []  # (operacion, ms, status, bytes)
+        self.guardadas = []  # números devueltos por guardados exitosos (incluye calentamiento)
+        self.peticiones = 0
+
+    def _peticion(self, sesion, operacion: str):
+        numeros = self.manifiesto['numeros']
+        if operacion == 'listado':
+            return sesion.get(f"{self.url}/todas-cotizaciones", timeout=TIMEOUT_PETICION)
+        if operacion == 'buscar':
+            return sesion.post(f"{self.url}/buscar", json={'query': self.rng.choice(datos.CLIENTES)},
+                               timeout=TIMEOUT_PETICION)
+        if operacion == 'desglose':
+            return sesion.get(f"{self.url}/desglose/{quote(self.rng.choice(numeros))}", timeout=TIMEOUT_PETICION)
+        if operacion == 'guardar':
+            payload = datos.formulario_nueva_cotizacion(1_000_000 * (self.indice + 1) + self.peticiones, self.materiales)
+            return sesion.post(f"{self.url}/formulario", json=payload, timeout=TIMEOUT_PETICION)
+        if operacion == 'pdf':
+            return sesion.get(f"{self.url}/pdf/{quote(self.rng.choice(numeros))}", timeout=TIMEOUT_PETICION)
+        raise ValueError(f"Operación desconocida: {operacion}")
+
+    def run(self):
+        import requests
+
+        sesion = requests.Session()
+        sesion.headers['Cookie'] = self.cookie
+        while True:
+            inicio = time.monotonic()
+            if inicio >= self.fin:
+                break
+            operacion = self.rng.choices(self.operaciones, self.pesos)[0]
+            try:
+                respuesta = self._peticion(sesion, operacion)
+                status, tamano = respuesta.status_code, len(respuesta.content)
+                if operacion == 'guardar' and status == 200:
+                    numero = (respuesta.json() or {}).get('numeroCotizacion')
+                    if numero:
+                        self.guardadas.append(numero)
+            except Exception as e:
+                status, tamano = type(e).__name__, 0
+            ms = (time.monotonic() - inicio) * 1000
+            self.peticiones += 1
+            if inicio >= self.inicio_medicion and time.monotonic() <= self.fin:
+                self.muestras.append((operacion, ms, status, tamano))
+            if self.pausa:
+                time.sleep(self.rng.uniform(0.5, 1.5) * self.pausa)
+        sesion.close()
+
+
+# ──────────────────────────────────────────────────────────
+# MÉTRICAS
+# ──────────────────────────────────────────────────────────
+
+def resumen_latencias(tiempos_ms: List[float]) -> Dict:
+    if not tiempos_ms:
+        return {'n': 0}
+    return {
+        'n': len(tiempos_ms),
+        'p50_ms': round(percentil(tiempos_ms, 50), 2),
+        'p95_ms': round(percentil(tiempos_ms, 95), 2),
+        'p99_ms': round(percentil(tiempos_ms, 99), 2),
+        'max_ms': round(max(tiempos_ms), 2),
+        'media_ms': round(sum(tiempos_ms) / len(tiempos_ms), 2),
+    }
+
+
+def _es_exito(status) -> bool:
+    return isinstance(status, int) and status < 400
+
+
+def agregar_contencion(volcados: List[Dict]) -> Dict:
+    """Suma los contadores por capa de todos los workers"""
+    capas = defaultdict(lambda: {'llamadas': 0, 'solapadas': 0, 'max_concurrentes': 0, 'errores': 0,
+                                 'total_ms': 0.0, 'max_ms': 0.0})
+    for volcado in volcados:
+        for capa, c in volcado.get('capas', {}).items():
+            total = capas[capa]
+            for clave in ('llamadas', 'solapadas', 'errores'):
+                total[clave] += c.get(clave, 0)
+            total['total_ms'] = round(total['total_ms'] + c.get('total_ms', 0.0), 2)
+            total['max_ms'] = max(total['max_ms'], c.get('max_ms', 0.0))
+            total['max_concurrentes'] = max(total['max_concurrentes'], c.get('max_concurrentes', 0))
+    for total in capas.values():
+        total['solapadas_pct'] = round(100.0 * total['solapadas'] / total['llamadas'], 1) if total['llamadas'] else 0.0
+    return {'workers_reportados': len(volcados), 'capas': dict(capas)}
+
+
+def _numeros_json(ruta: str) -> Counter:
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            contenido = json.load(archivo)
+    except (OSError, ValueError) as e:
+        print(f"[CARGA] JSON offline ilegible tras la corrida: {e}", file=sys.stderr)
+        return Counter()
+    return Counter(c.get('numeroCotizacion') for c in contenido.get('cotizaciones', []))
+
+
+def _numeros_sdk(ruta: str, numeros: List[str]) -> Counter:
+    import sqlite3
+    conexion = sqlite3.connect(ruta)
+    try:
+        return Counter({numero: conexion.execute(
+            "SELECT COUNT(*) FROM cotizaciones WHERE json_extract(doc, '$.numero_cotizacion') = ?",
+            (numero,)).fetchone()[0] for numero in numeros})
+    finally:
+        conexion.close()
+
+
+def _numeros_postgresql(database_url: str, numeros: List[str]) -> Counter:
+    import psycopg2
+    conexion = psycopg2.connect(database_url, connect_timeout=10)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT numero_cotizacion, COUNT(*) FROM cotizaciones "
+                           "WHERE numero_cotizacion = ANY(%s) GROUP BY numero_cotizacion", (numeros,))
+            return Counter(dict(cursor.fetchall()))
+    finally:
+        conexion.close()
+
+
+def verificar_integridad(directorio: str, capa: str, guardadas: List[str], database_url: str = None) -> Dict:
+    """Cada guardado exitoso debe persistir una sola vez en cada destino de la capa"""
+    respuestas = Counter(guardadas)
+    destinos = {'offline_json': _numeros_json(os.path.join(directorio, 'cotizaciones_offline.json'))}
+    if capa == 'sdk':
+        destinos['sdk'] = _numeros_sdk(os.path.join(directorio, 'sdk.sqlite3'), list(respuestas))
+    elif capa == 'postgresql':
+        destinos['postgresql'] = _numeros_postgresql(database_url, list(respuestas))
+
+    resultado = {
+        'guardados_exitosos': len(guardadas),
+        'numeros_repetidos_en_respuestas': sorted(n for n, veces in respuestas.items() if veces > 1),
+    }
+    for nombre, persistidos in destinos.items():
+        resultado[nombre] = {
+            'perdidos': sorted(n for n in respuestas if not persistidos.get(n)),
+            'duplicados': sorted(n for n in respuestas if persistidos.get(n, 0) > 1),
+        }
+    return resultado
+
+
+# ──────────────────────────────────────────────────────────
+# ORQUESTACIÓN
+# ──────────────────────────────────────────────────────────
+
+def preparar_datos(directorio: str, capa: str, tamano: int, semilla: int, database_url: str = None) -> Dict:
+    """Genera el tenant y el manifiesto que cada worker usa para montar Storage/Drive"""
+    sembrado = sembrar(tamano, directorio, [capa], database_url, semilla)
+    if sembrado['cliente_sdk'] is not None:
+        sembrado['cliente_sdk'].cerrar()
+    nombres = [nombre[:-len('.pdf')] for nombre in sembrado['storage'].listar(BUCKET, 'nuevas')]
+    manifiesto = {
+        'capa': capa,
+        'tamano': tamano,
+        'storage': nombres,
+        'numeros': nombres,
+        'drive': [{k: archivo[k] for k in ('nombre', 'carpeta_origen', 'fecha_modificacion')}
+                  for archivo in sembrado['drive'].archivos.values()],
+        'generacion_s': sembrado['generacion_s'],
+    }
+    with open(os.path.join(directorio, MANIFIESTO), 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False)
+    return manifiesto
+
+
+def correr(url: str, cookie: str, manifiesto: Dict, usuarios: int, duracion: float, calentamiento: float,
+           mezcla: Dict[str, int], pausa_ms: float, semilla: int, materiales: List[Dict]) -> Dict:
+    """Lanza los usuarios virtuales contra un servidor ya listo y agrega sus muestras"""
+    inicio = time.monotonic()
+    inicio_medicion = inicio + calentamiento
+    fin = inicio_medicion + duracion
+    hilos = [UsuarioVirtual(i, url, cookie, mezcla, manifiesto, inicio_medicion, fin, pausa_ms, semilla, materiales)
+             for i in range(usuarios)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = max(time.monotonic(), fin) - inicio_medicion
+
+    muestras = [m for hilo in hilos for m in hilo.muestras]
+    por_operacion = defaultdict(list)
+    for operacion, ms, status, _ in muestras:
+        por_operacion[operacion].append((ms, status))
+
+    operaciones = {}
+    for operacion, valores in sorted(por_operacion.items()):
+        operaciones[operacion] = {
+            **resumen_latencias([ms for ms, _ in valores]),
+            'errores': sum(1 for _, status in valores if not _es_exito(status)),
+            'status': dict(Counter(str(status) for _, status in valores)),
+        }
+    exitosas = sum(1 for m in muestras if _es_exito(m[2]))
+    return {
+        'usuarios': usuarios,
+        'duracion_s': round(transcurrido, 2),
+        'peticiones': len(muestras),
+        'errores': len(muestras) - exitosas,
+        'throughput_rps': round(exitosas / transcurrido, 2) if transcurrido else 0.0,
+        'latencia': resumen_latencias([m[1] for m in muestras]),
+        'operaciones': operaciones,
+        'bytes_totales': sum(m[3] for m in muestras),
+        'guardadas': [n for hilo in hilos for n in hilo.guardadas],
+    }
+
+
+def ejecutar_carga(usuarios: List[int], workers: List[int], threads: List[int], capa: str = 'offline',
+                   tamano: int = 1000, duracion: float = 30, calentamiento: float = 5,
+                   mezcla: Dict[str, int] = None, pausa_ms: float = 0, semilla: int = 42,
+                   database_url: str = None, slo_p95_ms: float = SLO_P95_DEFAULT, verbose: bool = False,
+                   directorio: str = None) -> Dict:
+    """Corre la matriz workers × threads × usuarios; un gunicorn limpio por corrida"""
+    if capa == 'postgresql' and not database_url:
+        raise ValueError("La capa postgresql requiere --database-url o BENCH_DATABASE_URL")
+    mezcla = mezcla or dict(MEZCLA_DEFAULT)
+    directorio_base = directorio or tempfile.mkdtemp(prefix='cws_carga_')
+    os.makedirs(directorio_base, exist_ok=True)
+    preparar_entorno(directorio_base, verbose)
+    os.environ['SECRET_KEY'] = secrets.token_hex(32)
+    cookie = cookie_sesion(os.environ['SECRET_KEY'])
+
+    print(f"[CARGA] Generando tenant de {tamano} cotizaciones (capa {capa})...", file=sys.stderr)
+    manifiesto = preparar_datos(directorio_base, capa, tamano, semilla, database_url)
+    materiales = datos.cargar_materiales()
+
+    corridas = []
+    try:
+        for n_workers in workers:
+            for n_threads in threads:
+                for n_usuarios in usuarios:
+                    trazas = os.path.join(directorio_base, 'trazas', f"w{n_workers}-t{n_threads}-u{n_usuarios}")
+                    print(f"[CARGA] workers={n_workers} threads={n_threads} usuarios={n_usuarios}...", file=sys.stderr)
+                    servidor = ServidorGunicorn(directorio_base, trazas, n_workers, n_threads, database_url)
+                    try:
+                        if not servidor.esperar_listo():
+                            raise RuntimeError(f"gunicorn no respondió; ver {servidor._log.name}")
+                        corrida = correr(servidor.url, cookie, manifiesto, n_usuarios, duracion, calentamiento,
+                                         mezcla, pausa_ms, semilla, materiales)
+                    finally:
+                        volcados = servidor.detener()
+                    guardadas = corrida.pop('guardadas')
+                    corridas.append({
+                        'workers': n_workers,
+                        'threads': n_threads,
+                        **corrida,
+                        'contencion': agregar_contencion(volcados),
+                        'integridad': verificar_integridad(directorio_base, capa, guardadas, database_url),
+                    })
+    finally:
+        if directorio is None:
+            shutil.rmtree(directorio_base, ignore_errors=True)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_git(),
+        'parametros': {'capa': capa, 'tamano': tamano, 'duracion_s': duracion, 'calentamiento_s': calentamiento,
+                       'mezcla': mezcla, 'pausa_ms': pausa_ms, 'semilla': semilla, 'slo_p95_ms': slo_p95_ms},
+        'generacion_s': manifiesto['generacion_s'],
+        'corridas': corridas,
+        'capacidad': estimar_capacidad(corridas, slo_p95_ms),
+    }
+
+
+def estimar_capacidad(corridas: List[Dict], slo_p95_ms: float) -> Dict:
+    """Máximo de usuarios concurrentes con p95 dentro del SLO y sin errores, por configuración"""
+    capacidad = {}
+    for corrida in corridas:
+        clave = f"w{corrida['workers']}-t{corrida['threads']}"
+        cumple = not corrida['errores'] and corrida['latencia'].get('p95_ms', float('inf')) <= slo_p95_ms
+        actual = capacidad.setdefault(clave, {'usuarios_max': 0, 'throughput_rps': 0.0})
+        if cumple and corrida['usuarios'] > actual['usuarios_max']:
+            actual.update(usuarios_max=corrida['usuarios'], throughput_rps=corrida['throughput_rps'])
+    return capacidad
+
+
+def _imprimir(documento: Dict):
+    for c in documento['corridas']:
+        latencia = c['latencia']
+        print(f"w={c['workers']} t={c['threads']} u={c['usuarios']}: {c['throughput_rps']} req/s, "
+              f"p50 {latencia.get('p50_ms', 0)} / p95 {latencia.get('p95_ms', 0)} / p99 {latencia.get('p99_ms', 0)} ms, "
+              f"errores {c['errores']}/{c['peticiones']}")
+        for operacion, valores in c['operaciones'].items():
+            print(f"    {operacion:<10} n={valores['n']:<6} p50 {valores['p50_ms']:>9.1f}  p95 {valores['p95_ms']:>9.1f}  "
+                  f"p99 {valores['p99_ms']:>9.1f} ms  status {valores['status']}")
+        for capa, valores in c['contencion']['capas'].items():
+            print(f"    contención {capa:<10} solapadas {valores['solapadas']}/{valores['llamadas']} "
+                  f"({valores['solapadas_pct']}%), máx simultáneas {valores['max_concurrentes']}")
+        integridad = c['integridad']
+        for destino in ('offline_json', 'sdk', 'postgresql'):
+            if destino in integridad:
+                print(f"    integridad {destino:<12} perdidos {len(integridad[destino]['perdidos'])}, "
+                      f"duplicados {len(integridad[destino]['duplicados'])} de {integridad['guardados_exitosos']}")
+        if integridad['numeros_repetidos_en_respuestas']:
+            print(f"    números repetidos en respuestas: {len(integridad['numeros_repetidos_en_respuestas'])}")
+    for clave, valores in documento['capacidad'].items():
+        print(f"Capacidad {clave} (p95 <= {documento['parametros']['slo_p95_ms']} ms): "
+              f"{valores['usuarios_max']} usuarios, {valores['throughput_rps']} req/s")
+
+
+def _parsear_mezcla(texto: str) -> Dict[str, int]:
+    mezcla = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        nombre = nombre.strip()
+        if nombre not in MEZCLA_DEFAULT:
+            raise argparse.ArgumentTypeError(f"operación desconocida '{nombre}' ({', '.join(MEZCLA_DEFAULT)})")
+        mezcla[nombre] = int(peso or 1)
+    if not any(mezcla.values()):
+        raise argparse.ArgumentTypeError("la mezcla necesita algún peso positivo")
+    return mezcla
+
+
+def _lista_enteros(texto: str) -> List[int]:
+    return [int(v) for v in texto.split(',') if v.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga concurrente de CWS Cotizador con gunicorn")
+    parser.add_argument('--usuarios', type=_lista_enteros, default=[1, 4, 8], help="Usuarios concurrentes (lista)")
+    parser.add_argument('--workers', type=_lista_enteros, default=[1], help="Workers de gunicorn (lista)")
+    parser.add_argument('--threads', type=_lista_enteros, default=[1], help="Threads por worker (lista)")
+    parser.add_argument('--capa', choices=CAPAS, default='offline')
+    parser.add_argument('--tamano', type=int, default=1000, help="Cotizaciones del tenant principal")
+    parser.add_argument('--duracion', type=float, default=30, help="Segundos medidos por corrida")
+    parser.add_argument('--calentamiento', type=float, default=5, help="Segundos sin medir al inicio de cada corrida")
+    parser.add_argument('--mezcla', type=_parsear_mezcla, help="p. ej. listado=30,buscar=25,desglose=20,guardar=10,pdf=15")
+    parser.add_argument('--pausa-ms', type=float, default=0, help="Tiempo de reflexión medio entre peticiones")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--slo-p95', type=float, default=SLO_P95_DEFAULT, help="p95 máximo aceptable en ms")
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL'),
+                        help="PostgreSQL local para --capa postgresql (nunca DATABASE_URL)")
+    parser.add_argument('--salida', help="Archivo JSON de resultados")
+    parser.add_argument('--directorio', help="Conservar datos, logs de gunicorn y trazas en este directorio")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    documento = ejecutar_carga(args.usuarios, args.workers, args.threads, capa=args.capa, tamano=args.tamano,
+                               duracion=args.duracion, calentamiento=args.calentamiento, mezcla=args.mezcla,
+                               pausa_ms=args.pausa_ms, semilla=args.semilla, database_url=args.database_url,
+                               slo_p95_ms=args.slo_p95, verbose=args.verbose, directorio=args.directorio)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(documento, archivo, ensure_ascii=False, indent=2)
+    _imprimir(documento)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DATOS SINTÉTICOS PARA BENCHMARKS
+================================
+
+Generador determinista (random.Random(semilla)) de cotizaciones con la forma
+que deja el guardado real: número CLIENTE-CWS-XX-###-R#-PROYECTO, partidas
+estructuradas con materiales de 'Lista de materiales.csv', campos numéricos
+normalizados y costoUnidad/total calculados con el motor de precios.
+
+Las cotizaciones se producen con un generador (iterar_cotizaciones) para que
+los tenants de 100k se escriban al JSON offline o al fake del SDK sin tener
+toda la lista en memoria.
+
+Cada dataset tiene un tenant principal (el de la sesión del benchmark) y un
+tenant de ruido con el 10% de su tamaño, para que el filtro por company_id
+tenga trabajo real.
+"""
+
+import csv
+import json
+import os
+import random
+import re
+import unicodedata
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from pricing_engine import aplicar_a_items, normalizar_cotizacion, redondear, subtotal_material
+
+RUTA_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Lista de materiales.csv')
+FECHA_FIN = datetime(2025, 9, 1, 18, 0, 0)
+DIAS_HISTORIA = 730
+FRACCION_RUIDO = 0.1
+
+COMPANY_ID = str(uuid.uuid5(uuid.NAMESPACE_URL, 'cws-benchmark/tenant-principal'))
+COMPANY_ID_RUIDO = str(uuid.uuid5(uuid.NAMESPACE_URL, 'cws-benchmark/tenant-ruido'))
+
+CLIENTES = [
+    'Daikin', 'BMW', 'Mazda', 'Bridgestone', 'Continental', 'Nissan', 'Bosch', 'Valeo',
+    'Grupo Modelo', 'Cemex', 'Ternium', 'Whirlpool', 'Mabe', 'General Motors', 'Honda',
+    'Schneider Electric', 'Siemens', 'Lear', 'Aptiv', 'Magna', 'ZF Sachs', 'Pirelli',
+    'Goodyear', 'Michelin', 'Hutchinson', 'Nestlé', 'Bimbo', 'Kellogg', 'Coca-Cola FEMSA',
+    'Heineken', 'Peñoles', 'Vitro', 'Nemak', 'Metalsa', 'Sigma', 'Alpla',
+]
+VENDEDORES = ['Francisco Moreno', 'Vicente Estrada', 'Ana López', 'José Ramírez',
+              'María Fernández', 'Luis Hernández', 'Sofía Martínez', 'Carlos Núñez']
+# Iniciales distintas a VENDEDORES: los números del tenant de ruido no chocan con los del principal
+VENDEDORES_RUIDO = ['Roberto Zamora', 'Tomás Quiroga', 'Úrsula Yáñez']
+PROYECTOS = [
+    'Carro para compresores', 'Mesa de trabajo', 'Rack de almacenamiento', 'Guarda de seguridad',
+    'Plataforma elevada', 'Escalera marina', 'Barandal perimetral', 'Soporte de tubería',
+    'Base para motor', 'Estructura de techo', 'Tolva de descarga', 'Jaula de protección',
+    'Banco de pruebas', 'Carro porta herramienta', 'Mezzanine', 'Pasillo de mantenimiento',
+]
+DESCRIPCIONES = [
+    'Fabricación en {m} con acabado en pintura electrostática',
+    'Estructura soldada de {m}, incluye tornillería grado 5',
+    'Suministro e instalación de {m} con primer anticorrosivo',
+    'Ensamble modular en {m}, rodajas de 8" con freno',
+    'Refuerzo en {m} calibre comercial, acabado galvanizado',
+]
+OTROS = [('Rodajas 8"x2"', 650, 1650), ('Tornillería grado 5', 80, 450), ('Pintura epóxica (galón)', 900, 2400),
+         ('Ruedas giratorias', 300, 900), ('Anclas químicas', 120, 380), ('Chapa con llave', 250, 700)]
+CONDICIONES = [
+    {'moneda': 'MXN', 'tipoCambio': None, 'tiempoEntrega': '21 días hábiles', 'entregaEn': 'Planta del cliente',
+     'terminos': '30 días de crédito', 'comentarios': ''},
+    {'moneda': 'MXN', 'tipoCambio': None, 'tiempoEntrega': '15 días hábiles', 'entregaEn': 'LAB Monterrey',
+     'terminos': '50% anticipo, 50% contra entrega', 'comentarios': 'Precios más IVA'},
+    {'moneda': 'USD', 'tipoCambio': 18.5, 'tiempoEntrega': '4 semanas', 'entregaEn': 'Planta del cliente',
+     'terminos': '45 días de crédito', 'comentarios': 'Tipo de cambio del día de facturación'},
+]
+
+
+def cargar_materiales(ruta: str = RUTA_CSV) -> List[Dict]:
+    """Catálogo real de materiales: [{'descripcion', 'peso', 'uom'}]"""
+    materiales = []
+    with open(ruta, 'r', encoding='utf-8-sig') as archivo:
+        for fila in csv.DictReader(archivo):
+            fila = {(k or '').strip(): (v or '').strip() for k, v in fila.items()}
+            try:
+                peso = float(fila.get('Peso', '').replace(',', '.'))
+            except ValueError:
+                continue
+            materiales.append({'descripcion': fila.get('Tipo de material', ''), 'peso': peso,
+                               'uom': fila.get('Ref de Peso', '')})
+    return materiales
+
+
+def _ascii_mayusculas(texto: str) -> str:
+    return unicodedata.normalize('NFKD', texto).encode('ASCII', 'ignore').decode('ASCII').upper()
+
+
+def patron_numero(cliente: str, vendedor: str) -> str:
+    """Prefijo CLIENTE-CWS-XX con las mismas reglas que generar_numero_cotizacion"""
+    cliente_norm = re.sub(r'[^A-Z0-9]', '-', _ascii_mayusculas(cliente))[:10]
+    palabras = _ascii_mayusculas(vendedor).split()
+    iniciales = ''.join(p[0] for p in palabras[:2] if p[0].isalpha())
+    if len(iniciales) < 2:
+        iniciales = palabras[0][:2]
+    return f"{cliente_norm}-CWS-{iniciales}"
+
+
+def _proyecto_numero(proyecto: str) -> str:
+    return ' '.join(re.sub(r'[^A-Z0-9 ]', '', _ascii_mayusculas(proyecto)).split())[:50]
+
+
+def generar_items(rng: random.Random, materiales: List[Dict], como_formulario: bool = False) -> List[Dict]:
+    """Partidas estructuradas; como_formulario=True deja los números como texto (lo que envía el navegador)"""
+    items = []
+    for _ in range(rng.choices((1, 2, 3, 4, 6), weights=(30, 30, 20, 12, 8))[0]):
+        mats = []
+        for material in rng.sample(materiales, rng.choices((1, 2, 3, 5), weights=(25, 35, 25, 15))[0]):
+            cantidad = round(rng.uniform(1, 40), 1)
+            precio = rng.choice((45, 60, 75, 80, 95, 120))
+            mats.append({'material': material['descripcion'], 'peso': material['peso'], 'cantidad': cantidad,
+                         'precio': precio, 'subtotal': redondear(subtotal_material(material['peso'], cantidad, precio)),
+                         'tipoCotizacion': 'normal'})
+        otros = []
+        for descripcion, minimo, maximo in rng.sample(OTROS, rng.choices((0, 1, 2), weights=(50, 35, 15))[0]):
+            cantidad, precio = rng.randint(1, 8), rng.randint(minimo, maximo)
+            otros.append({'descripcion': descripcion, 'cantidad': cantidad, 'precio': precio,
+                          'subtotal': cantidad * precio})
+        item = {
+            'descripcion': rng.choice(DESCRIPCIONES).format(m=mats[0]['material']),
+            'uom': rng.choice(('Pieza', 'Lote', 'Servicio', 'Juego')),
+            'cantidad': rng.randint(1, 12),
+            'materiales': mats,
+            'otrosMateriales': otros,
+            'transporte': rng.choice((0, 0, 500, 1200, 2500)),
+            'instalacion': rng.choice((0, 0, 0, 1500, 4800)),
+            'seguridad': rng.choice((0, 0, 3, 5)),
+            'descuento': rng.choice((0, 0, 0, 5, 10)),
+        }
+        items.append(item)
+    aplicar_a_items(items)
+    if como_formulario:
+        for item in items:
+            for campo in ('cantidad', 'transporte', 'instalacion', 'seguridad', 'descuento', 'costoUnidad', 'total'):
+                item[campo] = str(item[campo])
+            for mat in item['materiales'] + item['otrosMateriales']:
+                for campo in ('peso', 'cantidad', 'precio', 'subtotal'):
+                    if campo in mat:
+                        mat[campo] = str(mat[campo])
+    return items
+
+
+def iterar_cotizaciones(tamano: int, company_id: str = COMPANY_ID, semilla: int = 42,
+                        materiales: List[Dict] = None, id_inicial: int = 1,
+                        vendedores: List[str] = VENDEDORES) -> Iterator[Dict]:
+    """
+    Cotizaciones del tenant en orden cronológico (formato offline/camelCase).
+
+    El 15% de las familias tiene revisiones R2/R3 con el mismo consecutivo,
+    como las que produce el flujo de nueva revisión.
+    """
+    rng = random.Random(f"{semilla}:{company_id}")
+    materiales = materiales or cargar_materiales()
+    consecutivos = {}
+    inicio = FECHA_FIN - timedelta(days=DIAS_HISTORIA)
+    paso = timedelta(days=DIAS_HISTORIA) / max(tamano, 1)
+    generadas = 0
+
+    while generadas < tamano:
+        cliente, vendedor, proyecto = rng.choice(CLIENTES), rng.choice(vendedores), rng.choice(PROYECTOS)
+        patron = patron_numero(cliente, vendedor)
+        consecutivos[patron] = consecutivos.get(patron, 0) + 1
+        revisiones = rng.choices((1, 2, 3), weights=(85, 10, 5))[0]
+        condiciones = dict(rng.choice(CONDICIONES))
+        items = generar_items(rng, materiales)
+
+        for revision in range(1, revisiones + 1):
+            if generadas >= tamano:
+                break
+            numero = f"{patron}-{consecutivos[patron]:03d}-R{revision}-{_proyecto_numero(proyecto)}"
+            fecha = inicio + paso * generadas + timedelta(seconds=rng.randint(0, 3600))
+            datos_generales = {
+                'cliente': cliente, 'vendedor': vendedor, 'proyecto': proyecto,
+                'atencionA': f"Ing. {rng.choice(('Pérez', 'García', 'Torres', 'Ruiz', 'Flores'))}",
+                'contacto': f"compras@{re.sub(r'[^a-z]', '', cliente.lower())}.com.mx",
+                'revision': revision, 'numeroCotizacion': numero, 'condiciones': condiciones,
+            }
+            if revision > 1:
+                datos_generales['actualizacionRevision'] = 'Ajuste de cantidades solicitado por el cliente'
+                items = generar_items(rng, materiales) if rng.random() < 0.5 else items
+            cotizacion = {
+                'numeroCotizacion': numero,
+                'datosGenerales': datos_generales,
+                'items': json.loads(json.dumps(items)),
+                'condiciones': condiciones,
+                'revision': revision,
+                'version': '1.0.0',
+                'timestamp': int(fecha.timestamp() * 1000),
+                'fechaCreacion': fecha.isoformat(),
+                'usuario': vendedor,
+                'observaciones': None,
+                'company_id': company_id,
+                'id': id_inicial + generadas,
+                '_id': str(id_inicial + generadas),
+            }
+            normalizar_cotizacion(cotizacion)
+            generadas += 1
+            yield cotizacion
+
+
+def iterar_dataset(tamano: int, semilla: int = 42, materiales: List[Dict] = None) -> Iterator[Dict]:
+    """Tenant principal (tamano) seguido del tenant de ruido (10%), con ids únicos"""
+    materiales = materiales or cargar_materiales()
+    yield from iterar_cotizaciones(tamano, COMPANY_ID, semilla, materiales)
+    yield from iterar_cotizaciones(int(tamano * FRACCION_RUIDO), COMPANY_ID_RUIDO, semilla, materiales,
+                                   id_inicial=tamano + 1, vendedores=VENDEDORES_RUIDO)
+
+
+def a_fila_supabase(cotizacion: Dict) -> Dict:
+    """Fila de la tabla cotizaciones (condiciones dentro de datos_generales, como el guardado)"""
+    datos_generales = dict(cotizacion.get('datosGenerales', {}))
+    datos_generales['condiciones'] = cotizacion.get('condiciones') or {}
+    return {
+        'id': cotizacion['id'],
+        'numero_cotizacion': cotizacion['numeroCotizacion'],
+        'datos_generales': datos_generales,
+        'items': cotizacion.get('items', []),
+        'revision': cotizacion.get('revision', 1),
+        'version': cotizacion.get('version', '1.0.0'),
+        'fecha_creacion': cotizacion.get('fechaCreacion'),
+        'timestamp': cotizacion.get('timestamp'),
+        'usuario': cotizacion.get('usuario'),
+        'observaciones': cotizacion.get('observaciones'),
+        'company_id': cotizacion.get('company_id'),
+    }
+
+
+def escribir_json_offline(ruta: str, cotizaciones: Iterator[Dict]) -> int:
+    """Escribe cotizaciones_offline.json en streaming; devuelve cuántas escribió"""
+    total = 0
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write('{"cotizaciones": [\n')
+        for cotizacion in cotizaciones:
+            if total:
+                archivo.write(',\n')
+            json.dump(cotizacion, archivo, ensure_ascii=False, default=str)
+            total += 1
+        archivo.write('\n], "contadores": {}, "version": "1.0.0"}\n')
+    return total
+
+
+def formulario_nueva_cotizacion(semilla: int, materiales: List[Dict] = None) -> Dict:
+    """Payload de POST /formulario para una cotización R1 nueva (sin número: se genera al guardar)"""
+    rng = random.Random(f"formulario:{semilla}")
+    materiales = materiales or cargar_materiales()
+    condiciones = dict(rng.choice(CONDICIONES), tipoCambio='')
+    return {
+        'datosGenerales': {
+            'cliente': rng.choice(CLIENTES), 'vendedor': rng.choice(VENDEDORES),
+            'proyecto': f"{rng.choice(PROYECTOS)} {semilla}", 'atencionA': 'Ing. Benchmark',
+            'contacto': 'benchmark@cws.mx', 'revision': '1', 'numeroCotizacion': '',
+        },
+        'items': generar_items(rng, materiales, como_formulario=True),
+        'condiciones': condiciones,
+        'numeroCotizacionHidden': '',
+    }
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DOBLES LOCALES PARA BENCHMARKS
+==============================
+
+Sustituyen los servicios externos sin tocar el código de la aplicación, que
+corre tal cual sobre ellos:
+
+- ClienteSupabaseSQLite: el subconjunto del SDK de Supabase (postgrest) que
+  usa SupabaseManager — table().select/insert/update/upsert/delete, filtros
+  eq/neq/gt/gte/lt/lte/like/ilike/in_/is_/or_, order, limit, range y
+  count='exact' — sobre SQLite con una columna JSON por fila. Respeta el
+  límite de 1000 filas por respuesta de PostgREST en Supabase. rpc() falla
+  como una función no desplegada, para que el código use su fallback.
+- StorageMemoria: supabase.storage.from_(bucket) con upload/list/download/
+  get_public_url/remove/move; list() pagina de 100 en 100 como Storage.
+  ServidorStorage publica las URLs en 127.0.0.1 porque servir_pdf descarga
+  el PDF con requests.get().
+- DriveMemoria: la interfaz de GoogleDriveClient que usa PDFManager
+  (is_available, buscar_pdfs, obtener_pdf, obtener_pdf_por_id).
+"""
+
+import io
+import json
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import quote, unquote
+
+MAX_FILAS_POSTGREST = 1000
+LIMITE_LIST_STORAGE = 100
+_IDENTIFICADOR = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_FILTRO_OR = re.compile(r'^(?P<columna>[^.]+)\.(?P<operador>[a-z_]+)\.(?P<valor>.*)$')
+
+
+class ErrorAPIFake(Exception):
+    """Error con la forma de postgrest.APIError (message/code)"""
+
+    def __init__(self, message: str, code: str = 'PGRST000'):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class RespuestaFake:
+    def __init__(self, data, count: int = None):
+        self.data = data
+        self.count = count
+
+
+# ──────────────────────────────────────────────────────────
+# SDK DE SUPABASE SOBRE SQLITE
+# ──────────────────────────────────────────────────────────
+
+def _ruta_json(columna: str) -> str:
+    """'datos_generales->>cliente' → '$.datos_generales.cliente'"""
+    partes = re.split(r'->>?', columna.strip())
+    for parte in partes:
+        if not _IDENTIFICADOR.match(parte):
+            raise ErrorAPIFake(f"columna inválida: {columna}", 'PGRST100')
+    return '$.' + '.'.join(partes)
+
+
+def _expresion(columna: str) -> str:
+    if columna.strip() == 'id':
+        return 'id'
+    return f"json_extract(doc, '{_ruta_json(columna)}')"
+
+
+def _valor_sql(valor):
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False)
+    return valor
+
+
+def _patron_glob(patron: str) -> str:
+    """LIKE sensible a mayúsculas (como en PostgreSQL) expresado como GLOB"""
+    especiales = {'*': '[*]', '?': '[?]', '[': '[[]', ']': '[]]', '%': '*', '_': '?'}
+    return ''.join(especiales.get(c, c) for c in patron)
+
+
+class ConsultaSQLite:
+    """Query builder encadenable con la semántica de postgrest-py"""
+
+    def __init__(self, cliente: 'ClienteSupabaseSQLite', tabla: str):
+        if not _IDENTIFICADOR.match(tabla):
+            raise ErrorAPIFake(f"tabla inválida: {tabla}", 'PGRST100')
+        self._cliente = cliente
+        self._tabla = tabla
+        self._operacion = 'select'
+        self._columnas = '*'
+        self._count = None
+        self._head = False
+        self._payload = None
+        self._on_conflict = 'id'
+        self._condiciones: List[str] = []
+        self._params: List = []
+        self._orden: List[str] = []
+        self._limite: Optional[int] = None
+        self._offset = 0
+
+    # ── operaciones ──
+    def select(self, *columnas, count: str = None, head: bool = False):
+        self._columnas = ','.join(columnas) if columnas else '*'
+        self._count = count
+        self._head = head
+        return self
+
+    def insert(self, filas, **_):
+        self._operacion, self._payload = 'insert', filas
+        return self
+
+    def update(self, valores: Dict, **_):
+        self._operacion, self._payload = 'update', valores
+        return self
+
+    def upsert(self, filas, on_conflict: str = 'id', **_):
+        self._operacion, self._payload, self._on_conflict = 'upsert', filas, on_conflict or 'id'
+        return self
+
+    def delete(self, **_):
+        self._operacion = 'delete'
+        return self
+
+    # ── filtros ──
+    def _filtro(self, columna: str, operador: str, valor):
+        sql, params = self._condicion(columna, operador, valor)
+        self._condiciones.append(sql)
+        self._params.extend(params)
+        return self
+
+    def _condicion(self, columna: str, operador: str, valor):
+        expresion = _expresion(columna)
+        comparadores = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+        if operador in comparadores:
+            return f"{expresion} {comparadores[operador]} ?", [_valor_sql(valor)]
+        if operador == 'like':
+            return f"{expresion} GLOB ?", [_patron_glob(str(valor))]
+        if operador == 'ilike':
+            return f"{expresion} LIKE ? ESCAPE '\\'", [str(valor).replace('*', '%')]
+        if operador == 'in':
+            valores = list(valor)
+            if not valores:
+                return '0', []
+            return f"{expresion} IN ({','.join('?' * len(valores))})", [_valor_sql(v) for v in valores]
+        if operador == 'is':
+            if valor in (None, 'null'):
+                return f"{expresion} IS NULL", []
+            return f"{expresion} = ?", [_valor_sql(valor in (True, 'true'))]
+        raise ErrorAPIFake(f"operador no soportado: {operador}", 'PGRST100')
+
+    def eq(self, columna, valor):
+        return self._filtro(columna, 'eq', valor)
+
+    def neq(self, columna, valor):
+        return self._filtro(columna, 'neq', valor)
+
+    def gt(self, columna, valor):
+        return self._filtro(columna, 'gt', valor)
+
+    def gte(self, columna, valor):
+        return self._filtro(columna, 'gte', valor)
+
+    def lt(self, columna, valor):
+        return self._filtro(columna, 'lt', valor)
+
+    def lte(self, columna, valor):
+        return self._filtro(columna, 'lte', valor)
+
+    def like(self, columna, patron):
+        return self._filtro(columna, 'like', patron)
+
+    def ilike(self, columna, patron):
+        return self._filtro(columna, 'ilike', patron)
+
+    def in_(self, columna, valores):
+        return self._filtro(columna, 'in', valores)
+
+    def is_(self, columna, valor):
+        return self._filtro(columna, 'is', valor)
+
+    def or_(self, filtros: str, **_):
+        """'numero_cotizacion.ilike.%x%,datos_generales->>cliente.ilike.%x%'"""
+        partes, params = [], []
+        for filtro in filtros.split(','):
+            coincidencia = _FILTRO_OR.match(filtro.strip())
+            if not coincidencia:
+                raise ErrorAPIFake(f"filtro or inválido: {filtro}", 'PGRST100')
+            valor = coincidencia['valor']
+            if coincidencia['operador'] == 'in':
+                valor = [v.strip().strip('"') for v in valor.strip('()').split(',')]
+            sql, valores = self._condicion(coincidencia['columna'], coincidencia['operador'], valor)
+            partes.append(sql)
+            params.extend(valores)
+        self._condiciones.append('(' + ' OR '.join(partes) + ')')
+        self._params.extend(params)
+        return self
+
+    # ── orden y paginación ──
+    def order(self, columna: str, desc: bool = False, **_):
+        self._orden.append(f"{_expresion(columna)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, n: int, **_):
+        self._limite = int(n)
+        return self
+
+    def range(self, inicio: int, fin: int, **_):
+        self._offset = int(inicio)
+        self._limite = int(fin) - int(inicio) + 1
+        return self
+
+    # ── ejecución ──
+    def _where(self) -> str:
+        return (' WHERE ' + ' AND '.join(self._condiciones)) if self._condiciones else ''
+
+    def _proyectar(self, doc: Dict) -> Dict:
+        if self._columnas.strip() in ('*', ''):
+            return doc
+        return {c.strip(): doc.get(c.strip()) for c in self._columnas.split(',') if c.strip()}
+
+    def execute(self) -> RespuestaFake:
+        with self._cliente._lock:
+            self._cliente._asegurar_tabla(self._tabla)
+            return getattr(self, f'_ejecutar_{self._operacion}')()
+
+    def _ejecutar_select(self) -> RespuestaFake:
+        conexion = self._cliente.conexion
+        total = None
+        if self._count:
+            total = conexion.execute(f'SELECT COUNT(*) FROM "{self._tabla}"{self._where()}', self._params).fetchone()[0]
+        if self._head:
+            return RespuestaFake([], total)
+        limite = min(self._limite if self._limite is not None else MAX_FILAS_POSTGREST, self._cliente.max_filas)
+        sql = f'SELECT doc FROM "{self._tabla}"{self._where()}'
+        if self._orden:
+            sql += ' ORDER BY ' + ', '.join(self._orden)
+        sql += ' LIMIT ? OFFSET ?'
+        filas = conexion.execute(sql, self._params + [limite, self._offset]).fetchall()
+        return RespuestaFake([self._proyectar(json.loads(f[0])) for f in filas], total)
+
+    def _ejecutar_insert(self) -> RespuestaFake:
+        filas = self._payload if isinstance(self._payload, list) else [self._payload]
+        return RespuestaFake([self._cliente._insertar(self._tabla, fila) for fila in filas])
+
+    def _ejecutar_update(self) -> RespuestaFake:
+        conexion = self._cliente.conexion
+        actualizadas = []
+        for id_fila, doc in conexion.execute(f'SELECT id, doc FROM "{self._tabla}"{self._where()}', self._params).fetchall():
+            doc = {**json.loads(doc), **self._payload, 'id': id_fila}
+            conexion.execute(f'UPDATE "{self._tabla}" SET doc = ? WHERE id = ?',
+                             (json.dumps(doc, ensure_ascii=False, default=str), id_fila))
+            actualizadas.append(doc)
+        conexion.commit()
+        return RespuestaFake(actualizadas)
+
+    def _ejecutar_upsert(self) -> RespuestaFake:
+        filas = self._payload if isinstance(self._payload, list) else [self._payload]
+        resultado = []
+        for fila in filas:
+            existente = None
+            if fila.get(self._on_conflict) is not None:
+                existente = self._cliente.conexion.execute(
+                    f'SELECT id FROM "{self._tabla}" WHERE {_expresion(self._on_conflict)} = ?',
+                    (_valor_sql(fila[self._on_conflict]),)).fetchone()
+            if existente:
+                consulta = ConsultaSQLite(self._cliente, self._tabla).update(fila).eq('id', existente[0])
+                resultado.extend(consulta._ejecutar_update().data)
+            else:
+                resultado.append(self._cliente._insertar(self._tabla, fila))
+        return RespuestaFake(resultado)
+
+    def _ejecutar_delete(self) -> RespuestaFake:
+        conexion = self._cliente.conexion
+        borradas = [json.loads(d[0]) for d in conexion.execute(
+            f'SELECT doc FROM "{self._tabla}"{self._where()}', self._params).fetchall()]
+        conexion.execute(f'DELETE FROM "{self._tabla}"{self._where()}', self._params)
+        conexion.commit()
+        return RespuestaFake(borradas)
+
+
+class ClienteSupabaseSQLite:
+    """
+    Doble del cliente de Supabase (create_client) para el SDK REST.
+
+    Args:
+        ruta: archivo SQLite (default en memoria)
+        storage: StorageMemoria expuesto como cliente.storage
+        max_filas: tope de filas por respuesta (db-max-rows de Supabase)
+    """
+
+    INDICES = {'cotizaciones': ('numero_cotizacion', 'company_id', 'fecha_creacion')}
+
+    def __init__(self, ruta: str = ':memory:', storage: 'StorageMemoria' = None,
+                 max_filas: int = MAX_FILAS_POSTGREST):
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.execute('PRAGMA journal_mode=WAL' if ruta != ':memory:' else 'PRAGMA journal_mode=MEMORY')
+        self.conexion.execute('PRAGMA synchronous=OFF')
+        self.storage = storage or StorageMemoria()
+        self.max_filas = max_filas
+        self._lock = threading.RLock()
+        self._tablas = set()
+
+    def _asegurar_tabla(self, tabla: str):
+        if tabla in self._tablas:
+            return
+        self.conexion.execute(f'CREATE TABLE IF NOT EXISTS "{tabla}" (id INTEGER PRIMARY KEY AUTOINCREMENT, doc TEXT NOT NULL)')
+        for columna in self.INDICES.get(tabla, ()):
+            self.conexion.execute(f'CREATE INDEX IF NOT EXISTS "idx_{tabla}_{columna}" '
+                                  f'ON "{tabla}" ({_expresion(columna)})')
+        self.conexion.commit()
+        self._tablas.add(tabla)
+
+    def _insertar(self, tabla: str, fila: Dict, commit: bool = True) -> Dict:
+        doc = dict(fila)
+        id_fila = doc.get('id')
+        cursor = self.conexion.execute(f'INSERT INTO "{tabla}" (id, doc) VALUES (?, ?)',
+                                       (id_fila, json.dumps(doc, ensure_ascii=False, default=str)))
+        if id_fila is None:
+            doc['id'] = cursor.lastrowid
+            self.conexion.execute(f'UPDATE "{tabla}" SET doc = ? WHERE id = ?',
+                                  (json.dumps(doc, ensure_ascii=False, default=str), doc['id']))
+        if commit:
+            self.conexion.commit()
+        return doc
+
+    def cargar(self, tabla: str, filas) -> int:
+        """Carga masiva (semilla del benchmark) en una sola transacción"""
+        with self._lock:
+            self._asegurar_tabla(tabla)
+            total = 0
+            for fila in filas:
+                self._insertar(tabla, fila, commit=False)
+                total += 1
+            self.conexion.commit()
+            return total
+
+    def table(self, tabla: str) -> ConsultaSQLite:
+        return ConsultaSQLite(self, tabla)
+
+    from_ = table
+
+    def rpc(self, funcion: str, params: Dict = None, *args, **kwargs):
+        raise ErrorAPIFake(f"Could not find the function public.{funcion} in the schema cache", 'PGRST202')
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+# ──────────────────────────────────────────────────────────
+# SUPABASE STORAGE EN MEMORIA
+# ──────────────────────────────────────────────────────────
+
+class BucketMemoria:
+    """supabase.storage.from_(bucket) sobre un dict ruta → (bytes, fecha)"""
+
+    def __init__(self, storage: 'StorageMemoria', nombre: str):
+        self._storage = storage
+        self.nombre = nombre
+
+    @property
+    def _archivos(self) -> Dict:
+        return self._storage.buckets.setdefault(self.nombre, {})
+
+    def upload(self, path: str, file, file_options: Dict = None):
+        if isinstance(file, (bytes, bytearray)):
+            contenido = bytes(file)
+        elif isinstance(file, str):
+            with open(file, 'rb') as archivo:
+                contenido = archivo.read()
+        else:
+            contenido = file.read()
+        upsert = str((file_options or {}).get('upsert', 'false')).lower() == 'true'
+        with self._storage.lock:
+            if path in self._archivos and not upsert:
+                raise ErrorAPIFake('The resource already exists', '409')
+            self._storage.escribir(self.nombre, path, contenido)
+        return {'Key': f"{self.nombre}/{path}", 'path': path}
+
+    def list(self, path: str = '', options: Dict = None) -> List[Dict]:
+        options = options or {}
+        limite = int(options.get('limit', LIMITE_LIST_STORAGE))
+        offset = int(options.get('offset', 0))
+        busqueda = (options.get('search') or '').lower()
+        nombres = self._storage.listar(self.nombre, path.strip('/'))
+        if busqueda:
+            nombres = [n for n in nombres if busqueda in n.lower()]
+        carpeta = path.strip('/')
+        resultado = []
+        for nombre in nombres[offset:offset + limite]:
+            contenido, fecha = self._archivos[f"{carpeta}/{nombre}" if carpeta else nombre]
+            resultado.append({'name': nombre, 'id': f"{carpeta}/{nombre}", 'created_at': fecha, 'updated_at': fecha,
+                              'metadata': {'size': len(contenido), 'mimetype': 'application/pdf'}})
+        return resultado
+
+    def download(self, path: str) -> bytes:
+        archivo = self._archivos.get(path)
+        if archivo is None:
+            raise ErrorAPIFake('Object not found', '404')
+        return archivo[0]
+
+    def get_public_url(self, path: str, options: Dict = None) -> str:
+        return f"{self._storage.url_base}/storage/v1/object/public/{self.nombre}/{quote(path)}?"
+
+    def remove(self, paths: List[str]) -> List[Dict]:
+        with self._storage.lock:
+            return [{'name': p} for p in paths if self._storage.borrar(self.nombre, p)]
+
+    def move(self, origen: str, destino: str):
+        with self._storage.lock:
+            contenido = self.download(origen)
+            self._storage.borrar(self.nombre, origen)
+            self._storage.escribir(self.nombre, destino, contenido)
+        return {'message': 'Successfully moved'}
+
+
+class StorageMemoria:
+    """Cliente de Storage: .from_(bucket); las URLs públicas apuntan a url_base"""
+
+    def __init__(self, url_base: str = 'http://127.0.0.1:9'):
+        self.url_base = url_base
+        self.buckets: Dict[str, Dict[str, tuple]] = {}
+        self.lock = threading.RLock()
+        self._listados: Dict[tuple, List[str]] = {}
+
+    def from_(self, bucket: str) -> BucketMemoria:
+        return BucketMemoria(self, bucket)
+
+    def escribir(self, bucket: str, ruta: str, contenido: bytes):
+        self.buckets.setdefault(bucket, {})[ruta] = (contenido, datetime.now().isoformat())
+        self._listados.pop((bucket, ruta.rpartition('/')[0]), None)
+
+    def borrar(self, bucket: str, ruta: str) -> bool:
+        self._listados.pop((bucket, ruta.rpartition('/')[0]), None)
+        return self.buckets.get(bucket, {}).pop(ruta, None) is not None
+
+    def listar(self, bucket: str, carpeta: str) -> List[str]:
+        """Nombres ordenados de los archivos directos de una carpeta (cacheado hasta la siguiente escritura)"""
+        clave = (bucket, carpeta)
+        with self.lock:
+            nombres = self._listados.get(clave)
+            if nombres is None:
+                prefijo = f"{carpeta}/" if carpeta else ''
+                nombres = sorted(r[len(prefijo):] for r in self.buckets.get(bucket, {})
+                                 if r.startswith(prefijo) and '/' not in r[len(prefijo):])
+                self._listados[clave] = nombres
+            return nombres
+
+    def leer_url(self, ruta_url: str) -> Optional[bytes]:
+        """Contenido de /storage/v1/object/public/<bucket>/<ruta>"""
+        prefijo = '/storage/v1/object/public/'
+        ruta_url = ruta_url.split('?', 1)[0]
+        if not ruta_url.startswith(prefijo):
+            return None
+        bucket, _, ruta = ruta_url[len(prefijo):].partition('/')
+        archivo = self.buckets.get(bucket, {}).get(unquote(ruta))
+        return archivo[0] if archivo else None
+
+
+class ServidorStorage:
+    """Servidor HTTP local para las URLs públicas de StorageMemoria"""
+
+    def __init__(self, storage: StorageMemoria):
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                contenido = storage.leer_url(self.path)
+                if contenido is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/pdf')
+                self.send_header('Content-Length', str(len(contenido)))
+                self.end_headers()
+                self.wfile.write(contenido)
+
+            def log_message(self, *_):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.servidor.daemon_threads = True
+        storage.url_base = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True, name="BenchmarkStorage")
+        self._hilo.start()
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+# ──────────────────────────────────────────────────────────
+# GOOGLE DRIVE EN MEMORIA
+# ──────────────────────────────────────────────────────────
+
+class DriveMemoria:
+    """Doble de GoogleDriveClient: PDFs históricos por carpeta"""
+
+    def __init__(self):
+        self.archivos: Dict[str, Dict] = {}
+
+    def agregar(self, nombre: str, contenido: bytes, carpeta: str = 'antiguas',
+                fecha_modificacion: str = None) -> str:
+        id_archivo = f"drive-{len(self.archivos) + 1:07d}"
+        self.archivos[id_archivo] = {'id': id_archivo, 'nombre': nombre, 'contenido': contenido,
+                                     'carpeta_origen': carpeta,
+                                     'fecha_modificacion': fecha_modificacion or datetime.now().isoformat()}
+        return id_archivo
+
+    def is_available(self) -> bool:
+        return True
+
+    def buscar_pdfs(self, query: str = "") -> List[Dict]:
+        """Misma forma de resultado que GoogleDriveClient.buscar_pdfs ('name contains', sin mayúsculas)"""
+        query = (query or '').lower()
+        resultado = []
+        for archivo in self.archivos.values():
+            if query and query not in archivo['nombre'].lower():
+                continue
+            numero = archivo['nombre'].replace('.pdf', '')
+            if numero.startswith('Cotizacion_'):
+                numero = numero.replace('Cotizacion_', '')
+            resultado.append({'id': archivo['id'], 'nombre': archivo['nombre'], 'numero_cotizacion': numero,
+                              'tamaño': str(len(archivo['contenido'])),
+                              'fecha_modificacion': archivo['fecha_modificacion'], 'md5': '',
+                              'tipo': 'google_drive', 'carpeta_origen': archivo['carpeta_origen']})
+        return resultado
+
+    def obtener_pdf_por_id(self, file_id: str, nombre_archivo: str = "archivo") -> Optional[bytes]:
+        archivo = self.archivos.get(file_id)
+        return archivo['contenido'] if archivo else None
+
+    def obtener_pdf(self, nombre_archivo: str) -> Optional[bytes]:
+        for archivo in self.archivos.values():
+            if archivo['nombre'] in (nombre_archivo, f"{nombre_archivo}.pdf"):
+                return archivo['contenido']
+        return None
+
+
+def pdf_minimo(texto: str = 'CWS benchmark') -> bytes:
+    """PDF de una página válido (para sembrar Storage/Drive sin generar con ReportLab)"""
+    contenido = f"BT /F1 12 Tf 72 720 Td ({texto}) Tj ET".encode('latin-1', 'replace')
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(contenido)).encode() + b" >>\nstream\n" + contenido + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    salida = io.BytesIO()
+    salida.write(b"%PDF-1.4\n")
+    posiciones = []
+    for i, objeto in enumerate(objetos, 1):
+        posiciones.append(salida.tell())
+        salida.write(f"{i} 0 obj\n".encode() + objeto + b"\nendobj\n")
+    inicio_xref = salida.tell()
+    salida.write(f"xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n".encode())
+    for posicion in posiciones:
+        salida.write(f"{posicion:010d} 00000 n \n".encode())
+    salida.write(f"trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n".encode())
+    return salida.getvalue()
@@ -0,0 +1,20 @@
+"""
+Configuración de gunicorn para benchmarks.carga.
+
+Workers, threads y bind llegan por línea de comandos; aquí solo van los
+hooks que montan los dobles locales en cada worker y vuelcan sus trazas.
+"""
+
+loglevel = 'warning'
+accesslog = None
+graceful_timeout = 30
+
+
+def post_worker_init(worker):
+    from benchmarks.carga import montar_worker
+    montar_worker()
+
+
+def worker_exit(server, worker):
+    from benchmarks.carga import volcar_traza_worker
+    volcar_traza_worker()
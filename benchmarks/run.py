@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK DE CAMINOS CRÍTICOS
+=============================
+
+Genera tenants sintéticos (datos_sinteticos) y mide con el test client de
+Flask los caminos que dominan la latencia en producción:
+
+    home                        GET  /
+    todas_cotizaciones          GET  /todas-cotizaciones
+    buscar                      POST /buscar
+    guardar_cotizacion          POST /formulario (cotización R1 nueva)
+    generar_pdf                 POST /generar_pdf
+    servir_pdf                  GET  /pdf/<numero> (Storage → descarga HTTP local)
+    sincronizar_bidireccional   SupabaseManager.sincronizar_bidireccional()
+
+Capas de datos (--capas):
+    offline      JSON local (SupabaseManager sin credenciales)
+    sdk          SDK REST sobre ClienteSupabaseSQLite (fakes.py)
+    postgresql   PostgreSQL local real (--database-url o BENCH_DATABASE_URL,
+                 con supabase_schema.sql y las migraciones ya aplicadas)
+
+Storage y Drive son siempre los dobles en memoria. La sincronización
+bidireccional solo existe contra PostgreSQL; en las otras capas se reporta
+como omitida.
+
+Antes de importar la app se vacían SUPABASE_URL/DATABASE_URL/claves y las
+credenciales de Drive: un .env de producción nunca se usa. Las escrituras
+(JSON offline, PDFs locales, cubo de ventas, snapshot de materiales) van a
+un directorio temporal. En PostgreSQL solo se tocan las filas de los dos
+tenants del benchmark.
+
+Uso CLI:
+    python -m benchmarks.run --tamanos 1000,10000 --capas offline,sdk --salida base.json
+    python -m benchmarks.run --comparar base.json --salida actual.json
+    python -m benchmarks.run --comparar base.json --contra actual.json --umbral 0.15
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+from urllib.parse import quote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmarks import datos_sinteticos as datos  # noqa: E402
+from benchmarks.fakes import ClienteSupabaseSQLite, DriveMemoria, ServidorStorage, StorageMemoria, pdf_minimo  # noqa: E402
+
+TAMANOS_DEFAULT = (1000, 10000, 100000)
+CAPAS = ('offline', 'sdk', 'postgresql')
+ESCENARIOS = ('home', 'todas_cotizaciones', 'buscar', 'guardar_cotizacion', 'generar_pdf',
+              'servir_pdf', 'sincronizar_bidireccional')
+UMBRAL_DEFAULT = 0.2
+FRACCION_DRIVE = 0.1
+BUCKET = 'cotizaciones-pdfs'
+
+
+# ──────────────────────────────────────────────────────────
+# ENTORNO Y DATOS
+# ──────────────────────────────────────────────────────────
+
+def preparar_entorno(directorio: str, verbose: bool = False):
+    """Variables de entorno aisladas; debe llamarse antes de importar app"""
+    for variable in ('SUPABASE_URL', 'DATABASE_URL', 'SUPABASE_ANON_KEY', 'SUPABASE_SERVICE_KEY',
+                     'GOOGLE_SERVICE_ACCOUNT_JSON', 'GEMINI_API_KEY'):
+        os.environ[variable] = ''
+    os.environ['SERVICIOS_WARMUP'] = 'false'
+    os.environ['SCHEDULERS_ENABLED'] = 'false'
+    os.environ['ENABLE_PDF_TEXT_INDEX'] = 'false'
+    os.environ['SALES_ANALYTICS_PATH'] = os.path.join(directorio, 'sales_analytics.db')
+    os.environ['PDF_TEXT_INDEX_PATH'] = os.path.join(directorio, 'pdf_text_index.db')
+    os.environ['MATERIALES_SNAPSHOT_PATH'] = os.path.join(directorio, 'materiales_catalogo.snapshot')
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(directorio, 'cola_trabajos.db')
+    os.environ['NO_PROXY'] = ','.join(filter(None, [os.environ.get('NO_PROXY'), '127.0.0.1', 'localhost']))
+    if not verbose:
+        os.environ.setdefault('LOG_CONSOLA_NIVEL', 'ERROR')
+
+
+def sembrar(tamano: int, directorio: str, capas: List[str], database_url: str = None,
+            semilla: int = 42) -> Dict:
+    """
+    Una sola pasada del generador alimenta todos los destinos: JSON offline,
+    fake del SDK (si se mide 'sdk'), PostgreSQL (si se mide 'postgresql'),
+    Storage (un PDF por cotización del tenant principal) y Drive (históricos).
+    """
+    inicio = time.perf_counter()
+    pdf = pdf_minimo()
+    storage = StorageMemoria()
+    drive = DriveMemoria()
+    cliente_sdk = ClienteSupabaseSQLite(os.path.join(directorio, 'sdk.sqlite3'), storage=storage) if 'sdk' in capas else None
+    conexion_pg = _conectar_postgresql(database_url) if 'postgresql' in capas else None
+    lote_sdk, lote_pg = [], []
+    muestra = None
+
+    def vaciar():
+        if cliente_sdk is not None and lote_sdk:
+            cliente_sdk.cargar('cotizaciones', lote_sdk)
+        if conexion_pg is not None and lote_pg:
+            _insertar_postgresql(conexion_pg, lote_pg)
+        lote_sdk.clear()
+        lote_pg.clear()
+
+    def cotizaciones():
+        nonlocal muestra
+        for i, cotizacion in enumerate(datos.iterar_dataset(tamano, semilla)):
+            if cotizacion['company_id'] == datos.COMPANY_ID:
+                numero = cotizacion['numeroCotizacion']
+                storage.escribir(BUCKET, f"nuevas/{numero}.pdf", pdf)
+                if i % int(1 / FRACCION_DRIVE) == 0:
+                    drive.agregar(f"Cotizacion_{numero}.pdf", pdf, fecha_modificacion=cotizacion['fechaCreacion'])
+                if muestra is None and cotizacion['revision'] == 1:
+                    muestra = cotizacion
+            fila = datos.a_fila_supabase(cotizacion)
+            if cliente_sdk is not None:
+                lote_sdk.append(fila)
+            if conexion_pg is not None:
+                lote_pg.append(fila)
+            if len(lote_sdk) >= 1000 or len(lote_pg) >= 1000:
+                vaciar()
+            yield cotizacion
+
+    ruta_json = os.path.join(directorio, 'cotizaciones_offline.json')
+    total = datos.escribir_json_offline(ruta_json, cotizaciones())
+    vaciar()
+    if conexion_pg is not None:
+        conexion_pg.close()
+
+    return {
+        'tamano': tamano,
+        'total_filas': total,
+        'ruta_json': ruta_json,
+        'storage': storage,
+        'drive': drive,
+        'cliente_sdk': cliente_sdk,
+        'muestra': muestra,
+        'pdf_servido': storage.listar(BUCKET, 'nuevas')[0][:-len('.pdf')],
+        'generacion_s': round(time.perf_counter() - inicio, 2),
+    }
+
+
+def _conectar_postgresql(database_url: str):
+    import psycopg2
+    conexion = psycopg2.connect(database_url, connect_timeout=10, application_name="CWS_Benchmark")
+    with conexion.cursor() as cursor:
+        cursor.execute("DELETE FROM cotizaciones WHERE company_id IN (%s, %s)",
+                       (datos.COMPANY_ID, datos.COMPANY_ID_RUIDO))
+    conexion.commit()
+    return conexion
+
+
+def _insertar_postgresql(conexion, filas: List[Dict]):
+    from psycopg2.extras import Json, execute_values
+    with conexion.cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO cotizaciones (
+                numero_cotizacion, datos_generales, items, revision, version,
+                fecha_creacion, timestamp, usuario, observaciones, company_id
+            ) VALUES %s ON CONFLICT (numero_cotizacion) DO NOTHING
+        """, [(f['numero_cotizacion'], Json(f['datos_generales']), Json(f['items']), f['revision'], f['version'],
+               f['fecha_creacion'], f['timestamp'], f['usuario'], f['observaciones'], f['company_id'])
+              for f in filas], page_size=1000)
+    conexion.commit()
+
+
+# ──────────────────────────────────────────────────────────
+# APLICACIÓN POR CAPA
+# ──────────────────────────────────────────────────────────
+
+def montar_capa(flask_app, capa: str, semilla: Dict, directorio: str, database_url: str = None):
+    """Construye db_manager/pdf_manager para la capa y los fija en el registro de servicios"""
+    from db_tracing import trazar_cliente_sdk
+    from pdf_manager import PDFManager
+    from price_history import PriceHistory
+    from sales_analytics import SalesAnalyticsCube
+    from supabase_manager import SupabaseManager
+
+    os.makedirs(directorio, exist_ok=True)
+    db_manager = SupabaseManager()
+    db_manager.archivo_offline = os.path.join(directorio, 'cotizaciones_offline.json')
+    if os.path.abspath(semilla['ruta_json']) != os.path.abspath(db_manager.archivo_offline):
+        shutil.copyfile(semilla['ruta_json'], db_manager.archivo_offline)  # varios workers pueden compartirlo
+
+    if capa == 'sdk':
+        db_manager.supabase_client = trazar_cliente_sdk(semilla['cliente_sdk'])
+        db_manager.modo_offline = False
+    elif capa == 'postgresql':
+        db_manager.supabase_url = 'http://benchmark.local'
+        db_manager.database_url = database_url
+        db_manager._inicializar_conexion()
+        if not db_manager.postgresql_disponible:
+            raise RuntimeError(f"PostgreSQL no disponible en {database_url}")
+
+    pdf_manager = PDFManager(db_manager, base_pdf_path=os.path.join(directorio, 'pdfs'))
+    if pdf_manager.supabase_storage is not None:
+        pdf_manager.supabase_storage.supabase = SimpleNamespace(storage=semilla['storage'])
+        pdf_manager.supabase_storage.storage_available = True
+        pdf_manager.supabase_storage_disponible = True
+    pdf_manager.drive_client = semilla['drive']
+
+    # Mismo cableado que las fábricas de create_app(): callbacks de cotización sobre el nuevo db_manager
+    sales_cube = SalesAnalyticsCube(db_path=os.path.join(directorio, 'sales_analytics.db'))
+    db_manager.registrar_callback_cotizacion(sales_cube.on_cotizacion_cambiada)
+    price_history = PriceHistory(db_manager)
+    db_manager.registrar_callback_cotizacion(price_history.on_cotizacion_cambiada)
+
+    registro = flask_app.extensions['servicios']
+    registro.reemplazar('sales_cube', sales_cube)
+    registro.reemplazar('price_history', price_history)
+    registro.reemplazar('db_manager', db_manager)
+    registro.reemplazar('pdf_manager', pdf_manager)
+    return db_manager
+
+
+def cliente_autenticado(flask_app):
+    cliente = flask_app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = 'benchmark-user'
+        sesion['user_email'] = 'benchmark@cws.mx'
+        sesion['user_name'] = 'Benchmark'
+        sesion['user_role'] = 'admin'
+        sesion['company_id'] = datos.COMPANY_ID
+    return cliente
+
+
+def escenarios(cliente, db_manager, capa: str, semilla: Dict) -> Dict[str, Callable]:
+    """Nombre → función(repetición) que ejecuta el camino y devuelve (status, bytes)"""
+    muestra = semilla['muestra']
+    numero = muestra['numeroCotizacion']
+
+    def http(respuesta):
+        return respuesta.status_code, len(respuesta.get_data())
+
+    def guardar(repeticion):
+        payload = datos.formulario_nueva_cotizacion(repeticion)
+        return http(cliente.post('/formulario', json=payload))
+
+    def sincronizar(_):
+        resultado = db_manager.sincronizar_bidireccional()
+        return (200 if resultado.get('success') else 500), len(json.dumps(resultado, default=str))
+
+    funciones = {
+        'home': lambda _: http(cliente.get('/')),
+        'todas_cotizaciones': lambda _: http(cliente.get('/todas-cotizaciones')),
+        'buscar': lambda _: http(cliente.post('/buscar', json={'query': muestra['datosGenerales']['cliente']})),
+        'guardar_cotizacion': guardar,
+        'generar_pdf': lambda _: http(cliente.post('/generar_pdf', json={'numeroCotizacion': numero})),
+        'servir_pdf': lambda _: http(cliente.get(f"/pdf/{quote(semilla['pdf_servido'])}")),
+        'sincronizar_bidireccional': sincronizar,
+    }
+    if capa != 'postgresql':
+        funciones['sincronizar_bidireccional'] = None  # requiere PostgreSQL
+    return funciones
+
+
+# ──────────────────────────────────────────────────────────
+# MEDICIÓN
+# ──────────────────────────────────────────────────────────
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100.0 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def estadisticas(tiempos_ms: List[float]) -> Dict:
+    return {
+        'n': len(tiempos_ms),
+        'min_ms': round(min(tiempos_ms), 2),
+        'p50_ms': round(percentil(tiempos_ms, 50), 2),
+        'p95_ms': round(percentil(tiempos_ms, 95), 2),
+        'max_ms': round(max(tiempos_ms), 2),
+        'media_ms': round(sum(tiempos_ms) / len(tiempos_ms), 2),
+    }
+
+
+@contextlib.contextmanager
+def _silencio(activo: bool):
+    if not activo:
+        yield
+        return
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+        yield
+
+
+def medir(funcion: Callable, repeticiones: int, calentamiento: int, silencioso: bool) -> Dict:
+    from db_tracing import trazador
+
+    for i in range(calentamiento):
+        with _silencio(silencioso):
+            funcion(-1 - i)
+    tiempos, codigos, tamanos = [], Counter(), []
+    trazador.limpiar()
+    for repeticion in range(repeticiones):
+        with _silencio(silencioso):
+            inicio = time.perf_counter()
+            status, tamano = funcion(repeticion)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        codigos[str(status)] += 1
+        tamanos.append(tamano)
+    capas_db = trazador.obtener_estado(limite=0)['capas']
+    return {
+        **estadisticas(tiempos),
+        'status': dict(codigos),
+        'bytes': max(tamanos),
+        'db': {capa: {'llamadas_por_op': round(c['llamadas'] / repeticiones, 1),
+                      'ms_por_op': round(c['total_ms'] / repeticiones, 2)}
+               for capa, c in capas_db.items()},
+    }
+
+
+def ejecutar(tamanos: List[int], capas: List[str], repeticiones: int = 5, calentamiento: int = 1,
+             escenarios_filtro: List[str] = None, database_url: str = None, semilla: int = 42,
+             verbose: bool = False, directorio: str = None) -> Dict:
+    """Corre la matriz tamaño × capa × escenario y devuelve el documento de resultados"""
+    directorio_base = directorio or tempfile.mkdtemp(prefix='cws_benchmark_')
+    preparar_entorno(directorio_base, verbose)
+    if 'postgresql' in capas and not database_url:
+        raise ValueError("La capa postgresql requiere --database-url o BENCH_DATABASE_URL")
+
+    with _silencio(not verbose):
+        import app as aplicacion
+    flask_app = aplicacion.app
+
+    resultados = []
+    try:
+        for tamano in tamanos:
+            directorio_tamano = os.path.join(directorio_base, f"n{tamano}")
+            os.makedirs(directorio_tamano, exist_ok=True)
+            print(f"[BENCHMARK] Generando tenant de {tamano} cotizaciones...", file=sys.stderr)
+            semilla_datos = sembrar(tamano, directorio_tamano, capas, database_url, semilla)
+            servidor = ServidorStorage(semilla_datos['storage'])
+            try:
+                for capa in capas:
+                    with _silencio(not verbose):
+                        db_manager = montar_capa(flask_app, capa, semilla_datos,
+                                                 os.path.join(directorio_tamano, capa), database_url)
+                    cliente = cliente_autenticado(flask_app)
+                    medidos = {}
+                    for nombre, funcion in escenarios(cliente, db_manager, capa, semilla_datos).items():
+                        if escenarios_filtro and nombre not in escenarios_filtro:
+                            continue
+                        if funcion is None:
+                            medidos[nombre] = {'omitido': 'requiere la capa postgresql'}
+                            continue
+                        print(f"[BENCHMARK] n={tamano} capa={capa} {nombre}...", file=sys.stderr)
+                        medidos[nombre] = medir(funcion, repeticiones, calentamiento, not verbose)
+                    resultados.append({'tamano': tamano, 'capa': capa,
+                                       'generacion_s': semilla_datos['generacion_s'], 'escenarios': medidos})
+                    with _silencio(not verbose):
+                        db_manager.cerrar_conexion()
+            finally:
+                servidor.cerrar()
+                if semilla_datos['cliente_sdk'] is not None:
+                    semilla_datos['cliente_sdk'].cerrar()
+    finally:
+        if directorio is None:
+            shutil.rmtree(directorio_base, ignore_errors=True)
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_git(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': {'tamanos': tamanos, 'capas': capas, 'repeticiones': repeticiones,
+                       'calentamiento': calentamiento, 'semilla': semilla},
+        'resultados': resultados,
+    }
+
+
+def _commit_git() -> str:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        sucio = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=RAIZ,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+        return f"{commit}{'-dirty' if sucio else ''}" if commit else 'desconocido'
+    except Exception:
+        return 'desconocido'
+
+
+# ──────────────────────────────────────────────────────────
+# COMPARACIÓN ENTRE COMMITS
+# ──────────────────────────────────────────────────────────
+
+def comparar(base: Dict, actual: Dict, umbral: float = UMBRAL_DEFAULT, metrica: str = 'p50_ms') -> Dict:
+    """
+    Compara la métrica de cada (tamaño, capa, escenario) presente en ambos
+    documentos. Regresión: actual > base * (1 + umbral).
+    """
+    def indexar(documento):
+        return {(r['tamano'], r['capa'], nombre): valores
+                for r in documento.get('resultados', []) for nombre, valores in r['escenarios'].items()
+                if metrica in valores}
+
+    indice_base, indice_actual = indexar(base), indexar(actual)
+    comparaciones = []
+    for clave in sorted(indice_base.keys() & indice_actual.keys()):
+        antes, despues = indice_base[clave][metrica], indice_actual[clave][metrica]
+        razon = despues / antes if antes else float('inf') if despues else 1.0
+        comparaciones.append({'tamano': clave[0], 'capa': clave[1], 'escenario': clave[2],
+                              'base_ms': antes, 'actual_ms': despues, 'razon': round(razon, 3),
+                              'regresion': razon > 1 + umbral})
+    return {
+        'base': base.get('commit'),
+        'actual': actual.get('commit'),
+        'metrica': metrica,
+        'umbral': umbral,
+        'comparaciones': comparaciones,
+        'regresiones': [c for c in comparaciones if c['regresion']],
+    }
+
+
+def _imprimir_comparacion(reporte: Dict):
+    print(f"Comparación {reporte['base']} → {reporte['actual']} ({reporte['metrica']}, umbral +{reporte['umbral']:.0%})")
+    for c in reporte['comparaciones']:
+        marca = 'REGRESIÓN' if c['regresion'] else ''
+        print(f"  n={c['tamano']:<7} {c['capa']:<10} {c['escenario']:<26} "
+              f"{c['base_ms']:>10.1f} → {c['actual_ms']:>10.1f} ms  x{c['razon']:<6} {marca}")
+    print(f"Regresiones: {len(reporte['regresiones'])}")
+
+
+def _imprimir_resultados(documento: Dict):
+    for r in documento['resultados']:
+        print(f"n={r['tamano']} capa={r['capa']} (generación {r.get('generacion_s', 0)} s)")
+        for nombre, valores in r['escenarios'].items():
+            if 'omitido' in valores:
+                print(f"  {nombre:<26} omitido: {valores['omitido']}")
+            else:
+                print(f"  {nombre:<26} p50 {valores['p50_ms']:>10.1f} ms  p95 {valores['p95_ms']:>10.1f} ms  "
+                      f"status {valores['status']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de caminos críticos con tenants sintéticos")
+    parser.add_argument('--tamanos', default=','.join(map(str, TAMANOS_DEFAULT)),
+                        help="Cotizaciones del tenant principal, separadas por coma")
+    parser.add_argument('--capas', default='offline,sdk', help=f"Capas a medir: {','.join(CAPAS)}")
+    parser.add_argument('--escenarios', help=f"Subconjunto de: {','.join(ESCENARIOS)}")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--calentamiento', type=int, default=1, help="Ejecuciones sin medir por escenario")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL'),
+                        help="PostgreSQL local para la capa postgresql (nunca DATABASE_URL)")
+    parser.add_argument('--salida', help="Archivo JSON de resultados (default: stdout)")
+    parser.add_argument('--comparar', help="JSON base para detectar regresiones")
+    parser.add_argument('--contra', help="JSON actual a comparar (sin correr el benchmark)")
+    parser.add_argument('--umbral', type=float, default=UMBRAL_DEFAULT, help="Regresión relativa tolerada (0.2 = +20%%)")
+    parser.add_argument('--directorio', help="Conservar los datos generados en este directorio")
+    parser.add_argument('--verbose', action='store_true', help="No silenciar la salida de la app")
+    args = parser.parse_args(argv)
+
+    capas = [c.strip() for c in args.capas.split(',') if c.strip()]
+    invalidas = set(capas) - set(CAPAS)
+    if invalidas:
+        parser.error(f"capas desconocidas: {', '.join(sorted(invalidas))}")
+    escenarios_filtro = [e.strip() for e in args.escenarios.split(',')] if args.escenarios else None
+
+    if args.contra:
+        with open(args.contra, encoding='utf-8') as archivo:
+            documento = json.load(archivo)
+    else:
+        documento = ejecutar([int(t) for t in args.tamanos.split(',') if t.strip()], capas,
+                             repeticiones=args.repeticiones, calentamiento=args.calentamiento,
+                             escenarios_filtro=escenarios_filtro, database_url=args.database_url,
+                             semilla=args.semilla, verbose=args.verbose, directorio=args.directorio)
+        if args.salida:
+            with open(args.salida, 'w', encoding='utf-8') as archivo:
+                json.dump(documento, archivo, ensure_ascii=False, indent=2)
+            _imprimir_resultados(documento)
+        else:
+            json.dump(documento, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        reporte = comparar(base, documento, args.umbral)
+        _imprimir_comparacion(reporte)
+        return 1 if reporte['regresiones'] else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
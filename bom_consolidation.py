@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CONSOLIDACIÓN DE BOMs EN TIEMPO LINEAL
+======================================
+
+Motor de los pasos 4 y 5 del análisis de PDFs (gemini_pdf_analyzer):
+agrupa los items de todas las páginas por clave de consolidación y genera
+la tabla master con subtotales dimensionales y el grand total.
+
+- Una sola pasada agrupada: cada item se resuelve a su grupo con un dict
+  (O(1)) y se acumula en columnas array('d') (cantidad, largo, ancho,
+  espesor); antes se recorría la lista completa por cada clave única (O(n²))
+- Subtotales de área y volumen calculados por columnas sobre los grupos
+- El grand total se acumula mientras se arman los registros de la tabla
+  master (sin segundo recorrido); top de repetidos con heapq.nlargest
+- Varios PDFs se pueden combinar en una misma tabla master (agregar_resultado
+  / consolidar_resultados), conservando las páginas de cada origen
+
+Benchmarks: python -m benchmarks.bom --tamanos 10000,100000
+"""
+
+import heapq
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+NAN = float('nan')
+
+
+def clave_consolidacion(item_id, descripcion, largo, ancho, espesor) -> str:
+    """Clave de materiales repetidos (misma que BOMItem.get_key_consolidacion)"""
+    return f"{item_id}_{descripcion}_{largo}_{ancho}_{espesor}".lower()
+
+
+def _a_columna(valor) -> float:
+    """Dimensión opcional -> float de columna (None/no numérico = NaN)"""
+    if valor is None:
+        return NAN
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def _de_columna(valor: float) -> Optional[float]:
+    return None if math.isnan(valor) else valor
+
+
+def _presente(valor: float) -> bool:
+    """Equivale al `if item.largo` original: ni None/NaN ni cero"""
+    return valor == valor and valor != 0
+
+
+class _AcumuladorGrandTotal:
+    """Totales generales, por clasificación y repetidos en un solo recorrido"""
+
+    def __init__(self):
+        self.totales = {
+            "total_items_unicos": 0,
+            "total_cantidad_items": 0,
+            "total_area_mm2": 0,
+            "total_volumen_mm3": 0
+        }
+        self.clasificacion_materiales: Dict[str, Dict] = {}
+        self.materiales_consolidados: List[Dict] = []
+        self.repetidos: List[Dict] = []
+
+    def agregar(self, registro: Dict):
+        self.totales["total_items_unicos"] += 1
+        self.totales["total_cantidad_items"] += registro["cantidad_total"]
+        subtotales = registro.get("subtotales_dimensionales") or {}
+        area = subtotales.get("area_total_mm2", 0)
+        volumen = subtotales.get("volumen_total_mm3", 0)
+        self.totales["total_area_mm2"] += area
+        self.totales["total_volumen_mm3"] += volumen
+
+        clasificacion = registro.get("clasificacion", "Sin clasificar")
+        grupo = self.clasificacion_materiales.get(clasificacion)
+        if grupo is None:
+            grupo = self.clasificacion_materiales[clasificacion] = {
+                "items": [],
+                "total_cantidad": 0,
+                "total_area": 0,
+                "total_volumen": 0
+            }
+        grupo["items"].append(registro)
+        grupo["total_cantidad"] += registro["cantidad_total"]
+        grupo["total_area"] += area
+        grupo["total_volumen"] += volumen
+
+        self.materiales_consolidados.append({
+            **registro,
+            "consolidado": registro["ocurrencias"] > 1,
+            "total_final": registro["cantidad_total"]
+        })
+        if registro["ocurrencias"] > 1:
+            self.repetidos.append(registro)
+
+    def resultado(self) -> Dict:
+        # nlargest equivale a sorted(..., reverse=True)[:10] (estable) sin ordenar todo
+        top = heapq.nlargest(10, self.repetidos, key=lambda r: r["ocurrencias"])
+        return {
+            "totales_generales": self.totales,
+            "clasificacion_por_tipo": self.clasificacion_materiales,
+            "materiales_consolidados": self.materiales_consolidados,
+            "materiales_mas_repetidos": top,
+            "resumen": {
+                "total_clasificaciones": len(self.clasificacion_materiales),
+                "materiales_repetidos": len(self.repetidos),
+                "material_mas_repetido": top[0] if top else None
+            }
+        }
+
+
+def generar_grand_total(tabla_master: Iterable[Dict]) -> Dict:
+    """Grand total (paso 5) de una tabla master ya consolidada"""
+    acumulador = _AcumuladorGrandTotal()
+    for registro in tabla_master:
+        acumulador.agregar(registro)
+    return acumulador.resultado()
+
+
+class ConsolidadorBOM:
+    """
+    Acumula items de una o varias fuentes y los consolida por clave.
+
+    Los grupos se numeran en orden de primera aparición (mismo orden que la
+    tabla master original); el primer item de cada grupo aporta id,
+    descripción, UDM, clasificación y dimensiones.
+    """
+
+    def __init__(self):
+        self._grupos: Dict[str, int] = {}
+        # Columnas por grupo
+        self.cantidad = array('d')
+        self.largo = array('d')
+        self.ancho = array('d')
+        self.espesor = array('d')
+        self.ocurrencias = array('l')
+        self._item_id: List[str] = []
+        self._descripcion: List[str] = []
+        self._udm: List[str] = []
+        self._clasificacion: List[str] = []
+        self._paginas: List[set] = []
+        self._origenes: List[Dict[Any, set]] = []
+        self.total_items = 0
+
+    def __len__(self):
+        return len(self._item_id)
+
+    def agregar(self, item_id, cantidad, udm, descripcion, largo=None, ancho=None, espesor=None,
+                clasificacion: str = "", pagina: int = 1, origen=None):
+        clave = clave_consolidacion(item_id, descripcion, largo, ancho, espesor)
+        grupo = self._grupos.get(clave)
+        if grupo is None:
+            grupo = self._grupos[clave] = len(self._item_id)
+            self._item_id.append(item_id)
+            self._descripcion.append(descripcion)
+            self._udm.append(udm)
+            self._clasificacion.append(clasificacion)
+            self.largo.append(_a_columna(largo))
+            self.ancho.append(_a_columna(ancho))
+            self.espesor.append(_a_columna(espesor))
+            self.cantidad.append(0.0)
+            self.ocurrencias.append(0)
+            self._paginas.append(set())
+            self._origenes.append({})
+        self.cantidad[grupo] += cantidad
+        self.ocurrencias[grupo] += 1
+        self._paginas[grupo].add(pagina)
+        if origen is not None:
+            self._origenes[grupo].setdefault(origen, set()).add(pagina)
+        self.total_items += 1
+
+    def agregar_items(self, items: Iterable, origen=None):
+        """Items BOMItem (atributos) o dicts con las mismas claves"""
+        for item in items:
+            if isinstance(item, dict):
+                self.agregar(item.get("item_id"), item.get("cantidad", 0), item.get("udm"),
+                             item.get("descripcion"), item.get("largo"), item.get("ancho"),
+                             item.get("espesor"), item.get("clasificacion", ""),
+                             item.get("pagina_origen", 1), origen)
+            else:
+                self.agregar(item.item_id, item.cantidad, item.udm, item.descripcion, item.largo,
+                             item.ancho, item.espesor, item.clasificacion, item.pagina_origen, origen)
+
+    def agregar_paginas(self, paginas_bom: Iterable, origen=None):
+        """Lista de PaginaBOM de un PDF"""
+        for pagina in paginas_bom:
+            self.agregar_items(pagina.items, origen)
+
+    def agregar_resultado(self, resultado: Dict, origen=None):
+        """Resultado de analizar_pdf_completo (tablas por página del paso 2)"""
+        origen = origen or resultado.get("numero_cotizacion") or resultado.get("ruta_pdf")
+        for tabla in resultado.get("paso_2_tablas_por_pagina", []):
+            numero_pagina = tabla.get("pagina", 1)
+            self.agregar_items(({**item, "pagina_origen": numero_pagina} for item in tabla.get("items", [])),
+                               origen)
+
+    def _subtotales(self) -> Tuple[array, array]:
+        """Área y volumen unitarios por grupo, por columnas (NaN = no aplica)"""
+        area = array('d', (l * a if _presente(l) and _presente(a) else NAN
+                           for l, a in zip(self.largo, self.ancho)))
+        volumen = array('d', (s * e if s == s and _presente(e) else NAN
+                              for s, e in zip(area, self.espesor)))
+        return area, volumen
+
+    def consolidar(self) -> Tuple[List[Dict], Dict]:
+        """Tabla master (paso 4) y grand total (paso 5) en un solo recorrido de los grupos"""
+        area, volumen = self._subtotales()
+        acumulador = _AcumuladorGrandTotal()
+        tabla_master = []
+        for grupo in range(len(self)):
+            cantidad_total = self.cantidad[grupo]
+            largo = _de_columna(self.largo[grupo])
+            ancho = _de_columna(self.ancho[grupo])
+            espesor = _de_columna(self.espesor[grupo])
+
+            subtotal_dimensional = {}
+            if area[grupo] == area[grupo]:
+                subtotal_dimensional = {
+                    "area_unitaria_mm2": area[grupo],
+                    "area_total_mm2": area[grupo] * cantidad_total,
+                    "largo_mm": largo,
+                    "ancho_mm": ancho
+                }
+                if volumen[grupo] == volumen[grupo]:
+                    subtotal_dimensional.update({
+                        "espesor_mm": espesor,
+                        "volumen_unitario_mm3": volumen[grupo],
+                        "volumen_total_mm3": volumen[grupo] * cantidad_total
+                    })
+
+            registro = {
+                "item_id": self._item_id[grupo],
+                "descripcion": self._descripcion[grupo],
+                "cantidad_total": cantidad_total,
+                "udm": self._udm[grupo],
+                "clasificacion": self._clasificacion[grupo],
+                "largo": largo,
+                "ancho": ancho,
+                "espesor": espesor,
+                "subtotales_dimensionales": subtotal_dimensional,
+                "paginas_origen": sorted(self._paginas[grupo]),
+                "ocurrencias": self.ocurrencias[grupo]
+            }
+            if self._origenes[grupo]:
+                registro["origenes"] = {origen: sorted(paginas) for origen, paginas in self._origenes[grupo].items()}
+
+            tabla_master.append(registro)
+            acumulador.agregar(registro)
+        return tabla_master, acumulador.resultado()
+
+    def tabla_master(self) -> List[Dict]:
+        return self.consolidar()[0]
+
+
+def consolidar_resultados(resultados: Iterable[Dict]) -> Dict:
+    """
+    Combina los BOMs de varios análisis de PDF en una tabla master.
+
+    Returns:
+        Dict con tabla_master, grand_total, pdfs y total_items
+    """
+    consolidador = ConsolidadorBOM()
+    pdfs = []
+    for resultado in resultados:
+        origen = resultado.get("numero_cotizacion") or resultado.get("ruta_pdf")
+        consolidador.agregar_resultado(resultado, origen)
+        pdfs.append(origen)
+    tabla_master, grand_total = consolidador.consolidar()
+    return {
+        "tabla_master": tabla_master,
+        "grand_total": grand_total,
+        "pdfs": pdfs,
+        "total_items": consolidador.total_items
+    }
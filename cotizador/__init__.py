@@ -6,11 +6,14 @@ import os
 import sys
 import datetime
 import atexit
+import threading
 import logging
 from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 from flask import Flask, jsonify
 
+import structured_logging
+
 # Compatibilidad de librerías PDF
 from cotizador._compat import REPORTLAB_AVAILABLE, WEASYPRINT_AVAILABLE
 
@@ -21,10 +24,18 @@ from cotizador.utilities import (
     handle_error_response, handle_not_found_response
 )
 from cotizador.pdf_generator import generar_pdf_reportlab, generar_desglose_pdf_reportlab
+from cotizador.services import RegistroServicios, es_proceso_lider
+
+logger = logging.getLogger(__name__)
 
 
 def configurar_logging(app_instance=None):
-    """Configura logging detallado para la aplicación."""
+    """
+    Configura logging detallado para la aplicación.
+
+    El archivo y la consola se escriben desde el hilo del QueueListener
+    (ver structured_logging); los requests solo encolan registros.
+    """
     base_dir = os.path.dirname(os.path.dirname(__file__))
     log_dir = os.path.join(base_dir, 'logs')
     os.makedirs(log_dir, exist_ok=True)
@@ -37,14 +48,11 @@ def configurar_logging(app_instance=None):
         backupCount=5
     )
 
-    formatter = logging.Formatter(
-        '%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s'
-    )
+    formatter = logging.Formatter(structured_logging.FORMATO_TEXTO)
     file_handler.setFormatter(formatter)
 
+    structured_logging.configurar([file_handler, structured_logging.handler_consola()])
     logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    logger.addHandler(file_handler)
 
     critical_logger = logging.getLogger('FALLOS_CRITICOS')
     critical_handler = RotatingFileHandler(
@@ -56,7 +64,7 @@ def configurar_logging(app_instance=None):
     critical_logger.addHandler(critical_handler)
     critical_logger.setLevel(logging.ERROR)
 
-    print(f"Logging configurado: {log_file}")
+    logger.info("Logging configurado: %s", log_file)
     return logger
 
 
@@ -66,7 +74,7 @@ def cargar_materiales_csv():
 
     materiales = []
     es_render = os.getenv('RENDER') or os.getenv('RENDER_SERVICE_NAME')
-    print(f"[MATERIALES] Entorno Render detectado: {bool(es_render)}")
+    logger.info("[MATERIALES] Entorno Render detectado: %s", bool(es_render))
 
     base_dir = os.path.dirname(os.path.dirname(__file__))
 
@@ -82,7 +90,7 @@ def cargar_materiales_csv():
         for ruta_csv in rutas_posibles:
             if os.path.exists(ruta_csv):
                 archivo_encontrado = ruta_csv
-                print(f"[MATERIALES] Archivo CSV encontrado en: {ruta_csv}")
+                logger.info("[MATERIALES] Archivo CSV encontrado en: %s", ruta_csv)
                 break
 
         if not archivo_encontrado:
@@ -126,17 +134,17 @@ def cargar_materiales_csv():
                     }
                     materiales.append(material)
                 except Exception as fila_error:
-                    print(f"[MATERIALES] Error procesando fila {i+1}: {fila_error}")
+                    logger.error("[MATERIALES] Error procesando fila %s: %s", i + 1, fila_error)
                     continue
 
-        print(f"[MATERIALES] Cargados {len(materiales)} materiales desde CSV")
+        logger.info("[MATERIALES] Cargados %s materiales desde CSV", len(materiales))
         if materiales:
-            print(f"[MATERIALES] Ejemplos cargados:")
+            logger.info("[MATERIALES] Ejemplos cargados:")
             for i, mat in enumerate(materiales[:3]):
-                print(f"  {i+1}. {mat['descripcion']} - {mat['peso']} {mat['uom']}")
+                logger.info("  %s. %s - %s %s", i + 1, mat['descripcion'], mat['peso'], mat['uom'])
 
     except Exception as e:
-        print(f"[MATERIALES] Error cargando materiales: {e}")
+        logger.error("[MATERIALES] Error cargando materiales: %s", e)
         materiales = [
             {'descripcion': 'Acero estructural', 'peso': 7850.0, 'uom': 'kg/m3'},
             {'descripcion': 'Concreto armado', 'peso': 2400.0, 'uom': 'kg/m3'},
@@ -145,7 +153,7 @@ def cargar_materiales_csv():
             {'descripcion': 'Tubo estructural', 'peso': 1.0, 'uom': 'kg/ml'},
             {'descripcion': 'Material personalizado', 'peso': 1.0, 'uom': 'Especificar'}
         ]
-        print(f"[MATERIALES] Usando {len(materiales)} materiales por defecto")
+        logger.info("[MATERIALES] Usando %s materiales por defecto", len(materiales))
 
     return materiales
 
@@ -168,56 +176,121 @@ def create_app():
     app.config['DEBUG'] = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     app.config['TEMPLATES_AUTO_RELOAD'] = True
 
-    # ── Inicializar DatabaseManager ──
-    print("Inicializando DatabaseManager (SupabaseManager)...")
-    from supabase_manager import SupabaseManager as DatabaseManager
-    db_manager = DatabaseManager()
-
-    print(f"Estado de conexión:")
-    print(f"   Modo offline: {db_manager.modo_offline}")
-    if not db_manager.modo_offline:
-        print(f"   Supabase conectado: {db_manager.supabase_url}")
-        print(f"   Base de datos: PostgreSQL")
-    else:
-        print(f"   Modo offline activo - usando JSON local")
-
-    # Estadísticas iniciales
-    try:
-        stats = db_manager.obtener_estadisticas()
-        print(f"Estadísticas iniciales:")
-        for key, value in stats.items():
-            print(f"   {key}: {value}")
-    except Exception as e:
-        print(f"Error obteniendo estadísticas: {e}")
-
-    # ── Inicializar PDFManager ──
-    try:
+    # ── Servicios: se registran aquí y se construyen en su primer uso o en el
+    #    hilo de calentamiento (ver cotizador/services.py) ──
+    servicios = RegistroServicios()
+    LISTA_MATERIALES = []  # se llena en sitio al construir el catálogo
+
+    def crear_db_manager():
+        logger.info("Inicializando DatabaseManager (SupabaseManager)...")
+        from supabase_manager import SupabaseManager as DatabaseManager
+        db_manager = DatabaseManager()
+        if not db_manager.modo_offline:
+            logger.info("Estado de conexión: Supabase conectado (%s)", db_manager.supabase_url)
+        else:
+            logger.info("Estado de conexión: modo offline activo - usando JSON local")
+        # Cierre de conexión al salir (solo si llegó a construirse)
+        atexit.register(db_manager.cerrar_conexion)
+        return db_manager
+
+    def crear_pdf_manager():
         from pdf_manager import PDFManager
-        pdf_manager = PDFManager(db_manager)
-        print("PDFManager inicializado exitosamente")
-    except Exception as e:
-        print(f"Error inicializando PDFManager: {e}")
-        pdf_manager = None
-
-    # ── Inicializar SyncScheduler ──
-    try:
+        pdf_manager = PDFManager(servicios.obtener('db_manager'))
+        logger.info("PDFManager inicializado exitosamente")
+        return pdf_manager
+
+    def crear_pdf_text_index():
+        from pdf_text_index import PDFTextIndex
+        pdf_text_index = PDFTextIndex(
+            servicios.obtener('pdf_manager'),
+            resolver_companias=servicios.obtener('db_manager').companias_de_cotizaciones)
+        if os.getenv('ENABLE_PDF_TEXT_INDEX', 'true').lower() == 'true' and es_proceso_lider():
+            pdf_text_index.iniciar()
+        logger.info("PDFTextIndex inicializado exitosamente")
+        return pdf_text_index
+
+    def crear_sales_cube():
+        from sales_analytics import SalesAnalyticsCube
+        db_manager = servicios.obtener('db_manager')
+        sales_cube = SalesAnalyticsCube()
+        db_manager.registrar_callback_cotizacion(sales_cube.on_cotizacion_cambiada)
+        if not sales_cube.obtener_estado()['cotizaciones'] and es_proceso_lider():
+            # Primer arranque: backfill en segundo plano para no retrasar el inicio
+            threading.Thread(target=sales_cube.reconstruir, args=(db_manager,),
+                             daemon=True, name="SalesCubeBackfill").start()
+        logger.info("SalesAnalyticsCube inicializado exitosamente")
+        return sales_cube
+
+    def crear_price_history():
+        from price_history import PriceHistory
+        db_manager = servicios.obtener('db_manager')
+        price_history = PriceHistory(db_manager)
+        db_manager.registrar_callback_cotizacion(price_history.on_cotizacion_cambiada)
+        logger.info("PriceHistory inicializado exitosamente")
+        return price_history
+
+    def crear_sync_scheduler():
         from sync_scheduler import SyncScheduler
-        sync_scheduler = SyncScheduler(db_manager)
-        print("SyncScheduler inicializado exitosamente")
-        if sync_scheduler.auto_sync_enabled and sync_scheduler.is_available():
+        sync_scheduler = SyncScheduler(servicios.obtener('db_manager'))
+        logger.info("SyncScheduler inicializado exitosamente")
+        if sync_scheduler.auto_sync_enabled and sync_scheduler.is_available() and es_proceso_lider():
             sync_scheduler.iniciar()
-    except Exception as e:
-        print(f"Error inicializando SyncScheduler: {e}")
-        sync_scheduler = None
+        return sync_scheduler
 
-    # ── Cargar materiales ──
-    LISTA_MATERIALES = cargar_materiales_csv()
-    print(f"[OK] Cargados {len(LISTA_MATERIALES)} materiales desde CSV")
+    def crear_catalogo_materiales():
+        # Catálogo indexado, recarga en caliente, snapshot binario
+        try:
+            from materials_catalog import MaterialsCatalog
+            catalogo_materiales = MaterialsCatalog()
+            LISTA_MATERIALES[:] = catalogo_materiales.materiales
+        except Exception as e:
+            logger.error("Error inicializando MaterialsCatalog: %s", e)
+            catalogo_materiales = None
+            LISTA_MATERIALES[:] = cargar_materiales_csv()
+        logger.info("[OK] Cargados %s materiales", len(LISTA_MATERIALES))
+        return catalogo_materiales
+
+    def crear_cola_trabajos():
+        # Cola local de efectos secundarios lentos: cada proceso aporta sus hilos
+        # (JOB_QUEUE_WORKERS=0 los apaga si corre `python -m job_queue trabajar`)
+        from job_queue import ColaTrabajos
+        cola_trabajos = ColaTrabajos(contexto=app.app_context)
+        cola_trabajos.iniciar()
+        atexit.register(cola_trabajos.detener)
+        logger.info("ColaTrabajos inicializada exitosamente")
+        return cola_trabajos
+
+    def crear_keepalive():
+        # Keepalive de Render: el scheduler solo corre en el proceso líder
+        from render_keepalive import get_keepalive_instance, init_keepalive
+        keepalive = init_keepalive() if es_proceso_lider() else get_keepalive_instance()
+        logger.info("Render Keepalive %s", 'activo' if keepalive.is_running else 'en standby')
+        return keepalive
+
+    # Orden de registro = orden de calentamiento
+    db_manager = servicios.registrar('db_manager', crear_db_manager)
+    catalogo_materiales = servicios.registrar('catalogo_materiales', crear_catalogo_materiales)
+    pdf_manager = servicios.registrar('pdf_manager', crear_pdf_manager)
+    sales_cube = servicios.registrar('sales_cube', crear_sales_cube)
+    price_history = servicios.registrar('price_history', crear_price_history)
+    pdf_text_index = servicios.registrar('pdf_text_index', crear_pdf_text_index)
+    sync_scheduler = servicios.registrar('sync_scheduler', crear_sync_scheduler)
+    cola_trabajos = servicios.registrar('cola_trabajos', crear_cola_trabajos)
+    servicios.registrar('keepalive', crear_keepalive)
+
+    # Los callbacks de cotización deben existir antes de que otro hilo use db_manager
+    db_manager.al_crear(lambda _: (servicios.obtener('sales_cube'), servicios.obtener('price_history')))
 
     # ── Guardar en extensions/config para acceso desde blueprints ──
+    app.extensions['servicios'] = servicios
     app.extensions['db_manager'] = db_manager
     app.extensions['pdf_manager'] = pdf_manager
     app.extensions['sync_scheduler'] = sync_scheduler
+    app.extensions['pdf_text_index'] = pdf_text_index
+    app.extensions['sales_cube'] = sales_cube
+    app.extensions['catalogo_materiales'] = catalogo_materiales
+    app.extensions['price_history'] = price_history
+    app.extensions['cola_trabajos'] = cola_trabajos
     app.config['LISTA_MATERIALES'] = LISTA_MATERIALES
     # Backward compat: también expuestos como config
     app.config['DB_MANAGER'] = db_manager
@@ -248,10 +321,18 @@ def create_app():
     from cotizador.blueprints.company_bp import company_bp
     app.register_blueprint(company_bp)
 
+    # ── Instrumentación de latencia (antes del middleware para incluirlo) ──
+    from cotizador.instrumentation import init_instrumentation
+    init_instrumentation(app, db_manager=db_manager, pdf_manager=pdf_manager)
+
     # ── Inicializar middleware multi-tenant ──
     from cotizador.middleware import init_middleware
     init_middleware(app, db_manager)
 
+    # ── Caché HTTP: ETags, filas renderizadas y compresión ──
+    from cotizador.http_cache import init_http_cache
+    init_http_cache(app)
+
     # ── Error handlers ──
     @app.errorhandler(404)
     def not_found(e):
@@ -270,7 +351,11 @@ def create_app():
             "app": os.getenv('APP_NAME', 'CWS Cotizaciones'),
             "version": os.getenv('APP_VERSION', '1.0.0'),
             "modo": "offline" if db_manager.modo_offline else "online",
-            **stats
+            **stats,
+            "servicios": servicios.obtener_estado(),
         })
 
+    if os.getenv('SERVICIOS_WARMUP', 'true').lower() == 'true':
+        servicios.calentar()
+
     return app
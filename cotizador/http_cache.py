@@ -0,0 +1,302 @@
+"""
+Caché HTTP para CWS Cotizador.
+
+- Validadores: ETag débil para los listados (home, /todas-cotizaciones) a
+  partir del contador de generación de la compañía
+  (SupabaseManager.obtener_generacion_datos) y para las vistas de una
+  cotización (/api/cotizacion, /ver-json, /desglose) a partir de su
+  timestamp + digest del contenido. Si el navegador manda If-None-Match con
+  el mismo ETag se responde 304 sin leer ni renderizar nada más
+- Fragmentos: cada fila de la tabla de listados se renderiza una vez por
+  versión (el contenido de la fila es la llave) y se reutiliza en memoria (LRU)
+- Compresión: gzip (o brotli si está instalado) para respuestas HTML/JSON
+  grandes, según Accept-Encoding
+
+El timestamp de una cotización se conserva al editarla, por eso el ETag
+individual incluye el digest del contenido y no solo el timestamp.
+
+Variables de entorno:
+    HTTP_CACHE_ENABLED          'false' desactiva ETags y compresión (default 'true')
+    HTTP_COMPRESION_MIN_BYTES   tamaño mínimo para comprimir (default 2048)
+    HTTP_GZIP_NIVEL             nivel de gzip 1-9 (default 6)
+    HTTP_BROTLI_NIVEL           calidad de brotli 0-11 (default 5)
+    FRAGMENTOS_CACHE_MAX        filas renderizadas en memoria (default 20000)
+    HTTP_CACHE_PDFS_TTL         segundos de validez del ETag cuando el listado
+                                incluye PDFs antiguos de Drive/Storage (default 300)
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, make_response, request, session
+from markupsafe import Markup
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+# Compañía legacy cuyo listado agrega los PDFs antiguos (Drive/Storage), que no
+# cambian el contador de generación
+CWS_COMPANY_ID = '5f6b07c9-3b9f-42ac-8ea0-e3ad9a4fe56b'
+
+TIPOS_COMPRIMIBLES = ('text/html', 'application/json', 'text/plain', 'text/csv')
+
+
+class CacheFragmentos:
+    """LRU en memoria de fragmentos HTML, seguro entre threads"""
+
+    def __init__(self, maximo: int = 20000):
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+    def obtener_estado(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'maximo': self.maximo,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0,
+            }
+
+
+class CacheHTTP:
+    """Configuración y contadores de la caché HTTP de la app"""
+
+    def __init__(self, version_app: str):
+        self.activo = os.getenv('HTTP_CACHE_ENABLED', 'true').lower() == 'true'
+        self.version_app = version_app
+        self.min_bytes = int(os.getenv('HTTP_COMPRESION_MIN_BYTES', '2048'))
+        self.nivel_gzip = int(os.getenv('HTTP_GZIP_NIVEL', '6'))
+        self.nivel_brotli = int(os.getenv('HTTP_BROTLI_NIVEL', '5'))
+        self.ttl_pdfs = max(1, int(os.getenv('HTTP_CACHE_PDFS_TTL', '300')))
+        self.fragmentos = CacheFragmentos(int(os.getenv('FRAGMENTOS_CACHE_MAX', '20000')))
+        self._lock = threading.Lock()
+        self.no_modificadas = 0
+        self.comprimidas = {'gzip': 0, 'br': 0}
+        self.bytes_ahorrados = 0
+
+    def contar_304(self):
+        with self._lock:
+            self.no_modificadas += 1
+
+    def contar_compresion(self, codificacion: str, ahorro: int):
+        with self._lock:
+            self.comprimidas[codificacion] += 1
+            self.bytes_ahorrados += ahorro
+
+    def obtener_estado(self) -> dict:
+        with self._lock:
+            estado = {
+                'activo': self.activo,
+                'version_app': self.version_app,
+                'brotli_disponible': BROTLI_AVAILABLE,
+                'respuestas_304': self.no_modificadas,
+                'comprimidas': dict(self.comprimidas),
+                'bytes_ahorrados': self.bytes_ahorrados,
+            }
+        estado['fragmentos'] = self.fragmentos.obtener_estado()
+        return estado
+
+
+# ──────────────────────────────────────────────────────────
+# ETAGS
+# ──────────────────────────────────────────────────────────
+
+def calcular_version_app(carpeta_plantillas: str) -> str:
+    """Commit desplegado (Render) o huella de mtimes de plantillas y app.py"""
+    commit = os.getenv('RENDER_GIT_COMMIT')
+    if commit:
+        return commit[:12]
+    huella = hashlib.blake2b(digest_size=6)
+    rutas = [os.path.join(os.path.dirname(carpeta_plantillas), 'app.py')]
+    for carpeta, _, archivos in os.walk(carpeta_plantillas):
+        rutas.extend(os.path.join(carpeta, a) for a in archivos)
+    for ruta in sorted(rutas):
+        try:
+            huella.update(f'{ruta}:{os.stat(ruta).st_mtime_ns};'.encode())
+        except OSError:
+            pass
+    return huella.hexdigest()
+
+
+def _cache():
+    cache = current_app.extensions.get('http_cache')
+    return cache if cache is not None and cache.activo else None
+
+
+def _etag(cache, *partes) -> str:
+    base = '|'.join(str(p) for p in (cache.version_app, session.get('user_id'), session.get('user_name'),
+                                     request.full_path) + partes)
+    return hashlib.blake2b(base.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def etag_listado(db_manager, company_id=None):
+    """
+    ETag del listado de la compañía para la URL actual (filtros y página
+    incluidos). None si la caché está apagada o la capa de datos no da una
+    generación confiable.
+    """
+    cache = _cache()
+    if cache is None or not db_manager:
+        return None
+    generacion = db_manager.obtener_generacion_datos(company_id)
+    if generacion is None:
+        return None
+    # Los PDFs antiguos no mueven la generación: el ETag caduca por tiempo
+    ventana = int(time.time() // cache.ttl_pdfs) if company_id == CWS_COMPANY_ID else 0
+    return _etag(cache, 'listado', company_id, generacion, ventana)
+
+
+def etag_cotizacion(cotizacion):
+    """ETag de una cotización: timestamp + digest (las ediciones conservan el timestamp)"""
+    cache = _cache()
+    if cache is None or not isinstance(cotizacion, dict):
+        return None
+    digest = hashlib.blake2b(json.dumps(cotizacion, sort_keys=True, default=str).encode('utf-8'),
+                             digest_size=12).hexdigest()
+    return _etag(cache, 'cotizacion', session.get('company_id'), cotizacion.get('timestamp'), digest)
+
+
+def no_modificada(etag) -> bool:
+    """True si el cliente ya tiene esta versión (If-None-Match)"""
+    return bool(etag) and request.if_none_match.contains_weak(etag)
+
+
+def respuesta_no_modificada(etag):
+    """304 con los mismos encabezados de caché que la respuesta completa"""
+    current_app.extensions['http_cache'].contar_304()
+    return con_etag(current_app.response_class(status=304), etag)
+
+
+def con_etag(respuesta, etag):
+    """Agrega ETag débil y Cache-Control privado (revalidar siempre) a la respuesta"""
+    respuesta = make_response(respuesta)
+    if etag:
+        respuesta.set_etag(etag, weak=True)
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        respuesta.vary.add('Cookie')
+    return respuesta
+
+
+# ──────────────────────────────────────────────────────────
+# FRAGMENTOS
+# ──────────────────────────────────────────────────────────
+
+def fila_cotizacion(plantilla: str, cotizacion: dict) -> Markup:
+    """
+    Fila renderizada de un listado. La llave es el contenido completo de la
+    fila, así que una versión nueva de la cotización nunca reutiliza HTML viejo.
+    """
+    app = current_app._get_current_object()
+    cache = app.extensions.get('http_cache')
+    fragmentos = cache.fragmentos if cache is not None and cache.activo else None
+    clave = None
+    if fragmentos is not None:
+        try:
+            clave = (plantilla, tuple(cotizacion.items()))
+            hash(clave)
+        except TypeError:
+            clave = None
+    if clave is not None:
+        html = fragmentos.obtener(clave)
+        if html is not None:
+            return html
+    html = Markup(app.jinja_env.get_template(plantilla).render(cot=cotizacion))
+    if clave is not None:
+        fragmentos.guardar(clave, html)
+    return html
+
+
+# ──────────────────────────────────────────────────────────
+# COMPRESIÓN
+# ──────────────────────────────────────────────────────────
+
+def comprimir_respuesta(cache, response):
+    """gzip/brotli en sitio si la respuesta es texto grande y el cliente lo acepta"""
+    if (response.status_code != 200 or request.method == 'HEAD' or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in TIPOS_COMPRIMIBLES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    cuerpo = response.get_data()
+    if len(cuerpo) < cache.min_bytes:
+        return response
+
+    aceptadas = request.accept_encodings
+    if BROTLI_AVAILABLE and aceptadas['br']:
+        codificacion, comprimido = 'br', brotli.compress(cuerpo, quality=cache.nivel_brotli)
+    elif aceptadas['gzip']:
+        codificacion, comprimido = 'gzip', gzip.compress(cuerpo, compresslevel=cache.nivel_gzip)
+    else:
+        return response
+
+    response.set_data(comprimido)
+    response.headers['Content-Encoding'] = codificacion
+    # Un ETag fuerte identifica bytes exactos: tras comprimir solo vale como débil
+    etag, debil = response.get_etag()
+    if etag and not debil:
+        response.set_etag(etag, weak=True)
+    cache.contar_compresion(codificacion, len(cuerpo) - len(comprimido))
+    return response
+
+
+# ──────────────────────────────────────────────────────────
+# REGISTRO EN LA APP
+# ──────────────────────────────────────────────────────────
+
+def init_http_cache(app):
+    """
+    Registra la caché HTTP en la app. Debe llamarse después de
+    init_instrumentation para que la compresión quede dentro del tiempo medido.
+
+    Returns:
+        CacheHTTP (también en app.extensions['http_cache'])
+    """
+    cache = CacheHTTP(calcular_version_app(os.path.join(app.root_path, app.template_folder)))
+    app.extensions['http_cache'] = cache
+    # La plantilla de filas se usa aunque la caché esté apagada
+    app.jinja_env.globals['fila_cotizacion'] = fila_cotizacion
+
+    if cache.activo:
+        @app.after_request
+        def comprimir(response):
+            return comprimir_respuesta(cache, response)
+
+    return cache
@@ -0,0 +1,334 @@
+"""
+Instrumentación de latencia por request para CWS Cotizador.
+
+- before_request / after_request miden cada request y lo acumulan en un
+  histograma por (método, ruta) con buckets fijos, más conteo por status
+- Sub-spans por componente dentro del request: db (SupabaseManager),
+  storage (PDFManager, Supabase Storage, Google Drive) y pdf (generación).
+  Cada componente mide solo su llamada más externa, así que las llamadas
+  anidadas del mismo componente no se cuentan dos veces
+- Exposición: /admin/metrics (texto Prometheus) y /admin/metrics/resumen (JSON
+  con p50/p95/p99 estimados de los buckets)
+- Header Server-Timing en cada respuesta (visible en DevTools)
+
+Costo por request: dos perf_counter, un bisect y un lock; los spans agregan
+una lectura de flask.g por llamada instrumentada.
+
+Variables de entorno:
+    METRICS_ENABLED   'false' desactiva la instrumentación (default 'true')
+    METRICS_TOKEN     /admin/metrics* acepta ?token= o Authorization: Bearer con este
+                      valor (para el scraper); sin token válido exige sesión iniciada
+"""
+
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, g, has_request_context, jsonify, request, session
+
+from cotizador.services import ServicioPerezoso
+
+# Límites superiores (segundos) de los buckets, estilo Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COMPONENTES = ('db', 'storage', 'pdf')
+
+
+class Histograma:
+    """Histograma de latencias con buckets fijos (no acumulativos en memoria)"""
+
+    __slots__ = ('conteos', 'suma', 'total', 'maximo')
+
+    def __init__(self):
+        self.conteos = [0] * (len(BUCKETS) + 1)  # último = +Inf
+        self.suma = 0.0
+        self.total = 0
+        self.maximo = 0.0
+
+    def observar(self, segundos: float):
+        self.conteos[bisect_left(BUCKETS, segundos)] += 1
+        self.suma += segundos
+        self.total += 1
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, p: float) -> float:
+        """Estimación por interpolación lineal dentro del bucket"""
+        if not self.total:
+            return 0.0
+        objetivo = p * self.total
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            if acumulado + conteo >= objetivo and conteo:
+                if i == len(BUCKETS):
+                    return self.maximo
+                inferior = BUCKETS[i - 1] if i else 0.0
+                superior = min(BUCKETS[i], self.maximo)
+                return inferior + (superior - inferior) * (objetivo - acumulado) / conteo
+            acumulado += conteo
+        return self.maximo
+
+
+class MetricasApp:
+    """Registro en memoria de latencias por ruta, status y componentes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.desde = time.time()
+            self._requests = {}   # (metodo, ruta) → Histograma
+            self._status = {}     # (metodo, ruta, status) → conteo
+            self._spans = {}      # (componente, ruta) → Histograma
+
+    def observar_request(self, metodo: str, ruta: str, status: int, duracion: float, spans: dict = None):
+        with self._lock:
+            clave = (metodo, ruta)
+            histograma = self._requests.get(clave)
+            if histograma is None:
+                histograma = self._requests[clave] = Histograma()
+            histograma.observar(duracion)
+
+            clave_status = (metodo, ruta, status)
+            self._status[clave_status] = self._status.get(clave_status, 0) + 1
+
+            for componente, segundos in (spans or {}).items():
+                clave_span = (componente, ruta)
+                histograma = self._spans.get(clave_span)
+                if histograma is None:
+                    histograma = self._spans[clave_span] = Histograma()
+                histograma.observar(segundos)
+
+    # ──────────────────────────────────────────────────────────
+    # EXPOSICIÓN
+    # ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _etiquetas(**etiquetas) -> str:
+        pares = ','.join(
+            f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+            for k, v in etiquetas.items()
+        )
+        return '{' + pares + '}'
+
+    def _lineas_histograma(self, nombre: str, histograma: Histograma, **etiquetas):
+        acumulado = 0
+        for limite, conteo in zip(BUCKETS, histograma.conteos):
+            acumulado += conteo
+            yield f'{nombre}_bucket{self._etiquetas(**etiquetas, le=limite)} {acumulado}'
+        yield f'{nombre}_bucket{self._etiquetas(**etiquetas, le="+Inf")} {histograma.total}'
+        yield f'{nombre}_sum{self._etiquetas(**etiquetas)} {histograma.suma:.6f}'
+        yield f'{nombre}_count{self._etiquetas(**etiquetas)} {histograma.total}'
+
+    def exportar_prometheus(self) -> str:
+        """Formato de exposición de texto de Prometheus (0.0.4)"""
+        with self._lock:
+            requests_ = sorted(self._requests.items())
+            status = sorted(self._status.items())
+            spans = sorted(self._spans.items())
+
+        lineas = [
+            '# HELP cotizador_request_duration_seconds Latencia de requests por ruta',
+            '# TYPE cotizador_request_duration_seconds histogram',
+        ]
+        for (metodo, ruta), histograma in requests_:
+            lineas.extend(self._lineas_histograma('cotizador_request_duration_seconds', histograma,
+                                                  method=metodo, route=ruta))
+
+        lineas += ['# HELP cotizador_requests_total Requests por ruta y status',
+                   '# TYPE cotizador_requests_total counter']
+        for (metodo, ruta, codigo), conteo in status:
+            lineas.append(f'cotizador_requests_total{self._etiquetas(method=metodo, route=ruta, status=codigo)} {conteo}')
+
+        lineas += ['# HELP cotizador_span_duration_seconds Tiempo por componente (db, storage, pdf) dentro del request',
+                   '# TYPE cotizador_span_duration_seconds histogram']
+        for (componente, ruta), histograma in spans:
+            lineas.extend(self._lineas_histograma('cotizador_span_duration_seconds', histograma,
+                                                  component=componente, route=ruta))
+        return '\n'.join(lineas) + '\n'
+
+    def resumen(self) -> dict:
+        """Resumen JSON por ruta, ordenado por tiempo total consumido"""
+        with self._lock:
+            rutas = []
+            for (metodo, ruta), h in self._requests.items():
+                codigos = {str(c): n for (m, r, c), n in self._status.items() if m == metodo and r == ruta}
+                rutas.append({
+                    'metodo': metodo,
+                    'ruta': ruta,
+                    'requests': h.total,
+                    'status': codigos,
+                    'errores': sum(n for c, n in codigos.items() if c.startswith('5')),
+                    'total_ms': round(h.suma * 1000, 2),
+                    'promedio_ms': round(h.suma / h.total * 1000, 2),
+                    'p50_ms': round(h.percentil(0.50) * 1000, 2),
+                    'p95_ms': round(h.percentil(0.95) * 1000, 2),
+                    'p99_ms': round(h.percentil(0.99) * 1000, 2),
+                    'max_ms': round(h.maximo * 1000, 2),
+                    'spans': {
+                        componente: {
+                            'requests': hs.total,
+                            'promedio_ms': round(hs.suma / hs.total * 1000, 2),
+                            'p95_ms': round(hs.percentil(0.95) * 1000, 2),
+                        }
+                        for (componente, r), hs in self._spans.items() if r == ruta
+                    },
+                })
+            desde = self.desde
+
+        rutas.sort(key=lambda r: -r['total_ms'])
+        return {
+            'desde': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(desde)),
+            'segundos': round(time.time() - desde, 1),
+            'requests': sum(r['requests'] for r in rutas),
+            'rutas': rutas,
+        }
+
+
+# ──────────────────────────────────────────────────────────
+# SUB-SPANS POR COMPONENTE
+# ──────────────────────────────────────────────────────────
+
+def _cerrar_span(componente: str, inicio: float):
+    g._spans_activos.discard(componente)
+    spans = g.setdefault('_spans', {})
+    spans[componente] = spans.get(componente, 0.0) + time.perf_counter() - inicio
+
+
+@contextmanager
+def span(componente: str):
+    """Mide un bloque como parte del componente dado (solo dentro de un request)"""
+    if not has_request_context():
+        yield
+        return
+    activos = g.setdefault('_spans_activos', set())
+    if componente in activos:
+        yield
+        return
+    activos.add(componente)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _cerrar_span(componente, inicio)
+
+
+def medido(componente: str):
+    """Decorador: la función cuenta como span del componente"""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not has_request_context():
+                return funcion(*args, **kwargs)
+            activos = g.setdefault('_spans_activos', set())
+            if componente in activos:
+                return funcion(*args, **kwargs)
+            activos.add(componente)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                _cerrar_span(componente, inicio)
+        return envoltura
+    return decorador
+
+
+def instrumentar_objeto(objeto, componente: str):
+    """
+    Envuelve los métodos públicos de una instancia como spans del componente.
+    Los generadores se omiten (su trabajo ocurre al iterar, fuera de la llamada).
+    """
+    if objeto is None or getattr(objeto, '_instrumentado', False):
+        return objeto
+    for nombre, funcion in inspect.getmembers(type(objeto), inspect.isfunction):
+        if nombre.startswith('_') or inspect.isgeneratorfunction(funcion):
+            continue
+        setattr(objeto, nombre, medido(componente)(getattr(objeto, nombre)))
+    objeto._instrumentado = True
+    return objeto
+
+
+# ──────────────────────────────────────────────────────────
+# REGISTRO EN LA APP
+# ──────────────────────────────────────────────────────────
+
+def _autorizado() -> bool:
+    """METRICS_TOKEN válido o sesión iniciada (nunca públicas, aunque no haya token)"""
+    token = os.getenv('METRICS_TOKEN')
+    if token:
+        encabezado = request.headers.get('Authorization', '')
+        if request.args.get('token') == token or encabezado == f'Bearer {token}':
+            return True
+    return 'user_id' in session
+
+
+def init_instrumentation(app, db_manager=None, pdf_manager=None):
+    """
+    Registra la instrumentación en la app. Debe llamarse antes de
+    init_middleware para que el tiempo del middleware quede dentro del request.
+
+    Returns:
+        MetricasApp (también en app.extensions['metricas']) o None si está desactivada
+    """
+    if os.getenv('METRICS_ENABLED', 'true').lower() != 'true':
+        app.extensions['metricas'] = None
+        return None
+
+    metricas = MetricasApp()
+    app.extensions['metricas'] = metricas
+
+    def instrumentar_pdf_manager(pdf):
+        instrumentar_objeto(pdf, 'storage')
+        instrumentar_objeto(getattr(pdf, 'supabase_storage', None), 'storage')
+        instrumentar_objeto(getattr(pdf, 'drive_client', None), 'storage')
+
+    # Servicios perezosos: se instrumentan al construirse, sin forzar su creación
+    if isinstance(db_manager, ServicioPerezoso):
+        db_manager.al_crear(lambda db: instrumentar_objeto(db, 'db'))
+    else:
+        instrumentar_objeto(db_manager, 'db')
+    if isinstance(pdf_manager, ServicioPerezoso):
+        pdf_manager.al_crear(instrumentar_pdf_manager)
+    elif pdf_manager is not None:
+        instrumentar_pdf_manager(pdf_manager)
+
+    @app.before_request
+    def iniciar_medicion():
+        g._inicio_request = time.perf_counter()
+
+    @app.after_request
+    def registrar_medicion(response):
+        inicio = g.pop('_inicio_request', None)
+        if inicio is None:
+            return response
+        duracion = time.perf_counter() - inicio
+        spans = g.pop('_spans', None)
+        ruta = request.url_rule.rule if request.url_rule else '<sin_ruta>'
+        metricas.observar_request(request.method, ruta, response.status_code, duracion, spans)
+
+        tiempos = [f'app;dur={duracion * 1000:.1f}']
+        tiempos += [f'{c};dur={s * 1000:.1f}' for c, s in (spans or {}).items()]
+        response.headers['Server-Timing'] = ', '.join(tiempos)
+        return response
+
+    @app.route("/admin/metrics")
+    def admin_metrics():
+        """Métricas en formato de texto Prometheus"""
+        if not _autorizado():
+            return jsonify({"error": "No autorizado"}), 401
+        return Response(metricas.exportar_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    @app.route("/admin/metrics/resumen")
+    def admin_metrics_resumen():
+        """Resumen JSON de latencias por ruta"""
+        if not _autorizado():
+            return jsonify({"error": "No autorizado"}), 401
+        return jsonify(metricas.resumen())
+
+    return metricas
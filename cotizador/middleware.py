@@ -7,7 +7,7 @@ Antes de cada request:
 3. Carga los datos de la compañía en g.company para templates
 """
 
-from flask import g, session, redirect, url_for, request
+from flask import g, session, redirect, url_for, request, jsonify
 from functools import wraps
 
 
@@ -32,9 +32,13 @@ def init_middleware(app, supabase_manager):
             '/health',
             '/static/',
         ]
+        # Rutas con su propia autorización (token o sesión), por coincidencia exacta
+        rutas_exactas = {'/admin/metrics', '/admin/metrics/resumen'}
 
         # Saltar middleware para rutas públicas
         path = request.path.rstrip('/') or '/'
+        if path in rutas_exactas:
+            return
         for public in public_routes:
             if path.startswith(public.rstrip('/')):
                 return
@@ -184,6 +188,16 @@ def company_required(f):
     return decorated_function
 
 
+def company_api_required(f):
+    """Decorador para APIs JSON: sin compañía en la sesión responde 403 (nunca consulta sin filtrar)."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('company_id'):
+            return jsonify({"success": False, "error": "Se requiere una compañía"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 def role_required(role):
     """Decorador: requiere un rol específico (admin, manager, seller)."""
     def decorator(f):
@@ -15,6 +15,7 @@ from reportlab.lib.units import inch
 from reportlab.graphics.shapes import Drawing, Line as GraphicsLine
 from cotizador._compat import REPORTLAB_AVAILABLE
 from cotizador.utilities import wrap_description_text
+from cotizador.instrumentation import medido
 
 
 # ── Constantes de color corporativo (fallback si no hay branding de compañía) ──
@@ -46,6 +47,7 @@ DEFAULT_BRANDING = {
 }
 
 
+@medido('pdf')
 def generar_pdf_reportlab(datos_cotizacion, company_branding=None, texto_personalizado=None):
     """Genera PDF usando ReportLab con formato profesional.
 
@@ -634,6 +636,7 @@ def generar_pdf_reportlab(datos_cotizacion, company_branding=None, texto_persona
     return buffer.getvalue()
 
 
+@medido('pdf')
 def generar_desglose_pdf_reportlab(datos_cotizacion, company_branding=None):
     """Genera un PDF COMPACTO tipo lista/resumen del desglose — optimizado para compartir.
 
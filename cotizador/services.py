@@ -0,0 +1,280 @@
+"""
+Registro perezoso de servicios para CWS Cotizador.
+
+Importar app.py construía de forma síncrona SupabaseManager (conexión y
+listado de tablas), PDFManager (Drive, carpetas, Storage), el índice de PDFs,
+el cubo de ventas, el SyncScheduler, el keepalive y el catálogo de materiales,
+en cada worker de gunicorn y en cada cold start de Render. Con el registro:
+
+- create_app() solo registra fábricas; app.extensions guarda un
+  ServicioPerezoso que construye el servicio en su primer uso
+- Un hilo de calentamiento construye en segundo plano los servicios marcados,
+  en orden de registro, para que el primer request no pague el costo
+- Los hooks al_crear() corren al terminar la construcción y antes de liberar
+  el servicio a otros hilos (callbacks de cotización, instrumentación)
+- Los schedulers en segundo plano (sync, keepalive, indexación de PDFs,
+  backfill del cubo) solo arrancan en el proceso líder: el que obtiene el
+  candado de archivo. Los demás workers sirven requests sin schedulers
+- obtener_estado() reporta el costo de construcción de cada servicio
+
+Variables de entorno:
+    SERVICIOS_WARMUP        'false' desactiva el calentamiento en segundo plano (default 'true')
+    SCHEDULERS_ENABLED      'false' no arranca schedulers en ningún proceso (default 'true')
+    SCHEDULERS_LOCK_FILE    ruta del candado del proceso líder (default <tmp>/cws_cotizador_schedulers.lock)
+
+Benchmark de arranque:
+    python -m cotizador.services
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_LOCK_LIDER = threading.Lock()
+_lider = None
+_archivo_lider = None
+
+
+# ──────────────────────────────────────────────────────────
+# PROCESO LÍDER (schedulers en un solo proceso)
+# ──────────────────────────────────────────────────────────
+
+def _adquirir_candado(ruta: str):
+    """Devuelve el archivo con candado exclusivo, o None si otro proceso lo tiene"""
+    try:
+        import fcntl
+    except ImportError:
+        return True  # Windows: desarrollo con un solo proceso
+    archivo = open(ruta, 'a+')
+    try:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        archivo.close()
+        return None
+    archivo.seek(0)
+    archivo.truncate()
+    archivo.write(str(os.getpid()))
+    archivo.flush()
+    return archivo
+
+
+def es_proceso_lider() -> bool:
+    """True solo en el proceso que debe correr los schedulers (se decide una vez)"""
+    global _lider, _archivo_lider
+    with _LOCK_LIDER:
+        if _lider is None:
+            if os.getenv('SCHEDULERS_ENABLED', 'true').lower() != 'true':
+                _lider = False
+            else:
+                ruta = os.getenv('SCHEDULERS_LOCK_FILE') or os.path.join(
+                    tempfile.gettempdir(), 'cws_cotizador_schedulers.lock')
+                try:
+                    _archivo_lider = _adquirir_candado(ruta)
+                except OSError as e:
+                    logger.warning("[SERVICIOS] No se pudo abrir el candado %s: %s", ruta, e)
+                    _archivo_lider = True
+                _lider = _archivo_lider is not None
+            logger.info("[SERVICIOS] Proceso %s %s", os.getpid(),
+                        'LÍDER (schedulers activos)' if _lider else 'sin schedulers')
+        return _lider
+
+
+# ──────────────────────────────────────────────────────────
+# REGISTRO
+# ──────────────────────────────────────────────────────────
+
+class _Servicio:
+    __slots__ = ('nombre', 'fabrica', 'respaldo', 'calentar', 'hooks', 'lock',
+                 'listo', 'instancia', 'ms', 'error', 'hilo')
+
+    def __init__(self, nombre, fabrica, respaldo, calentar):
+        self.nombre = nombre
+        self.fabrica = fabrica
+        self.respaldo = respaldo
+        self.calentar = calentar
+        self.hooks = []
+        self.lock = threading.RLock()
+        self.listo = False
+        self.instancia = None
+        self.ms = None
+        self.error = None
+        self.hilo = None
+
+
+class ServicioPerezoso:
+    """Proxy de un servicio del registro: se construye al primer acceso"""
+
+    __slots__ = ('_registro', '_nombre')
+
+    def __init__(self, registro, nombre: str):
+        object.__setattr__(self, '_registro', registro)
+        object.__setattr__(self, '_nombre', nombre)
+
+    def _objetivo(self):
+        return self._registro.obtener(self._nombre)
+
+    def al_crear(self, hook):
+        self._registro.al_crear(self._nombre, hook)
+
+    @property
+    def inicializado(self) -> bool:
+        return self._registro.inicializado(self._nombre)
+
+    def __getattr__(self, nombre):
+        return getattr(self._objetivo(), nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._objetivo(), nombre, valor)
+
+    def __delattr__(self, nombre):
+        delattr(self._objetivo(), nombre)
+
+    def __bool__(self):
+        return bool(self._objetivo())
+
+    def __repr__(self):
+        if not self.inicializado:
+            return f'<ServicioPerezoso {self._nombre} (pendiente)>'
+        return repr(self._objetivo())
+
+
+class RegistroServicios:
+    """Fábricas de servicios con construcción única, perezosa y medida"""
+
+    def __init__(self):
+        self._servicios = {}
+        self._hilo_calentamiento = None
+
+    def registrar(self, nombre: str, fabrica, respaldo=None, calentar: bool = True) -> ServicioPerezoso:
+        """
+        Registra una fábrica sin ejecutarla.
+
+        Args:
+            fabrica: callable sin argumentos que construye el servicio
+            respaldo: callable usado si la fábrica falla (default: el servicio queda en None)
+            calentar: construirlo en el hilo de calentamiento
+        """
+        self._servicios[nombre] = _Servicio(nombre, fabrica, respaldo, calentar)
+        return ServicioPerezoso(self, nombre)
+
+    def al_crear(self, nombre: str, hook):
+        """hook(instancia) al construirse o reemplazarse el servicio (inmediato si ya existe)"""
+        servicio = self._servicios[nombre]
+        with servicio.lock:
+            servicio.hooks.append(hook)
+            if not servicio.listo:
+                return
+        self._ejecutar_hook(servicio, hook)
+
+    def reemplazar(self, nombre: str, instancia):
+        """Fija la instancia de un servicio sin ejecutar su fábrica (benchmarks, pruebas)"""
+        servicio = self._servicios[nombre]
+        with servicio.lock:
+            servicio.instancia = instancia
+            servicio.listo = True
+            servicio.error = None
+            servicio.ms = 0.0
+            servicio.hilo = threading.current_thread().name
+            hooks = list(servicio.hooks)
+        for hook in hooks:
+            self._ejecutar_hook(servicio, hook)
+
+    def inicializado(self, nombre: str) -> bool:
+        return self._servicios[nombre].listo
+
+    def obtener(self, nombre: str):
+        servicio = self._servicios[nombre]
+        if servicio.listo:
+            return servicio.instancia
+        with servicio.lock:
+            if servicio.listo:
+                return servicio.instancia
+            inicio = time.perf_counter()
+            try:
+                instancia = servicio.fabrica()
+            except Exception as e:
+                logger.error("[SERVICIOS] Error inicializando %s: %s", nombre, e)
+                servicio.error = str(e)
+                instancia = servicio.respaldo() if servicio.respaldo else None
+            servicio.ms = round((time.perf_counter() - inicio) * 1000, 2)
+            servicio.hilo = threading.current_thread().name
+            servicio.instancia = instancia
+            servicio.listo = True
+            logger.info("[SERVICIOS] %s inicializado en %.0f ms (%s)", nombre, servicio.ms, servicio.hilo)
+            for hook in servicio.hooks:
+                self._ejecutar_hook(servicio, hook)
+        return servicio.instancia
+
+    @staticmethod
+    def _ejecutar_hook(servicio, hook):
+        if servicio.instancia is None:
+            return
+        try:
+            hook(servicio.instancia)
+        except Exception as e:
+            logger.error("[SERVICIOS] Error en hook de %s: %s", servicio.nombre, e)
+
+    def calentar(self, nombres=None, en_segundo_plano: bool = True):
+        """Construye los servicios marcados (o los indicados) en orden de registro"""
+        pendientes = list(nombres) if nombres is not None else [
+            s.nombre for s in self._servicios.values() if s.calentar]
+
+        def ejecutar():
+            inicio = time.perf_counter()
+            for nombre in pendientes:
+                self.obtener(nombre)
+            logger.info("[SERVICIOS] Calentamiento completo en %.0f ms", (time.perf_counter() - inicio) * 1000)
+
+        if not en_segundo_plano:
+            ejecutar()
+            return None
+        self._hilo_calentamiento = threading.Thread(target=ejecutar, daemon=True, name="ServiciosWarmup")
+        self._hilo_calentamiento.start()
+        return self._hilo_calentamiento
+
+    def esperar_calentamiento(self, timeout: float = None) -> bool:
+        if self._hilo_calentamiento is not None:
+            self._hilo_calentamiento.join(timeout)
+            return not self._hilo_calentamiento.is_alive()
+        return True
+
+    def obtener_estado(self) -> dict:
+        return {
+            'lider': _lider,
+            'servicios': {
+                s.nombre: {
+                    'estado': ('error' if s.error else 'listo') if s.listo else 'pendiente',
+                    'ms': s.ms,
+                    'hilo': s.hilo,
+                    'error': s.error,
+                }
+                for s in self._servicios.values()
+            },
+        }
+
+
+def benchmark_arranque() -> dict:
+    """Costo de create_app() y de construir cada servicio, de forma secuencial"""
+    os.environ['SERVICIOS_WARMUP'] = 'false'
+    inicio = time.perf_counter()
+    from cotizador import create_app
+    app = create_app()
+    create_app_ms = (time.perf_counter() - inicio) * 1000
+
+    registro = app.extensions['servicios']
+    registro.calentar(en_segundo_plano=False)
+    servicios = {n: e['ms'] for n, e in registro.obtener_estado()['servicios'].items()}
+    return {
+        'create_app_ms': round(create_app_ms, 2),
+        'servicios_ms': servicios,
+        'total_servicios_ms': round(sum(ms or 0 for ms in servicios.values()), 2),
+    }
+
+
+if __name__ == '__main__':
+    print(json.dumps(benchmark_arranque(), indent=2, ensure_ascii=False))
@@ -4,6 +4,7 @@ Funciones auxiliares extraídas de app.py para ser usadas por los blueprints.
 """
 import json
 from flask import current_app
+from pricing_engine import leer_numero, subtotal_material
 
 
 def safe_float(value, default=0.0):
@@ -71,9 +72,9 @@ def validate_material_data(material, item_index=0, material_index=0):
         }
 
     descripcion = material.get('descripcion') or material.get('material', 'Sin descripción')
-    peso = safe_float(material.get('peso'), 1.0)
-    cantidad = safe_float(material.get('cantidad'), 0.0)
-    precio = safe_float(material.get('precio'), 0.0)
+    peso = leer_numero(material.get('peso'), 1.0)
+    cantidad = leer_numero(material.get('cantidad'), 0.0)
+    precio = leer_numero(material.get('precio'), 0.0)
 
     if peso < 0:
         peso = 0.0
@@ -84,7 +85,7 @@ def validate_material_data(material, item_index=0, material_index=0):
         print(f"[VALIDATE] Precio negativo detectado: {precio}, corrigiendo a 0")
         precio = 0.0
 
-    subtotal = round(peso * cantidad * precio, 2)
+    subtotal = subtotal_material(peso, cantidad, precio)
 
     return {
         'descripcion': descripcion,
@@ -160,5 +161,6 @@ def get_managers():
     db = current_app.extensions.get('db_manager')
     pdf = current_app.extensions.get('pdf_manager')
     sync = current_app.extensions.get('sync_scheduler')
-    materiales = current_app.config.get('LISTA_MATERIALES', [])
+    catalogo = current_app.extensions.get('catalogo_materiales')
+    materiales = catalogo.materiales if catalogo else current_app.config.get('LISTA_MATERIALES', [])
     return db, pdf, sync, materiales
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TRAZADO DE LLAMADAS A BASE DE DATOS Y LOG DE CONSULTAS LENTAS
+=============================================================
+
+SupabaseManager resuelve cada operación en una de tres capas (PostgreSQL
+directo, SDK REST, JSON offline). Este módulo mide cada llamada en la capa
+donde ocurre:
+
+- PostgreSQL: CursorTrazado (cursor_factory de la conexión) mide execute /
+  executemany; execute_values pasa por execute
+- SDK REST: trazar_cliente_sdk() envuelve el cliente de Supabase y mide cada
+  .execute() de table()/rpc()
+- Offline: SupabaseManager mide la carga/guardado del JSON con trazador.medir()
+
+Por cada llamada se registra capa, operación (SQL sin parámetros o
+"tabla.select"), duración, filas y la ruta Flask que la originó. Las que
+superan el umbral quedan en un buffer circular; una fracción de los SELECT
+lentos de PostgreSQL captura además su EXPLAIN (sin ANALYZE: no se re-ejecuta).
+
+Contención: cada capa cuenta las llamadas que empezaron mientras otra de la
+misma capa seguía en curso en el proceso ('solapadas') y el máximo de
+llamadas simultáneas. En PostgreSQL todas comparten pg_connection (psycopg2
+serializa los execute de una conexión); en offline, cargas y guardados
+simultáneos del JSON son lecturas-modificación-escritura sin candado.
+
+Variables de entorno:
+    DB_SLOW_QUERY_MS         umbral de consulta lenta (default 200)
+    DB_SLOW_QUERY_BUFFER     capacidad del buffer circular (default 200)
+    DB_EXPLAIN_SAMPLE_RATE   fracción de SELECT lentos con EXPLAIN (default 0.1)
+"""
+
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+CAPAS = ('postgresql', 'sdk', 'offline')
+MAX_TEXTO_SQL = 1000
+_ESPACIOS = re.compile(r'\s+')
+
+
+def ruta_actual() -> str:
+    """Ruta Flask que origina la llamada (o el hilo, fuera de un request)"""
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            regla = request.url_rule.rule if request.url_rule else request.path
+            return f"{request.method} {regla}"
+    except Exception:
+        pass
+    return f"hilo:{threading.current_thread().name}"
+
+
+class _Operacion:
+    """Registro mutable dentro de trazador.medir(): el llamador fija las filas"""
+
+    __slots__ = ('filas',)
+
+    def __init__(self):
+        self.filas = None
+
+
+class TrazadorDB:
+    """Contadores por capa y buffer circular de consultas lentas"""
+
+    def __init__(self, umbral_ms: float = None, capacidad: int = None, muestreo_explain: float = None):
+        self.umbral_ms = umbral_ms if umbral_ms is not None else float(os.getenv('DB_SLOW_QUERY_MS', 200))
+        self.muestreo_explain = (muestreo_explain if muestreo_explain is not None
+                                 else float(os.getenv('DB_EXPLAIN_SAMPLE_RATE', 0.1)))
+        self.lentas = deque(maxlen=capacidad or int(os.getenv('DB_SLOW_QUERY_BUFFER', 200)))
+        self._lock = threading.Lock()
+        self._capas = {}
+        self._en_curso = {}
+
+    def _contadores(self, capa: str) -> Dict:
+        contadores = self._capas.get(capa)
+        if contadores is None:
+            contadores = self._capas[capa] = {'llamadas': 0, 'total_ms': 0.0, 'filas': 0, 'lentas': 0,
+                                              'errores': 0, 'max_ms': 0.0, 'solapadas': 0,
+                                              'max_concurrentes': 0}
+        return contadores
+
+    def entrar(self, capa: str):
+        """Marca el inicio de una llamada (contención); cada entrar() lleva su salir()"""
+        with self._lock:
+            activas = self._en_curso.get(capa, 0) + 1
+            self._en_curso[capa] = activas
+            contadores = self._contadores(capa)
+            if activas > 1:
+                contadores['solapadas'] += 1
+            contadores['max_concurrentes'] = max(contadores['max_concurrentes'], activas)
+
+    def salir(self, capa: str):
+        with self._lock:
+            self._en_curso[capa] = max(0, self._en_curso.get(capa, 0) - 1)
+
+    def registrar(self, capa: str, operacion: str, duracion: float, filas: int = None,
+                  error: Exception = None) -> Optional[Dict]:
+        """
+        Registra una llamada. Devuelve la entrada del buffer si fue lenta
+        (el llamador puede completarla, p. ej. con el EXPLAIN).
+        """
+        ms = duracion * 1000
+        lenta = ms >= self.umbral_ms
+        with self._lock:
+            contadores = self._contadores(capa)
+            contadores['llamadas'] += 1
+            contadores['total_ms'] += ms
+            contadores['filas'] += filas or 0
+            contadores['max_ms'] = max(contadores['max_ms'], ms)
+            if error is not None:
+                contadores['errores'] += 1
+            if not lenta:
+                return None
+            contadores['lentas'] += 1
+
+        entrada = {
+            'fecha': datetime.now().isoformat(timespec='milliseconds'),
+            'capa': capa,
+            'operacion': operacion,
+            'duracion_ms': round(ms, 2),
+            'filas': filas,
+            'ruta': ruta_actual(),
+            'error': str(error)[:300] if error is not None else None,
+        }
+        self.lentas.append(entrada)
+        return entrada
+
+    @contextmanager
+    def medir(self, capa: str, operacion: str):
+        """Mide un bloque; el llamador puede fijar .filas en el objeto devuelto"""
+        registro = _Operacion()
+        self.entrar(capa)
+        inicio = time.perf_counter()
+        error = None
+        try:
+            yield registro
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.salir(capa)
+            self.registrar(capa, operacion, duracion, registro.filas, error)
+
+    def configurar(self, umbral_ms: float = None, muestreo_explain: float = None):
+        if umbral_ms is not None:
+            self.umbral_ms = max(0.0, float(umbral_ms))
+        if muestreo_explain is not None:
+            self.muestreo_explain = min(1.0, max(0.0, float(muestreo_explain)))
+
+    def limpiar(self):
+        with self._lock:
+            self._capas = {}
+            self.lentas.clear()
+
+    def obtener_estado(self, limite: int = 50) -> Dict:
+        with self._lock:
+            capas = {}
+            for capa, c in self._capas.items():
+                capas[capa] = {**c, 'total_ms': round(c['total_ms'], 2), 'max_ms': round(c['max_ms'], 2),
+                               'promedio_ms': round(c['total_ms'] / c['llamadas'], 2) if c['llamadas'] else 0.0}
+            lentas = list(self.lentas)
+        return {
+            'umbral_ms': self.umbral_ms,
+            'muestreo_explain': self.muestreo_explain,
+            'capacidad': self.lentas.maxlen,
+            'capas': capas,
+            'lentas': lentas[::-1][:limite],  # más reciente primero
+        }
+
+
+trazador = TrazadorDB()
+
+
+# ──────────────────────────────────────────────────────────
+# POSTGRESQL
+# ──────────────────────────────────────────────────────────
+
+def _texto_sql(cursor, query) -> str:
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    elif not isinstance(query, str):
+        try:
+            query = query.as_string(cursor)
+        except Exception:
+            query = str(query)
+    return _ESPACIOS.sub(' ', query).strip()[:MAX_TEXTO_SQL]
+
+
+def _capturar_explain(cursor, query, params) -> Optional[list]:
+    """EXPLAIN (FORMAT JSON) del statement ya ejecutado, aislado en un savepoint"""
+    conexion = cursor.connection
+    auxiliar = conexion.cursor(cursor_factory=psycopg2.extensions.cursor)
+    try:
+        sql = cursor.mogrify(query, params).decode('utf-8', 'replace')
+        if conexion.autocommit:
+            auxiliar.execute("EXPLAIN (FORMAT JSON) " + sql)
+            return auxiliar.fetchone()[0]
+        auxiliar.execute("SAVEPOINT traza_explain")
+        try:
+            auxiliar.execute("EXPLAIN (FORMAT JSON) " + sql)
+            plan = auxiliar.fetchone()[0]
+            auxiliar.execute("RELEASE SAVEPOINT traza_explain")
+            return plan
+        except Exception:
+            auxiliar.execute("ROLLBACK TO SAVEPOINT traza_explain")
+            return None
+    except Exception:
+        return None
+    finally:
+        auxiliar.close()
+
+
+class CursorTrazado(RealDictCursor):
+    """RealDictCursor que registra cada execute en el trazador"""
+
+    def _medir(self, metodo, query, params):
+        trazador.entrar('postgresql')
+        inicio = time.perf_counter()
+        error = None
+        try:
+            return metodo(query, params)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            trazador.salir('postgresql')
+            texto = _texto_sql(self, query)
+            entrada = trazador.registrar('postgresql', texto, duracion,
+                                         self.rowcount if error is None and self.rowcount >= 0 else None, error)
+            if (entrada is not None and error is None and metodo.__name__ == 'execute' and self.name is None
+                    and texto[:6].upper() in ('SELECT', 'WITH ') and random.random() < trazador.muestreo_explain):
+                entrada['explain'] = _capturar_explain(self, query, params)
+
+    def execute(self, query, vars=None):
+        return self._medir(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._medir(super().executemany, query, vars_list)
+
+
+# ──────────────────────────────────────────────────────────
+# SDK REST
+# ──────────────────────────────────────────────────────────
+
+_OPERACIONES_SDK = ('select', 'insert', 'update', 'upsert', 'delete')
+
+
+class _ConsultaSDK:
+    """Proxy de un query builder de postgrest que mide su .execute()"""
+
+    __slots__ = ('_objetivo', '_operacion')
+
+    def __init__(self, objetivo, operacion: str):
+        self._objetivo = objetivo
+        self._operacion = operacion
+
+    def _envolver(self, resultado, nombre: str):
+        if hasattr(resultado, 'execute'):
+            operacion = f"{self._operacion}.{nombre}" if nombre in _OPERACIONES_SDK else self._operacion
+            return _ConsultaSDK(resultado, operacion)
+        return resultado
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._objetivo, nombre)
+        if nombre == 'execute':
+            def ejecutar(*args, **kwargs):
+                with trazador.medir('sdk', self._operacion) as registro:
+                    respuesta = atributo(*args, **kwargs)
+                    datos = getattr(respuesta, 'data', None)
+                    registro.filas = len(datos) if isinstance(datos, list) else int(datos is not None)
+                    return respuesta
+            return ejecutar
+        if not callable(atributo):
+            return self._envolver(atributo, nombre)
+
+        def encadenar(*args, **kwargs):
+            return self._envolver(atributo(*args, **kwargs), nombre)
+        return encadenar
+
+
+class ClienteSDKTrazado:
+    """Envoltura del cliente de Supabase: table()/rpc() devuelven builders trazados"""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def table(self, nombre: str):
+        return _ConsultaSDK(self._cliente.table(nombre), nombre)
+
+    from_ = table
+
+    def rpc(self, funcion: str, params: Dict = None, *args, **kwargs):
+        return _ConsultaSDK(self._cliente.rpc(funcion, params or {}, *args, **kwargs), f"rpc:{funcion}")
+
+    def __getattr__(self, nombre):
+        return getattr(self._cliente, nombre)
+
+
+def trazar_cliente_sdk(cliente):
+    if cliente is None or isinstance(cliente, ClienteSDKTrazado):
+        return cliente
+    return ClienteSDKTrazado(cliente)
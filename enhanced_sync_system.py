@@ -24,6 +24,8 @@ from enum import Enum
 from pathlib import Path
 import logging
 
+from state_journal import DiarioEstado
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
@@ -112,9 +114,10 @@ class EnhancedSyncSystem:
         self.is_monitoring_drive = False
         
         # Archivos de persistencia
-        self.queue_file = Path("sync_queue.json")
-        self.conflicts_file = Path("sync_conflicts.json")
+        self.queue_file = Path("sync_queue.json")           # formato anterior (se migra una vez)
+        self.conflicts_file = Path("sync_conflicts.json")   # formato anterior (se migra una vez)
         self.sync_log_file = Path("sync_operations.log")
+        self.diario = DiarioEstado(os.getenv('SYNC_STATE_JOURNAL', 'sync_state.journal'))
         
         # Configuración
         self.config = {
@@ -176,6 +179,7 @@ class EnhancedSyncSystem:
         
         # Guardar estado
         self._save_persistent_state()
+        self.diario.sincronizar()
         
         logger.info("✅ [SYNC] Sistema detenido correctamente")
     
@@ -633,102 +637,105 @@ class EnhancedSyncSystem:
         return hashlib.md5(stable_string.encode()).hexdigest()
     
     def _load_persistent_state(self):
-        """Cargar estado persistente desde archivos"""
+        """Cargar estado persistente desde el diario"""
         try:
+            if not self.diario.existia:
+                self._migrar_estado_json()
+            
             # Cargar cola de sincronización
-            if self.queue_file.exists():
-                with open(self.queue_file, 'r', encoding='utf-8') as f:
-                    queue_data = json.load(f)
-                
-                self.sync_queue = []
-                for op_data in queue_data:
-                    operation = SyncOperation(
-                        id=op_data['id'],
-                        source=op_data['source'],
-                        target=op_data['target'],
-                        operation_type=op_data['operation_type'],
-                        data=op_data['data'],
-                        checksum=op_data['checksum'],
-                        priority=op_data.get('priority', 5),
-                        created_at=datetime.fromisoformat(op_data['created_at']),
-                        updated_at=datetime.fromisoformat(op_data['updated_at']),
-                        status=SyncStatus(op_data.get('status', 'pending')),
-                        retry_count=op_data.get('retry_count', 0),
-                        max_retries=op_data.get('max_retries', 3),
-                        error_message=op_data.get('error_message')
-                    )
-                    self.sync_queue.append(operation)
-                
+            self.sync_queue = []
+            for _, op_data in self.diario.items('op:'):
+                operation = SyncOperation(
+                    id=op_data['id'],
+                    source=op_data['source'],
+                    target=op_data['target'],
+                    operation_type=op_data['operation_type'],
+                    data=op_data['data'],
+                    checksum=op_data['checksum'],
+                    priority=op_data.get('priority', 5),
+                    created_at=datetime.fromisoformat(op_data['created_at']),
+                    updated_at=datetime.fromisoformat(op_data['updated_at']),
+                    status=SyncStatus(op_data.get('status', 'pending')),
+                    retry_count=op_data.get('retry_count', 0),
+                    max_retries=op_data.get('max_retries', 3),
+                    error_message=op_data.get('error_message')
+                )
+                self.sync_queue.append(operation)
+            self.sync_queue.sort(key=lambda x: (x.priority, x.created_at))
+            
+            if self.sync_queue:
                 logger.info(f"📂 [PERSISTENT] {len(self.sync_queue)} operaciones cargadas")
             
             # Cargar conflictos
-            if self.conflicts_file.exists():
-                with open(self.conflicts_file, 'r', encoding='utf-8') as f:
-                    conflicts_data = json.load(f)
-                
-                self.conflict_queue = []
-                for conf_data in conflicts_data:
-                    conflict = SyncConflict(
-                        id=conf_data['id'],
-                        operation_id=conf_data['operation_id'],
-                        source_data=conf_data['source_data'],
-                        target_data=conf_data['target_data'],
-                        conflict_fields=conf_data['conflict_fields'],
-                        resolution_strategy=ConflictResolution(conf_data['resolution_strategy']),
-                        resolved=conf_data.get('resolved', False),
-                        resolution_data=conf_data.get('resolution_data'),
-                        created_at=datetime.fromisoformat(conf_data['created_at'])
-                    )
-                    self.conflict_queue.append(conflict)
-                
+            self.conflict_queue = []
+            for _, conf_data in self.diario.items('conflicto:'):
+                conflict = SyncConflict(
+                    id=conf_data['id'],
+                    operation_id=conf_data['operation_id'],
+                    source_data=conf_data['source_data'],
+                    target_data=conf_data['target_data'],
+                    conflict_fields=conf_data['conflict_fields'],
+                    resolution_strategy=ConflictResolution(conf_data['resolution_strategy']),
+                    resolved=conf_data.get('resolved', False),
+                    resolution_data=conf_data.get('resolution_data'),
+                    created_at=datetime.fromisoformat(conf_data['created_at'])
+                )
+                self.conflict_queue.append(conflict)
+            
+            if self.conflict_queue:
                 logger.info(f"⚠️ [PERSISTENT] {len(self.conflict_queue)} conflictos cargados")
                 
         except Exception as e:
             logger.error(f"❌ [PERSISTENT] Error cargando estado: {e}")
     
+    def _migrar_estado_json(self):
+        """Migración única desde sync_queue.json / sync_conflicts.json (se reescribían completos)"""
+        if self.queue_file.exists():
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                self.diario.reemplazar({f"op:{op['id']}": op for op in json.load(f)}, prefijo='op:')
+        if self.conflicts_file.exists():
+            with open(self.conflicts_file, 'r', encoding='utf-8') as f:
+                self.diario.reemplazar({f"conflicto:{c['id']}": c for c in json.load(f)}, prefijo='conflicto:')
+    
+    @staticmethod
+    def _serializar_operacion(operation: SyncOperation) -> Dict:
+        return {
+            'id': operation.id,
+            'source': operation.source,
+            'target': operation.target,
+            'operation_type': operation.operation_type,
+            'data': operation.data,
+            'checksum': operation.checksum,
+            'priority': operation.priority,
+            'created_at': operation.created_at.isoformat(),
+            'updated_at': operation.updated_at.isoformat(),
+            'status': operation.status.value,
+            'retry_count': operation.retry_count,
+            'max_retries': operation.max_retries,
+            'error_message': operation.error_message
+        }
+    
+    @staticmethod
+    def _serializar_conflicto(conflict: SyncConflict) -> Dict:
+        return {
+            'id': conflict.id,
+            'operation_id': conflict.operation_id,
+            'source_data': conflict.source_data,
+            'target_data': conflict.target_data,
+            'conflict_fields': conflict.conflict_fields,
+            'resolution_strategy': conflict.resolution_strategy.value,
+            'resolved': conflict.resolved,
+            'resolution_data': conflict.resolution_data,
+            'created_at': conflict.created_at.isoformat()
+        }
+    
     def _save_persistent_state(self):
-        """Guardar estado persistente en archivos"""
+        """Guardar estado persistente: el diario solo recibe lo que cambió"""
         try:
-            # Guardar cola de sincronización
-            queue_data = []
-            for operation in self.sync_queue:
-                queue_data.append({
-                    'id': operation.id,
-                    'source': operation.source,
-                    'target': operation.target,
-                    'operation_type': operation.operation_type,
-                    'data': operation.data,
-                    'checksum': operation.checksum,
-                    'priority': operation.priority,
-                    'created_at': operation.created_at.isoformat(),
-                    'updated_at': operation.updated_at.isoformat(),
-                    'status': operation.status.value,
-                    'retry_count': operation.retry_count,
-                    'max_retries': operation.max_retries,
-                    'error_message': operation.error_message
-                })
-            
-            with open(self.queue_file, 'w', encoding='utf-8') as f:
-                json.dump(queue_data, f, ensure_ascii=False, indent=2)
-            
-            # Guardar conflictos
-            conflicts_data = []
-            for conflict in self.conflict_queue:
-                conflicts_data.append({
-                    'id': conflict.id,
-                    'operation_id': conflict.operation_id,
-                    'source_data': conflict.source_data,
-                    'target_data': conflict.target_data,
-                    'conflict_fields': conflict.conflict_fields,
-                    'resolution_strategy': conflict.resolution_strategy.value,
-                    'resolved': conflict.resolved,
-                    'resolution_data': conflict.resolution_data,
-                    'created_at': conflict.created_at.isoformat()
-                })
-            
-            with open(self.conflicts_file, 'w', encoding='utf-8') as f:
-                json.dump(conflicts_data, f, ensure_ascii=False, indent=2)
-                
+            self.diario.reemplazar({f"op:{op.id}": self._serializar_operacion(op) for op in self.sync_queue},
+                                   prefijo='op:')
+            self.diario.reemplazar({f"conflicto:{c.id}": self._serializar_conflicto(c) for c in self.conflict_queue},
+                                   prefijo='conflicto:')
         except Exception as e:
             logger.error(f"❌ [PERSISTENT] Error guardando estado: {e}")
     
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AUDITORÍA FINANCIERA MASIVA
+===========================
+
+Recalcula costoUnidad/total de todas las partidas guardadas con el motor de
+precios (pricing_engine.LoteItems) y reporta las que no coinciden con lo
+almacenado. Las cotizaciones se leen en streaming con
+SupabaseManager.iterar_cotizaciones() y se evalúan por lotes, así que la
+memoria no depende del número de cotizaciones: el reporte solo guarda
+contadores agregados y las N peores discrepancias (heap acotado).
+
+Solo se auditan partidas estructuradas; las partidas legacy conservan su
+total guardado por diseño y no generan discrepancias. Las comparaciones se
+hacen en centavos enteros (valores redondeados ROUND_HALF_UP), así una
+diferencia igual a la tolerancia no se reporta por ruido de punto flotante.
+
+Reparación opcional (--reparar): las cotizaciones con discrepancias se
+corrigen con aplicar_a_items() y se escriben por lotes con
+SupabaseManager.actualizar_items_lote().
+
+Uso CLI:
+    python financial_audit.py
+    python financial_audit.py --company-id <uuid> --desde 2025-01-01 --json
+    python financial_audit.py --reparar --tolerancia 0.01
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from pricing_engine import LoteItems, aplicar_a_items, convertir_numero, redondear
+
+logger = logging.getLogger(__name__)
+
+TOLERANCIA_DEFAULT = 0.01
+TAMANO_LOTE = 1000
+MAX_PEORES = 50
+
+# Rangos de magnitud de la diferencia absoluta en total (límite superior, etiqueta)
+RANGOS_MAGNITUD = (
+    (1.0, '<1'),
+    (100.0, '1-100'),
+    (10000.0, '100-10k'),
+    (float('inf'), '>=10k'),
+)
+
+
+def centavos(valor: float) -> int:
+    """Valor redondeado a centavos (ROUND_HALF_UP), como entero"""
+    return round(redondear(valor) * 100)
+
+
+def rango_magnitud(diferencia: float) -> str:
+    diferencia = abs(diferencia)
+    for limite, etiqueta in RANGOS_MAGNITUD:
+        if diferencia < limite:
+            return etiqueta
+    return RANGOS_MAGNITUD[-1][1]
+
+
+class ReporteAuditoria:
+    """Acumulador de resultados con memoria acotada"""
+
+    def __init__(self, tolerancia: float = TOLERANCIA_DEFAULT, max_peores: int = MAX_PEORES):
+        self.tolerancia = tolerancia
+        self.max_peores = max_peores
+        self.cotizaciones = 0
+        self.partidas = 0
+        self.partidas_auditadas = 0
+        self.partidas_con_diferencia = 0
+        self.cotizaciones_con_diferencia = 0
+        self.diferencia_total = 0.0
+        self.reparadas = 0
+        self.por_tenant = defaultdict(lambda: {'partidas': 0, 'cotizaciones': 0, 'diferencia': 0.0})
+        self.por_vendedor = defaultdict(lambda: {'partidas': 0, 'cotizaciones': 0, 'diferencia': 0.0})
+        self.por_magnitud = {etiqueta: 0 for _, etiqueta in RANGOS_MAGNITUD}
+        self._peores = []  # heap de (abs(diferencia), secuencia, detalle)
+        self._secuencia = 0
+
+    def registrar(self, cot: Dict, partida: int, guardado_total: float, calculado_total: float,
+                  guardado_costo: float, calculado_costo: float):
+        diferencia = calculado_total - guardado_total
+        self.partidas_con_diferencia += 1
+        self.diferencia_total += diferencia
+        self.por_magnitud[rango_magnitud(diferencia)] += 1
+
+        tenant = cot.get('company_id') or 'sin_tenant'
+        vendedor = (cot.get('datosGenerales') or {}).get('vendedor') or 'sin_vendedor'
+        for grupo, clave in ((self.por_tenant, tenant), (self.por_vendedor, vendedor)):
+            grupo[clave]['partidas'] += 1
+            grupo[clave]['diferencia'] += diferencia
+
+        detalle = {
+            'numeroCotizacion': cot.get('numeroCotizacion'),
+            'company_id': cot.get('company_id'),
+            'vendedor': vendedor,
+            'partida': partida,
+            'total_guardado': guardado_total,
+            'total_calculado': calculado_total,
+            'costoUnidad_guardado': guardado_costo,
+            'costoUnidad_calculado': calculado_costo,
+            'diferencia': redondear(diferencia),
+        }
+        self._secuencia += 1
+        entrada = (abs(diferencia), self._secuencia, detalle)
+        if len(self._peores) < self.max_peores:
+            heapq.heappush(self._peores, entrada)
+        elif entrada[0] > self._peores[0][0]:
+            heapq.heapreplace(self._peores, entrada)
+
+    def registrar_cotizacion_con_diferencia(self, cot: Dict):
+        self.cotizaciones_con_diferencia += 1
+        tenant = cot.get('company_id') or 'sin_tenant'
+        vendedor = (cot.get('datosGenerales') or {}).get('vendedor') or 'sin_vendedor'
+        self.por_tenant[tenant]['cotizaciones'] += 1
+        self.por_vendedor[vendedor]['cotizaciones'] += 1
+
+    def a_dict(self) -> Dict:
+        def _redondear_grupo(grupo):
+            return {
+                clave: {**valores, 'diferencia': redondear(valores['diferencia'])}
+                for clave, valores in sorted(grupo.items(), key=lambda kv: -abs(kv[1]['diferencia']))
+            }
+
+        return {
+            'tolerancia': self.tolerancia,
+            'cotizaciones': self.cotizaciones,
+            'partidas': self.partidas,
+            'partidas_auditadas': self.partidas_auditadas,
+            'partidas_con_diferencia': self.partidas_con_diferencia,
+            'cotizaciones_con_diferencia': self.cotizaciones_con_diferencia,
+            'diferencia_total': redondear(self.diferencia_total),
+            'reparadas': self.reparadas,
+            'por_tenant': _redondear_grupo(self.por_tenant),
+            'por_vendedor': _redondear_grupo(self.por_vendedor),
+            'por_magnitud': dict(self.por_magnitud),
+            'peores': [d for _, _, d in sorted(self._peores, key=lambda e: (-e[0], e[1]))],
+        }
+
+
+def auditar_lote(cotizaciones: List[Dict], reporte: ReporteAuditoria) -> List[Dict]:
+    """
+    Evalúa un lote de cotizaciones en un solo LoteItems.
+
+    Returns:
+        Cotizaciones del lote que tienen al menos una partida con diferencia
+    """
+    items, indices = [], []
+    for c, cot in enumerate(cotizaciones):
+        partidas = cot.get('items')
+        if isinstance(partidas, list):
+            items.extend(partidas)
+            indices.extend([c] * len(partidas))
+
+    reporte.cotizaciones += len(cotizaciones)
+    reporte.partidas += len(items)
+    if not items:
+        return []
+
+    lote = LoteItems(items, indices)
+    tolerancia = centavos(reporte.tolerancia)
+    con_diferencia = set()
+    inicio_cotizacion = {}
+
+    for i, item in enumerate(items):
+        c = lote.cotizacion[i]
+        inicio_cotizacion.setdefault(c, i)
+        if not lote.estructurado[i]:
+            continue
+        reporte.partidas_auditadas += 1
+
+        calculado_total = redondear(lote.total[i])
+        calculado_costo = redondear(lote.costo_unidad[i])
+        guardado_total = convertir_numero(item.get('total'))
+        guardado_costo = convertir_numero(item.get('costoUnidad'))
+
+        if (abs(centavos(calculado_total) - centavos(guardado_total)) > tolerancia
+                or abs(centavos(calculado_costo) - centavos(guardado_costo)) > tolerancia):
+            reporte.registrar(cotizaciones[c], i - inicio_cotizacion[c],
+                              guardado_total, calculado_total, guardado_costo, calculado_costo)
+            con_diferencia.add(c)
+
+    for c in sorted(con_diferencia):
+        reporte.registrar_cotizacion_con_diferencia(cotizaciones[c])
+    return [cotizaciones[c] for c in sorted(con_diferencia)]
+
+
+def _en_lotes(cotizaciones: Iterable[Dict], tamano: int):
+    lote = []
+    for cot in cotizaciones:
+        lote.append(cot)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def auditar_cotizaciones(cotizaciones: Iterable[Dict], tolerancia: float = TOLERANCIA_DEFAULT,
+                         tamano_lote: int = TAMANO_LOTE, reparar_con=None,
+                         max_peores: int = MAX_PEORES) -> Dict:
+    """
+    Audita un iterable de cotizaciones (cualquier fuente).
+
+    Args:
+        reparar_con: Callable(cambios: {numero: items}) -> Dict con 'actualizadas';
+                     si se indica, se llama una vez por lote con las cotizaciones a corregir
+    """
+    reporte = ReporteAuditoria(tolerancia, max_peores)
+    inicio = time.perf_counter()
+
+    for lote in _en_lotes(cotizaciones, tamano_lote):
+        con_diferencia = auditar_lote(lote, reporte)
+        if reparar_con and con_diferencia:
+            cambios = {
+                cot.get('numeroCotizacion'): aplicar_a_items(cot.get('items'))
+                for cot in con_diferencia if cot.get('numeroCotizacion')
+            }
+            resultado = reparar_con(cambios) or {}
+            reporte.reparadas += resultado.get('actualizadas', 0)
+
+    resultado = reporte.a_dict()
+    resultado['duracion_s'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def auditar(db_manager, company_id: Optional[str] = None, desde: Optional[str] = None,
+            hasta: Optional[str] = None, tolerancia: float = TOLERANCIA_DEFAULT,
+            reparar: bool = False, tamano_lote: int = TAMANO_LOTE) -> Dict:
+    """Audita las cotizaciones de SupabaseManager (streaming, por lotes)"""
+    logger.info("[AUDITORIA] Iniciando (company_id=%s, reparar=%s, tolerancia=%s)", company_id, reparar, tolerancia)
+    resultado = auditar_cotizaciones(
+        db_manager.iterar_cotizaciones(company_id=company_id, desde=desde, hasta=hasta,
+                                       tamano_lote=tamano_lote),
+        tolerancia=tolerancia,
+        tamano_lote=tamano_lote,
+        reparar_con=db_manager.actualizar_items_lote if reparar else None,
+    )
+    logger.info("[AUDITORIA] %d cotizaciones, %d partidas con diferencia, %d reparadas en %ss",
+                resultado['cotizaciones'], resultado['partidas_con_diferencia'], resultado['reparadas'],
+                resultado['duracion_s'])
+    return resultado
+
+
+def _imprimir_reporte(reporte: Dict):
+    print("=" * 60)
+    print("AUDITORÍA FINANCIERA")
+    print("=" * 60)
+    print(f"Cotizaciones:              {reporte['cotizaciones']}")
+    print(f"Partidas (auditadas):      {reporte['partidas']} ({reporte['partidas_auditadas']})")
+    print(f"Partidas con diferencia:   {reporte['partidas_con_diferencia']}")
+    print(f"Cotizaciones afectadas:    {reporte['cotizaciones_con_diferencia']}")
+    print(f"Diferencia neta:           {reporte['diferencia_total']:,.2f}")
+    print(f"Reparadas:                 {reporte['reparadas']}")
+    print(f"Duración:                  {reporte['duracion_s']}s")
+
+    print("\nPor magnitud:")
+    for rango, cantidad in reporte['por_magnitud'].items():
+        print(f"  {rango:>8}: {cantidad}")
+    for titulo, clave in (("Por tenant", 'por_tenant'), ("Por vendedor", 'por_vendedor')):
+        if reporte[clave]:
+            print(f"\n{titulo}:")
+            for nombre, valores in list(reporte[clave].items())[:20]:
+                print(f"  {nombre}: {valores['partidas']} partidas, "
+                      f"{valores['cotizaciones']} cotizaciones, dif {valores['diferencia']:,.2f}")
+    if reporte['peores']:
+        print("\nPeores discrepancias:")
+        for d in reporte['peores'][:10]:
+            print(f"  {d['numeroCotizacion']} partida {d['partida']}: "
+                  f"{d['total_guardado']:,.2f} -> {d['total_calculado']:,.2f} ({d['diferencia']:+,.2f})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Auditoría financiera masiva de cotizaciones")
+    parser.add_argument('--company-id', help="Auditar solo una compañía")
+    parser.add_argument('--desde', help="Fecha de creación inicial (YYYY-MM-DD)")
+    parser.add_argument('--hasta', help="Fecha de creación final (YYYY-MM-DD)")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_DEFAULT)
+    parser.add_argument('--reparar', action='store_true', help="Corregir las partidas con diferencia")
+    parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+    parser.add_argument('--json', action='store_true', help="Imprimir el reporte como JSON")
+    args = parser.parse_args(argv)
+
+    from supabase_manager import SupabaseManager
+
+    db_manager = SupabaseManager()
+    try:
+        reporte = auditar(db_manager, company_id=args.company_id, desde=args.desde, hasta=args.hasta,
+                          tolerancia=args.tolerancia, reparar=args.reparar, tamano_lote=args.tamano_lote)
+    finally:
+        db_manager.close()
+
+    if args.json:
+        json.dump(reporte, sys.stdout, ensure_ascii=False, indent=2, default=str)
+        print()
+    else:
+        _imprimir_reporte(reporte)
+    return 1 if reporte['partidas_con_diferencia'] and not args.reparar else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,17 +16,24 @@ Fecha: 2025-08-29
 """
 
 import os
+import io
 import json
+import time
+import hashlib
+import sqlite3
 import datetime
-from typing import Dict, List, Optional, Tuple, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from pathlib import Path
-import tempfile
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 import re
 
+from bom_consolidation import ConsolidadorBOM, clave_consolidacion, consolidar_resultados, generar_grand_total
+
 try:
     import google.generativeai as genai
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
     import PyPDF2
     GEMINI_AVAILABLE = True
 except ImportError as e:
@@ -180,7 +187,7 @@ class BOMItem:
     
     def get_key_consolidacion(self) -> str:
         """Genera clave única para consolidación de materiales repetidos"""
-        return f"{self.item_id}_{self.descripcion}_{self.largo}_{self.ancho}_{self.espesor}".lower()
+        return clave_consolidacion(self.item_id, self.descripcion, self.largo, self.ancho, self.espesor)
 
 @dataclass
 class PaginaBOM:
@@ -190,16 +197,171 @@ class PaginaBOM:
     tabla_detectada: bool
     contenido_texto: str = ""
 
+# Prompt de análisis de una página (imagen). Forma parte de la clave del cache
+# de páginas: al cambiarlo, las páginas se vuelven a analizar.
+PROMPT_ANALISIS_PAGINA = """
+            Analiza esta imagen de un plano de ingeniería o documento técnico que puede contener información de materiales y componentes estructurales.
+
+            Busca TODA la información de materiales presente en la imagen, incluyendo:
+
+            📋 TABLAS DE MATERIALES:
+            - Listas de materiales estructurales
+            - Especificaciones de perfiles
+            - Cantidades de componentes
+            - Dimensiones y medidas
+
+            🔍 ELEMENTOS ESTRUCTURALES EN DIBUJOS:
+            - Perfiles metálicos (IPR, PTR, canales, etc.)
+            - Placas y láminas
+            - Pernos, soldaduras, conexiones
+            - Cualquier anotación con dimensiones
+
+            📏 INFORMACIÓN A EXTRAER:
+            1. Descripción detallada del material (ej: "IPR 6x4x3/8", "PTR 2x2x1/4", "Placa 1/2")
+            2. Cantidad exacta
+            3. Unidad de medida (pcs, ft, lb, kg, etc.)
+            4. Dimensiones específicas (largo, ancho, espesor)
+            5. Tipo/clasificación de material
+            6. Cualquier código o referencia
+
+            INSTRUCCIONES CRÍTICAS:
+            - Examina TODA la imagen cuidadosamente
+            - Incluye información tanto de tablas como de anotaciones en dibujos
+            - Si ves medidas como "2'-6", "10.5ft", "1/2 inch", inclúyelas
+            - Para perfiles como "IPR 6x4x3/8", extrae dimensiones: altura=6, ancho=4, espesor=3/8
+            - Si no encuentras información específica, responde tabla_detectada: false
+            - NO inventes datos, solo extrae lo que realmente ves
+
+            Formato JSON EXACTO:
+            {
+                "tabla_detectada": true/false,
+                "items": [
+                    {
+                        "item_id": "referencia o código si existe",
+                        "cantidad": 1.0,
+                        "udm": "pcs/ft/lb/kg/etc",
+                        "descripcion": "descripción completa del material",
+                        "largo": 120.5,
+                        "ancho": 60.0,
+                        "espesor": 6.0,
+                        "clasificacion": "perfil/placa/conexion/etc"
+                    }
+                ]
+            }
+
+            EJEMPLO para "4 IPR 6x4x3/8 @ 12'-0 LONG":
+            {
+                "tabla_detectada": true,
+                "items": [
+                    {
+                        "item_id": "IPR-01",
+                        "cantidad": 4.0,
+                        "udm": "pcs",
+                        "descripcion": "IPR 6x4x3/8 @ 12'-0 LONG",
+                        "largo": 144.0,
+                        "ancho": 6.0,
+                        "espesor": 0.375,
+                        "clasificacion": "perfil estructural"
+                    }
+                ]
+            }
+            """
+
+
+class CacheAnalisisPaginas:
+    """
+    Cache persistente (SQLite) de resultados por imagen de página.
+
+    La clave es el sha256 del PNG renderizado más la versión del análisis
+    (modelo + prompt): al re-analizar un juego de planos revisado solo se
+    paga por las páginas que cambiaron. Solo se guardan análisis completos;
+    un error de Gemini no se cachea.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.getenv('GEMINI_PAGE_CACHE_PATH', 'gemini_paginas_cache.db')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS paginas (
+                hash_imagen TEXT NOT NULL,
+                version TEXT NOT NULL,
+                items TEXT NOT NULL,
+                analizado_en TEXT,
+                PRIMARY KEY (hash_imagen, version)
+            )
+        """)
+        self._conn.commit()
+
+    def obtener(self, hash_imagen: str, version: str) -> Optional[List[Dict]]:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT items FROM paginas WHERE hash_imagen = ? AND version = ?", (hash_imagen, version)
+            ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def guardar(self, hash_imagen: str, version: str, items: List[Dict]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO paginas (hash_imagen, version, items, analizado_en) VALUES (?, ?, ?, ?)",
+                (hash_imagen, version, json.dumps(items, ensure_ascii=False), datetime.datetime.now().isoformat())
+            )
+            self._conn.commit()
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LimitadorTasa:
+    """Espaciado mínimo entre llamadas (peticiones por minuto), compartido entre hilos"""
+
+    def __init__(self, por_minuto: float):
+        self.intervalo = 60.0 / por_minuto if por_minuto and por_minuto > 0 else 0.0
+        self._siguiente = 0.0
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            self._siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
 class GeminiPDFAnalyzer:
     """Analizador de PDFs usando Gemini para extracción de BOMs"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, modelo=None, cache_path: str = None):
         """
         Inicializa el analizador Gemini
         
         Args:
             api_key: API key de Google Gemini. Si no se proporciona, usa variable de entorno
+            modelo: Cliente con generate_content() ya construido (pruebas); omite la configuración de Gemini
+            cache_path: Ruta del cache de páginas (default GEMINI_PAGE_CACHE_PATH)
         """
+        # Pipeline de páginas: render de a una, análisis concurrente con tasa limitada
+        self.config = {
+            "dpi": int(os.getenv('GEMINI_PDF_DPI', '200')),
+            "workers": max(1, int(os.getenv('GEMINI_PAGE_WORKERS', '4'))),
+            "peticiones_por_minuto": float(os.getenv('GEMINI_RPM', '15')),
+        }
+        self.limitador = LimitadorTasa(self.config["peticiones_por_minuto"])
+        self.cache_paginas = CacheAnalisisPaginas(cache_path)
+        self.ultimas_estadisticas_paginas = {}
+        
+        if modelo is not None:
+            self.api_key = api_key
+            self.model = modelo
+            self.model_text = modelo
+            self.nombre_modelo = getattr(modelo, 'model_name', type(modelo).__name__)
+            self.version_analisis = self._version_analisis()
+            return
+        
         if not GEMINI_AVAILABLE:
             raise ImportError("Dependencias de Gemini no están disponibles. Instalar: pip install google-generativeai pdf2image PyPDF2")
         
@@ -213,10 +375,18 @@ class GeminiPDFAnalyzer:
         # Usar modelos actualizados y más eficientes
         self.model = genai.GenerativeModel('gemini-1.5-flash-latest')  # Modelo rápido para análisis de imágenes
         self.model_text = genai.GenerativeModel('gemini-1.5-flash-latest')    # Modelo rápido para procesamiento
+        self.nombre_modelo = 'gemini-1.5-flash-latest'
+        self.version_analisis = self._version_analisis()
         
         print(f"[GEMINI] Analizador inicializado correctamente")
         print(f"[GEMINI] Modelo vision: gemini-1.5-flash-latest")
         print(f"[GEMINI] Modelo texto: gemini-1.5-flash-latest")
+        print(f"[GEMINI] Páginas: {self.config['workers']} en paralelo, {self.config['peticiones_por_minuto']:g} peticiones/min")
+    
+    def _version_analisis(self) -> str:
+        """Versión del análisis de página para el cache: cambia con el modelo, el prompt o el dpi"""
+        base = f"{self.nombre_modelo}|{self.config['dpi']}|{PROMPT_ANALISIS_PAGINA}"
+        return hashlib.sha256(base.encode('utf-8')).hexdigest()[:16]
     
     def analizar_pdf_completo(self, ruta_pdf: str, numero_cotizacion: str = None) -> Dict:
         """
@@ -311,13 +481,12 @@ class GeminiPDFAnalyzer:
             print(f"[PASO_3] Procesamiento completo: {total_paginas} páginas analizadas")
             
             # PASO 4: Consolidar tablas en tabla master con subtotales dimensionales
+            # PASO 5: Identificar materiales repetidos y generar grand total
+            # (una sola pasada agrupada; el grand total se acumula al armar la tabla)
             print(f"[PASO_4] Consolidando tabla master...")
-            tabla_master = self._paso_4_consolidar_tabla_master(paginas_bom)
+            tabla_master, grand_total = self._consolidar_paginas(paginas_bom)
             resultado["paso_4_tabla_master"] = tabla_master
-            
-            # PASO 5: Identificar materiales repetidos y generar grand total
-            print(f"[PASO_5] Generando grand total...")
-            grand_total = self._paso_5_generar_grand_total(tabla_master)
+            self._imprimir_grand_total(grand_total)
             resultado["paso_5_grand_total"] = grand_total
             
             # Estadísticas finales
@@ -330,6 +499,7 @@ class GeminiPDFAnalyzer:
                 "total_items_unicos": total_items_unicos,
                 "total_items_consolidados": total_items_consolidados,
                 "paginas_con_tablas": sum(1 for p in paginas_bom if p.tabla_detectada),
+                "paginas_en_cache": self.ultimas_estadisticas_paginas.get("en_cache", 0),
                 "tiempo_procesamiento": "completo"
             }
             
@@ -407,66 +577,17 @@ class GeminiPDFAnalyzer:
     def _paso_1_analizar_paginas_individuales(self, ruta_pdf: str) -> List[PaginaBOM]:
         """
         PASO 1: Análisis por página individual del PDF
-        Convierte cada página a imagen y la analiza con Gemini
+        Renderiza las páginas de a una y las analiza con Gemini en paralelo
         """
         print(f"[PASO_1] Iniciando análisis por páginas individuales")
-        paginas_bom = []
+        self.ultimas_estadisticas_paginas = {}
         
         try:
             # Normalizar ruta del PDF
             ruta_pdf_normalizada = normalize_path(ruta_pdf)
             print(f"[PASO_1] Ruta PDF normalizada: {ruta_pdf_normalizada}")
             
-            # Convertir PDF a imágenes (una por página)
-            print(f"[PASO_1] Convirtiendo PDF a imágenes...")
-            convert_kwargs = {"dpi": 200}
-            
-            # Agregar poppler_path si está disponible (Windows)
-            if POPPLER_PATH:
-                convert_kwargs["poppler_path"] = POPPLER_PATH
-                print(f"[PASO_1] Usando poppler desde: {POPPLER_PATH}")
-            
-            imagenes_paginas = convert_from_path(ruta_pdf_normalizada, **convert_kwargs)
-            print(f"[PASO_1] PDF convertido: {len(imagenes_paginas)} páginas")
-            
-            # Analizar cada página
-            for num_pagina, imagen in enumerate(imagenes_paginas, 1):
-                print(f"[PASO_1] Analizando página {num_pagina}/{len(imagenes_paginas)}")
-                
-                try:
-                    # Guardar imagen temporalmente
-                    with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_img:
-                        imagen.save(temp_img.name, 'PNG')
-                        temp_img_path = temp_img.name
-                    
-                    # Analizar página con Gemini
-                    items_pagina = self._analizar_pagina_individual(temp_img_path, num_pagina)
-                    
-                    # Crear objeto PaginaBOM
-                    pagina_bom = PaginaBOM(
-                        numero_pagina=num_pagina,
-                        items=items_pagina,
-                        tabla_detectada=len(items_pagina) > 0
-                    )
-                    
-                    paginas_bom.append(pagina_bom)
-                    print(f"[PASO_1] Página {num_pagina}: {len(items_pagina)} items encontrados")
-                    
-                    # Limpiar archivo temporal
-                    try:
-                        os.unlink(temp_img_path)
-                    except:
-                        pass
-                        
-                except Exception as e:
-                    print(f"[PASO_1] ERROR analizando página {num_pagina}: {e}")
-                    # Crear página vacía en caso de error
-                    pagina_bom = PaginaBOM(
-                        numero_pagina=num_pagina,
-                        items=[],
-                        tabla_detectada=False
-                    )
-                    paginas_bom.append(pagina_bom)
+            paginas_bom = self._analizar_paginas_png(self._iterar_paginas_png(ruta_pdf_normalizada))
             
             print(f"[PASO_1] Análisis individual completado: {len(paginas_bom)} páginas procesadas")
             return paginas_bom
@@ -491,6 +612,116 @@ class GeminiPDFAnalyzer:
                 
             return []
     
+    def _iterar_paginas_png(self, ruta_pdf: str) -> Iterator[Tuple[int, bytes]]:
+        """
+        Renderiza el PDF página por página (first_page = last_page) y entrega
+        (numero_pagina, bytes PNG). Solo una imagen PIL vive en memoria a la vez
+        y no se escriben archivos temporales.
+        """
+        convert_kwargs = {"dpi": self.config["dpi"]}
+        
+        # Agregar poppler_path si está disponible (Windows)
+        if POPPLER_PATH:
+            convert_kwargs["poppler_path"] = POPPLER_PATH
+            print(f"[PASO_1] Usando poppler desde: {POPPLER_PATH}")
+        
+        info_kwargs = {"poppler_path": POPPLER_PATH} if POPPLER_PATH else {}
+        total_paginas = pdfinfo_from_path(ruta_pdf, **info_kwargs)["Pages"]
+        print(f"[PASO_1] PDF con {total_paginas} páginas (render a {self.config['dpi']} dpi, una a la vez)")
+        
+        for num_pagina in range(1, total_paginas + 1):
+            imagenes = convert_from_path(ruta_pdf, first_page=num_pagina, last_page=num_pagina, **convert_kwargs)
+            if not imagenes:
+                continue
+            buffer = io.BytesIO()
+            imagenes[0].save(buffer, 'PNG')
+            for imagen in imagenes:
+                imagen.close()
+            yield num_pagina, buffer.getvalue()
+    
+    def _analizar_paginas_png(self, paginas: Iterable[Tuple[int, bytes]]) -> List[PaginaBOM]:
+        """
+        Analiza páginas (numero_pagina, bytes PNG) con un pool de workers.
+        
+        - Cache por hash de imagen: las páginas ya analizadas no llaman a Gemini
+        - Páginas idénticas dentro del mismo PDF se analizan una sola vez
+        - Como máximo 2 x workers imágenes pendientes en memoria: el render
+          espera a que se libere un lugar
+        - La tasa de llamadas la controla self.limitador (compartido)
+        """
+        workers = self.config["workers"]
+        cupo = threading.BoundedSemaphore(workers * 2)
+        resultados: Dict[int, Any] = {}   # numero_pagina -> items (dicts) o Future
+        en_curso: Dict[str, Any] = {}     # hash -> Future (páginas repetidas)
+        estadisticas = {"paginas": 0, "en_cache": 0, "analizadas": 0, "repetidas": 0, "errores": 0}
+        
+        def analizar(hash_imagen: str, png: bytes, num_pagina: int) -> Optional[List[Dict]]:
+            try:
+                items = self._analizar_imagen_pagina(png, num_pagina)
+                if items is None:
+                    return None
+                filas = [self._item_a_dict(item) for item in items]
+                self.cache_paginas.guardar(hash_imagen, self.version_analisis, filas)
+                return filas
+            finally:
+                cupo.release()
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gemini-pagina') as pool:
+            for num_pagina, png in paginas:
+                estadisticas["paginas"] += 1
+                hash_imagen = hashlib.sha256(png).hexdigest()
+                
+                if hash_imagen in en_curso:
+                    estadisticas["repetidas"] += 1
+                    resultados[num_pagina] = en_curso[hash_imagen]
+                    continue
+                
+                en_cache = self.cache_paginas.obtener(hash_imagen, self.version_analisis)
+                if en_cache is not None:
+                    estadisticas["en_cache"] += 1
+                    print(f"[PASO_1] Página {num_pagina}: en cache ({len(en_cache)} items)")
+                    resultados[num_pagina] = en_cache
+                    continue
+                
+                cupo.acquire()
+                estadisticas["analizadas"] += 1
+                futuro = pool.submit(analizar, hash_imagen, png, num_pagina)
+                en_curso[hash_imagen] = futuro
+                resultados[num_pagina] = futuro
+        
+        paginas_bom = []
+        for num_pagina in sorted(resultados):
+            filas = resultados[num_pagina]
+            if not isinstance(filas, list):
+                try:
+                    filas = filas.result()
+                except Exception as e:
+                    print(f"[PASO_1] ERROR analizando página {num_pagina}: {e}")
+                    filas = None
+            if filas is None:
+                estadisticas["errores"] += 1
+                filas = []
+            
+            items = [BOMItem(**dict(fila, pagina_origen=num_pagina)) for fila in filas]
+            paginas_bom.append(PaginaBOM(
+                numero_pagina=num_pagina,
+                items=items,
+                tabla_detectada=len(items) > 0
+            ))
+            print(f"[PASO_1] Página {num_pagina}: {len(items)} items encontrados")
+        
+        self.ultimas_estadisticas_paginas = estadisticas
+        print(f"[PASO_1] Páginas: {estadisticas['analizadas']} analizadas, {estadisticas['en_cache']} en cache, "
+              f"{estadisticas['repetidas']} repetidas, {estadisticas['errores']} con error")
+        return paginas_bom
+    
+    @staticmethod
+    def _item_a_dict(item: BOMItem) -> Dict:
+        """Item sin página de origen (el cache es por imagen, no por posición)"""
+        fila = asdict(item)
+        fila.pop("pagina_origen")
+        return fila
+    
     def _analizar_texto_pagina(self, texto_pagina: str, numero_pagina: int) -> List[BOMItem]:
         """
         Analiza texto extraído del PDF usando Gemini (modo texto, sin imagen)
@@ -592,82 +823,20 @@ Si no encuentras materiales estructurales, devuelve: {{"items": []}}
     
     def _analizar_pagina_individual(self, ruta_imagen: str, numero_pagina: int) -> List[BOMItem]:
         """
-        Analiza una página individual usando Gemini Vision
+        Analiza una página individual (archivo de imagen) usando Gemini Vision
+        """
+        with open(ruta_imagen, 'rb') as img_file:
+            return self._analizar_imagen_pagina(img_file.read(), numero_pagina) or []
+    
+    def _analizar_imagen_pagina(self, imagen_data: bytes, numero_pagina: int) -> Optional[List[BOMItem]]:
+        """
+        Analiza los bytes PNG de una página usando Gemini Vision
+        
+        Returns:
+            Items extraídos (lista vacía si la página no tiene materiales) o
+            None si el análisis falló (no se debe cachear)
         """
         try:
-            # Prompt específico y mejorado para análisis de BOM de planos de ingeniería
-            prompt = """
-            Analiza esta imagen de un plano de ingeniería o documento técnico que puede contener información de materiales y componentes estructurales.
-
-            Busca TODA la información de materiales presente en la imagen, incluyendo:
-
-            📋 TABLAS DE MATERIALES:
-            - Listas de materiales estructurales
-            - Especificaciones de perfiles
-            - Cantidades de componentes
-            - Dimensiones y medidas
-
-            🔍 ELEMENTOS ESTRUCTURALES EN DIBUJOS:
-            - Perfiles metálicos (IPR, PTR, canales, etc.)
-            - Placas y láminas
-            - Pernos, soldaduras, conexiones
-            - Cualquier anotación con dimensiones
-
-            📏 INFORMACIÓN A EXTRAER:
-            1. Descripción detallada del material (ej: "IPR 6x4x3/8", "PTR 2x2x1/4", "Placa 1/2")
-            2. Cantidad exacta
-            3. Unidad de medida (pcs, ft, lb, kg, etc.)
-            4. Dimensiones específicas (largo, ancho, espesor)
-            5. Tipo/clasificación de material
-            6. Cualquier código o referencia
-
-            INSTRUCCIONES CRÍTICAS:
-            - Examina TODA la imagen cuidadosamente
-            - Incluye información tanto de tablas como de anotaciones en dibujos
-            - Si ves medidas como "2'-6", "10.5ft", "1/2 inch", inclúyelas
-            - Para perfiles como "IPR 6x4x3/8", extrae dimensiones: altura=6, ancho=4, espesor=3/8
-            - Si no encuentras información específica, responde tabla_detectada: false
-            - NO inventes datos, solo extrae lo que realmente ves
-
-            Formato JSON EXACTO:
-            {
-                "tabla_detectada": true/false,
-                "items": [
-                    {
-                        "item_id": "referencia o código si existe",
-                        "cantidad": 1.0,
-                        "udm": "pcs/ft/lb/kg/etc",
-                        "descripcion": "descripción completa del material",
-                        "largo": 120.5,
-                        "ancho": 60.0,
-                        "espesor": 6.0,
-                        "clasificacion": "perfil/placa/conexion/etc"
-                    }
-                ]
-            }
-
-            EJEMPLO para "4 IPR 6x4x3/8 @ 12'-0 LONG":
-            {
-                "tabla_detectada": true,
-                "items": [
-                    {
-                        "item_id": "IPR-01",
-                        "cantidad": 4.0,
-                        "udm": "pcs",
-                        "descripcion": "IPR 6x4x3/8 @ 12'-0 LONG",
-                        "largo": 144.0,
-                        "ancho": 6.0,
-                        "espesor": 0.375,
-                        "clasificacion": "perfil estructural"
-                    }
-                ]
-            }
-            """
-            
-            # Cargar imagen y enviar a Gemini
-            with open(ruta_imagen, 'rb') as img_file:
-                imagen_data = img_file.read()
-            
             # Crear objeto de imagen para Gemini
             imagen_gemini = {
                 'mime_type': 'image/png',
@@ -678,7 +847,8 @@ Si no encuentras materiales estructurales, devuelve: {{"items": []}}
             max_retries = 2
             for retry in range(max_retries):
                 try:
-                    response = self.model.generate_content([prompt, imagen_gemini])
+                    self.limitador.esperar()
+                    response = self.model.generate_content([PROMPT_ANALISIS_PAGINA, imagen_gemini])
                     
                     # Procesar respuesta
                     if response and response.text:
@@ -748,20 +918,20 @@ Si no encuentras materiales estructurales, devuelve: {{"items": []}}
                                 print(f"[GEMINI] ERROR decodificando JSON en página {numero_pagina}: {e}")
                                 print(f"[GEMINI] Respuesta recibida: {respuesta_texto[:200]}...")
                                 if retry == max_retries - 1:
-                                    return []
+                                    return None
                                 else:
                                     print(f"[GEMINI] Reintentando página {numero_pagina}...")
                                     continue
                         else:
                             print(f"[GEMINI] No se encontró JSON válido en respuesta de página {numero_pagina}")
                             if retry == max_retries - 1:
-                                return []
+                                return None
                             else:
                                 continue
                     else:
                         print(f"[GEMINI] No se recibió respuesta para página {numero_pagina}")
                         if retry == max_retries - 1:
-                            return []
+                            return None
                         else:
                             continue
                             
@@ -769,170 +939,64 @@ Si no encuentras materiales estructurales, devuelve: {{"items": []}}
                     print(f"[GEMINI] ERROR en llamada a Gemini para página {numero_pagina} (intento {retry+1}): {gemini_error}")
                     if "quota" in str(gemini_error).lower() or "429" in str(gemini_error):
                         print(f"[GEMINI] Límite de cuota alcanzado - esperando antes de reintentar...")
-                        import time
                         time.sleep(10)
                     
                     if retry == max_retries - 1:
                         print(f"[GEMINI] Máximo número de reintentos alcanzado para página {numero_pagina}")
-                        return []
+                        return None
                     else:
                         continue
                 
         except Exception as e:
             print(f"[GEMINI] ERROR analizando página {numero_pagina}: {e}")
-            return []
+            return None
     
     def _paso_4_consolidar_tabla_master(self, paginas_bom: List[PaginaBOM]) -> List[Dict]:
         """
         PASO 4: Consolidar las tablas de cada página en una tabla master
-        Genera subtotales dimensionales de cada item
+        Genera subtotales dimensionales de cada item (bom_consolidation, una sola pasada)
         """
-        print(f"[PASO_4] Iniciando consolidación de tabla master")
-        
-        # Recopilar todos los items de todas las páginas
-        todos_items = []
-        for pagina in paginas_bom:
-            todos_items.extend(pagina.items)
-        
-        print(f"[PASO_4] Total items encontrados en todas las páginas: {len(todos_items)}")
-        
-        # Crear tabla master con subtotales por ítem único
-        tabla_master = []
-        items_procesados = set()
-        
-        for item in todos_items:
-            key = item.get_key_consolidacion()
-            
-            if key not in items_procesados:
-                # Buscar todos los items similares
-                items_similares = [i for i in todos_items if i.get_key_consolidacion() == key]
-                
-                # Calcular subtotales
-                cantidad_total = sum(i.cantidad for i in items_similares)
-                paginas_origen = list(set(i.pagina_origen for i in items_similares))
-                
-                # Calcular subtotales dimensionales
-                subtotal_dimensional = {}
-                if item.largo and item.ancho:
-                    area_unitaria = item.largo * item.ancho
-                    area_total = area_unitaria * cantidad_total
-                    subtotal_dimensional = {
-                        "area_unitaria_mm2": area_unitaria,
-                        "area_total_mm2": area_total,
-                        "largo_mm": item.largo,
-                        "ancho_mm": item.ancho
-                    }
-                    
-                    if item.espesor:
-                        volumen_unitario = area_unitaria * item.espesor
-                        volumen_total = volumen_unitario * cantidad_total
-                        subtotal_dimensional.update({
-                            "espesor_mm": item.espesor,
-                            "volumen_unitario_mm3": volumen_unitario,
-                            "volumen_total_mm3": volumen_total
-                        })
-                
-                # Crear registro master
-                registro_master = {
-                    "item_id": item.item_id,
-                    "descripcion": item.descripcion,
-                    "cantidad_total": cantidad_total,
-                    "udm": item.udm,
-                    "clasificacion": item.clasificacion,
-                    "largo": item.largo,
-                    "ancho": item.ancho,
-                    "espesor": item.espesor,
-                    "subtotales_dimensionales": subtotal_dimensional,
-                    "paginas_origen": paginas_origen,
-                    "ocurrencias": len(items_similares)
-                }
-                
-                tabla_master.append(registro_master)
-                items_procesados.add(key)
-        
-        print(f"[PASO_4] Tabla master consolidada: {len(tabla_master)} items únicos")
-        return tabla_master
+        return self._consolidar_paginas(paginas_bom)[0]
     
     def _paso_5_generar_grand_total(self, tabla_master: List[Dict]) -> Dict:
         """
         PASO 5: Clasificar e identificar materiales repetidos para generar grand total
         """
         print(f"[PASO_5] Generando grand total y clasificación final")
+        grand_total = generar_grand_total(tabla_master)
+        self._imprimir_grand_total(grand_total)
+        return grand_total
+    
+    def _consolidar_paginas(self, paginas_bom: List[PaginaBOM]) -> Tuple[List[Dict], Dict]:
+        """Pasos 4 y 5 juntos: tabla master y grand total sin recorrer la tabla dos veces"""
+        print(f"[PASO_4] Iniciando consolidación de tabla master")
+        consolidador = ConsolidadorBOM()
+        consolidador.agregar_paginas(paginas_bom)
+        print(f"[PASO_4] Total items encontrados en todas las páginas: {consolidador.total_items}")
         
-        # Clasificar materiales por tipo
-        clasificacion_materiales = {}
-        materiales_consolidados = []
-        
-        # Totales generales
-        totales = {
-            "total_items_unicos": len(tabla_master),
-            "total_cantidad_items": 0,
-            "total_area_mm2": 0,
-            "total_volumen_mm3": 0
-        }
-        
-        for item in tabla_master:
-            # Sumar totales generales
-            totales["total_cantidad_items"] += item["cantidad_total"]
-            
-            if "subtotales_dimensionales" in item:
-                subtotales = item["subtotales_dimensionales"]
-                if "area_total_mm2" in subtotales:
-                    totales["total_area_mm2"] += subtotales["area_total_mm2"]
-                if "volumen_total_mm3" in subtotales:
-                    totales["total_volumen_total_mm3"] += subtotales["volumen_total_mm3"]
-            
-            # Clasificar por tipo de material
-            clasificacion = item.get("clasificacion", "Sin clasificar")
-            if clasificacion not in clasificacion_materiales:
-                clasificacion_materiales[clasificacion] = {
-                    "items": [],
-                    "total_cantidad": 0,
-                    "total_area": 0,
-                    "total_volumen": 0
-                }
-            
-            clasificacion_materiales[clasificacion]["items"].append(item)
-            clasificacion_materiales[clasificacion]["total_cantidad"] += item["cantidad_total"]
-            
-            if "subtotales_dimensionales" in item:
-                subtotales = item["subtotales_dimensionales"]
-                if "area_total_mm2" in subtotales:
-                    clasificacion_materiales[clasificacion]["total_area"] += subtotales["area_total_mm2"]
-                if "volumen_total_mm3" in subtotales:
-                    clasificacion_materiales[clasificacion]["total_volumen"] += subtotales["volumen_total_mm3"]
-            
-            # Agregar a materiales consolidados
-            material_consolidado = {
-                **item,
-                "consolidado": item["ocurrencias"] > 1,
-                "total_final": item["cantidad_total"]
-            }
-            materiales_consolidados.append(material_consolidado)
-        
-        # Identificar materiales más repetidos
-        materiales_repetidos = [item for item in tabla_master if item["ocurrencias"] > 1]
-        materiales_repetidos.sort(key=lambda x: x["ocurrencias"], reverse=True)
-        
-        grand_total = {
-            "totales_generales": totales,
-            "clasificacion_por_tipo": clasificacion_materiales,
-            "materiales_consolidados": materiales_consolidados,
-            "materiales_mas_repetidos": materiales_repetidos[:10],  # Top 10
-            "resumen": {
-                "total_clasificaciones": len(clasificacion_materiales),
-                "materiales_repetidos": len(materiales_repetidos),
-                "material_mas_repetido": materiales_repetidos[0] if materiales_repetidos else None
-            }
-        }
-        
+        tabla_master, grand_total = consolidador.consolidar()
+        print(f"[PASO_4] Tabla master consolidada: {len(tabla_master)} items únicos")
+        return tabla_master, grand_total
+    
+    def consolidar_pdfs(self, resultados: List[Dict]) -> Dict:
+        """
+        Combina los BOMs de varios análisis (analizar_pdf_completo) en una
+        sola tabla master; cada registro indica páginas por PDF en "origenes"
+        """
+        combinado = consolidar_resultados(resultados)
+        print(f"[CONSOLIDACIÓN] {len(combinado['pdfs'])} PDFs, {combinado['total_items']} items -> "
+              f"{len(combinado['tabla_master'])} únicos")
+        self._imprimir_grand_total(combinado["grand_total"])
+        return combinado
+    
+    @staticmethod
+    def _imprimir_grand_total(grand_total: Dict):
+        totales = grand_total["totales_generales"]
         print(f"[PASO_5] Grand total generado:")
         print(f"  - Total items: {totales['total_items_unicos']}")
         print(f"  - Total cantidad: {totales['total_cantidad_items']}")
-        print(f"  - Materiales repetidos: {len(materiales_repetidos)}")
-        print(f"  - Clasificaciones: {len(clasificacion_materiales)}")
-        
-        return grand_total
+        print(f"  - Materiales repetidos: {grand_total['resumen']['materiales_repetidos']}")
+        print(f"  - Clasificaciones: {grand_total['resumen']['total_clasificaciones']}")
     
     def obtener_estadisticas_rapidas(self, ruta_pdf: str) -> Dict:
         """
@@ -252,7 +252,7 @@ class GoogleDriveClient:
                         q=search_query,
                         pageSize=1000,  # Máximo permitido por Google Drive API
                         pageToken=page_token,
-                        fields="nextPageToken, files(id, name, size, modifiedTime, parents)"
+                        fields="nextPageToken, files(id, name, size, modifiedTime, md5Checksum, parents)"
                     ).execute()
 
                     files_pagina = results.get('files', [])
@@ -293,6 +293,7 @@ class GoogleDriveClient:
                     'numero_cotizacion': numero_cotizacion,
                     'tamaño': file.get('size', '0'),
                     'fecha_modificacion': file.get('modifiedTime', ''),
+                    'md5': file.get('md5Checksum', ''),
                     'tipo': 'google_drive',
                     'carpeta_origen': carpeta
                 })
@@ -30,6 +30,8 @@ from pathlib import Path
 import logging
 import re
 
+from state_journal import DiarioEstado
+
 # Para análisis de texto en PDFs
 try:
     import PyPDF2
@@ -40,6 +42,34 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+def extract_pdf_text(pdf_content: bytes, max_pages: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Extraer texto y metadatos de un PDF con PyPDF2.
+    Compartido por el monitor de Drive y el índice de texto completo (pdf_text_index).
+
+    Returns:
+        Dict con num_pages, metadata (dict del documento) y text
+    """
+    import io
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
+
+    num_pages = len(pdf_reader.pages)
+    metadata = pdf_reader.metadata if pdf_reader.metadata else {}
+
+    paginas_a_extraer = num_pages if max_pages is None else min(max_pages, num_pages)
+    partes = []
+    for page_num in range(paginas_a_extraer):
+        try:
+            partes.append(pdf_reader.pages[page_num].extract_text() or "")
+        except Exception as e:
+            logger.debug(f"Error extrayendo texto de página {page_num}: {e}")
+
+    return {
+        "num_pages": num_pages,
+        "metadata": metadata,
+        "text": "\n".join(partes)
+    }
+
 class FileChangeType(Enum):
     """Tipos de cambios en archivos"""
     ADDED = "added"
@@ -135,8 +165,9 @@ class GoogleDriveMonitor:
         }
         
         # Archivos de persistencia
-        self.cache_file = Path("drive_monitor_cache.json")
-        self.events_file = Path("drive_monitor_events.json")
+        self.cache_file = Path("drive_monitor_cache.json")     # formato anterior (se migra una vez)
+        self.events_file = Path("drive_monitor_events.json")   # formato anterior (se migra una vez)
+        self.diario = DiarioEstado(os.getenv('DRIVE_MONITOR_JOURNAL', 'drive_monitor.journal'))
         
         # Estadísticas
         self.stats = {
@@ -207,6 +238,7 @@ class GoogleDriveMonitor:
         
         # Guardar estado
         self._save_persistent_state()
+        self.diario.cerrar()
         
         logger.info("✅ [DRIVE_MONITOR] Monitor detenido correctamente")
     
@@ -234,6 +266,10 @@ class GoogleDriveMonitor:
                 if self.change_events:
                     self._process_pending_events()
                 
+                # Persistir lo que cambió en este ciclo (líneas al diario, no reescritura)
+                if changes or self.change_events:
+                    self._save_persistent_state()
+                
                 # Actualizar estadísticas
                 scan_time_ms = int((time.time() - start_time) * 1000)
                 self.stats["last_scan_duration_ms"] = scan_time_ms
@@ -642,31 +678,16 @@ class GoogleDriveMonitor:
             if not pdf_content:
                 return PDFMetadata(numero_cotizacion=self._extract_cotizacion_number(file_info.name))
             
-            # Crear objeto PDF
-            import io
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
-            
-            # Extraer información básica
-            num_pages = len(pdf_reader.pages)
-            
-            # Metadatos del documento
-            metadata = pdf_reader.metadata if pdf_reader.metadata else {}
+            # Extraer texto de las primeras páginas (solo primeras 3)
+            extraido = extract_pdf_text(pdf_content, max_pages=3)
+            num_pages = extraido["num_pages"]
+            metadata = extraido["metadata"]
+            texto_extraido = extraido["text"]
             
             titulo = metadata.get('/Title', file_info.name) if metadata else file_info.name
             autor = metadata.get('/Author', '') if metadata else ''
             creador = metadata.get('/Creator', '') if metadata else ''
             
-            # Extraer texto de las primeras páginas
-            texto_extraido = ""
-            max_pages_to_extract = min(3, num_pages)  # Solo primeras 3 páginas
-            
-            for page_num in range(max_pages_to_extract):
-                try:
-                    page = pdf_reader.pages[page_num]
-                    texto_extraido += page.extract_text() + "\n"
-                except Exception as e:
-                    logger.debug(f"Error extrayendo texto de página {page_num}: {e}")
-            
             # Extraer palabras clave del texto
             keywords = self._extract_keywords_from_text(texto_extraido)
             
@@ -736,109 +757,119 @@ class GoogleDriveMonitor:
                 self.change_events.remove(event)
     
     def _load_persistent_state(self):
-        """Cargar estado persistente"""
+        """Cargar estado persistente desde el diario"""
         try:
+            if not self.diario.existia:
+                self._migrar_estado_json()
+            
             # Cargar cache de archivos
-            if self.cache_file.exists():
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                
-                self.known_files = {}
-                for file_id, file_data in cache_data.get('known_files', {}).items():
-                    self.known_files[file_id] = DriveFileInfo(
-                        file_id=file_data['file_id'],
-                        name=file_data['name'],
-                        size=file_data['size'],
-                        modified_time=datetime.fromisoformat(file_data['modified_time']),
-                        created_time=datetime.fromisoformat(file_data['created_time']),
-                        md5_checksum=file_data.get('md5_checksum', ''),
-                        mime_type=file_data.get('mime_type', ''),
-                        parent_folder=file_data.get('parent_folder', ''),
-                        folder_name=file_data.get('folder_name', ''),
-                        web_view_link=file_data.get('web_view_link', ''),
-                        download_link=file_data.get('download_link', '')
-                    )
-                
-                self.last_sync_time = None
-                if cache_data.get('last_sync_time'):
-                    self.last_sync_time = datetime.fromisoformat(cache_data['last_sync_time'])
-                
+            self.known_files = {}
+            for _, file_data in self.diario.items('archivo:'):
+                file_info = self._archivo_desde_dict(file_data)
+                self.known_files[file_info.file_id] = file_info
+            
+            self.last_sync_time = None
+            meta = self.diario.get('meta') or {}
+            if meta.get('last_sync_time'):
+                self.last_sync_time = datetime.fromisoformat(meta['last_sync_time'])
+            
+            if self.known_files:
                 logger.info(f"📂 [DRIVE_MONITOR] {len(self.known_files)} archivos cargados del cache")
             
-            # Cargar eventos
-            if self.events_file.exists():
-                with open(self.events_file, 'r', encoding='utf-8') as f:
-                    events_data = json.load(f)
-                
-                # Cargar solo eventos no completados
-                for event_data in events_data.get('pending_events', []):
-                    file_info = DriveFileInfo(**event_data['file_info'])
-                    event = FileChangeEvent(
-                        event_id=event_data['event_id'],
-                        file_info=file_info,
-                        change_type=FileChangeType(event_data['change_type']),
-                        detected_at=datetime.fromisoformat(event_data['detected_at']),
-                        processed_at=datetime.fromisoformat(event_data['processed_at']) if event_data.get('processed_at') else None,
-                        processing_status=ProcessingStatus(event_data['processing_status']),
-                        error_message=event_data.get('error_message', ''),
-                        retry_count=event_data.get('retry_count', 0)
-                    )
-                    
-                    if event.processing_status != ProcessingStatus.COMPLETED:
-                        self.change_events.append(event)
+            # Cargar solo eventos no completados
+            for _, event_data in self.diario.items('evento:'):
+                event = FileChangeEvent(
+                    event_id=event_data['event_id'],
+                    file_info=self._archivo_desde_dict(event_data['file_info']),
+                    change_type=FileChangeType(event_data['change_type']),
+                    detected_at=datetime.fromisoformat(event_data['detected_at']),
+                    processed_at=datetime.fromisoformat(event_data['processed_at']) if event_data.get('processed_at') else None,
+                    processing_status=ProcessingStatus(event_data['processing_status']),
+                    error_message=event_data.get('error_message', ''),
+                    retry_count=event_data.get('retry_count', 0)
+                )
                 
+                if event.processing_status != ProcessingStatus.COMPLETED:
+                    self.change_events.append(event)
+            
+            if self.change_events:
                 logger.info(f"⏳ [DRIVE_MONITOR] {len(self.change_events)} eventos pendientes cargados")
                 
         except Exception as e:
             logger.error(f"❌ [DRIVE_MONITOR] Error cargando estado persistente: {e}")
     
+    def _migrar_estado_json(self):
+        """Migración única desde drive_monitor_cache.json / drive_monitor_events.json"""
+        if self.cache_file.exists():
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cache_data = json.load(f)
+            self.diario.reemplazar({f"archivo:{file_id}": file_data
+                                    for file_id, file_data in cache_data.get('known_files', {}).items()},
+                                   prefijo='archivo:')
+            self.diario.poner('meta', {'last_sync_time': cache_data.get('last_sync_time')})
+        if self.events_file.exists():
+            with open(self.events_file, 'r', encoding='utf-8') as f:
+                events_data = json.load(f)
+            self.diario.reemplazar({f"evento:{e['event_id']}": e for e in events_data.get('pending_events', [])},
+                                   prefijo='evento:')
+    
+    @staticmethod
+    def _serializar_archivo(file_info: DriveFileInfo) -> Dict:
+        return {
+            'file_id': file_info.file_id,
+            'name': file_info.name,
+            'size': file_info.size,
+            'modified_time': file_info.modified_time.isoformat(),
+            'created_time': file_info.created_time.isoformat(),
+            'md5_checksum': file_info.md5_checksum,
+            'mime_type': file_info.mime_type,
+            'parent_folder': file_info.parent_folder,
+            'folder_name': file_info.folder_name,
+            'web_view_link': file_info.web_view_link,
+            'download_link': file_info.download_link
+        }
+    
+    @staticmethod
+    def _archivo_desde_dict(file_data: Dict) -> DriveFileInfo:
+        return DriveFileInfo(
+            file_id=file_data['file_id'],
+            name=file_data['name'],
+            size=file_data['size'],
+            modified_time=datetime.fromisoformat(file_data['modified_time']),
+            created_time=datetime.fromisoformat(file_data['created_time']),
+            md5_checksum=file_data.get('md5_checksum', ''),
+            mime_type=file_data.get('mime_type', ''),
+            parent_folder=file_data.get('parent_folder', ''),
+            folder_name=file_data.get('folder_name', ''),
+            web_view_link=file_data.get('web_view_link', ''),
+            download_link=file_data.get('download_link', '')
+        )
+    
     def _save_persistent_state(self):
-        """Guardar estado persistente"""
+        """Guardar estado persistente: el diario solo recibe lo que cambió"""
         try:
-            # Guardar cache de archivos
-            cache_data = {
-                'known_files': {},
-                'last_sync_time': self.last_sync_time.isoformat() if self.last_sync_time else None
-            }
-            
-            for file_id, file_info in self.known_files.items():
-                cache_data['known_files'][file_id] = {
-                    'file_id': file_info.file_id,
-                    'name': file_info.name,
-                    'size': file_info.size,
-                    'modified_time': file_info.modified_time.isoformat(),
-                    'created_time': file_info.created_time.isoformat(),
-                    'md5_checksum': file_info.md5_checksum,
-                    'mime_type': file_info.mime_type,
-                    'parent_folder': file_info.parent_folder,
-                    'folder_name': file_info.folder_name,
-                    'web_view_link': file_info.web_view_link,
-                    'download_link': file_info.download_link
-                }
+            self.diario.reemplazar({f"archivo:{file_id}": self._serializar_archivo(file_info)
+                                    for file_id, file_info in self.known_files.items()},
+                                   prefijo='archivo:')
             
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
+            meta = {'last_sync_time': self.last_sync_time.isoformat() if self.last_sync_time else None}
+            self.diario.reemplazar({'meta': meta}, prefijo='meta')
             
             # Guardar eventos pendientes
-            events_data = {
-                'pending_events': []
-            }
-            
-            for event in self.change_events:
-                if event.processing_status != ProcessingStatus.COMPLETED:
-                    events_data['pending_events'].append({
-                        'event_id': event.event_id,
-                        'file_info': asdict(event.file_info),
-                        'change_type': event.change_type.value,
-                        'detected_at': event.detected_at.isoformat(),
-                        'processed_at': event.processed_at.isoformat() if event.processed_at else None,
-                        'processing_status': event.processing_status.value,
-                        'error_message': event.error_message,
-                        'retry_count': event.retry_count
-                    })
-            
-            with open(self.events_file, 'w', encoding='utf-8') as f:
-                json.dump(events_data, f, ensure_ascii=False, indent=2)
+            self.diario.reemplazar({
+                f"evento:{event.event_id}": {
+                    'event_id': event.event_id,
+                    'file_info': self._serializar_archivo(event.file_info),
+                    'change_type': event.change_type.value,
+                    'detected_at': event.detected_at.isoformat(),
+                    'processed_at': event.processed_at.isoformat() if event.processed_at else None,
+                    'processing_status': event.processing_status.value,
+                    'error_message': event.error_message,
+                    'retry_count': event.retry_count
+                }
+                for event in self.change_events
+                if event.processing_status != ProcessingStatus.COMPLETED
+            }, prefijo='evento:')
                 
         except Exception as e:
             logger.error(f"❌ [DRIVE_MONITOR] Error guardando estado persistente: {e}")
@@ -16,7 +16,6 @@ Sistema avanzado de monitoreo de salud y validación de integridad que:
 import os
 import json
 import time
-import hashlib
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Set, Tuple, Any, Callable
@@ -25,7 +24,11 @@ from enum import Enum
 from pathlib import Path
 import logging
 import statistics
-from collections import deque, defaultdict
+from collections import defaultdict
+
+from integrity_tree import comparar_arboles
+from metrics_store import AlmacenMetricas
+from state_journal import DiarioEstado
 
 logger = logging.getLogger(__name__)
 
@@ -152,9 +155,8 @@ class HealthMonitoringSystem:
         self.resolved_alerts: List[Alert] = []
         self.integrity_reports: List[IntegrityReport] = []
         
-        # Métricas en tiempo real
-        self.metrics_history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=100))
-        self.performance_history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=50))
+        # Métricas en tiempo real: series con memoria acotada (crudo/minuto/hora)
+        self.metricas = AlmacenMetricas()
         
         # Configuración
         self.config = {
@@ -181,9 +183,9 @@ class HealthMonitoringSystem:
         }
         
         # Archivos de persistencia
-        self.alerts_file = Path("health_alerts.json")
-        self.reports_file = Path("integrity_reports.json")
-        self.metrics_file = Path("health_metrics.json")
+        self.alerts_file = Path("health_alerts.json")        # formato anterior (se migra una vez)
+        self.reports_file = Path("integrity_reports.json")   # formato anterior (se migra una vez)
+        self.diario = DiarioEstado(os.getenv('HEALTH_STATE_JOURNAL', 'health_state.journal'))
         
         # Contadores de alertas
         self.alert_counts = defaultdict(int)
@@ -233,6 +235,8 @@ class HealthMonitoringSystem:
         
         # Guardar estado final
         self._save_persistent_state()
+        self.metricas.cerrar()
+        self.diario.cerrar()
         
         logger.info("✅ [HEALTH_MONITOR] Monitoreo detenido")
     
@@ -462,7 +466,7 @@ class HealthMonitoringSystem:
                 timestamp=datetime.now()
             )
             check.metrics.append(metric)
-            self.metrics_history["supabase_response_time"].append((datetime.now(), duration_ms))
+            self.metricas.registrar("supabase_response_time", duration_ms)
             
             check.duration_ms = duration_ms
             check.last_run = datetime.now()
@@ -536,7 +540,7 @@ class HealthMonitoringSystem:
                         timestamp=datetime.now()
                     )
                     check.metrics.append(usage_metric)
-                    self.metrics_history["cloudinary_storage"].append((datetime.now(), storage_usado))
+                    self.metricas.registrar("cloudinary_storage", storage_usado)
             
             check.duration_ms = duration_ms
             check.last_run = datetime.now()
@@ -593,7 +597,7 @@ class HealthMonitoringSystem:
                     timestamp=datetime.now()
                 )
                 check.metrics.append(files_metric)
-                self.metrics_history["google_drive_files"].append((datetime.now(), len(test_pdfs)))
+                self.metricas.registrar("google_drive_files", len(test_pdfs))
                 
             else:
                 check.status = HealthStatus.WARNING
@@ -681,7 +685,7 @@ class HealthMonitoringSystem:
                 timestamp=datetime.now()
             )
             check.metrics.append(search_metric)
-            self.metrics_history["search_performance"].append((datetime.now(), search_duration))
+            self.metricas.registrar("search_performance", search_duration)
             
             check.duration_ms = total_duration
             check.last_run = datetime.now()
@@ -742,7 +746,7 @@ class HealthMonitoringSystem:
                             timestamp=datetime.now()
                         )
                         check.metrics.append(usage_metric)
-                        self.metrics_history["cloudinary_usage"].append((datetime.now(), usage_percent))
+                        self.metricas.registrar("cloudinary_usage", usage_percent)
                         
                 except Exception as e:
                     capacity_issues.append(f"Error verificando Cloudinary: {e}")
@@ -769,7 +773,7 @@ class HealthMonitoringSystem:
                     timestamp=datetime.now()
                 )
                 check.metrics.append(disk_metric)
-                self.metrics_history["disk_usage"].append((datetime.now(), local_usage_percent))
+                self.metricas.registrar("disk_usage", local_usage_percent)
                 
             except Exception as e:
                 capacity_issues.append(f"Error verificando disco local: {e}")
@@ -832,7 +836,12 @@ class HealthMonitoringSystem:
             )
     
     def _run_integrity_check(self) -> IntegrityReport:
-        """Ejecutar verificación completa de integridad"""
+        """
+        Verificación de integridad por árbol de hashes (ver integrity_tree.py).
+        Compara la raíz de cada compañía y solo lee las cotizaciones de los
+        buckets que difieren: el costo crece con la divergencia, no con el
+        total de registros.
+        """
         logger.info("🔍 [INTEGRITY] Iniciando verificación de integridad...")
         
         report_id = f"integrity_{int(time.time())}"
@@ -840,77 +849,51 @@ class HealthMonitoringSystem:
         issues = []
         
         try:
-            # Obtener datos de ambas fuentes
-            supabase_data = {}
-            json_data = {}
-            
-            # Datos de Supabase
+            manager = self.storage_manager.supabase
+            systems_checked = ["json_local"]
+            
+            # Árbol del JSON local (en memoria, se reconstruye solo si el archivo cambió)
+            arbol_local = manager.arbol_integridad_offline()
+            buckets_local = arbol_local.buckets()
+            duplicate_records = len(arbol_local.duplicados)
+            for numero in arbol_local.duplicados:
+                issues.append(f"Número duplicado en JSON local: {numero}")
+            
+            # Huellas de Supabase (tabla integridad_buckets, mantenida por trigger)
+            buckets_remotos = None
             if self.storage_manager.system_health.supabase.value == "online":
-                try:
-                    supabase_result = self.storage_manager.supabase.buscar_cotizaciones("", 1, 10000)
-                    if not supabase_result.get('error'):
-                        for item in supabase_result.get('resultados', []):
-                            numero = item.get('numeroCotizacion')
-                            if numero:
-                                supabase_data[numero] = item
-                except Exception as e:
-                    issues.append(f"Error accediendo a Supabase: {e}")
-            
-            # Datos de JSON local
-            try:
-                json_raw = self.storage_manager.supabase._cargar_datos_offline()
-                for item in json_raw.get('cotizaciones', []):
-                    numero = item.get('numeroCotizacion')
-                    if numero:
-                        json_data[numero] = item
-            except Exception as e:
-                issues.append(f"Error accediendo a JSON local: {e}")
-            
-            # Análisis de consistencia
-            all_numbers = set(supabase_data.keys()) | set(json_data.keys())
-            consistent_records = 0
-            inconsistent_records = 0
-            missing_records = 0
-            
-            for numero in all_numbers:
-                supabase_item = supabase_data.get(numero)
-                json_item = json_data.get(numero)
-                
-                if supabase_item and json_item:
-                    # Comparar campos críticos
-                    if self._compare_records(supabase_item, json_item):
-                        consistent_records += 1
-                    else:
-                        inconsistent_records += 1
-                        issues.append(f"Inconsistencia detectada en: {numero}")
-                        
-                elif supabase_item and not json_item:
-                    missing_records += 1
-                    issues.append(f"Falta en JSON local: {numero}")
-                    
-                elif json_item and not supabase_item:
-                    missing_records += 1
-                    issues.append(f"Falta en Supabase: {numero}")
-            
-            # Detectar duplicados
-            duplicate_records = 0
-            seen_checksums = set()
-            
-            for items_dict in [supabase_data, json_data]:
-                for numero, item in items_dict.items():
-                    checksum = self._calculate_record_checksum(item)
-                    if checksum in seen_checksums:
-                        duplicate_records += 1
-                        issues.append(f"Posible duplicado detectado: {numero}")
-                    seen_checksums.add(checksum)
+                buckets_remotos = manager.obtener_buckets_integridad()
+                if buckets_remotos is None:
+                    issues.append("Árbol de integridad de Supabase no disponible (¿migración v2.6 aplicada?)")
+            
+            if buckets_remotos is None:
+                # Sin lado remoto no hay comparación: todo lo local cuenta como faltante
+                total_records = len(arbol_local)
+                consistent_records = 0
+                inconsistent_records = 0
+                missing_records = total_records
+                if total_records:
+                    issues.append(f"{total_records} registros locales sin verificar contra Supabase")
+            else:
+                systems_checked.insert(0, "supabase")
+                comparacion = comparar_arboles(buckets_remotos, buckets_local,
+                                               manager.obtener_hojas_integridad, arbol_local.hojas)
+                total_records = comparacion['total']
+                consistent_records = comparacion['consistentes']
+                inconsistent_records = len(comparacion['inconsistentes'])
+                missing_records = len(comparacion['faltan_en_a']) + len(comparacion['faltan_en_b'])
+                issues.extend(f"Inconsistencia detectada en: {numero}" for numero in comparacion['inconsistentes'])
+                issues.extend(f"Falta en JSON local: {numero}" for numero in comparacion['faltan_en_b'])
+                issues.extend(f"Falta en Supabase: {numero}" for numero in comparacion['faltan_en_a'])
+                logger.info(f"🔍 [INTEGRITY] {comparacion['companias']} compañías, "
+                            f"{comparacion['buckets_revisados']} buckets revisados")
             
             # Crear reporte
-            total_records = len(all_numbers)
             duration_ms = int((time.time() - start_time) * 1000)
             
             report = IntegrityReport(
                 report_id=report_id,
-                systems_checked=["supabase", "json_local"],
+                systems_checked=systems_checked,
                 total_records=total_records,
                 consistent_records=consistent_records,
                 inconsistent_records=inconsistent_records,
@@ -967,8 +950,11 @@ class HealthMonitoringSystem:
             )
             check.metrics.append(consistency_metric)
             
-            # Guardar reporte
+            # Guardar reporte (una línea al diario; se conservan los últimos 10)
             self.integrity_reports.append(report)
+            self.diario.poner(f"reporte:{report.report_id}", self._serializar_reporte(report))
+            for viejo in self.integrity_reports[:-10]:
+                self.diario.borrar(f"reporte:{viejo.report_id}")
             
             logger.info(f"✅ [INTEGRITY] Verificación completada: {report.consistency_rate:.1f}% consistencia")
             
@@ -992,30 +978,6 @@ class HealthMonitoringSystem:
                 duration_ms=int((time.time() - start_time) * 1000)
             )
     
-    def _compare_records(self, record1: Dict, record2: Dict) -> bool:
-        """Comparar dos registros para detectar inconsistencias"""
-        # Campos críticos que deben ser idénticos
-        critical_fields = ['numeroCotizacion', 'datosGenerales', 'items', 'revision']
-        
-        for field in critical_fields:
-            if field in record1 and field in record2:
-                if record1[field] != record2[field]:
-                    return False
-            elif field in record1 or field in record2:
-                # Uno tiene el campo y el otro no
-                return False
-        
-        return True
-    
-    def _calculate_record_checksum(self, record: Dict) -> str:
-        """Calcular checksum de un registro"""
-        # Campos que participan en el checksum
-        stable_fields = ['numeroCotizacion', 'datosGenerales', 'items']
-        stable_data = {k: v for k, v in record.items() if k in stable_fields}
-        
-        record_string = json.dumps(stable_data, sort_keys=True, ensure_ascii=False)
-        return hashlib.md5(record_string.encode()).hexdigest()
-    
     def _create_alert(self, level: AlertLevel, title: str, description: str, system: str):
         """Crear nueva alerta"""
         if not self.config['enable_alerting']:
@@ -1048,6 +1010,7 @@ class HealthMonitoringSystem:
         
         self.active_alerts.append(alert)
         self.alert_counts[alert_key] += 1
+        self.diario.poner(f"alerta:{alert.alert_id}", self._serializar_alerta(alert))
         
         # Log de la alerta
         level_icons = {
@@ -1092,127 +1055,124 @@ class HealthMonitoringSystem:
             # TODO: Agregar más estrategias de auto-recuperación
     
     def _cleanup_old_metrics(self):
-        """Limpiar métricas antiguas para conservar memoria"""
-        cutoff_time = datetime.now() - timedelta(hours=self.config['metrics_retention_hours'])
-        
-        for metric_name, metric_history in self.metrics_history.items():
-            # Filtrar métricas más recientes que el cutoff
-            filtered_metrics = deque(
-                [(timestamp, value) for timestamp, value in metric_history if timestamp > cutoff_time],
-                maxlen=metric_history.maxlen
-            )
-            self.metrics_history[metric_name] = filtered_metrics
-        
-        # Limpiar métricas de health checks
+        """Recortar las métricas adjuntas a cada check (las series ya están acotadas)"""
+        cutoff_time = datetime.now() - timedelta(hours=24)
         for check in self.health_checks.values():
             check.metrics = [
                 metric for metric in check.metrics[-10:]  # Mantener solo las últimas 10
-                if (datetime.now() - metric.timestamp).hours <= 24
+                if metric.timestamp > cutoff_time
             ]
     
     def _load_persistent_state(self):
-        """Cargar estado persistente"""
+        """Cargar estado persistente desde el diario"""
         try:
+            if not self.diario.existia:
+                self._migrar_estado_json()
+            
             # Cargar alertas
-            if self.alerts_file.exists():
-                with open(self.alerts_file, 'r', encoding='utf-8') as f:
-                    alerts_data = json.load(f)
-                
-                for alert_data in alerts_data.get('active_alerts', []):
-                    alert = Alert(
-                        alert_id=alert_data['alert_id'],
-                        level=AlertLevel(alert_data['level']),
-                        title=alert_data['title'],
-                        description=alert_data['description'],
-                        system=alert_data['system'],
-                        timestamp=datetime.fromisoformat(alert_data['timestamp']),
-                        acknowledged=alert_data.get('acknowledged', False),
-                        resolved=alert_data.get('resolved', False),
-                        resolution_message=alert_data.get('resolution_message', ''),
-                        metadata=alert_data.get('metadata', {})
-                    )
-                    
-                    if not alert.resolved:
-                        self.active_alerts.append(alert)
-                    else:
-                        self.resolved_alerts.append(alert)
+            for _, alert_data in self.diario.items('alerta:'):
+                alert = Alert(
+                    alert_id=alert_data['alert_id'],
+                    level=AlertLevel(alert_data['level']),
+                    title=alert_data['title'],
+                    description=alert_data['description'],
+                    system=alert_data['system'],
+                    timestamp=datetime.fromisoformat(alert_data['timestamp']),
+                    acknowledged=alert_data.get('acknowledged', False),
+                    resolved=alert_data.get('resolved', False),
+                    resolution_message=alert_data.get('resolution_message', ''),
+                    metadata=alert_data.get('metadata', {})
+                )
                 
+                if not alert.resolved:
+                    self.active_alerts.append(alert)
+                else:
+                    self.resolved_alerts.append(alert)
+            
+            if self.active_alerts:
                 logger.info(f"📂 [HEALTH_MONITOR] {len(self.active_alerts)} alertas activas cargadas")
             
             # Cargar reportes de integridad
-            if self.reports_file.exists():
-                with open(self.reports_file, 'r', encoding='utf-8') as f:
-                    reports_data = json.load(f)
-                
-                for report_data in reports_data.get('integrity_reports', []):
-                    report = IntegrityReport(
-                        report_id=report_data['report_id'],
-                        systems_checked=report_data['systems_checked'],
-                        total_records=report_data['total_records'],
-                        consistent_records=report_data['consistent_records'],
-                        inconsistent_records=report_data['inconsistent_records'],
-                        missing_records=report_data['missing_records'],
-                        duplicate_records=report_data['duplicate_records'],
-                        corruption_detected=report_data['corruption_detected'],
-                        issues=report_data['issues'],
-                        timestamp=datetime.fromisoformat(report_data['timestamp']),
-                        duration_ms=report_data['duration_ms']
-                    )
-                    self.integrity_reports.append(report)
-                
+            for _, report_data in self.diario.items('reporte:'):
+                report = IntegrityReport(
+                    report_id=report_data['report_id'],
+                    systems_checked=report_data['systems_checked'],
+                    total_records=report_data['total_records'],
+                    consistent_records=report_data['consistent_records'],
+                    inconsistent_records=report_data['inconsistent_records'],
+                    missing_records=report_data['missing_records'],
+                    duplicate_records=report_data['duplicate_records'],
+                    corruption_detected=report_data['corruption_detected'],
+                    issues=report_data['issues'],
+                    timestamp=datetime.fromisoformat(report_data['timestamp']),
+                    duration_ms=report_data['duration_ms']
+                )
+                self.integrity_reports.append(report)
+            self.integrity_reports.sort(key=lambda r: r.timestamp)
+            
+            if self.integrity_reports:
                 logger.info(f"📋 [HEALTH_MONITOR] {len(self.integrity_reports)} reportes de integridad cargados")
                 
         except Exception as e:
             logger.error(f"❌ [HEALTH_MONITOR] Error cargando estado persistente: {e}")
     
+    def _migrar_estado_json(self):
+        """Migración única desde health_alerts.json / integrity_reports.json"""
+        if self.alerts_file.exists():
+            with open(self.alerts_file, 'r', encoding='utf-8') as f:
+                alerts_data = json.load(f)
+            self.diario.reemplazar({f"alerta:{a['alert_id']}": a for a in alerts_data.get('active_alerts', [])},
+                                   prefijo='alerta:')
+        if self.reports_file.exists():
+            with open(self.reports_file, 'r', encoding='utf-8') as f:
+                reports_data = json.load(f)
+            self.diario.reemplazar({f"reporte:{r['report_id']}": r
+                                    for r in reports_data.get('integrity_reports', [])[-10:]},
+                                   prefijo='reporte:')
+    
+    @staticmethod
+    def _serializar_alerta(alert: Alert) -> Dict:
+        return {
+            'alert_id': alert.alert_id,
+            'level': alert.level.value,
+            'title': alert.title,
+            'description': alert.description,
+            'system': alert.system,
+            'timestamp': alert.timestamp.isoformat(),
+            'acknowledged': alert.acknowledged,
+            'resolved': alert.resolved,
+            'resolution_message': alert.resolution_message,
+            'metadata': alert.metadata
+        }
+    
+    @staticmethod
+    def _serializar_reporte(report: IntegrityReport) -> Dict:
+        return {
+            'report_id': report.report_id,
+            'systems_checked': report.systems_checked,
+            'total_records': report.total_records,
+            'consistent_records': report.consistent_records,
+            'inconsistent_records': report.inconsistent_records,
+            'missing_records': report.missing_records,
+            'duplicate_records': report.duplicate_records,
+            'corruption_detected': report.corruption_detected,
+            'issues': report.issues,
+            'timestamp': report.timestamp.isoformat(),
+            'duration_ms': report.duration_ms
+        }
+    
     def _save_persistent_state(self):
-        """Guardar estado persistente"""
+        """Guardar estado persistente: el diario solo recibe lo que cambió"""
         try:
-            # Guardar alertas
-            alerts_data = {
-                'active_alerts': [],
-                'resolved_alerts': []
-            }
-            
-            for alert in self.active_alerts:
-                alerts_data['active_alerts'].append({
-                    'alert_id': alert.alert_id,
-                    'level': alert.level.value,
-                    'title': alert.title,
-                    'description': alert.description,
-                    'system': alert.system,
-                    'timestamp': alert.timestamp.isoformat(),
-                    'acknowledged': alert.acknowledged,
-                    'resolved': alert.resolved,
-                    'resolution_message': alert.resolution_message,
-                    'metadata': alert.metadata
-                })
-            
-            with open(self.alerts_file, 'w', encoding='utf-8') as f:
-                json.dump(alerts_data, f, ensure_ascii=False, indent=2)
-            
-            # Guardar reportes de integridad (solo los últimos 10)
-            reports_data = {
-                'integrity_reports': []
-            }
-            
-            for report in self.integrity_reports[-10:]:
-                reports_data['integrity_reports'].append({
-                    'report_id': report.report_id,
-                    'systems_checked': report.systems_checked,
-                    'total_records': report.total_records,
-                    'consistent_records': report.consistent_records,
-                    'inconsistent_records': report.inconsistent_records,
-                    'missing_records': report.missing_records,
-                    'duplicate_records': report.duplicate_records,
-                    'corruption_detected': report.corruption_detected,
-                    'issues': report.issues,
-                    'timestamp': report.timestamp.isoformat(),
-                    'duration_ms': report.duration_ms
-                })
-            
-            with open(self.reports_file, 'w', encoding='utf-8') as f:
-                json.dump(reports_data, f, ensure_ascii=False, indent=2)
+            # Alertas activas y reportes de integridad (solo los últimos 10)
+            self.diario.reemplazar({f"alerta:{a.alert_id}": self._serializar_alerta(a) for a in self.active_alerts},
+                                   prefijo='alerta:')
+            self.diario.reemplazar({f"reporte:{r.report_id}": self._serializar_reporte(r)
+                                    for r in self.integrity_reports[-10:]},
+                                   prefijo='reporte:')
+            
+            # Snapshot binario de las series (tamaño fijo; la bitácora se reinicia)
+            self.metricas.guardar()
                 
         except Exception as e:
             logger.error(f"❌ [HEALTH_MONITOR] Error guardando estado persistente: {e}")
@@ -1256,15 +1216,27 @@ class HealthMonitoringSystem:
                 "consistency_rate": self.integrity_reports[-1].consistency_rate if self.integrity_reports else None,
                 "issues_detected": len(self.integrity_reports[-1].issues) if self.integrity_reports else 0
             },
+            "metrics": {nombre: self.metricas.resumen(nombre) for nombre in self.metricas.nombres()},
             "uptime_seconds": uptime.total_seconds(),
             "is_monitoring": self.is_monitoring
         }
     
+    def get_metric_series(self, nombre: str, horas: float = 24, resolucion: str = 'auto') -> Dict:
+        """Serie de una métrica para dashboards (nivel crudo/minuto/hora según el rango)"""
+        desde = time.time() - horas * 3600
+        return {
+            "metric": nombre,
+            "desde": datetime.fromtimestamp(desde).isoformat(),
+            "puntos": self.metricas.consultar(nombre, desde=desde, resolucion=resolucion),
+            "resumen": self.metricas.resumen(nombre, segundos=horas * 3600)
+        }
+    
     def acknowledge_alert(self, alert_id: str) -> bool:
         """Reconocer una alerta"""
         for alert in self.active_alerts:
             if alert.alert_id == alert_id:
                 alert.acknowledged = True
+                self.diario.poner(f"alerta:{alert.alert_id}", self._serializar_alerta(alert))
                 logger.info(f"✅ [ALERT] Alerta reconocida: {alert_id}")
                 return True
         return False
@@ -1279,6 +1251,7 @@ class HealthMonitoringSystem:
                 # Mover a alertas resueltas
                 self.active_alerts.remove(alert)
                 self.resolved_alerts.append(alert)
+                self.diario.borrar(f"alerta:{alert.alert_id}")
                 
                 logger.info(f"✅ [ALERT] Alerta resuelta: {alert_id}")
                 return True
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ÁRBOL DE INTEGRIDAD POR COMPAÑÍA
+================================
+
+Verificación de consistencia Supabase <-> JSON local sin leer todas las
+cotizaciones. Cada cotización tiene un hash de contenido calculado al
+escribirla; las cotizaciones de cada compañía se reparten en 256 buckets
+(primer byte del md5 del número) y cada bucket guarda una huella (XOR de
+las hojas) y un conteo. Es un árbol de Merkle de dos niveles:
+
+    raíz (compañía) = XOR de las huellas de sus buckets + total de registros
+    bucket          = XOR de las hojas + registros del bucket
+    hoja            = primeros 64 bits del hash de contenido
+
+El XOR permite mantener la huella incrementalmente (sacar la hoja vieja y
+meter la nueva) tanto en PostgreSQL (trigger de migrations/v2.6_integridad_merkle.sql)
+como en memoria para el JSON. La comparación baja solo por las ramas que
+difieren: si las raíces coinciden no se lee ninguna cotización, y si no, solo
+las hojas de los buckets distintos. El costo es proporcional a la divergencia.
+
+Uso:
+    python -m integrity_tree verificar     (compara Supabase contra el JSON local)
+    python -m integrity_tree rellenar      (calcula hash_contenido de filas antiguas)
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Misma convención que cotizaciones_generacion: company_id NULL = compañía "cero"
+SIN_COMPANIA = '00000000-0000-0000-0000-000000000000'
+NUM_BUCKETS = 256
+
+
+def hash_contenido(cotizacion: Dict) -> str:
+    """
+    Hash canónico del contenido de una cotización (sha256 hex).
+
+    Acepta la forma de la app (numeroCotizacion/datosGenerales/condiciones/
+    items) y normaliza como la columna datos_generales: condiciones y texto
+    introductorio van dentro de datosGenerales. Así el JSON local y la fila
+    de PostgreSQL producen el mismo hash. Timestamps, usuario y observaciones
+    no participan.
+    """
+    datos_generales = dict(cotizacion.get('datosGenerales') or {})
+    condiciones = cotizacion.get('condiciones') if 'condiciones' in cotizacion else datos_generales.get('condiciones')
+    datos_generales['condiciones'] = condiciones or {}
+    texto_intro = cotizacion.get('textoIntroductorio') or datos_generales.get('textoIntroductorio', '')
+    if texto_intro:
+        datos_generales['textoIntroductorio'] = texto_intro
+
+    canonico = json.dumps({
+        'numeroCotizacion': cotizacion.get('numeroCotizacion'),
+        'datosGenerales': datos_generales,
+        'items': cotizacion.get('items') or [],
+    }, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+
+def bucket_de(numero: str) -> int:
+    """Bucket del número: get_byte(decode(md5(numero), 'hex'), 0) en PostgreSQL"""
+    return hashlib.md5(numero.encode('utf-8')).digest()[0]
+
+
+def hoja(hash_hex: Optional[str]) -> int:
+    """Hoja de 64 bits con signo: ('x' || substr(hash, 1, 16))::bit(64)::bigint"""
+    if not hash_hex:
+        return 0
+    valor = int(hash_hex[:16], 16)
+    return valor - (1 << 64) if valor >= (1 << 63) else valor
+
+
+def clave_compania(company_id) -> str:
+    return str(company_id) if company_id else SIN_COMPANIA
+
+
+def raiz(buckets: Dict[int, Tuple[int, int]]) -> Tuple[int, int]:
+    """Raíz de una compañía: (XOR de huellas, total de registros)"""
+    huella, registros = 0, 0
+    for huella_bucket, registros_bucket in buckets.values():
+        huella ^= huella_bucket
+        registros += registros_bucket
+    return huella, registros
+
+
+class ArbolIntegridad:
+    """
+    Árbol en memoria (lado JSON local). Mantiene, por compañía y bucket, las
+    hojas {numero: hash} y la huella XOR con su conteo; actualizar() y
+    eliminar() son O(1).
+    """
+
+    def __init__(self):
+        self._hojas: Dict[str, Dict[int, Dict[str, str]]] = {}
+        self._buckets: Dict[str, Dict[int, List[int]]] = {}
+        self._ubicacion: Dict[str, str] = {}  # numero -> compañía
+        self._lock = threading.Lock()
+        self.duplicados: List[str] = []
+        self.version = None
+
+    @classmethod
+    def desde_cotizaciones(cls, cotizaciones: Iterable[Dict], version=None) -> 'ArbolIntegridad':
+        """Construye el árbol completo; los números repetidos quedan en duplicados (gana el último)"""
+        arbol = cls()
+        for cotizacion in cotizaciones:
+            numero = cotizacion.get('numeroCotizacion')
+            if not numero:
+                continue
+            if numero in arbol._ubicacion:
+                arbol.duplicados.append(numero)
+            arbol.actualizar(cotizacion.get('company_id'), numero, hash_contenido(cotizacion))
+        arbol.version = version
+        return arbol
+
+    def actualizar(self, company_id, numero: str, hash_hex: str):
+        compania = clave_compania(company_id)
+        bucket = bucket_de(numero)
+        with self._lock:
+            self._quitar(numero)
+            self._hojas.setdefault(compania, {}).setdefault(bucket, {})[numero] = hash_hex
+            nodo = self._buckets.setdefault(compania, {}).setdefault(bucket, [0, 0])
+            nodo[0] ^= hoja(hash_hex)
+            nodo[1] += 1
+            self._ubicacion[numero] = compania
+
+    def eliminar(self, numero: str):
+        with self._lock:
+            self._quitar(numero)
+
+    def _quitar(self, numero: str):
+        compania = self._ubicacion.pop(numero, None)
+        if compania is None:
+            return
+        bucket = bucket_de(numero)
+        hash_hex = self._hojas[compania][bucket].pop(numero)
+        nodo = self._buckets[compania][bucket]
+        nodo[0] ^= hoja(hash_hex)
+        nodo[1] -= 1
+        if not nodo[1]:
+            del self._buckets[compania][bucket]
+            del self._hojas[compania][bucket]
+
+    def buckets(self) -> Dict[str, Dict[int, Tuple[int, int]]]:
+        """{compañía: {bucket: (huella, registros)}} (solo buckets no vacíos)"""
+        with self._lock:
+            return {compania: {bucket: tuple(nodo) for bucket, nodo in nodos.items()}
+                    for compania, nodos in self._buckets.items() if nodos}
+
+    def hojas(self, company_id, buckets: Iterable[int]) -> Dict[int, Dict[str, str]]:
+        """Hojas {bucket: {numero: hash}} de los buckets pedidos de una compañía"""
+        with self._lock:
+            por_bucket = self._hojas.get(clave_compania(company_id), {})
+            return {bucket: dict(por_bucket.get(bucket, {})) for bucket in buckets}
+
+    def __len__(self):
+        return len(self._ubicacion)
+
+
+def comparar_arboles(buckets_a: Dict[str, Dict[int, Tuple[int, int]]],
+                     buckets_b: Dict[str, Dict[int, Tuple[int, int]]],
+                     hojas_a: Callable[[str, List[int]], Dict[int, Dict[str, str]]],
+                     hojas_b: Callable[[str, List[int]], Dict[int, Dict[str, str]]]) -> Dict:
+    """
+    Compara dos árboles bajando solo por las ramas distintas.
+
+    Por compañía compara primero la raíz; si difiere, compara los buckets y
+    pide a cada lado solo las hojas de los buckets distintos (una llamada
+    por lado y compañía).
+
+    Returns:
+        Dict con total, consistentes, inconsistentes, faltan_en_a,
+        faltan_en_b (listas de números), companias y buckets_revisados
+    """
+    resultado = {'total': 0, 'consistentes': 0, 'inconsistentes': [], 'faltan_en_a': [],
+                 'faltan_en_b': [], 'companias': 0, 'buckets_revisados': 0}
+
+    for compania in sorted(set(buckets_a) | set(buckets_b)):
+        nodos_a = buckets_a.get(compania, {})
+        nodos_b = buckets_b.get(compania, {})
+        resultado['companias'] += 1
+        raiz_a = raiz(nodos_a)
+        if raiz_a == raiz(nodos_b):
+            registros = raiz_a[1]
+            resultado['total'] += registros
+            resultado['consistentes'] += registros
+            continue
+
+        distintos = sorted(b for b in set(nodos_a) | set(nodos_b) if nodos_a.get(b) != nodos_b.get(b))
+        for bucket, nodo in nodos_a.items():
+            if bucket not in distintos:
+                resultado['total'] += nodo[1]
+                resultado['consistentes'] += nodo[1]
+        if not distintos:
+            continue
+
+        resultado['buckets_revisados'] += len(distintos)
+        hojas_de_a = hojas_a(compania, distintos)
+        hojas_de_b = hojas_b(compania, distintos)
+        for bucket in distintos:
+            de_a = hojas_de_a.get(bucket, {})
+            de_b = hojas_de_b.get(bucket, {})
+            for numero in sorted(set(de_a) | set(de_b)):
+                resultado['total'] += 1
+                if numero not in de_a:
+                    resultado['faltan_en_a'].append(numero)
+                elif numero not in de_b:
+                    resultado['faltan_en_b'].append(numero)
+                elif de_a[numero] != de_b[numero]:
+                    resultado['inconsistentes'].append(numero)
+                else:
+                    resultado['consistentes'] += 1
+
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Árbol de integridad Supabase <-> JSON local')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    sub.add_parser('verificar', help='Comparar Supabase contra el JSON local')
+    rellenar = sub.add_parser('rellenar', help='Calcular hash_contenido de filas antiguas')
+    rellenar.add_argument('--lote', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    from supabase_manager import SupabaseManager
+    manager = SupabaseManager()
+    try:
+        if args.comando == 'rellenar':
+            print(f"[INTEGRIDAD] {manager.rellenar_hashes_integridad(args.lote)} filas actualizadas")
+            return 0
+
+        remoto = manager.obtener_buckets_integridad()
+        if remoto is None:
+            print("[INTEGRIDAD] Árbol remoto no disponible (¿migración v2.6 aplicada?)")
+            return 1
+        local = manager.arbol_integridad_offline()
+        resultado = comparar_arboles(remoto, local.buckets(), manager.obtener_hojas_integridad, local.hojas)
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        return 0 if not (resultado['inconsistentes'] or resultado['faltan_en_a'] or resultado['faltan_en_b']) else 2
+    finally:
+        manager.close()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+COLA LOCAL DE TRABAJOS EN SEGUNDO PLANO
+=======================================
+
+Cola durable sobre SQLite (sin broker externo) para los efectos secundarios
+lentos que antes corrían dentro del request: subida de PDFs e imágenes a
+Supabase Storage, generación de texto con IA, escaneos de Drive/Storage y
+migraciones masivas de administración. El request solo encola y responde.
+
+Características:
+- Prioridades: número menor sale primero (PRIORIDAD_ALTA / NORMAL / BAJA)
+- Reintentos con backoff exponencial y jitter; ErrorPermanente no reintenta
+- Claves de idempotencia: encolar dos veces la misma clave devuelve el mismo
+  trabajo mientras siga pendiente, en curso o completado
+- Dead-letter: los trabajos que agotan sus intentos pasan a trabajos_fallidos
+  con el historial de errores, y se pueden reintentar desde ahí
+- Arrendamiento (lease): si un worker muere a mitad de un trabajo, otro lo
+  retoma cuando vence bloqueado_hasta
+- Varios procesos comparten el archivo (WAL); el reclamo de cada trabajo es
+  una transacción BEGIN IMMEDIATE, así que nunca lo toman dos workers
+- Hilos trabajadores dentro de cada proceso web, o un proceso dedicado:
+      JOB_QUEUE_WORKERS=0 gunicorn ...      (la web solo encola)
+      python -m job_queue trabajar          (proceso trabajador)
+
+Variables de entorno:
+    JOB_QUEUE_PATH           archivo SQLite (default cola_trabajos.db)
+    JOB_QUEUE_WORKERS        hilos trabajadores por proceso (default 2; 0 = solo encolar)
+    JOB_QUEUE_MAX_INTENTOS   intentos por trabajo (default 5)
+    JOB_QUEUE_BACKOFF_BASE   segundos del primer reintento (default 5)
+    JOB_QUEUE_BACKOFF_MAX    tope del backoff en segundos (default 600)
+    JOB_QUEUE_LEASE          segundos de arrendamiento por trabajo (default 300)
+    JOB_QUEUE_POLL           segundos entre sondeos con la cola vacía (default 1)
+    JOB_QUEUE_RETENCION_HORAS  horas que se conservan los completados (default 72)
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIORIDAD_ALTA = 0      # el usuario espera el resultado (texto IA)
+PRIORIDAD_NORMAL = 5    # efectos secundarios de un guardado
+PRIORIDAD_BAJA = 9      # migraciones y escaneos masivos
+
+ESTADOS = ('pendiente', 'en_curso', 'completado', 'fallido')
+
+
+class ErrorPermanente(Exception):
+    """Error que no se arregla reintentando: el trabajo pasa directo a dead-letter"""
+
+
+class ColaTrabajos:
+    """Cola de trabajos persistente en SQLite con hilos trabajadores"""
+
+    def __init__(self, db_path: str = None, hilos: int = None, contexto: Callable = None):
+        self.db_path = db_path or os.getenv('JOB_QUEUE_PATH', 'cola_trabajos.db')
+        self.config = {
+            "hilos": int(os.getenv('JOB_QUEUE_WORKERS', '2')) if hilos is None else hilos,
+            "max_intentos": int(os.getenv('JOB_QUEUE_MAX_INTENTOS', '5')),
+            "backoff_base": float(os.getenv('JOB_QUEUE_BACKOFF_BASE', '5')),
+            "backoff_max": float(os.getenv('JOB_QUEUE_BACKOFF_MAX', '600')),
+            "lease_segundos": float(os.getenv('JOB_QUEUE_LEASE', '300')),
+            "sondeo_segundos": float(os.getenv('JOB_QUEUE_POLL', '1')),
+            "retencion_horas": float(os.getenv('JOB_QUEUE_RETENCION_HORAS', '72')),
+        }
+        # contexto(): context manager alrededor de cada trabajo (p. ej. app.app_context)
+        self.contexto = contexto
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._tareas = {}
+        self._local = threading.local()
+        self._hay_trabajo = threading.Event()
+        self._stop_event = threading.Event()
+        self._hilos = []
+        self._lock = threading.Lock()
+        self._ultima_purga = 0.0
+        self.procesados = {'completados': 0, 'reintentos': 0, 'fallidos': 0}
+
+        self._crear_esquema()
+
+    # ──────────────────────────────────────────────────────
+    # ALMACENAMIENTO
+    # ──────────────────────────────────────────────────────
+
+    def _conexion(self) -> sqlite3.Connection:
+        """Una conexión por hilo, en autocommit (las transacciones son explícitas)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _crear_esquema(self):
+        self._conexion().executescript("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                payload TEXT NOT NULL DEFAULT '{}',
+                adjunto BLOB,
+                prioridad INTEGER NOT NULL DEFAULT 5,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                clave_idempotencia TEXT UNIQUE,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                max_intentos INTEGER NOT NULL,
+                disponible_en REAL NOT NULL,
+                bloqueado_hasta REAL,
+                worker TEXT,
+                ultimo_error TEXT,
+                errores TEXT NOT NULL DEFAULT '[]',
+                resultado TEXT,
+                company_id TEXT,
+                usuario TEXT,
+                creado_en REAL NOT NULL,
+                actualizado_en REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_trabajos_listos
+                ON trabajos(estado, prioridad, disponible_en, id);
+
+            CREATE TABLE IF NOT EXISTS trabajos_fallidos (
+                id INTEGER PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                adjunto BLOB,
+                prioridad INTEGER NOT NULL,
+                clave_idempotencia TEXT,
+                intentos INTEGER NOT NULL,
+                max_intentos INTEGER NOT NULL,
+                ultimo_error TEXT,
+                errores TEXT NOT NULL,
+                company_id TEXT,
+                usuario TEXT,
+                creado_en REAL NOT NULL,
+                fallido_en REAL NOT NULL
+            );
+        """)
+
+    # ──────────────────────────────────────────────────────
+    # REGISTRO DE TAREAS Y ENCOLADO
+    # ──────────────────────────────────────────────────────
+
+    def registrar_tarea(self, tipo: str, funcion: Callable, max_intentos: int = None,
+                        lease_segundos: float = None):
+        """
+        Registra el manejador de un tipo de trabajo.
+
+        funcion(payload: dict, adjunto: bytes | None) -> resultado serializable a JSON.
+        Una excepción reintenta con backoff; ErrorPermanente va directo a dead-letter.
+        """
+        self._tareas[tipo] = {
+            'funcion': funcion,
+            'max_intentos': max_intentos,
+            'lease_segundos': lease_segundos,
+        }
+
+    def encolar(self, tipo: str, payload: Dict = None, prioridad: int = PRIORIDAD_NORMAL,
+                clave_idempotencia: str = None, adjunto: bytes = None, retraso: float = 0,
+                max_intentos: int = None, company_id: str = None, usuario: str = None) -> Dict:
+        """
+        Agrega un trabajo a la cola.
+
+        Returns:
+            {"id", "estado", "duplicado"}; duplicado=True si la clave de
+            idempotencia ya tenía un trabajo vigente (se devuelve ese)
+        """
+        tarea = self._tareas.get(tipo, {})
+        intentos = max_intentos or tarea.get('max_intentos') or self.config['max_intentos']
+        ahora = time.time()
+        conn = self._conexion()
+        try:
+            cursor = conn.execute(
+                """INSERT INTO trabajos (tipo, payload, adjunto, prioridad, clave_idempotencia, max_intentos,
+                                         disponible_en, company_id, usuario, creado_en, actualizado_en)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (tipo, json.dumps(payload or {}, ensure_ascii=False, default=str), adjunto, prioridad,
+                 clave_idempotencia, intentos, ahora + retraso, company_id, usuario, ahora, ahora))
+        except sqlite3.IntegrityError:
+            existente = conn.execute("SELECT id, estado FROM trabajos WHERE clave_idempotencia = ?",
+                                     (clave_idempotencia,)).fetchone()
+            if existente is None:
+                # Se completó y purgó entre el INSERT y el SELECT: reintentar una vez
+                return self.encolar(tipo, payload, prioridad, clave_idempotencia, adjunto, retraso,
+                                    max_intentos, company_id, usuario)
+            return {"id": existente['id'], "estado": existente['estado'], "duplicado": True}
+
+        self._hay_trabajo.set()
+        logger.debug("[COLA] Encolado %s #%d (prioridad %d)", tipo, cursor.lastrowid, prioridad)
+        return {"id": cursor.lastrowid, "estado": "pendiente", "duplicado": False}
+
+    # ──────────────────────────────────────────────────────
+    # PROCESAMIENTO
+    # ──────────────────────────────────────────────────────
+
+    def _reclamar(self) -> Optional[sqlite3.Row]:
+        """Toma el siguiente trabajo listo (o con lease vencido) de forma atómica"""
+        ahora = time.time()
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conn.execute(
+                """SELECT * FROM trabajos
+                   WHERE (estado = 'pendiente' AND disponible_en <= ?)
+                      OR (estado = 'en_curso' AND bloqueado_hasta < ?)
+                   ORDER BY prioridad, disponible_en, id LIMIT 1""",
+                (ahora, ahora)).fetchone()
+            if fila is not None:
+                lease = self._tareas.get(fila['tipo'], {}).get('lease_segundos') or self.config['lease_segundos']
+                conn.execute(
+                    """UPDATE trabajos SET estado = 'en_curso', intentos = intentos + 1, bloqueado_hasta = ?,
+                                           worker = ?, actualizado_en = ? WHERE id = ?""",
+                    (ahora + lease, f"{self.worker_id}:{threading.current_thread().name}", ahora, fila['id']))
+            conn.execute("COMMIT")
+            return fila
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _backoff(self, intentos: int) -> float:
+        """Exponencial con jitter: base * 2^(n-1), acotado, entre 50% y 100% del valor"""
+        espera = min(self.config['backoff_max'], self.config['backoff_base'] * (2 ** max(0, intentos - 1)))
+        return espera * random.uniform(0.5, 1.0)
+
+    def procesar_siguiente(self) -> bool:
+        """Ejecuta un trabajo si hay alguno listo. Returns: True si procesó uno"""
+        fila = self._reclamar()
+        if fila is None:
+            return False
+
+        trabajo_id, tipo = fila['id'], fila['tipo']
+        intento = fila['intentos'] + 1
+        tarea = self._tareas.get(tipo)
+        conn = self._conexion()
+
+        if tarea is None:
+            # Sin manejador en este proceso (aún registrándose o versión vieja): devolverlo sin gastar intento
+            conn.execute("""UPDATE trabajos SET estado = 'pendiente', intentos = intentos - 1, bloqueado_hasta = NULL,
+                                                disponible_en = ?, actualizado_en = ? WHERE id = ?""",
+                         (time.time() + 5, time.time(), trabajo_id))
+            logger.warning("[COLA] Sin manejador para %s #%d, se devuelve a la cola", tipo, trabajo_id)
+            return True
+
+        inicio = time.perf_counter()
+        try:
+            with (self.contexto() if self.contexto else nullcontext()):
+                resultado = tarea['funcion'](json.loads(fila['payload']), fila['adjunto'])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            permanente = isinstance(e, ErrorPermanente)
+            logger.warning("[COLA] %s #%s intento %d/%d falló: %s",
+                           tipo, trabajo_id, intento, fila['max_intentos'], error)
+            self._registrar_fallo(fila, intento, error, permanente)
+            return True
+
+        ahora = time.time()
+        conn.execute(
+            """UPDATE trabajos SET estado = 'completado', resultado = ?, bloqueado_hasta = NULL, adjunto = NULL,
+                                   ultimo_error = NULL, actualizado_en = ? WHERE id = ?""",
+            (json.dumps(resultado, ensure_ascii=False, default=str), ahora, trabajo_id))
+        with self._lock:
+            self.procesados['completados'] += 1
+        logger.info("[COLA] %s #%d completado en %.0f ms", tipo, trabajo_id, (time.perf_counter() - inicio) * 1000)
+        return True
+
+    def _registrar_fallo(self, fila: sqlite3.Row, intento: int, error: str, permanente: bool):
+        ahora = time.time()
+        errores = json.loads(fila['errores'] or '[]')
+        errores.append({"intento": intento, "error": error[:2000], "fecha": datetime.now().isoformat()})
+        conn = self._conexion()
+
+        if not permanente and intento < fila['max_intentos']:
+            conn.execute(
+                """UPDATE trabajos SET estado = 'pendiente', disponible_en = ?, bloqueado_hasta = NULL,
+                                       ultimo_error = ?, errores = ?, actualizado_en = ? WHERE id = ?""",
+                (ahora + self._backoff(intento), error[:2000], json.dumps(errores), ahora, fila['id']))
+            with self._lock:
+                self.procesados['reintentos'] += 1
+            return
+
+        # Dead-letter: mover con su historial de errores
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """INSERT OR REPLACE INTO trabajos_fallidos
+                   (id, tipo, payload, adjunto, prioridad, clave_idempotencia, intentos, max_intentos,
+                    ultimo_error, errores, company_id, usuario, creado_en, fallido_en)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (fila['id'], fila['tipo'], fila['payload'], fila['adjunto'], fila['prioridad'],
+                 fila['clave_idempotencia'], intento, fila['max_intentos'], error[:2000], json.dumps(errores),
+                 fila['company_id'], fila['usuario'], fila['creado_en'], ahora))
+            conn.execute("DELETE FROM trabajos WHERE id = ?", (fila['id'],))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self.procesados['fallidos'] += 1
+        logger.error("[COLA] %s #%s movido a dead-letter tras %d intento(s)", fila['tipo'], fila['id'], intento)
+
+    def procesar_pendientes(self, limite: int = None) -> int:
+        """Procesa en este hilo los trabajos listos (pruebas, CLI). Returns: cuántos procesó"""
+        procesados = 0
+        while (limite is None or procesados < limite) and self.procesar_siguiente():
+            procesados += 1
+        return procesados
+
+    # ──────────────────────────────────────────────────────
+    # CONSULTAS (API DE ESTADO)
+    # ──────────────────────────────────────────────────────
+
+    @staticmethod
+    def _a_dict(fila: sqlite3.Row, estado: str = None) -> Dict:
+        datos = dict(fila)
+        datos.pop('adjunto', None)
+        datos['tiene_adjunto'] = fila['adjunto'] is not None
+        datos['payload'] = json.loads(datos['payload'] or '{}')
+        datos['errores'] = json.loads(datos['errores'] or '[]')
+        if datos.get('resultado') is not None:
+            datos['resultado'] = json.loads(datos['resultado'])
+        if estado:
+            datos['estado'] = estado
+        return datos
+
+    def obtener(self, trabajo_id: int) -> Optional[Dict]:
+        """Trabajo por id, buscando también en dead-letter (estado 'fallido')"""
+        conn = self._conexion()
+        fila = conn.execute("SELECT * FROM trabajos WHERE id = ?", (trabajo_id,)).fetchone()
+        if fila is not None:
+            return self._a_dict(fila)
+        fila = conn.execute("SELECT * FROM trabajos_fallidos WHERE id = ?", (trabajo_id,)).fetchone()
+        return self._a_dict(fila, 'fallido') if fila is not None else None
+
+    def listar(self, estado: str = None, tipo: str = None, limite: int = 50) -> List[Dict]:
+        """Trabajos más recientes primero; estado='fallido' lista la dead-letter"""
+        tabla = 'trabajos_fallidos' if estado == 'fallido' else 'trabajos'
+        condiciones, params = [], []
+        if estado and estado != 'fallido':
+            condiciones.append("estado = ?")
+            params.append(estado)
+        if tipo:
+            condiciones.append("tipo = ?")
+            params.append(tipo)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        filas = self._conexion().execute(
+            f"SELECT * FROM {tabla} {where} ORDER BY id DESC LIMIT ?", params + [int(limite)]).fetchall()
+        return [self._a_dict(f, 'fallido' if tabla == 'trabajos_fallidos' else None) for f in filas]
+
+    def reintentar(self, trabajo_id: int) -> bool:
+        """Devuelve un trabajo de dead-letter a la cola con sus intentos en cero"""
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conn.execute("SELECT * FROM trabajos_fallidos WHERE id = ?", (trabajo_id,)).fetchone()
+            if fila is None:
+                conn.execute("ROLLBACK")
+                return False
+            ahora = time.time()
+            clave = fila['clave_idempotencia']
+            if clave and conn.execute("SELECT 1 FROM trabajos WHERE clave_idempotencia = ?", (clave,)).fetchone():
+                clave = None  # Ya hay un trabajo vigente con esa clave
+            conn.execute(
+                """INSERT INTO trabajos (id, tipo, payload, adjunto, prioridad, clave_idempotencia, max_intentos,
+                                         disponible_en, errores, company_id, usuario, creado_en, actualizado_en)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (fila['id'], fila['tipo'], fila['payload'], fila['adjunto'], fila['prioridad'], clave,
+                 fila['max_intentos'], ahora, fila['errores'], fila['company_id'], fila['usuario'],
+                 fila['creado_en'], ahora))
+            conn.execute("DELETE FROM trabajos_fallidos WHERE id = ?", (trabajo_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._hay_trabajo.set()
+        return True
+
+    def purgar(self, horas: float = None) -> int:
+        """Elimina trabajos completados más viejos que la retención. Returns: cuántos"""
+        limite = time.time() - 3600 * (self.config['retencion_horas'] if horas is None else horas)
+        cursor = self._conexion().execute(
+            "DELETE FROM trabajos WHERE estado = 'completado' AND actualizado_en < ?", (limite,))
+        return cursor.rowcount
+
+    def obtener_estado(self) -> Dict:
+        conn = self._conexion()
+        por_estado = {e: 0 for e in ESTADOS}
+        por_tipo = {}
+        for fila in conn.execute("SELECT tipo, estado, COUNT(*) AS n FROM trabajos GROUP BY tipo, estado"):
+            por_estado[fila['estado']] += fila['n']
+            por_tipo.setdefault(fila['tipo'], {})[fila['estado']] = fila['n']
+        for fila in conn.execute("SELECT tipo, COUNT(*) AS n FROM trabajos_fallidos GROUP BY tipo"):
+            por_estado['fallido'] += fila['n']
+            por_tipo.setdefault(fila['tipo'], {})['fallido'] = fila['n']
+        ahora = time.time()
+        mas_antiguo = conn.execute(
+            "SELECT MIN(disponible_en) FROM trabajos WHERE estado = 'pendiente' AND disponible_en <= ?",
+            (ahora,)).fetchone()[0]
+        with self._lock:
+            procesados = dict(self.procesados)
+        return {
+            "db_path": self.db_path,
+            "worker": self.worker_id,
+            "hilos_activos": sum(1 for h in self._hilos if h.is_alive()),
+            "tareas_registradas": sorted(self._tareas),
+            "por_estado": por_estado,
+            "por_tipo": por_tipo,
+            "espera_mas_antigua_s": round(ahora - mas_antiguo, 1) if mas_antiguo else 0.0,
+            "procesados_en_este_proceso": procesados,
+            "config": dict(self.config),
+        }
+
+    # ──────────────────────────────────────────────────────
+    # HILOS TRABAJADORES
+    # ──────────────────────────────────────────────────────
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.procesar_siguiente():
+                    continue
+                if time.time() - self._ultima_purga > 3600:
+                    self._ultima_purga = time.time()
+                    purgados = self.purgar()
+                    if purgados:
+                        logger.info("[COLA] Purgados %d trabajos completados", purgados)
+            except Exception as e:
+                logger.error("[COLA] Error en el hilo trabajador: %s", e)
+                self._stop_event.wait(self.config['sondeo_segundos'])
+            self._hay_trabajo.wait(self.config['sondeo_segundos'])
+            self._hay_trabajo.clear()
+
+    def iniciar(self):
+        """Arranca los hilos trabajadores (no-op si hilos = 0 o ya están corriendo)"""
+        if any(h.is_alive() for h in self._hilos) or self.config['hilos'] <= 0:
+            return
+        self._stop_event.clear()
+        self._hilos = [threading.Thread(target=self._loop, daemon=True, name=f"ColaTrabajos-{i}")
+                       for i in range(self.config['hilos'])]
+        for hilo in self._hilos:
+            hilo.start()
+        logger.info("[COLA] %d hilo(s) trabajador(es) en %s", len(self._hilos), self.db_path)
+
+    def detener(self, timeout: float = 10):
+        """Detiene los hilos al terminar su trabajo actual"""
+        self._stop_event.set()
+        self._hay_trabajo.set()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+
+
+# ──────────────────────────────────────────────────────────
+# CLI: estado, reintentos y proceso trabajador dedicado
+# ──────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cola local de trabajos de CWS Cotizador")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("estado", help="Conteos por estado y tipo")
+    listar = sub.add_parser("listar", help="Últimos trabajos")
+    listar.add_argument("--estado", choices=ESTADOS)
+    listar.add_argument("--limite", type=int, default=20)
+    reintentar = sub.add_parser("reintentar", help="Devolver un trabajo de dead-letter a la cola")
+    reintentar.add_argument("id", type=int)
+    sub.add_parser("purgar", help="Eliminar completados fuera de la retención")
+    trabajar = sub.add_parser("trabajar", help="Proceso trabajador dedicado (importa la app para sus tareas)")
+    trabajar.add_argument("--hilos", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.comando == "trabajar":
+        # La web de este proceso no debe arrancar sus propios hilos: los maneja este comando
+        hilos = args.hilos or int(os.getenv('JOB_QUEUE_WORKERS', '2')) or 2
+        os.environ['JOB_QUEUE_WORKERS'] = '0'
+        from app import app
+        cola = app.extensions['cola_trabajos']
+        cola.config['hilos'] = hilos
+        cola.iniciar()
+        detener = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: detener.set())
+        try:
+            while not detener.is_set():
+                detener.wait(1)
+        except KeyboardInterrupt:
+            pass
+        cola.detener()
+        return 0
+
+    cola = ColaTrabajos(hilos=0)
+    if args.comando == "estado":
+        resultado = cola.obtener_estado()
+    elif args.comando == "listar":
+        resultado = cola.listar(args.estado, limite=args.limite)
+    elif args.comando == "reintentar":
+        resultado = {"reintentado": cola.reintentar(args.id)}
+    else:
+        resultado = {"purgados": cola.purgar()}
+    print(json.dumps(resultado, indent=2, ensure_ascii=False, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
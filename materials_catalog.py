@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CATÁLOGO DE MATERIALES
+======================
+
+Servicio en memoria sobre 'Lista de materiales.csv':
+
+- Índices por descripción normalizada (sin acentos, minúsculas, espacios
+  colapsados), por unidad (Ref de Peso) y por token para búsqueda por prefijo
+- Recarga en caliente: si cambia el mtime/tamaño del CSV, el siguiente
+  acceso reconstruye el índice (sin reiniciar el servidor)
+- Snapshot binario (marshal) con el índice ya construido, para que cada
+  worker arranque sin parsear el CSV; se invalida si el CSV cambia. marshal
+  solo reconstruye tipos básicos (nunca instancia clases ni ejecuta código
+  al cargar, a diferencia de pickle), así que un snapshot alterado a lo más
+  se descarta y se reconstruye desde el CSV
+- version: hash del contenido del CSV, usado como ETag y como parámetro de
+  cache-busting del formulario (/api/materiales?v=<version>)
+
+Configuración:
+    MATERIALES_CSV_PATH                 Ruta del CSV (default: junto a app.py)
+    MATERIALES_SNAPSHOT_PATH            Ruta del snapshot (default: materiales_catalogo.snapshot)
+    MATERIALES_INTERVALO_REVISION_S     Segundos entre revisiones de mtime (default 2)
+
+Uso CLI (precompilar snapshot en el build):
+    python materials_catalog.py --compilar
+"""
+
+import argparse
+import bisect
+import csv
+import hashlib
+import io
+import logging
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FORMATO_SNAPSHOT = 2
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RUTA_CSV_DEFAULT = os.path.join(_BASE_DIR, 'Lista de materiales.csv')
+RUTA_SNAPSHOT_DEFAULT = os.path.join(_BASE_DIR, 'materiales_catalogo.snapshot')
+
+# Mismos materiales de respaldo que cargar_materiales_csv() si falta el CSV
+MATERIALES_POR_DEFECTO = [
+    {'descripcion': 'Acero estructural', 'peso': 7850.0, 'uom': 'kg/m3'},
+    {'descripcion': 'Concreto armado', 'peso': 2400.0, 'uom': 'kg/m3'},
+    {'descripcion': 'Lamina galvanizada', 'peso': 7.85, 'uom': 'kg/m2'},
+    {'descripcion': 'Perfil IPR', 'peso': 1.0, 'uom': 'kg/ml'},
+    {'descripcion': 'Tubo estructural', 'peso': 1.0, 'uom': 'kg/ml'},
+    {'descripcion': 'Material personalizado', 'peso': 1.0, 'uom': 'Especificar'},
+]
+
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9/.]+')
+
+
+def normalizar_texto(texto) -> str:
+    """Clave de índice: sin acentos, minúsculas, solo alfanuméricos, '/' y '.'"""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_NO_ALFANUMERICO.sub(' ', texto.lower()).split())
+
+
+def leer_csv(contenido: str) -> List[Dict]:
+    """Parsea el CSV con los mismos nombres de columna que cargar_materiales_csv()"""
+    materiales = []
+    for i, fila in enumerate(csv.DictReader(io.StringIO(contenido))):
+        fila = {(k or '').strip(): v for k, v in fila.items()}
+        descripcion = (fila.get('Tipo de material') or fila.get('tipo_material') or
+                       fila.get('material') or fila.get('descripcion') or f'Material {i + 1}')
+        peso_str = fila.get('Peso') or fila.get('peso') or fila.get('weight') or '1.0'
+        uom = fila.get('Ref de Peso') or fila.get('uom') or fila.get('unidad') or 'kg/m2'
+        try:
+            peso = float(str(peso_str).replace(',', '.'))
+        except (ValueError, TypeError):
+            peso = 1.0
+        materiales.append({'descripcion': str(descripcion).strip(), 'peso': peso, 'uom': str(uom).strip()})
+    return materiales
+
+
+def construir_indice(materiales: List[Dict], version: str) -> Dict:
+    """Índices del catálogo (estructura plana de builtins, serializable en el snapshot)"""
+    por_descripcion, por_uom, postings = {}, {}, {}
+    claves = []
+    for i, material in enumerate(materiales):
+        clave = normalizar_texto(material['descripcion'])
+        claves.append(clave)
+        por_descripcion.setdefault(clave, i)
+        por_uom.setdefault(normalizar_texto(material['uom']), []).append(i)
+        for token in set(clave.split()):
+            postings.setdefault(token, []).append(i)
+    return {
+        'version': version,
+        'materiales': materiales,
+        'claves': claves,
+        'por_descripcion': por_descripcion,
+        'por_uom': por_uom,
+        'tokens': sorted(postings),
+        'postings': postings,
+    }
+
+
+class MaterialsCatalog:
+    """
+    Catálogo de materiales indexado con recarga en caliente.
+
+    Args:
+        ruta_csv: CSV de materiales
+        ruta_snapshot: Snapshot binario del índice (None desactiva el snapshot)
+        intervalo_revision: Segundos mínimos entre revisiones del mtime del CSV
+    """
+
+    def __init__(self, ruta_csv: str = None, ruta_snapshot: Optional[str] = '',
+                 intervalo_revision: float = None):
+        self.ruta_csv = ruta_csv or os.getenv('MATERIALES_CSV_PATH') or RUTA_CSV_DEFAULT
+        if ruta_snapshot == '':
+            ruta_snapshot = os.getenv('MATERIALES_SNAPSHOT_PATH') or RUTA_SNAPSHOT_DEFAULT
+        self.ruta_snapshot = ruta_snapshot
+        if intervalo_revision is None:
+            intervalo_revision = float(os.getenv('MATERIALES_INTERVALO_REVISION_S', '2'))
+        self.intervalo_revision = intervalo_revision
+
+        self._lock = threading.Lock()
+        self._indice = None
+        self._firma_csv = None
+        self._ultima_revision = 0.0
+        self.fuente = None
+        self.recargas = 0
+        self._cargar()
+
+    # ──────────────────────────────────────────────
+    # CARGA Y RECARGA
+    # ──────────────────────────────────────────────
+
+    def _firma(self):
+        try:
+            st = os.stat(self.ruta_csv)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _cargar(self):
+        """Carga desde el snapshot si coincide con el CSV; si no, parsea el CSV"""
+        inicio = time.perf_counter()
+        firma = self._firma()
+
+        indice = self._leer_snapshot(firma) if firma else None
+        if indice is not None:
+            fuente = 'snapshot'
+        elif firma:
+            with open(self.ruta_csv, 'rb') as f:
+                crudo = f.read()
+            version = hashlib.sha1(crudo).hexdigest()[:16]
+            indice = construir_indice(leer_csv(crudo.decode('utf-8-sig')), version)
+            fuente = 'csv'
+            self._escribir_snapshot(firma, indice)
+        else:
+            logger.warning("[MATERIALES] CSV no encontrado en %s, usando materiales por defecto", self.ruta_csv)
+            indice = construir_indice([dict(m) for m in MATERIALES_POR_DEFECTO], 'default')
+            fuente = 'default'
+
+        self._indice = indice
+        self._firma_csv = firma
+        self._ultima_revision = time.monotonic()
+        self.fuente = fuente
+        logger.info("[MATERIALES] Catálogo cargado: %d materiales desde %s en %.1f ms (v%s)",
+                    len(indice['materiales']), fuente, (time.perf_counter() - inicio) * 1000, indice['version'])
+
+    def _leer_snapshot(self, firma) -> Optional[Dict]:
+        if not self.ruta_snapshot or not os.path.exists(self.ruta_snapshot):
+            return None
+        try:
+            with open(self.ruta_snapshot, 'rb') as f:
+                datos = marshal.load(f)
+            if (not isinstance(datos, dict) or datos.get('formato') != FORMATO_SNAPSHOT
+                    or tuple(datos.get('firma_csv') or ()) != firma):
+                return None
+            indice = datos.get('indice')
+            if not isinstance(indice, dict) or not isinstance(indice.get('materiales'), list):
+                return None
+            return indice
+        except Exception as e:
+            logger.warning("[MATERIALES] Snapshot inválido, se reconstruye: %s", e)
+            return None
+
+    def _escribir_snapshot(self, firma, indice: Dict):
+        if not self.ruta_snapshot:
+            return
+        temporal = f"{self.ruta_snapshot}.{os.getpid()}.tmp"
+        try:
+            with open(temporal, 'wb') as f:
+                marshal.dump({'formato': FORMATO_SNAPSHOT, 'firma_csv': firma, 'indice': indice}, f)
+            os.replace(temporal, self.ruta_snapshot)
+        except Exception as e:
+            logger.warning("[MATERIALES] No se pudo escribir snapshot: %s", e)
+            try:
+                os.remove(temporal)
+            except OSError:
+                pass
+
+    def revisar_cambios(self, forzar: bool = False) -> bool:
+        """Recarga si el CSV cambió desde la última carga. Regresa True si recargó"""
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultima_revision < self.intervalo_revision:
+            return False
+        with self._lock:
+            self._ultima_revision = ahora
+            if self._firma() == self._firma_csv and not forzar:
+                return False
+            self._cargar()
+            self.recargas += 1
+            return True
+
+    def _actual(self) -> Dict:
+        self.revisar_cambios()
+        return self._indice
+
+    # ──────────────────────────────────────────────
+    # CONSULTAS
+    # ──────────────────────────────────────────────
+
+    @property
+    def version(self) -> str:
+        return self._actual()['version']
+
+    @property
+    def materiales(self) -> List[Dict]:
+        return self._actual()['materiales']
+
+    def obtener(self, descripcion: str) -> Optional[Dict]:
+        """Material por descripción (comparación normalizada)"""
+        indice = self._actual()
+        i = indice['por_descripcion'].get(normalizar_texto(descripcion))
+        return indice['materiales'][i] if i is not None else None
+
+    def por_unidad(self, uom: str) -> List[Dict]:
+        indice = self._actual()
+        return [indice['materiales'][i] for i in indice['por_uom'].get(normalizar_texto(uom), [])]
+
+    def _coincidencias_token(self, indice: Dict, prefijo: str) -> set:
+        tokens = indice['tokens']
+        encontrados = set()
+        pos = bisect.bisect_left(tokens, prefijo)
+        while pos < len(tokens) and tokens[pos].startswith(prefijo):
+            encontrados.update(indice['postings'][tokens[pos]])
+            pos += 1
+        return encontrados
+
+    def buscar(self, consulta: str = '', uom: str = None, limite: int = 20) -> List[Dict]:
+        """
+        Búsqueda por prefijo de tokens: "ptr 1 cal" encuentra 'PTR 1" x 1" CAL 14'.
+        Ordena coincidencia exacta, luego prefijo de la descripción, luego orden del CSV.
+        """
+        indice = self._actual()
+        clave = normalizar_texto(consulta)
+        candidatos = None
+        for token in clave.split():
+            coincidencias = self._coincidencias_token(indice, token)
+            candidatos = coincidencias if candidatos is None else candidatos & coincidencias
+            if not candidatos:
+                return []
+        if uom:
+            por_uom = set(indice['por_uom'].get(normalizar_texto(uom), []))
+            candidatos = por_uom if candidatos is None else candidatos & por_uom
+        if candidatos is None:
+            candidatos = range(len(indice['materiales']))
+
+        claves = indice['claves']
+        ordenados = sorted(candidatos, key=lambda i: (claves[i] != clave, not claves[i].startswith(clave), i))
+        if limite:
+            ordenados = ordenados[:limite]
+        return [indice['materiales'][i] for i in ordenados]
+
+    def etag(self, *partes) -> str:
+        """ETag de una respuesta derivada del catálogo (versión + parámetros de la consulta)"""
+        base = '|'.join([self.version] + [str(p) for p in partes])
+        return hashlib.sha1(base.encode('utf-8')).hexdigest()[:20]
+
+    def obtener_estado(self) -> Dict:
+        indice = self._actual()
+        return {
+            'version': indice['version'],
+            'total': len(indice['materiales']),
+            'unidades': len(indice['por_uom']),
+            'tokens': len(indice['tokens']),
+            'fuente': self.fuente,
+            'recargas': self.recargas,
+            'ruta_csv': self.ruta_csv,
+            'ruta_snapshot': self.ruta_snapshot,
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Catálogo de materiales")
+    parser.add_argument('--compilar', action='store_true', help="Regenerar el snapshot binario desde el CSV")
+    parser.add_argument('--buscar', help="Probar una búsqueda")
+    args = parser.parse_args(argv)
+
+    if args.compilar and os.path.exists(os.getenv('MATERIALES_SNAPSHOT_PATH') or RUTA_SNAPSHOT_DEFAULT):
+        os.remove(os.getenv('MATERIALES_SNAPSHOT_PATH') or RUTA_SNAPSHOT_DEFAULT)
+    catalogo = MaterialsCatalog()
+    print(catalogo.obtener_estado())
+    if args.buscar:
+        for material in catalogo.buscar(args.buscar):
+            print(f"  {material['descripcion']} - {material['peso']} {material['uom']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ALMACÉN DE SERIES DE TIEMPO DE MÉTRICAS
+=======================================
+
+Series de salud y latencia con memoria acotada: cada métrica guarda tres
+niveles en anillos de tamaño fijo respaldados por array (sin objetos por
+muestra):
+
+    crudo   últimas N muestras tal cual
+    minuto  agregados por minuto (n, suma, mínimo, máximo)
+    hora    agregados por hora
+
+Cada muestra entra al nivel crudo y se acumula en el minuto en curso; al
+cerrar el minuto su agregado pasa al anillo de minutos y se acumula en la
+hora en curso, y así sucesivamente. Lo más viejo se sobrescribe, así que la
+memoria y el snapshot no crecen con las semanas de uptime.
+
+Persistencia binaria:
+    <ruta>       snapshot de todos los anillos (tamaño acotado por las capacidades)
+    <ruta>.log   bitácora append-only de muestras desde el último snapshot;
+                 al superar METRICS_LOG_MAX_BYTES se compacta en un snapshot nuevo
+
+Variables de entorno:
+    METRICS_STORE_PATH        archivo del snapshot (default health_metrics.bin)
+    METRICS_RAW_SAMPLES       muestras crudas por métrica (default 1440)
+    METRICS_RETENTION_HOURS   horas de agregados por minuto (default 24)
+    METRICS_HISTORY_DAYS      días de agregados por hora (default 30)
+    METRICS_LOG_MAX_BYTES     tamaño de la bitácora antes de compactar (default 262144)
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIA = b'CWSMET1\n'
+RESOLUCIONES = ('crudo', 'minuto', 'hora')
+_PERIODOS = {'minuto': 60, 'hora': 3600}
+
+# Registros de la bitácora: b'N' declara el id de una serie, b'S' es una muestra
+_NOMBRE = struct.Struct('<cHH')
+_MUESTRA = struct.Struct('<cHdd')
+
+
+class Anillo:
+    """Buffer circular de agregados (t, n, suma, mínimo, máximo) sobre arrays de capacidad fija"""
+
+    __slots__ = ('capacidad', 'inicio', 'cantidad', 't', 'n', 'suma', 'minimo', 'maximo')
+
+    def __init__(self, capacidad: int):
+        self.capacidad = max(1, int(capacidad))
+        self.inicio = 0
+        self.cantidad = 0
+        self.t = array('d', bytes(8 * self.capacidad))
+        self.n = array('d', bytes(8 * self.capacidad))
+        self.suma = array('d', bytes(8 * self.capacidad))
+        self.minimo = array('d', bytes(8 * self.capacidad))
+        self.maximo = array('d', bytes(8 * self.capacidad))
+
+    def agregar(self, t: float, n: float, suma: float, minimo: float, maximo: float):
+        if self.cantidad < self.capacidad:
+            i = (self.inicio + self.cantidad) % self.capacidad
+            self.cantidad += 1
+        else:
+            i = self.inicio
+            self.inicio = (self.inicio + 1) % self.capacidad
+        self.t[i], self.n[i], self.suma[i], self.minimo[i], self.maximo[i] = t, n, suma, minimo, maximo
+
+    def filas(self, desde: float = None, hasta: float = None) -> Iterator[Tuple[float, float, float, float, float]]:
+        """Filas en orden cronológico de llegada"""
+        for k in range(self.cantidad):
+            i = (self.inicio + k) % self.capacidad
+            t = self.t[i]
+            if (desde is not None and t < desde) or (hasta is not None and t > hasta):
+                continue
+            yield t, self.n[i], self.suma[i], self.minimo[i], self.maximo[i]
+
+    def mas_antiguo(self) -> Optional[float]:
+        return self.t[self.inicio] if self.cantidad else None
+
+    def bytes_memoria(self) -> int:
+        return 5 * self.capacidad * self.t.itemsize
+
+
+class SerieTiempo:
+    """Una métrica: anillo crudo + anillos de minutos y horas con su acumulador en curso"""
+
+    def __init__(self, capacidades: Dict[str, int]):
+        self.niveles = {nombre: Anillo(capacidades[nombre]) for nombre in RESOLUCIONES}
+        # [inicio_periodo, n, suma, mínimo, máximo] del minuto/hora en curso
+        self.en_curso: Dict[str, Optional[list]] = {'minuto': None, 'hora': None}
+
+    def registrar(self, t: float, valor: float):
+        self.niveles['crudo'].agregar(t, 1, valor, valor, valor)
+        self._acumular('minuto', t, 1, valor, valor, valor)
+
+    def _acumular(self, nivel: str, t: float, n: float, suma: float, minimo: float, maximo: float):
+        periodo = _PERIODOS[nivel]
+        inicio = t - t % periodo
+        actual = self.en_curso[nivel]
+        if actual is not None and inicio > actual[0]:
+            self._cerrar(nivel)
+            actual = None
+        if actual is None:
+            self.en_curso[nivel] = [inicio, n, suma, minimo, maximo]
+            return
+        # Muestras del mismo periodo (o atrasadas) se pliegan en el acumulador
+        actual[1] += n
+        actual[2] += suma
+        actual[3] = min(actual[3], minimo)
+        actual[4] = max(actual[4], maximo)
+
+    def _cerrar(self, nivel: str):
+        actual = self.en_curso[nivel]
+        self.niveles[nivel].agregar(*actual)
+        self.en_curso[nivel] = None
+        if nivel == 'minuto':
+            self._acumular('hora', *actual)
+
+    def filas(self, resolucion: str, desde: float = None, hasta: float = None) -> List[Tuple]:
+        filas = list(self.niveles[resolucion].filas(desde, hasta))
+        actual = self.en_curso.get(resolucion)
+        if actual is not None and (desde is None or actual[0] >= desde) and (hasta is None or actual[0] <= hasta):
+            filas.append(tuple(actual))
+        return filas
+
+
+class AlmacenMetricas:
+    """Series de tiempo por nombre, con snapshot binario y bitácora append-only"""
+
+    def __init__(self, ruta: str = None, capacidades: Dict[str, int] = None):
+        self.ruta = ruta if ruta is not None else os.getenv('METRICS_STORE_PATH', 'health_metrics.bin')
+        self.capacidades = {
+            'crudo': int(os.getenv('METRICS_RAW_SAMPLES', '1440')),
+            'minuto': int(os.getenv('METRICS_RETENTION_HOURS', '24')) * 60,
+            'hora': int(os.getenv('METRICS_HISTORY_DAYS', '30')) * 24,
+        }
+        self.capacidades.update(capacidades or {})
+        self.log_max_bytes = int(os.getenv('METRICS_LOG_MAX_BYTES', '262144'))
+        self.series: Dict[str, SerieTiempo] = {}
+        self._ids: Dict[str, int] = {}
+        self._ids_en_log = set()
+        self._log = None
+        self._lock = threading.RLock()
+        if self.ruta:
+            self.cargar()
+
+    # ──────────────────────────────────────────────────────────
+    # ESCRITURA
+    # ──────────────────────────────────────────────────────────
+
+    def registrar(self, nombre: str, valor: float, t: float = None):
+        """Agrega una muestra (t en epoch segundos; default ahora)"""
+        t = time.time() if t is None else float(t)
+        valor = float(valor)
+        with self._lock:
+            self._serie(nombre).registrar(t, valor)
+            if self.ruta:
+                self._anotar(nombre, t, valor)
+
+    def _serie(self, nombre: str) -> SerieTiempo:
+        serie = self.series.get(nombre)
+        if serie is None:
+            serie = self.series[nombre] = SerieTiempo(self.capacidades)
+            self._ids[nombre] = len(self._ids)
+        return serie
+
+    def _anotar(self, nombre: str, t: float, valor: float):
+        try:
+            if self._log is None:
+                self._log = open(self.ruta + '.log', 'ab')
+            id_serie = self._ids[nombre]
+            if id_serie not in self._ids_en_log:
+                codificado = nombre.encode('utf-8')
+                self._log.write(_NOMBRE.pack(b'N', id_serie, len(codificado)) + codificado)
+                self._ids_en_log.add(id_serie)
+            self._log.write(_MUESTRA.pack(b'S', id_serie, t, valor))
+            self._log.flush()
+            if self._log.tell() >= self.log_max_bytes:
+                self.guardar()
+        except OSError as e:
+            logger.warning("[METRICAS] No se pudo escribir la bitácora: %s", e)
+
+    # ──────────────────────────────────────────────────────────
+    # CONSULTA
+    # ──────────────────────────────────────────────────────────
+
+    def nombres(self) -> List[str]:
+        with self._lock:
+            return sorted(self.series)
+
+    def consultar(self, nombre: str, desde: float = None, hasta: float = None,
+                  resolucion: str = 'auto') -> List[Dict]:
+        """
+        Puntos de una serie para graficar: [{t, n, promedio, min, max}].
+
+        resolucion='auto' usa el nivel más fino que todavía cubre `desde`
+        (crudo, luego minuto, luego hora).
+        """
+        with self._lock:
+            serie = self.series.get(nombre)
+            if serie is None:
+                return []
+            if resolucion == 'auto':
+                resolucion = self._resolucion_para(serie, desde)
+            if resolucion not in RESOLUCIONES:
+                raise ValueError(f"Resolución inválida: {resolucion}")
+            filas = serie.filas(resolucion, desde, hasta)
+        return [
+            {'t': t, 'n': int(n), 'promedio': suma / n if n else 0.0, 'min': minimo, 'max': maximo}
+            for t, n, suma, minimo, maximo in filas
+        ]
+
+    @staticmethod
+    def _resolucion_para(serie: SerieTiempo, desde: Optional[float]) -> str:
+        if desde is None:
+            return 'hora'
+        for resolucion in ('crudo', 'minuto'):
+            anillo = serie.niveles[resolucion]
+            # Un anillo que no ha sobrescrito nada tiene toda la historia
+            if anillo.cantidad < anillo.capacidad or anillo.mas_antiguo() <= desde:
+                return resolucion
+        return 'hora'
+
+    def ultimo(self, nombre: str) -> Optional[Tuple[float, float]]:
+        """(t, valor) de la última muestra cruda"""
+        with self._lock:
+            serie = self.series.get(nombre)
+            if serie is None or not serie.niveles['crudo'].cantidad:
+                return None
+            anillo = serie.niveles['crudo']
+            i = (anillo.inicio + anillo.cantidad - 1) % anillo.capacidad
+            return anillo.t[i], anillo.suma[i]
+
+    def resumen(self, nombre: str, segundos: float = 3600) -> Dict:
+        """Conteo, promedio, mínimo, máximo y p95 de las muestras crudas de la ventana"""
+        desde = time.time() - segundos
+        with self._lock:
+            serie = self.series.get(nombre)
+            valores = sorted(fila[2] for fila in serie.niveles['crudo'].filas(desde)) if serie else []
+        if not valores:
+            return {'muestras': 0}
+        return {
+            'muestras': len(valores),
+            'promedio': round(sum(valores) / len(valores), 3),
+            'min': valores[0],
+            'max': valores[-1],
+            'p95': valores[min(len(valores) - 1, int(0.95 * len(valores)))],
+            'ultimo': self.ultimo(nombre)[1],
+        }
+
+    def obtener_estado(self) -> Dict:
+        with self._lock:
+            memoria = sum(anillo.bytes_memoria() for serie in self.series.values()
+                          for anillo in serie.niveles.values())
+            return {
+                'series': len(self.series),
+                'capacidades': dict(self.capacidades),
+                'bytes_memoria': memoria,
+                'bytes_snapshot': _tamano(self.ruta) if self.ruta else 0,
+                'bytes_bitacora': _tamano(self.ruta + '.log') if self.ruta else 0,
+            }
+
+    # ──────────────────────────────────────────────────────────
+    # PERSISTENCIA
+    # ──────────────────────────────────────────────────────────
+
+    def guardar(self):
+        """Escribe el snapshot (atómico) y reinicia la bitácora"""
+        if not self.ruta:
+            return
+        with self._lock:
+            temporal = self.ruta + '.tmp'
+            with open(temporal, 'wb') as f:
+                f.write(MAGIA)
+                f.write(struct.pack('<I', len(self.series)))
+                for nombre, serie in self.series.items():
+                    codificado = nombre.encode('utf-8')
+                    f.write(struct.pack('<H', len(codificado)) + codificado)
+                    for resolucion in RESOLUCIONES:
+                        filas = list(serie.niveles[resolucion].filas())
+                        f.write(struct.pack('<I', len(filas)))
+                        for columna in range(5):
+                            array('d', (fila[columna] for fila in filas)).tofile(f)
+                    for nivel in ('minuto', 'hora'):
+                        actual = serie.en_curso[nivel]
+                        f.write(struct.pack('<?5d', actual is not None, *(actual or (0.0,) * 5)))
+            os.replace(temporal, self.ruta)
+
+            if self._log is not None:
+                self._log.close()
+            self._log = open(self.ruta + '.log', 'wb')
+            self._ids_en_log = set()
+
+    def cargar(self):
+        """Lee el snapshot y reaplica la bitácora (un final truncado se ignora)"""
+        with self._lock:
+            if os.path.exists(self.ruta):
+                try:
+                    self._cargar_snapshot()
+                except (OSError, ValueError, struct.error, EOFError) as e:
+                    logger.warning("[METRICAS] Snapshot ilegible, se descarta: %s", e)
+                    self.series, self._ids = {}, {}
+            ruta_log = self.ruta + '.log'
+            if os.path.exists(ruta_log):
+                with open(ruta_log, 'rb') as f:
+                    datos = f.read()
+                nombres_log = {}
+                pos = 0
+                while pos < len(datos):
+                    tipo = datos[pos:pos + 1]
+                    if tipo == b'N' and pos + _NOMBRE.size <= len(datos):
+                        _, id_serie, largo = _NOMBRE.unpack_from(datos, pos)
+                        fin = pos + _NOMBRE.size + largo
+                        if fin > len(datos):
+                            break
+                        nombres_log[id_serie] = datos[pos + _NOMBRE.size:fin].decode('utf-8')
+                        pos = fin
+                    elif tipo == b'S' and pos + _MUESTRA.size <= len(datos):
+                        _, id_serie, t, valor = _MUESTRA.unpack_from(datos, pos)
+                        if id_serie in nombres_log:
+                            self._serie(nombres_log[id_serie]).registrar(t, valor)
+                        pos += _MUESTRA.size
+                    else:
+                        break
+            if self.series:
+                # Consolidar lo reaplicado en un snapshot y arrancar una bitácora vacía
+                self.guardar()
+
+    def _cargar_snapshot(self):
+        with open(self.ruta, 'rb') as f:
+            if f.read(len(MAGIA)) != MAGIA:
+                raise ValueError('formato desconocido')
+            (num_series,) = struct.unpack('<I', _leer(f, 4))
+            for _ in range(num_series):
+                (largo,) = struct.unpack('<H', _leer(f, 2))
+                serie = self._serie(_leer(f, largo).decode('utf-8'))
+                for resolucion in RESOLUCIONES:
+                    (cantidad,) = struct.unpack('<I', _leer(f, 4))
+                    columnas = []
+                    for _ in range(5):
+                        columna = array('d')
+                        columna.frombytes(_leer(f, 8 * cantidad))
+                        columnas.append(columna)
+                    # Si la capacidad bajó se conservan las más recientes
+                    for fila in zip(*columnas):
+                        serie.niveles[resolucion].agregar(*fila)
+                for nivel in ('minuto', 'hora'):
+                    presente, *acumulado = struct.unpack('<?5d', _leer(f, struct.calcsize('<?5d')))
+                    serie.en_curso[nivel] = list(acumulado) if presente else None
+
+    def cerrar(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def _leer(f, n: int) -> bytes:
+    datos = f.read(n)
+    if len(datos) != n:
+        raise EOFError('snapshot truncado')
+    return datos
+
+
+def _tamano(ruta: str) -> int:
+    try:
+        return os.path.getsize(ruta)
+    except OSError:
+        return 0
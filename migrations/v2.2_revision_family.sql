@@ -0,0 +1,82 @@
+-- ============================================================
+-- MIGRACIÓN v2.2: ÍNDICE DE FAMILIAS DE REVISIÓN
+-- ============================================================
+-- Descompone numero_cotizacion (CLIENTE-CWS-VE-###-R#-PROYECTO)
+-- en columnas indexadas para que la verificación de "revisión más
+-- reciente" y el historial de revisiones sean una sola consulta
+-- indexada en lugar de un ILIKE sobre toda la tabla.
+--
+-- Las columnas se llenan con un trigger, así que funcionan igual
+-- para inserts vía SDK REST, PostgreSQL directo o sincronización.
+--
+-- PREREQUISITO: Haber ejecutado v2_multi_tenant.sql primero
+-- ============================================================
+
+-- ============================================================
+-- 1. COLUMNAS DERIVADAS DEL NÚMERO
+-- ============================================================
+ALTER TABLE public.cotizaciones
+    ADD COLUMN IF NOT EXISTS numero_base VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS cliente_codigo VARCHAR(50),
+    ADD COLUMN IF NOT EXISTS vendedor_iniciales VARCHAR(10),
+    ADD COLUMN IF NOT EXISTS consecutivo INTEGER,
+    ADD COLUMN IF NOT EXISTS revision_numero INTEGER,
+    ADD COLUMN IF NOT EXISTS proyecto_codigo VARCHAR(255);
+
+-- ============================================================
+-- 2. FUNCIÓN DE PARSEO + TRIGGER
+-- ============================================================
+-- Misma lógica que parsear_numero_cotizacion() en supabase_manager.py
+CREATE OR REPLACE FUNCTION parsear_numero_cotizacion()
+RETURNS TRIGGER AS $$
+DECLARE
+    partes TEXT[];
+    base_partes TEXT[];
+BEGIN
+    partes := regexp_match(NEW.numero_cotizacion, '^(.*?)-R([0-9]+)(?:-(.*))?$');
+
+    IF partes IS NULL THEN
+        NEW.numero_base := NEW.numero_cotizacion;
+        NEW.revision_numero := 1;
+        NEW.proyecto_codigo := NULL;
+    ELSE
+        NEW.numero_base := partes[1];
+        NEW.revision_numero := partes[2]::INTEGER;
+        NEW.proyecto_codigo := partes[3];
+    END IF;
+
+    base_partes := regexp_match(NEW.numero_base, '^(.+)-CWS-([A-Z0-9]+)-([0-9]+)$');
+    IF base_partes IS NULL THEN
+        NEW.cliente_codigo := NULL;
+        NEW.vendedor_iniciales := NULL;
+        NEW.consecutivo := NULL;
+    ELSE
+        NEW.cliente_codigo := base_partes[1];
+        NEW.vendedor_iniciales := base_partes[2];
+        NEW.consecutivo := base_partes[3]::INTEGER;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_parsear_numero_cotizacion ON public.cotizaciones;
+CREATE TRIGGER trg_parsear_numero_cotizacion
+    BEFORE INSERT OR UPDATE OF numero_cotizacion ON public.cotizaciones
+    FOR EACH ROW EXECUTE FUNCTION parsear_numero_cotizacion();
+
+-- ============================================================
+-- 3. BACKFILL DE FILAS EXISTENTES
+-- ============================================================
+-- El UPDATE dispara el trigger, que recalcula todas las columnas
+UPDATE public.cotizaciones SET numero_cotizacion = numero_cotizacion;
+
+-- ============================================================
+-- 4. ÍNDICES
+-- ============================================================
+CREATE INDEX IF NOT EXISTS idx_cotizaciones_familia
+    ON public.cotizaciones(company_id, numero_base, revision_numero DESC);
+CREATE INDEX IF NOT EXISTS idx_cotizaciones_numero_base
+    ON public.cotizaciones(numero_base, revision_numero DESC);
+CREATE INDEX IF NOT EXISTS idx_cotizaciones_cliente_vendedor
+    ON public.cotizaciones(cliente_codigo, vendedor_iniciales, consecutivo);
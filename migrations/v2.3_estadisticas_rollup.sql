@@ -0,0 +1,165 @@
+-- ============================================================
+-- MIGRACIÓN v2.3: TABLAS DE ROLLUP PARA ESTADÍSTICAS
+-- ============================================================
+-- /stats y el panel de administración leían todas las filas de
+-- cotizaciones para contar clientes/vendedores únicos. Esta
+-- migración mantiene agregados por compañía que se actualizan en
+-- cada escritura (trigger), así que un dashboard cuesta una sola
+-- lectura indexada.
+--
+-- Dimensiones del rollup (columna "dimension"):
+--   total     clave = 'total'
+--   moneda    clave = MXN / USD
+--   vendedor  clave = datos_generales->>'vendedor'
+--   cliente   clave = datos_generales->>'cliente'
+--   mes       clave = YYYY-MM de fecha_creacion ('sin_fecha' si es NULL,
+--             para que la resta del trigger siempre encuentre la misma fila)
+--
+-- Clientes/vendedores únicos = número de filas de esa dimensión
+-- (las filas con num_cotizaciones = 0 se eliminan).
+--
+-- PREREQUISITO: Haber ejecutado v2_multi_tenant.sql primero
+-- ============================================================
+
+-- ============================================================
+-- 1. TABLA DE ROLLUP
+-- ============================================================
+CREATE TABLE IF NOT EXISTS public.estadisticas_rollup (
+    company_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000'::UUID,
+    dimension VARCHAR(20) NOT NULL
+        CHECK (dimension IN ('total', 'moneda', 'vendedor', 'cliente', 'mes')),
+    clave VARCHAR(255) NOT NULL,
+    num_cotizaciones BIGINT NOT NULL DEFAULT 0,
+    total_monto NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (company_id, dimension, clave)
+);
+
+-- ============================================================
+-- 2. FUNCIONES AUXILIARES
+-- ============================================================
+-- Conversión tolerante de texto a numérico (valores legacy tipo "1,234.50")
+CREATE OR REPLACE FUNCTION safe_numeric(valor TEXT)
+RETURNS NUMERIC AS $$
+BEGIN
+    RETURN NULLIF(regexp_replace(COALESCE(valor, ''), '[^0-9.\-]', '', 'g'), '')::NUMERIC;
+EXCEPTION WHEN others THEN
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Monto de una cotización: suma de items[].total (antes de IVA)
+CREATE OR REPLACE FUNCTION monto_cotizacion(items JSONB)
+RETURNS NUMERIC AS $$
+    SELECT COALESCE(SUM(COALESCE(safe_numeric(i->>'total'), 0)), 0)
+    FROM jsonb_array_elements(
+        CASE WHEN jsonb_typeof(items) = 'array' THEN items ELSE '[]'::JSONB END
+    ) AS i;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Suma (signo = 1) o resta (signo = -1) la contribución de una cotización
+CREATE OR REPLACE FUNCTION aplicar_rollup_cotizacion(
+    p_company_id UUID, p_datos_generales JSONB, p_items JSONB,
+    p_fecha TIMESTAMPTZ, p_signo INTEGER
+) RETURNS VOID AS $$
+DECLARE
+    v_company UUID := COALESCE(p_company_id, '00000000-0000-0000-0000-000000000000'::UUID);
+    v_monto NUMERIC := monto_cotizacion(p_items);
+    v_claves TEXT[][];
+    v_par TEXT[];
+BEGIN
+    v_claves := ARRAY[
+        ARRAY['total', 'total'],
+        ARRAY['moneda', COALESCE(NULLIF(p_datos_generales->'condiciones'->>'moneda', ''), 'MXN')],
+        ARRAY['vendedor', NULLIF(TRIM(p_datos_generales->>'vendedor'), '')],
+        ARRAY['cliente', NULLIF(TRIM(p_datos_generales->>'cliente'), '')],
+        ARRAY['mes', COALESCE(to_char(p_fecha, 'YYYY-MM'), 'sin_fecha')]
+    ];
+
+    FOREACH v_par SLICE 1 IN ARRAY v_claves LOOP
+        CONTINUE WHEN v_par[2] IS NULL;
+
+        INSERT INTO public.estadisticas_rollup AS r
+            (company_id, dimension, clave, num_cotizaciones, total_monto)
+        VALUES (v_company, v_par[1], LEFT(v_par[2], 255), p_signo, p_signo * v_monto)
+        ON CONFLICT (company_id, dimension, clave) DO UPDATE SET
+            num_cotizaciones = r.num_cotizaciones + EXCLUDED.num_cotizaciones,
+            total_monto = r.total_monto + EXCLUDED.total_monto,
+            updated_at = NOW();
+    END LOOP;
+
+    DELETE FROM public.estadisticas_rollup
+    WHERE company_id = v_company AND num_cotizaciones <= 0;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- ============================================================
+-- 3. TRIGGER: MANTENER EL ROLLUP EN CADA ESCRITURA
+-- ============================================================
+CREATE OR REPLACE FUNCTION actualizar_estadisticas_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM aplicar_rollup_cotizacion(OLD.company_id, OLD.datos_generales, OLD.items, OLD.fecha_creacion, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM aplicar_rollup_cotizacion(NEW.company_id, NEW.datos_generales, NEW.items, NEW.fecha_creacion, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_estadisticas_rollup ON public.cotizaciones;
+CREATE TRIGGER trg_estadisticas_rollup
+    AFTER INSERT OR UPDATE OF company_id, datos_generales, items, fecha_creacion OR DELETE
+    ON public.cotizaciones
+    FOR EACH ROW EXECUTE FUNCTION actualizar_estadisticas_rollup();
+
+-- ============================================================
+-- 4. RECONSTRUCCIÓN COMPLETA (backfill y reparación)
+-- ============================================================
+CREATE OR REPLACE FUNCTION recalcular_estadisticas_rollup()
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM public.estadisticas_rollup;
+
+    WITH base AS (
+        SELECT
+            COALESCE(company_id, '00000000-0000-0000-0000-000000000000'::UUID) AS company_id,
+            COALESCE(NULLIF(datos_generales->'condiciones'->>'moneda', ''), 'MXN') AS moneda,
+            NULLIF(TRIM(datos_generales->>'vendedor'), '') AS vendedor,
+            NULLIF(TRIM(datos_generales->>'cliente'), '') AS cliente,
+            COALESCE(to_char(fecha_creacion, 'YYYY-MM'), 'sin_fecha') AS mes,
+            monto_cotizacion(items) AS monto
+        FROM public.cotizaciones
+    )
+    INSERT INTO public.estadisticas_rollup (company_id, dimension, clave, num_cotizaciones, total_monto)
+    SELECT company_id, 'total', 'total', COUNT(*), SUM(monto) FROM base GROUP BY company_id
+    UNION ALL
+    SELECT company_id, 'moneda', moneda, COUNT(*), SUM(monto) FROM base GROUP BY company_id, moneda
+    UNION ALL
+    SELECT company_id, 'vendedor', LEFT(vendedor, 255), COUNT(*), SUM(monto) FROM base
+        WHERE vendedor IS NOT NULL GROUP BY company_id, LEFT(vendedor, 255)
+    UNION ALL
+    SELECT company_id, 'cliente', LEFT(cliente, 255), COUNT(*), SUM(monto) FROM base
+        WHERE cliente IS NOT NULL GROUP BY company_id, LEFT(cliente, 255)
+    UNION ALL
+    SELECT company_id, 'mes', mes, COUNT(*), SUM(monto) FROM base GROUP BY company_id, mes;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT recalcular_estadisticas_rollup();
+
+-- ============================================================
+-- 5. RLS: cada compañía solo lee sus agregados
+-- ============================================================
+ALTER TABLE public.estadisticas_rollup ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY company_isolation_estadisticas ON public.estadisticas_rollup
+    FOR SELECT
+    USING (
+        company_id = COALESCE(
+            current_setting('app.current_company_id', true)::UUID,
+            '00000000-0000-0000-0000-000000000000'::UUID
+        )
+    );
@@ -0,0 +1,258 @@
+-- ============================================================
+-- MIGRACIÓN v2.4: PROYECCIÓN NORMALIZADA DE PARTIDAS Y MATERIALES
+-- ============================================================
+-- Las partidas y sus materiales solo existían dentro del JSONB
+-- cotizaciones.items. Preguntas como "cotizaciones que usan el
+-- material X en los últimos 90 días" o "$/kg promedio por
+-- material" obligaban a descargar y recorrer todas las
+-- cotizaciones. Esta migración mantiene dos tablas derivadas que
+-- un trigger reescribe en cada guardado:
+--
+--   cotizacion_items        una fila por partida
+--   cotizacion_materiales   una fila por material de una partida
+--       tipo = 'material'   items[].materiales[] normales
+--                           (kg = peso × cantidad, precio_kg = precio)
+--       tipo = 'peso'       COTIZAR_POR_PESO
+--                           (kg = pesoEstructura, precio_kg = precioKg)
+--       tipo = 'otro'       items[].otrosMateriales[] (sin kg)
+--
+-- La proyección es de solo lectura para la aplicación: la fuente
+-- de verdad sigue siendo cotizaciones.items. quote_items.py
+-- replica la misma proyección para el modo offline.
+--
+-- PREREQUISITO: Haber ejecutado v2.3_estadisticas_rollup.sql
+-- (usa safe_numeric)
+-- ============================================================
+
+-- ============================================================
+-- 1. TABLAS DE PROYECCIÓN
+-- ============================================================
+CREATE TABLE IF NOT EXISTS public.cotizacion_items (
+    cotizacion_id INTEGER NOT NULL REFERENCES public.cotizaciones(id) ON DELETE CASCADE,
+    partida INTEGER NOT NULL,
+    company_id UUID,
+    numero_cotizacion VARCHAR(255) NOT NULL,
+    fecha_creacion TIMESTAMP,
+    cliente VARCHAR(255),
+    vendedor VARCHAR(255),
+    moneda VARCHAR(10),
+    descripcion TEXT,
+    uom VARCHAR(50),
+    cantidad NUMERIC,
+    costo_unidad NUMERIC,
+    total NUMERIC,
+    PRIMARY KEY (cotizacion_id, partida)
+);
+
+CREATE TABLE IF NOT EXISTS public.cotizacion_materiales (
+    cotizacion_id INTEGER NOT NULL,
+    partida INTEGER NOT NULL,
+    tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('material', 'peso', 'otro')),
+    posicion INTEGER NOT NULL,
+    company_id UUID,
+    numero_cotizacion VARCHAR(255) NOT NULL,
+    fecha_creacion TIMESTAMP,
+    cliente VARCHAR(255),
+    vendedor VARCHAR(255),
+    moneda VARCHAR(10),
+    descripcion TEXT NOT NULL,
+    descripcion_normalizada TEXT NOT NULL,
+    peso NUMERIC,
+    cantidad NUMERIC,
+    precio NUMERIC,
+    subtotal NUMERIC,
+    kg NUMERIC,
+    precio_kg NUMERIC,
+    PRIMARY KEY (cotizacion_id, partida, tipo, posicion),
+    FOREIGN KEY (cotizacion_id, partida)
+        REFERENCES public.cotizacion_items(cotizacion_id, partida) ON DELETE CASCADE
+);
+
+-- ============================================================
+-- 2. ÍNDICES (material, compañía, fecha)
+-- ============================================================
+-- "Cotizaciones con el material X" y estadísticas de un material
+CREATE INDEX IF NOT EXISTS idx_cot_materiales_descripcion
+    ON public.cotizacion_materiales(company_id, descripcion_normalizada, fecha_creacion DESC);
+
+-- Búsqueda por prefijo (LIKE 'ptr 2%')
+CREATE INDEX IF NOT EXISTS idx_cot_materiales_descripcion_prefijo
+    ON public.cotizacion_materiales(descripcion_normalizada text_pattern_ops);
+
+-- Analítica por periodo
+CREATE INDEX IF NOT EXISTS idx_cot_materiales_fecha
+    ON public.cotizacion_materiales(company_id, fecha_creacion DESC);
+
+CREATE INDEX IF NOT EXISTS idx_cot_items_fecha
+    ON public.cotizacion_items(company_id, fecha_creacion DESC);
+
+-- ============================================================
+-- 3. FUNCIONES AUXILIARES
+-- ============================================================
+-- Clave de búsqueda: equivalente a materials_catalog.normalizar_texto()
+-- para texto en español (sin acentos, minúsculas, solo [a-z0-9/.])
+CREATE OR REPLACE FUNCTION normalizar_descripcion_material(texto TEXT)
+RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(
+        translate(lower(COALESCE(texto, '')),
+                  'áàâäãéèêëíìîïóòôöõúùûüñç', 'aaaaaeeeeiiiiooooouuuunc'),
+        '[^a-z0-9/.]+', ' ', 'g'
+    ));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Partidas de un JSONB items con su número (1..n)
+CREATE OR REPLACE FUNCTION partidas_cotizacion(items JSONB)
+RETURNS TABLE (partida INTEGER, item JSONB) AS $$
+    SELECT i.ord::INTEGER, i.item
+    FROM jsonb_array_elements(
+        CASE WHEN jsonb_typeof(items) = 'array' THEN items ELSE '[]'::JSONB END
+    ) WITH ORDINALITY AS i(item, ord)
+    WHERE jsonb_typeof(i.item) = 'object';
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Elementos objeto de un arreglo JSONB con su posición (1..n)
+CREATE OR REPLACE FUNCTION elementos_jsonb(arreglo JSONB)
+RETURNS TABLE (posicion INTEGER, elemento JSONB) AS $$
+    SELECT e.ord::INTEGER, e.elemento
+    FROM jsonb_array_elements(
+        CASE WHEN jsonb_typeof(arreglo) = 'array' THEN arreglo ELSE '[]'::JSONB END
+    ) WITH ORDINALITY AS e(elemento, ord)
+    WHERE jsonb_typeof(e.elemento) = 'object';
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Reescribe la proyección de una cotización
+CREATE OR REPLACE FUNCTION proyectar_cotizacion_items(
+    p_id INTEGER, p_company_id UUID, p_numero VARCHAR, p_fecha TIMESTAMP,
+    p_datos_generales JSONB, p_items JSONB
+) RETURNS VOID AS $$
+DECLARE
+    v_cliente VARCHAR := LEFT(NULLIF(TRIM(p_datos_generales->>'cliente'), ''), 255);
+    v_vendedor VARCHAR := LEFT(NULLIF(TRIM(p_datos_generales->>'vendedor'), ''), 255);
+    v_moneda VARCHAR := LEFT(COALESCE(NULLIF(p_datos_generales->'condiciones'->>'moneda', ''), 'MXN'), 10);
+BEGIN
+    -- ON DELETE CASCADE elimina también sus materiales
+    DELETE FROM public.cotizacion_items WHERE cotizacion_id = p_id;
+
+    INSERT INTO public.cotizacion_items
+        (cotizacion_id, partida, company_id, numero_cotizacion, fecha_creacion,
+         cliente, vendedor, moneda, descripcion, uom, cantidad, costo_unidad, total)
+    SELECT p_id, p.partida, p_company_id, p_numero, p_fecha,
+           v_cliente, v_vendedor, v_moneda,
+           p.item->>'descripcion', LEFT(p.item->>'uom', 50),
+           safe_numeric(p.item->>'cantidad'), safe_numeric(p.item->>'costoUnidad'),
+           safe_numeric(p.item->>'total')
+    FROM partidas_cotizacion(p_items) AS p;
+
+    INSERT INTO public.cotizacion_materiales
+        (cotizacion_id, partida, tipo, posicion, company_id, numero_cotizacion, fecha_creacion,
+         cliente, vendedor, moneda, descripcion, descripcion_normalizada,
+         peso, cantidad, precio, subtotal, kg, precio_kg)
+    SELECT p_id, m.partida, m.tipo, m.posicion, p_company_id, p_numero, p_fecha,
+           v_cliente, v_vendedor, v_moneda, m.descripcion,
+           normalizar_descripcion_material(m.descripcion),
+           m.peso, m.cantidad, m.precio, m.subtotal,
+           CASE m.tipo WHEN 'peso' THEN m.peso_estructura
+                       WHEN 'material' THEN m.peso * m.cantidad END,
+           CASE WHEN m.tipo <> 'otro' THEN m.precio END
+    FROM (
+        SELECT p.partida, e.posicion,
+               CASE WHEN e.elemento->>'material' = 'COTIZAR_POR_PESO'
+                      OR e.elemento->>'tipoCotizacion' = 'peso' THEN 'peso'
+                    ELSE 'material' END AS tipo,
+               TRIM(e.elemento->>'material') AS descripcion,
+               CASE WHEN e.elemento->>'material' = 'COTIZAR_POR_PESO'
+                      OR e.elemento->>'tipoCotizacion' = 'peso' THEN NULL
+                    ELSE safe_numeric(e.elemento->>'peso') END AS peso,
+               CASE WHEN e.elemento->>'material' = 'COTIZAR_POR_PESO'
+                      OR e.elemento->>'tipoCotizacion' = 'peso' THEN NULL
+                    ELSE safe_numeric(e.elemento->>'cantidad') END AS cantidad,
+               COALESCE(safe_numeric(e.elemento->>'precioKg'), safe_numeric(e.elemento->>'precio')) AS precio,
+               safe_numeric(e.elemento->>'subtotal') AS subtotal,
+               safe_numeric(e.elemento->>'pesoEstructura') AS peso_estructura
+        FROM partidas_cotizacion(p_items) AS p,
+             elementos_jsonb(p.item->'materiales') AS e
+        UNION ALL
+        SELECT p.partida, e.posicion, 'otro',
+               TRIM(e.elemento->>'descripcion'),
+               NULL, safe_numeric(e.elemento->>'cantidad'), safe_numeric(e.elemento->>'precio'),
+               safe_numeric(e.elemento->>'subtotal'), NULL
+        FROM partidas_cotizacion(p_items) AS p,
+             elementos_jsonb(p.item->'otrosMateriales') AS e
+    ) AS m
+    WHERE COALESCE(m.descripcion, '') <> '';
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- ============================================================
+-- 4. TRIGGER: MANTENER LA PROYECCIÓN EN CADA GUARDADO
+-- ============================================================
+-- Los DELETE de cotizaciones se propagan por ON DELETE CASCADE
+CREATE OR REPLACE FUNCTION sincronizar_cotizacion_items()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM proyectar_cotizacion_items(
+        NEW.id, NEW.company_id, NEW.numero_cotizacion, NEW.fecha_creacion,
+        NEW.datos_generales, NEW.items
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_cotizacion_items ON public.cotizaciones;
+CREATE TRIGGER trg_cotizacion_items
+    AFTER INSERT OR UPDATE OF company_id, numero_cotizacion, datos_generales, items, fecha_creacion
+    ON public.cotizaciones
+    FOR EACH ROW EXECUTE FUNCTION sincronizar_cotizacion_items();
+
+-- ============================================================
+-- 5. RECONSTRUCCIÓN COMPLETA (backfill y reparación)
+-- ============================================================
+-- También disponible como: python quote_items.py --reconstruir
+CREATE OR REPLACE FUNCTION recalcular_cotizacion_items()
+RETURNS INTEGER AS $$
+DECLARE
+    v_fila RECORD;
+    v_total INTEGER := 0;
+BEGIN
+    DELETE FROM public.cotizacion_items;
+
+    FOR v_fila IN
+        SELECT id, company_id, numero_cotizacion, fecha_creacion, datos_generales, items
+        FROM public.cotizaciones ORDER BY id
+    LOOP
+        PERFORM proyectar_cotizacion_items(
+            v_fila.id, v_fila.company_id, v_fila.numero_cotizacion, v_fila.fecha_creacion,
+            v_fila.datos_generales, v_fila.items
+        );
+        v_total := v_total + 1;
+    END LOOP;
+
+    RETURN v_total;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+SELECT recalcular_cotizacion_items();
+
+-- ============================================================
+-- 6. RLS: cada compañía solo lee sus partidas y materiales
+-- ============================================================
+ALTER TABLE public.cotizacion_items ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.cotizacion_materiales ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY company_isolation_cotizacion_items ON public.cotizacion_items
+    FOR SELECT
+    USING (
+        company_id = COALESCE(
+            current_setting('app.current_company_id', true)::UUID,
+            '00000000-0000-0000-0000-000000000000'::UUID
+        )
+    );
+
+CREATE POLICY company_isolation_cotizacion_materiales ON public.cotizacion_materiales
+    FOR SELECT
+    USING (
+        company_id = COALESCE(
+            current_setting('app.current_company_id', true)::UUID,
+            '00000000-0000-0000-0000-000000000000'::UUID
+        )
+    );
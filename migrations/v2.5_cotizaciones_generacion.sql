@@ -0,0 +1,81 @@
+-- ============================================================
+-- MIGRACIÓN v2.5: CONTADOR DE GENERACIÓN POR COMPAÑÍA
+-- ============================================================
+-- Las páginas de listado (home, /todas-cotizaciones) usan un ETag
+-- derivado de este contador: si nada cambió desde la última visita
+-- el servidor responde 304 sin leer ni renderizar las cotizaciones.
+-- El trigger incrementa la generación de la compañía en cada
+-- INSERT/UPDATE/DELETE de cotizaciones (ambas compañías si una fila
+-- cambia de company_id).
+--
+-- PREREQUISITO: Haber ejecutado v2_multi_tenant.sql primero
+-- ============================================================
+
+-- ============================================================
+-- 1. TABLA DE GENERACIÓN
+-- ============================================================
+CREATE TABLE IF NOT EXISTS public.cotizaciones_generacion (
+    company_id UUID PRIMARY KEY DEFAULT '00000000-0000-0000-0000-000000000000'::UUID,
+    generacion BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- ============================================================
+-- 2. FUNCIÓN AUXILIAR
+-- ============================================================
+CREATE OR REPLACE FUNCTION incrementar_generacion_cotizaciones(p_company_id UUID)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO public.cotizaciones_generacion AS g (company_id, generacion)
+    VALUES (COALESCE(p_company_id, '00000000-0000-0000-0000-000000000000'::UUID), 1)
+    ON CONFLICT (company_id) DO UPDATE SET
+        generacion = g.generacion + 1,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- ============================================================
+-- 3. TRIGGER: INCREMENTAR EN CADA ESCRITURA
+-- ============================================================
+CREATE OR REPLACE FUNCTION actualizar_generacion_cotizaciones()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM incrementar_generacion_cotizaciones(NEW.company_id);
+    END IF;
+    IF TG_OP = 'DELETE'
+       OR (TG_OP = 'UPDATE' AND OLD.company_id IS DISTINCT FROM NEW.company_id) THEN
+        PERFORM incrementar_generacion_cotizaciones(OLD.company_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_generacion_cotizaciones ON public.cotizaciones;
+CREATE TRIGGER trg_generacion_cotizaciones
+    AFTER INSERT OR UPDATE OR DELETE
+    ON public.cotizaciones
+    FOR EACH ROW EXECUTE FUNCTION actualizar_generacion_cotizaciones();
+
+-- ============================================================
+-- 4. BACKFILL: UNA FILA POR COMPAÑÍA EXISTENTE
+-- ============================================================
+INSERT INTO public.cotizaciones_generacion (company_id, generacion)
+SELECT DISTINCT COALESCE(company_id, '00000000-0000-0000-0000-000000000000'::UUID), 1
+FROM public.cotizaciones
+ON CONFLICT (company_id) DO NOTHING;
+
+-- ============================================================
+-- 5. RLS: cada compañía solo lee su generación
+-- ============================================================
+ALTER TABLE public.cotizaciones_generacion ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS company_isolation_generacion ON public.cotizaciones_generacion;
+CREATE POLICY company_isolation_generacion ON public.cotizaciones_generacion
+    FOR SELECT
+    USING (
+        company_id = COALESCE(
+            current_setting('app.current_company_id', true)::UUID,
+            '00000000-0000-0000-0000-000000000000'::UUID
+        )
+    );
@@ -0,0 +1,149 @@
+-- ============================================================
+-- MIGRACIÓN v2.6: ÁRBOL DE INTEGRIDAD (MERKLE POR BUCKETS)
+-- ============================================================
+-- La verificación de integridad Supabase <-> JSON local ya no
+-- descarga todas las cotizaciones: compara huellas por compañía y
+-- bucket, y solo lee las cotizaciones de los buckets que difieren
+-- (ver integrity_tree.py).
+--
+-- - hash_contenido: sha256 del contenido canónico, lo calcula la app
+--   al escribir (integrity_tree.hash_contenido)
+-- - Un UPDATE que cambia el contenido sin traer hash nuevo (SQL
+--   manual, otro cliente) deja hash_contenido en NULL: la fila aparece
+--   como inconsistente en vez de conservar un hash viejo que coincide
+-- - integridad_bucket: primer byte de md5(numero_cotizacion), 0..255
+-- - integridad_buckets: huella (XOR de los primeros 64 bits de cada
+--   hash) y conteo por (compañía, bucket), mantenidos por trigger
+--
+-- Las filas anteriores a esta migración quedan con hash NULL (hoja 0):
+-- aparecen como inconsistentes hasta ejecutar
+--     python -m integrity_tree rellenar
+--
+-- PREREQUISITO: Haber ejecutado v2_multi_tenant.sql primero
+-- ============================================================
+
+-- ============================================================
+-- 1. COLUMNAS EN COTIZACIONES
+-- ============================================================
+ALTER TABLE public.cotizaciones ADD COLUMN IF NOT EXISTS hash_contenido TEXT;
+ALTER TABLE public.cotizaciones ADD COLUMN IF NOT EXISTS integridad_bucket SMALLINT
+    GENERATED ALWAYS AS (get_byte(decode(md5(numero_cotizacion), 'hex'), 0)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_cotizaciones_integridad_bucket
+    ON public.cotizaciones (company_id, integridad_bucket);
+
+-- ============================================================
+-- 2. TABLA DE HUELLAS POR BUCKET
+-- ============================================================
+CREATE TABLE IF NOT EXISTS public.integridad_buckets (
+    company_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000'::UUID,
+    bucket SMALLINT NOT NULL,
+    huella BIGINT NOT NULL DEFAULT 0,
+    registros INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (company_id, bucket)
+);
+
+-- ============================================================
+-- 3. FUNCIONES AUXILIARES
+-- ============================================================
+CREATE OR REPLACE FUNCTION integridad_hoja(p_hash TEXT)
+RETURNS BIGINT AS $$
+    SELECT CASE
+        WHEN p_hash IS NULL OR length(p_hash) < 16 THEN 0::BIGINT
+        ELSE ('x' || substr(p_hash, 1, 16))::BIT(64)::BIGINT
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION aplicar_hoja_integridad(p_company_id UUID, p_bucket SMALLINT,
+                                                   p_hash TEXT, p_registros INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    -- XOR es su propia inversa: sumar y restar una hoja es la misma operación
+    INSERT INTO public.integridad_buckets AS b (company_id, bucket, huella, registros)
+    VALUES (COALESCE(p_company_id, '00000000-0000-0000-0000-000000000000'::UUID),
+            p_bucket, integridad_hoja(p_hash), p_registros)
+    ON CONFLICT (company_id, bucket) DO UPDATE SET
+        huella = b.huella # EXCLUDED.huella,
+        registros = b.registros + EXCLUDED.registros;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- ============================================================
+-- 4. TRIGGER: INVALIDAR HASH SI CAMBIA EL CONTENIDO SIN HASH NUEVO
+-- ============================================================
+CREATE OR REPLACE FUNCTION invalidar_hash_contenido()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (NEW.items IS DISTINCT FROM OLD.items
+        OR NEW.datos_generales IS DISTINCT FROM OLD.datos_generales
+        OR NEW.numero_cotizacion IS DISTINCT FROM OLD.numero_cotizacion)
+       AND NEW.hash_contenido IS NOT DISTINCT FROM OLD.hash_contenido THEN
+        NEW.hash_contenido := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_invalidar_hash_cotizaciones ON public.cotizaciones;
+CREATE TRIGGER trg_invalidar_hash_cotizaciones
+    BEFORE UPDATE OF items, datos_generales, numero_cotizacion
+    ON public.cotizaciones
+    FOR EACH ROW EXECUTE FUNCTION invalidar_hash_contenido();
+
+-- ============================================================
+-- 5. TRIGGER: MANTENER HUELLAS EN CADA ESCRITURA
+-- ============================================================
+CREATE OR REPLACE FUNCTION actualizar_integridad_buckets()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.hash_contenido IS NOT DISTINCT FROM NEW.hash_contenido
+       AND OLD.company_id IS NOT DISTINCT FROM NEW.company_id
+       AND OLD.integridad_bucket = NEW.integridad_bucket THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM aplicar_hoja_integridad(OLD.company_id, OLD.integridad_bucket, OLD.hash_contenido, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM aplicar_hoja_integridad(NEW.company_id, NEW.integridad_bucket, NEW.hash_contenido, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_integridad_cotizaciones ON public.cotizaciones;
+CREATE TRIGGER trg_integridad_cotizaciones
+    AFTER INSERT OR UPDATE OR DELETE
+    ON public.cotizaciones
+    FOR EACH ROW EXECUTE FUNCTION actualizar_integridad_buckets();
+
+-- ============================================================
+-- 6. BACKFILL: HUELLAS DE LAS FILAS EXISTENTES
+-- ============================================================
+-- bit_xor requiere PostgreSQL 14+ (Supabase usa 15)
+INSERT INTO public.integridad_buckets (company_id, bucket, huella, registros)
+SELECT COALESCE(company_id, '00000000-0000-0000-0000-000000000000'::UUID),
+       integridad_bucket,
+       bit_xor(integridad_hoja(hash_contenido)),
+       COUNT(*)
+FROM public.cotizaciones
+GROUP BY 1, 2
+ON CONFLICT (company_id, bucket) DO UPDATE SET
+    huella = EXCLUDED.huella,
+    registros = EXCLUDED.registros;
+
+-- ============================================================
+-- 7. RLS: cada compañía solo lee sus huellas
+-- ============================================================
+ALTER TABLE public.integridad_buckets ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS company_isolation_integridad ON public.integridad_buckets;
+CREATE POLICY company_isolation_integridad ON public.integridad_buckets
+    FOR SELECT
+    USING (
+        company_id = COALESCE(
+            current_setting('app.current_company_id', true)::UUID,
+            '00000000-0000-0000-0000-000000000000'::UUID
+        )
+    );
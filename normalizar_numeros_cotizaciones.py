@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MIGRACIÓN ÚNICA: NORMALIZACIÓN NUMÉRICA DE COTIZACIONES
+=======================================================
+
+Desde que guardar_cotizacion / edicion_menor_cotizacion / guardar_draft
+normalizan los números al guardar (pricing_engine.normalizar_cotizacion),
+las lecturas usan leer_numero() que no parsea. Este script lleva las filas
+ya guardadas al mismo formato: cantidad, peso, precio, subtotal, seguridad,
+descuento, costoUnidad/total de partidas y condiciones.tipoCambio.
+
+Las cotizaciones se recorren en streaming (iterar_cotizaciones) y solo las
+que cambian se escriben, por lotes, con actualizar_items_lote().
+
+Uso:
+    python normalizar_numeros_cotizaciones.py --dry-run
+    python normalizar_numeros_cotizaciones.py
+    python normalizar_numeros_cotizaciones.py --benchmark 20000
+"""
+
+import argparse
+import copy
+import sys
+import time
+from typing import Dict
+
+from pricing_engine import (NUMERICOS_MATERIAL, NUMERICOS_PARTIDA, LoteItems,
+                            convertir_numero, leer_numero, normalizar_cotizacion)
+
+TAMANO_LOTE = 500
+
+
+def migrar(db_manager, company_id: str = None, dry_run: bool = False,
+           tamano_lote: int = TAMANO_LOTE) -> Dict:
+    """Normaliza las cotizaciones guardadas. Regresa contadores de la migración"""
+    resumen = {"revisadas": 0, "modificadas": 0, "campos": 0, "actualizadas": 0}
+    items_lote, dg_lote = {}, {}
+
+    def _escribir():
+        if items_lote and not dry_run:
+            resultado = db_manager.actualizar_items_lote(dict(items_lote), dict(dg_lote))
+            resumen["actualizadas"] += resultado.get("actualizadas", 0)
+        items_lote.clear()
+        dg_lote.clear()
+
+    for cot in db_manager.iterar_cotizaciones(company_id=company_id, tamano_lote=tamano_lote):
+        resumen["revisadas"] += 1
+        campos = normalizar_cotizacion(cot)
+        numero = cot.get("numeroCotizacion")
+        if not campos or not numero:
+            continue
+
+        resumen["modificadas"] += 1
+        resumen["campos"] += campos
+        datos_generales = cot.get("datosGenerales") if isinstance(cot.get("datosGenerales"), dict) else {}
+        if isinstance(cot.get("condiciones"), dict):
+            datos_generales = {**datos_generales, "condiciones": cot["condiciones"]}
+        items_lote[numero] = cot.get("items") or []
+        dg_lote[numero] = datos_generales
+
+        if len(items_lote) >= tamano_lote:
+            _escribir()
+    _escribir()
+
+    print(f"[NORMALIZAR] {resumen['revisadas']} revisadas, {resumen['modificadas']} con cambios "
+          f"({resumen['campos']} campos), {resumen['actualizadas']} actualizadas"
+          f"{' [dry-run]' if dry_run else ''}")
+    return resumen
+
+
+# ──────────────────────────────────────────────────────────
+# MICROBENCHMARK
+# ──────────────────────────────────────────────────────────
+
+def _cotizacion_legacy(k: int) -> Dict:
+    """Cotización con números guardados como texto, como llegan del formulario"""
+    return {
+        "numeroCotizacion": f"BENCH-{k}",
+        "condiciones": {"moneda": "USD", "tipoCambio": "18,50"},
+        "items": [
+            {
+                "cantidad": str(1 + p), "seguridad": "10", "descuento": "5",
+                "transporte": "1,250.00", "instalacion": "",
+                "materiales": [
+                    {"peso": "12.5", "cantidad": str(m + 1), "precio": "1,234.50", "subtotal": "15,431.25"}
+                    for m in range(4)
+                ],
+                "otrosMateriales": [{"cantidad": "2", "precio": "99.90", "subtotal": "199.80"}],
+            }
+            for p in range(3)
+        ],
+    }
+
+
+def _leer_campos(cotizaciones, lector):
+    """Recorre todos los campos numéricos como lo hacen las lecturas (tabla/desglose)"""
+    total = 0.0
+    for cot in cotizaciones:
+        for item in cot["items"]:
+            for campo, default in NUMERICOS_PARTIDA.items():
+                if campo in item:
+                    total += lector(item[campo], default)
+            for mat in item["materiales"] + item["otrosMateriales"]:
+                for campo, default in NUMERICOS_MATERIAL.items():
+                    if campo in mat:
+                        total += lector(mat[campo], default)
+    return total
+
+
+def benchmark(n: int = 20000) -> Dict:
+    """Costo por fila de parsear en cada lectura vs. leer números ya normalizados"""
+    from cotizador.utilities import safe_float
+
+    legacy = [_cotizacion_legacy(k) for k in range(n)]
+    normalizadas = copy.deepcopy(legacy)
+    inicio = time.perf_counter()
+    for cot in normalizadas:
+        normalizar_cotizacion(cot)
+    costo_migracion = time.perf_counter() - inicio
+
+    def medir(funcion):
+        inicio = time.perf_counter()
+        funcion()
+        return time.perf_counter() - inicio
+
+    resultados = {
+        "cotizaciones": n,
+        "migracion_unica_s": costo_migracion,
+        "lectura_safe_float_texto_s": medir(lambda: _leer_campos(legacy, safe_float)),
+        "lectura_convertir_numero_texto_s": medir(lambda: _leer_campos(legacy, convertir_numero)),
+        "lectura_normalizada_s": medir(lambda: _leer_campos(normalizadas, leer_numero)),
+        "lote_items_texto_s": medir(lambda: LoteItems([i for c in legacy for i in c["items"]])),
+        "lote_items_normalizado_s": medir(lambda: LoteItems([i for c in normalizadas for i in c["items"]])),
+    }
+
+    print(f"[NORMALIZAR] Microbenchmark ({n} cotizaciones, 3 partidas × 5 materiales)")
+    for clave, valor in resultados.items():
+        if clave.endswith("_s"):
+            print(f"  {clave:<36} {valor * 1000:9.1f} ms  ({valor / n * 1e6:6.2f} µs/cotización)")
+    print(f"  ahorro por lectura (safe_float → normalizado): "
+          f"{resultados['lectura_safe_float_texto_s'] / resultados['lectura_normalizada_s']:.1f}x")
+    return resultados
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Normalización numérica única de cotizaciones guardadas")
+    parser.add_argument('--company-id', help="Migrar solo una compañía")
+    parser.add_argument('--dry-run', action='store_true', help="Solo contar, no escribir")
+    parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+    parser.add_argument('--benchmark', type=int, nargs='?', const=20000, metavar='N',
+                        help="Ejecutar el microbenchmark con N cotizaciones sintéticas y salir")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return 0
+
+    from supabase_manager import SupabaseManager
+
+    db_manager = SupabaseManager()
+    try:
+        migrar(db_manager, company_id=args.company_id, dry_run=args.dry_run, tamano_lote=args.tamano_lote)
+    finally:
+        db_manager.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,7 @@ Nota: Cloudinary eliminado - migrado completamente a Supabase Storage
 
 import os
 import json
+import logging
 import datetime
 from pathlib import Path
 import shutil
@@ -16,6 +17,10 @@ from typing import Dict, List, Optional, Tuple
 from google_drive_client import GoogleDriveClient
 # CloudinaryManager eliminado - migrado a Supabase Storage
 from supabase_storage_manager import SupabaseStorageManager
+from structured_logging import logger_debug
+
+logger = logging.getLogger(__name__)
+log_pdf = logger_debug('pdf')
 
 class PDFManager:
     def __init__(self, database_manager, base_pdf_path: str = None):
@@ -554,8 +559,7 @@ class PDFManager:
     
     def _obtener_pdf_offline(self, numero_cotizacion: str) -> Dict:
         """Obtiene información de un PDF en modo offline (incluye Google Drive)"""
-        print(f"Buscando PDF offline: '{numero_cotizacion}'")
-        print(f"Ruta base configurada: {self.base_pdf_path}")
+        logger.info("[OBTENER PDF] Buscando PDF offline: %r", numero_cotizacion)
         
         # Variaciones del nombre a buscar (incluyendo prefijo "Cotizacion_")
         variaciones_base = [
@@ -574,34 +578,30 @@ class PDFManager:
         
         # Eliminar duplicados
         variaciones_nombre = list(set(variaciones_nombre))
-        print(f"Variaciones a buscar: {variaciones_nombre}")
+        log_pdf.debug("[OBTENER PDF] Variaciones a buscar (base %s): %s", self.base_pdf_path, variaciones_nombre)
         
         try:
             # 1. BUSCAR EN SUPABASE STORAGE (PRIORITARIO)
             if self.supabase_storage_disponible:
-                print("[OBTENER PDF] Buscando en Supabase Storage...")
-                print(f"[OBTENER PDF] Supabase Storage disponible: {self.supabase_storage_disponible}")
-                print(f"[OBTENER PDF] Total variaciones a buscar: {len(variaciones_nombre)}")
+                log_pdf.debug("[OBTENER PDF] Buscando en Supabase Storage (%d variaciones)...", len(variaciones_nombre))
                 try:
                     # Buscar en Supabase Storage usando las variaciones
                     for idx, variacion in enumerate(variaciones_nombre, 1):
-                        print(f"[SUPABASE_STORAGE] Buscando variación {idx}/{len(variaciones_nombre)}: '{variacion}'")
 
                         # Intentar encontrar el PDF con esta variación
                         supabase_pdfs = self.supabase_storage.buscar_pdfs(variacion, 20)
-                        print(f"[SUPABASE_STORAGE] Resultados encontrados: {len(supabase_pdfs)}")
+                        log_pdf.debug("[SUPABASE_STORAGE] Variación %d/%d %r: %d resultados",
+                                      idx, len(variaciones_nombre), variacion, len(supabase_pdfs))
 
                         for pdf_info in supabase_pdfs:
                             pdf_file_path = pdf_info.get('file_path', '')
                             pdf_numero = pdf_info.get('numero_cotizacion', '')
 
-                            print(f"[SUPABASE_STORAGE] Comparando con: {pdf_numero} (file: {pdf_file_path})")
-
                             # Verificar coincidencia
                             if (variacion.lower() in pdf_file_path.lower() or
                                 variacion.lower() in pdf_numero.lower()):
 
-                                print(f"[SUPABASE_STORAGE] ✓ MATCH! PDF encontrado: {pdf_file_path}")
+                                logger.info("[SUPABASE_STORAGE] PDF encontrado: %s", pdf_file_path)
                                 return {
                                     "encontrado": True,
                                     "registro": pdf_info,
@@ -613,33 +613,29 @@ class PDFManager:
                                     "fuente": "supabase_storage"
                                 }
 
-                    print("[SUPABASE_STORAGE] ✗ PDF no encontrado en Supabase Storage, probando con Google Drive...")
+                    log_pdf.debug("[SUPABASE_STORAGE] PDF no encontrado en Supabase Storage, probando con Google Drive...")
 
                 except Exception as e:
-                    print(f"[SUPABASE_STORAGE] ✗ Error en búsqueda: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception("[SUPABASE_STORAGE] Error en búsqueda: %s", e)
             else:
-                print("[OBTENER PDF] ✗ Supabase Storage NO disponible, saltando a Google Drive")
+                log_pdf.debug("[OBTENER PDF] Supabase Storage NO disponible, saltando a Google Drive")
             
             # 2. Buscar en Google Drive (secundario)
             if self.drive_client.is_available():
-                print("Buscando en Google Drive...")
                 try:
                     drive_pdfs = self.drive_client.buscar_pdfs(numero_cotizacion)
-                    print(f"PDFs encontrados en Drive para '{numero_cotizacion}': {len(drive_pdfs)}")
+                    log_pdf.debug("[GDRIVE] PDFs encontrados en Drive para %r: %d", numero_cotizacion, len(drive_pdfs))
                 except Exception as e:
-                    print(f"Error buscando en Google Drive: {e}")
+                    logger.warning("[GDRIVE] Error buscando en Google Drive: %s", e)
                     drive_pdfs = []
                 
                 # Buscar coincidencia exacta con variaciones
-                print(f"   Comparando variaciones con {len(drive_pdfs)} archivos:")
                 for pdf in drive_pdfs:
                     pdf_nombre = pdf['numero_cotizacion']
                     for variacion in variaciones_nombre:
                         coincide = pdf_nombre == variacion
                         if coincide:
-                            print(f"     [MATCH] MATCH: '{pdf_nombre}' == '{variacion}'")
+                            logger.info("[GDRIVE] PDF encontrado: %r", pdf_nombre)
                             return {
                                 "encontrado": True,
                                 "ruta_completa": f"gdrive://{pdf['id']}",
@@ -655,16 +651,13 @@ class PDFManager:
                         }
             
             # 2. Buscar en carpetas locales (fallback)
-            print(f"Buscando archivos locales...")
-            print(f"Carpeta nuevas: {self.nuevas_path} (existe: {self.nuevas_path.exists()})")
-            print(f"Carpeta antiguas: {self.antiguas_path} (existe: {self.antiguas_path.exists()})")
+            log_pdf.debug("[LOCAL] Buscando archivos locales en %s y %s", self.nuevas_path, self.antiguas_path)
             
             # Buscar en carpeta de PDFs nuevos con todas las variaciones
             for variacion in variaciones_nombre:
                 pdf_nuevos = self.nuevas_path / f"{variacion}.pdf"
-                print(f"Buscando archivo nuevo: {pdf_nuevos}")
                 if pdf_nuevos.exists():
-                    print(f"[FOUND] Encontrado en nuevos: {variacion}")
+                    logger.info("[LOCAL] Encontrado en nuevos: %s", variacion)
                     return {
                         "encontrado": True,
                         "ruta_completa": str(pdf_nuevos),
@@ -681,9 +674,8 @@ class PDFManager:
             # Buscar en carpeta de PDFs antiguos con todas las variaciones
             for variacion in variaciones_nombre:
                 pdf_antiguos = self.antiguas_path / f"{variacion}.pdf"
-                print(f"Buscando archivo antiguo: {pdf_antiguos}")
                 if pdf_antiguos.exists():
-                    print(f"[FOUND] Encontrado en antiguos: {variacion}")
+                    logger.info("[LOCAL] Encontrado en antiguos: %s", variacion)
                     return {
                         "encontrado": True,
                         "ruta_completa": str(pdf_antiguos),
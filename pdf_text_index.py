@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ÍNDICE DE TEXTO COMPLETO DE PDFs
+================================
+
+Índice persistente (SQLite FTS5) sobre el contenido de los PDFs almacenados,
+incluyendo los históricos de Google Drive y de la carpeta local "antiguas"
+que no tienen registro en la base de datos.
+
+Características:
+- Extracción de texto con PyPDF2 (reutiliza extract_pdf_text del monitor de Drive)
+- Actualización incremental: solo se re-extraen archivos cuyo checksum cambió
+- Eliminación de documentos que ya no existen en su origen
+- Búsqueda con snippets resaltados y paginación
+- Hilo de indexación en segundo plano
+- Aislamiento por compañía: cada documento guarda el company_id de su
+  cotización (resuelto por número al sincronizar) y toda búsqueda filtra por
+  él; los PDFs sin cotización registrada (históricos) solo los ve la
+  compañía legacy (incluir_sin_compania)
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from google_drive_monitor import PDF_TEXT_EXTRACTION, extract_pdf_text
+
+logger = logging.getLogger(__name__)
+
+class PDFTextIndex:
+    """Índice de texto completo sobre PDFs locales y de Google Drive"""
+
+    def __init__(self, pdf_manager=None, db_path: str = None,
+                 resolver_companias: Callable[[List[str]], Dict[str, str]] = None):
+        self.pdf_manager = pdf_manager
+        # numeros -> {numero: company_id} (SupabaseManager.companias_de_cotizaciones)
+        self.resolver_companias = resolver_companias
+        self.db_path = db_path or os.getenv('PDF_TEXT_INDEX_PATH', 'pdf_text_index.db')
+
+        self.config = {
+            "intervalo_segundos": int(os.getenv('PDF_TEXT_INDEX_INTERVAL', '1800')),  # 30 min
+            "retraso_inicial_segundos": int(os.getenv('PDF_TEXT_INDEX_DELAY', '60')),
+            "max_file_size_mb": int(os.getenv('MAX_PDF_SIZE_MB', '50')),
+        }
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.ultima_indexacion = None
+        self.ultimo_resultado = {}
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._crear_esquema()
+
+    def _crear_esquema(self):
+        """Crear tablas de documentos y tabla virtual FTS5"""
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documentos (
+                    doc_key TEXT PRIMARY KEY,
+                    origen TEXT NOT NULL,
+                    nombre TEXT NOT NULL,
+                    numero_cotizacion TEXT,
+                    checksum TEXT NOT NULL,
+                    tamano INTEGER DEFAULT 0,
+                    mtime REAL DEFAULT 0,
+                    paginas INTEGER DEFAULT 0,
+                    indexado_en TEXT,
+                    company_id TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_documentos_origen ON documentos(origen);
+                CREATE VIRTUAL TABLE IF NOT EXISTS documentos_fts USING fts5(
+                    doc_key UNINDEXED,
+                    numero_cotizacion,
+                    nombre,
+                    texto,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                );
+            """)
+            # Índices creados antes del aislamiento por compañía
+            columnas = {fila['name'] for fila in self._conn.execute("PRAGMA table_info(documentos)")}
+            if 'company_id' not in columnas:
+                self._conn.execute("ALTER TABLE documentos ADD COLUMN company_id TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documentos_company ON documentos(company_id)")
+            self._conn.commit()
+
+    # ========================================
+    # INDEXACIÓN
+    # ========================================
+
+    def indexar_texto(self, doc_key: str, texto: str, origen: str, nombre: str,
+                      checksum: str, numero_cotizacion: str = None, paginas: int = 0,
+                      tamano: int = 0, mtime: float = 0, company_id: str = None) -> None:
+        """Insertar o reemplazar el texto de un documento en el índice"""
+        numero = numero_cotizacion or _numero_desde_nombre(nombre)
+        with self._lock:
+            self._conn.execute("DELETE FROM documentos_fts WHERE doc_key = ?", (doc_key,))
+            self._conn.execute(
+                "INSERT INTO documentos_fts (doc_key, numero_cotizacion, nombre, texto) VALUES (?, ?, ?, ?)",
+                (doc_key, numero, nombre, texto or "")
+            )
+            self._conn.execute("""
+                INSERT OR REPLACE INTO documentos
+                    (doc_key, origen, nombre, numero_cotizacion, checksum, tamano, mtime, paginas, indexado_en,
+                     company_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (doc_key, origen, nombre, numero, checksum, tamano, mtime, paginas,
+                  datetime.now().isoformat(), company_id))
+            self._conn.commit()
+
+    def indexar_pdf(self, doc_key: str, contenido: bytes, origen: str, nombre: str,
+                    checksum: str = None, **kwargs) -> bool:
+        """
+        Extraer e indexar un PDF si su checksum cambió.
+
+        Returns:
+            True si el documento fue (re)indexado, False si ya estaba al día
+        """
+        checksum = checksum or hashlib.md5(contenido).hexdigest()
+        if self.checksum_indexado(doc_key) == checksum:
+            return False
+
+        extraido = extract_pdf_text(contenido)
+        self.indexar_texto(doc_key, extraido["text"], origen, nombre, checksum,
+                           paginas=extraido["num_pages"], **kwargs)
+        return True
+
+    def checksum_indexado(self, doc_key: str) -> Optional[str]:
+        """Checksum con el que se indexó un documento (None si no está indexado)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT checksum FROM documentos WHERE doc_key = ?", (doc_key,)
+            ).fetchone()
+        return row['checksum'] if row else None
+
+    def eliminar(self, doc_key: str) -> None:
+        """Eliminar un documento del índice"""
+        with self._lock:
+            self._conn.execute("DELETE FROM documentos_fts WHERE doc_key = ?", (doc_key,))
+            self._conn.execute("DELETE FROM documentos WHERE doc_key = ?", (doc_key,))
+            self._conn.commit()
+
+    def sincronizar(self) -> Dict:
+        """
+        Recorre las carpetas locales (nuevas/antiguas) y Google Drive, indexando
+        solo archivos nuevos o con checksum distinto y purgando los eliminados.
+        """
+        if not PDF_TEXT_EXTRACTION:
+            return {"success": False, "error": "PyPDF2 no disponible - extracción de texto deshabilitada"}
+
+        inicio = time.time()
+        resultado = {"indexados": 0, "sin_cambios": 0, "eliminados": 0, "errores": 0}
+        vistos = set()
+
+        for origen, ruta in self._carpetas_locales():
+            self._sincronizar_carpeta_local(origen, ruta, vistos, resultado)
+
+        drive_listado = self._sincronizar_drive(vistos, resultado)
+
+        # Purgar documentos cuyo origen se recorrió completo y ya no existen
+        origenes_recorridos = {origen for origen, _ in self._carpetas_locales()}
+        if drive_listado:
+            origenes_recorridos.update({"drive/nuevas", "drive/antiguas"})
+        with self._lock:
+            filas = self._conn.execute("SELECT doc_key, origen FROM documentos").fetchall()
+        for fila in filas:
+            if fila['origen'] in origenes_recorridos and fila['doc_key'] not in vistos:
+                self.eliminar(fila['doc_key'])
+                resultado["eliminados"] += 1
+
+        resultado["companias_asignadas"] = self.asignar_companias()
+
+        resultado["success"] = True
+        resultado["duracion_ms"] = int((time.time() - inicio) * 1000)
+        self.ultima_indexacion = datetime.now()
+        self.ultimo_resultado = resultado
+        logger.info(f"[PDF_INDEX] Sincronización: {resultado}")
+        return resultado
+
+    def asignar_companias(self) -> int:
+        """
+        Asigna company_id a los documentos que aún no lo tienen, resolviendo
+        sus números de cotización en lote. Los que no tienen cotización
+        registrada quedan sin compañía (solo visibles para la compañía legacy).
+        """
+        if not self.resolver_companias:
+            return 0
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT doc_key, numero_cotizacion FROM documentos WHERE company_id IS NULL"
+            ).fetchall()
+        if not filas:
+            return 0
+        try:
+            companias = self.resolver_companias([fila['numero_cotizacion'] for fila in filas])
+        except Exception as e:
+            logger.warning(f"[PDF_INDEX] No se pudieron resolver compañías: {e}")
+            return 0
+        asignados = [(companias[fila['numero_cotizacion']], fila['doc_key'])
+                     for fila in filas if companias.get(fila['numero_cotizacion'])]
+        if asignados:
+            with self._lock:
+                self._conn.executemany("UPDATE documentos SET company_id = ? WHERE doc_key = ?", asignados)
+                self._conn.commit()
+        return len(asignados)
+
+    def _carpetas_locales(self) -> List[tuple]:
+        if not self.pdf_manager:
+            return []
+        carpetas = []
+        for origen, ruta in (("local/nuevas", getattr(self.pdf_manager, 'nuevas_path', None)),
+                             ("local/antiguas", getattr(self.pdf_manager, 'antiguas_path', None))):
+            if ruta and Path(ruta).exists():
+                carpetas.append((origen, Path(ruta)))
+        return carpetas
+
+    def _sincronizar_carpeta_local(self, origen: str, ruta: Path, vistos: set, resultado: Dict):
+        max_bytes = self.config["max_file_size_mb"] * 1024 * 1024
+        for archivo in ruta.glob("*.pdf"):
+            doc_key = f"{origen}/{archivo.name}"
+            vistos.add(doc_key)
+            try:
+                stat = archivo.stat()
+                if stat.st_size > max_bytes:
+                    continue
+
+                # Atajo: mismo tamaño y mtime que la última indexación → sin leer el archivo
+                with self._lock:
+                    fila = self._conn.execute(
+                        "SELECT tamano, mtime FROM documentos WHERE doc_key = ?", (doc_key,)
+                    ).fetchone()
+                if fila and fila['tamano'] == stat.st_size and fila['mtime'] == stat.st_mtime:
+                    resultado["sin_cambios"] += 1
+                    continue
+
+                contenido = archivo.read_bytes()
+                if self.indexar_pdf(doc_key, contenido, origen, archivo.name,
+                                    tamano=stat.st_size, mtime=stat.st_mtime):
+                    resultado["indexados"] += 1
+                else:
+                    with self._lock:
+                        self._conn.execute(
+                            "UPDATE documentos SET tamano = ?, mtime = ? WHERE doc_key = ?",
+                            (stat.st_size, stat.st_mtime, doc_key)
+                        )
+                        self._conn.commit()
+                    resultado["sin_cambios"] += 1
+            except Exception as e:
+                logger.warning(f"[PDF_INDEX] Error indexando {doc_key}: {e}")
+                resultado["errores"] += 1
+
+    def _sincronizar_drive(self, vistos: set, resultado: Dict) -> bool:
+        """Indexar PDFs de Google Drive. Retorna True si el listado fue completo."""
+        drive = getattr(self.pdf_manager, 'drive_client', None) if self.pdf_manager else None
+        if not drive or not drive.is_available():
+            return False
+
+        archivos = drive.buscar_pdfs("")
+        if not archivos:
+            return False
+
+        for archivo in archivos:
+            origen = f"drive/{archivo.get('carpeta_origen', 'antiguas')}"
+            doc_key = f"drive/{archivo['id']}"
+            vistos.add(doc_key)
+            checksum = archivo.get('md5') or f"{archivo.get('tamaño', '0')}:{archivo.get('fecha_modificacion', '')}"
+            if self.checksum_indexado(doc_key) == checksum:
+                resultado["sin_cambios"] += 1
+                continue
+            try:
+                contenido = drive.obtener_pdf_por_id(archivo['id'], archivo['nombre'])
+                if not contenido:
+                    resultado["errores"] += 1
+                    continue
+                self.indexar_pdf(doc_key, contenido, origen, archivo['nombre'], checksum=checksum,
+                                 numero_cotizacion=archivo.get('numero_cotizacion'),
+                                 tamano=len(contenido))
+                resultado["indexados"] += 1
+            except Exception as e:
+                logger.warning(f"[PDF_INDEX] Error indexando {doc_key}: {e}")
+                resultado["errores"] += 1
+        return True
+
+    # ========================================
+    # BÚSQUEDA
+    # ========================================
+
+    def buscar(self, texto: str, company_id: str, page: int = 1, per_page: int = 20,
+               incluir_sin_compania: bool = False) -> Dict:
+        """
+        Buscar texto en el contenido de los PDFs indexados de una compañía.
+        Todas las palabras deben aparecer; la última admite prefijo.
+        Sin company_id no se devuelve nada; incluir_sin_compania agrega los
+        PDFs históricos sin cotización registrada (compañía legacy).
+        """
+        consulta = _construir_consulta_fts(texto)
+        page = max(1, int(page))
+        per_page = max(1, min(int(per_page), 100))
+        if not consulta or not company_id:
+            return {"resultados": [], "total": 0, "page": page, "per_page": per_page, "pages": 0}
+
+        filtro_compania = "(d.company_id = ? OR (? AND d.company_id IS NULL))"
+        parametros = (consulta, str(company_id), 1 if incluir_sin_compania else 0)
+        with self._lock:
+            total = self._conn.execute(f"""
+                SELECT COUNT(*) AS total
+                FROM documentos_fts f
+                JOIN documentos d ON d.doc_key = f.doc_key
+                WHERE documentos_fts MATCH ? AND {filtro_compania}
+            """, parametros).fetchone()['total']
+            filas = self._conn.execute(f"""
+                SELECT f.doc_key, f.numero_cotizacion, f.nombre,
+                       snippet(documentos_fts, 3, '<mark>', '</mark>', '…', 16) AS snippet,
+                       d.origen, d.paginas, d.indexado_en
+                FROM documentos_fts f
+                JOIN documentos d ON d.doc_key = f.doc_key
+                WHERE documentos_fts MATCH ? AND {filtro_compania}
+                ORDER BY bm25(documentos_fts)
+                LIMIT ? OFFSET ?
+            """, parametros + (per_page, (page - 1) * per_page)).fetchall()
+
+        return {
+            "resultados": [dict(fila) for fila in filas],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": (total + per_page - 1) // per_page
+        }
+
+    def obtener_estado(self) -> Dict:
+        """Estado del índice para diagnóstico"""
+        with self._lock:
+            por_origen = {
+                fila['origen']: fila['total']
+                for fila in self._conn.execute(
+                    "SELECT origen, COUNT(*) AS total FROM documentos GROUP BY origen"
+                ).fetchall()
+            }
+        return {
+            "documentos": sum(por_origen.values()),
+            "por_origen": por_origen,
+            "extraccion_disponible": PDF_TEXT_EXTRACTION,
+            "en_ejecucion": bool(self._thread and self._thread.is_alive()),
+            "ultima_indexacion": self.ultima_indexacion.isoformat() if self.ultima_indexacion else None,
+            "ultimo_resultado": self.ultimo_resultado,
+            "db_path": self.db_path
+        }
+
+    # ========================================
+    # HILO EN SEGUNDO PLANO
+    # ========================================
+
+    def iniciar(self) -> bool:
+        """Iniciar el hilo de indexación periódica"""
+        if not PDF_TEXT_EXTRACTION:
+            logger.warning("[PDF_INDEX] PyPDF2 no disponible - indexación deshabilitada")
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="PDFTextIndex")
+        self._thread.start()
+        logger.info(f"[PDF_INDEX] Indexación en segundo plano cada {self.config['intervalo_segundos']}s")
+        return True
+
+    def detener(self):
+        """Detener el hilo de indexación"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _loop(self):
+        if self._stop_event.wait(self.config["retraso_inicial_segundos"]):
+            return
+        while not self._stop_event.is_set():
+            try:
+                self.sincronizar()
+            except Exception as e:
+                logger.error(f"[PDF_INDEX] Error en ciclo de indexación: {e}")
+            self._stop_event.wait(self.config["intervalo_segundos"])
+
+
+def _numero_desde_nombre(nombre: str) -> str:
+    """Número de cotización a partir del nombre de archivo"""
+    numero = nombre[:-4] if nombre.lower().endswith('.pdf') else nombre
+    if numero.startswith('Cotizacion_'):
+        numero = numero[len('Cotizacion_'):]
+    return numero
+
+
+def _construir_consulta_fts(texto: str) -> str:
+    """Convierte texto libre en una consulta FTS5 segura (términos entre comillas)"""
+    terminos = [t.replace('"', '') for t in (texto or '').split()]
+    terminos = [t for t in terminos if t]
+    if not terminos:
+        return ""
+    partes = [f'"{t}"' for t in terminos[:-1]]
+    partes.append(f'"{terminos[-1]}"*')
+    return " ".join(partes)
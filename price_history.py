@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HISTORIAL DE PRECIOS Y SUGERENCIA DE ÚLTIMO PRECIO
+==================================================
+
+Estadísticas móviles de precio por material y compañía (último, mediana,
+mínimo, máximo) para que el formulario precargue el precio de un material
+sin recorrer cotizaciones anteriores.
+
+- Fuente persistente: la proyección cotizacion_materiales (migración v2.4),
+  leída con SupabaseManager.historial_precios() la primera vez que se
+  consulta una compañía
+- Mantenimiento incremental: callback de SupabaseManager.registrar_callback_cotizacion;
+  cada guardado reemplaza los precios de esa cotización en O(ventana)
+- Serie por (compañía, moneda, tipo, material): ventana de los últimos N
+  precios (deque) + lista ordenada (bisect) para mediana/mín/máx
+
+Tipos (mismos que cotizacion_materiales): material ($/kg), peso ($/kg de
+COTIZAR_POR_PESO) y otro (precio unitario de otrosMateriales).
+"""
+
+import logging
+import os
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Dict, Iterable, List
+
+from materials_catalog import normalizar_texto
+from pricing_engine import redondear
+from quote_items import proyectar_cotizacion
+from supabase_manager import safe_str
+
+logger = logging.getLogger(__name__)
+
+VENTANA_DEFAULT = 50
+DIAS_HISTORIAL_DEFAULT = 365
+
+
+class _SerieMaterial:
+    """Últimos N precios de un material, con sus valores también ordenados"""
+
+    __slots__ = ('entradas', 'ordenados', 'descripcion')
+
+    def __init__(self):
+        self.entradas = deque()   # (precio, fecha, numero_cotizacion) en orden de registro
+        self.ordenados = []       # mismos precios, ordenados
+        self.descripcion = ''
+
+    def agregar(self, precio: float, fecha: str, numero: str, ventana: int):
+        self.entradas.append((precio, fecha, numero))
+        insort(self.ordenados, precio)
+        while len(self.entradas) > ventana:
+            self._quitar_ordenado(self.entradas.popleft()[0])
+
+    def quitar_cotizacion(self, numero: str):
+        if not any(e[2] == numero for e in self.entradas):
+            return
+        for entrada in self.entradas:
+            if entrada[2] == numero:
+                self._quitar_ordenado(entrada[0])
+        self.entradas = deque(e for e in self.entradas if e[2] != numero)
+
+    def _quitar_ordenado(self, precio: float):
+        del self.ordenados[bisect_left(self.ordenados, precio)]
+
+    def estadisticas(self) -> Dict:
+        n = len(self.ordenados)
+        mitad = n // 2
+        mediana = self.ordenados[mitad] if n % 2 else (self.ordenados[mitad - 1] + self.ordenados[mitad]) / 2
+        precio, fecha, numero = self.entradas[-1]
+        return {
+            'descripcion': self.descripcion,
+            'ultimo': redondear(precio),
+            'mediana': redondear(mediana),
+            'minimo': redondear(self.ordenados[0]),
+            'maximo': redondear(self.ordenados[-1]),
+            'muestras': n,
+            'fecha_ultimo': fecha or None,
+            'cotizacion_ultimo': numero,
+        }
+
+
+class PriceHistory:
+    """Cache en memoria de estadísticas de precio por material y compañía"""
+
+    def __init__(self, db_manager=None, ventana: int = None, dias_historial: int = None):
+        self.db_manager = db_manager
+        self.ventana = ventana or int(os.getenv('PRECIOS_VENTANA', VENTANA_DEFAULT))
+        self.dias_historial = dias_historial or int(os.getenv('PRECIOS_DIAS_HISTORIAL', DIAS_HISTORIAL_DEFAULT))
+        self._lock = threading.RLock()
+        self._series: Dict[tuple, _SerieMaterial] = {}
+        self._claves_por_cotizacion: Dict[str, set] = {}
+        self._companias_cargadas = set()
+
+    # ──────────────────────────────────────────────────────────
+    # MANTENIMIENTO INCREMENTAL
+    # ──────────────────────────────────────────────────────────
+
+    def _reemplazar(self, numero: str, filas: Iterable[Dict]):
+        """Sustituye los precios de una cotización (idempotente por número)"""
+        for clave in self._claves_por_cotizacion.pop(numero, ()):
+            serie = self._series.get(clave)
+            if serie:
+                serie.quitar_cotizacion(numero)
+                if not serie.entradas:
+                    del self._series[clave]
+
+        claves = set()
+        for fila in filas:
+            precio = fila.get('precio')
+            if precio is None or float(precio) <= 0:
+                continue
+            clave = (safe_str(fila.get('company_id')), fila.get('moneda') or 'MXN',
+                     fila['tipo'], fila['descripcion_normalizada'])
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = _SerieMaterial()
+            serie.descripcion = fila['descripcion']
+            fecha = fila.get('fecha_creacion')
+            serie.agregar(float(precio), fecha.isoformat() if hasattr(fecha, 'isoformat') else safe_str(fecha),
+                          numero, self.ventana)
+            claves.add(clave)
+        if claves:
+            self._claves_por_cotizacion[numero] = claves
+
+    def registrar_cotizacion(self, cotizacion: Dict):
+        """Registra (o re-registra) los precios de una cotización guardada"""
+        numero = safe_str(cotizacion.get('numeroCotizacion'))
+        if not numero:
+            return
+        _, materiales = proyectar_cotizacion(cotizacion)
+        with self._lock:
+            self._reemplazar(numero, materiales)
+
+    def eliminar_cotizacion(self, numero: str):
+        with self._lock:
+            self._reemplazar(numero, ())
+
+    def on_cotizacion_cambiada(self, accion: str, cotizacion: Dict):
+        """
+        Callback para SupabaseManager.registrar_callback_cotizacion.
+        Un guardado o sincronización sin company_id se ignora: registrarlo
+        movería los precios de la cotización a la serie de la compañía ''.
+        """
+        try:
+            if accion == 'eliminada':
+                self.eliminar_cotizacion(safe_str(cotizacion.get('numeroCotizacion')))
+            elif cotizacion.get('company_id'):
+                self.registrar_cotizacion(cotizacion)
+        except Exception as e:
+            logger.warning("[PRECIOS] Error actualizando historial: %s", e)
+
+    def cargar_filas(self, filas: Iterable[Dict]):
+        """Carga filas de cotizacion_materiales (orden cronológico)"""
+        por_cotizacion: Dict[str, List[Dict]] = {}
+        for fila in filas:
+            por_cotizacion.setdefault(safe_str(fila.get('numero_cotizacion')), []).append(fila)
+        with self._lock:
+            for numero, filas_cotizacion in por_cotizacion.items():
+                if numero:
+                    self._reemplazar(numero, filas_cotizacion)
+
+    def _asegurar_compania(self, company_id: str):
+        """Primera consulta de una compañía: precarga desde la proyección"""
+        if company_id in self._companias_cargadas or not self.db_manager:
+            return
+        try:
+            filas = self.db_manager.historial_precios(company_id or None, self.dias_historial)
+        except Exception as e:
+            logger.warning("[PRECIOS] Error cargando historial de %s: %s", company_id or 'sin compañía', e)
+            return
+        self.cargar_filas(filas)
+        with self._lock:
+            self._companias_cargadas.add(company_id)
+        logger.info("[PRECIOS] Historial cargado para %s: %d precios", company_id or 'sin compañía', len(filas))
+
+    # ──────────────────────────────────────────────────────────
+    # CONSULTAS
+    # ──────────────────────────────────────────────────────────
+
+    def sugerir(self, materiales: Iterable[str], company_id: str = None,
+                tipo: str = 'material', moneda: str = 'MXN') -> Dict[str, Dict]:
+        """
+        Estadísticas de precio de cada material solicitado, solo con precios
+        de la compañía indicada (sin compañía no hay sugerencias).
+
+        Returns:
+            {descripcion solicitada: {ultimo, mediana, minimo, maximo, muestras, ...} o None}
+        """
+        company_id = safe_str(company_id)
+        if not company_id:
+            return {material: None for material in materiales}
+        self._asegurar_compania(company_id)
+        resultado = {}
+        with self._lock:
+            for material in materiales:
+                serie = self._series.get((company_id, moneda or 'MXN', tipo, normalizar_texto(material)))
+                resultado[material] = serie.estadisticas() if serie else None
+        return resultado
+
+    def obtener_estado(self) -> Dict:
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'cotizaciones': len(self._claves_por_cotizacion),
+                'companias_cargadas': len(self._companias_cargadas),
+                'ventana': self.ventana,
+            }
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MOTOR DE PRECIOS
+================
+
+Única implementación de la fórmula de costo por partida, compartida por el
+guardado (SupabaseManager), la tabla de cotizaciones, el desglose y la
+preparación de revisiones. templates/formulario.html (calcularCostosItem)
+replica esta misma fórmula en el navegador.
+
+Fórmula por partida:
+    subtotal_base  = Σ materiales + Σ otrosMateriales + transporte + instalacion
+    costo_unidad   = subtotal_base * (1 + seguridad/100) * (1 - descuento/100)
+    total          = costo_unidad * cantidad        (cantidad <= 0 → 1)
+
+Los lotes se evalúan en columnas array.array: una pasada acumula los
+subtotales de todos los materiales sobre el índice de su partida y otra
+aplica la fórmula a todas las partidas. El redondeo a centavos se hace con
+Decimal (ROUND_HALF_UP) solo en los bordes: costoUnidad/total guardados y
+totales de cotización.
+
+API escalar:  calcular_item(), aplicar_a_items(), resumen_cotizacion()
+API por lote: LoteItems, calcular_items(), totales_cotizaciones()
+Normalización al guardar: normalizar_cotizacion(), leer_numero()
+"""
+
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List
+
+TASA_IVA = Decimal('0.16')
+_CENTAVOS = Decimal('0.01')
+
+# Campos que identifican una partida del formulario actual; las partidas
+# legacy (precio_unitario/subtotal sin componentes) conservan su total guardado.
+CAMPOS_ESTRUCTURADOS = ('materiales', 'otrosMateriales', 'transporte', 'instalacion',
+                        'seguridad', 'descuento', 'costoUnidad')
+
+
+def convertir_numero(valor, default: float = 0.0) -> float:
+    """
+    Conversión tolerante a float (misma regla que safe_float): acepta números,
+    strings con separador de miles ("1,234.50") o coma decimal ("123,45").
+    """
+    if valor is None:
+        return default
+    if isinstance(valor, bool):
+        return float(valor)
+    if isinstance(valor, (int, float)):
+        return float(valor)
+
+    texto = str(valor).strip()
+    if not texto or texto.lower() in ('none', 'null', 'n/a'):
+        return default
+
+    if ',' in texto:
+        partes = texto.split(',')
+        if len(partes) == 2 and len(partes[1]) <= 3 and partes[1].isdigit():
+            texto = f"{partes[0]}.{partes[1]}"
+        else:
+            texto = texto.replace(',', '')
+
+    limpio = ''.join(c for c in texto if c.isdigit() or c in '.-')
+    if not limpio or limpio == '-':
+        return default
+    try:
+        resultado = float(limpio)
+    except ValueError:
+        return default
+    return default if abs(resultado) > 1e10 else resultado
+
+
+def redondear(valor, decimales: int = 2) -> float:
+    """Redondeo decimal exacto (ROUND_HALF_UP) del valor tal como se muestra"""
+    cuanto = _CENTAVOS if decimales == 2 else Decimal(1).scaleb(-decimales)
+    return float(Decimal(repr(float(valor))).quantize(cuanto, rounding=ROUND_HALF_UP))
+
+
+def leer_numero(valor, default: float = 0.0):
+    """
+    Lectura de un campo numérico ya normalizado al guardar: los números se
+    devuelven tal cual; solo las filas aún no migradas pasan por convertir_numero().
+    """
+    if valor.__class__ is float or valor.__class__ is int:
+        return valor
+    return convertir_numero(valor, default)
+
+
+def subtotal_material(peso, cantidad, precio) -> float:
+    """Subtotal de un material: peso × cantidad × precio, redondeado a centavos"""
+    return redondear(leer_numero(peso, 1.0) * leer_numero(cantidad) * leer_numero(precio))
+
+
+def es_item_estructurado(item: Dict) -> bool:
+    return any(campo in item for campo in CAMPOS_ESTRUCTURADOS)
+
+
+class LoteItems:
+    """
+    Columnas de un lote de partidas (de una o varias cotizaciones).
+
+    Args:
+        items: Partidas a evaluar (dicts del formulario/BD)
+        cotizacion_de_item: Índice de cotización de cada partida (opcional)
+    """
+
+    def __init__(self, items: List[Dict], cotizacion_de_item: Iterable[int] = None):
+        n = len(items)
+        ceros = array('d', [0.0]) * n
+        self.items = items
+        self.n = n
+        self.cotizacion = array('I', cotizacion_de_item) if cotizacion_de_item is not None else array('I', [0]) * n
+
+        self.materiales = array('d', ceros)
+        self.otros = array('d', ceros)
+        self.transporte = array('d', ceros)
+        self.instalacion = array('d', ceros)
+        self.seguridad = array('d', ceros)
+        self.descuento = array('d', ceros)
+        self.cantidad = array('d', [1.0]) * n
+        self.estructurado = array('b', [1]) * n
+        self.total_legacy = array('d', ceros)
+
+        # Materiales aplanados: subtotal + índice de partida (para acumular en una pasada)
+        mat_subtotal, mat_item = array('d'), array('I')
+        otr_subtotal, otr_item = array('d'), array('I')
+
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                self.estructurado[i] = 0
+                continue
+            if not es_item_estructurado(item):
+                self.estructurado[i] = 0
+                guardado = item.get('total') or item.get('subtotal')
+                if guardado:
+                    self.total_legacy[i] = leer_numero(guardado)
+                else:
+                    precio = item.get('precio_unitario') or item.get('precio') or 0
+                    self.total_legacy[i] = leer_numero(precio) * leer_numero(item.get('cantidad'))
+
+            for campo, subtotales, indices in (('materiales', mat_subtotal, mat_item),
+                                               ('otrosMateriales', otr_subtotal, otr_item)):
+                lista = item.get(campo)
+                if isinstance(lista, list):
+                    for mat in lista:
+                        if isinstance(mat, dict):
+                            subtotales.append(leer_numero(mat.get('subtotal')))
+                            indices.append(i)
+
+            self.transporte[i] = leer_numero(item.get('transporte'))
+            self.instalacion[i] = leer_numero(item.get('instalacion'))
+            self.seguridad[i] = leer_numero(item.get('seguridad'))
+            self.descuento[i] = leer_numero(item.get('descuento'))
+            cantidad = leer_numero(item.get('cantidad'), 1.0)
+            self.cantidad[i] = cantidad if cantidad > 0 else 1.0
+
+        for subtotal, i in zip(mat_subtotal, mat_item):
+            self.materiales[i] += subtotal
+        for subtotal, i in zip(otr_subtotal, otr_item):
+            self.otros[i] += subtotal
+
+        self.costo_unidad = array('d', ceros)
+        self.total = array('d', ceros)
+        self._evaluar()
+
+    def _evaluar(self):
+        """Aplica la fórmula a todas las partidas del lote"""
+        mats, otros = self.materiales, self.otros
+        transp, inst = self.transporte, self.instalacion
+        seg, desc, cant = self.seguridad, self.descuento, self.cantidad
+        costo_unidad, total = self.costo_unidad, self.total
+
+        for i in range(self.n):
+            if not self.estructurado[i]:
+                total[i] = self.total_legacy[i]
+                continue
+            subtotal_base = mats[i] + otros[i] + transp[i] + inst[i]
+            subtotal_con_seg = subtotal_base + subtotal_base * (seg[i] / 100.0)
+            costo = subtotal_con_seg - subtotal_con_seg * (desc[i] / 100.0)
+            costo_unidad[i] = costo
+            total[i] = costo * cant[i]
+
+    def resultado(self, i: int) -> Dict:
+        """Valores redondeados de la partida i"""
+        return {
+            'subtotalMateriales': redondear(self.materiales[i]),
+            'subtotalOtros': redondear(self.otros[i]),
+            'costoUnidad': redondear(self.costo_unidad[i]),
+            'total': redondear(self.total[i]),
+        }
+
+    def totales_por_cotizacion(self, num_cotizaciones: int) -> List[float]:
+        """Suma de totales redondeados por partida, agrupada por cotización"""
+        acumulado = [Decimal(0)] * num_cotizaciones
+        for i in range(self.n):
+            acumulado[self.cotizacion[i]] += Decimal(repr(redondear(self.total[i])))
+        return [float(t) for t in acumulado]
+
+
+# ──────────────────────────────────────────────────────────
+# API ESCALAR
+# ──────────────────────────────────────────────────────────
+
+def calcular_item(item: Dict) -> Dict:
+    """Resultado redondeado de una sola partida"""
+    return LoteItems([item]).resultado(0)
+
+
+def calcular_items(items: List[Dict]) -> List[Dict]:
+    """Resultados redondeados de una lista de partidas (sin modificarlas)"""
+    lote = LoteItems(items)
+    return [lote.resultado(i) for i in range(lote.n)]
+
+
+def aplicar_a_items(items: List[Dict], incluir_subtotales: bool = False,
+                    completar_legacy: bool = False) -> List[Dict]:
+    """
+    Escribe costoUnidad y total (y opcionalmente subtotalMateriales/subtotalOtros)
+    en cada partida estructurada. Las partidas legacy no se modifican, salvo
+    con completar_legacy: las que no traen total reciben el que usa el
+    resumen (precio_unitario * cantidad), para mostrarlas.
+    """
+    if not isinstance(items, list):
+        return items
+    lote = LoteItems(items)
+    for i, item in enumerate(items):
+        if not lote.estructurado[i]:
+            if completar_legacy and isinstance(item, dict) and not (item.get('total') or item.get('subtotal')):
+                item['total'] = lote.resultado(i)['total']
+            continue
+        resultado = lote.resultado(i)
+        item['costoUnidad'] = resultado['costoUnidad']
+        item['total'] = resultado['total']
+        if incluir_subtotales:
+            item['subtotalMateriales'] = resultado['subtotalMateriales']
+            item['subtotalOtros'] = resultado['subtotalOtros']
+    return items
+
+
+def resumen_cotizacion(items: List[Dict], tasa_iva: Decimal = TASA_IVA) -> Dict:
+    """Subtotal, IVA y total de una cotización"""
+    items = items if isinstance(items, list) else []
+    subtotal = Decimal(repr(LoteItems(items).totales_por_cotizacion(1)[0]))
+    iva = (subtotal * tasa_iva).quantize(_CENTAVOS, rounding=ROUND_HALF_UP)
+    return {
+        'subtotal': float(subtotal),
+        'iva': float(iva),
+        'total': float(subtotal + iva),
+    }
+
+
+# ──────────────────────────────────────────────────────────
+# API POR LOTE
+# ──────────────────────────────────────────────────────────
+
+def totales_cotizaciones(cotizaciones: List[Dict]) -> List[float]:
+    """
+    Subtotal (antes de IVA) de muchas cotizaciones evaluando todas sus
+    partidas en un solo lote.
+    """
+    items, indices = [], []
+    for c, cot in enumerate(cotizaciones):
+        partidas = cot.get('items') if isinstance(cot, dict) else None
+        if isinstance(partidas, list):
+            items.extend(partidas)
+            indices.extend([c] * len(partidas))
+    return LoteItems(items, indices).totales_por_cotizacion(len(cotizaciones))
+
+
+# ──────────────────────────────────────────────────────────
+# NORMALIZACIÓN AL GUARDAR
+# ──────────────────────────────────────────────────────────
+# Campo -> valor cuando llega vacío (los mismos defaults que usaban las lecturas).
+# Solo se normalizan campos presentes: no se agregan llaves, así una partida
+# legacy no se vuelve estructurada.
+
+NUMERICOS_PARTIDA = {
+    'cantidad': 1.0, 'seguridad': 0.0, 'descuento': 0.0, 'transporte': 0.0,
+    'instalacion': 0.0, 'costoUnidad': 0.0, 'total': 0.0, 'subtotal': 0.0,
+    'precio': 0.0, 'precio_unitario': 0.0,
+}
+NUMERICOS_MATERIAL = {'peso': 1.0, 'cantidad': 0.0, 'precio': 0.0, 'subtotal': 0.0,
+                      'pesoEstructura': 0.0, 'precioKg': 0.0}
+# tipoCambio vacío significa "no aplica" (MXN); el formulario lo envía como null
+NUMERICOS_CONDICIONES = {'tipoCambio': None}
+
+
+def numero_canonico(valor, default=0.0):
+    """Número canónico: int si es entero exacto, float en otro caso (default si viene vacío)"""
+    numero = convertir_numero(valor, default)
+    if numero is None:
+        return None
+    if numero != numero or numero in (float('inf'), float('-inf')):
+        numero = default
+    if isinstance(numero, float) and numero.is_integer():
+        return int(numero)
+    return numero
+
+
+def _normalizar_campos(destino: Dict, campos: Dict, conservar_vacios: bool) -> int:
+    cambios = 0
+    for campo, default in campos.items():
+        if campo not in destino:
+            continue
+        valor = destino[campo]
+        if conservar_vacios and (valor is None or (isinstance(valor, str) and not valor.strip())):
+            continue
+        if campo == 'cantidad' and campos is NUMERICOS_PARTIDA and not es_item_estructurado(destino):
+            default = 0.0  # legacy: precio × cantidad, sin cantidad no hay total
+        nuevo = numero_canonico(valor, default)
+        if nuevo != valor or nuevo.__class__ is not valor.__class__:
+            destino[campo] = nuevo
+            cambios += 1
+    return cambios
+
+
+def normalizar_items(items: List[Dict], conservar_vacios: bool = False) -> int:
+    """Convierte a número los campos numéricos de partidas y materiales. Regresa cuántos cambió"""
+    if not isinstance(items, list):
+        return 0
+    cambios = 0
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        cambios += _normalizar_campos(item, NUMERICOS_PARTIDA, conservar_vacios)
+        for campo in ('materiales', 'otrosMateriales'):
+            lista = item.get(campo)
+            if isinstance(lista, list):
+                for mat in lista:
+                    if isinstance(mat, dict):
+                        cambios += _normalizar_campos(mat, NUMERICOS_MATERIAL, conservar_vacios)
+    return cambios
+
+
+def normalizar_cotizacion(datos: Dict, conservar_vacios: bool = False) -> int:
+    """
+    Etapa de normalización al guardar: items, condiciones y
+    datosGenerales.condiciones quedan con números canónicos.
+
+    Args:
+        conservar_vacios: Dejar los campos vacíos como vienen (drafts en edición)
+
+    Returns:
+        Número de campos modificados
+    """
+    if not isinstance(datos, dict):
+        return 0
+    cambios = normalizar_items(datos.get('items'), conservar_vacios)
+    datos_generales = datos.get('datosGenerales')
+    for condiciones in (datos.get('condiciones'),
+                        datos_generales.get('condiciones') if isinstance(datos_generales, dict) else None):
+        if isinstance(condiciones, dict):
+            cambios += _normalizar_campos(condiciones, NUMERICOS_CONDICIONES, conservar_vacios)
+    return cambios
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EXPORTACIÓN MASIVA DE COTIZACIONES
+==================================
+
+Exporta cotizaciones a CSV, JSONL o XLSX en streaming: las cotizaciones se
+leen con SupabaseManager.iterar_cotizaciones() (cursor server-side en
+PostgreSQL, generador en modo offline) y cada formato emite bloques de bytes
+a medida que se escriben las filas, así que la memoria no crece con el
+número de cotizaciones exportadas.
+
+Niveles:
+- cotizacion: una fila por cotización con sus totales
+- lineas: una fila por material de cada partida (partidas sin materiales
+  producen una fila con las columnas de material vacías)
+
+Uso CLI:
+    python quote_export.py --formato csv --salida cotizaciones.csv
+    python quote_export.py --formato xlsx --nivel lineas --desde 2025-01-01 --salida lineas.xlsx
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+from xml.sax.saxutils import escape
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+NIVELES = ('cotizacion', 'lineas')
+
+COLUMNAS_COTIZACION = [
+    'numero_cotizacion', 'fecha_creacion', 'cliente', 'vendedor', 'proyecto',
+    'atencion_a', 'revision', 'moneda', 'tipo_cambio', 'num_partidas', 'subtotal',
+]
+COLUMNAS_LINEA = COLUMNAS_COTIZACION[:7] + [
+    'moneda', 'partida', 'descripcion_partida', 'cantidad_partida', 'uom',
+    'costo_unidad', 'total_partida', 'tipo_material', 'material',
+    'cantidad_material', 'precio_material', 'peso_material', 'subtotal_material',
+]
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+def _num(valor, default=0.0) -> float:
+    try:
+        return float(valor) if valor not in (None, '') else default
+    except (ValueError, TypeError):
+        return default
+
+
+def _encabezado(cot: Dict) -> Dict:
+    dg = cot.get('datosGenerales') or {}
+    condiciones = cot.get('condiciones') or dg.get('condiciones') or {}
+    return {
+        'numero_cotizacion': cot.get('numeroCotizacion', ''),
+        'fecha_creacion': cot.get('fechaCreacion') or '',
+        'cliente': dg.get('cliente', ''),
+        'vendedor': dg.get('vendedor', ''),
+        'proyecto': dg.get('proyecto', ''),
+        'atencion_a': dg.get('atencionA', ''),
+        'revision': dg.get('revision') or cot.get('revision') or 1,
+        'moneda': condiciones.get('moneda') or 'MXN',
+        'tipo_cambio': condiciones.get('tipoCambio') or '',
+    }
+
+
+def filas_cotizacion(cotizaciones: Iterable[Dict]) -> Iterator[Dict]:
+    """Una fila por cotización"""
+    for cot in cotizaciones:
+        items = cot.get('items') if isinstance(cot.get('items'), list) else []
+        fila = _encabezado(cot)
+        fila['num_partidas'] = len(items)
+        fila['subtotal'] = round(sum(_num(i.get('total')) for i in items if isinstance(i, dict)), 2)
+        yield fila
+
+
+def filas_linea(cotizaciones: Iterable[Dict]) -> Iterator[Dict]:
+    """Una fila por material de cada partida"""
+    for cot in cotizaciones:
+        encabezado = _encabezado(cot)
+        items = cot.get('items') if isinstance(cot.get('items'), list) else []
+        for n, item in enumerate(items, 1):
+            if not isinstance(item, dict):
+                continue
+            partida = dict(encabezado)
+            partida.update({
+                'partida': n,
+                'descripcion_partida': item.get('descripcion', ''),
+                'cantidad_partida': item.get('cantidad', ''),
+                'uom': item.get('uom', ''),
+                'costo_unidad': item.get('costoUnidad', ''),
+                'total_partida': item.get('total', ''),
+            })
+
+            materiales = [('material', m) for m in item.get('materiales') or [] if isinstance(m, dict)]
+            materiales += [('otro', m) for m in item.get('otrosMateriales') or [] if isinstance(m, dict)]
+            if not materiales:
+                yield partida
+                continue
+
+            for tipo, mat in materiales:
+                fila = dict(partida)
+                fila.update({
+                    'tipo_material': tipo,
+                    'material': mat.get('material') or mat.get('descripcion', ''),
+                    'cantidad_material': mat.get('cantidad', ''),
+                    'precio_material': mat.get('precio', ''),
+                    'peso_material': mat.get('peso', ''),
+                    'subtotal_material': mat.get('subtotal', ''),
+                })
+                yield fila
+
+
+# ──────────────────────────────────────────────────────────
+# ESCRITORES EN STREAMING
+# ──────────────────────────────────────────────────────────
+
+def _stream_csv(filas: Iterable[Dict], columnas: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columnas, extrasaction='ignore')
+    buffer.write('\ufeff')  # BOM para que Excel detecte UTF-8
+    writer.writeheader()
+    for fila in filas:
+        writer.writerow(fila)
+        if buffer.tell() >= TAMANO_BLOQUE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _stream_jsonl(filas: Iterable[Dict], columnas: List[str]) -> Iterator[bytes]:
+    bloque = []
+    tamano = 0
+    for fila in filas:
+        linea = json.dumps({c: fila.get(c, '') for c in columnas}, ensure_ascii=False, default=str) + '\n'
+        bloque.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_BLOQUE:
+            yield ''.join(bloque).encode('utf-8')
+            bloque, tamano = [], 0
+    yield ''.join(bloque).encode('utf-8')
+
+
+class _SalidaStreaming(io.RawIOBase):
+    """Destino no buscable para zipfile: acumula bytes hasta que se drenan"""
+
+    def __init__(self):
+        self._partes = []
+        self.pendiente = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self.pendiente += len(datos)
+        return len(datos)
+
+    def drenar(self) -> bytes:
+        datos = b''.join(self._partes)
+        self._partes, self.pendiente = [], 0
+        return datos
+
+
+_XLSX_ESTATICOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Cotizaciones" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _celda_xlsx(valor) -> str:
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = '' if valor is None else str(valor)
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _fila_xlsx(valores) -> str:
+    return '<row>' + ''.join(_celda_xlsx(v) for v in valores) + '</row>'
+
+
+def _stream_xlsx(filas: Iterable[Dict], columnas: List[str]) -> Iterator[bytes]:
+    """
+    XLSX mínimo (una hoja, celdas inlineStr) escrito con zipfile sobre un
+    destino no buscable, de modo que el archivo se emite mientras se genera.
+    """
+    salida = _SalidaStreaming()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in _XLSX_ESTATICOS.items():
+            zf.writestr(nombre, contenido)
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as hoja:
+            hoja.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _fila_xlsx(columnas)
+            ).encode('utf-8'))
+            for fila in filas:
+                hoja.write(_fila_xlsx(fila.get(c, '') for c in columnas).encode('utf-8'))
+                if salida.pendiente >= TAMANO_BLOQUE:
+                    yield salida.drenar()
+            hoja.write(b'</sheetData></worksheet>')
+    yield salida.drenar()
+
+
+_ESCRITORES = {'csv': _stream_csv, 'jsonl': _stream_jsonl, 'xlsx': _stream_xlsx}
+
+
+def exportar(db_manager, formato: str = 'csv', nivel: str = 'cotizacion',
+             company_id: str = None, desde: str = None, hasta: str = None) -> Iterator[bytes]:
+    """
+    Generador de bytes con la exportación completa.
+
+    Raises:
+        ValueError: formato o nivel no soportado
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato} (usar {', '.join(FORMATOS)})")
+    if nivel not in NIVELES:
+        raise ValueError(f"Nivel no soportado: {nivel} (usar {', '.join(NIVELES)})")
+
+    cotizaciones = db_manager.iterar_cotizaciones(company_id=company_id, desde=desde, hasta=hasta)
+    if nivel == 'lineas':
+        filas, columnas = filas_linea(cotizaciones), COLUMNAS_LINEA
+    else:
+        filas, columnas = filas_cotizacion(cotizaciones), COLUMNAS_COTIZACION
+    return _ESCRITORES[formato](filas, columnas)
+
+
+def nombre_archivo(formato: str, nivel: str = 'cotizacion') -> str:
+    sufijo = '_lineas' if nivel == 'lineas' else ''
+    return f"cotizaciones{sufijo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{FORMATOS[formato][1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportación masiva de cotizaciones")
+    parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+    parser.add_argument('--nivel', choices=NIVELES, default='cotizacion')
+    parser.add_argument('--company-id', help="Filtrar por compañía")
+    parser.add_argument('--desde', help="Fecha inicial YYYY-MM-DD (inclusive)")
+    parser.add_argument('--hasta', help="Fecha final YYYY-MM-DD (inclusive)")
+    parser.add_argument('--salida', help="Archivo destino (por defecto stdout)")
+    args = parser.parse_args()
+
+    from supabase_manager import SupabaseManager
+    db_manager = SupabaseManager()
+
+    destino = open(args.salida, 'wb') if args.salida else sys.stdout.buffer
+    try:
+        total = 0
+        for bloque in exportar(db_manager, args.formato, args.nivel,
+                               args.company_id, args.desde, args.hasta):
+            destino.write(bloque)
+            total += len(bloque)
+    finally:
+        if args.salida:
+            destino.close()
+    print(f"[EXPORT] {total} bytes escritos en {args.salida or 'stdout'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PROYECCIÓN NORMALIZADA DE PARTIDAS Y MATERIALES
+===============================================
+
+Las partidas y materiales de una cotización viven dentro del JSON `items`.
+Para consultas entre cotizaciones ("¿qué cotizaciones usan el material X?",
+"$/kg promedio por material") se mantiene una proyección con una fila por
+partida y una por material:
+
+- PostgreSQL: tablas cotizacion_items / cotizacion_materiales que un trigger
+  reescribe en cada guardado (ver migrations/v2.4_cotizacion_items.sql)
+- Offline: proyectar_cotizacion() produce las mismas filas a partir del JSON
+
+Tipos de fila en cotizacion_materiales:
+- material   kg = peso × cantidad, precio_kg = precio
+- peso       COTIZAR_POR_PESO: kg = pesoEstructura, precio_kg = precioKg
+- otro       otrosMateriales: sin kg
+
+Uso (backfill / consultas):
+    python quote_items.py --reconstruir
+    python quote_items.py --material "PTR 2\\" x 2\\" CAL 14" --dias 90
+    python quote_items.py --estadisticas
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from materials_catalog import normalizar_texto
+from pricing_engine import convertir_numero, redondear
+
+TIPOS_MATERIAL = ('material', 'peso', 'otro')
+
+
+def _numero(valor):
+    """Mismo criterio que safe_numeric(): vacío → None"""
+    return convertir_numero(valor, None)
+
+
+def _elementos(arreglo) -> Iterable[Tuple[int, Dict]]:
+    """Elementos dict de una lista con su posición (1..n), como elementos_jsonb()"""
+    if not isinstance(arreglo, list):
+        return []
+    return ((i, e) for i, e in enumerate(arreglo, 1) if isinstance(e, dict))
+
+
+def _es_por_peso(material: Dict) -> bool:
+    return material.get('material') == 'COTIZAR_POR_PESO' or material.get('tipoCotizacion') == 'peso'
+
+
+def proyectar_cotizacion(cotizacion: Dict) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Filas de cotizacion_items y cotizacion_materiales de una cotización
+    (mismas columnas y reglas que proyectar_cotizacion_items() en SQL).
+
+    Returns:
+        (partidas, materiales)
+    """
+    datos_generales = cotizacion.get('datosGenerales') or {}
+    condiciones = cotizacion.get('condiciones') or datos_generales.get('condiciones') or {}
+    base = {
+        'numero_cotizacion': cotizacion.get('numeroCotizacion') or datos_generales.get('numeroCotizacion'),
+        'company_id': cotizacion.get('company_id'),
+        'fecha_creacion': cotizacion.get('fechaCreacion'),
+        'cliente': str(datos_generales.get('cliente') or '').strip() or None,
+        'vendedor': str(datos_generales.get('vendedor') or '').strip() or None,
+        'moneda': condiciones.get('moneda') or 'MXN',
+    }
+
+    partidas, materiales = [], []
+    for partida, item in _elementos(cotizacion.get('items')):
+        partidas.append({
+            **base,
+            'partida': partida,
+            'descripcion': item.get('descripcion'),
+            'uom': item.get('uom'),
+            'cantidad': _numero(item.get('cantidad')),
+            'costo_unidad': _numero(item.get('costoUnidad')),
+            'total': _numero(item.get('total')),
+        })
+
+        for posicion, mat in _elementos(item.get('materiales')):
+            descripcion = str(mat.get('material') or '').strip()
+            if not descripcion:
+                continue
+            precio = _numero(mat.get('precioKg'))
+            if precio is None:
+                precio = _numero(mat.get('precio'))
+            fila = {**base, 'partida': partida, 'posicion': posicion, 'descripcion': descripcion,
+                    'descripcion_normalizada': normalizar_texto(descripcion),
+                    'precio': precio, 'subtotal': _numero(mat.get('subtotal')), 'precio_kg': precio}
+            if _es_por_peso(mat):
+                fila.update(tipo='peso', peso=None, cantidad=None, kg=_numero(mat.get('pesoEstructura')))
+            else:
+                peso, cantidad = _numero(mat.get('peso')), _numero(mat.get('cantidad'))
+                kg = peso * cantidad if peso is not None and cantidad is not None else None
+                fila.update(tipo='material', peso=peso, cantidad=cantidad, kg=kg)
+            materiales.append(fila)
+
+        for posicion, otro in _elementos(item.get('otrosMateriales')):
+            descripcion = str(otro.get('descripcion') or '').strip()
+            if not descripcion:
+                continue
+            materiales.append({
+                **base, 'partida': partida, 'tipo': 'otro', 'posicion': posicion,
+                'descripcion': descripcion, 'descripcion_normalizada': normalizar_texto(descripcion),
+                'peso': None, 'cantidad': _numero(otro.get('cantidad')), 'precio': _numero(otro.get('precio')),
+                'subtotal': _numero(otro.get('subtotal')), 'kg': None, 'precio_kg': None,
+            })
+
+    return partidas, materiales
+
+
+def proyectar_cotizaciones(cotizaciones: Iterable[Dict]) -> List[Dict]:
+    """Filas de cotizacion_materiales de varias cotizaciones"""
+    filas = []
+    for cot in cotizaciones:
+        if isinstance(cot, dict):
+            filas.extend(proyectar_cotizacion(cot)[1])
+    return filas
+
+
+def _fecha_texto(valor) -> str:
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return str(valor) if valor else ''
+
+
+def formatear_uso(fila: Dict) -> Dict:
+    """Fila de material para la respuesta JSON (Decimal → float, fecha → ISO)"""
+    resultado = {}
+    for clave in ('numero_cotizacion', 'fecha_creacion', 'cliente', 'vendedor', 'moneda', 'partida',
+                  'tipo', 'descripcion', 'peso', 'cantidad', 'precio', 'subtotal', 'kg', 'precio_kg'):
+        valor = fila.get(clave)
+        if clave == 'fecha_creacion':
+            valor = _fecha_texto(valor) or None
+        elif valor is not None and clave not in ('numero_cotizacion', 'cliente', 'vendedor', 'moneda',
+                                                 'partida', 'tipo', 'descripcion'):
+            valor = float(valor)
+        resultado[clave] = valor
+    return resultado
+
+
+def formatear_estadistica(fila: Dict) -> Dict:
+    """Fila agregada por material (misma forma desde SQL o desde agregar_por_material)"""
+    def _redondeado(clave):
+        valor = fila.get(clave)
+        return redondear(float(valor)) if valor is not None else None
+
+    return {
+        'descripcion': fila['descripcion'],
+        'descripcion_normalizada': fila['descripcion_normalizada'],
+        'moneda': fila['moneda'],
+        'usos': int(fila['usos']),
+        'cotizaciones': int(fila['cotizaciones']),
+        'kg_total': _redondeado('kg_total'),
+        'monto_total': _redondeado('monto_total'),
+        'precio_promedio': _redondeado('precio_promedio'),
+        'precio_kg_promedio': _redondeado('precio_kg_promedio'),
+        'precio_min': _redondeado('precio_min'),
+        'precio_max': _redondeado('precio_max'),
+        'ultimo_uso': _fecha_texto(fila.get('ultimo_uso')) or None,
+    }
+
+
+def agregar_por_material(filas: Iterable[Dict], limite: int = 50) -> List[Dict]:
+    """
+    Estadísticas por (material, moneda) sobre filas de cotizacion_materiales.
+    Equivale a la consulta agregada de SupabaseManager.estadisticas_materiales():
+    $/kg promedio ponderado por kg, precio promedio/mín/máx y último uso.
+    """
+    grupos = defaultdict(lambda: {'usos': 0, 'cotizaciones': set(), 'kg_total': 0.0, 'monto_total': 0.0,
+                                  'suma_precio': 0.0, 'con_precio': 0, 'precio_min': None, 'precio_max': None,
+                                  'suma_precio_kg': 0.0, 'kg_con_precio': 0.0,
+                                  'ultimo_uso': '', 'descripcion': ''})
+    for fila in filas:
+        g = grupos[(fila['descripcion_normalizada'], fila.get('moneda') or 'MXN')]
+        g['usos'] += 1
+        g['cotizaciones'].add(fila.get('numero_cotizacion'))
+        fecha = _fecha_texto(fila.get('fecha_creacion'))
+        if fecha >= g['ultimo_uso']:
+            g['ultimo_uso'], g['descripcion'] = fecha, fila['descripcion']
+
+        kg, precio, precio_kg = fila.get('kg'), fila.get('precio'), fila.get('precio_kg')
+        g['kg_total'] += float(kg or 0)
+        g['monto_total'] += float(fila.get('subtotal') or 0)
+        if precio is not None:
+            precio = float(precio)
+            g['suma_precio'] += precio
+            g['con_precio'] += 1
+            g['precio_min'] = precio if g['precio_min'] is None else min(g['precio_min'], precio)
+            g['precio_max'] = precio if g['precio_max'] is None else max(g['precio_max'], precio)
+        if kg and float(kg) > 0 and precio_kg is not None:
+            g['suma_precio_kg'] += float(precio_kg) * float(kg)
+            g['kg_con_precio'] += float(kg)
+
+    resultado = []
+    for (normalizada, moneda), g in grupos.items():
+        resultado.append(formatear_estadistica({
+            'descripcion': g['descripcion'],
+            'descripcion_normalizada': normalizada,
+            'moneda': moneda,
+            'usos': g['usos'],
+            'cotizaciones': len(g['cotizaciones']),
+            'kg_total': g['kg_total'],
+            'monto_total': g['monto_total'],
+            'precio_promedio': g['suma_precio'] / g['con_precio'] if g['con_precio'] else None,
+            'precio_kg_promedio': g['suma_precio_kg'] / g['kg_con_precio'] if g['kg_con_precio'] else None,
+            'precio_min': g['precio_min'],
+            'precio_max': g['precio_max'],
+            'ultimo_uso': g['ultimo_uso'],
+        }))
+    resultado.sort(key=lambda e: (-e['usos'], e['descripcion_normalizada']))
+    return resultado[:limite] if limite else resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proyección de partidas y materiales de cotizaciones")
+    parser.add_argument("--reconstruir", action="store_true", help="Backfill completo de la proyección")
+    parser.add_argument("--material", help="Cotizaciones que usan este material")
+    parser.add_argument("--estadisticas", action="store_true", help="Estadísticas por material")
+    parser.add_argument("--company-id", default=None)
+    parser.add_argument("--dias", type=int, default=None)
+    parser.add_argument("--limite", type=int, default=50)
+    args = parser.parse_args()
+    if (args.material or args.estadisticas) and not args.company_id:
+        parser.error("--company-id es obligatorio con --material/--estadisticas")
+
+    from supabase_manager import SupabaseManager
+    db_manager = SupabaseManager()
+    try:
+        if args.reconstruir:
+            resultado = db_manager.reconstruir_proyeccion_items()
+        elif args.material:
+            resultado = db_manager.cotizaciones_por_material(
+                args.material, company_id=args.company_id, dias=args.dias or 90, limite=args.limite)
+        elif args.estadisticas:
+            resultado = db_manager.estadisticas_materiales(
+                company_id=args.company_id, dias=args.dias, limite=args.limite)
+        else:
+            parser.print_help()
+            return 1
+        print(json.dumps(resultado, ensure_ascii=False, indent=2, default=str))
+        return 0
+    finally:
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
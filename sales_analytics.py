@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CUBO DE ANALÍTICA DE VENTAS
+===========================
+
+Cubo pre-agregado del valor cotizado por compañía, vendedor, cliente, mes,
+moneda y número de revisión, mantenido incrementalmente desde el guardado
+de cotizaciones y desde los deltas de sincronización.
+
+Características:
+- Un "hecho" por cotización (numero → dimensiones + monto), persistido en SQLite
+- Celdas del cubo en columnas array.array (códigos de diccionario + medidas)
+- Cada guardado resta la contribución anterior y suma la nueva: O(1)
+- Consultas slice/dice (filtros + agrupación) evaluadas sobre las columnas,
+  sin leer nunca los items de las cotizaciones
+- Reconstrucción completa paginada (backfill) desde SupabaseManager
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from supabase_manager import safe_str, parsear_numero_cotizacion, _monto_cotizacion
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONES = ('company_id', 'vendedor', 'cliente', 'mes', 'moneda', 'revision')
+MEDIDAS = ('cotizaciones', 'monto')
+
+
+def extraer_hecho(cotizacion: Dict, company_id: str = None) -> Optional[Dict]:
+    """
+    Reduce una cotización a su hecho analítico (dimensiones + monto).
+    Es el único punto donde se leen los items; las consultas usan solo el hecho.
+    """
+    numero = safe_str(cotizacion.get('numeroCotizacion'))
+    if not numero:
+        return None
+
+    dg = cotizacion.get('datosGenerales') or {}
+    condiciones = cotizacion.get('condiciones') or dg.get('condiciones') or {}
+    revision = parsear_numero_cotizacion(numero).get('revision_numero') or 1
+    fecha = cotizacion.get('fechaCreacion')
+    if hasattr(fecha, 'isoformat'):
+        fecha = fecha.isoformat()
+    fecha = safe_str(fecha) or datetime.now().isoformat()
+
+    return {
+        'numero': numero,
+        'company_id': safe_str(company_id or cotizacion.get('company_id')),
+        'vendedor': safe_str(dg.get('vendedor')),
+        'cliente': safe_str(dg.get('cliente')),
+        'mes': fecha[:7],
+        'moneda': safe_str(condiciones.get('moneda')) or 'MXN',
+        'revision': int(revision),
+        'monto': round(_monto_cotizacion(cotizacion.get('items')), 2)
+    }
+
+
+class SalesAnalyticsCube:
+    """Cubo de ventas en memoria (columnar) con persistencia de hechos en SQLite"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.getenv('SALES_ANALYTICS_PATH', 'sales_analytics.db')
+        self._lock = threading.RLock()
+        self.ultima_reconstruccion = None
+
+        # Diccionarios de dimensión: valor → código y código → valor
+        self._codigos = {dim: {} for dim in DIMENSIONES}
+        self._valores = {dim: [] for dim in DIMENSIONES}
+
+        # Celdas: una fila por combinación de dimensiones, en columnas
+        self._columnas = {dim: array('I') for dim in DIMENSIONES}
+        self._cotizaciones = array('q')
+        self._monto = array('d')
+        self._indice_celdas = {}
+
+        # Contribución vigente de cada cotización: numero → (celda, monto)
+        self._hechos = {}
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._crear_esquema()
+        self._cargar_hechos()
+
+    # ──────────────────────────────────────────────────────────
+    # PERSISTENCIA
+    # ──────────────────────────────────────────────────────────
+
+    def _crear_esquema(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS hechos (
+                    numero TEXT PRIMARY KEY,
+                    company_id TEXT NOT NULL DEFAULT '',
+                    vendedor TEXT NOT NULL DEFAULT '',
+                    cliente TEXT NOT NULL DEFAULT '',
+                    mes TEXT NOT NULL,
+                    moneda TEXT NOT NULL,
+                    revision INTEGER NOT NULL DEFAULT 1,
+                    monto REAL NOT NULL DEFAULT 0,
+                    actualizado_en TEXT
+                );
+            """)
+            self._conn.commit()
+
+    def _cargar_hechos(self):
+        """Reconstruye las celdas en memoria desde los hechos persistidos"""
+        with self._lock:
+            filas = self._conn.execute("SELECT * FROM hechos").fetchall()
+            for fila in filas:
+                self._sumar(dict(fila))
+        if filas:
+            logger.info("[ANALYTICS] Cubo cargado: %d cotizaciones, %d celdas", len(filas), len(self._monto))
+
+    # ──────────────────────────────────────────────────────────
+    # MANTENIMIENTO INCREMENTAL
+    # ──────────────────────────────────────────────────────────
+
+    def _codigo(self, dimension: str, valor) -> int:
+        codigos = self._codigos[dimension]
+        codigo = codigos.get(valor)
+        if codigo is None:
+            codigo = len(self._valores[dimension])
+            codigos[valor] = codigo
+            self._valores[dimension].append(valor)
+        return codigo
+
+    def _sumar(self, hecho: Dict):
+        clave = tuple(self._codigo(dim, hecho[dim]) for dim in DIMENSIONES)
+        celda = self._indice_celdas.get(clave)
+        if celda is None:
+            celda = len(self._monto)
+            self._indice_celdas[clave] = celda
+            for dim, codigo in zip(DIMENSIONES, clave):
+                self._columnas[dim].append(codigo)
+            self._cotizaciones.append(0)
+            self._monto.append(0.0)
+
+        self._cotizaciones[celda] += 1
+        self._monto[celda] += hecho['monto']
+        self._hechos[hecho['numero']] = (celda, hecho['monto'])
+
+    def _restar(self, numero: str) -> bool:
+        anterior = self._hechos.pop(numero, None)
+        if anterior is None:
+            return False
+        celda, monto = anterior
+        self._cotizaciones[celda] -= 1
+        self._monto[celda] -= monto
+        return True
+
+    def aplicar(self, cotizacion: Dict, company_id: str = None, persistir: bool = True) -> bool:
+        """Registra (o reemplaza) la contribución de una cotización al cubo"""
+        hecho = extraer_hecho(cotizacion, company_id)
+        if not hecho:
+            return False
+
+        with self._lock:
+            self._restar(hecho['numero'])
+            self._sumar(hecho)
+            if persistir:
+                self._conn.execute("""
+                    INSERT OR REPLACE INTO hechos
+                        (numero, company_id, vendedor, cliente, mes, moneda, revision, monto, actualizado_en)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, tuple(hecho[c] for c in ('numero',) + DIMENSIONES + ('monto',)) +
+                     (datetime.now().isoformat(),))
+                self._conn.commit()
+        return True
+
+    def eliminar(self, numero: str) -> bool:
+        """Retira una cotización del cubo"""
+        with self._lock:
+            eliminado = self._restar(numero)
+            self._conn.execute("DELETE FROM hechos WHERE numero = ?", (numero,))
+            self._conn.commit()
+        return eliminado
+
+    def on_cotizacion_cambiada(self, accion: str, cotizacion: Dict):
+        """Callback para SupabaseManager.registrar_callback_cotizacion"""
+        try:
+            if accion == 'eliminada':
+                self.eliminar(safe_str(cotizacion.get('numeroCotizacion')))
+            else:
+                self.aplicar(cotizacion)
+        except Exception as e:
+            logger.warning("[ANALYTICS] Error actualizando cubo: %s", e)
+
+    def reconstruir(self, db_manager, por_pagina: int = 200) -> Dict:
+        """
+        Reconstrucción completa (backfill) recorriendo las cotizaciones por páginas.
+        Reemplaza todos los hechos en una sola transacción.
+        """
+        hechos = []
+        page = 1
+        while True:
+            resultado = db_manager.buscar_cotizaciones("", page=page, per_page=por_pagina)
+            if resultado.get('error'):
+                return {"success": False, "error": resultado['error']}
+            for cot in resultado.get('resultados', []):
+                hecho = extraer_hecho(cot)
+                if hecho:
+                    hechos.append(hecho)
+            if page >= (resultado.get('pages') or 0):
+                break
+            page += 1
+
+        with self._lock:
+            self._codigos = {dim: {} for dim in DIMENSIONES}
+            self._valores = {dim: [] for dim in DIMENSIONES}
+            self._columnas = {dim: array('I') for dim in DIMENSIONES}
+            self._cotizaciones = array('q')
+            self._monto = array('d')
+            self._indice_celdas = {}
+            self._hechos = {}
+
+            ahora = datetime.now().isoformat()
+            self._conn.execute("DELETE FROM hechos")
+            for hecho in hechos:
+                self._restar(hecho['numero'])  # números repetidos entre páginas
+                self._sumar(hecho)
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO hechos
+                    (numero, company_id, vendedor, cliente, mes, moneda, revision, monto, actualizado_en)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [tuple(h[c] for c in ('numero',) + DIMENSIONES + ('monto',)) + (ahora,) for h in hechos])
+            self._conn.commit()
+            self.ultima_reconstruccion = ahora
+
+        logger.info("[ANALYTICS] Cubo reconstruido: %d cotizaciones, %d celdas", len(self._hechos), len(self._monto))
+        return {"success": True, "cotizaciones": len(self._hechos), "celdas": len(self._monto)}
+
+    # ──────────────────────────────────────────────────────────
+    # CONSULTAS (slice / dice)
+    # ──────────────────────────────────────────────────────────
+
+    def _codigos_filtro(self, dimension: str, valores) -> set:
+        if not isinstance(valores, (list, tuple, set)):
+            valores = [valores]
+        if dimension == 'revision':
+            valores = [int(v) for v in valores]
+        codigos = self._codigos[dimension]
+        return {codigos[v] for v in valores if v in codigos}
+
+    def _codigos_rango_mes(self, desde: str = None, hasta: str = None) -> set:
+        return {
+            codigo for codigo, mes in enumerate(self._valores['mes'])
+            if (not desde or mes >= desde) and (not hasta or mes <= hasta)
+        }
+
+    def consultar(self, filtros: Dict = None, agrupar_por: Iterable[str] = (),
+                  mes_desde: str = None, mes_hasta: str = None,
+                  ordenar_por: str = 'monto', limite: int = None) -> Dict:
+        """
+        Consulta slice/dice sobre el cubo.
+
+        Args:
+            filtros: {dimension: valor | [valores]} (slice/dice)
+            agrupar_por: dimensiones a conservar; el resto se suma
+            mes_desde, mes_hasta: rango inclusivo 'YYYY-MM'
+            ordenar_por: 'monto', 'cotizaciones' o una dimensión
+            limite: máximo de grupos devueltos
+        """
+        filtros = filtros or {}
+        agrupar_por = list(agrupar_por)
+        for dim in list(filtros) + agrupar_por:
+            if dim not in DIMENSIONES:
+                raise ValueError(f"Dimensión desconocida: {dim}")
+
+        with self._lock:
+            total_celdas = len(self._monto)
+            candidatas = range(total_celdas)
+
+            restricciones = [(dim, self._codigos_filtro(dim, v)) for dim, v in filtros.items()]
+            if mes_desde or mes_hasta:
+                restricciones.append(('mes', self._codigos_rango_mes(mes_desde, mes_hasta)))
+
+            # Filtrar columna por columna: cada pasada solo recorre las celdas sobrevivientes
+            for dim, permitidos in restricciones:
+                columna = self._columnas[dim]
+                candidatas = [i for i in candidatas if columna[i] in permitidos]
+
+            columnas_grupo = [self._columnas[dim] for dim in agrupar_por]
+            cotizaciones, monto = self._cotizaciones, self._monto
+            grupos = {}
+            for i in candidatas:
+                if cotizaciones[i] <= 0:
+                    continue
+                clave = tuple(col[i] for col in columnas_grupo)
+                acumulado = grupos.get(clave)
+                if acumulado is None:
+                    grupos[clave] = [cotizaciones[i], monto[i]]
+                else:
+                    acumulado[0] += cotizaciones[i]
+                    acumulado[1] += monto[i]
+
+            resultados = []
+            for clave, (num, suma) in grupos.items():
+                fila = {dim: self._valores[dim][codigo] for dim, codigo in zip(agrupar_por, clave)}
+                fila['cotizaciones'] = num
+                fila['monto'] = round(suma, 2)
+                resultados.append(fila)
+
+        if ordenar_por in MEDIDAS:
+            resultados.sort(key=lambda f: f[ordenar_por], reverse=True)
+        elif ordenar_por in agrupar_por:
+            resultados.sort(key=lambda f: f[ordenar_por])
+        total_grupos = len(resultados)
+        if limite:
+            resultados = resultados[:limite]
+
+        return {
+            "grupos": resultados,
+            "total_grupos": total_grupos,
+            "totales": {
+                "cotizaciones": sum(v[0] for v in grupos.values()),
+                "monto": round(sum(v[1] for v in grupos.values()), 2)
+            },
+            "agrupar_por": agrupar_por,
+            "filtros": filtros,
+            "celdas_evaluadas": total_celdas
+        }
+
+    def obtener_estado(self) -> Dict:
+        with self._lock:
+            return {
+                "cotizaciones": len(self._hechos),
+                "celdas": len(self._monto),
+                "dimensiones": {dim: len(self._valores[dim]) for dim in DIMENSIONES},
+                "ultima_reconstruccion": self.ultima_reconstruccion,
+                "db_path": self.db_path
+            }
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DIARIO DE ESTADO APPEND-ONLY
+============================
+
+Persistencia clave -> valor para el estado de los subsistemas de fondo
+(cola de operaciones pendientes, sincronización, monitor de Drive, monitor
+de salud). En lugar de reescribir un JSON completo en cada cambio, cada
+cambio agrega una línea al diario:
+
+    {"o":"s","k":"op:123","v":{...}}     poner
+    {"o":"d","k":"op:123"}               borrar
+
+- reemplazar(estado) escribe solo las claves que cambiaron, así que el costo
+  de persistir es proporcional a los cambios y no al tamaño del estado
+- Compactación: cuando el diario acumula más de FACTOR x claves vivas (y al
+  menos MINIMO líneas) se reescribe con una línea por clave (archivo
+  temporal + os.replace, atómico)
+- fsync por lotes: cada línea se escribe y se hace flush (sobrevive a la
+  caída del proceso); el fsync se agrupa en una ventana de JOURNAL_FSYNC_MS
+- Recuperación: al abrir se reaplican las líneas; una línea final
+  incompleta (caída a mitad de escritura) se descarta y se trunca
+
+Variables de entorno:
+    JOURNAL_FSYNC_MS           ventana de agrupación de fsync (default 200; 0 = fsync por línea)
+    JOURNAL_COMPACTAR_FACTOR   líneas por clave viva antes de compactar (default 4)
+    JOURNAL_COMPACTAR_MINIMO   líneas mínimas antes de compactar (default 1000)
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_AUSENTE = object()
+
+
+class DiarioEstado:
+    """Mapa clave -> valor JSON persistido como diario append-only"""
+
+    def __init__(self, ruta, fsync_ms: float = None, factor_compactacion: int = None,
+                 minimo_compactacion: int = None):
+        self.ruta = str(ruta)
+        self.fsync_segundos = (fsync_ms if fsync_ms is not None
+                               else float(os.getenv('JOURNAL_FSYNC_MS', '200'))) / 1000
+        self.factor_compactacion = factor_compactacion or int(os.getenv('JOURNAL_COMPACTAR_FACTOR', '4'))
+        self.minimo_compactacion = (minimo_compactacion if minimo_compactacion is not None
+                                    else int(os.getenv('JOURNAL_COMPACTAR_MINIMO', '1000')))
+        self.estado: Dict[str, Any] = {}
+        self.existia = os.path.exists(self.ruta)
+        self.lineas = 0
+        self.compactaciones = 0
+        self._archivo = None
+        self._pendiente_fsync = False
+        self._temporizador: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        self._recuperar()
+
+    # ──────────────────────────────────────────────────────────
+    # LECTURA
+    # ──────────────────────────────────────────────────────────
+
+    def get(self, clave: str, default=None):
+        return self.estado.get(clave, default)
+
+    def items(self, prefijo: str = '') -> Iterator[Tuple[str, Any]]:
+        """Pares (clave, valor) en orden de inserción, opcionalmente filtrados por prefijo"""
+        with self._lock:
+            pares = [(k, v) for k, v in self.estado.items() if k.startswith(prefijo)]
+        return iter(pares)
+
+    def __len__(self):
+        return len(self.estado)
+
+    def __contains__(self, clave):
+        return clave in self.estado
+
+    # ──────────────────────────────────────────────────────────
+    # ESCRITURA
+    # ──────────────────────────────────────────────────────────
+
+    def poner(self, clave: str, valor):
+        with self._lock:
+            self.estado[clave] = valor
+            self._anotar({'o': 's', 'k': clave, 'v': valor})
+            self._quizas_compactar()
+
+    def borrar(self, clave: str):
+        with self._lock:
+            if self.estado.pop(clave, _AUSENTE) is _AUSENTE:
+                return
+            self._anotar({'o': 'd', 'k': clave})
+            self._quizas_compactar()
+
+    def reemplazar(self, nuevo: Dict[str, Any], prefijo: str = '') -> int:
+        """
+        Deja las claves con `prefijo` iguales a `nuevo`, escribiendo solo las
+        diferencias. Devuelve el número de líneas escritas.
+        """
+        escritas = 0
+        with self._lock:
+            for clave in [k for k in self.estado if k.startswith(prefijo) and k not in nuevo]:
+                del self.estado[clave]
+                self._anotar({'o': 'd', 'k': clave})
+                escritas += 1
+            for clave, valor in nuevo.items():
+                if self.estado.get(clave, _AUSENTE) != valor:
+                    self.estado[clave] = valor
+                    self._anotar({'o': 's', 'k': clave, 'v': valor})
+                    escritas += 1
+            if escritas:
+                self._quizas_compactar()
+        return escritas
+
+    def _anotar(self, registro: Dict):
+        if self._archivo is None:
+            self._archivo = open(self.ruta, 'a', encoding='utf-8')
+        self._archivo.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':'), default=str) + '\n')
+        self._archivo.flush()
+        self.lineas += 1
+        if self.fsync_segundos <= 0:
+            os.fsync(self._archivo.fileno())
+        elif not self._pendiente_fsync:
+            # Un solo fsync para todas las líneas escritas dentro de la ventana
+            self._pendiente_fsync = True
+            self._temporizador = threading.Timer(self.fsync_segundos, self.sincronizar)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+    def sincronizar(self):
+        """fsync de lo escrito hasta ahora"""
+        with self._lock:
+            self._pendiente_fsync = False
+            if self._archivo is not None and not self._archivo.closed:
+                os.fsync(self._archivo.fileno())
+
+    # ──────────────────────────────────────────────────────────
+    # COMPACTACIÓN Y RECUPERACIÓN
+    # ──────────────────────────────────────────────────────────
+
+    def _quizas_compactar(self):
+        if self.lineas >= max(self.minimo_compactacion, self.factor_compactacion * len(self.estado)):
+            self.compactar()
+
+    def compactar(self):
+        """Reescribe el diario con una línea por clave viva (atómico)"""
+        with self._lock:
+            temporal = self.ruta + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as f:
+                for clave, valor in self.estado.items():
+                    f.write(json.dumps({'o': 's', 'k': clave, 'v': valor}, ensure_ascii=False,
+                                       separators=(',', ':'), default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+            os.replace(temporal, self.ruta)
+            self._pendiente_fsync = False
+            self.lineas = len(self.estado)
+            self.compactaciones += 1
+
+    def _recuperar(self):
+        if not self.existia:
+            return
+        valido = 0
+        with open(self.ruta, 'rb') as f:
+            datos = f.read()
+        for linea in datos.splitlines(keepends=True):
+            if not linea.endswith(b'\n'):
+                break
+            try:
+                registro = json.loads(linea)
+                if registro['o'] == 's':
+                    self.estado[registro['k']] = registro['v']
+                elif registro['o'] == 'd':
+                    self.estado.pop(registro['k'], None)
+                else:
+                    break
+            except (ValueError, KeyError, TypeError):
+                break
+            valido += len(linea)
+            self.lineas += 1
+        if valido < len(datos):
+            logger.warning("[DIARIO] %s: final incompleto descartado (%d bytes)",
+                           os.path.basename(self.ruta), len(datos) - valido)
+            with open(self.ruta, 'r+b') as f:
+                f.truncate(valido)
+
+    def cerrar(self):
+        with self._lock:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+            if self._archivo is not None:
+                self.sincronizar()
+                self._archivo.close()
+                self._archivo = None
+
+    def obtener_estado(self) -> Dict:
+        return {
+            'ruta': self.ruta,
+            'claves': len(self.estado),
+            'lineas': self.lineas,
+            'compactaciones': self.compactaciones,
+            'bytes': os.path.getsize(self.ruta) if os.path.exists(self.ruta) else 0,
+        }
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LOGGING ESTRUCTURADO ASÍNCRONO
+==============================
+
+Los caminos calientes (guardar_cotizacion, formulario, todas_cotizaciones,
+_obtener_pdf_offline) hacían decenas de print() síncronos por request, algunos
+volcando dicts completos. Este módulo los reemplaza por un pipeline de logging:
+
+- ColaHandler (QueueHandler) en el logger raíz: el hilo del request solo
+  encola el LogRecord; el formateo y la escritura (archivo, consola) ocurren
+  en el hilo del QueueListener
+- Formateo perezoso: los mensajes usan %-args y Perezoso() para volcados
+  caros; nada se formatea si el nivel está deshabilitado, y lo habilitado se
+  formatea en el hilo de escritura
+- Niveles por módulo: LOG_LEVELS="supabase_manager=DEBUG,debug.pdf=INFO"
+- Categorías de debug (logger 'debug.<categoria>') apagadas por defecto y con
+  límite de tasa: como máximo N mensajes por ventana; el excedente se descarta
+  y se informa el número de suprimidos en el siguiente mensaje que pasa
+
+Variables de entorno:
+    LOG_LEVELS             niveles por logger, "modulo=NIVEL,..." (default vacío)
+    LOG_DEBUG              categorías de debug activas, "issue1,pdf" o "*" (default ninguna)
+    LOG_DEBUG_LIMITE       mensajes por categoría y ventana (default 20)
+    LOG_DEBUG_VENTANA_S    duración de la ventana en segundos (default 10)
+    LOG_FORMAT             'json' para una línea JSON por registro (default texto)
+    LOG_CONSOLA_NIVEL      nivel mínimo en consola (default INFO)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+PREFIJO_DEBUG = 'debug'
+FORMATO_TEXTO = '%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s'
+FORMATO_CONSOLA = '%(message)s'
+
+# Atributos estándar de LogRecord: todo lo demás se considera campo estructurado (extra=)
+_ATRIBUTOS_RECORD = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_cola_handler: Optional[QueueHandler] = None
+
+
+class Perezoso:
+    """Difiere un cálculo caro (json.dumps de un dict, etc.) hasta que el mensaje se formatea"""
+
+    __slots__ = ('_funcion', '_args')
+
+    def __init__(self, funcion, *args):
+        self._funcion = funcion
+        self._args = args
+
+    def __str__(self):
+        try:
+            return str(self._funcion(*self._args))
+        except Exception as e:
+            return f'<error formateando: {e}>'
+
+    __repr__ = __str__
+
+
+def volcado_json(valor) -> Perezoso:
+    """json.dumps perezoso para registrar estructuras completas"""
+    return Perezoso(_dumps, valor)
+
+
+def _dumps(valor) -> str:
+    return json.dumps(valor, default=str, ensure_ascii=False)
+
+
+class ColaHandler(QueueHandler):
+    """
+    QueueHandler que NO formatea en el hilo del llamador.
+
+    El QueueHandler estándar llama a format() en prepare() para que el record
+    sea serializable; aquí la cola es en memoria, así que basta con renderizar
+    la traza de excepción (el frame no debe sobrevivir al llamador) y dejar
+    msg/args intactos para el hilo de escritura.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro, con los campos pasados en extra="""
+
+    def format(self, record):
+        entrada = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f'.{int(record.msecs):03d}',
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'origen': f'{record.module}:{record.lineno}',
+            'hilo': record.threadName,
+        }
+        for clave, valor in record.__dict__.items():
+            if clave not in _ATRIBUTOS_RECORD and not clave.startswith('_'):
+                entrada[clave] = valor
+        if record.exc_text:
+            entrada['excepcion'] = record.exc_text
+        return json.dumps(entrada, default=str, ensure_ascii=False)
+
+
+class FiltroLimiteTasa(logging.Filter):
+    """Deja pasar como máximo `limite` registros por ventana de `ventana_s` segundos"""
+
+    def __init__(self, limite: int = None, ventana_s: float = None):
+        super().__init__()
+        self.limite = limite if limite is not None else int(os.getenv('LOG_DEBUG_LIMITE', 20))
+        self.ventana_s = ventana_s if ventana_s is not None else float(os.getenv('LOG_DEBUG_VENTANA_S', 10))
+        self._inicio = 0.0
+        self._emitidos = 0
+        self.suprimidos = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora - self._inicio >= self.ventana_s:
+                self._inicio = ahora
+                self._emitidos = 0
+            if self._emitidos >= self.limite:
+                self.suprimidos += 1
+                return False
+            self._emitidos += 1
+            suprimidos, self.suprimidos = self.suprimidos, 0
+        if suprimidos:
+            record.suprimidos = suprimidos
+            record.msg = f'[+{suprimidos} suprimidos] {record.msg}'
+        return True
+
+
+def _nivel(texto: str) -> int:
+    nivel = logging.getLevelName(texto.strip().upper())
+    if not isinstance(nivel, int):
+        raise ValueError(f'Nivel de log inválido: {texto}')
+    return nivel
+
+
+def parsear_niveles(texto: str) -> Dict[str, int]:
+    """'supabase_manager=DEBUG, debug.pdf=info' → {'supabase_manager': 10, 'debug.pdf': 20}"""
+    niveles = {}
+    for par in (texto or '').split(','):
+        if '=' not in par:
+            continue
+        nombre, nivel = par.split('=', 1)
+        try:
+            niveles[nombre.strip()] = _nivel(nivel)
+        except ValueError as e:
+            print(f"[LOGGING] {e}")
+    return niveles
+
+
+def logger_debug(categoria: str) -> logging.Logger:
+    """
+    Logger de una categoría de debug ('debug.<categoria>'). Apagado salvo que
+    la categoría esté en LOG_DEBUG (o LOG_LEVELS la habilite), y con límite de tasa.
+    """
+    logger = logging.getLogger(f'{PREFIJO_DEBUG}.{categoria}')
+    if not any(isinstance(f, FiltroLimiteTasa) for f in logger.filters):
+        logger.addFilter(FiltroLimiteTasa())
+        activas = {c.strip() for c in os.getenv('LOG_DEBUG', '').split(',') if c.strip()}
+        if logger.level == logging.NOTSET:
+            logger.setLevel(logging.DEBUG if ('*' in activas or categoria in activas) else logging.WARNING)
+    return logger
+
+
+def aplicar_niveles(niveles: Dict[str, int]):
+    for nombre, nivel in niveles.items():
+        logging.getLogger(nombre or None).setLevel(nivel)
+
+
+def _destino(handler: logging.Handler):
+    """Un handler por archivo y uno solo de consola (p. ej. si ya hubo un basicConfig)"""
+    if isinstance(handler, logging.FileHandler):
+        return handler.baseFilename
+    if type(handler) is logging.StreamHandler:
+        return '<consola>'
+    return id(handler)
+
+
+def configurar(handlers: List[logging.Handler] = None, nivel_raiz: int = logging.INFO,
+               niveles: Dict[str, int] = None) -> QueueListener:
+    """
+    Instala el pipeline en el logger raíz (idempotente).
+
+    Los handlers recibidos (y los que ya tuviera el raíz) pasan al
+    QueueListener; el raíz queda solo con el ColaHandler.
+    """
+    global _listener, _cola_handler
+    with _lock:
+        raiz = logging.getLogger()
+        if _listener is None:
+            existentes = [h for h in raiz.handlers if not isinstance(h, QueueHandler)]
+            for handler in existentes:
+                raiz.removeHandler(handler)
+            _cola_handler = ColaHandler(queue.SimpleQueue())
+            raiz.addHandler(_cola_handler)
+            _listener = QueueListener(_cola_handler.queue, *existentes, respect_handler_level=True)
+            _listener.start()
+            atexit.register(detener)
+
+        destinos = {_destino(h) for h in _listener.handlers}
+        nuevos = []
+        for handler in handlers or []:
+            if _destino(handler) not in destinos:
+                destinos.add(_destino(handler))
+                nuevos.append(handler)
+        if nuevos:
+            formato = FormatoJSON() if os.getenv('LOG_FORMAT', '').lower() == 'json' else None
+            for handler in nuevos:
+                if formato is not None:
+                    handler.setFormatter(formato)
+            _listener.handlers = tuple(_listener.handlers) + tuple(nuevos)
+
+        raiz.setLevel(nivel_raiz)
+        aplicar_niveles({**parsear_niveles(os.getenv('LOG_LEVELS', '')), **(niveles or {})})
+        return _listener
+
+
+def handler_consola() -> logging.Handler:
+    """Consola (stdout) para los mensajes que antes eran print()"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setLevel(_nivel(os.getenv('LOG_CONSOLA_NIVEL', 'INFO')))
+    handler.setFormatter(logging.Formatter(FORMATO_CONSOLA))
+    return handler
+
+
+def detener():
+    """Vacía la cola y detiene el hilo de escritura (atexit)"""
+    global _listener, _cola_handler
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger().removeHandler(_cola_handler)
+        for handler in _listener.handlers:
+            logging.getLogger().addHandler(handler)
+        _listener = None
+        _cola_handler = None
@@ -16,27 +16,150 @@ Características:
 """
 
 import json
+import logging
 import os
 import sys
 import time
 import re
 import unicodedata
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 import psycopg2
-from psycopg2.extras import Json, RealDictCursor
+from psycopg2.extras import Json, RealDictCursor, execute_values
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from pricing_engine import aplicar_a_items, normalizar_cotizacion
+from db_tracing import CursorTrazado, trazador, trazar_cliente_sdk
+from integrity_tree import SIN_COMPANIA, ArbolIntegridad, hash_contenido
+from structured_logging import logger_debug, volcado_json
 
 # Cargar variables de entorno
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+log_issue1 = logger_debug('issue1')
+log_sdk = logger_debug('sdk')
+
 def safe_str(value, default=""):
     """Convierte valor a string de forma segura y simple"""
     if value is None:
         return default
     return str(value).strip()
 
+_PATRON_REVISION = re.compile(r'^(?P<base>.*?)-R(?P<revision>\d+)(?:-(?P<proyecto>.*))?$')
+_PATRON_BASE_CWS = re.compile(r'^(?P<cliente>.+)-CWS-(?P<vendedor>[A-Z0-9]+)-(?P<consecutivo>\d+)$')
+
+def parsear_numero_cotizacion(numero_cotizacion) -> Dict:
+    """
+    Descompone un número CLIENTE-CWS-VE-###-R#-PROYECTO en sus componentes.
+    Misma lógica que el trigger parsear_numero_cotizacion() de
+    migrations/v2.2_revision_family.sql.
+
+    numero_base es todo lo anterior a -R# y agrupa a la familia de revisiones.
+    Los componentes que no aplican (formatos legacy) se devuelven como None.
+    """
+    numero = safe_str(numero_cotizacion)
+    componentes = {
+        'numero_base': numero,
+        'cliente_codigo': None,
+        'vendedor_iniciales': None,
+        'consecutivo': None,
+        'revision_numero': 1,
+        'proyecto_codigo': None,
+    }
+
+    match = _PATRON_REVISION.match(numero)
+    if match:
+        componentes['numero_base'] = match.group('base')
+        componentes['revision_numero'] = int(match.group('revision'))
+        componentes['proyecto_codigo'] = match.group('proyecto')
+
+    match_base = _PATRON_BASE_CWS.match(componentes['numero_base'])
+    if match_base:
+        componentes['cliente_codigo'] = match_base.group('cliente')
+        componentes['vendedor_iniciales'] = match_base.group('vendedor')
+        componentes['consecutivo'] = int(match_base.group('consecutivo'))
+
+    return componentes
+
+# Clave de la dimensión "mes" para cotizaciones sin fecha_creacion (misma que en SQL)
+MES_SIN_FECHA = 'sin_fecha'
+
+def _monto_cotizacion(items) -> float:
+    """Suma de items[].total (antes de IVA) - misma regla que monto_cotizacion() en SQL"""
+    monto = 0.0
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict):
+            try:
+                monto += float(item.get('total') or 0)
+            except (ValueError, TypeError):
+                pass
+    return monto
+
+def calcular_rollup_estadisticas(cotizaciones: List[Dict]) -> List[Dict]:
+    """
+    Calcula en un solo recorrido las mismas filas que mantiene la tabla
+    estadisticas_rollup (dimension, clave, num_cotizaciones, total_monto).
+    """
+    acumulado = {}
+
+    def _sumar(dimension, clave, monto):
+        fila = acumulado.setdefault((dimension, clave), [0, 0.0])
+        fila[0] += 1
+        fila[1] += monto
+
+    for cot in cotizaciones:
+        dg = cot.get('datosGenerales') or {}
+        condiciones = cot.get('condiciones') or dg.get('condiciones') or {}
+        monto = _monto_cotizacion(cot.get('items'))
+        fecha = safe_str(cot.get('fechaCreacion'))
+
+        _sumar('total', 'total', monto)
+        _sumar('moneda', safe_str(condiciones.get('moneda')) or 'MXN', monto)
+        if safe_str(dg.get('vendedor')):
+            _sumar('vendedor', safe_str(dg.get('vendedor')), monto)
+        if safe_str(dg.get('cliente')):
+            _sumar('cliente', safe_str(dg.get('cliente')), monto)
+        _sumar('mes', fecha[:7] if fecha else MES_SIN_FECHA, monto)
+
+    return [
+        {'dimension': d, 'clave': c, 'num_cotizaciones': n, 'total_monto': round(m, 2)}
+        for (d, c), (n, m) in acumulado.items()
+    ]
+
+def _formatear_estadisticas(filas: List[Dict], fuente: str) -> Dict:
+    """
+    Convierte filas de rollup en el dict que consumen /stats y el panel admin.
+    Sin filtro de compañía llegan filas de varias compañías: se suman por
+    (dimension, clave) antes de formatear.
+    """
+    acumulado = {}
+    for fila in filas:
+        suma = acumulado.setdefault((fila['dimension'], fila['clave']), [0, 0.0])
+        suma[0] += int(fila['num_cotizaciones'] or 0)
+        suma[1] += float(fila['total_monto'] or 0)
+
+    por_dimension = {}
+    for (dimension, clave), (cotizaciones, total) in acumulado.items():
+        por_dimension.setdefault(dimension, []).append({
+            'clave': clave,
+            'cotizaciones': cotizaciones,
+            'total': round(total, 2)
+        })
+
+    def _ordenadas(dimension, por='total'):
+        return sorted(por_dimension.get(dimension, []), key=lambda f: f[por], reverse=True)
+
+    return {
+        "total_cotizaciones": sum(f['cotizaciones'] for f in por_dimension.get('total', [])),
+        "clientes_unicos": len(por_dimension.get('cliente', [])),
+        "vendedores_unicos": len(por_dimension.get('vendedor', [])),
+        "totales_por_moneda": {f['clave']: f['total'] for f in por_dimension.get('moneda', [])},
+        "por_vendedor": _ordenadas('vendedor'),
+        "por_mes": sorted(por_dimension.get('mes', []), key=lambda f: f['clave']),
+        "fuente": fuente
+    }
+
 class SupabaseManager:
     """
     Administrador de Supabase PostgreSQL que reemplaza DatabaseManager de MongoDB
@@ -60,6 +183,7 @@ class SupabaseManager:
         self.ultima_conexion = None
         self.estado_anterior = None  # Para detectar cambios de estado
         self.callbacks_cambio_estado = []  # Callbacks para cambios online/offline
+        self.callbacks_cotizacion = []  # Callbacks para cotizaciones guardadas/eliminadas
         
         # Archivo JSON para fallback offline
         self.archivo_offline = os.path.join(os.getcwd(), "cotizaciones_offline.json")
@@ -69,52 +193,53 @@ class SupabaseManager:
     
     def _inicializar_conexion(self):
         """Inicializar conexión a Supabase"""
-        print("[SUPABASE] Inicializando conexion...")
+        logger.info("[SUPABASE] Inicializando conexion...")
         
         # Debug de variables de entorno
         service_key = os.getenv('SUPABASE_SERVICE_KEY')
-        print(f"[SUPABASE] Variables disponibles:")
-        print(f"   SUPABASE_URL: {'Configurada' if self.supabase_url else 'Faltante'}")
-        print(f"   SUPABASE_ANON_KEY: {'Configurada' if self.supabase_key else 'Faltante'}")
-        print(f"   SUPABASE_SERVICE_KEY: {'Configurada' if service_key else '⚠️  FALTANTE - Requerida para escritura'}")
-        print(f"   DATABASE_URL: {'Configurada' if self.database_url else 'Faltante'}")
+        logger.info("[SUPABASE] Variables disponibles:")
+        logger.info("   SUPABASE_URL: %s", 'Configurada' if self.supabase_url else 'Faltante')
+        logger.info("   SUPABASE_ANON_KEY: %s", 'Configurada' if self.supabase_key else 'Faltante')
+        logger.info("   SUPABASE_SERVICE_KEY: %s",
+                    'Configurada' if service_key else '⚠️  FALTANTE - Requerida para escritura')
+        logger.info("   DATABASE_URL: %s", 'Configurada' if self.database_url else 'Faltante')
         
         # Validar configuración
         if not self.supabase_url or not self.database_url:
-            print("[SUPABASE] Variables de entorno faltantes - modo offline")
-            print("   Necesitas: SUPABASE_URL, DATABASE_URL")
+            logger.info("[SUPABASE] Variables de entorno faltantes - modo offline")
+            logger.info("   Necesitas: SUPABASE_URL, DATABASE_URL")
             self.modo_offline = True
             return
         
         # Advertir sobre SERVICE_KEY faltante (crítico para escritura en producción)
         if not service_key:
-            print("[SUPABASE] ⚠️  ADVERTENCIA: SUPABASE_SERVICE_KEY no configurada")
-            print("[SUPABASE] ⚠️  Esto puede causar fallos de escritura en producción")
-            print("[SUPABASE] ⚠️  ANON_KEY tiene permisos limitados por RLS")
+            logger.warning("[SUPABASE] ⚠️  ADVERTENCIA: SUPABASE_SERVICE_KEY no configurada")
+            logger.error("[SUPABASE] ⚠️  Esto puede causar fallos de escritura en producción")
+            logger.warning("[SUPABASE] ⚠️  ANON_KEY tiene permisos limitados por RLS")
         
         try:
             # Cliente Supabase (APIs automáticas)
             if self.supabase_key:
                 try:
                     # Crear cliente Supabase
-                    self.supabase_client = create_client(self.supabase_url, self.supabase_key)
-                    print("[SUPABASE] Cliente Supabase inicializado")
+                    self.supabase_client = trazar_cliente_sdk(create_client(self.supabase_url, self.supabase_key))
+                    logger.info("[SUPABASE] Cliente Supabase inicializado")
                 except Exception as supabase_error:
-                    print(f"[SUPABASE] Warning - Cliente Supabase falló: {supabase_error}")
+                    logger.error("[SUPABASE] Warning - Cliente Supabase falló: %s", supabase_error)
                     self.supabase_client = None
             
             # Conexión PostgreSQL directa
-            print(f"[SUPABASE] Intentando conexión PostgreSQL...")
-            print(f"[SUPABASE] DATABASE_URL (primeros 50 chars): {self.database_url[:50]}...")
+            logger.info("[SUPABASE] Intentando conexión PostgreSQL...")
+            logger.info("[SUPABASE] DATABASE_URL (primeros 50 chars): %s...", self.database_url[:50])
             
             self.pg_connection = psycopg2.connect(
                 self.database_url,
-                cursor_factory=RealDictCursor,
+                cursor_factory=CursorTrazado,
                 connect_timeout=10,
                 application_name="CWS_Cotizador"
             )
             
-            print(f"[SUPABASE] Conexión PostgreSQL establecida")
+            logger.info("[SUPABASE] Conexión PostgreSQL establecida")
             
             # Test de conexión
             cursor = self.pg_connection.cursor()
@@ -129,12 +254,12 @@ class SupabaseManager:
                 self.postgresql_disponible = True
                 self.modo_offline = False
                 self.ultima_conexion = datetime.now()
-                print("[SUPABASE] Conectado a PostgreSQL exitosamente")
-                print(f"[SUPABASE] URL: {self.supabase_url}")
+                logger.info("[SUPABASE] Conectado a PostgreSQL exitosamente")
+                logger.info("[SUPABASE] URL: %s", self.supabase_url)
                 
                 # Notificar cambio de estado si es necesario
                 if estado_cambio:
-                    print("[ESTADO_CAMBIO] Supabase RECUPERADO - offline -> online")
+                    logger.info("[ESTADO_CAMBIO] Supabase RECUPERADO - offline -> online")
                     self._notificar_cambio_estado("offline", "online")
                 
                 self.estado_anterior = "online"
@@ -145,22 +270,22 @@ class SupabaseManager:
                     cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public';")
                     tablas = cursor.fetchall()
                     cursor.close()
-                    print(f"[SUPABASE] Tablas disponibles: {[t['table_name'] for t in tablas]}")
+                    logger.info("[SUPABASE] Tablas disponibles: %s", [t['table_name'] for t in tablas])
                 except Exception as table_error:
-                    print(f"[SUPABASE] Error verificando tablas: {table_error}")
+                    logger.error("[SUPABASE] Error verificando tablas: %s", table_error)
                     
             else:
                 raise Exception("Test de conexión falló")
                 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[SUPABASE] Error conectando: {error_msg}")
-            print("[SUPABASE] PostgreSQL falló - evaluando SDK REST...")
+            logger.error("[SUPABASE] Error conectando: %s", error_msg)
+            logger.error("[SUPABASE] PostgreSQL falló - evaluando SDK REST...")
             
             # IMPORTANTE: PostgreSQL puede fallar, pero SDK REST aún puede funcionar
             # NO activar modo offline permanente solo por fallo PostgreSQL
-            print("[SUPABASE] PostgreSQL falló, pero SDK REST puede seguir funcionando")
-            print("[SUPABASE] Manteniendo disponibilidad de SDK REST para operaciones")
+            logger.error("[SUPABASE] PostgreSQL falló, pero SDK REST puede seguir funcionando")
+            logger.info("[SUPABASE] Manteniendo disponibilidad de SDK REST para operaciones")
             
             # Solo marcar PostgreSQL como no disponible, no todo el sistema offline
             self.postgresql_disponible = False
@@ -170,15 +295,15 @@ class SupabaseManager:
             
             # CRÍTICO: Si SDK REST está disponible, mantener sistema ONLINE
             if self.supabase_client:
-                print("[SUPABASE] SDK REST disponible - MANTENIENDO SISTEMA ONLINE")
+                logger.info("[SUPABASE] SDK REST disponible - MANTENIENDO SISTEMA ONLINE")
                 self.modo_offline = False  # ¡CLAVE! No activar modo offline si SDK REST funciona
             else:
-                print("[SUPABASE] SDK REST no disponible - activando modo offline")
+                logger.warning("[SUPABASE] SDK REST no disponible - activando modo offline")
                 self.modo_offline = True
             
             # Notificar cambio de estado si es necesario
             if estado_cambio:
-                print("[ESTADO_CAMBIO] Supabase PERDIDO - online -> offline")
+                logger.info("[ESTADO_CAMBIO] Supabase PERDIDO - online -> offline")
                 self._notificar_cambio_estado("online", "offline")
             
             self.estado_anterior = "offline"
@@ -195,7 +320,7 @@ class SupabaseManager:
         if not self.modo_offline:
             return True
         
-        print("[SUPABASE] Intentando reconexion...")
+        logger.info("[SUPABASE] Intentando reconexion...")
         self._inicializar_conexion()
         return not self.modo_offline
     
@@ -218,19 +343,21 @@ class SupabaseManager:
                 # Verificar conexión antes de cada intento
                 if not self._verificar_conexion_activa():
                     if intento < max_reintentos:
-                        print(f"[REINTENTOS] Intento {intento + 1}/{max_reintentos + 1}: Reconectando para {descripcion}")
+                        logger.warning("[REINTENTOS] Intento %s/%s: Reconectando para %s",
+                                       intento + 1, max_reintentos + 1, descripcion)
                         continue
                     else:
-                        print(f"[REINTENTOS] {descripcion} FALLO: Sin conexión después de {max_reintentos} reintentos")
+                        logger.warning("[REINTENTOS] %s FALLO: Sin conexión después de %s reintentos",
+                                       descripcion, max_reintentos)
                         self.modo_offline = True
                         return None
                 
                 # Ejecutar operación
-                print(f"[REINTENTOS] Ejecutando {descripcion} (intento {intento + 1})")
+                logger.warning("[REINTENTOS] Ejecutando %s (intento %s)", descripcion, intento + 1)
                 resultado = operacion()
                 
                 if intento > 0:
-                    print(f"[REINTENTOS] {descripcion} ÉXITO en intento {intento + 1}")
+                    logger.warning("[REINTENTOS] %s ÉXITO en intento %s", descripcion, intento + 1)
                     
                 return resultado
                 
@@ -239,7 +366,7 @@ class SupabaseManager:
                 ultimo_error = e
                 
                 if 'ssl connection has been closed' in error_msg or 'connection closed' in error_msg:
-                    print(f"[REINTENTOS] Intento {intento + 1}: Error SSL - {str(e)}")
+                    logger.warning("[REINTENTOS] Intento %s: Error SSL - %s", intento + 1, str(e))
                     
                     # Cerrar conexión problemática
                     if self.pg_connection:
@@ -252,30 +379,30 @@ class SupabaseManager:
                     if intento < max_reintentos:
                         import time
                         tiempo_espera = (intento + 1) * 2  # Backoff exponencial: 2s, 4s, 6s
-                        print(f"[REINTENTOS] Esperando {tiempo_espera}s antes del siguiente intento...")
+                        logger.warning("[REINTENTOS] Esperando %ss antes del siguiente intento...", tiempo_espera)
                         time.sleep(tiempo_espera)
                         
                         # Intentar reconectar
                         try:
                             self._inicializar_conexion()
                         except Exception as reconect_error:
-                            print(f"[REINTENTOS] Error reconectando: {reconect_error}")
+                            logger.warning("[REINTENTOS] Error reconectando: %s", reconect_error)
                             continue
                     else:
-                        print(f"[REINTENTOS] {descripcion} FALLO DEFINITIVO: {str(e)}")
+                        logger.warning("[REINTENTOS] %s FALLO DEFINITIVO: %s", descripcion, str(e))
                         self.modo_offline = True
                         break
                 else:
                     # Error que no es SSL - no reintentar
-                    print(f"[REINTENTOS] {descripcion} error no-SSL: {str(e)}")
+                    logger.warning("[REINTENTOS] %s error no-SSL: %s", descripcion, str(e))
                     raise e
                     
             except Exception as e:
                 # Otros errores - no reintentar
-                print(f"[REINTENTOS] {descripcion} error inesperado: {str(e)}")
+                logger.warning("[REINTENTOS] %s error inesperado: %s", descripcion, str(e))
                 raise e
         
-        print(f"[REINTENTOS] {descripcion} FALLO FINAL después de {max_reintentos + 1} intentos")
+        logger.warning("[REINTENTOS] %s FALLO FINAL después de %s intentos", descripcion, max_reintentos + 1)
         if ultimo_error:
             raise ultimo_error
         return None
@@ -304,8 +431,8 @@ class SupabaseManager:
             return True
             
         except (psycopg2.OperationalError, psycopg2.InterfaceError, Exception) as e:
-            print(f"[SUPABASE] Conexión perdida: {safe_str(e)}")
-            print("[SUPABASE] Intentando reconexión automática...")
+            logger.info("[SUPABASE] Conexión perdida: %s", safe_str(e))
+            logger.info("[SUPABASE] Intentando reconexión automática...")
             
             # Cerrar conexión problemática
             if self.pg_connection:
@@ -328,17 +455,39 @@ class SupabaseManager:
         """
         if callback not in self.callbacks_cambio_estado:
             self.callbacks_cambio_estado.append(callback)
-            print(f"[CALLBACKS] Callback registrado: {callback.__name__ if hasattr(callback, '__name__') else 'función'}")
+            logger.info("[CALLBACKS] Callback registrado: %s",
+                        callback.__name__ if hasattr(callback, '__name__') else 'función')
     
     def _notificar_cambio_estado(self, estado_anterior: str, estado_nuevo: str):
         """Notificar a todos los callbacks sobre cambio de estado"""
-        print(f"[CALLBACKS] Notificando cambio: {estado_anterior} -> {estado_nuevo}")
+        logger.info("[CALLBACKS] Notificando cambio: %s -> %s", estado_anterior, estado_nuevo)
         
         for callback in self.callbacks_cambio_estado:
             try:
                 callback(estado_anterior, estado_nuevo)
             except Exception as e:
-                print(f"[CALLBACKS] Error ejecutando callback: {e}")
+                logger.error("[CALLBACKS] Error ejecutando callback: %s", e)
+    
+    def registrar_callback_cotizacion(self, callback):
+        """
+        Registrar callback para cotizaciones guardadas, sincronizadas o eliminadas
+        
+        Args:
+            callback: Función que recibe (accion, cotizacion) con accion en
+                      'guardada' | 'sincronizada' | 'eliminada'
+        """
+        if callback not in self.callbacks_cotizacion:
+            self.callbacks_cotizacion.append(callback)
+            logger.info("[CALLBACKS] Callback de cotizaciones registrado: %s",
+                        callback.__name__ if hasattr(callback, '__name__') else 'función')
+    
+    def _notificar_cotizacion(self, accion: str, cotizacion: Dict):
+        """Notificar a los callbacks de cotizaciones (errores aislados por callback)"""
+        for callback in self.callbacks_cotizacion:
+            try:
+                callback(accion, cotizacion)
+            except Exception as e:
+                logger.error("[CALLBACKS] Error ejecutando callback de cotización: %s", e)
     
     def health_check(self) -> dict:
         """
@@ -360,7 +509,7 @@ class SupabaseManager:
                 cursor.fetchone()
                 cursor.close()
             except:
-                print("[HEALTH_CHECK] Conexión perdida, reactivando modo offline")
+                logger.info("[HEALTH_CHECK] Conexión perdida, reactivando modo offline")
                 estado_cambio = not self.modo_offline
                 self.modo_offline = True
                 if estado_cambio:
@@ -380,23 +529,27 @@ class SupabaseManager:
         """Cargar datos desde archivo JSON offline"""
         try:
             if os.path.exists(self.archivo_offline):
-                with open(self.archivo_offline, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with trazador.medir('offline', f"cargar {os.path.basename(self.archivo_offline)}") as registro:
+                    with open(self.archivo_offline, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    registro.filas = len(data.get("cotizaciones", [])) if isinstance(data, dict) else None
                 return data
             else:
                 return {"cotizaciones": []}
         except Exception as e:
-            print(f"[OFFLINE] Error cargando JSON: {safe_str(e)}")
+            logger.error("[OFFLINE] Error cargando JSON: %s", safe_str(e))
             return {"cotizaciones": []}
     
     def _guardar_datos_offline(self, data: Dict) -> bool:
         """Guardar datos en archivo JSON offline"""
         try:
-            with open(self.archivo_offline, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+            with trazador.medir('offline', f"guardar {os.path.basename(self.archivo_offline)}") as registro:
+                registro.filas = len(data.get("cotizaciones", []))
+                with open(self.archivo_offline, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2, default=str)
             return True
         except Exception as e:
-            print(f"[OFFLINE] Error guardando JSON: {safe_str(e)}")
+            logger.error("[OFFLINE] Error guardando JSON: %s", safe_str(e))
             return False
     
     def obtener_estadisticas(self) -> Dict:
@@ -409,9 +562,19 @@ class SupabaseManager:
                 cursor = self.pg_connection.cursor()
                 
                 try:
-                    # Contar cotizaciones
-                    cursor.execute("SELECT COUNT(*) as total FROM cotizaciones;")
-                    total = cursor.fetchone()['total']
+                    # Contar cotizaciones (rollup mantenido por trigger; COUNT(*) si no está migrado)
+                    total = None
+                    try:
+                        cursor.execute("""
+                            SELECT COALESCE(SUM(num_cotizaciones), 0) as total
+                            FROM estadisticas_rollup WHERE dimension = 'total';
+                        """)
+                        total = cursor.fetchone()['total']
+                    except psycopg2.errors.UndefinedTable:
+                        self.pg_connection.rollback()
+                    if total is None:
+                        cursor.execute("SELECT COUNT(*) as total FROM cotizaciones;")
+                        total = cursor.fetchone()['total']
                     
                     # Contar PDFs
                     cursor.execute("SELECT COUNT(*) as total FROM pdf_storage WHERE pdf_data IS NOT NULL;")
@@ -439,15 +602,15 @@ class SupabaseManager:
             
             if resultado is None:
                 # PostgreSQL falló - intentar SDK REST
-                print("[ESTADISTICAS] PostgreSQL falló, intentando SDK REST...")
+                logger.warning("[ESTADISTICAS] PostgreSQL falló, intentando SDK REST...")
                 
                 # 2. Fallback a SDK REST (estable)
                 if self.supabase_client:
                     try:
                         return self._obtener_estadisticas_sdk()
                     except Exception as sdk_error:
-                        print(f"[SDK_REST] Error obteniendo estadísticas: {safe_str(sdk_error)}")
-                        print("[SDK_REST] Fallback a modo offline")
+                        logger.error("[SDK_REST] Error obteniendo estadísticas: %s", safe_str(sdk_error))
+                        logger.warning("[SDK_REST] Fallback a modo offline")
                 
                 # 3. Último recurso: JSON offline
                 data = self._cargar_datos_offline()
@@ -467,7 +630,7 @@ class SupabaseManager:
             try:
                 return self._obtener_estadisticas_sdk()
             except Exception as sdk_error:
-                print(f"[SDK_REST] Error obteniendo estadísticas offline: {safe_str(sdk_error)}")
+                logger.error("[SDK_REST] Error obteniendo estadísticas offline: %s", safe_str(sdk_error))
         
         # Último recurso: JSON offline
         data = self._cargar_datos_offline()
@@ -486,11 +649,11 @@ class SupabaseManager:
             if not self.supabase_client:
                 raise Exception("SDK de Supabase no disponible")
             
-            # Contar cotizaciones
-            response = self.supabase_client.table('cotizaciones').select('*', count='exact').execute()
+            # Contar cotizaciones (solo el conteo, sin descargar filas)
+            response = self.supabase_client.table('cotizaciones').select('id', count='exact', head=True).execute()
             total_cotizaciones = response.count
             
-            print(f"[SDK_REST] Estadísticas obtenidas: {total_cotizaciones} cotizaciones")
+            logger.info("[SDK_REST] Estadísticas obtenidas: %s cotizaciones", total_cotizaciones)
             
             return {
                 "total_cotizaciones": total_cotizaciones,
@@ -501,9 +664,372 @@ class SupabaseManager:
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[SDK_REST] Error obteniendo estadísticas: {error_msg}")
+            logger.error("[SDK_REST] Error obteniendo estadísticas: %s", error_msg)
             raise e
     
+    def obtener_estadisticas_detalladas(self, company_id: str = None) -> Dict:
+        """
+        Estadísticas agregadas por compañía: total, clientes/vendedores únicos,
+        montos por moneda, por vendedor y por mes.
+
+        Lee la tabla estadisticas_rollup (ver migrations/v2.3_estadisticas_rollup.sql),
+        que un trigger mantiene en cada escritura: una sola lectura indexada.
+        """
+        # 1. PostgreSQL directo
+        if self.postgresql_disponible and self.pg_connection:
+            try:
+                filas = self._leer_rollup_supabase(company_id)
+                return _formatear_estadisticas(filas, "Supabase PostgreSQL (rollup)")
+            except Exception as pg_error:
+                logger.warning("[ESTADISTICAS] Rollup PostgreSQL no disponible: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+
+        # 2. SDK REST (misma tabla de rollup)
+        if self.supabase_client:
+            try:
+                query = self.supabase_client.table('estadisticas_rollup').select(
+                    'dimension,clave,num_cotizaciones,total_monto'
+                )
+                if company_id:
+                    query = query.eq('company_id', company_id)
+                filas = query.execute().data or []
+                return _formatear_estadisticas(filas, "Supabase SDK REST (rollup)")
+            except Exception as sdk_error:
+                logger.warning("[ESTADISTICAS] Rollup SDK no disponible: %s", safe_str(sdk_error))
+
+        # 3. PostgreSQL agregado directo (base sin migrar v2.3)
+        if self.postgresql_disponible and self.pg_connection:
+            try:
+                filas = self._agregar_estadisticas_supabase(company_id)
+                return _formatear_estadisticas(filas, "Supabase PostgreSQL (agregado)")
+            except Exception as pg_error:
+                logger.error("[ESTADISTICAS] Agregado PostgreSQL falló: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+
+        # 4. JSON offline (un solo recorrido, cacheado por mtime del archivo)
+        filas = self._rollup_offline(company_id)
+        return _formatear_estadisticas(filas, "JSON local")
+
+    def _leer_rollup_supabase(self, company_id: str = None) -> List[Dict]:
+        """Filas de estadisticas_rollup vía PostgreSQL directo"""
+        cursor = self.pg_connection.cursor()
+        try:
+            query = "SELECT dimension, clave, num_cotizaciones, total_monto FROM estadisticas_rollup"
+            params = ()
+            if company_id:
+                query += " WHERE company_id = %s"
+                params = (company_id,)
+            cursor.execute(query + ";", params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _agregar_estadisticas_supabase(self, company_id: str = None) -> List[Dict]:
+        """
+        Mismas filas que el rollup, calculadas con GROUP BY en PostgreSQL.
+        El monto replica monto_cotizacion() en línea: esta ruta corre cuando
+        la base no tiene la migración v2.3 (ni sus funciones).
+        """
+        cursor = self.pg_connection.cursor()
+        try:
+            filtro = "WHERE company_id = %s" if company_id else ""
+            params = (MES_SIN_FECHA, company_id) if company_id else (MES_SIN_FECHA,)
+            cursor.execute(f"""
+                WITH base AS (
+                    SELECT
+                        COALESCE(NULLIF(datos_generales->'condiciones'->>'moneda', ''), 'MXN') AS moneda,
+                        NULLIF(TRIM(datos_generales->>'vendedor'), '') AS vendedor,
+                        NULLIF(TRIM(datos_generales->>'cliente'), '') AS cliente,
+                        COALESCE(to_char(fecha_creacion, 'YYYY-MM'), %s) AS mes,
+                        (
+                            SELECT COALESCE(SUM(
+                                CASE WHEN regexp_replace(COALESCE(i->>'total', ''), '[^0-9.\\-]', '', 'g')
+                                          ~ '^-?[0-9]*\\.?[0-9]+$'
+                                     THEN regexp_replace(i->>'total', '[^0-9.\\-]', '', 'g')::NUMERIC
+                                     ELSE 0 END
+                            ), 0)
+                            FROM jsonb_array_elements(
+                                CASE WHEN jsonb_typeof(items) = 'array' THEN items ELSE '[]'::JSONB END
+                            ) AS i
+                        ) AS monto
+                    FROM cotizaciones {filtro}
+                )
+                SELECT 'total' AS dimension, 'total' AS clave, COUNT(*) AS num_cotizaciones,
+                       SUM(monto) AS total_monto FROM base
+                UNION ALL
+                SELECT 'moneda', moneda, COUNT(*), SUM(monto) FROM base GROUP BY moneda
+                UNION ALL
+                SELECT 'vendedor', vendedor, COUNT(*), SUM(monto) FROM base WHERE vendedor IS NOT NULL GROUP BY vendedor
+                UNION ALL
+                SELECT 'cliente', cliente, COUNT(*), SUM(monto) FROM base WHERE cliente IS NOT NULL GROUP BY cliente
+                UNION ALL
+                SELECT 'mes', mes, COUNT(*), SUM(monto) FROM base GROUP BY mes;
+            """, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _rollup_offline(self, company_id: str = None) -> List[Dict]:
+        """Rollup calculado sobre el JSON offline, cacheado mientras el archivo no cambie"""
+        try:
+            mtime = os.path.getmtime(self.archivo_offline)
+        except OSError:
+            mtime = None
+
+        cache = getattr(self, '_cache_rollup_offline', None)
+        clave_cache = (self.archivo_offline, mtime, company_id)
+        if cache and cache[0] == clave_cache:
+            return cache[1]
+
+        cotizaciones = self._cargar_datos_offline().get("cotizaciones", [])
+        if company_id:
+            cotizaciones = [c for c in cotizaciones if c.get("company_id") == company_id]
+        filas = calcular_rollup_estadisticas(cotizaciones)
+        self._cache_rollup_offline = (clave_cache, filas)
+        return filas
+
+    def obtener_generacion_datos(self, company_id: str = None) -> Optional[str]:
+        """
+        Marca barata que cambia cada vez que cambian las cotizaciones de la
+        compañía, en la misma capa de la que leería buscar_cotizaciones().
+
+        PostgreSQL/SDK leen cotizaciones_generacion (ver
+        migrations/v2.5_cotizaciones_generacion.sql); offline usa mtime y
+        tamaño del JSON. None = no hay marca confiable (base sin migrar o
+        compañía sin fila de generación).
+        """
+        if not self.modo_offline or self.supabase_client:
+            if time.monotonic() < getattr(self, '_generacion_no_disponible_hasta', 0):
+                return None
+            company = company_id or '00000000-0000-0000-0000-000000000000'
+            try:
+                if not self.modo_offline:
+                    cursor = self.pg_connection.cursor()
+                    try:
+                        cursor.execute("SELECT generacion FROM cotizaciones_generacion WHERE company_id = %s;",
+                                       (company,))
+                        fila = cursor.fetchone()
+                    finally:
+                        cursor.close()
+                    if not fila:
+                        return None
+                    return f"pg:{fila['generacion'] if isinstance(fila, dict) else fila[0]}"
+
+                # Sin fila visible (compañía sin cotizaciones o RLS) no hay marca confiable
+                filas = self.supabase_client.table('cotizaciones_generacion').select('generacion').eq(
+                    'company_id', company).execute().data or []
+                return f"sdk:{filas[0]['generacion']}" if filas else None
+            except Exception as e:
+                logger.warning("[GENERACION] Contador no disponible, listados sin ETag por 5 min: %s", safe_str(e))
+                if not self.modo_offline:
+                    try:
+                        self.pg_connection.rollback()
+                    except:
+                        pass
+                self._generacion_no_disponible_hasta = time.monotonic() + 300
+                return None
+
+        try:
+            estado = os.stat(self.archivo_offline)
+        except OSError:
+            return "json:vacio"
+        return f"json:{estado.st_mtime_ns}-{estado.st_size}"
+
+    # ========================================
+    # ÁRBOL DE INTEGRIDAD (ver integrity_tree.py y
+    # migrations/v2.6_integridad_merkle.sql)
+    # ========================================
+
+    def _columna_hash_disponible(self) -> bool:
+        """
+        True si cotizaciones tiene hash_contenido (migración v2.6 aplicada).
+        El resultado positivo se recuerda; el negativo (la columna no existe)
+        se reintenta a los 5 min. Un fallo transitorio de conexión no se
+        recuerda: devuelve False solo para esta llamada.
+        """
+        if getattr(self, '_hash_contenido_disponible', False):
+            return True
+        if time.monotonic() < getattr(self, '_hash_contenido_no_disponible_hasta', 0):
+            return False
+        try:
+            if self.postgresql_disponible and self.pg_connection:
+                cursor = self.pg_connection.cursor()
+                try:
+                    cursor.execute("""
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_name = 'cotizaciones' AND column_name = 'hash_contenido';
+                    """)
+                    disponible = cursor.fetchone() is not None
+                finally:
+                    cursor.close()
+            elif self.supabase_client:
+                try:
+                    self.supabase_client.table('cotizaciones').select('hash_contenido').limit(1).execute()
+                    disponible = True
+                except Exception as e:
+                    # 42703: columna inexistente; cualquier otro error es transitorio
+                    mensaje = safe_str(e)
+                    if '42703' not in mensaje and 'does not exist' not in mensaje:
+                        raise
+                    disponible = False
+            else:
+                return False
+        except Exception as e:
+            logger.warning("[INTEGRIDAD] No se pudo verificar la columna hash_contenido: %s", safe_str(e))
+            if self.postgresql_disponible and self.pg_connection:
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+            return False
+        self._hash_contenido_disponible = disponible
+        if not disponible:
+            self._hash_contenido_no_disponible_hasta = time.monotonic() + 300
+        return disponible
+
+    def obtener_buckets_integridad(self) -> Optional[Dict[str, Dict[int, Tuple[int, int]]]]:
+        """
+        Huellas del árbol remoto: {compañía: {bucket: (huella, registros)}}.
+        Lee solo integridad_buckets (a lo sumo 256 filas por compañía).
+        None = base sin migrar o sin conexión.
+        """
+        try:
+            if self.postgresql_disponible and self.pg_connection:
+                cursor = self.pg_connection.cursor()
+                try:
+                    cursor.execute("""
+                        SELECT company_id::text AS company_id, bucket, huella, registros
+                        FROM integridad_buckets WHERE registros > 0;
+                    """)
+                    filas = cursor.fetchall()
+                finally:
+                    cursor.close()
+            elif self.supabase_client:
+                filas, inicio = [], 0
+                while True:
+                    pagina = self.supabase_client.table('integridad_buckets').select(
+                        'company_id,bucket,huella,registros').gt('registros', 0).order(
+                        'company_id').order('bucket').range(inicio, inicio + 999).execute().data or []
+                    filas.extend(pagina)
+                    if len(pagina) < 1000:
+                        break
+                    inicio += 1000
+            else:
+                return None
+        except Exception as e:
+            logger.warning("[INTEGRIDAD] Árbol remoto no disponible: %s", safe_str(e))
+            if self.postgresql_disponible and self.pg_connection:
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+            return None
+
+        buckets = {}
+        for fila in filas:
+            buckets.setdefault(str(fila['company_id']), {})[int(fila['bucket'])] = (
+                int(fila['huella']), int(fila['registros']))
+        return buckets
+
+    def obtener_hojas_integridad(self, company_id: str, buckets: List[int]) -> Dict[int, Dict[str, str]]:
+        """Hojas remotas {bucket: {numero: hash}} solo de los buckets pedidos"""
+        buckets = [int(b) for b in buckets]
+        sin_compania = not company_id or company_id == SIN_COMPANIA
+        if self.postgresql_disponible and self.pg_connection:
+            cursor = self.pg_connection.cursor()
+            try:
+                cursor.execute(f"""
+                    SELECT integridad_bucket, numero_cotizacion, hash_contenido FROM cotizaciones
+                    WHERE {'company_id IS NULL' if sin_compania else 'company_id = %s'}
+                      AND integridad_bucket = ANY(%s);
+                """, ((buckets,) if sin_compania else (company_id, buckets)))
+                filas = cursor.fetchall()
+            finally:
+                cursor.close()
+        else:
+            filas, inicio = [], 0
+            while True:
+                consulta = self.supabase_client.table('cotizaciones').select(
+                    'integridad_bucket,numero_cotizacion,hash_contenido').in_('integridad_bucket', buckets)
+                consulta = consulta.is_('company_id', 'null') if sin_compania else consulta.eq('company_id', company_id)
+                pagina = consulta.order('id').range(inicio, inicio + 999).execute().data or []
+                filas.extend(pagina)
+                if len(pagina) < 1000:
+                    break
+                inicio += 1000
+
+        hojas = {bucket: {} for bucket in buckets}
+        for fila in filas:
+            hojas.setdefault(int(fila['integridad_bucket']), {})[fila['numero_cotizacion']] = fila['hash_contenido']
+        return hojas
+
+    def _version_offline(self):
+        try:
+            estado = os.stat(self.archivo_offline)
+        except OSError:
+            return None
+        return (estado.st_mtime_ns, estado.st_size)
+
+    def arbol_integridad_offline(self) -> ArbolIntegridad:
+        """
+        Árbol del JSON local. Se reconstruye solo si el archivo cambió por
+        fuera de _guardar_cotizacion_offline(), que lo actualiza en O(1).
+        """
+        version = self._version_offline()
+        arbol = getattr(self, '_arbol_offline', None)
+        if arbol is None or arbol.version != version:
+            arbol = ArbolIntegridad.desde_cotizaciones(
+                self._cargar_datos_offline().get("cotizaciones", []), version)
+            self._arbol_offline = arbol
+        return arbol
+
+    def rellenar_hashes_integridad(self, tamano_lote: int = 500) -> int:
+        """
+        Calcula hash_contenido de las filas anteriores a la migración v2.6
+        (hash NULL). El trigger actualiza las huellas de cada bucket.
+        """
+        if not self.postgresql_disponible or not self.pg_connection:
+            logger.info("[INTEGRIDAD] Relleno requiere PostgreSQL directo")
+            return 0
+        total = 0
+        while True:
+            cursor = self.pg_connection.cursor()
+            try:
+                cursor.execute("""
+                    SELECT numero_cotizacion, datos_generales, items FROM cotizaciones
+                    WHERE hash_contenido IS NULL LIMIT %s;
+                """, (tamano_lote,))
+                filas = [
+                    (fila['numero_cotizacion'], hash_contenido({
+                        'numeroCotizacion': fila['numero_cotizacion'],
+                        'datosGenerales': fila['datos_generales'],
+                        'items': fila['items'],
+                    }))
+                    for fila in cursor.fetchall()
+                ]
+                if filas:
+                    execute_values(cursor, """
+                        UPDATE cotizaciones AS c SET hash_contenido = v.hash_contenido
+                        FROM (VALUES %s) AS v(numero_cotizacion, hash_contenido)
+                        WHERE c.numero_cotizacion = v.numero_cotizacion
+                    """, filas, page_size=tamano_lote)
+                self.pg_connection.commit()
+            except Exception:
+                self.pg_connection.rollback()
+                raise
+            finally:
+                cursor.close()
+            total += len(filas)
+            logger.info("[INTEGRIDAD] Relleno: %s filas con hash", total)
+            if len(filas) < tamano_lote:
+                return total
+
     def guardar_cotizacion(self, datos: Dict, company_id: str = None) -> Dict:
         """
         Guardar cotización en Supabase (online) o JSON (offline)
@@ -516,16 +1042,16 @@ class SupabaseManager:
             # FIX ISSUE #1: SIEMPRE priorizar número en datosGenerales.numeroCotizacion
             numero_cotizacion = None
 
-            print(f"[DEBUG_ISSUE1] === INICIO DEBUG GUARDAR_COTIZACION ===")
-            print(f"[DEBUG_ISSUE1] datos['numeroCotizacion']: '{datos.get('numeroCotizacion', 'VACIO')}'")
-            print(f"[DEBUG_ISSUE1] datos['numeroCotizacionHidden']: '{datos.get('numeroCotizacionHidden', 'VACIO')}'")
-            print(f"[DEBUG_ISSUE1] datosGenerales['numeroCotizacion']: '{datos.get('datosGenerales', {}).get('numeroCotizacion', 'VACIO')}'")
+            if log_issue1.isEnabledFor(logging.DEBUG):
+                log_issue1.debug("[DEBUG_ISSUE1] numeroCotizacion=%r numeroCotizacionHidden=%r datosGenerales.numeroCotizacion=%r",
+                                 datos.get('numeroCotizacion', 'VACIO'), datos.get('numeroCotizacionHidden', 'VACIO'),
+                                 datos.get('datosGenerales', {}).get('numeroCotizacion', 'VACIO'))
             
             # Verificar PRIMERO si hay número en datosGenerales (caso de revisiones)
             if 'datosGenerales' in datos and 'numeroCotizacion' in datos['datosGenerales']:
                 if datos['datosGenerales']['numeroCotizacion'] and datos['datosGenerales']['numeroCotizacion'].strip():
                     numero_cotizacion = datos['datosGenerales']['numeroCotizacion']
-                    print(f"[REVISIÓN] Usando número de datosGenerales: {numero_cotizacion}")
+                    logger.debug("[REVISIÓN] Usando número de datosGenerales: %s", numero_cotizacion)
                     datos['numeroCotizacion'] = numero_cotizacion
             
             # Si no hay en datosGenerales, verificar numeroCotizacionHidden (desde formulario)
@@ -533,7 +1059,7 @@ class SupabaseManager:
                 numero_hidden = datos.get('numeroCotizacionHidden')
                 if numero_hidden and numero_hidden.strip():
                     numero_cotizacion = numero_hidden
-                    print(f"[REVISIÓN] Usando número de numeroCotizacionHidden: {numero_cotizacion}")
+                    logger.debug("[REVISIÓN] Usando número de numeroCotizacionHidden: %s", numero_cotizacion)
                     datos['numeroCotizacion'] = numero_cotizacion
             
             # Si no hay en Hidden, usar el del nivel raíz
@@ -554,19 +1080,20 @@ class SupabaseManager:
                 
                 if revision > 1:
                     # ES UNA REVISIÓN - ERROR CRÍTICO: no debería llegar aquí sin número
-                    error_msg = f"[CRÍTICO] Revisión R{revision} sin número de cotización base. Esto NO debe ocurrir."
-                    print(error_msg)
+                    logger.error("[CRÍTICO] Revisión R%s sin número de cotización base. Esto NO debe ocurrir.",
+                                 revision)
                     return {"success": False, "error": f"Issue #1 - Revisión sin número base: R{revision}"}
                 else:
                     # Es una nueva cotización (R1) - generar número consecutivo
-                    print("[GUARDAR] Nueva cotización (R1), generando número consecutivo...")
+                    logger.debug("[GUARDAR] Nueva cotización (R1), generando número consecutivo...")
                     
                     # Extraer datos necesarios para generación consecutiva
                     cliente = datos_generales.get('cliente', 'CLIENTE')
                     vendedor = datos_generales.get('vendedor', 'VENDEDOR')  
                     proyecto = datos_generales.get('proyecto', 'PROYECTO')
                     
-                    print(f"[GUARDAR] Generando consecutivo para: Cliente='{cliente}', Vendedor='{vendedor}', Proyecto='{proyecto}', Rev={revision}")
+                    logger.debug("[GUARDAR] Generando consecutivo para: Cliente=%r, Vendedor=%r, Proyecto=%r, Rev=%s",
+                                 cliente, vendedor, proyecto, revision)
                     
                     # Usar el método consecutivo irrepetible solo para NUEVAS cotizaciones
                     numero_cotizacion = self.generar_numero_cotizacion(cliente, vendedor, proyecto, revision)
@@ -574,100 +1101,69 @@ class SupabaseManager:
                     
                     # Actualizar también en datosGenerales para consistencia
                     datos['datosGenerales']['numeroCotizacion'] = numero_cotizacion
-                    print(f"[GUARDAR] Número consecutivo generado: {numero_cotizacion}")
+                    logger.info("[GUARDAR] Número consecutivo generado: %s", numero_cotizacion)
             
-            print(f"[GUARDAR] Procesando cotización: {numero_cotizacion}")
+            logger.info("[GUARDAR] Procesando cotización: %s", numero_cotizacion)
+
+            # NORMALIZAR campos numéricos una sola vez al guardar (las lecturas ya no parsean)
+            normalizar_cotizacion(datos)
 
             # RECALCULAR totales de items desde componentes para garantizar consistencia
-            # (misma fórmula que preparar_datos_nueva_revision() y JS calcularCostosItem())
-            items = datos.get('items', [])
-            if isinstance(items, list):
-                for item in items:
-                    if isinstance(item, dict):
-                        try:
-                            # Sumar subtotales de materiales normales
-                            mats = item.get('materiales', [])
-                            total_mat = sum(
-                                float(m.get('subtotal', 0)) if isinstance(m, dict) else 0.0
-                                for m in (mats if isinstance(mats, list) else [])
-                            )
-                            # Sumar subtotales de otros materiales
-                            otros = item.get('otrosMateriales', [])
-                            total_otr = sum(
-                                float(m.get('subtotal', 0)) if isinstance(m, dict) else 0.0
-                                for m in (otros if isinstance(otros, list) else [])
-                            )
-                            # Extraer campos con defaults seguros
-                            def _f(v, d=0.0):
-                                try: return float(v) if v not in (None, '') else d
-                                except (ValueError, TypeError): return d
-                            transp = _f(item.get('transporte', 0))
-                            inst   = _f(item.get('instalacion', 0))
-                            seg    = _f(item.get('seguridad', 0))
-                            desc   = _f(item.get('descuento', 0))
-                            cant   = _f(item.get('cantidad', 1))
-                            if cant <= 0:
-                                cant = 1.0
-                            # Fórmula completa
-                            subtotal_base     = total_mat + total_otr + transp + inst
-                            aumento_seguridad = subtotal_base * (seg / 100.0)
-                            subtotal_con_seg  = subtotal_base + aumento_seguridad
-                            reduccion_desc    = subtotal_con_seg * (desc / 100.0)
-                            costo_unidad      = subtotal_con_seg - reduccion_desc
-                            total_item        = costo_unidad * cant
-                            # Actualizar campos calculados
-                            item['costoUnidad'] = round(costo_unidad, 2)
-                            item['total']       = round(total_item, 2)
-                        except Exception as calc_err:
-                            print(f"[GUARDAR] Error recalculando total de item: {calc_err}")
+            # (motor de precios compartido con la tabla, el desglose y las revisiones)
+            aplicar_a_items(datos.get('items', []))
 
             # SISTEMA HÍBRIDO TRIPLE LAYER (REORDENADO PARA ESTABILIDAD):
             # 1. PRIORIDAD: SDK REST de Supabase (funciona independiente de PostgreSQL)
             if self.supabase_client:
-                print("[HIBRIDO] PRIORIDAD 1: Intentando SDK REST de Supabase...")
+                logger.debug("[HIBRIDO] PRIORIDAD 1: Intentando SDK REST de Supabase...")
                 resultado_sdk = self._guardar_cotizacion_sdk(datos)
                 
                 # Verificar si SDK REST realmente funcionó
                 if resultado_sdk.get('success'):
-                    print("[HIBRIDO] SDK REST exitoso - operación completada")
+                    logger.debug("[HIBRIDO] SDK REST exitoso - operación completada")
                     # También guardar en JSON como backup
                     self._guardar_cotizacion_offline(datos)
+                    self._notificar_cotizacion('guardada', datos)
                     return resultado_sdk
                 else:
-                    print(f"[HIBRIDO] SDK REST falló: {resultado_sdk.get('error', 'unknown')}")
-                    print(f"[HIBRIDO] SDK REST resultado completo: {json.dumps(resultado_sdk, default=str, indent=2)}")
-                    print("[HIBRIDO] Intentando fallback a PostgreSQL directo...")
+                    logger.warning("[HIBRIDO] SDK REST falló: %s - intentando fallback a PostgreSQL directo",
+                                   resultado_sdk.get('error', 'unknown'))
+                    log_sdk.debug("[HIBRIDO] SDK REST resultado completo: %s", volcado_json(resultado_sdk))
             
             # 2. FALLBACK: PostgreSQL directo (solo si está disponible)  
             if self.postgresql_disponible:
                 try:
-                    print("[HIBRIDO] FALLBACK: Intentando PostgreSQL directo...")
+                    logger.debug("[HIBRIDO] FALLBACK: Intentando PostgreSQL directo...")
                     resultado_online = self._guardar_cotizacion_supabase(datos)
                     
                     # También guardar en JSON como backup
                     self._guardar_cotizacion_offline(datos)
                     
+                    self._notificar_cotizacion('guardada', datos)
                     return resultado_online
                     
                 except Exception as pg_error:
-                    print(f"[POSTGRES] Error guardando: {safe_str(pg_error)}")
-                    print("[POSTGRES] Activando modo offline...")
+                    logger.error("[POSTGRES] Error guardando: %s - activando modo offline", safe_str(pg_error))
                     self.modo_offline = True
             
             # Guardar en JSON (modo offline o fallback)
-            return self._guardar_cotizacion_offline(datos)
+            resultado_offline = self._guardar_cotizacion_offline(datos)
+            if resultado_offline.get('success'):
+                self._notificar_cotizacion('guardada', datos)
+            return resultado_offline
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[GUARDAR] Error general: {error_msg}")
+            logger.error("[GUARDAR] Error general: %s", error_msg)
             return {"success": False, "error": error_msg}
     
     def _guardar_cotizacion_sdk(self, datos: Dict) -> Dict:
         """Guardar cotización usando Supabase SDK REST (fallback estable)"""
         try:
-            print(f"[SDK_REST] INICIO - Guardando cotización via SDK REST")
-            print(f"[SDK_REST] Cliente disponible: {'Sí' if self.supabase_client else 'No'}")
-            
+            log_sdk.debug("[SDK_REST] INICIO - Guardando cotización via SDK REST (cliente: %s)",
+                          'Sí' if self.supabase_client else 'No')
+
+
             if not self.supabase_client:
                 raise Exception("SDK de Supabase no disponible")
             
@@ -687,8 +1183,8 @@ class SupabaseManager:
             # condiciones se almacena dentro de datos_generales (no existe columna separada en la tabla)
             datos_generales['condiciones'] = condiciones if condiciones else {}
 
-            print(f"[SDK_REST] Datos extraídos - Número: {numero_cotizacion}, Items: {len(items)}, Revisión: {revision}")
-            print(f"[SDK_REST] Condiciones extraídas: {condiciones if condiciones else 'VACÍAS'}")
+            log_sdk.debug("[SDK_REST] Datos extraídos - Número: %s, Items: %d, Revisión: %s, Condiciones: %s",
+                          numero_cotizacion, len(items), revision, volcado_json(condiciones) if condiciones else 'VACÍAS')
 
             # Timestamp y fecha
             timestamp = datos.get('timestamp', int(time.time() * 1000))
@@ -701,7 +1197,7 @@ class SupabaseManager:
             else:
                 fecha_creacion = datetime.now().isoformat()
 
-            print(f"[SDK_REST] Fecha procesada: {fecha_creacion}")
+            log_sdk.debug("[SDK_REST] Fecha procesada: %s", fecha_creacion)
 
             # Preservar texto introductorio IA (viene en el root del form o en datosGenerales)
             texto_intro = datos.get('textoIntroductorio') or datos_generales.get('textoIntroductorio', '')
@@ -721,15 +1217,17 @@ class SupabaseManager:
                 'observaciones': observaciones,
                 'company_id': datos.get('company_id')
             }
+            if self._columna_hash_disponible():
+                sdk_data['hash_contenido'] = hash_contenido(datos)
             
-            print(f"[SDK_REST] Datos SDK preparados, verificando si cotización existe...")
+            log_sdk.debug("[SDK_REST] Datos SDK preparados, verificando si cotización existe...")
             
             # Verificar si existe (para UPDATE vs INSERT)
             try:
                 existing = self.supabase_client.table('cotizaciones').select('id').eq('numero_cotizacion', numero_cotizacion).execute()
-                print(f"[SDK_REST] Verificación existencia: {'Encontrada' if existing.data else 'Nueva'}")
+                log_sdk.debug("[SDK_REST] Verificación existencia: %s", 'Encontrada' if existing.data else 'Nueva')
             except Exception as check_error:
-                print(f"[SDK_REST] Error verificando existencia: {safe_str(check_error)}")
+                logger.error("[SDK_REST] Error verificando existencia: %s", safe_str(check_error))
                 raise Exception(f"Error verificando cotización existente: {safe_str(check_error)}")
             
             if existing.data:
@@ -737,36 +1235,36 @@ class SupabaseManager:
                 if not sdk_data.get('company_id'):
                     sdk_data.pop('company_id', None)  # no sobreescribir con NULL
                 cotizacion_id = existing.data[0]['id']
-                print(f"[SDK_REST] Ejecutando UPDATE para ID {cotizacion_id}...")
+                log_sdk.debug("[SDK_REST] Ejecutando UPDATE para ID %s...", cotizacion_id)
                 try:
                     response = self.supabase_client.table('cotizaciones').update(sdk_data).eq('id', cotizacion_id).execute()
-                    print(f"[SDK_REST] UPDATE exitoso - Cotización actualizada: {numero_cotizacion}")
+                    logger.info("[SDK_REST] UPDATE exitoso - Cotización actualizada: %s", numero_cotizacion)
                 except Exception as update_error:
-                    print(f"[SDK_REST] Error en UPDATE: {safe_str(update_error)}")
+                    logger.error("[SDK_REST] Error en UPDATE: %s", safe_str(update_error))
                     raise Exception(f"Error actualizando cotización: {safe_str(update_error)}")
             else:
                 # INSERT nueva
-                print(f"[SDK_REST] Ejecutando INSERT nueva cotización...")
+                log_sdk.debug("[SDK_REST] Ejecutando INSERT nueva cotización...")
                 try:
                     response = self.supabase_client.table('cotizaciones').insert(sdk_data).execute()
                     cotizacion_id = response.data[0]['id'] if response.data else None
-                    print(f"[SDK_REST] INSERT exitoso - ID asignado: {cotizacion_id}")
+                    logger.info("[SDK_REST] INSERT exitoso - ID asignado: %s", cotizacion_id)
                 except Exception as insert_error:
-                    print(f"[SDK_REST] Error en INSERT: {safe_str(insert_error)}")
-                    print(f"[SDK_REST] Datos que causaron error: {json.dumps(sdk_data, default=str, indent=2)}")
+                    logger.error("[SDK_REST] Error en INSERT: %s", safe_str(insert_error))
+                    logger.error("[SDK_REST] Datos que causaron error: %s", volcado_json(sdk_data))
                     raise Exception(f"Error insertando cotización: {safe_str(insert_error)}")
             
             # Verificar que el guardado fue exitoso
-            print(f"[SDK_REST] Verificando guardado exitoso...")
+            log_sdk.debug("[SDK_REST] Verificando guardado exitoso...")
             try:
                 verify_response = self.supabase_client.table('cotizaciones').select('id').eq('numero_cotizacion', numero_cotizacion).execute()
                 if verify_response.data:
-                    print(f"[SDK_REST] VERIFICACIÓN OK - Cotización confirmada en Supabase")
+                    log_sdk.debug("[SDK_REST] VERIFICACIÓN OK - Cotización confirmada en Supabase")
                 else:
-                    print(f"[SDK_REST] VERIFICACIÓN FALLÓ - Cotización no encontrada después del guardado")
+                    logger.warning("[SDK_REST] VERIFICACIÓN FALLÓ - Cotización no encontrada después del guardado")
                     raise Exception("Cotización no encontrada después del guardado - operación falló")
             except Exception as verify_error:
-                print(f"[SDK_REST] Error en verificación: {safe_str(verify_error)}")
+                logger.warning("[SDK_REST] Error en verificación: %s", safe_str(verify_error))
                 raise Exception(f"Error verificando guardado: {safe_str(verify_error)}")
             
             resultado = {
@@ -777,13 +1275,12 @@ class SupabaseManager:
                 "mensaje": "Guardado via Supabase SDK REST"
             }
             
-            print(f"[SDK_REST] ÉXITO - Operación completada: {numero_cotizacion}")
+            log_sdk.debug("[SDK_REST] ÉXITO - Operación completada: %s", numero_cotizacion)
             return resultado
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[SDK_REST] ERROR CRÍTICO guardando: {error_msg}")
-            print(f"[SDK_REST] Tipo de error: {type(e).__name__}")
+            logger.error("[SDK_REST] ERROR CRÍTICO guardando (%s): %s", type(e).__name__, error_msg)
             # NO hacer raise aquí - permitir que el sistema use el siguiente fallback
             return {
                 "success": False,
@@ -830,18 +1327,22 @@ class SupabaseManager:
         if texto_intro:
             datos_generales['textoIntroductorio'] = texto_intro
 
+        # Hash de contenido para el árbol de integridad (si la base ya tiene la columna)
+        hash_registro = hash_contenido(datos) if self._columna_hash_disponible() else None
+
         def _operacion_guardar():
             """Operación de guardado que será ejecutada con reintentos"""
             cursor = self.pg_connection.cursor()
             
             try:
                 # Query de inserción/actualización
-                query = """
+                query = f"""
                     INSERT INTO cotizaciones (
                         numero_cotizacion, datos_generales, items, revision,
                         version, fecha_creacion, timestamp, usuario, observaciones, company_id
+                        {', hash_contenido' if hash_registro else ''}
                     ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s{', %s' if hash_registro else ''}
                     ) ON CONFLICT (numero_cotizacion) DO UPDATE SET
                         datos_generales = EXCLUDED.datos_generales,
                         items = EXCLUDED.items,
@@ -850,6 +1351,7 @@ class SupabaseManager:
                         usuario = EXCLUDED.usuario,
                         observaciones = EXCLUDED.observaciones,
                         company_id = COALESCE(EXCLUDED.company_id, cotizaciones.company_id),
+                        {'hash_contenido = EXCLUDED.hash_contenido,' if hash_registro else ''}
                         updated_at = NOW()
                     RETURNING id, numero_cotizacion;
                 """
@@ -865,7 +1367,7 @@ class SupabaseManager:
                     usuario,
                     observaciones,
                     datos.get('company_id')
-                ))
+                ) + ((hash_registro,) if hash_registro else ()))
                 
                 resultado = cursor.fetchone()
                 cotizacion_id = resultado['id']
@@ -874,7 +1376,7 @@ class SupabaseManager:
                 self.pg_connection.commit()
                 cursor.close()
                 
-                print(f"[SUPABASE] Cotizacion guardada: ID={cotizacion_id}")
+                logger.info("[SUPABASE] Cotizacion guardada: ID=%s", cotizacion_id)
                 
                 return {
                     "success": True,
@@ -932,14 +1434,20 @@ class SupabaseManager:
             # Actualizar o agregar
             if indice_existente is not None:
                 cotizaciones[indice_existente] = datos
-                print(f"[OFFLINE] Cotizacion actualizada: {numero_cotizacion}")
+                logger.info("[OFFLINE] Cotizacion actualizada: %s", numero_cotizacion)
             else:
                 cotizaciones.append(datos)
-                print(f"[OFFLINE] Nueva cotizacion: {numero_cotizacion}")
+                logger.info("[OFFLINE] Nueva cotizacion: %s", numero_cotizacion)
             
             # Guardar archivo
             data["cotizaciones"] = cotizaciones
+            version_previa = self._version_offline()
             if self._guardar_datos_offline(data):
+                # Árbol de integridad al día sin reconstruir (solo si reflejaba el archivo previo)
+                arbol = getattr(self, '_arbol_offline', None)
+                if arbol is not None and arbol.version == version_previa:
+                    arbol.actualizar(datos.get('company_id'), numero_cotizacion, hash_contenido(datos))
+                    arbol.version = self._version_offline()
                 return {
                     "success": True,
                     "numero_cotizacion": numero_cotizacion,
@@ -952,7 +1460,7 @@ class SupabaseManager:
                 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[OFFLINE] Error guardando: {error_msg}")
+            logger.error("[OFFLINE] Error guardando: %s", error_msg)
             return {"success": False, "error": error_msg}
     
     def buscar_cotizaciones(self, query: str, page: int = 1, per_page: int = 20,
@@ -967,23 +1475,23 @@ class SupabaseManager:
                 try:
                     return self._buscar_cotizaciones_supabase(query, page, per_page, company_id)
                 except Exception as pg_error:
-                    print(f"[POSTGRES] Error en búsqueda: {safe_str(pg_error)}")
-                    print("[POSTGRES] Intentando fallback a SDK REST...")
+                    logger.error("[POSTGRES] Error en búsqueda: %s", safe_str(pg_error))
+                    logger.warning("[POSTGRES] Intentando fallback a SDK REST...")
 
             # 2. Fallback a SDK REST (estable)
             if self.supabase_client:
                 try:
                     return self._buscar_cotizaciones_sdk(query, page, per_page, company_id)
                 except Exception as sdk_error:
-                    print(f"[SDK_REST] Error en búsqueda: {safe_str(sdk_error)}")
-                    print("[SDK_REST] Fallback a modo offline")
+                    logger.error("[SDK_REST] Error en búsqueda: %s", safe_str(sdk_error))
+                    logger.warning("[SDK_REST] Fallback a modo offline")
 
             # 3. Último recurso: JSON offline
             return self._buscar_cotizaciones_offline(query, page, per_page, company_id)
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[BUSCAR] Error general: {error_msg}")
+            logger.error("[BUSCAR] Error general: %s", error_msg)
             return {"error": error_msg}
     
     def _buscar_cotizaciones_sdk(self, query: str, page: int, per_page: int,
@@ -1037,13 +1545,14 @@ class SupabaseManager:
                     "fechaCreacion": row['fecha_creacion'],
                     "timestamp": row['timestamp'],
                     "usuario": row['usuario'],
-                    "observaciones": row['observaciones']
+                    "observaciones": row['observaciones'],
+                    "company_id": str(row['company_id']) if row.get('company_id') else None
                 }
                 cotizaciones.append(cotizacion)
             
             total_pages = (total + per_page - 1) // per_page
             
-            print(f"[SDK_REST] Encontradas {len(cotizaciones)} de {total} cotizaciones")
+            logger.info("[SDK_REST] Encontradas %s de %s cotizaciones", len(cotizaciones), total)
             
             return {
                 "resultados": cotizaciones,
@@ -1056,7 +1565,7 @@ class SupabaseManager:
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[SDK_REST] Error en búsqueda: {error_msg}")
+            logger.error("[SDK_REST] Error en búsqueda: %s", error_msg)
             raise e
 
     def _buscar_cotizaciones_supabase(self, query: str, page: int, per_page: int,
@@ -1077,7 +1586,7 @@ class SupabaseManager:
                 count_query = f"SELECT COUNT(*) as total FROM cotizaciones WHERE 1=1{company_filter};"
                 search_query = f"""
                     SELECT id, numero_cotizacion, datos_generales, items,
-                           revision, fecha_creacion, timestamp, usuario, observaciones
+                           revision, fecha_creacion, timestamp, usuario, observaciones, company_id
                     FROM cotizaciones WHERE 1=1{company_filter}
                     ORDER BY fecha_creacion DESC
                     LIMIT %s OFFSET %s;
@@ -1101,7 +1610,7 @@ class SupabaseManager:
                 """
                 search_query = f"""
                     SELECT id, numero_cotizacion, datos_generales, items,
-                           revision, fecha_creacion, timestamp, usuario, observaciones
+                           revision, fecha_creacion, timestamp, usuario, observaciones, company_id
                     FROM cotizaciones
                     WHERE {search_conditions}{company_filter}
                     ORDER BY fecha_creacion DESC
@@ -1130,7 +1639,8 @@ class SupabaseManager:
                     "fechaCreacion": row['fecha_creacion'].isoformat() if row['fecha_creacion'] else None,
                     "timestamp": row['timestamp'],
                     "usuario": row['usuario'],
-                    "observaciones": row['observaciones']
+                    "observaciones": row['observaciones'],
+                    "company_id": str(row['company_id']) if row.get('company_id') else None
                 }
                 cotizaciones.append(cotizacion)
             
@@ -1138,7 +1648,7 @@ class SupabaseManager:
             
             total_pages = (total + per_page - 1) // per_page
             
-            print(f"[SUPABASE] Encontradas {len(cotizaciones)} de {total} cotizaciones")
+            logger.info("[SUPABASE] Encontradas %s de %s cotizaciones", len(cotizaciones), total)
             
             return {
                 "resultados": cotizaciones,
@@ -1151,27 +1661,28 @@ class SupabaseManager:
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[SUPABASE] Error en búsqueda: {error_msg}")
+            logger.error("[SUPABASE] Error en búsqueda: %s", error_msg)
             raise e
     
     def _buscar_cotizaciones_offline(self, query: str, page: int, per_page: int,
                                       company_id: str = None) -> Dict:
         """Buscar cotizaciones en JSON offline"""
         try:
-            print(f"[OFFLINE] Iniciando busqueda offline con query: '{query}'")
+            logger.info("[OFFLINE] Iniciando busqueda offline con query: '%s'", query)
             data = self._cargar_datos_offline()
             cotizaciones = data.get("cotizaciones", [])
-            print(f"[OFFLINE] Cargadas {len(cotizaciones)} cotizaciones del JSON")
+            logger.info("[OFFLINE] Cargadas %s cotizaciones del JSON", len(cotizaciones))
             
             if len(cotizaciones) > 0:
-                print(f"[OFFLINE] Primera cotizacion: {list(cotizaciones[0].keys())}")
+                logger.info("[OFFLINE] Primera cotizacion: %s", list(cotizaciones[0].keys()))
                 if 'datosGenerales' in cotizaciones[0]:
                     dg = cotizaciones[0]['datosGenerales']
-                    print(f"[OFFLINE] datosGenerales: {list(dg.keys())}")
-                    print(f"[OFFLINE] Cliente: '{dg.get('cliente', 'N/A')}'")
-                    print(f"[OFFLINE] numeroCotizacion (root): '{cotizaciones[0].get('numeroCotizacion', 'N/A')}'")
+                    logger.info("[OFFLINE] datosGenerales: %s", list(dg.keys()))
+                    logger.info("[OFFLINE] Cliente: '%s'", dg.get('cliente', 'N/A'))
+                    logger.info("[OFFLINE] numeroCotizacion (root): '%s'",
+                                cotizaciones[0].get('numeroCotizacion', 'N/A'))
                 else:
-                    print(f"[OFFLINE] No hay datosGenerales en primera cotizacion")
+                    logger.info("[OFFLINE] No hay datosGenerales en primera cotizacion")
             
             # Filtrar por company_id primero
             if company_id:
@@ -1180,7 +1691,7 @@ class SupabaseManager:
                     c for c in cotizaciones
                     if c.get("company_id") == company_id
                 ]
-                print(f"[OFFLINE] Filtro company_id: {antes} → {len(cotizaciones)}")
+                logger.info("[OFFLINE] Filtro company_id: %s → %s", antes, len(cotizaciones))
 
             if not query:
                 resultados = cotizaciones
@@ -1212,7 +1723,7 @@ class SupabaseManager:
             
             total_pages = (total + per_page - 1) // per_page
             
-            print(f"[OFFLINE] Encontradas {len(resultados_pagina)} de {total} cotizaciones")
+            logger.info("[OFFLINE] Encontradas %s de %s cotizaciones", len(resultados_pagina), total)
             
             return {
                 "resultados": resultados_pagina,
@@ -1225,9 +1736,580 @@ class SupabaseManager:
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[OFFLINE] Error en búsqueda: {error_msg}")
+            logger.error("[OFFLINE] Error en búsqueda: %s", error_msg)
             return {"error": error_msg}
     
+    def iterar_cotizaciones(self, company_id: str = None, desde: str = None,
+                            hasta: str = None, tamano_lote: int = 500):
+        """
+        Generador de cotizaciones para exportaciones masivas (memoria constante).
+
+        - PostgreSQL: cursor con nombre (server-side) en una conexión dedicada,
+          trae filas en lotes de `tamano_lote` sin materializar el resultado
+        - SDK REST: paginación por llave (id > último) en lotes
+        - Offline: recorre el JSON local filtrando al vuelo
+
+        Args:
+            company_id: Filtrar por compañía
+            desde, hasta: Rango inclusivo de fecha de creación (YYYY-MM-DD)
+        """
+        if self.postgresql_disponible and self.database_url:
+            try:
+                conexion = psycopg2.connect(
+                    self.database_url,
+                    cursor_factory=CursorTrazado,
+                    connect_timeout=10,
+                    application_name="CWS_Cotizador_Export"
+                )
+            except Exception as pg_error:
+                logger.warning("[EXPORT] PostgreSQL no disponible: %s", safe_str(pg_error))
+            else:
+                yield from self._iterar_cotizaciones_supabase(conexion, company_id, desde, hasta, tamano_lote)
+                return
+
+        if self.supabase_client:
+            yield from self._iterar_cotizaciones_sdk(company_id, desde, hasta, tamano_lote)
+            return
+
+        yield from self._iterar_cotizaciones_offline(company_id, desde, hasta)
+
+    def _iterar_cotizaciones_supabase(self, conexion, company_id, desde, hasta, tamano_lote):
+        condiciones = ["1=1"]
+        params = []
+        if company_id:
+            condiciones.append("company_id = %s")
+            params.append(company_id)
+        if desde:
+            condiciones.append("fecha_creacion >= %s::date")
+            params.append(desde)
+        if hasta:
+            condiciones.append("fecha_creacion < %s::date + 1")
+            params.append(hasta)
+
+        try:
+            if company_id:
+                # Conexión dedicada: fijar el contexto de compañía para que aplique RLS
+                contexto = conexion.cursor()
+                contexto.execute("SELECT set_config('app.current_company_id', %s, false)", (str(company_id),))
+                contexto.close()
+            cursor = conexion.cursor(name="export_cotizaciones")
+            cursor.itersize = tamano_lote
+            cursor.execute(f"""
+                SELECT id, numero_cotizacion, datos_generales, items, revision,
+                       fecha_creacion, timestamp, usuario, observaciones, company_id
+                FROM cotizaciones
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY fecha_creacion, id;
+            """, params)
+            for row in cursor:
+                yield {
+                    "_id": str(row['id']),
+                    "numeroCotizacion": row['numero_cotizacion'],
+                    "datosGenerales": row['datos_generales'],
+                    "items": row['items'],
+                    "revision": row['revision'],
+                    "fechaCreacion": row['fecha_creacion'].isoformat() if row['fecha_creacion'] else None,
+                    "timestamp": row['timestamp'],
+                    "usuario": row['usuario'],
+                    "observaciones": row['observaciones'],
+                    "company_id": str(row['company_id']) if row.get('company_id') else None
+                }
+            cursor.close()
+        finally:
+            conexion.close()
+
+    def _iterar_cotizaciones_sdk(self, company_id, desde, hasta, tamano_lote):
+        ultimo_id = None
+        while True:
+            query = self.supabase_client.table('cotizaciones').select('*')
+            if company_id:
+                query = query.eq('company_id', company_id)
+            if desde:
+                query = query.gte('fecha_creacion', desde)
+            if hasta:
+                query = query.lte('fecha_creacion', f"{hasta}T23:59:59.999999")
+            if ultimo_id is not None:
+                query = query.gt('id', ultimo_id)
+            filas = query.order('id').limit(tamano_lote).execute().data or []
+
+            for row in filas:
+                yield {
+                    "_id": str(row['id']),
+                    "numeroCotizacion": row['numero_cotizacion'],
+                    "datosGenerales": row['datos_generales'],
+                    "items": row['items'],
+                    "revision": row['revision'],
+                    "fechaCreacion": row['fecha_creacion'],
+                    "timestamp": row['timestamp'],
+                    "usuario": row['usuario'],
+                    "observaciones": row['observaciones'],
+                    "company_id": row.get('company_id')
+                }
+            if len(filas) < tamano_lote:
+                return
+            ultimo_id = filas[-1]['id']
+
+    def _iterar_cotizaciones_offline(self, company_id, desde, hasta):
+        for cot in self._cargar_datos_offline().get("cotizaciones", []):
+            if company_id and cot.get("company_id") != company_id:
+                continue
+            fecha = safe_str(cot.get("fechaCreacion"))[:10]
+            if (desde and fecha < desde) or (hasta and fecha > hasta):
+                continue
+            yield cot
+
+    def actualizar_items_lote(self, cambios: Dict[str, List[Dict]],
+                              datos_generales: Dict[str, Dict] = None) -> Dict:
+        """
+        Reemplaza los items (y opcionalmente datosGenerales) de varias
+        cotizaciones en una sola operación por capa. Usado por reparaciones y
+        migraciones masivas (auditoría financiera, normalización numérica).
+
+        Args:
+            cambios: {numero_cotizacion: items}
+            datos_generales: {numero_cotizacion: datosGenerales} (condiciones
+                             embebidas, igual que en la columna datos_generales)
+
+        Returns:
+            Dict con success, actualizadas y modo
+        """
+        if not cambios:
+            return {"success": True, "actualizadas": 0, "modo": "sin_cambios"}
+
+        datos_generales = datos_generales or {}
+        actualizadas = 0
+        modo = "offline"
+        columna_hash = self._columna_hash_disponible()
+        faltantes = [numero for numero in cambios if numero not in datos_generales]
+
+        def _hashes(dg_actuales: Dict[str, Dict]) -> Dict[str, str]:
+            # El hash cubre datos_generales: sin uno nuevo se usa el actual de la fila
+            return {
+                numero: hash_contenido({'numeroCotizacion': numero, 'items': items,
+                                        'datosGenerales': datos_generales.get(numero, dg_actuales.get(numero))})
+                for numero, items in cambios.items()
+            }
+
+        # 1. PostgreSQL directo: un UPDATE ... FROM (VALUES ...) por lote
+        if self.postgresql_disponible and self.pg_connection:
+            try:
+                cursor = self.pg_connection.cursor()
+                hashes = {}
+                if columna_hash:
+                    dg_actuales = {}
+                    if faltantes:
+                        cursor.execute("SELECT numero_cotizacion, datos_generales FROM cotizaciones "
+                                       "WHERE numero_cotizacion = ANY(%s);", (faltantes,))
+                        dg_actuales = {f['numero_cotizacion']: f['datos_generales'] for f in cursor.fetchall()}
+                    hashes = _hashes(dg_actuales)
+                filas = [
+                    (numero, Json(items),
+                     Json(datos_generales[numero]) if numero in datos_generales else None)
+                    + ((hashes[numero],) if columna_hash else ())
+                    for numero, items in cambios.items()
+                ]
+                execute_values(cursor, f"""
+                    UPDATE cotizaciones AS c
+                    SET items = v.items::jsonb,
+                        datos_generales = COALESCE(v.datos_generales::jsonb, c.datos_generales),
+                        {'hash_contenido = v.hash_contenido,' if columna_hash else ''}
+                        updated_at = NOW()
+                    FROM (VALUES %s) AS v(numero_cotizacion, items, datos_generales{', hash_contenido' if columna_hash else ''})
+                    WHERE c.numero_cotizacion = v.numero_cotizacion
+                """, filas, page_size=500)
+                actualizadas = cursor.rowcount
+                self.pg_connection.commit()
+                cursor.close()
+                modo = "online"
+            except Exception as pg_error:
+                logger.error("[LOTE] PostgreSQL falló: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+
+        # 2. SDK REST: no admite UPDATE con valores distintos por fila
+        if modo == "offline" and self.supabase_client:
+            try:
+                hashes = {}
+                if columna_hash:
+                    dg_actuales = {}
+                    if faltantes:
+                        filas = self.supabase_client.table('cotizaciones').select(
+                            'numero_cotizacion,datos_generales').in_('numero_cotizacion', faltantes).execute().data or []
+                        dg_actuales = {f['numero_cotizacion']: f['datos_generales'] for f in filas}
+                    hashes = _hashes(dg_actuales)
+                for numero, items in cambios.items():
+                    valores = {'items': items}
+                    if numero in datos_generales:
+                        valores['datos_generales'] = datos_generales[numero]
+                    if numero in hashes:
+                        valores['hash_contenido'] = hashes[numero]
+                    self.supabase_client.table('cotizaciones').update(
+                        valores
+                    ).eq('numero_cotizacion', numero).execute()
+                    actualizadas += 1
+                modo = "sdk_rest"
+            except Exception as sdk_error:
+                logger.error("[LOTE] SDK REST falló: %s", safe_str(sdk_error))
+
+        # 3. JSON offline: siempre se mantiene como respaldo (una sola escritura)
+        data = self._cargar_datos_offline()
+        actualizadas_offline = 0
+        for cot in data.get("cotizaciones", []):
+            numero = cot.get("numeroCotizacion")
+            items = cambios.get(numero)
+            if items is None:
+                continue
+            cot["items"] = items
+            dg = datos_generales.get(numero)
+            if dg is not None:
+                if "condiciones" in cot and isinstance(dg.get("condiciones"), dict):
+                    cot["condiciones"] = dg["condiciones"]
+                cot["datosGenerales"] = dg
+            actualizadas_offline += 1
+        if actualizadas_offline:
+            self._guardar_datos_offline(data)
+        if modo == "offline":
+            actualizadas = actualizadas_offline
+
+        logger.info("[LOTE] %s cotizaciones actualizadas (%s)", actualizadas, modo)
+        return {"success": True, "actualizadas": actualizadas, "modo": modo}
+
+    # ========================================
+    # PROYECCIÓN DE PARTIDAS Y MATERIALES
+    # ========================================
+    # Tablas cotizacion_items / cotizacion_materiales (ver
+    # migrations/v2.4_cotizacion_items.sql y quote_items.py)
+
+    _COLUMNAS_USO_MATERIAL = ('company_id, numero_cotizacion, fecha_creacion, cliente, vendedor, moneda, partida, '
+                              'tipo, descripcion, descripcion_normalizada, peso, cantidad, precio, '
+                              'subtotal, kg, precio_kg')
+
+    def cotizaciones_por_material(self, material: str, company_id: str,
+                                  dias: int = 90, limite: int = 200) -> Dict:
+        """
+        Usos de un material en cotizaciones recientes (más reciente primero).
+        company_id es obligatorio: nunca se consultan usos de todas las compañías.
+
+        Compara la descripción normalizada (sin acentos ni mayúsculas), así que
+        "Lámina cal 14" encuentra "LAMINA CAL 14". En PostgreSQL es una lectura
+        del índice (company_id, descripcion_normalizada, fecha_creacion).
+        """
+        from quote_items import formatear_uso
+        from materials_catalog import normalizar_texto
+
+        if not company_id:
+            raise ValueError("company_id es obligatorio")
+        clave = normalizar_texto(material)
+        if not clave:
+            return {"material": material, "usos": [], "fuente": None}
+
+        # 1. PostgreSQL directo
+        if self.postgresql_disponible and self.pg_connection:
+            try:
+                filas = self._consultar_materiales_supabase(clave, company_id, dias, limite)
+                return {"material": material, "usos": [formatear_uso(f) for f in filas],
+                        "fuente": "Supabase PostgreSQL"}
+            except Exception as pg_error:
+                logger.warning("[MATERIALES] Proyección PostgreSQL no disponible: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+
+        # 2. SDK REST
+        if self.supabase_client:
+            try:
+                filas = self._consultar_materiales_sdk(clave, company_id, dias, limite)
+                return {"material": material, "usos": [formatear_uso(f) for f in filas],
+                        "fuente": "Supabase SDK REST"}
+            except Exception as sdk_error:
+                logger.warning("[MATERIALES] Proyección SDK no disponible: %s", safe_str(sdk_error))
+
+        # 3. JSON offline
+        filas = [f for f in self._proyeccion_materiales_offline(company_id, dias)
+                 if f['descripcion_normalizada'] == clave]
+        filas.sort(key=lambda f: safe_str(f.get('fecha_creacion')), reverse=True)
+        return {"material": material, "usos": [formatear_uso(f) for f in filas[:limite]],
+                "fuente": "JSON local"}
+
+    def estadisticas_materiales(self, company_id: str, dias: int = None,
+                                material: str = None, limite: int = 50) -> Dict:
+        """
+        Estadísticas por material y moneda de una compañía (obligatoria): usos,
+        cotizaciones, kg totales, $/kg promedio ponderado por kg, precio
+        promedio/mín/máx y último uso.
+
+        Args:
+            dias: Solo cotizaciones de los últimos N días (None = todas)
+            material: Solo este material (descripción, comparación normalizada)
+        """
+        from quote_items import agregar_por_material, formatear_estadistica
+        from materials_catalog import normalizar_texto
+
+        if not company_id:
+            raise ValueError("company_id es obligatorio")
+        clave = normalizar_texto(material) if material else None
+
+        # 1. PostgreSQL directo (agregado en la base)
+        if self.postgresql_disponible and self.pg_connection:
+            try:
+                filas = self._agregar_materiales_supabase(company_id, dias, clave, limite)
+                return {"materiales": [formatear_estadistica(f) for f in filas],
+                        "fuente": "Supabase PostgreSQL"}
+            except Exception as pg_error:
+                logger.warning("[MATERIALES] Agregado PostgreSQL no disponible: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+
+        # 2. SDK REST (filas filtradas por índice, agregadas aquí)
+        if self.supabase_client:
+            try:
+                filas = self._consultar_materiales_sdk(clave, company_id, dias, None)
+                return {"materiales": agregar_por_material(filas, limite), "fuente": "Supabase SDK REST"}
+            except Exception as sdk_error:
+                logger.warning("[MATERIALES] Proyección SDK no disponible: %s", safe_str(sdk_error))
+
+        # 3. JSON offline
+        filas = self._proyeccion_materiales_offline(company_id, dias)
+        if clave:
+            filas = [f for f in filas if f['descripcion_normalizada'] == clave]
+        return {"materiales": agregar_por_material(filas, limite), "fuente": "JSON local"}
+
+    def historial_precios(self, company_id: str = None, dias: int = 365) -> List[Dict]:
+        """
+        Precios capturados por material (más antiguo primero), para precargar
+        price_history.PriceHistory. Lee la proyección cotizacion_materiales.
+        """
+        # 1. PostgreSQL directo
+        if self.postgresql_disponible and self.pg_connection:
+            condiciones = ["precio > 0"]
+            params = []
+            if company_id:
+                condiciones.append("company_id = %s")
+                params.append(company_id)
+            if dias:
+                condiciones.append("fecha_creacion >= NOW() - make_interval(days => %s)")
+                params.append(int(dias))
+            cursor = self.pg_connection.cursor()
+            try:
+                cursor.execute(f"""
+                    SELECT {self._COLUMNAS_USO_MATERIAL}
+                    FROM cotizacion_materiales
+                    WHERE {' AND '.join(condiciones)}
+                    ORDER BY fecha_creacion, numero_cotizacion;
+                """, params)
+                return cursor.fetchall()
+            except Exception as pg_error:
+                logger.warning("[PRECIOS] Historial PostgreSQL no disponible: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+            finally:
+                cursor.close()
+
+        # 2. SDK REST
+        if self.supabase_client:
+            try:
+                filas = self._consultar_materiales_sdk(None, company_id, dias)
+                return [f for f in reversed(filas) if (f.get('precio') or 0) > 0]
+            except Exception as sdk_error:
+                logger.warning("[PRECIOS] Historial SDK no disponible: %s", safe_str(sdk_error))
+
+        # 3. JSON offline
+        filas = [f for f in self._proyeccion_materiales_offline(company_id, dias) if (f.get('precio') or 0) > 0]
+        filas.sort(key=lambda f: safe_str(f.get('fecha_creacion')))
+        return filas
+
+    def reconstruir_proyeccion_items(self) -> Dict:
+        """Backfill completo de cotizacion_items / cotizacion_materiales"""
+        if self.postgresql_disponible and self.pg_connection:
+            cursor = self.pg_connection.cursor()
+            try:
+                cursor.execute("SELECT recalcular_cotizacion_items() AS total;")
+                total = cursor.fetchone()['total']
+                self.pg_connection.commit()
+                logger.info("[MATERIALES] Proyección reconstruida: %s cotizaciones", total)
+                return {"success": True, "cotizaciones": total, "modo": "postgresql"}
+            except Exception as pg_error:
+                logger.error("[MATERIALES] Error reconstruyendo proyección: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+            finally:
+                cursor.close()
+
+        if self.supabase_client:
+            try:
+                total = self.supabase_client.rpc('recalcular_cotizacion_items', {}).execute().data
+                return {"success": True, "cotizaciones": total, "modo": "sdk"}
+            except Exception as sdk_error:
+                logger.error("[MATERIALES] Error reconstruyendo proyección (SDK): %s", safe_str(sdk_error))
+
+        # Offline la proyección se deriva del JSON: basta invalidar el cache
+        self._cache_proyeccion_offline = None
+        total = len(self._cargar_datos_offline().get("cotizaciones", []))
+        return {"success": True, "cotizaciones": total, "modo": "offline"}
+
+    def _consultar_materiales_supabase(self, clave: str, company_id: str, dias: int, limite: int) -> List[Dict]:
+        """Usos de un material vía PostgreSQL directo (siempre filtrado por compañía)"""
+        if not company_id:
+            raise ValueError("company_id es obligatorio")
+        condiciones = ["company_id = %s", "descripcion_normalizada = %s"]
+        params = [company_id, clave]
+        if dias:
+            condiciones.append("fecha_creacion >= NOW() - make_interval(days => %s)")
+            params.append(int(dias))
+        params.append(limite)
+
+        cursor = self.pg_connection.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT {self._COLUMNAS_USO_MATERIAL}
+                FROM cotizacion_materiales
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY fecha_creacion DESC
+                LIMIT %s;
+            """, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _agregar_materiales_supabase(self, company_id: str, dias: int, clave: str, limite: int) -> List[Dict]:
+        """Estadísticas por material calculadas en PostgreSQL (siempre filtradas por compañía)"""
+        if not company_id:
+            raise ValueError("company_id es obligatorio")
+        condiciones = ["company_id = %s"]
+        params = [company_id]
+        if clave:
+            condiciones.append("descripcion_normalizada = %s")
+            params.append(clave)
+        if dias:
+            condiciones.append("fecha_creacion >= NOW() - make_interval(days => %s)")
+            params.append(int(dias))
+        params.append(limite)
+
+        cursor = self.pg_connection.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT descripcion_normalizada, moneda,
+                       (array_agg(descripcion ORDER BY fecha_creacion DESC NULLS LAST))[1] AS descripcion,
+                       COUNT(*) AS usos,
+                       COUNT(DISTINCT numero_cotizacion) AS cotizaciones,
+                       COALESCE(SUM(kg), 0) AS kg_total,
+                       COALESCE(SUM(subtotal), 0) AS monto_total,
+                       AVG(precio) AS precio_promedio,
+                       SUM(precio_kg * kg) FILTER (WHERE kg > 0 AND precio_kg IS NOT NULL)
+                           / NULLIF(SUM(kg) FILTER (WHERE kg > 0 AND precio_kg IS NOT NULL), 0)
+                           AS precio_kg_promedio,
+                       MIN(precio) AS precio_min,
+                       MAX(precio) AS precio_max,
+                       MAX(fecha_creacion) AS ultimo_uso
+                FROM cotizacion_materiales
+                WHERE {' AND '.join(condiciones)}
+                GROUP BY descripcion_normalizada, moneda
+                ORDER BY usos DESC, descripcion_normalizada
+                LIMIT %s;
+            """, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _consultar_materiales_sdk(self, clave: str, company_id: str, dias: int, limite: int = None,
+                                  tamano_pagina: int = 1000) -> List[Dict]:
+        """Filas de cotizacion_materiales vía SDK REST, paginadas"""
+        filas = []
+        while True:
+            query = self.supabase_client.table('cotizacion_materiales').select(self._COLUMNAS_USO_MATERIAL)
+            if clave:
+                query = query.eq('descripcion_normalizada', clave)
+            if company_id:
+                query = query.eq('company_id', company_id)
+            if dias:
+                query = query.gte('fecha_creacion', (datetime.now() - timedelta(days=dias)).isoformat())
+            pagina = min(tamano_pagina, limite - len(filas)) if limite else tamano_pagina
+            lote = query.order('fecha_creacion', desc=True).range(len(filas), len(filas) + pagina - 1).execute().data or []
+            filas.extend(lote)
+            if len(lote) < pagina or (limite and len(filas) >= limite):
+                return filas
+
+    def _proyeccion_materiales_offline(self, company_id: str = None, dias: int = None) -> List[Dict]:
+        """Filas de cotizacion_materiales derivadas del JSON offline, cacheadas por mtime"""
+        from quote_items import proyectar_cotizaciones
+
+        try:
+            mtime = os.path.getmtime(self.archivo_offline)
+        except OSError:
+            mtime = None
+
+        cache = getattr(self, '_cache_proyeccion_offline', None)
+        clave_cache = (self.archivo_offline, mtime)
+        if not cache or cache[0] != clave_cache:
+            cotizaciones = self._cargar_datos_offline().get("cotizaciones", [])
+            cache = (clave_cache, proyectar_cotizaciones(cotizaciones))
+            self._cache_proyeccion_offline = cache
+
+        filas = cache[1]
+        if company_id:
+            filas = [f for f in filas if f.get('company_id') == company_id]
+        if dias:
+            corte = (datetime.now() - timedelta(days=dias)).isoformat()
+            filas = [f for f in filas if safe_str(f.get('fecha_creacion')) >= corte]
+        return filas
+
+    def companias_de_cotizaciones(self, numeros: List[str], tamano_lote: int = 500) -> Dict[str, str]:
+        """
+        company_id de cada número de cotización (en lote). Los números sin
+        cotización registrada no aparecen en el resultado.
+        """
+        pendientes = sorted({n for n in numeros if n})
+        companias: Dict[str, str] = {}
+        if not pendientes:
+            return companias
+
+        # 1. PostgreSQL directo
+        if self.postgresql_disponible and self.pg_connection:
+            try:
+                cursor = self.pg_connection.cursor()
+                for i in range(0, len(pendientes), tamano_lote):
+                    cursor.execute(
+                        "SELECT numero_cotizacion, company_id FROM cotizaciones "
+                        "WHERE numero_cotizacion = ANY(%s) AND company_id IS NOT NULL",
+                        (pendientes[i:i + tamano_lote],))
+                    companias.update({row['numero_cotizacion']: str(row['company_id']) for row in cursor.fetchall()})
+                cursor.close()
+            except Exception as pg_error:
+                logger.warning("[PDF_INDEX] Compañías PostgreSQL no disponibles: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+        # 2. SDK REST
+        elif self.supabase_client:
+            try:
+                for i in range(0, len(pendientes), tamano_lote):
+                    response = self.supabase_client.table('cotizaciones') \
+                        .select('numero_cotizacion,company_id') \
+                        .in_('numero_cotizacion', pendientes[i:i + tamano_lote]).execute()
+                    companias.update({row['numero_cotizacion']: str(row['company_id'])
+                                      for row in response.data or [] if row.get('company_id')})
+            except Exception as sdk_error:
+                logger.warning("[PDF_INDEX] Compañías SDK no disponibles: %s", safe_str(sdk_error))
+
+        # 3. JSON offline (cotizaciones aún sin sincronizar)
+        faltantes = set(pendientes) - set(companias)
+        if faltantes:
+            for cotizacion in self._cargar_datos_offline().get("cotizaciones", []):
+                numero = cotizacion.get('numeroCotizacion') or cotizacion.get('numero_cotizacion')
+                if numero in faltantes and cotizacion.get('company_id'):
+                    companias[numero] = str(cotizacion['company_id'])
+        return companias
+
     def obtener_cotizacion(self, numero_cotizacion: str) -> Dict:
         """
         Obtener cotización específica por número.
@@ -1242,7 +2324,8 @@ class SupabaseManager:
 
         # === Fallback: si el ID es numérico, buscar por clave primaria ===
         if numero_cotizacion.isdigit():
-            print(f"[HIBRIDO_GET] Búsqueda por numero_cotizacion='{numero_cotizacion}' falló — intentando por id...")
+            logger.warning("[HIBRIDO_GET] Búsqueda por numero_cotizacion='%s' falló — intentando por id...",
+                           numero_cotizacion)
             resultado_por_id = self._buscar_cotizacion_en_capas(numero_cotizacion, columna='id')
             if resultado_por_id.get('encontrado'):
                 return resultado_por_id
@@ -1255,32 +2338,32 @@ class SupabaseManager:
             # 1. PRIORIDAD: SDK REST de Supabase
             if self.supabase_client:
                 try:
-                    print(f"[HIBRIDO_GET] PRIORIDAD 1: SDK REST buscando por {columna}='{valor}'...")
+                    logger.info("[HIBRIDO_GET] PRIORIDAD 1: SDK REST buscando por %s='%s'...", columna, valor)
                     resultado = self._obtener_cotizacion_sdk(valor, columna=columna)
                     if resultado.get('encontrado'):
                         return resultado
-                    print(f"[HIBRIDO_GET] SDK REST no encontró (columna={columna}), intentando PostgreSQL...")
+                    logger.info("[HIBRIDO_GET] SDK REST no encontró (columna=%s), intentando PostgreSQL...", columna)
                 except Exception as sdk_error:
-                    print(f"[SDK_REST] Error: {safe_str(sdk_error)} — intentando PostgreSQL...")
+                    logger.warning("[SDK_REST] Error: %s — intentando PostgreSQL...", safe_str(sdk_error))
 
             # 2. FALLBACK: PostgreSQL directo
             if self.postgresql_disponible:
                 try:
-                    print(f"[HIBRIDO_GET] FALLBACK: PostgreSQL buscando por {columna}='{valor}'...")
+                    logger.warning("[HIBRIDO_GET] FALLBACK: PostgreSQL buscando por %s='%s'...", columna, valor)
                     resultado = self._obtener_cotizacion_supabase(valor, columna=columna)
                     if resultado.get('encontrado'):
                         return resultado
-                    print(f"[HIBRIDO_GET] PostgreSQL no encontró (columna={columna}), intentando offline...")
+                    logger.info("[HIBRIDO_GET] PostgreSQL no encontró (columna=%s), intentando offline...", columna)
                 except Exception as pg_error:
-                    print(f"[POSTGRES] Error: {safe_str(pg_error)} — intentando offline...")
+                    logger.warning("[POSTGRES] Error: %s — intentando offline...", safe_str(pg_error))
 
             # 3. ÚLTIMO RECURSO: JSON offline
-            print(f"[HIBRIDO_GET] ÚLTIMO RECURSO: Offline buscando por {columna}='{valor}'...")
+            logger.info("[HIBRIDO_GET] ÚLTIMO RECURSO: Offline buscando por %s='%s'...", columna, valor)
             return self._obtener_cotizacion_offline(valor, columna=columna)
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[OBTENER] Error general: {error_msg}")
+            logger.error("[OBTENER] Error general: %s", error_msg)
             return {"error": error_msg, "encontrado": False}
     
     def _obtener_cotizacion_sdk(self, numero_cotizacion: str, columna: str = 'numero_cotizacion') -> Dict:
@@ -1331,12 +2414,12 @@ class SupabaseManager:
                 "observaciones": row['observaciones']
             }
 
-            print(f"[SDK_REST] Cotización obtenida: {numero_cotizacion}")
+            logger.info("[SDK_REST] Cotización obtenida: %s", numero_cotizacion)
             return {"encontrado": True, "item": cotizacion}
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[SDK_REST] Error obteniendo cotización: {error_msg}")
+            logger.error("[SDK_REST] Error obteniendo cotización: %s", error_msg)
             raise e
 
     def _obtener_cotizacion_supabase(self, numero_cotizacion: str, columna: str = 'numero_cotizacion') -> Dict:
@@ -1402,7 +2485,7 @@ class SupabaseManager:
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[SUPABASE] Error obteniendo cotización: {error_msg}")
+            logger.error("[SUPABASE] Error obteniendo cotización: %s", error_msg)
             raise e
     
     def _obtener_cotizacion_offline(self, numero_cotizacion: str, columna: str = 'numero_cotizacion') -> Dict:
@@ -1441,7 +2524,7 @@ class SupabaseManager:
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[OFFLINE] Error obteniendo cotización: {error_msg}")
+            logger.error("[OFFLINE] Error obteniendo cotización: %s", error_msg)
             return {"error": error_msg, "encontrado": False}
     
     def obtener_todas_cotizaciones(self, page: int = 1, per_page: int = 20) -> Dict:
@@ -1457,7 +2540,7 @@ class SupabaseManager:
         Formato: CLIENTE-CWS-VENDEDOR-###-R#-PROYECTO
         """
         try:
-            print(f"[NUMERO] Datos generales recibidos: {datos_generales}")
+            logger.info("[NUMERO] Datos generales recibidos: %s", datos_generales)
             
             # Obtener valores con fallbacks robustos
             cliente = safe_str(datos_generales.get('cliente', 'CLIENTE'))
@@ -1477,7 +2560,8 @@ class SupabaseManager:
             vendedor = unicodedata.normalize('NFKD', vendedor).encode('ASCII', 'ignore').decode('ASCII').upper()
             proyecto = unicodedata.normalize('NFKD', proyecto).encode('ASCII', 'ignore').decode('ASCII').upper()
 
-            print(f"[NUMERO] Valores procesados - Cliente: '{cliente}', Vendedor: '{vendedor}', Proyecto: '{proyecto}'")
+            logger.info("[NUMERO] Valores procesados - Cliente: '%s', Vendedor: '%s', Proyecto: '%s'",
+                        cliente, vendedor, proyecto)
 
             # Limpiar caracteres especiales
             cliente = re.sub(r'[^A-Z0-9]', '-', cliente)[:10]
@@ -1489,17 +2573,18 @@ class SupabaseManager:
             # Limpiar espacios múltiples y recortar
             proyecto = ' '.join(proyecto.split())[:50]
             
-            print(f"[NUMERO] Valores limpiados - Cliente: '{cliente}', Vendedor: '{vendedor}', Proyecto: '{proyecto}'")
+            logger.info("[NUMERO] Valores limpiados - Cliente: '%s', Vendedor: '%s', Proyecto: '%s'",
+                        cliente, vendedor, proyecto)
             
             # Contar cotizaciones existentes para este vendedor
             if self.modo_offline:
-                print(f"[NUMERO] Modo offline - generando número para vendedor: {vendedor}")
+                logger.info("[NUMERO] Modo offline - generando número para vendedor: %s", vendedor)
                 data = self._cargar_datos_offline()
                 cotizaciones = data.get("cotizaciones", [])
-                print(f"[NUMERO] Cotizaciones cargadas: {len(cotizaciones)}")
+                logger.info("[NUMERO] Cotizaciones cargadas: %s", len(cotizaciones))
                 count = len([c for c in cotizaciones 
                            if c.get('datosGenerales', {}).get('vendedor', '').upper() == vendedor])
-                print(f"[NUMERO] Count para vendedor {vendedor}: {count}")
+                logger.info("[NUMERO] Count para vendedor %s: %s", vendedor, count)
             else:
                 try:
                     cursor = self.pg_connection.cursor()
@@ -1516,12 +2601,12 @@ class SupabaseManager:
             numero = count + 1
             numero_cotizacion = f"{cliente}-CWS-{vendedor}-{numero:03d}-R1-{proyecto}"
             
-            print(f"[NUMERO] Generado: {numero_cotizacion}")
+            logger.info("[NUMERO] Generado: %s", numero_cotizacion)
             return numero_cotizacion
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[NUMERO] Error generando: {error_msg}")
+            logger.error("[NUMERO] Error generando: %s", error_msg)
             # Fallback simple
             timestamp = int(time.time())
             return f"CWS-AUTO-{timestamp}-R1"
@@ -1534,7 +2619,8 @@ class SupabaseManager:
         Con numeración consecutiva irrepetible usando PostgreSQL atomic operations
         """
         try:
-            print(f"[NUMERO_COTIZACION] Generando para: Cliente='{cliente}', Vendedor='{vendedor}', Proyecto='{proyecto}', Revision={revision}")
+            logger.info("[NUMERO_COTIZACION] Generando para: Cliente='%s', Vendedor='%s', Proyecto='%s', Revision=%s",
+                        cliente, vendedor, proyecto, revision)
 
             # Normalizar datos de entrada con acentos y espacios
             if cliente:
@@ -1568,7 +2654,8 @@ class SupabaseManager:
             if not iniciales_vendedor:
                 iniciales_vendedor = "XX"
 
-            print(f"[NUMERO_COTIZACION] Normalizados - Cliente: '{cliente}', Iniciales: '{iniciales_vendedor}', Proyecto: '{proyecto}'")
+            logger.info("[NUMERO_COTIZACION] Normalizados - Cliente: '%s', Iniciales: '%s', Proyecto: '%s'",
+                        cliente, iniciales_vendedor, proyecto)
             
             # Generar patrón base para buscar números consecutivos
             patron_base = f"{cliente}-CWS-{iniciales_vendedor}"
@@ -1577,12 +2664,12 @@ class SupabaseManager:
             # Formatear número completo
             numero_cotizacion = f"{cliente}-CWS-{iniciales_vendedor}-{numero_consecutivo:03d}-R{revision}-{proyecto}"
             
-            print(f"[NUMERO_COTIZACION] Generado: {numero_cotizacion}")
+            logger.info("[NUMERO_COTIZACION] Generado: %s", numero_cotizacion)
             return numero_cotizacion
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[NUMERO_COTIZACION] Error generando: {error_msg}")
+            logger.error("[NUMERO_COTIZACION] Error generando: %s", error_msg)
             # Fallback a número único basado en timestamp
             timestamp = int(time.time())
             return f"CWS-{timestamp}-R{revision}"
@@ -1594,7 +2681,8 @@ class SupabaseManager:
         Formato: CLIENTE-CWS-INICIALES-###-R#-PROYECTO
         """
         try:
-            print(f"[NUMERO_REVISION] Original: '{numero_cotizacion_original}', Nueva revisión: {nueva_revision}")
+            logger.info("[NUMERO_REVISION] Original: '%s', Nueva revisión: %s",
+                        numero_cotizacion_original, nueva_revision)
 
             # Caso 1: Formato normal con proyecto al final: CLIENTE-CWS-VE-001-R1-PROYECTO
             patron_con_proyecto = r'-R\d+-'
@@ -1610,7 +2698,7 @@ class SupabaseManager:
 
                 # Generar nuevo número con la nueva revisión
                 nuevo_numero = f"{base}-R{nueva_revision}-{proyecto_parte}"
-                print(f"[NUMERO_REVISION] Generado: {nuevo_numero}")
+                logger.info("[NUMERO_REVISION] Generado: %s", nuevo_numero)
                 return nuevo_numero
 
             # Caso 2: Formato sin proyecto al final: CWS-1234567-R1
@@ -1620,27 +2708,150 @@ class SupabaseManager:
             if match_final:
                 base = numero_cotizacion_original[:match_final.start()]
                 nuevo_numero = f"{base}-R{nueva_revision}"
-                print(f"[NUMERO_REVISION] Generado (sin proyecto): {nuevo_numero}")
+                logger.info("[NUMERO_REVISION] Generado (sin proyecto): %s", nuevo_numero)
                 return nuevo_numero
 
             # Fallback: el número no tiene ningún patrón de revisión reconocido
-            print(f"[NUMERO_REVISION] Formato no reconocido, agregando revisión al final")
+            logger.info("[NUMERO_REVISION] Formato no reconocido, agregando revisión al final")
             nuevo_numero = f"{numero_cotizacion_original}-R{nueva_revision}"
-            print(f"[NUMERO_REVISION] Generado (fallback): {nuevo_numero}")
+            logger.warning("[NUMERO_REVISION] Generado (fallback): %s", nuevo_numero)
             return nuevo_numero
                 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[NUMERO_REVISION] Error generando: {error_msg}")
+            logger.error("[NUMERO_REVISION] Error generando: %s", error_msg)
             return f"{numero_cotizacion_original}-R{nueva_revision}"
-    
+
+    def obtener_familia_revisiones(self, numero_cotizacion: str, company_id: str = None) -> Dict:
+        """
+        Obtiene todas las revisiones de la misma cotización base en una sola
+        consulta indexada (columnas numero_base/revision_numero, ver
+        migrations/v2.2_revision_family.sql).
+
+        Returns:
+            Dict con numero_base, revision_actual, revision_maxima,
+            numero_ultima_revision y revisiones (ordenadas de la más
+            reciente a la más antigua: numero, revision, justificacion, fecha)
+        """
+        componentes = parsear_numero_cotizacion(numero_cotizacion)
+        numero_base = componentes['numero_base']
+        revisiones = None
+
+        # 1. PostgreSQL directo (índice idx_cotizaciones_familia)
+        if self.postgresql_disponible and self.pg_connection:
+            try:
+                revisiones = self._obtener_familia_supabase(numero_base, company_id)
+            except Exception as pg_error:
+                logger.error("[FAMILIA] PostgreSQL falló: %s", safe_str(pg_error))
+                try:
+                    self.pg_connection.rollback()
+                except:
+                    pass
+
+        # 2. SDK REST (misma consulta indexada vía PostgREST)
+        if revisiones is None and self.supabase_client:
+            try:
+                revisiones = self._obtener_familia_sdk(numero_base, company_id)
+            except Exception as sdk_error:
+                logger.error("[FAMILIA] SDK REST falló: %s", safe_str(sdk_error))
+
+        # 3. Búsqueda por patrón (esquema sin migrar o modo offline)
+        if revisiones is None:
+            revisiones = self._obtener_familia_por_busqueda(numero_base, company_id)
+
+        revisiones.sort(key=lambda r: r['revision'], reverse=True)
+
+        revision_actual = componentes['revision_numero']
+        revision_maxima = revision_actual
+        numero_ultima_revision = numero_cotizacion
+        if revisiones and revisiones[0]['revision'] > revision_actual:
+            revision_maxima = revisiones[0]['revision']
+            numero_ultima_revision = revisiones[0]['numero']
+
+        return {
+            "numero_base": numero_base,
+            "revision_actual": revision_actual,
+            "revision_maxima": revision_maxima,
+            "numero_ultima_revision": numero_ultima_revision,
+            "revisiones": revisiones
+        }
+
+    def _obtener_familia_supabase(self, numero_base: str, company_id: str = None) -> List[Dict]:
+        """Familia de revisiones vía PostgreSQL directo"""
+        cursor = self.pg_connection.cursor()
+        try:
+            query = """
+                SELECT numero_cotizacion, revision_numero,
+                       datos_generales->>'actualizacionRevision' AS justificacion,
+                       datos_generales->>'fecha' AS fecha,
+                       fecha_creacion
+                FROM cotizaciones
+                WHERE numero_base = %s
+            """
+            params = (numero_base,)
+            if company_id:
+                query += " AND company_id = %s"
+                params += (company_id,)
+            query += " ORDER BY revision_numero DESC;"
+
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        return [{
+            'numero': row['numero_cotizacion'],
+            'revision': row['revision_numero'] or 1,
+            'justificacion': row['justificacion'] or '',
+            'fecha': row['fecha_creacion'].isoformat() if row['fecha_creacion'] else (row['fecha'] or '')
+        } for row in rows]
+
+    def _obtener_familia_sdk(self, numero_base: str, company_id: str = None) -> List[Dict]:
+        """Familia de revisiones vía Supabase SDK REST"""
+        query = self.supabase_client.table('cotizaciones').select(
+            'numero_cotizacion,revision_numero,fecha_creacion,'
+            'justificacion:datos_generales->>actualizacionRevision,'
+            'fecha:datos_generales->>fecha'
+        ).eq('numero_base', numero_base)
+        if company_id:
+            query = query.eq('company_id', company_id)
+        response = query.order('revision_numero', desc=True).execute()
+
+        return [{
+            'numero': row['numero_cotizacion'],
+            'revision': row.get('revision_numero') or 1,
+            'justificacion': row.get('justificacion') or '',
+            'fecha': row.get('fecha_creacion') or row.get('fecha') or ''
+        } for row in (response.data or [])]
+
+    def _obtener_familia_por_busqueda(self, numero_base: str, company_id: str = None) -> List[Dict]:
+        """
+        Familia de revisiones filtrando una búsqueda por patrón.
+        Fallback para bases sin la migración v2.2 y para el JSON offline.
+        """
+        resultado = self.buscar_cotizaciones(numero_base, page=1, per_page=100, company_id=company_id)
+        revisiones = []
+        for item in resultado.get('resultados') or []:
+            numero = item.get('numeroCotizacion', '')
+            componentes = parsear_numero_cotizacion(numero)
+            if componentes['numero_base'] != numero_base:
+                continue
+            datos_generales = item.get('datosGenerales') or {}
+            revisiones.append({
+                'numero': numero,
+                'revision': componentes['revision_numero'],
+                'justificacion': datos_generales.get('actualizacionRevision', ''),
+                'fecha': item.get('fechaCreacion') or datos_generales.get('fecha', '')
+            })
+        return revisiones
+
     def _obtener_siguiente_consecutivo(self, patron_base):
         """
         Obtiene el siguiente número consecutivo para un patrón base dado
         Implementa lógica atómica para evitar números duplicados
         """
         try:
-            print(f"[CONSECUTIVO] Buscando siguiente para patrón: '{patron_base}'")
+            logger.info("[CONSECUTIVO] Buscando siguiente para patrón: '%s'", patron_base)
 
             # Prioridad 1: SDK REST de Supabase (no depende de conexión PostgreSQL directa)
             if self.supabase_client:
@@ -1655,7 +2866,7 @@ class SupabaseManager:
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[CONSECUTIVO] Error obteniendo: {error_msg}")
+            logger.error("[CONSECUTIVO] Error obteniendo: %s", error_msg)
             return 1
 
     def _obtener_consecutivo_sdk(self, patron_base):
@@ -1665,7 +2876,7 @@ class SupabaseManager:
         Consulta las cotizaciones existentes para encontrar el máximo número y retorna max+1.
         """
         try:
-            print(f"[CONTADOR_SDK] Obteniendo siguiente para patrón: '{patron_base}'")
+            logger.info("[CONTADOR_SDK] Obteniendo siguiente para patrón: '%s'", patron_base)
 
             # Buscar todas las cotizaciones que coincidan con el patrón
             patron_sql = f"{patron_base}-%"
@@ -1690,12 +2901,13 @@ class SupabaseManager:
                         continue
 
             siguiente = max(numeros_existentes) + 1 if numeros_existentes else 1
-            print(f"[CONTADOR_SDK] Siguiente={siguiente} para patrón '{patron_base}', existentes: {sorted(numeros_existentes)}")
+            logger.info("[CONTADOR_SDK] Siguiente=%s para patrón '%s', existentes: %s",
+                        siguiente, patron_base, sorted(numeros_existentes))
             return siguiente
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[CONTADOR_SDK] Error: {error_msg}, usando fallback offline")
+            logger.warning("[CONTADOR_SDK] Error: %s, usando fallback offline", error_msg)
             return self._obtener_consecutivo_offline(patron_base)
     
     def _obtener_consecutivo_supabase(self, patron_base):
@@ -1703,7 +2915,7 @@ class SupabaseManager:
         try:
             cursor = self.pg_connection.cursor()
             
-            print(f"[CONTADOR_ATOMICO] Obteniendo siguiente para patrón: '{patron_base}'")
+            logger.info("[CONTADOR_ATOMICO] Obteniendo siguiente para patrón: '%s'", patron_base)
             
             # Operación atómica usando ON CONFLICT para increment
             query = """
@@ -1727,13 +2939,13 @@ class SupabaseManager:
             self.pg_connection.commit()
             cursor.close()
             
-            print(f"[CONTADOR_ATOMICO] Número asignado: {siguiente} para patrón '{patron_base}'")
+            logger.info("[CONTADOR_ATOMICO] Número asignado: %s para patrón '%s'", siguiente, patron_base)
             
             return siguiente
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[CONTADOR_ATOMICO] Error: {error_msg}")
+            logger.error("[CONTADOR_ATOMICO] Error: %s", error_msg)
             
             # Rollback en caso de error
             try:
@@ -1742,7 +2954,7 @@ class SupabaseManager:
                 pass
                 
             # Fallback a método legacy
-            print(f"[CONTADOR_ATOMICO] Usando fallback legacy para patrón: {patron_base}")
+            logger.warning("[CONTADOR_ATOMICO] Usando fallback legacy para patrón: %s", patron_base)
             return self._obtener_consecutivo_legacy(patron_base)
     
     def _obtener_consecutivo_legacy(self, patron_base):
@@ -1791,14 +3003,14 @@ class SupabaseManager:
             else:
                 siguiente = max(numeros_existentes) + 1
             
-            print(f"[CONSECUTIVO_LEGACY] Números existentes: {sorted(numeros_existentes)}")
-            print(f"[CONSECUTIVO_LEGACY] Siguiente: {siguiente}")
+            logger.info("[CONSECUTIVO_LEGACY] Números existentes: %s", sorted(numeros_existentes))
+            logger.info("[CONSECUTIVO_LEGACY] Siguiente: %s", siguiente)
             
             return siguiente
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[CONSECUTIVO_LEGACY] Error: {error_msg}")
+            logger.error("[CONSECUTIVO_LEGACY] Error: %s", error_msg)
             # Fallback a modo offline
             return self._obtener_consecutivo_offline(patron_base)
     
@@ -1813,17 +3025,17 @@ class SupabaseManager:
             
             contadores = data["contadores"]
             
-            print(f"[CONTADOR_OFFLINE] Obteniendo siguiente para patrón: '{patron_base}'")
+            logger.info("[CONTADOR_OFFLINE] Obteniendo siguiente para patrón: '%s'", patron_base)
             
             # Obtener y incrementar contador para este patrón
             if patron_base in contadores:
                 siguiente = contadores[patron_base]["ultimo_numero"] + 1
                 contadores[patron_base]["ultimo_numero"] = siguiente
                 contadores[patron_base]["updated_at"] = datetime.now().isoformat()
-                print(f"[CONTADOR_OFFLINE] Incrementado contador existente: {siguiente-1} -> {siguiente}")
+                logger.info("[CONTADOR_OFFLINE] Incrementado contador existente: %s -> %s", siguiente - 1, siguiente)
             else:
                 # Nuevo patrón: analizar cotizaciones existentes para sincronizar
-                print(f"[CONTADOR_OFFLINE] Nuevo patrón, analizando cotizaciones existentes...")
+                logger.info("[CONTADOR_OFFLINE] Nuevo patrón, analizando cotizaciones existentes...")
                 
                 cotizaciones = data.get("cotizaciones", [])
                 # El índice del consecutivo depende de cuántas partes tiene el patrón base
@@ -1850,10 +3062,11 @@ class SupabaseManager:
                 if numeros_existentes:
                     ultimo_usado = max(numeros_existentes)
                     siguiente = ultimo_usado + 1
-                    print(f"[CONTADOR_OFFLINE] Números existentes: {sorted(numeros_existentes)}, máximo: {ultimo_usado}")
+                    logger.info("[CONTADOR_OFFLINE] Números existentes: %s, máximo: %s",
+                                sorted(numeros_existentes), ultimo_usado)
                 else:
                     siguiente = 1
-                    print(f"[CONTADOR_OFFLINE] No hay números existentes, iniciando en 1")
+                    logger.info("[CONTADOR_OFFLINE] No hay números existentes, iniciando en 1")
                 
                 # Crear entrada de contador
                 contadores[patron_base] = {
@@ -1865,15 +3078,15 @@ class SupabaseManager:
             
             # Guardar datos actualizados
             if self._guardar_datos_offline(data):
-                print(f"[CONTADOR_OFFLINE] Número asignado: {siguiente} para patrón '{patron_base}'")
+                logger.info("[CONTADOR_OFFLINE] Número asignado: %s para patrón '%s'", siguiente, patron_base)
                 return siguiente
             else:
-                print(f"[CONTADOR_OFFLINE] Error guardando contador, usando fallback")
+                logger.warning("[CONTADOR_OFFLINE] Error guardando contador, usando fallback")
                 return self._obtener_consecutivo_fallback(patron_base)
             
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[CONTADOR_OFFLINE] Error: {error_msg}")
+            logger.error("[CONTADOR_OFFLINE] Error: %s", error_msg)
             return self._obtener_consecutivo_fallback(patron_base)
     
     def _obtener_consecutivo_fallback(self, patron_base):
@@ -1885,11 +3098,11 @@ class SupabaseManager:
             if siguiente == 0:
                 siguiente = 1
             
-            print(f"[CONTADOR_FALLBACK] Número generado: {siguiente} para patrón '{patron_base}'")
+            logger.warning("[CONTADOR_FALLBACK] Número generado: %s para patrón '%s'", siguiente, patron_base)
             return siguiente
             
         except Exception:
-            print(f"[CONTADOR_FALLBACK] Error crítico, usando 1")
+            logger.warning("[CONTADOR_FALLBACK] Error crítico, usando 1")
             return 1
     
     def verificar_numero_unico(self, numero_cotizacion):
@@ -1916,7 +3129,7 @@ class SupabaseManager:
                     cursor.close()
                     return count == 0
                 except Exception as e:
-                    print(f"[VERIFICAR_UNICO] Error en Supabase: {safe_str(e)}")
+                    logger.error("[VERIFICAR_UNICO] Error en Supabase: %s", safe_str(e))
                     # Fallback a offline
                     data = self._cargar_datos_offline()
                     cotizaciones = data.get("cotizaciones", [])
@@ -1927,7 +3140,7 @@ class SupabaseManager:
                     
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[VERIFICAR_UNICO] Error: {error_msg}")
+            logger.error("[VERIFICAR_UNICO] Error: %s", error_msg)
             return True  # Si hay error, asumir que es único para no bloquear
     
     def sincronizar_bidireccional(self) -> dict:
@@ -1952,7 +3165,7 @@ class SupabaseManager:
                 "conflictos": 0
             }
         
-        print("[SYNC_BIDIRECCIONAL] Iniciando sincronización bidireccional...")
+        logger.info("[SYNC_BIDIRECCIONAL] Iniciando sincronización bidireccional...")
         
         try:
             # Cargar datos JSON local
@@ -1979,17 +3192,18 @@ class SupabaseManager:
                         'fechaCreacion': row['fecha_creacion'].isoformat() if row['fecha_creacion'] else None,
                         'usuario': row['usuario'],
                         'observaciones': row['observaciones'],
-                        'id': row['id']
+                        'id': row['id'],
+                        'company_id': str(row['company_id']) if row.get('company_id') else None
                     }
                     cotizaciones_supabase[numero] = cotizacion
                 
                 cursor.close()
-                print(f"[SYNC] Supabase: {len(cotizaciones_supabase)} cotizaciones")
+                logger.info("[SYNC] Supabase: %s cotizaciones", len(cotizaciones_supabase))
             except Exception as e:
-                print(f"[SYNC] Error leyendo Supabase: {e}")
+                logger.error("[SYNC] Error leyendo Supabase: %s", e)
                 return {"success": False, "error": str(e)}
             
-            print(f"[SYNC] JSON local: {len(cotizaciones_json)} cotizaciones")
+            logger.info("[SYNC] JSON local: %s cotizaciones", len(cotizaciones_json))
             
             # Contadores
             subidas = 0      # JSON a Supabase
@@ -1998,7 +3212,7 @@ class SupabaseManager:
             errores = 0
             
             # FASE 1: JSON a Supabase (subir cambios locales)
-            print("[SYNC_FASE_1] JSON a Supabase")
+            logger.info("[SYNC_FASE_1] JSON a Supabase")
             
             for numero, cot_json in cotizaciones_json.items():
                 try:
@@ -2011,9 +3225,10 @@ class SupabaseManager:
                         
                         if resultado_guardado.get("success"):
                             subidas += 1
-                            print(f"[SUBIDA] Nueva: {numero}")
+                            logger.info("[SUBIDA] Nueva: %s", numero)
                         else:
-                            print(f"[SUBIDA_ERROR] {numero}: {resultado_guardado.get('error', 'Error desconocido')}")
+                            logger.error("[SUBIDA_ERROR] %s: %s",
+                                         numero, resultado_guardado.get('error', 'Error desconocido'))
                             errores += 1
                         
                     else:
@@ -2026,12 +3241,13 @@ class SupabaseManager:
                             cot_limpia = self._limpiar_cotizacion_para_supabase(cot_json)
                             
                             # Actualizar en Supabase usando UPDATE
+                            hash_registro = hash_contenido(cot_limpia) if self._columna_hash_disponible() else None
                             cursor = self.pg_connection.cursor()
-                            cursor.execute("""
+                            cursor.execute(f"""
                                 UPDATE cotizaciones 
                                 SET datos_generales = %s, items = %s, revision = %s, 
                                     version = %s, timestamp = %s, usuario = %s, 
-                                    observaciones = %s, updated_at = NOW()
+                                    observaciones = %s, {'hash_contenido = %s, ' if hash_registro else ''}updated_at = NOW()
                                 WHERE numero_cotizacion = %s
                             """, (
                                 Json(cot_limpia['datosGenerales']),
@@ -2041,21 +3257,20 @@ class SupabaseManager:
                                 cot_limpia['timestamp'],
                                 cot_limpia.get('usuario'),
                                 cot_limpia.get('observaciones'),
-                                numero
-                            ))
+                            ) + ((hash_registro,) if hash_registro else ()) + (numero,))
                             self.pg_connection.commit()
                             cursor.close()
                             
                             subidas += 1
                             conflictos += 1
-                            print(f"[CONFLICTO] JSON más reciente: {numero}")
+                            logger.info("[CONFLICTO] JSON más reciente: %s", numero)
                             
                 except Exception as e:
-                    print(f"[SUBIDA_ERROR] {numero}: {e}")
+                    logger.error("[SUBIDA_ERROR] %s: %s", numero, e)
                     errores += 1
             
             # FASE 2: Supabase a JSON (descargar cambios remotos)  
-            print("[SYNC_FASE_2] Supabase a JSON")
+            logger.info("[SYNC_FASE_2] Supabase a JSON")
             
             cotizaciones_json_actualizadas = cotizaciones_json.copy()
             
@@ -2068,7 +3283,8 @@ class SupabaseManager:
                         cot_limpia = self._limpiar_cotizacion_para_json(cot_supabase)
                         cotizaciones_json_actualizadas[numero] = cot_limpia
                         descargas += 1
-                        print(f"[DESCARGA] Nueva: {numero}")
+                        self._notificar_cotizacion('sincronizada', cot_limpia)
+                        logger.info("[DESCARGA] Nueva: %s", numero)
                         
                     else:
                         # Existe en ambos, verificar timestamps
@@ -2081,15 +3297,16 @@ class SupabaseManager:
                             cotizaciones_json_actualizadas[numero] = cot_limpia
                             descargas += 1
                             conflictos += 1
-                            print(f"[CONFLICTO] Supabase más reciente: {numero}")
+                            self._notificar_cotizacion('sincronizada', cot_limpia)
+                            logger.info("[CONFLICTO] Supabase más reciente: %s", numero)
                             
                 except Exception as e:
-                    print(f"[DESCARGA_ERROR] {numero}: {e}")
+                    logger.error("[DESCARGA_ERROR] %s: %s", numero, e)
                     errores += 1
             
             # FASE 3: Guardar JSON actualizado
             if descargas > 0:
-                print("[SYNC_FASE_3] Guardando JSON actualizado...")
+                logger.info("[SYNC_FASE_3] Guardando JSON actualizado...")
                 datos_offline["cotizaciones"] = list(cotizaciones_json_actualizadas.values())
                 datos_offline["ultima_sincronizacion"] = datetime.now().isoformat()
                 datos_offline["sincronizaciones"] = datos_offline.get("sincronizaciones", 0) + 1
@@ -2108,12 +3325,12 @@ class SupabaseManager:
                 "mensaje": f"Sincronización completada: subidas:{subidas} descargas:{descargas} conflictos:{conflictos} errores:{errores}"
             }
             
-            print(f"[SYNC_RESULTADO] {resultado['mensaje']}")
+            logger.info("[SYNC_RESULTADO] %s", resultado['mensaje'])
             return resultado
             
         except Exception as e:
             error_msg = f"Error en sincronización bidireccional: {safe_str(e)}"
-            print(f"[SYNC_ERROR] {error_msg}")
+            logger.error("[SYNC_ERROR] %s", error_msg)
             return {"success": False, "error": error_msg}
     
     def _limpiar_cotizacion_para_supabase(self, cotizacion: dict) -> dict:
@@ -2227,7 +3444,7 @@ class SupabaseManager:
         # Buscar el último -R#- y reemplazar todo lo que sigue
         nuevo_numero = _re.sub(r'^(.*-R\d+-).*$', rf'\1{proyecto_norm}', numero_actual)
 
-        print(f"[EDICION_MENOR] Número regenerado: {numero_actual} → {nuevo_numero}")
+        logger.info("[EDICION_MENOR] Número regenerado: %s → %s", numero_actual, nuevo_numero)
         return nuevo_numero
 
     def _eliminar_cotizacion_por_numero(self, numero_cotizacion: str) -> bool:
@@ -2242,10 +3459,10 @@ class SupabaseManager:
                 try:
                     result = self.supabase_client.table('cotizaciones').delete().eq('numero_cotizacion', numero_cotizacion).execute()
                     if hasattr(result, 'data') and result.data:
-                        print(f"[ELIMINAR] SDK REST: {numero_cotizacion} eliminada")
+                        logger.info("[ELIMINAR] SDK REST: %s eliminada", numero_cotizacion)
                         eliminado = True
                 except Exception as e:
-                    print(f"[ELIMINAR] SDK REST falló: {safe_str(e)}")
+                    logger.error("[ELIMINAR] SDK REST falló: %s", safe_str(e))
 
             # Capa 2: PostgreSQL directo
             if not eliminado and self.postgresql_disponible:
@@ -2254,10 +3471,10 @@ class SupabaseManager:
                     cursor.execute("DELETE FROM cotizaciones WHERE numero_cotizacion = %s", (numero_cotizacion,))
                     self.pg_connection.commit()
                     cursor.close()
-                    print(f"[ELIMINAR] PostgreSQL: {numero_cotizacion} eliminada")
+                    logger.info("[ELIMINAR] PostgreSQL: %s eliminada", numero_cotizacion)
                     eliminado = True
                 except Exception as e:
-                    print(f"[ELIMINAR] PostgreSQL falló: {safe_str(e)}")
+                    logger.error("[ELIMINAR] PostgreSQL falló: %s", safe_str(e))
 
             # Capa 3: JSON offline
             try:
@@ -2265,13 +3482,16 @@ class SupabaseManager:
                 cotizaciones = data.get('cotizaciones', [])
                 data['cotizaciones'] = [c for c in cotizaciones if c.get('numeroCotizacion') != numero_cotizacion]
                 self._guardar_datos_offline(data)
-                print(f"[ELIMINAR] JSON: {numero_cotizacion} eliminada")
+                logger.info("[ELIMINAR] JSON: %s eliminada", numero_cotizacion)
                 eliminado = True
             except Exception as e:
-                print(f"[ELIMINAR] JSON falló: {safe_str(e)}")
+                logger.error("[ELIMINAR] JSON falló: %s", safe_str(e))
+
+            if eliminado:
+                self._notificar_cotizacion('eliminada', {'numeroCotizacion': numero_cotizacion})
 
         except Exception as e:
-            print(f"[ELIMINAR] Error general: {safe_str(e)}")
+            logger.error("[ELIMINAR] Error general: %s", safe_str(e))
 
         return eliminado
 
@@ -2311,56 +3531,11 @@ class SupabaseManager:
 
     def _recalcular_totales_items(self, items: list) -> list:
         """
-        Recalcula los totales de cada ítem sumando los subtotales de materiales
-        que el frontend ya calculó correctamente (normales y por peso).
-        NO recalcula subtotales individuales — confía en el frontend.
+        Recalcula subtotales, costoUnidad y total de cada ítem con el motor de
+        precios a partir de los subtotales de materiales que el frontend ya
+        calculó (normales y por peso). NO recalcula subtotales individuales.
         """
-        for item in items:
-            # Sumar subtotales de materiales (frontend ya los calculó)
-            subtotal_mat = 0.0
-            for mat in item.get('materiales', []):
-                try:
-                    subtotal_mat += float(mat.get('subtotal', 0))
-                except (ValueError, TypeError):
-                    pass
-            item['subtotalMateriales'] = round(subtotal_mat, 2)
-
-            # Sumar subtotales de otros materiales (frontend ya los calculó)
-            subtotal_otros = 0.0
-            for otro in item.get('otrosMateriales', []):
-                try:
-                    subtotal_otros += float(otro.get('subtotal', 0))
-                except (ValueError, TypeError):
-                    pass
-            item['subtotalOtros'] = round(subtotal_otros, 2)
-
-            # Calcular total del ítem
-            subtotal_base = subtotal_mat + subtotal_otros
-            try:
-                transporte = float(item.get('transporte', 0))
-            except (ValueError, TypeError):
-                transporte = 0.0
-            try:
-                instalacion = float(item.get('instalacion', 0))
-            except (ValueError, TypeError):
-                instalacion = 0.0
-            try:
-                seguridad = float(item.get('seguridad', 0))
-            except (ValueError, TypeError):
-                seguridad = 0.0
-            try:
-                descuento = float(item.get('descuento', 0))
-            except (ValueError, TypeError):
-                descuento = 0.0
-
-            total_antes_descuento = subtotal_base + transporte + instalacion + seguridad
-            item['total'] = round(total_antes_descuento - descuento, 2)
-
-            # Mantener costoUnidad si existe
-            if 'costoUnidad' not in item or not item.get('costoUnidad'):
-                item['costoUnidad'] = item['total']
-
-        return items
+        return aplicar_a_items(items, incluir_subtotales=True)
 
     def edicion_menor_cotizacion(self, numero_cotizacion: str, parche: dict, usuario: str = '') -> dict:
         """
@@ -2377,6 +3552,9 @@ class SupabaseManager:
             if not valido:
                 return {'success': False, 'error': mensaje_error}
 
+            # 1a. Normalizar números del parche (items/condiciones)
+            normalizar_cotizacion(parche)
+
             # 2. Obtener cotización actual
             resultado = self.obtener_cotizacion(numero_cotizacion)
             if not resultado.get('encontrado'):
@@ -2415,7 +3593,7 @@ class SupabaseManager:
                     cotizacion['numeroCotizacion'] = nuevo_numero
                     cotizacion['datosGenerales']['numeroCotizacion'] = nuevo_numero
                     campos_modificados.append(f'numero_cotizacion: {viejo_numero} → {nuevo_numero}')
-                    print(f"[EDICION_MENOR] Proyecto cambiado. Número: {viejo_numero} → {nuevo_numero}")
+                    logger.info("[EDICION_MENOR] Proyecto cambiado. Número: %s → %s", viejo_numero, nuevo_numero)
 
             # 4. Aplicar parche en condiciones (ahora incluye moneda, tipoCambio, terminos)
             cond_patch = parche.get('condiciones', {})
@@ -2464,7 +3642,8 @@ class SupabaseManager:
 
                     cotizacion['items'] = self._recalcular_totales_items(items_procesados)
                     campos_modificados.append(f'items (completos, {len(items_procesados)} ítems)')
-                    print(f"[EDICION_MENOR] Items reemplazados completamente ({len(items_procesados)} ítems), totales recalculados")
+                    logger.info("[EDICION_MENOR] Items reemplazados completamente (%s ítems), totales recalculados",
+                                len(items_procesados))
                 else:
                     # Modo texto: solo descripcion/notas (comportamiento original)
                     for i, item_patch in enumerate(items_patch):
@@ -2542,12 +3721,13 @@ class SupabaseManager:
 
             # 9. Guardar cotización actualizada
             numero_para_guardar = cotizacion.get('numeroCotizacion', viejo_numero)
-            print(f"[EDICION_MENOR] Guardando en: {numero_para_guardar} | tipo: {tipo_edicion} | campos: {campos_modificados}")
+            logger.info("[EDICION_MENOR] Guardando en: %s | tipo: %s | campos: %s",
+                        numero_para_guardar, tipo_edicion, campos_modificados)
             resultado_guardado = self.guardar_cotizacion(cotizacion)
 
             # 10. Si proyecto cambió y el guardado fue exitoso, eliminar el registro viejo
             if proyecto_cambiado and resultado_guardado.get('success'):
-                print(f"[EDICION_MENOR] Eliminando registro viejo: {viejo_numero}")
+                logger.info("[EDICION_MENOR] Eliminando registro viejo: %s", viejo_numero)
                 self._eliminar_cotizacion_por_numero(viejo_numero)
                 resultado_guardado['proyecto_cambiado'] = True
                 resultado_guardado['numero_cotizacion'] = numero_para_guardar
@@ -2557,7 +3737,7 @@ class SupabaseManager:
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[EDICION_MENOR] Error: {error_msg}")
+            logger.error("[EDICION_MENOR] Error: %s", error_msg)
             return {'success': False, 'error': error_msg}
 
     def obtener_estado_sincronizacion(self):
@@ -2610,6 +3790,8 @@ class SupabaseManager:
 
             vendedor = datos.get('vendedor', 'UNKNOWN')
             datos_draft = datos.get('datos', {})
+            # Drafts en edición: se convierten números pero se conservan campos vacíos
+            normalizar_cotizacion(datos_draft, conservar_vacios=True)
             draft_id = datos.get('draft_id') or f"draft_{int(time.time() * 1000)}"
 
             # Generar nombre automático para el draft
@@ -2640,7 +3822,7 @@ class SupabaseManager:
             # Intentar guardar en Supabase si está disponible
             if not self.modo_offline and self.supabase_client:
                 try:
-                    print(f"[DRAFT] Guardando draft en Supabase: {draft_id}")
+                    logger.info("[DRAFT] Guardando draft en Supabase: %s", draft_id)
 
                     # Verificar si el draft ya existe
                     existing = self.supabase_client.table('drafts').select('id').eq('id', draft_id).execute()
@@ -2653,15 +3835,15 @@ class SupabaseManager:
                             'ultima_modificacion': fecha_actual,
                             'timestamp': timestamp
                         }).eq('id', draft_id).execute()
-                        print(f"[DRAFT] Draft actualizado en Supabase: {draft_id}")
+                        logger.info("[DRAFT] Draft actualizado en Supabase: %s", draft_id)
                     else:
                         # Insertar nuevo draft
                         self.supabase_client.table('drafts').insert(draft_obj).execute()
-                        print(f"[DRAFT] Draft creado en Supabase: {draft_id}")
+                        logger.info("[DRAFT] Draft creado en Supabase: %s", draft_id)
 
                 except Exception as supabase_error:
-                    print(f"[DRAFT] Error guardando en Supabase: {safe_str(supabase_error)}")
-                    print("[DRAFT] Fallback a almacenamiento JSON local")
+                    logger.error("[DRAFT] Error guardando en Supabase: %s", safe_str(supabase_error))
+                    logger.warning("[DRAFT] Fallback a almacenamiento JSON local")
 
             # Guardar en JSON local (siempre, como backup)
             try:
@@ -2689,10 +3871,10 @@ class SupabaseManager:
                 with open(archivo_drafts, 'w', encoding='utf-8') as f:
                     json.dump(drafts_data, f, ensure_ascii=False, indent=2)
 
-                print(f"[DRAFT] Draft guardado en JSON local: {draft_id}")
+                logger.info("[DRAFT] Draft guardado en JSON local: %s", draft_id)
 
             except Exception as json_error:
-                print(f"[DRAFT] Error guardando en JSON: {safe_str(json_error)}")
+                logger.error("[DRAFT] Error guardando en JSON: %s", safe_str(json_error))
                 return {"success": False, "error": safe_str(json_error)}
 
             return {
@@ -2704,7 +3886,7 @@ class SupabaseManager:
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[DRAFT] Error guardando draft: {error_msg}")
+            logger.error("[DRAFT] Error guardando draft: %s", error_msg)
             return {"success": False, "error": error_msg}
 
     def listar_drafts(self, vendedor: Optional[str] = None,
@@ -2718,7 +3900,7 @@ class SupabaseManager:
             # Intentar obtener de Supabase si está disponible
             if not self.modo_offline and self.supabase_client:
                 try:
-                    print(f"[DRAFT] Listando drafts desde Supabase")
+                    logger.info("[DRAFT] Listando drafts desde Supabase")
                     query = self.supabase_client.table('drafts').select('*')
 
                     if vendedor:
@@ -2737,18 +3919,18 @@ class SupabaseManager:
                             'fecha_creacion': d['fecha_creacion'],
                             'ultima_modificacion': d['ultima_modificacion']
                         } for d in response.data]
-                        print(f"[DRAFT] {len(drafts)} drafts encontrados en Supabase")
+                        logger.info("[DRAFT] %s drafts encontrados en Supabase", len(drafts))
                         return drafts
 
                 except Exception as supabase_error:
-                    print(f"[DRAFT] Error listando desde Supabase: {safe_str(supabase_error)}")
-                    print("[DRAFT] Fallback a JSON local")
+                    logger.error("[DRAFT] Error listando desde Supabase: %s", safe_str(supabase_error))
+                    logger.warning("[DRAFT] Fallback a JSON local")
 
             # Fallback a JSON local
             archivo_drafts = os.path.join(os.getcwd(), "drafts_offline.json")
 
             if not os.path.exists(archivo_drafts):
-                print("[DRAFT] No hay drafts en JSON local")
+                logger.info("[DRAFT] No hay drafts en JSON local")
                 return []
 
             with open(archivo_drafts, 'r', encoding='utf-8') as f:
@@ -2775,12 +3957,12 @@ class SupabaseManager:
                 'ultima_modificacion': d.get('ultima_modificacion', '')
             } for d in drafts]
 
-            print(f"[DRAFT] {len(result)} drafts encontrados en JSON local")
+            logger.info("[DRAFT] %s drafts encontrados en JSON local", len(result))
             return result
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[DRAFT] Error listando drafts: {error_msg}")
+            logger.error("[DRAFT] Error listando drafts: %s", error_msg)
             return []
 
     def obtener_draft(self, draft_id: str) -> Optional[Dict]:
@@ -2797,23 +3979,23 @@ class SupabaseManager:
             # Intentar obtener de Supabase si está disponible
             if not self.modo_offline and self.supabase_client:
                 try:
-                    print(f"[DRAFT] Obteniendo draft desde Supabase: {draft_id}")
+                    logger.info("[DRAFT] Obteniendo draft desde Supabase: %s", draft_id)
                     response = self.supabase_client.table('drafts').select('*').eq('id', draft_id).execute()
 
                     if response.data:
                         draft = response.data[0]
-                        print(f"[DRAFT] Draft encontrado en Supabase: {draft_id}")
+                        logger.info("[DRAFT] Draft encontrado en Supabase: %s", draft_id)
                         return draft
 
                 except Exception as supabase_error:
-                    print(f"[DRAFT] Error obteniendo desde Supabase: {safe_str(supabase_error)}")
-                    print("[DRAFT] Fallback a JSON local")
+                    logger.error("[DRAFT] Error obteniendo desde Supabase: %s", safe_str(supabase_error))
+                    logger.warning("[DRAFT] Fallback a JSON local")
 
             # Fallback a JSON local
             archivo_drafts = os.path.join(os.getcwd(), "drafts_offline.json")
 
             if not os.path.exists(archivo_drafts):
-                print(f"[DRAFT] Archivo JSON no existe: {draft_id}")
+                logger.info("[DRAFT] Archivo JSON no existe: %s", draft_id)
                 return None
 
             with open(archivo_drafts, 'r', encoding='utf-8') as f:
@@ -2823,15 +4005,15 @@ class SupabaseManager:
 
             for draft in all_drafts:
                 if draft.get('id') == draft_id:
-                    print(f"[DRAFT] Draft encontrado en JSON local: {draft_id}")
+                    logger.info("[DRAFT] Draft encontrado en JSON local: %s", draft_id)
                     return draft
 
-            print(f"[DRAFT] Draft no encontrado: {draft_id}")
+            logger.warning("[DRAFT] Draft no encontrado: %s", draft_id)
             return None
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[DRAFT] Error obteniendo draft: {error_msg}")
+            logger.error("[DRAFT] Error obteniendo draft: %s", error_msg)
             return None
 
     def eliminar_drafts_por_numero_cotizacion(self, numero_cotizacion: str) -> Dict:
@@ -2846,7 +4028,7 @@ class SupabaseManager:
         """
         try:
             error_msg = f"[DRAFT] Eliminando drafts para cotización: {numero_cotizacion}"
-            print(error_msg)
+            logger.info("%s", error_msg)
 
             drafts_eliminados = 0
 
@@ -2865,11 +4047,11 @@ class SupabaseManager:
                             # Si el draft tiene el mismo número de cotización, eliminarlo
                             if numero_draft == numero_cotizacion:
                                 self.supabase_client.table('drafts').delete().eq('id', draft['id']).execute()
-                                print(f"[DRAFT] Draft eliminado de Supabase: {draft['id']}")
+                                logger.info("[DRAFT] Draft eliminado de Supabase: %s", draft['id'])
                                 drafts_eliminados += 1
 
                 except Exception as supabase_error:
-                    print(f"[DRAFT] Error eliminando de Supabase: {safe_str(supabase_error)}")
+                    logger.error("[DRAFT] Error eliminando de Supabase: %s", safe_str(supabase_error))
 
             # Eliminar de JSON local también
             archivo_drafts = os.path.join(os.getcwd(), "drafts_offline.json")
@@ -2891,7 +4073,7 @@ class SupabaseManager:
                     if numero_draft != numero_cotizacion:
                         drafts_filtrados.append(d)
                     else:
-                        print(f"[DRAFT] Draft eliminado de JSON: {d.get('id')}")
+                        logger.info("[DRAFT] Draft eliminado de JSON: %s", d.get('id'))
                         drafts_eliminados += 1
 
                 if len(drafts_filtrados) < drafts_originales:
@@ -2901,12 +4083,12 @@ class SupabaseManager:
                         json.dump(drafts_data, f, ensure_ascii=False, indent=2)
 
             mensaje = f"Eliminados {drafts_eliminados} drafts para cotización {numero_cotizacion}"
-            print(f"[DRAFT] {mensaje}")
+            logger.info("[DRAFT] %s", mensaje)
             return {"success": True, "mensaje": mensaje, "cantidad_eliminada": drafts_eliminados}
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[DRAFT] Error eliminando drafts por número: {error_msg}")
+            logger.error("[DRAFT] Error eliminando drafts por número: %s", error_msg)
             return {"success": False, "error": error_msg}
 
     def eliminar_draft(self, draft_id: str) -> Dict:
@@ -2923,13 +4105,13 @@ class SupabaseManager:
             # Intentar eliminar de Supabase si está disponible
             if not self.modo_offline and self.supabase_client:
                 try:
-                    print(f"[DRAFT] Eliminando draft de Supabase: {draft_id}")
+                    logger.info("[DRAFT] Eliminando draft de Supabase: %s", draft_id)
                     self.supabase_client.table('drafts').delete().eq('id', draft_id).execute()
-                    print(f"[DRAFT] Draft eliminado de Supabase: {draft_id}")
+                    logger.info("[DRAFT] Draft eliminado de Supabase: %s", draft_id)
 
                 except Exception as supabase_error:
-                    print(f"[DRAFT] Error eliminando de Supabase: {safe_str(supabase_error)}")
-                    print("[DRAFT] Continuando con JSON local")
+                    logger.error("[DRAFT] Error eliminando de Supabase: %s", safe_str(supabase_error))
+                    logger.info("[DRAFT] Continuando con JSON local")
 
             # Eliminar de JSON local
             archivo_drafts = os.path.join(os.getcwd(), "drafts_offline.json")
@@ -2947,15 +4129,15 @@ class SupabaseManager:
                     with open(archivo_drafts, 'w', encoding='utf-8') as f:
                         json.dump(drafts_data, f, ensure_ascii=False, indent=2)
 
-                    print(f"[DRAFT] Draft eliminado de JSON local: {draft_id}")
+                    logger.info("[DRAFT] Draft eliminado de JSON local: %s", draft_id)
                 else:
-                    print(f"[DRAFT] Draft no encontrado en JSON local: {draft_id}")
+                    logger.warning("[DRAFT] Draft no encontrado en JSON local: %s", draft_id)
 
             return {"success": True, "mensaje": f"Draft {draft_id} eliminado"}
 
         except Exception as e:
             error_msg = safe_str(e)
-            print(f"[DRAFT] Error eliminando draft: {error_msg}")
+            logger.error("[DRAFT] Error eliminando draft: %s", error_msg)
             return {"success": False, "error": error_msg}
 
     def close(self):
@@ -2963,7 +4145,7 @@ class SupabaseManager:
         if self.pg_connection:
             try:
                 self.pg_connection.close()
-                print("[SUPABASE] Conexión PostgreSQL cerrada")
+                logger.info("[SUPABASE] Conexión PostgreSQL cerrada")
             except:
                 pass
 
@@ -2981,7 +4163,7 @@ class SupabaseManager:
                 cursor.close()
                 return True
         except Exception as e:
-            print(f"[TENANT] Error configurando company context: {e}")
+            logger.error("[TENANT] Error configurando company context: %s", e)
         return False
 
     def get_company_by_id(self, company_id: str) -> Optional[Dict]:
@@ -2997,7 +4179,7 @@ class SupabaseManager:
                 if resp.data:
                     return resp.data[0]
         except Exception as e:
-            print(f"[TENANT] SDK fallback: {e}")
+            logger.warning("[TENANT] SDK fallback: %s", e)
 
         # Intento 2: PostgreSQL directo
         try:
@@ -3020,7 +4202,7 @@ class SupabaseManager:
                     colnames = [desc[0] for desc in cursor.description]
                     return dict(zip(colnames, row))
         except Exception as e:
-            print(f"[TENANT] Error get_company_by_id: {e}")
+            logger.error("[TENANT] Error get_company_by_id: %s", e)
             try:
                 self.pg_connection.rollback()
             except:
@@ -3042,7 +4224,7 @@ class SupabaseManager:
                     colnames = [desc[0] for desc in cursor.description]
                     return dict(zip(colnames, row))
         except Exception as e:
-            print(f"[TENANT] Error get_company_by_slug: {e}")
+            logger.error("[TENANT] Error get_company_by_slug: %s", e)
         return None
 
     def create_company(self, data: Dict) -> Optional[Dict]:
@@ -3064,7 +4246,7 @@ class SupabaseManager:
                     colnames = [desc[0] for desc in cursor.description]
                     return dict(zip(colnames, row))
         except Exception as e:
-            print(f"[TENANT] Error create_company: {e}")
+            logger.error("[TENANT] Error create_company: %s", e)
             try:
                 self.pg_connection.rollback()
             except:
@@ -3090,7 +4272,7 @@ class SupabaseManager:
                     colnames = [desc[0] for desc in cursor.description]
                     return dict(zip(colnames, row))
         except Exception as e:
-            print(f"[TENANT] Error update_company: {e}")
+            logger.error("[TENANT] Error update_company: %s", e)
             try:
                 self.pg_connection.rollback()
             except:
@@ -3123,7 +4305,7 @@ class SupabaseManager:
                 if resp.data:
                     return resp.data[0]
         except Exception as e:
-            print(f"[TENANT] Error get_user_profile: {e}")
+            logger.error("[TENANT] Error get_user_profile: %s", e)
         return None
 
     def create_profile(self, user_id: str, company_id: str,
@@ -3145,7 +4327,7 @@ class SupabaseManager:
                     colnames = [desc[0] for desc in cursor.description]
                     return dict(zip(colnames, row))
         except Exception as e:
-            print(f"[TENANT] Error create_profile: {e}")
+            logger.error("[TENANT] Error create_profile: %s", e)
             try:
                 self.pg_connection.rollback()
             except:
@@ -3165,7 +4347,7 @@ class SupabaseManager:
                 if resp.data:
                     return resp.data
         except Exception as e:
-            print(f"[TENANT] SDK profiles: {e}")
+            logger.info("[TENANT] SDK profiles: %s", e)
 
         # Intento 2: PostgreSQL directo
         try:
@@ -3185,7 +4367,7 @@ class SupabaseManager:
                 colnames = [desc[0] for desc in cursor.description]
                 return [dict(zip(colnames, row)) for row in rows]
         except Exception as e:
-            print(f"[TENANT] Error get_profiles_by_company: {e}")
+            logger.error("[TENANT] Error get_profiles_by_company: %s", e)
         return []
 
     def close(self):
@@ -3193,12 +4375,12 @@ class SupabaseManager:
         if self.pg_connection:
             try:
                 self.pg_connection.close()
-                print("[SUPABASE] Conexión PostgreSQL cerrada")
+                logger.info("[SUPABASE] Conexión PostgreSQL cerrada")
             except:
                 pass
 
         # El cliente Supabase no necesita cierre explícito
-        print("[SUPABASE] SupabaseManager cerrado")
+        logger.info("[SUPABASE] SupabaseManager cerrado")
 
     def cerrar_conexion(self):
         """Alias para close() - compatibilidad con código existente"""
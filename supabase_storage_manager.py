@@ -5,6 +5,7 @@ Reemplaza Cloudinary con almacenamiento nativo integrado
 
 import os
 import json
+import time
 import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -25,6 +26,10 @@ class SupabaseStorageManager:
         self.folder_antiguas = "antiguas"
         self.max_retries = 3
         self.retry_delay = 2  # segundos
+        # Cache de estadísticas (listar el bucket es costoso); se invalida en cada escritura
+        self.stats_ttl = int(os.getenv('STORAGE_STATS_TTL', '300'))  # segundos
+        self._cache_estadisticas = None
+        self._cache_estadisticas_ts = 0.0
         
         try:
             from supabase import create_client, Client
@@ -213,6 +218,7 @@ class SupabaseStorageManager:
             print(f"   Tamaño: {info_archivo['bytes']} bytes")
             print(f"   Path: {file_path}")
             
+            self._invalidar_estadisticas()
             return info_archivo
             
         except Exception as e:
@@ -298,6 +304,7 @@ class SupabaseStorageManager:
             }
 
             print(f"OK: Archivo subido a Supabase Storage: {url_publica}")
+            self._invalidar_estadisticas()
             return info_archivo
 
         except Exception as e:
@@ -435,6 +442,7 @@ class SupabaseStorageManager:
             response = self.supabase.storage.from_(self.bucket_name).remove([file_path])
             
             print(f"OK: PDF eliminado exitosamente")
+            self._invalidar_estadisticas()
             return {"eliminado": True, "file_path": file_path}
             
         except Exception as e:
@@ -471,6 +479,7 @@ class SupabaseStorageManager:
                 url_nueva = url_nueva[:-1]
             
             print(f"OK: PDF movido a antiguas exitosamente")
+            self._invalidar_estadisticas()
             
             return {
                 "movido": True,
@@ -572,25 +581,50 @@ class SupabaseStorageManager:
             print(f"[SUPABASE_STORAGE] Error en búsqueda: {e}")
             return []
 
-    def obtener_estadisticas(self) -> dict:
+    def _invalidar_estadisticas(self):
+        """Descarta el conteo cacheado tras subir, eliminar o mover archivos"""
+        self._cache_estadisticas = None
+
+    def _contar_pdfs(self, carpeta: str) -> int:
+        """Cuenta PDFs de una carpeta paginando list() sin construir URLs públicas"""
+        total = 0
+        offset = 0
+        limite = 1000
+        while True:
+            response = self.supabase.storage.from_(self.bucket_name).list(
+                carpeta, {"limit": limite, "offset": offset}
+            )
+            total += sum(1 for archivo in response if archivo.get('name', '').endswith('.pdf'))
+            if len(response) < limite:
+                return total
+            offset += limite
+
+    def obtener_estadisticas(self, forzar: bool = False) -> dict:
         """
         Obtiene estadísticas de uso de Supabase Storage
         
+        Args:
+            forzar: Ignorar el cache y volver a contar
+            
         Returns:
             Dict con estadísticas de almacenamiento
         """
         if not self.storage_available:
             return {"error": "Supabase Storage no disponible"}
         
+        if (not forzar and self._cache_estadisticas
+                and time.time() - self._cache_estadisticas_ts < self.stats_ttl):
+            return dict(self._cache_estadisticas, cache=True)
+        
         try:
             # Obtener conteo de PDFs por carpeta
-            nuevas = self.listar_pdfs(self.folder_nuevas, max_resultados=1000)
-            antiguas = self.listar_pdfs(self.folder_antiguas, max_resultados=1000)
+            pdfs_nuevos = self._contar_pdfs(self.folder_nuevas)
+            pdfs_antiguos = self._contar_pdfs(self.folder_antiguas)
             
             estadisticas = {
-                "pdfs_nuevos": len(nuevas.get("archivos", [])),
-                "pdfs_antiguos": len(antiguas.get("archivos", [])),
-                "total_pdfs": len(nuevas.get("archivos", [])) + len(antiguas.get("archivos", [])),
+                "pdfs_nuevos": pdfs_nuevos,
+                "pdfs_antiguos": pdfs_antiguos,
+                "total_pdfs": pdfs_nuevos + pdfs_antiguos,
                 "bucket_name": self.bucket_name,
                 "fecha_consulta": datetime.datetime.now().isoformat()
             }
@@ -600,6 +634,8 @@ class SupabaseStorageManager:
             print(f"   Nuevos: {estadisticas['pdfs_nuevos']}")
             print(f"   Antiguos: {estadisticas['pdfs_antiguos']}")
             
+            self._cache_estadisticas = estadisticas
+            self._cache_estadisticas_ts = time.time()
             return estadisticas
             
         except Exception as e:
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de la suite de benchmarks
+Valida el generador determinista de tenants, la semántica del fake del SDK
+(filtros, límite de filas de PostgREST, upsert), los dobles de Storage/Drive,
+la comparación de resultados entre commits, una corrida mínima del CLI y
+la agregación de la prueba de carga (contención, integridad, capacidad)
+"""
+
+import json
+import os
+import subprocess
+import sys
+from itertools import islice
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from benchmarks import datos_sinteticos as datos
+from benchmarks.fakes import ClienteSupabaseSQLite, DriveMemoria, StorageMemoria, pdf_minimo
+from benchmarks.carga import (agregar_contencion, cookie_sesion, estimar_capacidad, _parsear_mezcla,
+                              verificar_integridad)
+from benchmarks.run import comparar, percentil
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def materiales():
+    return datos.cargar_materiales()
+
+
+@pytest.fixture
+def cliente(materiales):
+    cliente = ClienteSupabaseSQLite(max_filas=50)
+    cliente.cargar('cotizaciones', [datos.a_fila_supabase(c) for c in datos.iterar_dataset(100, 7, materiales)])
+    yield cliente
+    cliente.cerrar()
+
+
+def test_generador_determinista_y_numeros_unicos(materiales):
+    primera = list(datos.iterar_dataset(300, 11, materiales))
+    segunda = list(datos.iterar_dataset(300, 11, materiales))
+    assert primera == segunda
+    assert len(primera) == 330
+    assert len({c['numeroCotizacion'] for c in primera}) == len(primera)
+    assert len({c['id'] for c in primera}) == len(primera)
+    ruido = [c for c in primera if c['company_id'] == datos.COMPANY_ID_RUIDO]
+    assert len(ruido) == 30
+
+
+def test_cotizacion_generada_tiene_partidas_y_totales(materiales):
+    cotizacion = next(datos.iterar_cotizaciones(1, semilla=3, materiales=materiales))
+    assert cotizacion['items']
+    assert all(item['materiales'] for item in cotizacion['items'])
+    fila = datos.a_fila_supabase(cotizacion)
+    assert fila['numero_cotizacion'] == cotizacion['numeroCotizacion']
+    assert 'condiciones' in fila['datos_generales']
+
+
+def test_escribir_json_offline_es_json_valido(tmp_path, materiales):
+    ruta = tmp_path / 'cotizaciones_offline.json'
+    total = datos.escribir_json_offline(str(ruta), islice(datos.iterar_cotizaciones(5, materiales=materiales), 5))
+    documento = json.loads(ruta.read_text(encoding='utf-8'))
+    assert total == 5 == len(documento['cotizaciones'])
+
+
+def test_fake_sdk_filtros_y_conteo(cliente):
+    respuesta = cliente.table('cotizaciones').select('*', count='exact').eq('company_id', datos.COMPANY_ID).limit(1).execute()
+    assert respuesta.count == 100
+    assert len(respuesta.data) == 1
+
+    numero = respuesta.data[0]['numero_cotizacion']
+    assert cliente.table('cotizaciones').select('id').eq('numero_cotizacion', numero).execute().data
+
+    # like distingue mayúsculas (GLOB); ilike no
+    assert not cliente.table('cotizaciones').select('id').like('numero_cotizacion', numero.lower()).execute().data
+    assert cliente.table('cotizaciones').select('id').ilike('numero_cotizacion', numero.lower()).execute().data
+
+    cliente_buscado = respuesta.data[0]['datos_generales']['cliente']
+    encontrados = cliente.table('cotizaciones').select('numero_cotizacion').or_(
+        f"numero_cotizacion.ilike.%NO-EXISTE%,datos_generales->>cliente.ilike.%{cliente_buscado}%").execute().data
+    assert encontrados
+
+
+def test_fake_sdk_respeta_max_filas_y_range(cliente):
+    assert len(cliente.table('cotizaciones').select('id').execute().data) == 50
+    pagina = cliente.table('cotizaciones').select('id').order('id').range(100, 109).execute().data
+    assert [f['id'] for f in pagina] == list(range(101, 111))
+
+
+def test_fake_sdk_upsert_y_update(cliente):
+    fila = cliente.table('cotizaciones').select('*').eq('id', 1).execute().data[0]
+    fila['observaciones'] = 'actualizada'
+    cliente.table('cotizaciones').upsert(fila, on_conflict='numero_cotizacion').execute()
+    cliente.table('cotizaciones').update({'version': '9'}).eq('id', 1).execute()
+    guardada = cliente.table('cotizaciones').select('*').eq('id', 1).execute().data[0]
+    assert guardada['observaciones'] == 'actualizada'
+    assert guardada['version'] == '9'
+    assert cliente.table('cotizaciones').select('id', count='exact').execute().count == 110
+
+
+def test_storage_lista_con_limite_y_url_publica():
+    storage = StorageMemoria('http://127.0.0.1:1')
+    for i in range(120):
+        storage.escribir('pdfs', f'nuevas/COT-{i:03d}.pdf', b'%PDF')
+    bucket = storage.from_('pdfs')
+    assert len(bucket.list('nuevas')) == 100
+    assert len(bucket.list('nuevas', {'limit': 200})) == 120
+    url = bucket.get_public_url('nuevas/COT 001.pdf')
+    assert url.startswith('http://127.0.0.1:1/storage/v1/object/public/pdfs/nuevas/COT%20001.pdf')
+    assert bucket.download('nuevas/COT-001.pdf') == b'%PDF'
+
+
+def test_drive_memoria_busqueda():
+    drive = DriveMemoria()
+    contenido = pdf_minimo('hola')
+    assert contenido.startswith(b'%PDF')
+    id_archivo = drive.agregar('Cotizacion_CWS-AB-001.pdf', contenido)
+    resultados = drive.buscar_pdfs('cws-ab')
+    assert [r['id'] for r in resultados] == [id_archivo]
+    assert drive.obtener_pdf_por_id(id_archivo) == contenido
+
+
+def test_percentil_y_comparacion():
+    assert percentil([5, 1, 3, 2, 4], 50) == 3
+    assert percentil([5, 1, 3, 2, 4], 95) == 5
+
+    def documento(commit, p50):
+        return {'commit': commit, 'resultados': [
+            {'tamano': 1000, 'capa': 'sdk', 'escenarios': {
+                'home': {'p50_ms': p50}, 'buscar': {'p50_ms': 10.0},
+                'sincronizar_bidireccional': {'omitido': 'requiere la capa postgresql'}}}]}
+
+    reporte = comparar(documento('a', 100.0), documento('b', 130.0), umbral=0.2)
+    assert [c['escenario'] for c in reporte['regresiones']] == ['home']
+    assert len(reporte['comparaciones']) == 2
+    assert not comparar(documento('a', 100.0), documento('b', 110.0), umbral=0.2)['regresiones']
+
+
+def test_cli_corrida_minima(tmp_path):
+    """Proceso aparte: el runner importa app y reemplaza servicios del registro global"""
+    salida = tmp_path / 'resultado.json'
+    proceso = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run', '--tamanos', '40', '--capas', 'offline,sdk',
+         '--repeticiones', '1', '--calentamiento', '0', '--salida', str(salida)],
+        cwd=RAIZ, capture_output=True, text=True, timeout=300)
+    assert proceso.returncode == 0, proceso.stderr[-2000:]
+
+    documento = json.loads(salida.read_text(encoding='utf-8'))
+    assert [(r['tamano'], r['capa']) for r in documento['resultados']] == [(40, 'offline'), (40, 'sdk')]
+    for resultado in documento['resultados']:
+        escenarios = resultado['escenarios']
+        assert 'omitido' in escenarios['sincronizar_bidireccional']
+        for nombre in ('home', 'todas_cotizaciones', 'buscar', 'guardar_cotizacion', 'generar_pdf', 'servir_pdf'):
+            assert escenarios[nombre]['status'] == {'200': 1}, (resultado['capa'], nombre, escenarios[nombre])
+    assert documento['resultados'][1]['escenarios']['buscar']['db'].get('sdk')
+
+
+def test_carga_agrega_contencion_de_workers():
+    volcados = [
+        {'pid': 1, 'capas': {'offline': {'llamadas': 10, 'solapadas': 2, 'max_concurrentes': 2, 'errores': 0,
+                                         'total_ms': 50.0, 'max_ms': 9.0}}},
+        {'pid': 2, 'capas': {'offline': {'llamadas': 10, 'solapadas': 3, 'max_concurrentes': 3, 'errores': 1,
+                                         'total_ms': 70.0, 'max_ms': 12.0}}},
+    ]
+    contencion = agregar_contencion(volcados)
+    assert contencion['workers_reportados'] == 2
+    assert contencion['capas']['offline'] == {'llamadas': 20, 'solapadas': 5, 'max_concurrentes': 3, 'errores': 1,
+                                              'total_ms': 120.0, 'max_ms': 12.0, 'solapadas_pct': 25.0}
+
+
+def test_carga_integridad_detecta_perdidos_y_duplicados(tmp_path):
+    cotizaciones = [{'numeroCotizacion': n} for n in ('A-1', 'A-2', 'A-2', 'VIEJA-1')]
+    (tmp_path / 'cotizaciones_offline.json').write_text(json.dumps({'cotizaciones': cotizaciones}), encoding='utf-8')
+    integridad = verificar_integridad(str(tmp_path), 'offline', ['A-1', 'A-2', 'A-3', 'A-3'])
+    assert integridad['guardados_exitosos'] == 4
+    assert integridad['numeros_repetidos_en_respuestas'] == ['A-3']
+    assert integridad['offline_json'] == {'perdidos': ['A-3'], 'duplicados': ['A-2']}
+
+
+def test_carga_capacidad_y_mezcla():
+    corridas = [
+        {'workers': 1, 'threads': 1, 'usuarios': 1, 'errores': 0, 'latencia': {'p95_ms': 300}, 'throughput_rps': 5},
+        {'workers': 1, 'threads': 1, 'usuarios': 4, 'errores': 0, 'latencia': {'p95_ms': 900}, 'throughput_rps': 9},
+        {'workers': 1, 'threads': 1, 'usuarios': 8, 'errores': 0, 'latencia': {'p95_ms': 2500}, 'throughput_rps': 10},
+        {'workers': 2, 'threads': 4, 'usuarios': 8, 'errores': 3, 'latencia': {'p95_ms': 500}, 'throughput_rps': 30},
+    ]
+    assert estimar_capacidad(corridas, 1000) == {'w1-t1': {'usuarios_max': 4, 'throughput_rps': 9},
+                                                 'w2-t4': {'usuarios_max': 0, 'throughput_rps': 0.0}}
+    assert _parsear_mezcla('listado=3,pdf=1') == {'listado': 3, 'pdf': 1}
+    with pytest.raises(Exception):
+        _parsear_mezcla('exportar=1')
+
+
+def test_carga_cookie_de_sesion_firmada():
+    from flask import Flask, session
+
+    app = Flask(__name__)
+    app.secret_key = 'clave-de-prueba'
+
+    @app.route('/quien')
+    def quien():
+        return f"{session.get('user_id')}|{session.get('company_id')}"
+
+    nombre, valor = cookie_sesion('clave-de-prueba').split('=', 1)
+    cliente = app.test_client()
+    cliente.set_cookie(nombre, valor)
+    respuesta = cliente.get('/quien')
+    assert respuesta.get_data(as_text=True) == f"carga-user|{datos.COMPANY_ID}"
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de la consolidación de BOMs
+Valida que la pasada agrupada produzca la misma tabla master que el
+algoritmo anterior, los subtotales de área/volumen, el grand total (incluido
+el volumen total), la combinación de varios PDFs y una corrida mínima del
+benchmark
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.bom import _como_objetos, como_resultados, consolidar_legado, generar_items
+from benchmarks.bom import main as benchmark_bom
+from bom_consolidation import ConsolidadorBOM, consolidar_resultados, generar_grand_total
+
+
+def _item(item_id, cantidad, largo=None, ancho=None, espesor=None, pagina=1, clasificacion='perfil'):
+    return {'item_id': item_id, 'cantidad': cantidad, 'udm': 'pcs', 'descripcion': f'PTR {item_id}',
+            'largo': largo, 'ancho': ancho, 'espesor': espesor, 'clasificacion': clasificacion,
+            'pagina_origen': pagina}
+
+
+def test_igual_al_algoritmo_anterior():
+    items = generar_items(2000, repeticion=4, semilla=7)
+    consolidador = ConsolidadorBOM()
+    consolidador.agregar_items(items)
+    tabla_master, _ = consolidador.consolidar()
+
+    legado = consolidar_legado(_como_objetos(items))
+    assert [r['item_id'] for r in tabla_master] == [r['item_id'] for r in legado]
+    assert [r['cantidad_total'] for r in tabla_master] == [r['cantidad_total'] for r in legado]
+    assert [r['ocurrencias'] for r in tabla_master] == [r['ocurrencias'] for r in legado]
+    assert [r['paginas_origen'] for r in tabla_master] == [sorted(r['paginas_origen']) for r in legado]
+
+
+def test_subtotales_dimensionales():
+    consolidador = ConsolidadorBOM()
+    consolidador.agregar_items([
+        _item('A', 2, largo=100, ancho=10, espesor=2, pagina=1),
+        _item('A', 3, largo=100, ancho=10, espesor=2, pagina=4),
+        _item('B', 1, largo=100, ancho=10),
+        _item('C', 5, largo=100),
+        _item('D', 1, largo=0, ancho=10, espesor=2),
+    ])
+    a, b, c, d = consolidador.tabla_master()
+
+    assert a['cantidad_total'] == 5 and a['ocurrencias'] == 2 and a['paginas_origen'] == [1, 4]
+    assert a['subtotales_dimensionales'] == {
+        'area_unitaria_mm2': 1000, 'area_total_mm2': 5000, 'largo_mm': 100, 'ancho_mm': 10,
+        'espesor_mm': 2, 'volumen_unitario_mm3': 2000, 'volumen_total_mm3': 10000}
+    assert set(b['subtotales_dimensionales']) == {'area_unitaria_mm2', 'area_total_mm2', 'largo_mm', 'ancho_mm'}
+    assert c['subtotales_dimensionales'] == {} and c['ancho'] is None
+    assert d['subtotales_dimensionales'] == {}
+
+
+def test_grand_total_con_volumen():
+    consolidador = ConsolidadorBOM()
+    consolidador.agregar_items([
+        _item('A', 2, largo=100, ancho=10, espesor=2),
+        _item('A', 1, largo=100, ancho=10, espesor=2),
+        _item('B', 4, clasificacion='tornilleria'),
+    ])
+    tabla_master, grand_total = consolidador.consolidar()
+
+    assert grand_total == generar_grand_total(tabla_master)
+    assert grand_total['totales_generales'] == {'total_items_unicos': 2, 'total_cantidad_items': 7,
+                                                'total_area_mm2': 3000, 'total_volumen_mm3': 6000}
+    assert grand_total['clasificacion_por_tipo']['perfil']['total_volumen'] == 6000
+    assert grand_total['resumen']['materiales_repetidos'] == 1
+    assert grand_total['resumen']['material_mas_repetido']['item_id'] == 'A'
+    assert [m['consolidado'] for m in grand_total['materiales_consolidados']] == [True, False]
+
+
+def test_combinar_varios_pdfs():
+    resultados = como_resultados([_item('A', 1, pagina=1), _item('B', 2, pagina=2),
+                                  _item('A', 3, pagina=1), _item('B', 1, pagina=5)], pdfs=2)
+    combinado = consolidar_resultados(resultados)
+
+    assert combinado['pdfs'] == ['PLANOS-01', 'PLANOS-02'] and combinado['total_items'] == 4
+    a, b = combinado['tabla_master']
+    assert a['cantidad_total'] == 4 and a['origenes'] == {'PLANOS-01': [1], 'PLANOS-02': [1]}
+    assert b['cantidad_total'] == 3 and b['origenes'] == {'PLANOS-01': [2], 'PLANOS-02': [5]}
+    assert combinado['grand_total']['totales_generales']['total_cantidad_items'] == 7
+
+
+def test_benchmark_cli(tmp_path, capsys):
+    salida = tmp_path / 'bom.json'
+    assert benchmark_bom(['--tamanos', '500', '--repeticiones', '1', '--legado', '--salida', str(salida)]) == 0
+    assert salida.exists()
+    assert 'legado' in capsys.readouterr().out
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del trazado de llamadas a base de datos
+Valida contadores por capa, buffer circular de consultas lentas, ruta de
+origen, el proxy del SDK y la medición de la capa offline de SupabaseManager
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask
+
+import db_tracing
+from db_tracing import TrazadorDB, trazar_cliente_sdk
+from supabase_manager import SupabaseManager
+
+
+@pytest.fixture
+def trazador(monkeypatch):
+    nuevo = TrazadorDB(umbral_ms=5, capacidad=3, muestreo_explain=0)
+    monkeypatch.setattr(db_tracing, 'trazador', nuevo)
+    monkeypatch.setattr('supabase_manager.trazador', nuevo)
+    return nuevo
+
+
+class _Respuesta:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Builder:
+    """Builder encadenable con la forma de postgrest (select/eq/execute)"""
+
+    def __init__(self, filas, espera=0.0):
+        self.filas, self.espera = filas, espera
+
+    def select(self, *_):
+        return self
+
+    def eq(self, *_):
+        return self
+
+    def execute(self):
+        time.sleep(self.espera)
+        return _Respuesta(self.filas)
+
+
+class _Cliente:
+    storage = 'storage'
+
+    def table(self, nombre):
+        return _Builder([{'id': 1}, {'id': 2}], espera=0.01 if nombre == 'lenta' else 0)
+
+    def rpc(self, funcion, params):
+        return _Builder(7)
+
+
+def test_buffer_circular_y_contadores(trazador):
+    for k in range(5):
+        trazador.registrar('postgresql', f'SELECT {k}', 0.010, filas=k)
+    trazador.registrar('postgresql', 'SELECT rapida', 0.001, filas=1)
+
+    estado = trazador.obtener_estado()
+    assert estado['capas']['postgresql']['llamadas'] == 6
+    assert estado['capas']['postgresql']['lentas'] == 5
+    assert estado['capas']['postgresql']['filas'] == 11
+    assert [e['operacion'] for e in estado['lentas']] == ['SELECT 4', 'SELECT 3', 'SELECT 2']
+    assert estado['lentas'][0]['ruta'].startswith('hilo:')
+
+    trazador.configurar(umbral_ms=50)
+    assert trazador.registrar('postgresql', 'SELECT x', 0.010) is None
+    trazador.limpiar()
+    assert trazador.obtener_estado()['lentas'] == []
+
+
+def test_ruta_de_origen(trazador):
+    app = Flask(__name__)
+
+    @app.route('/cotizacion/<numero>')
+    def ver(numero):
+        trazador.registrar('sdk', 'cotizaciones.select', 0.010)
+        return 'ok'
+
+    app.test_client().get('/cotizacion/A-1')
+    assert trazador.obtener_estado()['lentas'][0]['ruta'] == 'GET /cotizacion/<numero>'
+
+
+def test_cliente_sdk_trazado(trazador):
+    cliente = trazar_cliente_sdk(_Cliente())
+    assert trazar_cliente_sdk(cliente) is cliente
+
+    assert cliente.table('cotizaciones').select('*').eq('id', 1).execute().data == [{'id': 1}, {'id': 2}]
+    cliente.table('lenta').select('*').execute()
+    assert cliente.rpc('recalcular').execute().data == 7
+    assert cliente.storage == 'storage'
+
+    estado = trazador.obtener_estado()
+    assert estado['capas']['sdk']['llamadas'] == 3
+    assert estado['capas']['sdk']['filas'] == 5
+    assert [e['operacion'] for e in estado['lentas']] == ['lenta.select']
+
+
+def test_capa_offline(trazador, tmp_path):
+    archivo = tmp_path / "cotizaciones_offline.json"
+    archivo.write_text(json.dumps({"cotizaciones": [{"numeroCotizacion": "A-1"}]}), encoding="utf-8")
+    manager = SupabaseManager()
+    manager.archivo_offline = str(archivo)
+
+    data = manager._cargar_datos_offline()
+    manager._guardar_datos_offline(data)
+
+    offline = trazador.obtener_estado()['capas']['offline']
+    assert offline['llamadas'] == 2 and offline['filas'] == 2
+
+
+def test_contencion_llamadas_solapadas(trazador):
+    import threading
+
+    dentro, liberar = threading.Barrier(3), threading.Event()
+
+    def ocupar():
+        with trazador.medir('offline', 'guardar cotizaciones_offline.json'):
+            dentro.wait()
+            liberar.wait(5)
+
+    hilos = [threading.Thread(target=ocupar) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    dentro.wait()
+    liberar.set()
+    for hilo in hilos:
+        hilo.join()
+    with trazador.medir('offline', 'cargar cotizaciones_offline.json'):
+        pass
+
+    offline = trazador.obtener_estado()['capas']['offline']
+    assert offline['llamadas'] == 3
+    assert offline['solapadas'] == 1
+    assert offline['max_concurrentes'] == 2
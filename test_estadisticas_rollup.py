@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de estadísticas agregadas (rollup)
+Valida calcular_rollup_estadisticas() y obtener_estadisticas_detalladas() en modo offline
+"""
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from supabase_manager import SupabaseManager, calcular_rollup_estadisticas
+
+
+def _cotizacion(numero, cliente, vendedor, moneda, totales, fecha, company_id=None):
+    return {
+        "numeroCotizacion": numero,
+        "datosGenerales": {"cliente": cliente, "vendedor": vendedor},
+        "condiciones": {"moneda": moneda},
+        "items": [{"total": t} for t in totales],
+        "fechaCreacion": fecha,
+        "company_id": company_id
+    }
+
+
+COTIZACIONES = [
+    _cotizacion("A-CWS-RM-001-R1-X", "BMW", "RM", "MXN", [100, "250.50"], "2025-01-10T10:00:00", "c1"),
+    _cotizacion("A-CWS-RM-002-R1-X", "BMW", "RM", "USD", [40], "2025-01-20T10:00:00", "c1"),
+    _cotizacion("A-CWS-JL-003-R1-X", "AUDI", "JL", "MXN", [10, None, "x"], "2025-02-01T10:00:00", "c2"),
+]
+
+
+def _manager_offline(tmp_path):
+    archivo = tmp_path / "cotizaciones_offline.json"
+    archivo.write_text(json.dumps({"cotizaciones": COTIZACIONES}), encoding="utf-8")
+
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(archivo)
+    return manager
+
+
+def test_rollup_dimensiones():
+    """Un solo recorrido produce las mismas dimensiones que la tabla SQL"""
+    filas = {(f["dimension"], f["clave"]): f for f in calcular_rollup_estadisticas(COTIZACIONES)}
+    assert filas[("total", "total")]["num_cotizaciones"] == 3
+    assert filas[("total", "total")]["total_monto"] == 400.5
+    assert filas[("moneda", "MXN")]["total_monto"] == 360.5
+    assert filas[("moneda", "USD")]["num_cotizaciones"] == 1
+    assert filas[("cliente", "BMW")]["num_cotizaciones"] == 2
+    assert filas[("mes", "2025-01")]["num_cotizaciones"] == 2
+
+
+def test_rollup_sin_fecha_usa_clave_fija():
+    """Sin fecha_creacion la fila de mes es 'sin_fecha' (la resta del trigger la encuentra)"""
+    filas = calcular_rollup_estadisticas([_cotizacion("S-1", "BMW", "RM", "MXN", [5], None)])
+    meses = [f for f in filas if f["dimension"] == "mes"]
+    assert meses == [{"dimension": "mes", "clave": "sin_fecha", "num_cotizaciones": 1, "total_monto": 5.0}]
+
+
+def test_estadisticas_detalladas_por_compania(tmp_path):
+    """El filtro por compañía se aplica antes de agregar"""
+    manager = _manager_offline(tmp_path)
+
+    stats = manager.obtener_estadisticas_detalladas()
+    assert stats["total_cotizaciones"] == 3
+    assert stats["clientes_unicos"] == 2
+    assert stats["vendedores_unicos"] == 2
+    assert stats["por_vendedor"][0]["clave"] == "RM"
+    assert [m["clave"] for m in stats["por_mes"]] == ["2025-01", "2025-02"]
+
+    stats_c1 = manager.obtener_estadisticas_detalladas(company_id="c1")
+    assert stats_c1["total_cotizaciones"] == 2
+    assert stats_c1["clientes_unicos"] == 1
+    assert stats_c1["totales_por_moneda"] == {"MXN": 350.5, "USD": 40.0}
+
+
+def test_estadisticas_offline_se_invalidan_al_cambiar_archivo(tmp_path):
+    """El cache offline se descarta cuando cambia el JSON"""
+    manager = _manager_offline(tmp_path)
+    assert manager.obtener_estadisticas_detalladas()["total_cotizaciones"] == 3
+
+    datos = {"cotizaciones": COTIZACIONES[:1]}
+    with open(manager.archivo_offline, "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+    os.utime(manager.archivo_offline, (0, 12345))
+
+    assert manager.obtener_estadisticas_detalladas()["total_cotizaciones"] == 1
+
+
+def test_filas_de_varias_companias_se_suman(tmp_path):
+    """Sin filtro, las filas del rollup de cada compañía se combinan por (dimension, clave)"""
+    from benchmarks.fakes import ClienteSupabaseSQLite
+
+    manager = _manager_offline(tmp_path)
+    manager.supabase_client = ClienteSupabaseSQLite()
+    manager.supabase_client.cargar('estadisticas_rollup', [
+        {"company_id": compania, "dimension": d, "clave": c, "num_cotizaciones": n, "total_monto": m}
+        for compania in ("c1", "c2")
+        for d, c, n, m in [("total", "total", 2, 150.0), ("moneda", "MXN", 2, 150.0),
+                           ("vendedor", "RM", 1, 100.0), ("cliente", "BMW", 2, 150.0),
+                           ("mes", "2025-01", 2, 150.0)]
+    ])
+
+    stats = manager.obtener_estadisticas_detalladas()
+    assert stats["fuente"] == "Supabase SDK REST (rollup)"
+    assert stats["total_cotizaciones"] == 4
+    assert stats["totales_por_moneda"] == {"MXN": 300.0}
+    assert stats["por_vendedor"] == [{"clave": "RM", "cotizaciones": 2, "total": 200.0}]
+    assert stats["por_mes"] == [{"clave": "2025-01", "cotizaciones": 4, "total": 300.0}]
+    assert stats["clientes_unicos"] == 1 and stats["vendedores_unicos"] == 1
+
+    assert manager.obtener_estadisticas_detalladas(company_id="c2")["totales_por_moneda"] == {"MXN": 150.0}
+    manager.supabase_client.cerrar()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del índice de familias de revisión
+Valida parsear_numero_cotizacion() y obtener_familia_revisiones() en modo offline
+"""
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from supabase_manager import SupabaseManager, parsear_numero_cotizacion
+
+
+def _manager_offline(tmp_path, numeros):
+    """SupabaseManager en modo offline con un JSON temporal"""
+    archivo = tmp_path / "cotizaciones_offline.json"
+    cotizaciones = [
+        {
+            "numeroCotizacion": numero,
+            "datosGenerales": {"actualizacionRevision": f"Cambio {i}"},
+            "timestamp": 1000 + i
+        }
+        for i, numero in enumerate(numeros)
+    ]
+    archivo.write_text(json.dumps({"cotizaciones": cotizaciones}), encoding="utf-8")
+
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(archivo)
+    return manager
+
+
+def test_parsear_formato_cws():
+    """Número estándar CLIENTE-CWS-VE-###-R#-PROYECTO"""
+    c = parsear_numero_cotizacion("GRUPO-BMW-CWS-RM-014-R3-NAVE INDUSTRIAL")
+    assert c["numero_base"] == "GRUPO-BMW-CWS-RM-014"
+    assert c["cliente_codigo"] == "GRUPO-BMW"
+    assert c["vendedor_iniciales"] == "RM"
+    assert c["consecutivo"] == 14
+    assert c["revision_numero"] == 3
+    assert c["proyecto_codigo"] == "NAVE INDUSTRIAL"
+
+
+def test_parsear_formatos_legacy():
+    """Formatos sin CWS o sin revisión no rompen el parseo"""
+    c = parsear_numero_cotizacion("CWS-1723456789-R2")
+    assert c["numero_base"] == "CWS-1723456789"
+    assert c["revision_numero"] == 2
+    assert c["cliente_codigo"] is None
+
+    c = parsear_numero_cotizacion("TEST-LOGGING-MEJORADO")
+    assert c["numero_base"] == "TEST-LOGGING-MEJORADO"
+    assert c["revision_numero"] == 1
+
+
+def test_familia_detecta_revision_mas_reciente(tmp_path):
+    """R1 no es la más reciente si existe R3 de la misma base"""
+    manager = _manager_offline(tmp_path, [
+        "BMW-CWS-RM-001-R1-NAVE",
+        "BMW-CWS-RM-001-R2-NAVE",
+        "BMW-CWS-RM-001-R3-NAVE",
+        "BMW-CWS-RM-010-R5-OTRA",
+    ])
+
+    familia = manager.obtener_familia_revisiones("BMW-CWS-RM-001-R1-NAVE")
+    assert familia["numero_base"] == "BMW-CWS-RM-001"
+    assert familia["revision_maxima"] == 3
+    assert familia["numero_ultima_revision"] == "BMW-CWS-RM-001-R3-NAVE"
+    assert [r["revision"] for r in familia["revisiones"]] == [3, 2, 1]
+    assert familia["revisiones"][0]["justificacion"] == "Cambio 2"
+
+
+def test_familia_no_mezcla_consecutivos_con_prefijo_comun(tmp_path):
+    """BMW-CWS-RM-001 no debe incluir BMW-CWS-RM-0015"""
+    manager = _manager_offline(tmp_path, [
+        "BMW-CWS-RM-001-R1-NAVE",
+        "BMW-CWS-RM-0015-R4-NAVE",
+    ])
+
+    familia = manager.obtener_familia_revisiones("BMW-CWS-RM-001-R1-NAVE")
+    assert familia["revision_maxima"] == 1
+    assert familia["numero_ultima_revision"] == "BMW-CWS-RM-001-R1-NAVE"
+    assert len(familia["revisiones"]) == 1
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de auditoría financiera masiva
+Valida la detección de discrepancias, los agrupamientos, la reparación por
+lotes en modo offline y el rendimiento sobre 100k cotizaciones sintéticas
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from financial_audit import auditar, auditar_cotizaciones, rango_magnitud
+from supabase_manager import SupabaseManager
+
+
+def _item(total, costo_unidad, cantidad="2"):
+    # 100 de materiales + 10% seguridad = 110 por unidad
+    return {
+        "descripcion": "Rack", "cantidad": cantidad, "seguridad": "10", "descuento": "0",
+        "materiales": [{"material": "PTR", "subtotal": "100"}],
+        "costoUnidad": costo_unidad, "total": total,
+    }
+
+
+def _cotizaciones():
+    return [
+        {"numeroCotizacion": "A-CWS-RM-001-R1-X", "company_id": "c1",
+         "datosGenerales": {"vendedor": "RM"},
+         "items": [_item(220.0, 110.0), {"descripcion": "Flete legacy", "total": "999"}]},
+        {"numeroCotizacion": "B-CWS-JL-002-R1-X", "company_id": "c1",
+         "datosGenerales": {"vendedor": "JL"},
+         "items": [_item(220.0, 110.0), _item(200.0, 100.0)]},
+        {"numeroCotizacion": "C-CWS-RM-003-R1-X", "company_id": "c2",
+         "datosGenerales": {"vendedor": "RM"},
+         "items": [_item(50000.0, 110.0)]},
+    ]
+
+
+def _manager_offline(tmp_path):
+    archivo = tmp_path / "cotizaciones_offline.json"
+    archivo.write_text(json.dumps({"cotizaciones": _cotizaciones()}), encoding="utf-8")
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(archivo)
+    return manager
+
+
+def test_rangos_magnitud():
+    assert rango_magnitud(0.5) == "<1"
+    assert rango_magnitud(-20) == "1-100"
+    assert rango_magnitud(5000) == "100-10k"
+    assert rango_magnitud(49780) == ">=10k"
+
+
+def test_detecta_y_agrupa_discrepancias():
+    reporte = auditar_cotizaciones(_cotizaciones(), tamano_lote=2)
+
+    assert reporte["cotizaciones"] == 3
+    assert reporte["partidas"] == 5
+    assert reporte["partidas_auditadas"] == 4  # la partida legacy no se audita
+    assert reporte["partidas_con_diferencia"] == 2
+    assert reporte["cotizaciones_con_diferencia"] == 2
+    assert reporte["por_tenant"]["c1"] == {"partidas": 1, "cotizaciones": 1, "diferencia": 20.0}
+    assert reporte["por_tenant"]["c2"]["diferencia"] == -49780.0
+    assert reporte["por_vendedor"]["RM"]["partidas"] == 1
+    assert reporte["por_magnitud"] == {"<1": 0, "1-100": 1, "100-10k": 0, ">=10k": 1}
+
+    peor = reporte["peores"][0]
+    assert peor["numeroCotizacion"] == "C-CWS-RM-003-R1-X"
+    assert peor["total_calculado"] == 220.0
+    assert reporte["peores"][1]["partida"] == 1
+
+
+def test_tolerancia():
+    reporte = auditar_cotizaciones(_cotizaciones(), tolerancia=25)
+    assert reporte["partidas_con_diferencia"] == 1
+
+
+def test_tolerancia_en_centavos_sin_ruido_flotante():
+    """Un centavo de diferencia con tolerancia 0.01 no se reporta; dos sí"""
+    def cotizacion(total):
+        item = {"descripcion": "Flete", "cantidad": "1", "transporte": "100.01",
+                "costoUnidad": total, "total": total}
+        return {"numeroCotizacion": "T-1", "items": [item]}
+
+    assert auditar_cotizaciones([cotizacion(100.0)])["partidas_con_diferencia"] == 0
+    assert auditar_cotizaciones([cotizacion(100.02)])["partidas_con_diferencia"] == 0
+    assert auditar_cotizaciones([cotizacion(99.99)])["partidas_con_diferencia"] == 1
+    assert auditar_cotizaciones([cotizacion(100.0)], tolerancia=0)["partidas_con_diferencia"] == 1
+
+
+def test_reparacion_offline(tmp_path):
+    manager = _manager_offline(tmp_path)
+
+    reporte = auditar(manager, reparar=True)
+    assert reporte["reparadas"] == 2
+
+    data = manager._cargar_datos_offline()
+    totales = [[i.get("total") for i in c["items"]] for c in data["cotizaciones"]]
+    assert totales == [[220.0, "999"], [220.0, 220.0], [220.0]]
+
+    assert auditar(manager)["partidas_con_diferencia"] == 0
+    assert auditar(manager, company_id="c2")["cotizaciones"] == 1
+
+
+def test_rendimiento_100k_cotizaciones():
+    def generar(n):
+        for k in range(n):
+            yield {"numeroCotizacion": f"Q-{k}", "company_id": f"c{k % 7}",
+                   "datosGenerales": {"vendedor": f"V{k % 13}"},
+                   "items": [_item(220.0 if k % 100 else 221.0, 110.0)]}
+
+    inicio = time.perf_counter()
+    reporte = auditar_cotizaciones(generar(100_000))
+    duracion = time.perf_counter() - inicio
+
+    assert reporte["cotizaciones"] == 100_000
+    assert reporte["partidas_con_diferencia"] == 1000
+    assert len(reporte["peores"]) == 50
+    assert duracion < 60, f"Auditoría de 100k cotizaciones tardó {duracion:.1f}s"
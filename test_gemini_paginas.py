@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del pipeline de páginas de GeminiPDFAnalyzer
+Con un cliente de modelo simulado (sin Gemini ni poppler) valida el análisis
+concurrente en orden de página, el cache por hash de imagen (un juego de
+planos revisado solo paga por las páginas cambiadas), que los errores no se
+cachean y el espaciado del limitador de tasa
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from gemini_pdf_analyzer import GeminiPDFAnalyzer, LimitadorTasa
+
+
+class ModeloSimulado:
+    """generate_content([prompt, imagen]): la imagen simulada es el texto de la descripción"""
+
+    model_name = 'modelo-simulado'
+
+    def __init__(self, demora=0.02, fallar=()):
+        self.demora = demora
+        self.fallar = set(fallar)
+        self.llamadas = []
+        self.concurrentes = 0
+        self.max_concurrentes = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, partes):
+        contenido = partes[1]['data'].decode('utf-8')
+        with self._lock:
+            self.llamadas.append(contenido)
+            self.concurrentes += 1
+            self.max_concurrentes = max(self.max_concurrentes, self.concurrentes)
+        try:
+            time.sleep(self.demora)
+            if contenido in self.fallar:
+                raise RuntimeError('error simulado')
+            items = [] if contenido == 'vacia' else [
+                {'item_id': contenido, 'cantidad': 2, 'udm': 'pcs', 'descripcion': f'PTR {contenido}',
+                 'largo': 120, 'clasificacion': 'perfil'}]
+            return SimpleNamespace(text=json.dumps({'tabla_detectada': bool(items), 'items': items}))
+        finally:
+            with self._lock:
+                self.concurrentes -= 1
+
+
+@pytest.fixture
+def analizador(tmp_path, monkeypatch):
+    monkeypatch.setenv('GEMINI_PAGE_WORKERS', '4')
+    monkeypatch.setenv('GEMINI_RPM', '0')  # sin límite de tasa en las pruebas
+
+    def crear(modelo):
+        return GeminiPDFAnalyzer(modelo=modelo, cache_path=str(tmp_path / 'paginas.db'))
+    return crear
+
+
+def _paginas(*contenidos):
+    return [(n, c.encode('utf-8')) for n, c in enumerate(contenidos, 1)]
+
+
+def test_paginas_concurrentes_en_orden(analizador):
+    modelo = ModeloSimulado()
+    paginas = analizador(modelo)._analizar_paginas_png(_paginas(*[f'P{n}' for n in range(1, 13)]))
+
+    assert [p.numero_pagina for p in paginas] == list(range(1, 13))
+    assert [p.items[0].item_id for p in paginas] == [f'P{n}' for n in range(1, 13)]
+    assert all(p.items[0].pagina_origen == p.numero_pagina and p.tabla_detectada for p in paginas)
+    assert 1 < modelo.max_concurrentes <= 4
+
+
+def test_revision_solo_paga_paginas_cambiadas(analizador):
+    primero = analizador(ModeloSimulado())
+    primero._analizar_paginas_png(_paginas('A', 'B', 'vacia', 'D'))
+
+    modelo = ModeloSimulado()
+    revisado = analizador(modelo)
+    paginas = revisado._analizar_paginas_png(_paginas('A', 'B2', 'vacia', 'D', 'D'))
+
+    assert sorted(modelo.llamadas) == ['B2']
+    assert revisado.ultimas_estadisticas_paginas == {'paginas': 5, 'en_cache': 4, 'analizadas': 1,
+                                                     'repetidas': 0, 'errores': 0}
+    assert [len(p.items) for p in paginas] == [1, 1, 0, 1, 1]
+    assert paginas[4].items[0].pagina_origen == 5  # cacheado en la página 4, reubicado
+
+
+def test_paginas_repetidas_y_errores(analizador):
+    modelo = ModeloSimulado(fallar={'X'})
+    gemini = analizador(modelo)
+    paginas = gemini._analizar_paginas_png(_paginas('A', 'A', 'X'))
+
+    assert modelo.llamadas.count('A') == 1 and modelo.llamadas.count('X') == 2  # reintento
+    assert [len(p.items) for p in paginas] == [1, 1, 0]
+    assert gemini.ultimas_estadisticas_paginas['repetidas'] == 1
+    assert gemini.ultimas_estadisticas_paginas['errores'] == 1
+
+    # El error no quedó en cache: se vuelve a intentar
+    modelo.fallar.clear()
+    assert gemini._analizar_paginas_png(_paginas('X'))[0].items[0].item_id == 'X'
+
+
+def test_limitador_espacia_llamadas():
+    limitador = LimitadorTasa(por_minuto=1200)  # una cada 50 ms
+    inicio = time.monotonic()
+    hilos = [threading.Thread(target=limitador.esperar) for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert time.monotonic() - inicio >= 0.19
+    assert LimitadorTasa(0).intervalo == 0
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de la caché HTTP
+Valida ETags de listado (generación de la compañía) y de cotización
+(timestamp + contenido), respuestas 304, la caché de filas renderizadas,
+la compresión gzip/brotli y la generación de datos en cada capa
+"""
+
+import gzip
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask, render_template_string, session
+
+from benchmarks.fakes import ClienteSupabaseSQLite
+from cotizador.http_cache import (BROTLI_AVAILABLE, CacheFragmentos, con_etag, etag_cotizacion, etag_listado,
+                                  init_http_cache, no_modificada, respuesta_no_modificada)
+from supabase_manager import SupabaseManager
+
+COMPANY = '11111111-1111-1111-1111-111111111111'
+
+
+class _Datos:
+    """Capa de datos mínima: generación por compañía y cotizaciones por número"""
+
+    def __init__(self):
+        self.generacion = 1
+        self.lecturas = 0
+        self.cotizaciones = {'A-1': {'numeroCotizacion': 'A-1', 'timestamp': 1700000000000,
+                                     'items': [{'total': 10}]}}
+
+    def obtener_generacion_datos(self, company_id=None):
+        return f"test:{self.generacion}" if self.generacion else None
+
+
+def _app(monkeypatch, tmp_path, **entorno):
+    monkeypatch.delenv('RENDER_GIT_COMMIT', raising=False)
+    for nombre, valor in entorno.items():
+        monkeypatch.setenv(nombre, valor)
+    plantillas = tmp_path / 'templates'
+    (plantillas / 'filas').mkdir(parents=True)
+    (plantillas / 'filas' / 'fila.html').write_text('<tr><td>{{ cot.numero }}</td><td>{{ cot.total }}</td></tr>',
+                                                    encoding='utf-8')
+    app = Flask(__name__, template_folder=str(plantillas))
+    app.secret_key = 'prueba'
+    cache = init_http_cache(app)
+    datos = _Datos()
+
+    @app.route('/entrar')
+    def entrar():
+        session['user_id'] = 'u1'
+        session['company_id'] = COMPANY
+        return 'ok'
+
+    @app.route('/listado')
+    def listado():
+        etag = etag_listado(datos, session.get('company_id'))
+        if no_modificada(etag):
+            return respuesta_no_modificada(etag)
+        datos.lecturas += 1
+        filas = [{'numero': n, 'total': len(c['items'])} for n, c in datos.cotizaciones.items()]
+        html = render_template_string("{% for cot in filas %}{{ fila_cotizacion('filas/fila.html', cot) }}{% endfor %}"
+                                      + 'x' * 3000, filas=filas)
+        return con_etag(html, etag)
+
+    @app.route('/api/<numero>')
+    def api(numero):
+        cotizacion = datos.cotizaciones[numero]
+        etag = etag_cotizacion(cotizacion)
+        if no_modificada(etag):
+            return respuesta_no_modificada(etag)
+        return con_etag({'cotizacion': cotizacion, 'relleno': 'y' * 3000}, etag)
+
+    cliente = app.test_client()
+    cliente.get('/entrar')
+    return app, cache, datos, cliente
+
+
+def test_listado_304_hasta_que_cambia_la_generacion(monkeypatch, tmp_path):
+    app, cache, datos, cliente = _app(monkeypatch, tmp_path)
+
+    primera = cliente.get('/listado')
+    etag = primera.headers['ETag']
+    assert primera.status_code == 200 and etag.startswith('W/')
+    assert primera.headers['Cache-Control'] == 'private, no-cache'
+
+    repetida = cliente.get('/listado', headers={'If-None-Match': etag})
+    assert repetida.status_code == 304 and repetida.headers['ETag'] == etag
+    assert datos.lecturas == 1
+
+    # Otra página/filtro es otro recurso
+    assert cliente.get('/listado?page=2', headers={'If-None-Match': etag}).status_code == 200
+
+    datos.generacion = 2
+    nueva = cliente.get('/listado', headers={'If-None-Match': etag})
+    assert nueva.status_code == 200 and nueva.headers['ETag'] != etag
+
+    # Sin generación confiable no hay validador
+    datos.generacion = None
+    assert 'ETag' not in cliente.get('/listado').headers
+    assert cache.obtener_estado()['respuestas_304'] == 1
+
+
+def test_etag_cotizacion_cambia_con_el_contenido_aunque_no_el_timestamp(monkeypatch, tmp_path):
+    app, cache, datos, cliente = _app(monkeypatch, tmp_path)
+
+    etag = cliente.get('/api/A-1').headers['ETag']
+    assert cliente.get('/api/A-1', headers={'If-None-Match': etag}).status_code == 304
+
+    # Edición menor: mismo timestamp, contenido distinto
+    datos.cotizaciones['A-1']['items'].append({'total': 5})
+    respuesta = cliente.get('/api/A-1', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200 and respuesta.headers['ETag'] != etag
+
+
+def test_etag_depende_del_usuario(monkeypatch, tmp_path):
+    app, cache, datos, cliente = _app(monkeypatch, tmp_path)
+    etag = cliente.get('/listado').headers['ETag']
+
+    otro = app.test_client()
+    with otro.session_transaction() as sesion:
+        sesion['user_id'] = 'u2'
+        sesion['company_id'] = COMPANY
+    assert otro.get('/listado', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_compresion_gzip_y_brotli(monkeypatch, tmp_path):
+    app, cache, datos, cliente = _app(monkeypatch, tmp_path)
+
+    respuesta = cliente.get('/listado', headers={'Accept-Encoding': 'gzip'})
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in respuesta.headers['Vary']
+    assert gzip.decompress(respuesta.data).decode().startswith('<tr><td>A-1</td>')
+
+    sin_codificacion = cliente.get('/listado')
+    assert 'Content-Encoding' not in sin_codificacion.headers
+
+    if BROTLI_AVAILABLE:
+        import brotli
+        respuesta = cliente.get('/api/A-1', headers={'Accept-Encoding': 'gzip, br'})
+        assert respuesta.headers['Content-Encoding'] == 'br'
+        assert json.loads(brotli.decompress(respuesta.data))['cotizacion']['numeroCotizacion'] == 'A-1'
+
+    # Respuestas chicas y 304 no se comprimen
+    assert 'Content-Encoding' not in cliente.get('/entrar', headers={'Accept-Encoding': 'gzip'}).headers
+    etag = cliente.get('/api/A-1').headers['ETag']
+    assert not cliente.get('/api/A-1', headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'}).data
+
+
+def test_cache_desactivada(monkeypatch, tmp_path):
+    app, cache, datos, cliente = _app(monkeypatch, tmp_path, HTTP_CACHE_ENABLED='false')
+    respuesta = cliente.get('/listado', headers={'Accept-Encoding': 'gzip'})
+    assert 'ETag' not in respuesta.headers and 'Content-Encoding' not in respuesta.headers
+    assert respuesta.data.startswith(b'<tr><td>A-1</td>')
+    assert cache.fragmentos.obtener_estado()['entradas'] == 0
+
+
+def test_filas_renderizadas_por_version(monkeypatch, tmp_path):
+    app, cache, datos, cliente = _app(monkeypatch, tmp_path)
+
+    cliente.get('/listado')
+    cliente.get('/listado?page=2')
+    estado = cache.fragmentos.obtener_estado()
+    assert estado['entradas'] == 1 and estado['aciertos'] == 1
+
+    # Una versión nueva de la fila no reutiliza el HTML anterior
+    datos.cotizaciones['A-1']['items'].append({'total': 5})
+    assert b'<td>2</td>' in cliente.get('/listado?page=3').data
+    assert cache.fragmentos.obtener_estado()['entradas'] == 2
+
+
+def test_cache_fragmentos_lru():
+    cache = CacheFragmentos(maximo=2)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    assert cache.obtener('a') == 1
+    cache.guardar('c', 3)
+    assert cache.obtener('b') is None
+    assert cache.obtener_estado() == {'entradas': 2, 'maximo': 2, 'aciertos': 1, 'fallos': 1, 'tasa_aciertos': 0.5}
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(tmp_path / 'cotizaciones_offline.json')
+    return manager
+
+
+def test_generacion_offline_cambia_al_guardar(manager):
+    assert manager.obtener_generacion_datos(COMPANY) == 'json:vacio'
+    manager.guardar_cotizacion({'datosGenerales': {'cliente': 'BMW', 'vendedor': 'RM', 'proyecto': 'X'},
+                                'items': []}, company_id=COMPANY)
+    primera = manager.obtener_generacion_datos(COMPANY)
+    assert primera.startswith('json:')
+    manager.guardar_cotizacion({'datosGenerales': {'cliente': 'AUDI', 'vendedor': 'RM', 'proyecto': 'Y'},
+                                'items': []}, company_id=COMPANY)
+    assert manager.obtener_generacion_datos(COMPANY) != primera
+
+
+def test_generacion_sdk_y_tabla_sin_migrar(manager):
+    cliente = ClienteSupabaseSQLite()
+    cliente.cargar('cotizaciones_generacion', [{'company_id': COMPANY, 'generacion': 7}])
+    manager.supabase_client = cliente
+    assert manager.obtener_generacion_datos(COMPANY) == 'sdk:7'
+    # Compañía sin fila: sin marca confiable
+    assert manager.obtener_generacion_datos('22222222-2222-2222-2222-222222222222') is None
+
+    class _SinTabla:
+        def table(self, nombre):
+            raise RuntimeError('relation "cotizaciones_generacion" does not exist')
+
+    manager.supabase_client = _SinTabla()
+    assert manager.obtener_generacion_datos(COMPANY) is None
+    # El fallo se recuerda: no se reintenta en cada request
+    manager.supabase_client = cliente
+    assert manager.obtener_generacion_datos(COMPANY) is None
+    cliente.cerrar()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de la instrumentación de latencia por request
+Valida histogramas/percentiles, sub-spans por componente (sin doble conteo
+en llamadas anidadas), exposición Prometheus/JSON, Server-Timing y el costo
+por request
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+from cotizador.instrumentation import BUCKETS, Histograma, init_instrumentation, span
+
+
+class _Repositorio:
+    """Objeto con métodos públicos anidados, como SupabaseManager"""
+
+    def buscar(self):
+        time.sleep(0.002)
+        return self.contar()
+
+    def contar(self):
+        time.sleep(0.002)
+        return 2
+
+    def _privado(self):
+        return 'sin instrumentar'
+
+
+def _app(monkeypatch, token=None):
+    if token:
+        monkeypatch.setenv('METRICS_TOKEN', token)
+    else:
+        monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    app = Flask(__name__)
+    app.secret_key = 'pruebas'
+    repositorio = _Repositorio()
+    metricas = init_instrumentation(app, db_manager=repositorio)
+
+    @app.route('/cotizacion/<numero>')
+    def ver(numero):
+        with span('pdf'):
+            time.sleep(0.001)
+        return {'numero': numero, 'n': repositorio.buscar()}
+
+    @app.route('/falla')
+    def falla():
+        return {'error': 'x'}, 500
+
+    return app, metricas, repositorio
+
+
+def test_histograma_percentiles():
+    h = Histograma()
+    for _ in range(90):
+        h.observar(0.004)
+    for _ in range(10):
+        h.observar(0.2)
+    assert h.total == 100 and h.conteos[0] == 90
+    assert h.percentil(0.5) <= BUCKETS[0]
+    assert 0.1 < h.percentil(0.95) <= 0.2
+    assert h.percentil(1.0) == 0.2
+
+
+def test_request_spans_y_server_timing(monkeypatch):
+    app, metricas, repositorio = _app(monkeypatch)
+    cliente = app.test_client()
+
+    respuesta = cliente.get('/cotizacion/A-1')
+    assert respuesta.status_code == 200
+    timing = respuesta.headers['Server-Timing']
+    assert timing.startswith('app;dur=') and 'db;dur=' in timing and 'pdf;dur=' in timing
+    cliente.get('/cotizacion/B-2')
+    cliente.get('/falla')
+    cliente.get('/no-existe')
+
+    resumen = {r['ruta']: r for r in metricas.resumen()['rutas']}
+    ruta = resumen['/cotizacion/<numero>']  # una serie por regla, no por URL
+    assert ruta['requests'] == 2 and ruta['status'] == {'200': 2}
+    assert ruta['spans']['db']['requests'] == 2  # buscar() → contar() cuenta una vez
+    assert 4 <= ruta['spans']['db']['promedio_ms'] < ruta['promedio_ms']
+    assert resumen['/falla']['errores'] == 1
+    assert resumen['<sin_ruta>']['status'] == {'404': 1}
+    assert repositorio._privado() == 'sin instrumentar'
+    assert repositorio.contar() == 2  # fuera de request: sin span, sin error
+
+
+def test_exposicion_prometheus(monkeypatch):
+    app, _, _ = _app(monkeypatch)
+    cliente = app.test_client()
+    cliente.get('/cotizacion/A-1')
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = 'u1'
+
+    texto = cliente.get('/admin/metrics').get_data(as_text=True)
+    assert '# TYPE cotizador_request_duration_seconds histogram' in texto
+    assert 'cotizador_request_duration_seconds_bucket{method="GET",route="/cotizacion/<numero>",le="+Inf"} 1' in texto
+    assert 'cotizador_requests_total{method="GET",route="/cotizacion/<numero>",status="200"} 1' in texto
+    assert 'cotizador_span_duration_seconds_count{component="db",route="/cotizacion/<numero>"} 1' in texto
+
+
+def test_token(monkeypatch):
+    app, _, _ = _app(monkeypatch, token='secreto')
+    cliente = app.test_client()
+    assert cliente.get('/admin/metrics').status_code == 401
+    assert cliente.get('/admin/metrics/resumen?token=secreto').status_code == 200
+    assert cliente.get('/admin/metrics', headers={'Authorization': 'Bearer secreto'}).status_code == 200
+    assert cliente.get('/admin/metrics?token=otro').status_code == 401
+
+
+def test_sin_token_exige_sesion(monkeypatch):
+    app, _, _ = _app(monkeypatch)
+    cliente = app.test_client()
+    assert cliente.get('/admin/metrics').status_code == 401
+    assert cliente.get('/admin/metrics/resumen').status_code == 401
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = 'u1'
+    assert cliente.get('/admin/metrics/resumen').status_code == 200
+
+
+def test_desactivada(monkeypatch):
+    monkeypatch.setenv('METRICS_ENABLED', 'false')
+    app = Flask(__name__)
+    assert init_instrumentation(app) is None
+    assert app.extensions['metricas'] is None
+
+
+def test_costo_por_request(monkeypatch):
+    """La instrumentación agrega muy poco al costo de un request"""
+    app, metricas, _ = _app(monkeypatch)
+
+    @app.route('/ping')
+    def ping():
+        return 'ok'
+
+    cliente = app.test_client()
+    n = 300
+    inicio = time.perf_counter()
+    for _ in range(n):
+        cliente.get('/ping')
+    con_metricas = (time.perf_counter() - inicio) / n
+
+    monkeypatch.setenv('METRICS_ENABLED', 'false')
+    simple = Flask(__name__)
+    simple.add_url_rule('/ping', 'ping', lambda: 'ok')
+    cliente_simple = simple.test_client()
+    inicio = time.perf_counter()
+    for _ in range(n):
+        cliente_simple.get('/ping')
+    sin_metricas = (time.perf_counter() - inicio) / n
+
+    assert metricas.resumen()['requests'] == n
+    assert con_metricas - sin_metricas < 0.001  # < 1 ms por request
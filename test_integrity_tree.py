@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del árbol de integridad
+Valida el hash canónico (mismo hash para el JSON local y la fila de
+PostgreSQL), el mantenimiento incremental de huellas, que la comparación
+solo baje por los buckets distintos y la verificación completa del
+monitor de salud contra el SDK
+"""
+
+import hashlib
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from benchmarks.fakes import ClienteSupabaseSQLite
+from health_monitoring_system import HealthMonitoringSystem
+from integrity_tree import (SIN_COMPANIA, ArbolIntegridad, bucket_de, comparar_arboles, hash_contenido, hoja,
+                            raiz)
+from supabase_manager import SupabaseManager
+
+COMPANY = '11111111-1111-1111-1111-111111111111'
+
+
+def _cotizacion(numero, total=10, company_id=COMPANY):
+    return {'numeroCotizacion': numero, 'company_id': company_id, 'timestamp': 1700000000000,
+            'datosGenerales': {'cliente': 'BMW', 'vendedor': 'RM', 'proyecto': 'X', 'numeroCotizacion': numero},
+            'condiciones': {'moneda': 'MXN'}, 'items': [{'descripcion': 'Rack', 'total': total}]}
+
+
+def test_hash_canonico_igual_en_json_y_fila():
+    cot = _cotizacion('A-1')
+    # Forma de la columna datos_generales: condiciones embebidas, sin raíz
+    fila = {'numeroCotizacion': 'A-1', 'items': cot['items'],
+            'datosGenerales': dict(cot['datosGenerales'], condiciones={'moneda': 'MXN'})}
+    assert hash_contenido(cot) == hash_contenido(fila)
+
+    assert hash_contenido(dict(cot, timestamp=1, usuario='otro')) == hash_contenido(cot)
+    assert hash_contenido(dict(cot, items=[{'descripcion': 'Rack', 'total': 11}])) != hash_contenido(cot)
+    assert hash_contenido(dict(cot, textoIntroductorio='Hola')) != hash_contenido(cot)
+
+
+def test_bucket_y_hoja_como_postgresql():
+    assert bucket_de('A-1') == hashlib.md5(b'A-1').digest()[0]
+    assert hoja(None) == 0
+    assert hoja('7fffffffffffffff' + 'a' * 48) == 2 ** 63 - 1
+    assert hoja('ffffffffffffffff' + 'a' * 48) == -1  # bigint con signo
+
+
+def test_arbol_incremental_igual_a_reconstruido():
+    arbol = ArbolIntegridad()
+    cotizaciones = {f'A-{n}': _cotizacion(f'A-{n}', total=n) for n in range(50)}
+    for numero, cot in cotizaciones.items():
+        arbol.actualizar(COMPANY, numero, hash_contenido(cot))
+
+    cotizaciones['A-3'] = _cotizacion('A-3', total=999)
+    arbol.actualizar(COMPANY, 'A-3', hash_contenido(cotizaciones['A-3']))
+    cotizaciones['A-4'] = _cotizacion('A-4', total=4, company_id=None)  # cambia de compañía
+    arbol.actualizar(None, 'A-4', hash_contenido(cotizaciones['A-4']))
+    del cotizaciones['A-5']
+    arbol.eliminar('A-5')
+
+    reconstruido = ArbolIntegridad.desde_cotizaciones(cotizaciones.values())
+    assert arbol.buckets() == reconstruido.buckets()
+    assert raiz(arbol.buckets()[SIN_COMPANIA])[1] == 1
+    assert len(arbol) == 49 and not reconstruido.duplicados
+
+    duplicado = ArbolIntegridad.desde_cotizaciones([_cotizacion('B-1'), _cotizacion('B-1', total=2)])
+    assert duplicado.duplicados == ['B-1'] and len(duplicado) == 1
+
+
+def test_comparacion_solo_baja_por_buckets_distintos():
+    cotizaciones = [_cotizacion(f'A-{n}', total=n) for n in range(200)]
+    remoto = ArbolIntegridad.desde_cotizaciones(cotizaciones)
+    local = ArbolIntegridad.desde_cotizaciones(cotizaciones)
+    pedidos = []
+
+    def hojas_remotas(compania, buckets):
+        pedidos.append(list(buckets))
+        return remoto.hojas(compania, buckets)
+
+    iguales = comparar_arboles(remoto.buckets(), local.buckets(), hojas_remotas, local.hojas)
+    assert iguales['consistentes'] == iguales['total'] == 200
+    assert pedidos == [] and iguales['buckets_revisados'] == 0
+
+    local.actualizar(COMPANY, 'A-7', hash_contenido(_cotizacion('A-7', total=-1)))
+    local.eliminar('A-8')
+    local.actualizar(COMPANY, 'A-999', hash_contenido(_cotizacion('A-999')))
+    resultado = comparar_arboles(remoto.buckets(), local.buckets(), hojas_remotas, local.hojas)
+
+    assert resultado['inconsistentes'] == ['A-7']
+    assert resultado['faltan_en_b'] == ['A-8'] and resultado['faltan_en_a'] == ['A-999']
+    assert resultado['total'] == 201 and resultado['consistentes'] == 198
+    assert pedidos == [sorted({bucket_de('A-7'), bucket_de('A-8'), bucket_de('A-999')})]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = ClienteSupabaseSQLite()
+    manager.archivo_offline = str(tmp_path / 'cotizaciones_offline.json')
+    yield manager
+    manager.supabase_client.cerrar()
+
+
+def _simular_trigger(cliente):
+    """integridad_bucket (columna generada) e integridad_buckets (trigger) a partir de las filas"""
+    filas = cliente.table('cotizaciones').select('*').execute().data
+    arbol = ArbolIntegridad()
+    for fila in filas:
+        cliente.table('cotizaciones').update({'integridad_bucket': bucket_de(fila['numero_cotizacion'])}).eq(
+            'id', fila['id']).execute()
+        arbol.actualizar(fila.get('company_id'), fila['numero_cotizacion'], fila.get('hash_contenido'))
+    cliente.table('integridad_buckets').delete().gte('bucket', 0).execute()
+    cliente.cargar('integridad_buckets', [
+        {'company_id': compania, 'bucket': bucket, 'huella': huella, 'registros': registros}
+        for compania, nodos in arbol.buckets().items() for bucket, (huella, registros) in nodos.items()
+    ])
+
+
+def test_guardar_escribe_hash_y_actualiza_arbol_local(manager):
+    manager.guardar_cotizacion(_cotizacion('A-1'), company_id=COMPANY)
+    arbol = manager.arbol_integridad_offline()
+    assert len(arbol) == 1
+
+    manager.guardar_cotizacion(_cotizacion('A-2'), company_id=COMPANY)
+    # Actualizado en O(1): mismo objeto, versión al día con el archivo
+    assert manager.arbol_integridad_offline() is arbol and len(arbol) == 2
+
+    fila = manager.supabase_client.table('cotizaciones').select('*').eq('numero_cotizacion', 'A-2').execute().data[0]
+    assert fila['hash_contenido'] == arbol.hojas(COMPANY, [bucket_de('A-2')])[bucket_de('A-2')]['A-2']
+
+
+def test_fallo_transitorio_no_se_recuerda_como_columna_ausente(manager, monkeypatch):
+    tabla = manager.supabase_client.table
+    fallos = [ConnectionError('timeout')]
+
+    def table(nombre):
+        if fallos:
+            raise fallos.pop()
+        return tabla(nombre)
+
+    monkeypatch.setattr(manager.supabase_client, 'table', table)
+    assert manager._columna_hash_disponible() is False
+    assert manager._columna_hash_disponible() is True  # se reintenta en la siguiente llamada
+
+    manager._hash_contenido_disponible = False
+    fallos.append(Exception('{"code": "42703", "message": "column cotizaciones.hash_contenido does not exist"}'))
+    assert manager._columna_hash_disponible() is False
+    assert manager._columna_hash_disponible() is False  # columna ausente: se recuerda 5 min
+
+
+def test_verificacion_del_monitor_contra_sdk(manager, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for n in range(30):
+        manager.guardar_cotizacion(_cotizacion(f'A-{n}', total=n), company_id=COMPANY)
+    # Divergencias: una fila cambiada en Supabase y una cotización solo local
+    manager.supabase_client.table('cotizaciones').update({'hash_contenido': 'f' * 64}).eq(
+        'numero_cotizacion', 'A-3').execute()
+    manager.supabase_client.table('cotizaciones').delete().eq('numero_cotizacion', 'A-4').execute()
+    _simular_trigger(manager.supabase_client)
+
+    storage = SimpleNamespace(supabase=manager,
+                              system_health=SimpleNamespace(supabase=SimpleNamespace(value='online')))
+    monitor = HealthMonitoringSystem(storage)
+    report = monitor._run_integrity_check()
+
+    assert report.systems_checked == ['supabase', 'json_local']
+    assert report.total_records == 30 and report.consistent_records == 28
+    assert report.inconsistent_records == 1 and report.missing_records == 1
+    assert report.issues == ['Inconsistencia detectada en: A-3', 'Falta en Supabase: A-4']
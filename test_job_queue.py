@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de la cola local de trabajos
+Valida prioridades, idempotencia, reintentos con backoff hasta dead-letter,
+errores permanentes, recuperación de leases vencidos, reintento manual y
+que dos workers (hilos o conexiones) nunca tomen el mismo trabajo
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from job_queue import PRIORIDAD_ALTA, PRIORIDAD_BAJA, ColaTrabajos, ErrorPermanente
+
+
+@pytest.fixture
+def cola(tmp_path, monkeypatch):
+    monkeypatch.setenv('JOB_QUEUE_BACKOFF_BASE', '0')
+    return ColaTrabajos(str(tmp_path / 'cola.db'), hilos=0)
+
+
+def test_prioridad_y_orden_de_llegada(cola):
+    vistos = []
+    cola.registrar_tarea('t', lambda payload, adjunto: vistos.append(payload['n']))
+    cola.encolar('t', {'n': 'baja'}, prioridad=PRIORIDAD_BAJA)
+    cola.encolar('t', {'n': 'normal-1'})
+    cola.encolar('t', {'n': 'alta'}, prioridad=PRIORIDAD_ALTA)
+    cola.encolar('t', {'n': 'normal-2'})
+
+    assert cola.procesar_pendientes() == 4
+    assert vistos == ['alta', 'normal-1', 'normal-2', 'baja']
+    assert cola.obtener_estado()['por_estado']['completado'] == 4
+
+
+def test_idempotencia_y_resultado(cola):
+    cola.registrar_tarea('t', lambda payload, adjunto: {'tamano': len(adjunto)})
+    primero = cola.encolar('t', {}, clave_idempotencia='pdf:A-1', adjunto=b'%PDF-1.4')
+    segundo = cola.encolar('t', {}, clave_idempotencia='pdf:A-1', adjunto=b'%PDF-1.4')
+    assert not primero['duplicado'] and segundo == {'id': primero['id'], 'estado': 'pendiente', 'duplicado': True}
+
+    cola.procesar_pendientes()
+    trabajo = cola.obtener(primero['id'])
+    assert trabajo['estado'] == 'completado' and trabajo['resultado'] == {'tamano': 8}
+    assert not trabajo['tiene_adjunto']  # el adjunto se libera al completar
+    assert cola.encolar('t', {}, clave_idempotencia='pdf:A-1')['duplicado']
+
+
+def test_reintentos_hasta_dead_letter_y_reintento_manual(cola):
+    intentos = []
+
+    def falla(payload, adjunto):
+        intentos.append(1)
+        if len(intentos) <= 3:
+            raise ConnectionError('Storage no responde')
+        return 'ok'
+
+    cola.registrar_tarea('subir', falla, max_intentos=3)
+    trabajo_id = cola.encolar('subir', {'n': 1}, clave_idempotencia='subir:1')['id']
+    cola.procesar_pendientes()
+
+    assert len(intentos) == 3
+    fallido = cola.obtener(trabajo_id)
+    assert fallido['estado'] == 'fallido' and fallido['intentos'] == 3
+    assert [e['intento'] for e in fallido['errores']] == [1, 2, 3]
+    assert 'ConnectionError' in fallido['ultimo_error']
+    assert [t['id'] for t in cola.listar('fallido')] == [trabajo_id]
+    # Mientras esté en dead-letter la clave no bloquea un trabajo nuevo
+    assert not cola.encolar('subir', {'n': 1}, clave_idempotencia='subir:1')['duplicado']
+
+    assert cola.reintentar(trabajo_id)
+    assert not cola.reintentar(trabajo_id)
+    cola.procesar_pendientes()
+    assert cola.obtener(trabajo_id)['estado'] == 'completado'
+
+
+def test_backoff_exponencial_acotado(cola, monkeypatch):
+    cola.config.update(backoff_base=5, backoff_max=60)
+    monkeypatch.setattr('job_queue.random.uniform', lambda a, b: 1.0)
+    assert [cola._backoff(n) for n in (1, 2, 3, 4, 5)] == [5, 10, 20, 40, 60]
+
+    cola.registrar_tarea('t', lambda payload, adjunto: 1 / 0)
+    trabajo_id = cola.encolar('t')['id']
+    antes = time.time()
+    assert cola.procesar_siguiente()
+    trabajo = cola.obtener(trabajo_id)
+    assert trabajo['estado'] == 'pendiente' and trabajo['disponible_en'] >= antes + 5
+    assert not cola.procesar_siguiente()  # todavía no vence el backoff
+
+
+def test_error_permanente_no_reintenta(cola):
+    llamadas = []
+
+    def tarea(payload, adjunto):
+        llamadas.append(1)
+        raise ErrorPermanente('cotización no encontrada')
+
+    cola.registrar_tarea('t', tarea, max_intentos=5)
+    trabajo_id = cola.encolar('t')['id']
+    cola.procesar_pendientes()
+    assert len(llamadas) == 1
+    assert cola.obtener(trabajo_id)['estado'] == 'fallido'
+
+
+def test_lease_vencido_se_retoma(cola):
+    cola.registrar_tarea('t', lambda payload, adjunto: 'ok', lease_segundos=0.05)
+    trabajo_id = cola.encolar('t')['id']
+    # Un worker lo toma y "muere" sin terminarlo
+    assert cola._reclamar()['id'] == trabajo_id
+    assert cola._reclamar() is None
+    time.sleep(0.1)
+    assert cola.procesar_siguiente()
+    trabajo = cola.obtener(trabajo_id)
+    assert trabajo['estado'] == 'completado' and trabajo['intentos'] == 2
+
+
+def test_tipo_sin_manejador_espera_sin_gastar_intentos(cola):
+    trabajo_id = cola.encolar('desconocido')['id']
+    assert cola.procesar_siguiente()
+    trabajo = cola.obtener(trabajo_id)
+    assert trabajo['estado'] == 'pendiente' and trabajo['intentos'] == 0
+
+
+def test_workers_concurrentes_no_duplican(tmp_path):
+    ruta = str(tmp_path / 'cola.db')
+    ejecutados = []
+    lock = threading.Lock()
+
+    def tarea(payload, adjunto):
+        with lock:
+            ejecutados.append(payload['n'])
+
+    # Dos "procesos": instancias con conexiones propias sobre el mismo archivo
+    colas = [ColaTrabajos(ruta, hilos=3), ColaTrabajos(ruta, hilos=3)]
+    for cola in colas:
+        cola.registrar_tarea('t', tarea)
+        cola.config['sondeo_segundos'] = 0.05
+    for n in range(60):
+        colas[n % 2].encolar('t', {'n': n})
+
+    for cola in colas:
+        cola.iniciar()
+    limite = time.time() + 20
+    while len(ejecutados) < 60 and time.time() < limite:
+        time.sleep(0.05)
+    for cola in colas:
+        cola.detener()
+
+    assert sorted(ejecutados) == list(range(60))
+    assert colas[0].obtener_estado()['por_estado']['completado'] == 60
+
+
+def test_purgar_completados(cola):
+    cola.registrar_tarea('t', lambda payload, adjunto: None)
+    cola.encolar('t')
+    cola.encolar('otro')
+    cola.procesar_pendientes()
+    assert cola.purgar(horas=0) == 1
+    assert [t['tipo'] for t in cola.listar()] == ['otro']
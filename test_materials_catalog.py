@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del catálogo de materiales
+Valida índices/búsqueda, recarga en caliente por mtime y el snapshot binario
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from materials_catalog import MaterialsCatalog, normalizar_texto
+
+CSV = '''﻿Tipo de material,Peso,Ref de Peso
+PTR 3/4 x 3/4 CAL 14,1.06,Peso x metro lineal
+"PTR 1"" x 1"" CAL 14",1.44,Peso x metro lineal
+LÁMINA CAL 14,"15,26",Peso x metro cuadrado
+Ángulo 1" x 1/8,1.19,Peso x metro lineal
+'''
+
+
+def _catalogo(tmp_path, contenido=CSV, **kwargs):
+    ruta = tmp_path / "materiales.csv"
+    if not ruta.exists():
+        ruta.write_text(contenido, encoding="utf-8")
+    return MaterialsCatalog(ruta_csv=str(ruta), ruta_snapshot=str(tmp_path / "catalogo.snapshot"),
+                            intervalo_revision=0, **kwargs)
+
+
+def test_normalizar_texto():
+    assert normalizar_texto('  LÁMINA   Cal. 14 ') == "lamina cal. 14"
+    assert normalizar_texto('PTR 1" x 1"') == "ptr 1 x 1"
+
+
+def test_carga_y_consultas(tmp_path):
+    catalogo = _catalogo(tmp_path)
+
+    assert len(catalogo.materiales) == 4
+    assert catalogo.materiales[2] == {"descripcion": "LÁMINA CAL 14", "peso": 15.26, "uom": "Peso x metro cuadrado"}
+    assert catalogo.obtener("lamina cal 14")["peso"] == 15.26
+    assert catalogo.obtener("no existe") is None
+    assert len(catalogo.por_unidad("peso x metro lineal")) == 3
+
+    assert [m["descripcion"] for m in catalogo.buscar("ptr cal")] == ['PTR 3/4 x 3/4 CAL 14', 'PTR 1" x 1" CAL 14']
+    assert [m["descripcion"] for m in catalogo.buscar("ang")] == ['Ángulo 1" x 1/8']
+    assert catalogo.buscar("cal 14", uom="Peso x metro cuadrado")[0]["descripcion"] == "LÁMINA CAL 14"
+    assert catalogo.buscar("ptr", limite=1)[0]["descripcion"] == 'PTR 3/4 x 3/4 CAL 14'
+    assert catalogo.buscar("zzz") == []
+
+
+def test_snapshot_binario(tmp_path):
+    primero = _catalogo(tmp_path)
+    assert primero.fuente == "csv"
+    assert (tmp_path / "catalogo.snapshot").exists()
+
+    segundo = _catalogo(tmp_path)
+    assert segundo.fuente == "snapshot"
+    assert segundo.version == primero.version
+    assert segundo.buscar("ptr") == primero.buscar("ptr")
+
+
+def test_snapshot_no_confiable_se_descarta(tmp_path):
+    """Un snapshot ajeno (p. ej. un pickle) no se deserializa: se reconstruye desde el CSV"""
+    import pickle
+    _catalogo(tmp_path)
+    (tmp_path / "catalogo.snapshot").write_bytes(pickle.dumps({"formato": 1, "indice": {}}))
+
+    catalogo = _catalogo(tmp_path)
+    assert catalogo.fuente == "csv"
+    assert _catalogo(tmp_path).fuente == "snapshot"
+
+
+def test_recarga_en_caliente(tmp_path):
+    catalogo = _catalogo(tmp_path)
+    version = catalogo.version
+
+    ruta = tmp_path / "materiales.csv"
+    ruta.write_text(CSV + "Solera 1/2 x 1/8,0.32,Peso x metro lineal\n", encoding="utf-8")
+    os.utime(ruta, ns=(os.stat(ruta).st_atime_ns, os.stat(ruta).st_mtime_ns + 10**9))
+
+    assert catalogo.obtener("solera 1/2 x 1/8")["peso"] == 0.32
+    assert catalogo.version != version
+    assert catalogo.recargas == 1
+    assert catalogo.etag("q") != ""
+
+    # La recarga reescribió el snapshot para el CSV nuevo
+    assert _catalogo(tmp_path).fuente == "snapshot"
+    assert len(_catalogo(tmp_path).materiales) == 5
+
+
+def test_sin_csv_usa_defaults(tmp_path):
+    catalogo = MaterialsCatalog(ruta_csv=str(tmp_path / "no_existe.csv"), ruta_snapshot=None)
+    assert catalogo.fuente == "default"
+    assert catalogo.obtener("Acero estructural")["peso"] == 7850.0
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del almacén de series de métricas
+Valida los anillos de capacidad fija, la reducción a minutos y horas, la
+elección automática de resolución y la persistencia binaria (snapshot de
+tamaño constante + bitácora append-only con final truncado)
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from metrics_store import AlmacenMetricas, Anillo
+
+T0 = 1_700_000_000 - 1_700_000_000 % 3600  # inicio de una hora
+
+
+def test_anillo_sobrescribe_lo_mas_viejo():
+    anillo = Anillo(3)
+    for t in range(5):
+        anillo.agregar(t, 1, t, t, t)
+    assert [fila[0] for fila in anillo.filas()] == [2, 3, 4]
+    assert anillo.mas_antiguo() == 2 and anillo.cantidad == 3
+    assert [fila[0] for fila in anillo.filas(desde=3)] == [3, 4]
+
+
+def test_reduccion_a_minutos_y_horas():
+    almacen = AlmacenMetricas(ruta='', capacidades={'crudo': 10, 'minuto': 100, 'hora': 10})
+    # 2 horas y media, una muestra cada 30 s: valor = minuto desde T0
+    for k in range(300):
+        almacen.registrar('latencia', k // 2, t=T0 + 30 * k)
+
+    crudo = almacen.consultar('latencia', resolucion='crudo')
+    assert len(crudo) == 10 and crudo[-1]['t'] == T0 + 30 * 299
+
+    minutos = almacen.consultar('latencia', resolucion='minuto')
+    assert minutos[-1] == {'t': T0 + 149 * 60, 'n': 2, 'promedio': 149.0, 'min': 149.0, 'max': 149.0}
+    assert len(minutos) == 101  # anillo lleno (100) + el minuto en curso
+
+    horas = almacen.consultar('latencia', resolucion='hora')
+    assert [h['t'] for h in horas] == [T0, T0 + 3600, T0 + 7200]
+    assert horas[0] == {'t': T0, 'n': 120, 'promedio': 29.5, 'min': 0.0, 'max': 59.0}
+
+    # auto: el crudo solo cubre los últimos 5 min, el anillo de minutos ~100 min
+    assert len(almacen.consultar('latencia', desde=T0 + 30 * 295)) == 5
+    assert almacen.consultar('latencia', desde=T0 + 7200)[0]['n'] == 2
+    assert almacen.consultar('latencia', desde=T0)[0]['n'] == 120
+    with pytest.raises(ValueError):
+        almacen.consultar('latencia', resolucion='semana')
+
+
+def test_memoria_constante():
+    almacen = AlmacenMetricas(ruta='', capacidades={'crudo': 50, 'minuto': 50, 'hora': 50})
+    almacen.registrar('disco', 1, t=T0)
+    memoria = almacen.obtener_estado()['bytes_memoria']
+    for k in range(5000):
+        almacen.registrar('disco', k, t=T0 + 60 * k)
+    assert almacen.obtener_estado()['bytes_memoria'] == memoria
+
+
+def test_persistencia_snapshot_y_bitacora(tmp_path):
+    ruta = str(tmp_path / 'metricas.bin')
+    capacidades = {'crudo': 20, 'minuto': 20, 'hora': 20}
+    almacen = AlmacenMetricas(ruta, capacidades)
+    for k in range(10):
+        almacen.registrar('busqueda', k, t=T0 + 20 * k)
+    almacen.guardar()
+    almacen.registrar('disco', 50.0, t=T0 + 300)  # solo en la bitácora
+    almacen.cerrar()
+    # Un proceso que muere a mitad de un registro deja un final truncado
+    with open(ruta + '.log', 'ab') as f:
+        f.write(b'S\x00')
+
+    recargado = AlmacenMetricas(ruta, capacidades)
+    assert recargado.nombres() == ['busqueda', 'disco']
+    assert recargado.consultar('busqueda', resolucion='crudo') == almacen.consultar('busqueda', resolucion='crudo')
+    assert recargado.consultar('busqueda', resolucion='minuto') == almacen.consultar('busqueda', resolucion='minuto')
+    assert recargado.ultimo('disco') == (T0 + 300, 50.0)
+    # Al cargar se consolida todo en el snapshot
+    assert os.path.getsize(ruta + '.log') == 0
+    recargado.cerrar()
+
+
+def test_snapshot_de_tamano_constante_y_compactacion(tmp_path, monkeypatch):
+    monkeypatch.setenv('METRICS_LOG_MAX_BYTES', '2000')
+    ruta = str(tmp_path / 'metricas.bin')
+    almacen = AlmacenMetricas(ruta, {'crudo': 30, 'minuto': 30, 'hora': 3})
+    for k in range(200):
+        almacen.registrar('latencia', k, t=T0 + 60 * k)
+    almacen.guardar()
+    tamano = os.path.getsize(ruta)
+
+    for k in range(200, 2000):
+        almacen.registrar('latencia', k, t=T0 + 60 * k)
+        assert os.path.getsize(ruta + '.log') < 2000  # se compacta sola
+    almacen.guardar()
+    assert os.path.getsize(ruta) == tamano
+    almacen.cerrar()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de normalización numérica al guardar
+Valida normalizar_cotizacion, su uso en guardar_cotizacion/guardar_draft y la
+migración única de filas guardadas en modo offline
+"""
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from normalizar_numeros_cotizaciones import migrar
+from pricing_engine import LoteItems, leer_numero, normalizar_cotizacion
+from supabase_manager import SupabaseManager
+
+
+def _cotizacion_texto(numero="BMW-CWS-RM-001-R1-NAVE"):
+    return {
+        "numeroCotizacion": numero,
+        "datosGenerales": {"numeroCotizacion": numero, "cliente": "BMW", "vendedor": "RM", "proyecto": "NAVE"},
+        "condiciones": {"moneda": "USD", "tipoCambio": "18,50"},
+        "items": [
+            {"descripcion": "Rack", "cantidad": "2", "seguridad": "10", "descuento": "", "instalacion": "1,250.00",
+             "materiales": [{"material": "PTR", "peso": "", "cantidad": "3", "precio": "1,234.5", "subtotal": "3703.5"}]},
+            {"descripcion": "Flete legacy", "cantidad": "", "precio_unitario": "500", "total": "1500"},
+        ],
+    }
+
+
+def _manager_offline(tmp_path, cotizaciones):
+    archivo = tmp_path / "cotizaciones_offline.json"
+    archivo.write_text(json.dumps({"cotizaciones": cotizaciones}), encoding="utf-8")
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(archivo)
+    return manager
+
+
+def test_normalizar_cotizacion():
+    cot = _cotizacion_texto()
+    assert normalizar_cotizacion(cot) == 12
+
+    rack, flete = cot["items"]
+    assert rack["cantidad"] == 2 and isinstance(rack["cantidad"], int)
+    assert rack["descuento"] == 0 and rack["instalacion"] == 1250
+    assert rack["materiales"][0] == {"material": "PTR", "peso": 1, "cantidad": 3, "precio": 1234.5, "subtotal": 3703.5}
+    assert flete == {"descripcion": "Flete legacy", "cantidad": 0, "precio_unitario": 500, "total": 1500}
+    assert "seguridad" not in flete  # no se agregan llaves: sigue siendo legacy
+    assert cot["condiciones"]["tipoCambio"] == 18.5
+
+    assert normalizar_cotizacion(cot) == 0  # idempotente
+
+
+def test_tipo_cambio_vacio_y_conservar_vacios():
+    cot = {"condiciones": {"tipoCambio": ""}, "items": [{"cantidad": "", "seguridad": "5"}]}
+    normalizar_cotizacion(cot, conservar_vacios=True)
+    assert cot == {"condiciones": {"tipoCambio": ""}, "items": [{"cantidad": "", "seguridad": 5}]}
+
+    normalizar_cotizacion(cot)
+    assert cot["condiciones"]["tipoCambio"] is None
+    assert cot["items"][0]["cantidad"] == 1
+
+
+def test_totales_identicos_antes_y_despues():
+    original = _cotizacion_texto()
+    normalizada = _cotizacion_texto()
+    normalizar_cotizacion(normalizada)
+    antes, despues = LoteItems(original["items"]), LoteItems(normalizada["items"])
+    assert list(antes.total) == list(despues.total)
+
+
+def test_leer_numero():
+    assert leer_numero(3) == 3
+    assert leer_numero(2.5) == 2.5
+    assert leer_numero("1,234.50") == 1234.5
+    assert leer_numero(None, 1.0) == 1.0
+
+
+def test_guardar_cotizacion_normaliza(tmp_path):
+    manager = _manager_offline(tmp_path, [])
+    assert manager.guardar_cotizacion(_cotizacion_texto())["success"]
+
+    guardada = manager._cargar_datos_offline()["cotizaciones"][0]
+    rack = guardada["items"][0]
+    assert rack["cantidad"] == 2 and rack["materiales"][0]["precio"] == 1234.5
+    assert guardada["condiciones"]["tipoCambio"] == 18.5
+
+
+def test_guardar_draft_conserva_vacios(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = _manager_offline(tmp_path, [])
+    datos = _cotizacion_texto()
+    assert manager.guardar_draft({"vendedor": "RM", "datos": datos})["success"]
+
+    draft = json.loads((tmp_path / "drafts_offline.json").read_text(encoding="utf-8"))["drafts"][0]
+    rack = draft["datos"]["items"][0]
+    assert rack["cantidad"] == 2 and rack["descuento"] == ""
+
+
+def test_migracion_offline(tmp_path):
+    manager = _manager_offline(tmp_path, [_cotizacion_texto("A-1"), _cotizacion_texto("B-2")])
+
+    assert migrar(manager, dry_run=True)["modificadas"] == 2
+    assert isinstance(manager._cargar_datos_offline()["cotizaciones"][0]["items"][0]["cantidad"], str)
+
+    resumen = migrar(manager)
+    assert resumen["actualizadas"] == 2
+    guardada = manager._cargar_datos_offline()["cotizaciones"][1]
+    assert guardada["items"][0]["materiales"][0]["peso"] == 1
+    assert guardada["condiciones"]["tipoCambio"] == 18.5
+
+    assert migrar(manager)["modificadas"] == 0
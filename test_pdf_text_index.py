@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del índice de texto completo de PDFs
+Valida indexación incremental por checksum, búsqueda con snippets, paginación
+y aislamiento por compañía
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pdf_text_index
+from pdf_text_index import PDFTextIndex
+
+
+def _extractor_falso(llamadas):
+    """Sustituye PyPDF2: el 'PDF' es texto plano en bytes"""
+    def extraer(contenido, max_pages=None):
+        llamadas.append(contenido)
+        return {"num_pages": 1, "metadata": {}, "text": contenido.decode("utf-8")}
+    return extraer
+
+
+def test_busqueda_con_snippet_y_acentos(tmp_path):
+    index = PDFTextIndex(db_path=str(tmp_path / "index.db"))
+    index.indexar_texto("local/antiguas/A.pdf", "Suministro de estructura metálica para nave",
+                        "local/antiguas", "A.pdf", checksum="c1", company_id="c1")
+    index.indexar_texto("local/antiguas/B.pdf", "Mantenimiento de techumbre",
+                        "local/antiguas", "B.pdf", checksum="c2", company_id="c1")
+
+    resultado = index.buscar("metalica", "c1")
+    assert resultado["total"] == 1
+    assert resultado["resultados"][0]["numero_cotizacion"] == "A"
+    assert "<mark>metálica</mark>" in resultado["resultados"][0]["snippet"]
+
+    # Prefijo en el último término y consulta con comillas no rompe FTS5
+    assert index.buscar("techum", "c1")["total"] == 1
+    assert index.buscar('"nave', "c1")["total"] == 1
+
+
+def test_paginacion(tmp_path):
+    index = PDFTextIndex(db_path=str(tmp_path / "index.db"))
+    for i in range(5):
+        index.indexar_texto(f"k{i}", "acero estructural", "local/nuevas", f"COT-{i}.pdf", checksum=str(i),
+                            company_id="c1")
+
+    pagina = index.buscar("acero", "c1", page=2, per_page=2)
+    assert pagina["total"] == 5
+    assert pagina["pages"] == 3
+    assert len(pagina["resultados"]) == 2
+
+
+def test_aislamiento_por_compania(tmp_path):
+    index = PDFTextIndex(db_path=str(tmp_path / "index.db"))
+    index.indexar_texto("a", "acero inoxidable", "local/nuevas", "A-1.pdf", checksum="1", company_id="c1")
+    index.indexar_texto("b", "acero al carbon", "local/nuevas", "B-1.pdf", checksum="2", company_id="c2")
+    index.indexar_texto("h", "acero historico", "drive/antiguas", "H-1.pdf", checksum="3")
+
+    assert [r["doc_key"] for r in index.buscar("acero", "c1")["resultados"]] == ["a"]
+    assert index.buscar("acero", "c2")["total"] == 1
+    assert index.buscar("acero", None)["total"] == 0
+    # Sin cotización registrada: solo con incluir_sin_compania (compañía legacy)
+    legacy = index.buscar("acero", "c1", incluir_sin_compania=True)
+    assert sorted(r["doc_key"] for r in legacy["resultados"]) == ["a", "h"]
+    assert legacy["total"] == 2
+
+
+def test_sincronizacion_incremental_por_checksum(tmp_path, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(pdf_text_index, "PDF_TEXT_EXTRACTION", True)
+    monkeypatch.setattr(pdf_text_index, "extract_pdf_text", _extractor_falso(llamadas))
+
+    antiguas = tmp_path / "antiguas"
+    antiguas.mkdir()
+    (antiguas / "BMW-001.pdf").write_bytes("lamina galvanizada".encode("utf-8"))
+    (antiguas / "MAZDA-002.pdf").write_bytes("perfil IPR".encode("utf-8"))
+
+    pdf_manager = SimpleNamespace(nuevas_path=tmp_path / "nuevas", antiguas_path=antiguas, drive_client=None)
+    index = PDFTextIndex(pdf_manager, db_path=str(tmp_path / "index.db"),
+                         resolver_companias=lambda numeros: {n: "c1" for n in numeros if n.startswith("BMW")})
+
+    resultado = index.sincronizar()
+    assert resultado["indexados"] == 2 and resultado["companias_asignadas"] == 1
+    assert len(llamadas) == 2
+
+    # Sin cambios: no se vuelve a extraer nada
+    assert index.sincronizar()["sin_cambios"] == 2
+    assert len(llamadas) == 2
+
+    # Cambio de contenido: solo ese archivo se re-extrae
+    (antiguas / "BMW-001.pdf").write_bytes("lamina pintro calibre 26".encode("utf-8"))
+    os.utime(antiguas / "BMW-001.pdf", (1, 1))
+    assert index.sincronizar()["indexados"] == 1
+    assert len(llamadas) == 3
+    assert index.buscar("pintro", "c1")["total"] == 1
+    assert index.buscar("galvanizada", "c1")["total"] == 0
+    assert index.buscar("IPR", "c1")["total"] == 0
+    assert index.buscar("IPR", "c1", incluir_sin_compania=True)["total"] == 1
+
+    # Archivo eliminado: se purga del índice
+    (antiguas / "MAZDA-002.pdf").unlink()
+    assert index.sincronizar()["eliminados"] == 1
+    assert index.buscar("IPR", "c1", incluir_sin_compania=True)["total"] == 0
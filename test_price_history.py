@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del historial de precios por material
+Valida estadísticas móviles (último, mediana, mín, máx), reemplazo al
+re-guardar, ventana, aislamiento por compañía/moneda y la precarga desde
+SupabaseManager en modo offline
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from price_history import PriceHistory
+from supabase_manager import SupabaseManager
+
+PTR = 'PTR 2" x 2" CAL 14'
+
+
+def _cot(numero, precio, company_id="c1", moneda="MXN", dias_atras=0):
+    return {
+        "numeroCotizacion": numero,
+        "company_id": company_id,
+        "fechaCreacion": (datetime.now() - timedelta(days=dias_atras)).isoformat(),
+        "condiciones": {"moneda": moneda},
+        "items": [{"descripcion": "Rack", "cantidad": 1, "materiales": [
+            {"material": PTR, "peso": 3, "cantidad": 10, "precio": precio, "subtotal": 30 * precio},
+        ], "otrosMateriales": [{"descripcion": "Tornillería", "cantidad": 4, "precio": 2.5, "subtotal": 10}]}],
+    }
+
+
+def test_estadisticas_incrementales():
+    historial = PriceHistory()
+    for numero, precio in (("A-1", 40), ("A-2", 60), ("A-3", 45), ("A-4", 50)):
+        historial.registrar_cotizacion(_cot(numero, precio))
+
+    ptr = historial.sugerir([PTR], company_id="c1")[PTR]
+    assert (ptr["ultimo"], ptr["mediana"], ptr["minimo"], ptr["maximo"], ptr["muestras"]) == (50, 47.5, 40, 60, 4)
+    assert ptr["cotizacion_ultimo"] == "A-4"
+
+    # Re-guardar reemplaza los precios de esa cotización
+    historial.registrar_cotizacion(_cot("A-2", 55))
+    ptr = historial.sugerir(["ptr 2 x 2 cal 14"], company_id="c1")["ptr 2 x 2 cal 14"]
+    assert (ptr["ultimo"], ptr["maximo"], ptr["muestras"]) == (55, 55, 4)
+
+    historial.on_cotizacion_cambiada("eliminada", {"numeroCotizacion": "A-2"})
+    assert historial.sugerir([PTR], company_id="c1")[PTR]["muestras"] == 3
+
+    assert historial.sugerir(["Tornillería"], company_id="c1", tipo="otro")["Tornillería"]["ultimo"] == 2.5
+    assert historial.sugerir(["No existe"], company_id="c1")["No existe"] is None
+    assert historial.sugerir([PTR], company_id=None) == {PTR: None}
+
+
+def test_aislamiento_y_ventana():
+    historial = PriceHistory(ventana=3)
+    for k in range(10):
+        historial.registrar_cotizacion(_cot(f"A-{k}", 10 + k))
+    historial.registrar_cotizacion(_cot("B-1", 99, company_id="c2"))
+    historial.registrar_cotizacion(_cot("U-1", 3, moneda="USD"))
+
+    ptr = historial.sugerir([PTR], company_id="c1")[PTR]
+    assert (ptr["muestras"], ptr["minimo"], ptr["maximo"]) == (3, 17, 19)
+    assert historial.sugerir([PTR], company_id="c2")[PTR]["ultimo"] == 99
+    assert historial.sugerir([PTR], company_id="c1", moneda="USD")[PTR]["ultimo"] == 3
+
+
+def test_precarga_y_callback_offline(tmp_path):
+    archivo = tmp_path / "cotizaciones_offline.json"
+    archivo.write_text(json.dumps({"cotizaciones": [
+        _cot("A-1", 40, dias_atras=30), _cot("A-2", 42, dias_atras=5), _cot("VIEJA", 1, dias_atras=900),
+    ]}), encoding="utf-8")
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(archivo)
+
+    historial = PriceHistory(manager)
+    manager.registrar_callback_cotizacion(historial.on_cotizacion_cambiada)
+
+    ptr = historial.sugerir([PTR], company_id="c1")[PTR]
+    assert (ptr["ultimo"], ptr["muestras"]) == (42, 2)  # fuera de dias_historial no se carga
+
+    nueva = _cot("A-3", 48)
+    nueva["datosGenerales"] = {"numeroCotizacion": "A-3"}
+    assert manager.guardar_cotizacion(nueva, company_id="c1")["success"]
+    ptr = historial.sugerir([PTR], company_id="c1")[PTR]
+    assert (ptr["ultimo"], ptr["mediana"], ptr["muestras"]) == (48, 42, 3)
+    assert historial.obtener_estado()["companias_cargadas"] == 1
+
+
+def test_callback_sin_compania_no_mueve_precios():
+    historial = PriceHistory()
+    historial.on_cotizacion_cambiada('guardada', _cot("A-1", 40))
+
+    sincronizada = _cot("A-1", 40)
+    del sincronizada["company_id"]
+    historial.on_cotizacion_cambiada('sincronizada', sincronizada)
+
+    assert historial.sugerir([PTR], company_id="c1")[PTR]["ultimo"] == 40
+    assert {clave[0] for clave in historial._series} == {"c1"}
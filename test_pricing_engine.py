@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de paridad del motor de precios
+Fija los resultados de pricing_engine contra la fórmula que existía copiada en
+guardar_cotizacion, todas_cotizaciones y preparar_datos_nueva_revision
+"""
+
+import json
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pricing_engine
+from pricing_engine import (LoteItems, aplicar_a_items, calcular_item, convertir_numero,
+                            redondear, resumen_cotizacion, totales_cotizaciones)
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def _formula_anterior(item):
+    """Fórmula previa (sin redondear), tal como estaba en guardar_cotizacion"""
+    def _f(v, d=0.0):
+        try: return float(v) if v not in (None, '') else d
+        except (ValueError, TypeError): return d
+    mats = item.get('materiales', [])
+    total_mat = sum(float(m.get('subtotal', 0)) if isinstance(m, dict) else 0.0
+                    for m in (mats if isinstance(mats, list) else []))
+    otros = item.get('otrosMateriales', [])
+    total_otr = sum(float(m.get('subtotal', 0)) if isinstance(m, dict) else 0.0
+                    for m in (otros if isinstance(otros, list) else []))
+    transp, inst = _f(item.get('transporte', 0)), _f(item.get('instalacion', 0))
+    seg, desc = _f(item.get('seguridad', 0)), _f(item.get('descuento', 0))
+    cant = _f(item.get('cantidad', 1))
+    if cant <= 0:
+        cant = 1.0
+    subtotal_base = total_mat + total_otr + transp + inst
+    subtotal_con_seg = subtotal_base + subtotal_base * (seg / 100.0)
+    costo_unidad = subtotal_con_seg - subtotal_con_seg * (desc / 100.0)
+    return costo_unidad, costo_unidad * cant
+
+
+def _item_aleatorio(rng):
+    return {
+        'materiales': [{'subtotal': f"{rng.uniform(0, 5000):.2f}"} for _ in range(rng.randint(0, 6))],
+        'otrosMateriales': [{'subtotal': rng.uniform(0, 900)} for _ in range(rng.randint(0, 3))],
+        'transporte': str(rng.choice([0, 150, 1250.5])),
+        'instalacion': rng.choice(['', 0, 800]),
+        'seguridad': rng.choice([0, 5, 10, '12.5']),
+        'descuento': rng.choice([0, 3, '7']),
+        'cantidad': rng.choice(['1', 2, '0', -1, '15', None]),
+    }
+
+
+def test_paridad_con_formula_anterior():
+    """Los valores sin redondear coinciden bit a bit con la fórmula previa"""
+    rng = random.Random(20250101)
+    items = [_item_aleatorio(rng) for _ in range(500)]
+    lote = LoteItems(items)
+    for i, item in enumerate(items):
+        costo, total = _formula_anterior(item)
+        assert lote.costo_unidad[i] == costo
+        assert lote.total[i] == total
+        resultado = lote.resultado(i)
+        # Solo difiere de round() en empates de medio centavo (p. ej. 113647.905)
+        assert abs(resultado['total'] - round(total, 2)) < 0.0101
+        assert resultado['total'] == redondear(total)
+
+
+def test_paridad_con_cotizaciones_guardadas():
+    """Las cotizaciones del JSON offline conservan sus totales guardados"""
+    with open(os.path.join(DIRECTORIO, 'cotizaciones_offline.json'), encoding='utf-8') as f:
+        cotizaciones = json.load(f)['cotizaciones']
+
+    for cot in cotizaciones:
+        for item in cot.get('items', []):
+            if pricing_engine.es_item_estructurado(item) and item.get('total') not in (None, ''):
+                _, total = _formula_anterior(item)
+                assert calcular_item(item)['total'] == round(total, 2)
+
+
+def test_lote_igual_a_escalar():
+    """totales_cotizaciones() agrupa correctamente partidas de varias cotizaciones"""
+    rng = random.Random(7)
+    cotizaciones = [{'items': [_item_aleatorio(rng) for _ in range(rng.randint(0, 5))]} for _ in range(40)]
+    cotizaciones.append({'items': None})
+
+    totales = totales_cotizaciones(cotizaciones)
+    for cot, total in zip(cotizaciones, totales):
+        esperado = sum(calcular_item(i)['total'] for i in cot['items'] or [])
+        assert abs(total - esperado) < 1e-6
+
+
+def test_aplicar_a_items_y_partidas_legacy():
+    items = [
+        {'materiales': [{'subtotal': '100'}], 'seguridad': '10', 'descuento': '5', 'cantidad': '2'},
+        {'descripcion': 'legacy', 'precio_unitario': '50', 'cantidad': '3', 'subtotal': 150},
+    ]
+    aplicar_a_items(items, incluir_subtotales=True)
+    assert items[0]['costoUnidad'] == 104.5
+    assert items[0]['total'] == 209.0
+    assert items[0]['subtotalMateriales'] == 100.0
+    assert 'costoUnidad' not in items[1]
+
+    resumen = resumen_cotizacion(items)
+    assert resumen == {'subtotal': 359.0, 'iva': 57.44, 'total': 416.44}
+
+
+def test_completar_legacy_para_mostrar():
+    """Las líneas mostradas suman exactamente el subtotal del resumen"""
+    items = [
+        {'materiales': [{'subtotal': '10.01'}], 'cantidad': '3', 'total': 999},
+        {'descripcion': 'legacy sin total', 'precio_unitario': '12.5', 'cantidad': '2'},
+        {'descripcion': 'legacy con total', 'total': '40'},
+    ]
+    aplicar_a_items(items, completar_legacy=True)
+    assert [i['total'] for i in items] == [30.03, 25.0, '40']
+    assert resumen_cotizacion(items)['subtotal'] == 95.03
+
+    sin_completar = [{'descripcion': 'legacy', 'precio_unitario': '5'}]
+    aplicar_a_items(sin_completar)
+    assert 'total' not in sin_completar[0]
+
+
+def test_redondeo_decimal_y_conversion():
+    assert redondear(2.675) == 2.68
+    assert redondear(-1.005) == -1.01
+    assert convertir_numero('1,234.50') == 1234.5
+    assert convertir_numero('123,45') == 123.45
+    assert convertir_numero('abc', 7.0) == 7.0
+    assert convertir_numero(None, 1.0) == 1.0
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de exportación masiva de cotizaciones
+Valida los formatos CSV/JSONL/XLSX, el nivel de líneas y los filtros en modo offline
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+import zipfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quote_export import exportar
+from supabase_manager import SupabaseManager
+
+COTIZACIONES = [
+    {
+        "numeroCotizacion": "BMW-CWS-RM-001-R1-NAVE",
+        "fechaCreacion": "2025-01-05T10:00:00",
+        "company_id": "c1",
+        "datosGenerales": {"cliente": "BMW", "vendedor": "RM", "proyecto": "Nave & <Racks>"},
+        "condiciones": {"moneda": "USD", "tipoCambio": "18.5"},
+        "items": [
+            {"descripcion": "Rack", "cantidad": "2", "total": "300",
+             "materiales": [{"material": "PTR 2\"", "cantidad": "3", "precio": "50", "subtotal": "150"}],
+             "otrosMateriales": [{"descripcion": "Rodajas", "cantidad": "1", "precio": "10", "subtotal": "10"}]},
+            {"descripcion": "Flete", "cantidad": "1", "total": "50"},
+        ],
+    },
+    {
+        "numeroCotizacion": "AUDI-CWS-JL-002-R1-X",
+        "fechaCreacion": "2025-03-01T10:00:00",
+        "company_id": "c2",
+        "datosGenerales": {"cliente": "AUDI", "vendedor": "JL"},
+        "items": [],
+    },
+]
+
+
+def _manager_offline(tmp_path):
+    archivo = tmp_path / "cotizaciones_offline.json"
+    archivo.write_text(json.dumps({"cotizaciones": COTIZACIONES}), encoding="utf-8")
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(archivo)
+    return manager
+
+
+def test_csv_por_cotizacion_con_filtros(tmp_path):
+    manager = _manager_offline(tmp_path)
+
+    contenido = b"".join(exportar(manager, "csv")).decode("utf-8-sig")
+    filas = list(csv.DictReader(io.StringIO(contenido)))
+    assert [f["numero_cotizacion"] for f in filas] == ["BMW-CWS-RM-001-R1-NAVE", "AUDI-CWS-JL-002-R1-X"]
+    assert filas[0]["subtotal"] == "350.0"
+    assert filas[0]["moneda"] == "USD"
+
+    contenido = b"".join(exportar(manager, "csv", company_id="c2")).decode("utf-8-sig")
+    assert len(list(csv.DictReader(io.StringIO(contenido)))) == 1
+
+    contenido = b"".join(exportar(manager, "csv", desde="2025-02-01", hasta="2025-03-01")).decode("utf-8-sig")
+    filas = list(csv.DictReader(io.StringIO(contenido)))
+    assert [f["cliente"] for f in filas] == ["AUDI"]
+
+
+def test_jsonl_por_lineas(tmp_path):
+    manager = _manager_offline(tmp_path)
+
+    lineas = b"".join(exportar(manager, "jsonl", nivel="lineas", company_id="c1")).decode("utf-8").splitlines()
+    filas = [json.loads(l) for l in lineas]
+    assert [(f["partida"], f["tipo_material"], f["material"]) for f in filas] == [
+        (1, "material", 'PTR 2"'),
+        (1, "otro", "Rodajas"),
+        (2, "", ""),
+    ]
+
+
+def test_xlsx_es_un_zip_valido(tmp_path):
+    manager = _manager_offline(tmp_path)
+
+    contenido = b"".join(exportar(manager, "xlsx"))
+    with zipfile.ZipFile(io.BytesIO(contenido)) as zf:
+        assert zf.testzip() is None
+        hoja = zf.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert hoja.count("<row>") == 3
+    assert "Nave &amp; &lt;Racks&gt;" in hoja
+
+
+def test_formato_invalido(tmp_path):
+    manager = _manager_offline(tmp_path)
+    try:
+        exportar(manager, "pdf")
+        assert False, "debió fallar"
+    except ValueError:
+        pass
+
+
+class _CursorRegistrado:
+    def __init__(self, registro, nombre=None):
+        self.registro = registro
+        self.nombre = nombre
+
+    def execute(self, sql, params=None):
+        self.registro.append((self.nombre, " ".join(sql.split()), params))
+
+    def __iter__(self):
+        return iter([])
+
+    def close(self):
+        pass
+
+
+class _ConexionRegistrada:
+    def __init__(self):
+        self.registro = []
+        self.cerrada = False
+
+    def cursor(self, name=None):
+        return _CursorRegistrado(self.registro, name)
+
+    def close(self):
+        self.cerrada = True
+
+
+def test_conexion_dedicada_fija_contexto_rls(tmp_path):
+    """El cursor server-side corre con app.current_company_id de la compañía exportada"""
+    manager = _manager_offline(tmp_path)
+    conexion = _ConexionRegistrada()
+    list(manager._iterar_cotizaciones_supabase(conexion, "c1", None, None, 100))
+
+    (nombre_contexto, sql_contexto, params_contexto), (nombre, sql, params) = conexion.registro
+    assert nombre_contexto is None and "set_config('app.current_company_id'" in sql_contexto
+    assert params_contexto == ("c1",)
+    assert nombre == "export_cotizaciones" and "company_id = %s" in sql and params == ["c1"]
+    assert conexion.cerrada
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de la proyección de partidas y materiales
+Valida proyectar_cotizacion (mismas reglas que la migración v2.4), las
+estadísticas por material y las consultas de SupabaseManager en modo offline
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quote_items import agregar_por_material, proyectar_cotizacion
+from supabase_manager import SupabaseManager
+
+
+def _cotizacion(numero, precio_ptr, dias_atras=0, company_id="c1", moneda="MXN"):
+    return {
+        "numeroCotizacion": numero,
+        "company_id": company_id,
+        "fechaCreacion": (datetime.now() - timedelta(days=dias_atras)).isoformat(),
+        "datosGenerales": {"cliente": "BMW ", "vendedor": "RM"},
+        "condiciones": {"moneda": moneda},
+        "items": [
+            {"descripcion": "Rack", "cantidad": 2, "uom": "Pieza", "costoUnidad": 500, "total": 1000,
+             "materiales": [
+                 {"material": 'PTR 2" x 2" CAL 14', "peso": 3, "cantidad": 10, "precio": precio_ptr,
+                  "subtotal": 30 * precio_ptr},
+                 {"material": "", "peso": 1, "cantidad": 1, "precio": 1},
+             ],
+             "otrosMateriales": [{"descripcion": "Tornillería", "cantidad": 4, "precio": 2.5, "subtotal": 10}]},
+            "no es dict",
+            {"descripcion": "Nave", "cantidad": 1,
+             "materiales": [{"material": "COTIZAR_POR_PESO", "pesoEstructura": 500, "precioKg": 25.5,
+                             "subtotal": 12750, "tipoCotizacion": "peso"}]},
+        ],
+    }
+
+
+def _manager_offline(tmp_path, cotizaciones):
+    archivo = tmp_path / "cotizaciones_offline.json"
+    archivo.write_text(json.dumps({"cotizaciones": cotizaciones}), encoding="utf-8")
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(archivo)
+    return manager
+
+
+def test_proyectar_cotizacion():
+    partidas, materiales = proyectar_cotizacion(_cotizacion("A-1", 40))
+
+    assert [p["partida"] for p in partidas] == [1, 3]  # partida = posición en items
+    assert partidas[0]["cliente"] == "BMW" and partidas[0]["total"] == 1000
+
+    ptr, otro, peso = materiales
+    assert (ptr["tipo"], ptr["descripcion_normalizada"], ptr["kg"], ptr["precio_kg"]) == \
+        ("material", "ptr 2 x 2 cal 14", 30, 40)
+    assert (otro["tipo"], otro["kg"], otro["precio_kg"], otro["precio"]) == ("otro", None, None, 2.5)
+    assert (peso["tipo"], peso["partida"], peso["kg"], peso["precio_kg"]) == ("peso", 3, 500, 25.5)
+    assert all(m["numero_cotizacion"] == "A-1" and m["moneda"] == "MXN" for m in materiales)
+
+
+def test_agregar_por_material():
+    filas = []
+    for numero, precio in (("A-1", 40), ("A-2", 50), ("A-3", 60)):
+        filas.extend(proyectar_cotizacion(_cotizacion(numero, precio))[1])
+    filas.extend(proyectar_cotizacion(_cotizacion("U-1", 3, moneda="USD"))[1])
+
+    estadisticas = {(e["descripcion_normalizada"], e["moneda"]): e for e in agregar_por_material(filas)}
+    ptr = estadisticas[("ptr 2 x 2 cal 14", "MXN")]
+    assert (ptr["usos"], ptr["cotizaciones"], ptr["kg_total"]) == (3, 3, 90)
+    assert (ptr["precio_kg_promedio"], ptr["precio_min"], ptr["precio_max"]) == (50, 40, 60)
+    assert ptr["monto_total"] == 4500
+    assert estadisticas[("ptr 2 x 2 cal 14", "USD")]["precio_kg_promedio"] == 3  # monedas separadas
+    assert estadisticas[("tornilleria", "MXN")]["precio_kg_promedio"] is None
+
+
+def test_consultas_offline(tmp_path):
+    manager = _manager_offline(tmp_path, [
+        _cotizacion("A-1", 40, dias_atras=200),
+        _cotizacion("A-2", 50, dias_atras=10),
+        _cotizacion("A-3", 60, dias_atras=1),
+        _cotizacion("B-1", 99, company_id="c2"),
+    ])
+
+    uso = manager.cotizaciones_por_material('ptr 2" x 2" cal 14', company_id="c1", dias=90)
+    assert uso["fuente"] == "JSON local"
+    assert [u["numero_cotizacion"] for u in uso["usos"]] == ["A-3", "A-2"]
+
+    estadisticas = manager.estadisticas_materiales(company_id="c1", material="PTR 2\" x 2\" CAL 14")
+    assert len(estadisticas["materiales"]) == 1
+    assert estadisticas["materiales"][0]["precio_kg_promedio"] == 50
+
+    assert manager.cotizaciones_por_material("  ", company_id="c1")["usos"] == []
+
+    # Sin compañía no se consulta nada (ni en PostgreSQL ni offline)
+    for consulta in (lambda: manager.cotizaciones_por_material("ptr", company_id=None),
+                     lambda: manager.estadisticas_materiales(company_id=""),
+                     lambda: manager._agregar_materiales_supabase(None, None, None, 10)):
+        try:
+            consulta()
+            assert False, "debió fallar"
+        except ValueError:
+            pass
+
+
+def test_proyeccion_offline_se_actualiza_al_guardar(tmp_path):
+    manager = _manager_offline(tmp_path, [_cotizacion("A-1", 40)])
+    assert len(manager.cotizaciones_por_material("Tornillería", company_id="c1")["usos"]) == 1
+
+    nueva = _cotizacion("A-2", 45)
+    nueva["datosGenerales"]["numeroCotizacion"] = "A-2"
+    assert manager.guardar_cotizacion(nueva, company_id="c1")["success"]
+    usos = manager.cotizaciones_por_material("tornilleria", company_id="c1")["usos"]
+    assert sorted(u["numero_cotizacion"] for u in usos) == ["A-1", "A-2"]
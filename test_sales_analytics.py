@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del cubo de analítica de ventas
+Valida mantenimiento incremental, slice/dice y persistencia de SalesAnalyticsCube
+"""
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sales_analytics import SalesAnalyticsCube
+from supabase_manager import SupabaseManager
+
+
+def _cot(numero, vendedor, cliente, moneda, totales, fecha, company_id="c1"):
+    return {
+        "numeroCotizacion": numero,
+        "datosGenerales": {"vendedor": vendedor, "cliente": cliente},
+        "condiciones": {"moneda": moneda},
+        "items": [{"total": t} for t in totales],
+        "fechaCreacion": fecha,
+        "company_id": company_id
+    }
+
+
+def _cubo(tmp_path):
+    cubo = SalesAnalyticsCube(db_path=str(tmp_path / "cubo.db"))
+    cubo.aplicar(_cot("BMW-CWS-RM-001-R1-NAVE", "RM", "BMW", "MXN", [100, 50], "2025-01-05"))
+    cubo.aplicar(_cot("BMW-CWS-RM-001-R2-NAVE", "RM", "BMW", "MXN", [200], "2025-02-01"))
+    cubo.aplicar(_cot("AUDI-CWS-JL-002-R1-RACK", "JL", "AUDI", "USD", [40], "2025-02-10"))
+    cubo.aplicar(_cot("OTRO-CWS-XX-003-R1-X", "XX", "OTRO", "MXN", [999], "2025-02-10", company_id="c2"))
+    return cubo
+
+
+def test_slice_y_agrupacion(tmp_path):
+    """Agrupar por vendedor dentro de una compañía y filtrar por moneda"""
+    cubo = _cubo(tmp_path)
+
+    r = cubo.consultar(filtros={"company_id": "c1"}, agrupar_por=["vendedor"])
+    assert r["grupos"] == [
+        {"vendedor": "RM", "cotizaciones": 2, "monto": 350.0},
+        {"vendedor": "JL", "cotizaciones": 1, "monto": 40.0},
+    ]
+    assert r["totales"] == {"cotizaciones": 3, "monto": 390.0}
+
+    r = cubo.consultar(filtros={"company_id": "c1", "moneda": ["USD"]}, agrupar_por=["cliente"])
+    assert r["grupos"] == [{"cliente": "AUDI", "cotizaciones": 1, "monto": 40.0}]
+
+    r = cubo.consultar(filtros={"revision": "2"}, agrupar_por=["mes"])
+    assert r["grupos"] == [{"mes": "2025-02", "cotizaciones": 1, "monto": 200.0}]
+
+    r = cubo.consultar(filtros={"company_id": "c1"}, mes_desde="2025-02", agrupar_por=["mes"])
+    assert r["totales"]["monto"] == 240.0
+
+
+def test_actualizacion_incremental_y_eliminacion(tmp_path):
+    """Re-guardar reemplaza la contribución anterior; eliminar la retira"""
+    cubo = _cubo(tmp_path)
+
+    cubo.aplicar(_cot("AUDI-CWS-JL-002-R1-RACK", "JL", "AUDI", "MXN", [60], "2025-02-10"))
+    r = cubo.consultar(filtros={"company_id": "c1"}, agrupar_por=["moneda"])
+    assert r["grupos"] == [{"moneda": "MXN", "cotizaciones": 3, "monto": 410.0}]
+
+    cubo.eliminar("BMW-CWS-RM-001-R2-NAVE")
+    r = cubo.consultar(filtros={"company_id": "c1", "vendedor": "RM"})
+    assert r["totales"] == {"cotizaciones": 1, "monto": 150.0}
+
+
+def test_persistencia_entre_instancias(tmp_path):
+    """El cubo se reconstruye desde los hechos persistidos al reiniciar"""
+    _cubo(tmp_path)
+    cubo = SalesAnalyticsCube(db_path=str(tmp_path / "cubo.db"))
+    assert cubo.consultar()["totales"] == {"cotizaciones": 4, "monto": 1389.0}
+
+
+def test_guardado_offline_notifica_al_cubo(tmp_path):
+    """guardar_cotizacion alimenta el cubo mediante registrar_callback_cotizacion"""
+    archivo = tmp_path / "cotizaciones_offline.json"
+    archivo.write_text(json.dumps({"cotizaciones": []}), encoding="utf-8")
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = None
+    manager.archivo_offline = str(archivo)
+
+    cubo = SalesAnalyticsCube(db_path=str(tmp_path / "cubo.db"))
+    manager.registrar_callback_cotizacion(cubo.on_cotizacion_cambiada)
+
+    datos = _cot("BMW-CWS-RM-001-R1-NAVE", "RM", "BMW", "MXN", [], "2025-01-05")
+    datos["items"] = [{"materiales": [{"subtotal": 100}], "cantidad": 2}]
+    assert manager.guardar_cotizacion(datos)["success"]
+
+    r = cubo.consultar(agrupar_por=["vendedor"])
+    assert r["grupos"] == [{"vendedor": "RM", "cotizaciones": 1, "monto": 200.0}]
+
+    reconstruido = cubo.reconstruir(manager)
+    assert reconstruido["cotizaciones"] == 1
+    assert cubo.consultar()["totales"]["monto"] == 200.0
+
+
+def test_reconstruccion_desde_filas_online(tmp_path):
+    """El backfill por SDK conserva la compañía de cada fila (las filas online no traen claves de la app)"""
+    from benchmarks.fakes import ClienteSupabaseSQLite
+
+    manager = SupabaseManager()
+    manager.modo_offline = True
+    manager.postgresql_disponible = False
+    manager.supabase_client = ClienteSupabaseSQLite()
+    manager.supabase_client.cargar('cotizaciones', [
+        {"id": i, "numero_cotizacion": numero, "company_id": compania, "revision": 1,
+         "datos_generales": {"vendedor": "RM", "cliente": "BMW", "condiciones": {"moneda": "MXN"}},
+         "items": [{"total": total}], "fecha_creacion": "2025-03-01T10:00:00", "timestamp": i,
+         "usuario": None, "observaciones": None}
+        for i, (numero, compania, total) in enumerate([
+            ("BMW-CWS-RM-001-R1-NAVE", "c1", 100), ("BMW-CWS-RM-002-R1-NAVE", "c1", 50),
+            ("BMW-CWS-RM-003-R1-NAVE", "c2", 7)], start=1)
+    ])
+
+    cubo = SalesAnalyticsCube(db_path=str(tmp_path / "cubo.db"))
+    assert cubo.reconstruir(manager, por_pagina=2)["cotizaciones"] == 3
+    assert cubo.consultar(filtros={"company_id": "c1"})["totales"] == {"cotizaciones": 2, "monto": 150.0}
+    assert cubo.consultar(filtros={"company_id": "c2"})["totales"] == {"cotizaciones": 1, "monto": 7.0}
+    assert cubo.consultar(filtros={"company_id": ""})["totales"]["cotizaciones"] == 0
+    manager.supabase_client.cerrar()
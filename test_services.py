@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del registro perezoso de servicios
+Valida construcción única y diferida, hooks al crear, respaldo ante error,
+el proxy, el calentamiento en segundo plano y el candado del proceso líder
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cotizador.services import RegistroServicios, ServicioPerezoso, _adquirir_candado
+
+
+class _Base:
+    def __init__(self):
+        self.callbacks = []
+        self.modo_offline = True
+
+    def registrar_callback_cotizacion(self, funcion):
+        self.callbacks.append(funcion)
+
+
+def test_construccion_perezosa_y_unica():
+    registro = RegistroServicios()
+    construidos = []
+
+    def fabrica():
+        time.sleep(0.02)
+        construidos.append(threading.current_thread().name)
+        return _Base()
+
+    db = registro.registrar('db_manager', fabrica)
+    assert isinstance(db, ServicioPerezoso) and not db.inicializado and construidos == []
+    assert 'pendiente' in repr(db)
+
+    hilos = [threading.Thread(target=lambda: db.modo_offline) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(construidos) == 1 and db.inicializado
+    db.modo_offline = False  # se escribe en el servicio real
+    assert registro.obtener('db_manager').modo_offline is False
+    estado = registro.obtener_estado()['servicios']['db_manager']
+    assert estado['estado'] == 'listo' and estado['ms'] >= 20
+
+
+def test_hooks_dependencias_y_respaldo():
+    registro = RegistroServicios()
+    db = registro.registrar('db_manager', _Base)
+    cubo = registro.registrar('cubo', lambda: registro.obtener('db_manager').registrar_callback_cotizacion('cb') or 'cubo')
+    falla = registro.registrar('falla', lambda: 1 / 0, respaldo=lambda: 'respaldo')
+    nulo = registro.registrar('nulo', lambda: 1 / 0)
+
+    db.al_crear(lambda _: registro.obtener('cubo'))
+    assert not registro.inicializado('cubo')
+    assert db.callbacks == ['cb']  # el hook construye el cubo al crear db_manager
+    assert registro.inicializado('cubo')
+
+    instrumentados = []
+    db.al_crear(instrumentados.append)  # ya construido: inmediato
+    assert instrumentados == [registro.obtener('db_manager')]
+
+    assert registro.obtener('falla') == 'respaldo'
+    assert nulo is not None  # el proxy nunca es None: la disponibilidad se consulta con bool()
+    assert not nulo and registro.obtener('nulo') is None
+    estado = registro.obtener_estado()['servicios']
+    assert estado['falla']['estado'] == 'error' and 'division' in estado['falla']['error']
+
+
+def test_calentamiento_en_segundo_plano():
+    registro = RegistroServicios()
+    registro.registrar('a', lambda: 'A')
+    registro.registrar('b', lambda: 'B', calentar=False)
+
+    hilo = registro.calentar()
+    assert registro.esperar_calentamiento(timeout=5)
+    estado = registro.obtener_estado()['servicios']
+    assert estado['a']['hilo'] == hilo.name == 'ServiciosWarmup'
+    assert estado['b']['estado'] == 'pendiente'
+
+
+def test_candado_de_proceso_lider(tmp_path):
+    ruta = str(tmp_path / 'schedulers.lock')
+    primero = _adquirir_candado(ruta)
+    assert primero is not None
+    if primero is not True:  # POSIX: un segundo descriptor no obtiene el candado
+        assert _adquirir_candado(ruta) is None
+        primero.close()
+        segundo = _adquirir_candado(ruta)
+        assert segundo is not None
+        segundo.close()
+
+
+def test_instrumentacion_no_fuerza_construccion():
+    from flask import Flask
+    from cotizador.instrumentation import init_instrumentation
+
+    registro = RegistroServicios()
+    db = registro.registrar('db_manager', _Base)
+    init_instrumentation(Flask(__name__), db_manager=db)
+    assert not db.inicializado
+    assert registro.obtener('db_manager')._instrumentado
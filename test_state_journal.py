@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del diario de estado append-only
+Valida que reemplazar() escriba solo las diferencias, la recuperación con
+final truncado, la compactación y la recarga del estado de los sistemas de
+fondo (sincronización y monitor de Drive) incluida la migración única desde
+los JSON anteriores
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from enhanced_sync_system import EnhancedSyncSystem, SyncOperation
+from google_drive_monitor import DriveFileInfo, FileChangeEvent, FileChangeType, GoogleDriveMonitor
+from state_journal import DiarioEstado
+
+
+def _lineas(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f]
+
+
+def test_reemplazar_escribe_solo_diferencias(tmp_path):
+    ruta = tmp_path / 'estado.journal'
+    diario = DiarioEstado(ruta, fsync_ms=0)
+    assert not diario.existia
+
+    assert diario.reemplazar({f'op:{n}': {'n': n} for n in range(100)}, prefijo='op:') == 100
+    diario.poner('otro', 1)
+    # Un cambio, un borrado y una alta: tres líneas, no 100
+    nuevo = {f'op:{n}': {'n': n} for n in range(1, 100)}
+    nuevo['op:5'] = {'n': -5}
+    nuevo['op:100'] = {'n': 100}
+    assert diario.reemplazar(nuevo, prefijo='op:') == 3
+    assert diario.reemplazar(nuevo, prefijo='op:') == 0
+    diario.borrar('inexistente')
+    diario.cerrar()
+
+    assert len(_lineas(ruta)) == 104
+    releido = DiarioEstado(ruta)
+    assert releido.existia and releido.get('otro') == 1
+    assert dict(releido.items('op:')) == nuevo
+
+
+def test_final_truncado_se_descarta(tmp_path, caplog):
+    ruta = tmp_path / 'estado.journal'
+    diario = DiarioEstado(ruta, fsync_ms=0)
+    diario.poner('a', 1)
+    diario.poner('b', 2)
+    diario.cerrar()
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.write('{"o":"s","k":"c","v":')  # caída a mitad de escritura
+
+    releido = DiarioEstado(ruta)
+    assert releido.estado == {'a': 1, 'b': 2}
+    assert '[DIARIO]' in caplog.text
+    releido.poner('c', 3)
+    releido.cerrar()
+    assert DiarioEstado(ruta).estado == {'a': 1, 'b': 2, 'c': 3}
+
+
+def test_compactacion(tmp_path):
+    ruta = tmp_path / 'estado.journal'
+    diario = DiarioEstado(ruta, fsync_ms=0, factor_compactacion=4, minimo_compactacion=20)
+    for n in range(50):
+        diario.poner('contador', n)
+    diario.poner('fijo', True)
+    diario.cerrar()
+
+    assert diario.compactaciones >= 2
+    assert len(_lineas(ruta)) < 20
+    assert DiarioEstado(ruta).estado == {'contador': 49, 'fijo': True}
+
+
+def test_sistema_de_sincronizacion_recarga_y_migra(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('sync_queue.json', 'w', encoding='utf-8') as f:
+        json.dump([EnhancedSyncSystem._serializar_operacion(
+            SyncOperation(id='vieja', source='json', target='supabase', operation_type='create',
+                          data={'numero': 'A-1'}, checksum='x', priority=3))], f)
+
+    sync = EnhancedSyncSystem(None)
+    assert [op.id for op in sync.sync_queue] == ['vieja']
+    sync.sync_queue.append(SyncOperation(id='nueva', source='supabase', target='json', operation_type='update',
+                                         data={'numero': 'A-2'}, checksum='y', priority=1))
+    sync._save_persistent_state()
+    sync.diario.cerrar()
+
+    recargado = EnhancedSyncSystem(None)
+    assert [op.id for op in recargado.sync_queue] == ['nueva', 'vieja']  # por prioridad
+    assert recargado.sync_queue[1].data == {'numero': 'A-1'}
+
+
+def test_monitor_de_drive_persiste_fechas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    archivo = DriveFileInfo(file_id='f1', name='A-1.pdf', size=10,
+                            modified_time=datetime(2024, 5, 1, 12), created_time=datetime(2024, 5, 1, 11))
+    monitor = GoogleDriveMonitor(None)
+    monitor.known_files['f1'] = archivo
+    monitor.last_sync_time = datetime(2024, 5, 2)
+    monitor.change_events.append(FileChangeEvent(event_id='e1', file_info=archivo,
+                                                 change_type=FileChangeType.ADDED, detected_at=datetime(2024, 5, 2)))
+    monitor._save_persistent_state()
+    monitor.diario.cerrar()
+
+    recargado = GoogleDriveMonitor(None)
+    assert recargado.known_files == {'f1': archivo}
+    assert recargado.last_sync_time == datetime(2024, 5, 2)
+    assert [e.file_info for e in recargado.change_events] == [archivo]
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test del logging estructurado asíncrono
+Valida que el formateo ocurre en el hilo del QueueListener, que las
+categorías de debug apagadas no evalúan volcados, el límite de tasa, los
+niveles por módulo, el formato JSON y el ahorro por request frente a print()
+"""
+
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from logging.handlers import QueueListener
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import structured_logging
+from structured_logging import (ColaHandler, FiltroLimiteTasa, FormatoJSON, Perezoso,
+                                logger_debug, parsear_niveles, volcado_json)
+
+
+class _Memoria(logging.Handler):
+    def __init__(self, formato=None):
+        super().__init__()
+        self.lineas = []
+        self.setFormatter(formato or logging.Formatter('%(message)s'))
+
+    def emit(self, record):
+        self.lineas.append(self.format(record))
+
+
+def _pipeline(nombre):
+    """Logger aislado con ColaHandler → QueueListener → handler en memoria"""
+    destino = _Memoria()
+    cola = ColaHandler(queue.SimpleQueue())
+    listener = QueueListener(cola.queue, destino)
+    logger = logging.getLogger(f'test_structured.{nombre}')
+    logger.handlers = [cola]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    listener.start()
+    return logger, listener, destino
+
+
+def test_formateo_en_hilo_de_escritura():
+    logger, listener, destino = _pipeline('hilo')
+    hilos = []
+
+    def volcar():
+        hilos.append(threading.current_thread().name)
+        return {'a': 1}
+
+    try:
+        logger.info("Resultado: %s", Perezoso(volcar))
+        try:
+            raise ValueError('falla')
+        except ValueError:
+            logger.exception("Con traza")
+    finally:
+        listener.stop()
+
+    assert hilos and hilos[0] != threading.current_thread().name
+    assert destino.lineas[0] == "Resultado: {'a': 1}"
+    assert destino.lineas[1].startswith('Con traza') and 'ValueError: falla' in destino.lineas[1]
+
+
+def test_categoria_apagada_no_evalua(monkeypatch):
+    monkeypatch.setenv('LOG_DEBUG', 'otra')
+    logger = logger_debug('apagada_test')
+    llamadas = []
+    logger.debug("Volcado: %s", Perezoso(lambda: llamadas.append(1)))
+    assert not logger.isEnabledFor(logging.DEBUG) and llamadas == []
+
+    monkeypatch.setenv('LOG_DEBUG', 'encendida_test,otra')
+    assert logger_debug('encendida_test').isEnabledFor(logging.DEBUG)
+    assert logger_debug('encendida_test') is logging.getLogger('debug.encendida_test')
+    assert len(logging.getLogger('debug.encendida_test').filters) == 1
+
+
+def test_limite_de_tasa():
+    logger, listener, destino = _pipeline('tasa')
+    filtro = FiltroLimiteTasa(limite=3, ventana_s=0.05)
+    logger.addFilter(filtro)
+    try:
+        for k in range(10):
+            logger.debug("mensaje %d", k)
+        time.sleep(0.06)
+        logger.debug("siguiente ventana")
+    finally:
+        listener.stop()
+    assert destino.lineas == ['mensaje 0', 'mensaje 1', 'mensaje 2', '[+7 suprimidos] siguiente ventana']
+
+
+def test_niveles_y_formato_json():
+    assert parsear_niveles('supabase_manager=DEBUG, debug.pdf=info,invalido,x=NOPE') == {
+        'supabase_manager': logging.DEBUG, 'debug.pdf': logging.INFO}
+
+    registro = logging.LogRecord('cotizador.app', logging.INFO, __file__, 10,
+                                 "[GUARDAR] %s", ('A-1',), None)
+    registro.numero = 'A-1'
+    entrada = json.loads(FormatoJSON().format(registro))
+    assert entrada['mensaje'] == '[GUARDAR] A-1' and entrada['nivel'] == 'INFO'
+    assert entrada['numero'] == 'A-1' and entrada['logger'] == 'cotizador.app'
+    assert str(volcado_json({'ñ': [1, 2]})) == '{"ñ": [1, 2]}'
+
+
+def _cotizacion(n_items=40):
+    return {
+        'numeroCotizacion': 'CLIENTE-CWS-VE-001-R1-PROYECTO',
+        'datosGenerales': {'cliente': 'CLIENTE', 'revision': 1},
+        'condiciones': {'moneda': 'MXN', 'tipoCambio': 17.5, 'comentariosAdicionales': 'x' * 200},
+        'items': [{'descripcion': f'Item {k}', 'cantidad': 3, 'materiales': [{'material': 'ACERO', 'peso': 1.5}] * 5}
+                  for k in range(n_items)],
+    }
+
+
+def test_ahorro_por_request(tmp_path):
+    """Los print() síncronos del camino caliente vs. el pipeline con categorías de debug apagadas"""
+    datos = _cotizacion()
+    n = 200
+
+    with open(tmp_path / 'stdout.log', 'w', buffering=1) as salida, redirect_stdout(salida):
+        inicio = time.perf_counter()
+        for _ in range(n):
+            # Forma anterior: bloques [ISSUE1_DEBUG]/[FORM_DEBUG] + volcado del resultado
+            print(f"[FORM] Cliente='{datos['datosGenerales']['cliente']}' | Items={len(datos['items'])}")
+            for clave in ('numeroCotizacion', 'numeroCotizacionHidden'):
+                print(f"[ISSUE1_DEBUG] datos['{clave}']: '{datos.get(clave, 'NO_ENCONTRADO')}'")
+            print(f"[FORM_DEBUG] CONDICIONES COMPLETAS: {datos['condiciones']}")
+            for clave, valor in datos['condiciones'].items():
+                print(f"[FORM_DEBUG] {clave}: '{valor}'")
+            print(f"[FORM] Resultado guardado = {json.dumps(datos, indent=2, ensure_ascii=False)}")
+        con_print = (time.perf_counter() - inicio) / n
+
+    logger, listener, destino = _pipeline('ahorro')
+    logger.setLevel(logging.INFO)
+    log_form = logging.getLogger('test_structured.ahorro.debug')
+    try:
+        inicio = time.perf_counter()
+        for _ in range(n):
+            logger.info("[FORM] Cliente=%r | Items=%d", datos['datosGenerales']['cliente'], len(datos['items']))
+            log_form.debug("[ISSUE1_DEBUG] numeroCotizacion=%r numeroCotizacionHidden=%r",
+                           datos.get('numeroCotizacion'), datos.get('numeroCotizacionHidden'))
+            log_form.debug("[FORM_DEBUG] CONDICIONES COMPLETAS: %s", volcado_json(datos['condiciones']))
+            log_form.debug("[GUARDAR_DEBUG] Resultado guardado = %s", volcado_json(datos))
+        con_cola = (time.perf_counter() - inicio) / n
+    finally:
+        listener.stop()
+
+    print(f"\n[BENCH] print síncrono: {con_print * 1e6:.1f} µs/request | "
+          f"cola + debug apagado: {con_cola * 1e6:.1f} µs/request")
+    assert len(destino.lineas) == n
+    assert con_cola * 5 < con_print
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test de cotización por peso en lote
+Valida peso directo y por catálogo, validación de rangos, paridad con el
+motor de precios y rendimiento con cientos de estructuras
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from materials_catalog import MaterialsCatalog
+from pricing_engine import calcular_item
+from weight_quoting import MAX_ESTRUCTURAS, cotizar_lote
+
+CSV = '''Tipo de material,Peso,Ref de Peso
+"PTR 2"" x 2"" CAL 14",3.0,Peso x metro lineal
+LAMINA CAL 14,15.26,Peso x metro cuadrado
+'''
+
+
+@pytest.fixture
+def catalogo(tmp_path):
+    ruta = tmp_path / "materiales.csv"
+    ruta.write_text(CSV, encoding="utf-8")
+    return MaterialsCatalog(ruta_csv=str(ruta), ruta_snapshot=None)
+
+
+def test_peso_directo_igual_al_formulario():
+    """Mismo resultado que una partida COTIZAR_POR_PESO capturada en el formulario"""
+    resultado = cotizar_lote([{"descripcion": "Nave", "cantidad": 2, "pesoEstructura": "500",
+                               "precioKg": "25.50", "transporte": 1000, "seguridad": 10, "descuento": 5}])
+    linea = resultado["lineas"][0]
+    assert linea["subtotal"] == 12750.0
+    assert linea["pesoTotal"] == 1000.0
+
+    esperado = calcular_item({
+        "cantidad": "2", "transporte": "1000", "seguridad": "10", "descuento": "5",
+        "materiales": [{"material": "COTIZAR_POR_PESO", "pesoEstructura": "500", "precioKg": "25.50", "subtotal": "12750.00"}],
+    })
+    assert linea["costoUnidad"] == esperado["costoUnidad"]
+    assert linea["total"] == esperado["total"]
+    assert resultado["items"][0]["materiales"][0]["tipoCotizacion"] == "peso"
+
+
+def test_peso_desde_catalogo(catalogo):
+    resultado = cotizar_lote([
+        {"descripcion": "Rack", "cantidad": 3, "materiales": [
+            {"material": 'ptr 2" x 2" cal 14', "cantidad": 10},
+            {"material": "LAMINA CAL 14", "cantidad": 2},
+            {"material": "Especial", "pesoUnitario": 1.5, "cantidad": 4},
+        ]},
+    ], catalogo=catalogo, precio_kg=40)
+
+    linea = resultado["lineas"][0]
+    assert linea["errores"] == []
+    assert linea["pesoEstructura"] == 66.52  # 30 + 30.52 + 6
+    assert linea["subtotal"] == 2660.8
+    assert linea["total"] == 7982.4
+    assert resultado["resumen"]["kg_por_material"]['PTR 2" x 2" CAL 14'] == 90.0
+    assert resultado["resumen"]["peso_total"] == 199.56
+
+
+def test_errores_por_linea(catalogo):
+    resultado = cotizar_lote([
+        {"descripcion": "Sin precio", "pesoEstructura": 100},
+        {"descripcion": "Muy pesada", "pesoEstructura": 60000, "precioKg": 20},
+        {"descripcion": "Material desconocido", "precioKg": 20, "materiales": [{"material": "XYZ", "cantidad": 1}]},
+        {"descripcion": "Correcta", "pesoEstructura": 100, "precioKg": 20},
+        "no es dict",
+    ], catalogo=catalogo)
+
+    errores = [l["errores"] for l in resultado["lineas"]]
+    assert "precio_kg fuera de rango" in errores[0][0]
+    assert "peso_estructura fuera de rango" in errores[1][0]
+    assert errores[2][0] == "Material no encontrado en catálogo: XYZ"
+    assert errores[3] == []
+    assert errores[4][0] == "Estructura inválida"
+
+    resumen = resultado["resumen"]
+    assert (resumen["validas"], resumen["con_error"]) == (1, 4)
+    assert resumen["subtotal"] == 2000.0
+    assert resumen["iva"] == 320.0
+    assert resumen["total"] == 2320.0
+
+
+def test_entrada_invalida():
+    with pytest.raises(ValueError):
+        cotizar_lote(None)
+    with pytest.raises(ValueError):
+        cotizar_lote([{}] * (MAX_ESTRUCTURAS + 1))
+
+
+def test_lote_grande(catalogo):
+    estructuras = [
+        {"descripcion": f"Marco {k}", "cantidad": 1 + k % 5, "precioKg": 35,
+         "materiales": [{"material": 'PTR 2" x 2" CAL 14', "cantidad": 6 + k % 7},
+                        {"material": "LAMINA CAL 14", "cantidad": 1}]}
+        for k in range(MAX_ESTRUCTURAS)
+    ]
+    inicio = time.perf_counter()
+    resultado = cotizar_lote(estructuras, catalogo=catalogo)
+    assert resultado["resumen"]["validas"] == MAX_ESTRUCTURAS
+    assert time.perf_counter() - inicio < 5
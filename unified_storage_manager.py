@@ -30,6 +30,8 @@ from enum import Enum
 import logging
 from pathlib import Path
 
+from state_journal import DiarioEstado
+
 # Managers existentes
 from supabase_manager import SupabaseManager
 # CloudinaryManager eliminado - migrado a Supabase Storage
@@ -120,7 +122,8 @@ class UnifiedStorageManager:
         
         # Cola de operaciones pendientes
         self.pending_queue = []
-        self.queue_file = Path("pending_operations.json")
+        self.queue_file = Path("pending_operations.json")  # formato anterior (se migra una vez)
+        self.diario_pendientes = DiarioEstado(os.getenv('PENDING_QUEUE_JOURNAL', 'pending_operations.journal'))
         self._load_pending_queue()
         
         # Configuración
@@ -681,57 +684,61 @@ class UnifiedStorageManager:
             )
     
     def _add_to_pending_queue(self, operation: PendingOperation):
-        """Agregar operación a la cola de pendientes"""
+        """Agregar operación a la cola de pendientes (una línea en el diario)"""
         try:
             self.pending_queue.append(operation)
-            self._save_pending_queue()
+            self.diario_pendientes.poner(operation.operation_id, self._serializar_operacion(operation))
             logger.info(f"⏳ [QUEUE] Operación {operation.operation_id} agregada a cola")
         except Exception as e:
             logger.error(f"❌ [QUEUE] Error agregando a cola: {e}")
     
+    @staticmethod
+    def _serializar_operacion(operation: PendingOperation) -> Dict:
+        return {
+            'operation_id': operation.operation_id,
+            'operation_type': operation.operation_type.value,
+            'data': operation.data,
+            'target_systems': operation.target_systems,
+            'created_at': operation.created_at.isoformat(),
+            'retry_count': operation.retry_count,
+            'max_retries': operation.max_retries
+        }
+    
     def _load_pending_queue(self):
-        """Cargar cola de operaciones pendientes"""
+        """Cargar cola de operaciones pendientes desde el diario"""
         try:
-            if self.queue_file.exists():
+            if not self.diario_pendientes.existia and self.queue_file.exists():
+                # Migración única desde el JSON que se reescribía completo
                 with open(self.queue_file, 'r', encoding='utf-8') as f:
-                    queue_data = json.load(f)
-                
-                self.pending_queue = []
-                for op_data in queue_data:
-                    operation = PendingOperation(
-                        operation_id=op_data['operation_id'],
-                        operation_type=OperationType(op_data['operation_type']),
-                        data=op_data['data'],
-                        target_systems=op_data['target_systems'],
-                        created_at=datetime.datetime.fromisoformat(op_data['created_at']),
-                        retry_count=op_data.get('retry_count', 0),
-                        max_retries=op_data.get('max_retries', 3)
-                    )
-                    self.pending_queue.append(operation)
-                
+                    self.diario_pendientes.reemplazar({op['operation_id']: op for op in json.load(f)})
+                logger.info(f"📦 [QUEUE] Cola migrada de {self.queue_file} al diario")
+            
+            self.pending_queue = []
+            for _, op_data in self.diario_pendientes.items():
+                operation = PendingOperation(
+                    operation_id=op_data['operation_id'],
+                    operation_type=OperationType(op_data['operation_type']),
+                    data=op_data['data'],
+                    target_systems=op_data['target_systems'],
+                    created_at=datetime.datetime.fromisoformat(op_data['created_at']),
+                    retry_count=op_data.get('retry_count', 0),
+                    max_retries=op_data.get('max_retries', 3)
+                )
+                self.pending_queue.append(operation)
+            
+            if self.pending_queue:
                 logger.info(f"📂 [QUEUE] {len(self.pending_queue)} operaciones pendientes cargadas")
         except Exception as e:
             logger.error(f"❌ [QUEUE] Error cargando cola: {e}")
             self.pending_queue = []
     
     def _save_pending_queue(self):
-        """Guardar cola de operaciones pendientes"""
+        """Guardar cola de operaciones pendientes (solo las que cambiaron)"""
         try:
-            queue_data = []
-            for operation in self.pending_queue:
-                queue_data.append({
-                    'operation_id': operation.operation_id,
-                    'operation_type': operation.operation_type.value,
-                    'data': operation.data,
-                    'target_systems': operation.target_systems,
-                    'created_at': operation.created_at.isoformat(),
-                    'retry_count': operation.retry_count,
-                    'max_retries': operation.max_retries
-                })
-            
-            with open(self.queue_file, 'w', encoding='utf-8') as f:
-                json.dump(queue_data, f, ensure_ascii=False, indent=2)
-                
+            self.diario_pendientes.reemplazar({
+                operation.operation_id: self._serializar_operacion(operation)
+                for operation in self.pending_queue
+            })
         except Exception as e:
             logger.error(f"❌ [QUEUE] Error guardando cola: {e}")
     
@@ -904,6 +911,7 @@ class UnifiedStorageManager:
             if self.pending_queue:
                 logger.info("⏳ [SHUTDOWN] Procesando operaciones pendientes finales...")
                 self._process_pending_operations()
+            self.diario_pendientes.cerrar()
             
             # Cerrar conexiones
             if hasattr(self.supabase, 'close'):
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+COTIZACIÓN POR PESO EN LOTE
+===========================
+
+Versión por lote del flujo "Cotizar por peso" del formulario: recibe cientos
+de estructuras (p. ej. derivadas de un BOM) y calcula peso, subtotal, costo
+por unidad y total de todas en pasadas sobre columnas array.array.
+
+Cada estructura define su peso de dos formas:
+- Directo:   {"pesoEstructura": 500}
+- Catálogo:  {"materiales": [{"material": "PTR 2\\" x 2\\" CAL 14", "cantidad": 12.5}]}
+             peso = Σ peso unitario del catálogo (kg/m, kg/m²) × cantidad (m, m²);
+             un material fuera del catálogo puede traer "pesoUnitario"
+
+Pasadas:
+1. Resolver referencias al catálogo (una búsqueda por material distinto) y
+   acumular kg de todos los materiales sobre el índice de su estructura
+2. Validar rangos de peso y $/kg (mismos límites que
+   SecurityValidator.validate_peso_estructura / validate_precio_kg)
+3. Subtotal = peso × $/kg y fórmula de partida (seguridad, descuento,
+   cantidad) con pricing_engine.LoteItems sobre las partidas resultantes
+
+Las partidas generadas tienen el mismo formato que las del formulario
+(material COTIZAR_POR_PESO), así que pueden guardarse tal cual.
+"""
+
+from array import array
+from collections import defaultdict
+from typing import Dict, List
+
+from pricing_engine import LoteItems, convertir_numero, redondear, resumen_cotizacion
+from security_validation import SecurityValidator
+
+MAX_ESTRUCTURAS = 5000
+
+
+def _en_rango(valor: float, minimo: float, maximo: float) -> bool:
+    return minimo <= valor <= maximo
+
+
+def cotizar_lote(estructuras: List[Dict], catalogo=None, precio_kg: float = None,
+                 seguridad: float = 0.0, descuento: float = 0.0) -> Dict:
+    """
+    Cotiza un lote de estructuras por peso.
+
+    Args:
+        estructuras: Lista de estructuras (ver docstring del módulo)
+        catalogo: MaterialsCatalog para resolver materiales por descripción
+        precio_kg, seguridad, descuento: Defaults para estructuras que no los traen
+
+    Returns:
+        Dict con 'lineas' (resultado por estructura), 'items' (partidas válidas
+        en formato del formulario) y 'resumen' (agregados)
+
+    Raises:
+        ValueError: Si la entrada no es una lista o excede MAX_ESTRUCTURAS
+    """
+    if not isinstance(estructuras, list):
+        raise ValueError("'estructuras' debe ser una lista")
+    if len(estructuras) > MAX_ESTRUCTURAS:
+        raise ValueError(f"Máximo {MAX_ESTRUCTURAS} estructuras por lote")
+
+    n = len(estructuras)
+    peso = array('d', [0.0]) * n
+    precio = array('d', [0.0]) * n
+    cantidad = array('d', [1.0]) * n
+    errores = [[] for _ in range(n)]
+    kg_por_material = defaultdict(float)
+
+    # ── Pasada 1: referencias al catálogo, aplanadas ──
+    ref_estructura, ref_kg = array('I'), array('d')
+    ref_nombre = []
+    resueltos = {}
+
+    for i, estructura in enumerate(estructuras):
+        if not isinstance(estructura, dict):
+            errores[i].append("Estructura inválida")
+            continue
+        precio[i] = convertir_numero(estructura.get('precioKg'), convertir_numero(precio_kg))
+        cantidad_estructura = convertir_numero(estructura.get('cantidad'), 1.0)
+        cantidad[i] = cantidad_estructura if cantidad_estructura > 0 else 1.0
+
+        materiales = estructura.get('materiales')
+        if not materiales:
+            peso[i] = convertir_numero(estructura.get('pesoEstructura'))
+            continue
+
+        for mat in materiales if isinstance(materiales, list) else []:
+            if not isinstance(mat, dict):
+                continue
+            nombre = str(mat.get('material') or mat.get('descripcion') or '').strip()
+            peso_unitario = mat.get('pesoUnitario')
+            if peso_unitario is None:
+                if nombre not in resueltos:
+                    resueltos[nombre] = catalogo.obtener(nombre) if catalogo else None
+                encontrado = resueltos[nombre]
+                if encontrado is None:
+                    errores[i].append(f"Material no encontrado en catálogo: {nombre}")
+                    continue
+                peso_unitario, nombre = encontrado['peso'], encontrado['descripcion']
+            ref_estructura.append(i)
+            ref_kg.append(convertir_numero(peso_unitario) * convertir_numero(mat.get('cantidad')))
+            ref_nombre.append(nombre)
+
+    for i, kg, nombre in zip(ref_estructura, ref_kg, ref_nombre):
+        peso[i] += kg
+        kg_por_material[nombre] += kg * cantidad[i]
+
+    # ── Pasada 2: validación de rangos ──
+    validador = SecurityValidator
+    for i in range(n):
+        peso[i] = redondear(peso[i])
+        precio[i] = redondear(precio[i])
+        if not _en_rango(peso[i], validador.MIN_PESO, validador.MAX_PESO):
+            errores[i].append(f"peso_estructura fuera de rango: {peso[i]} "
+                              f"(válido: {validador.MIN_PESO}-{validador.MAX_PESO})")
+        if not _en_rango(precio[i], validador.MIN_PRECIO, validador.MAX_PRECIO):
+            errores[i].append(f"precio_kg fuera de rango: {precio[i]} "
+                              f"(válido: {validador.MIN_PRECIO}-{validador.MAX_PRECIO})")
+
+    # ── Pasada 3: partidas y fórmula del motor de precios ──
+    items, indices_validos = [], []
+    for i, estructura in enumerate(estructuras):
+        if errores[i]:
+            continue
+        subtotal = redondear(peso[i] * precio[i])
+        items.append({
+            'descripcion': estructura.get('descripcion') or f"Estructura {i + 1}",
+            'cantidad': cantidad[i],
+            'uom': estructura.get('uom') or 'Pieza',
+            'materiales': [{
+                'material': 'COTIZAR_POR_PESO',
+                'pesoEstructura': peso[i],
+                'precioKg': precio[i],
+                'subtotal': subtotal,
+                'tipoCotizacion': 'peso',
+            }],
+            'otrosMateriales': [],
+            'transporte': convertir_numero(estructura.get('transporte')),
+            'instalacion': convertir_numero(estructura.get('instalacion')),
+            'seguridad': convertir_numero(estructura.get('seguridad'), convertir_numero(seguridad)),
+            'descuento': convertir_numero(estructura.get('descuento'), convertir_numero(descuento)),
+        })
+        indices_validos.append(i)
+
+    lote = LoteItems(items)
+    lineas = []
+    posicion = {i: k for k, i in enumerate(indices_validos)}
+    peso_total = 0.0
+    for i, estructura in enumerate(estructuras):
+        linea = {
+            'indice': i,
+            'descripcion': estructura.get('descripcion') if isinstance(estructura, dict) else None,
+            'pesoEstructura': peso[i],
+            'precioKg': precio[i],
+            'errores': errores[i],
+        }
+        k = posicion.get(i)
+        if k is not None:
+            item = items[k]
+            resultado = lote.resultado(k)
+            item['costoUnidad'] = resultado['costoUnidad']
+            item['total'] = resultado['total']
+            peso_total += peso[i] * cantidad[i]
+            linea.update({
+                'cantidad': cantidad[i],
+                'pesoTotal': redondear(peso[i] * cantidad[i]),
+                'subtotal': item['materiales'][0]['subtotal'],
+                'costoUnidad': resultado['costoUnidad'],
+                'total': resultado['total'],
+            })
+        lineas.append(linea)
+
+    resumen = resumen_cotizacion(items)
+    resumen.update({
+        'estructuras': n,
+        'validas': len(items),
+        'con_error': n - len(items),
+        'peso_total': redondear(peso_total),
+        'kg_por_material': {nombre: redondear(kg) for nombre, kg in
+                            sorted(kg_por_material.items(), key=lambda kv: -kv[1])},
+    })
+    return {'lineas': lineas, 'items': items, 'resumen': resumen}